@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+PlanB Motoru - Dağıtık analiz işçisi
+
+Redis'teki pazar shard'lı analiz kuyruğundan (src/core/analysis_queue.py) toplu iş alır,
+analyze_symbol_fast ile yerel thread havuzunda analiz eder ve sonuçları ortak
+`analysis_results` akışına yazar. Aynı Redis'e bağlı birden fazla süreç/düğüm bir taramayı
+paylaşır; ölen işçinin işleri görünürlük süresi sonunda diğerlerine geçer. docker collector'ın
+`analysis_queue` listesine yazdığı istekler de akışlara aktarılır.
+
+Kullanım:
+    python analysis_worker.py --redis-url redis://localhost:6379/0 --markets BIST,XETRA \\
+        --batch-size 32 --threads 10 --visibility-timeout 300
+    python analysis_worker.py --stats
+"""
+
+import argparse
+import json
+import os
+import sys
+
+sys.path.append(os.path.dirname(__file__))
+
+from src.core.analysis_queue import AnalysisWorkQueue, AnalysisWorker, create_broker
+
+
+def main():
+    parser = argparse.ArgumentParser(description="PlanB distributed analysis worker")
+    parser.add_argument("--redis-url", default=os.getenv('REDIS_URL'))
+    parser.add_argument("--markets", default=os.getenv('ANALYSIS_WORKER_MARKETS', ''),
+                        help="Virgülle ayrılmış shard listesi (boşsa tüm pazarlar)")
+    parser.add_argument("--name", default=None, help="Tüketici adı (varsayılan host-pid)")
+    parser.add_argument("--batch-size", type=int, default=int(os.getenv('ANALYSIS_BATCH_SIZE', '32')))
+    parser.add_argument("--threads", type=int, default=int(os.getenv('MAX_WORKERS', '10')))
+    parser.add_argument("--visibility-timeout", type=float, default=300.0)
+    parser.add_argument("--max-deliveries", type=int, default=3)
+    parser.add_argument("--until-idle", action="store_true", help="Kuyruk boşalınca çık")
+    parser.add_argument("--stats", action="store_true", help="Kuyruk durumunu yazdır ve çık")
+    args = parser.parse_args()
+    if not args.redis_url:
+        parser.error("--redis-url veya REDIS_URL gerekli (süreç içi broker düğümler arası paylaşılmaz)")
+
+    queue = AnalysisWorkQueue(create_broker(args.redis_url), visibility_timeout=args.visibility_timeout,
+                              max_deliveries=args.max_deliveries)
+    if args.stats:
+        print(json.dumps(queue.get_stats(), indent=2, ensure_ascii=False))
+        return
+
+    from telegram_full_trader_with_sentiment import analyze_symbol_fast, prefetch_sentiment
+
+    markets = [m.strip() for m in args.markets.split(',') if m.strip()] or None
+    worker = AnalysisWorker(queue, analyze_symbol_fast, name=args.name, markets=markets,
+                            batch_size=args.batch_size, max_workers=args.threads,
+                            prefetch_fn=prefetch_sentiment)
+    print(f"⚙️ Analiz işçisi {worker.name}: {', '.join(markets or ['tüm pazarlar'])}, "
+          f"parti {args.batch_size}, {args.threads} thread")
+    try:
+        worker.run(until_idle=args.until_idle)
+    except KeyboardInterrupt:
+        print("👋 İşçi durduruldu")
+    print(f"📊 {worker.stats}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+PlanB Motoru - Ultra API Load Test
+Sabit hızlı (open-loop) yük ile p50/p99 gecikme ölçümü
+
+Kullanım:
+    python ultra_api_server.py &
+    python api_load_test.py --rps 100 1000 --duration 10
+    python api_load_test.py --endpoint predict_batch --batch-size 50
+"""
+
+import argparse
+import asyncio
+import random
+import time
+from typing import Dict, List
+
+import aiohttp
+import numpy as np
+
+DEFAULT_URL = "http://localhost:8001"
+
+ENDPOINTS = {
+    "predict": ("POST", "/api/v1/ml/predict"),
+    "predict_batch": ("POST", "/api/v1/ml/predict_batch"),
+    "market_data": ("GET", "/api/v1/market-data"),
+    "analysis": ("GET", "/api/v1/analysis"),
+}
+
+
+def _random_features() -> Dict[str, float]:
+    return {
+        "rsi": random.uniform(10, 90),
+        "macd": random.gauss(0, 0.5),
+        "volume": random.randint(100000, 5000000),
+        "price_change": random.gauss(0, 2),
+    }
+
+
+def _payload(endpoint: str, batch_size: int):
+    if endpoint == "predict":
+        return {"symbol": f"LOAD{random.randint(0, 999)}", "features": _random_features()}
+    if endpoint == "predict_batch":
+        return {"requests": [
+            {"symbol": f"LOAD{i}", "features": _random_features()} for i in range(batch_size)
+        ]}
+    return None
+
+
+async def _one_request(session: aiohttp.ClientSession, method: str, url: str, payload,
+                       latencies: List[float], errors: List[int]):
+    start = time.perf_counter()
+    try:
+        async with session.request(method, url, json=payload) as response:
+            await response.read()
+            if response.status != 200:
+                errors.append(response.status)
+                return
+    except Exception:
+        errors.append(-1)
+        return
+    latencies.append((time.perf_counter() - start) * 1000)
+
+
+async def run_load(base_url: str, endpoint: str, rps: int, duration: float, batch_size: int) -> Dict:
+    """Hedef hızda istek üret, gecikme yüzdeliklerini döndür"""
+    method, path = ENDPOINTS[endpoint]
+    url = base_url + path
+    latencies: List[float] = []
+    errors: List[int] = []
+    total = int(rps * duration)
+    interval = 1.0 / rps
+
+    connector = aiohttp.TCPConnector(limit=0)
+    timeout = aiohttp.ClientTimeout(total=30)
+    async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+        tasks = []
+        started = time.perf_counter()
+        for i in range(total):
+            # Open-loop: yavaş yanıtlar sonraki isteklerin gönderimini geciktirmez
+            delay = started + i * interval - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            tasks.append(asyncio.create_task(
+                _one_request(session, method, url, _payload(endpoint, batch_size), latencies, errors)
+            ))
+        await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - started
+
+    values = np.array(latencies) if latencies else np.array([np.nan])
+    return {
+        "endpoint": endpoint,
+        "target_rps": rps,
+        "achieved_rps": round(len(latencies) / elapsed, 1),
+        "requests": total,
+        "errors": len(errors),
+        "p50_ms": round(float(np.percentile(values, 50)), 2),
+        "p99_ms": round(float(np.percentile(values, 99)), 2),
+        "max_ms": round(float(np.max(values)), 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="PlanB Ultra API load test")
+    parser.add_argument("--url", default=DEFAULT_URL)
+    parser.add_argument("--endpoint", choices=sorted(ENDPOINTS), default="predict")
+    parser.add_argument("--rps", type=int, nargs="+", default=[100, 1000])
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--batch-size", type=int, default=50)
+    args = parser.parse_args()
+
+    print(f"🚀 Load test: {args.url} [{args.endpoint}] {args.duration:.0f}s per step")
+    print(f"{'target':>8} {'achieved':>9} {'errors':>7} {'p50 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+    for rps in args.rps:
+        result = asyncio.run(run_load(args.url, args.endpoint, rps, args.duration, args.batch_size))
+        print(f"{result['target_rps']:>8} {result['achieved_rps']:>9} {result['errors']:>7} "
+              f"{result['p50_ms']:>9} {result['p99_ms']:>9} {result['max_ms']:>9}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+PlanB Motoru - Backup benchmark
+
+Sentetik bir veri ağacında ilk (tam) ve artımlı snapshot süresini, yazılan bayt miktarını
+ve geri yükleme hızını ölçer; aynı ağaçta eski "kopyala + zip + şifrele" yolu ile karşılaştırır.
+
+Kullanım:
+    python backup_benchmark.py --size-mb 512 --files 200 --change-pct 2
+"""
+
+import argparse
+import os
+import random
+import shutil
+import tempfile
+import time
+import zipfile
+
+from src.offline.backup_store import BackupStore
+from src.security.encryption_manager import encryption_manager
+
+
+def write_tree(root: str, size_mb: int, files: int, seed: int = 7):
+    """Yarı sıkıştırılabilir dosyalardan oluşan örnek veri ağacı"""
+    rng = random.Random(seed)
+    per_file = size_mb * 1024 * 1024 // files
+    for i in range(files):
+        path = os.path.join(root, f"dir{i % 10}", f"file{i:04d}.bin")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(rng.randbytes(per_file // 2) + b"PlanB" * (per_file // 10))
+
+
+def touch_tree(root: str, change_pct: float, seed: int = 11):
+    """Dosyaların bir kısmının ortasına küçük değişiklik yaz"""
+    rng = random.Random(seed)
+    paths = sorted(os.path.join(r, f) for r, _, fs in os.walk(root) for f in fs)
+    for path in rng.sample(paths, max(1, int(len(paths) * change_pct / 100))):
+        with open(path, 'r+b') as f:
+            f.seek(os.path.getsize(path) // 2)
+            f.write(rng.randbytes(4096))
+
+
+def legacy_backup(source: str, dest: str) -> float:
+    """Eski yol: tüm ağacı kopyala, zip'le, akış halinde şifrele"""
+    started = time.perf_counter()
+    shutil.copytree(source, dest)
+    with zipfile.ZipFile(f"{dest}.zip", 'w', zipfile.ZIP_DEFLATED) as zipf:
+        for root, _, files in os.walk(dest):
+            for filename in files:
+                path = os.path.join(root, filename)
+                zipf.write(path, os.path.relpath(path, dest))
+    shutil.rmtree(dest)
+    encryption_manager.encrypt_file(f"{dest}.zip", f"{dest}.zip.enc")
+    os.remove(f"{dest}.zip")
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description="PlanB backup benchmark")
+    parser.add_argument("--size-mb", type=int, default=512)
+    parser.add_argument("--files", type=int, default=200)
+    parser.add_argument("--change-pct", type=float, default=2.0)
+    parser.add_argument("--workers", type=int, default=min(4, os.cpu_count() or 1))
+    parser.add_argument("--skip-legacy", action="store_true")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        source = os.path.join(tmp, "data")
+        write_tree(source, args.size_mb, args.files)
+        store = BackupStore(os.path.join(tmp, "backups"), workers=args.workers)
+
+        started = time.perf_counter()
+        full = store.create_snapshot("tam", {'data': source})
+        elapsed = time.perf_counter() - started
+        print(f"📦 İlk snapshot: {elapsed:.2f}s ({args.size_mb / elapsed:,.0f} MB/s), "
+              f"{full['bytes_stored'] / 1024 / 1024:.1f} MB yazıldı")
+
+        started = time.perf_counter()
+        same = store.create_snapshot("degismeyen", {'data': source})
+        print(f"⚡ Değişiklik yok: {(time.perf_counter() - started) * 1000:.0f} ms, "
+              f"{same['files_reused']} dosya yeniden kullanıldı")
+
+        touch_tree(source, args.change_pct)
+        started = time.perf_counter()
+        incremental = store.create_snapshot("artimli", {'data': source})
+        print(f"🔁 Artımlı (%{args.change_pct:g} dosya değişti): {time.perf_counter() - started:.2f}s, "
+              f"{incremental['chunks_new']} yeni parça, {incremental['bytes_stored'] / 1024 / 1024:.2f} MB yazıldı")
+
+        started = time.perf_counter()
+        listed = store.list_snapshots()
+        print(f"📋 Listeleme: {len(listed)} snapshot, {(time.perf_counter() - started) * 1000:.1f} ms")
+
+        started = time.perf_counter()
+        restored = store.restore_snapshot("artimli", os.path.join(tmp, "restore"))
+        elapsed = time.perf_counter() - started
+        print(f"♻️ Doğrulamalı geri yükleme: {elapsed:.2f}s ({restored / 1024 / 1024 / elapsed:,.0f} MB/s)")
+
+        if not args.skip_legacy:
+            elapsed = legacy_backup(source, os.path.join(tmp, "legacy"))
+            print(f"🐢 Eski yol (her seferinde tam kopya + zip + şifre): {elapsed:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
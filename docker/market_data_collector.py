@@ -6,16 +6,24 @@ Polygon/Tiingo (stocks) + Binance (crypto) data feeds
 """
 
 import asyncio
+import csv
+import functools
+import io
 import logging
 import os
 import json
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Callable, Iterable
 import pandas as pd
 import numpy as np
 from dataclasses import dataclass, asdict
 import psycopg2
 from psycopg2.extras import RealDictCursor
+from psycopg2.pool import ThreadedConnectionPool
 import redis
 import aiohttp
 import time
@@ -33,6 +41,10 @@ try:
 except ImportError:
     BINANCE_AVAILABLE = False
 
+# Shared PlanB modules (market archive is also the loader's cold tier)
+sys.path.append(os.getenv('PLANB_ROOT', '/app'))
+from src.storage.market_archive import MarketArchive
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -53,144 +65,396 @@ class MarketDataPoint:
     volume: int
     adjusted_close: Optional[float] = None
 
-class PolygonDataProvider:
+def env_list(name: str, default: List[str]) -> List[str]:
+    """Comma separated list from the environment"""
+    value = os.getenv(name)
+    return [item.strip() for item in value.split(',') if item.strip()] if value else list(default)
+
+
+def to_millis(timestamp: datetime) -> int:
+    return int(timestamp.timestamp() * 1000)
+
+
+class AsyncRateLimiter:
+    """Token bucket shared by every request to one provider (rate <= 0: unlimited)"""
+
+    def __init__(self, rate: float, burst: Optional[int] = None):
+        self.rate = rate
+        self.capacity = burst or max(1, int(rate))
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        if self.rate <= 0:
+            return
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class FanOutExecutor:
+    """Runs blocking provider SDK calls concurrently
+
+    Concurrency is bounded per provider (own worker threads + semaphore) and every
+    call takes a token from the provider's rate limiter first. Failed items are
+    logged and skipped so one bad symbol does not drop the whole cycle.
+    """
+
+    def __init__(self, name: str, max_concurrency: int = 8, rate_limiter: Optional[AsyncRateLimiter] = None):
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.rate_limiter = rate_limiter
+        self._pool = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix=f"{name}-fetch")
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self.stats = {'calls': 0, 'errors': 0}
+
+    async def call(self, fn: Callable, *args, **kwargs):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        async with self._semaphore:
+            if self.rate_limiter:
+                await self.rate_limiter.acquire()
+            self.stats['calls'] += 1
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._pool, functools.partial(fn, *args, **kwargs))
+
+    async def _guarded(self, fn: Callable, item):
+        try:
+            return await self.call(fn, item)
+        except Exception as e:
+            self.stats['errors'] += 1
+            logger.error(f"{self.name} fetch error for {item}: {e}")
+            return None
+
+    async def map(self, fn: Callable, items: Iterable) -> List[Any]:
+        """fn(item) for every item, results in input order (None for failures)"""
+        return await asyncio.gather(*(self._guarded(fn, item) for item in items))
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False)
+
+
+class IncrementalProvider:
+    """Tracks the last stored bar per symbol so each cycle only fetches newer bars
+
+    The last bar itself is fetched again (inclusive start) so a still-forming
+    minute bar gets its final values upserted.
+    """
+
+    def __init__(self, name: str, max_concurrency: int, requests_per_second: float,
+                 rate_limiter: Optional[AsyncRateLimiter] = None):
+        self.executor = FanOutExecutor(name, max_concurrency,
+                                       rate_limiter or AsyncRateLimiter(requests_per_second))
+        self.last_timestamps: Dict[str, datetime] = {}
+
+    def seed_last_timestamps(self, timestamps: Dict[str, datetime]):
+        """Resume from the database: keep whichever timestamp is newer"""
+        for symbol, timestamp in timestamps.items():
+            current = self.last_timestamps.get(symbol)
+            if timestamp is not None and (current is None or timestamp > current):
+                self.last_timestamps[symbol] = timestamp
+
+    def _advance(self, symbol: str, points: List[MarketDataPoint]) -> List[MarketDataPoint]:
+        last = self.last_timestamps.get(symbol)
+        if last is not None:
+            points = [point for point in points if point.timestamp >= last]
+        if points:
+            self.last_timestamps[symbol] = max(point.timestamp for point in points)
+        return points
+
+    async def _fan_out(self, fetch_symbol: Callable, symbols: List[str]) -> List[MarketDataPoint]:
+        data_points = []
+        for points in await self.executor.map(fetch_symbol, symbols):
+            if points:
+                data_points.extend(points)
+        return data_points
+
+
+class PolygonDataProvider(IncrementalProvider):
     """Polygon.io data provider for stocks"""
     
-    def __init__(self, api_key: str):
+    def __init__(self, api_key: str, max_concurrency: int = 8, requests_per_second: float = 50,
+                 rate_limiter: Optional[AsyncRateLimiter] = None, client=None):
+        super().__init__("polygon", max_concurrency, requests_per_second, rate_limiter)
         self.api_key = api_key
-        self.client = PolygonClient(api_key) if POLYGON_AVAILABLE else None
+        self.client = client or (PolygonClient(api_key) if POLYGON_AVAILABLE else None)
+
+    def _fetch_symbol(self, symbol: str) -> List[MarketDataPoint]:
+        """Minute bars since the last stored bar (today's session on first fetch); runs in a worker thread"""
+        today = datetime.now().strftime("%Y-%m-%d")
+        last = self.last_timestamps.get(symbol)
+        bars = self.client.get_aggs(
+            ticker=symbol,
+            multiplier=1,
+            timespan="minute",
+            from_=to_millis(last) if last else today,
+            to=today
+        )
+        points = [
+            MarketDataPoint(
+                timestamp=datetime.fromtimestamp(bar.timestamp / 1000),
+                symbol=symbol,
+                market="BIST" if symbol.endswith(".IS") else "NASDAQ",
+                open=bar.open,
+                high=bar.high,
+                low=bar.low,
+                close=bar.close,
+                volume=int(bar.volume) if bar.volume is not None else None,
+                adjusted_close=bar.close
+            )
+            for bar in bars or []
+        ]
+        return self._advance(symbol, points)
         
     async def get_realtime_data(self, symbols: List[str]) -> List[MarketDataPoint]:
         """Get real-time stock data"""
-        data_points = []
-        
         if not self.client:
             logger.warning("Polygon client not available")
-            return data_points
-            
-        try:
-            for symbol in symbols:
-                # Get current day's data
-                bars = self.client.get_aggs(
-                    ticker=symbol,
-                    multiplier=1,
-                    timespan="minute",
-                    from_=datetime.now().strftime("%Y-%m-%d"),
-                    to=datetime.now().strftime("%Y-%m-%d")
-                )
-                
-                for bar in bars:
-                    data_point = MarketDataPoint(
-                        timestamp=datetime.fromtimestamp(bar.timestamp / 1000),
-                        symbol=symbol,
-                        market="BIST" if symbol.endswith(".IS") else "NASDAQ",
-                        open=bar.open,
-                        high=bar.high,
-                        low=bar.low,
-                        close=bar.close,
-                        volume=bar.volume,
-                        adjusted_close=bar.close
-                    )
-                    data_points.append(data_point)
-                    
-        except Exception as e:
-            logger.error(f"Polygon data fetch error: {e}")
-            
-        return data_points
+            return []
+        return await self._fan_out(self._fetch_symbol, symbols)
 
-class BinanceDataProvider:
+class BinanceDataProvider(IncrementalProvider):
     """Binance data provider for crypto"""
     
-    def __init__(self, api_key: str, secret_key: str):
+    def __init__(self, api_key: str, secret_key: str, max_concurrency: int = 8,
+                 requests_per_second: float = 10, rate_limiter: Optional[AsyncRateLimiter] = None,
+                 client=None):
+        super().__init__("binance", max_concurrency, requests_per_second, rate_limiter)
         self.api_key = api_key
         self.secret_key = secret_key
-        self.client = BinanceClient(api_key, secret_key) if BINANCE_AVAILABLE else None
+        self.client = client or (BinanceClient(api_key, secret_key) if BINANCE_AVAILABLE else None)
+
+    def _fetch_symbol(self, symbol: str) -> List[MarketDataPoint]:
+        """1m klines since the last stored one (latest kline on first fetch); runs in a worker thread"""
+        last = self.last_timestamps.get(symbol)
+        if last:
+            klines = self.client.get_klines(symbol=symbol, interval='1m', startTime=to_millis(last), limit=1000)
+        else:
+            klines = self.client.get_klines(symbol=symbol, interval='1m', limit=1)
+        points = [
+            MarketDataPoint(
+                timestamp=datetime.fromtimestamp(kline[0] / 1000),
+                symbol=symbol,
+                market="CRYPTO",
+                open=float(kline[1]),
+                high=float(kline[2]),
+                low=float(kline[3]),
+                close=float(kline[4]),
+                volume=int(float(kline[5])),
+                adjusted_close=float(kline[4])
+            )
+            for kline in klines or []
+        ]
+        return self._advance(symbol, points)
         
     async def get_realtime_data(self, symbols: List[str]) -> List[MarketDataPoint]:
         """Get real-time crypto data"""
-        data_points = []
-        
         if not self.client:
             logger.warning("Binance client not available")
-            return data_points
-            
-        try:
-            # Get 24hr ticker statistics
-            tickers = self.client.get_ticker()
-            
-            for ticker in tickers:
-                if ticker['symbol'] in symbols:
-                    # Get recent klines (candlestick data)
-                    klines = self.client.get_klines(
-                        symbol=ticker['symbol'],
-                        interval='1m',
-                        limit=1
-                    )
-                    
-                    if klines:
-                        kline = klines[0]
-                        data_point = MarketDataPoint(
-                            timestamp=datetime.fromtimestamp(kline[0] / 1000),
-                            symbol=ticker['symbol'],
-                            market="CRYPTO",
-                            open=float(kline[1]),
-                            high=float(kline[2]),
-                            low=float(kline[3]),
-                            close=float(kline[4]),
-                            volume=int(float(kline[5])),
-                            adjusted_close=float(kline[4])
-                        )
-                        data_points.append(data_point)
-                        
-        except Exception as e:
-            logger.error(f"Binance data fetch error: {e}")
-            
-        return data_points
+            return []
+        return await self._fan_out(self._fetch_symbol, symbols)
+
+MARKET_DATA_COLUMNS = (
+    'timestamp', 'symbol', 'market', 'open', 'high', 'low', 'close', 'volume', 'adjusted_close'
+)
+
 
 class DatabaseManager:
-    """PostgreSQL/TimescaleDB manager"""
-    
-    def __init__(self, db_url: str):
+    """PostgreSQL/TimescaleDB manager
+
+    Connections come from a thread-safe pool. Bars are buffered by (timestamp, symbol)
+    and flushed in batches: COPY into a per-connection temp staging table, then a
+    single INSERT ... SELECT ... ON CONFLICT merge into the hypertable.
+    """
+
+    def __init__(self, db_url: str, min_connections: int = 1, max_connections: int = 5,
+                 table: str = 'market_data', batch_size: int = 50000,
+                 flush_rows: int = 5000, flush_interval: float = 60, max_pending: int = 500000,
+                 pool=None):
         self.db_url = db_url
-        
-    def save_market_data(self, data_points: List[MarketDataPoint]):
-        """Save market data to TimescaleDB hypertable"""
+        self.min_connections = min_connections
+        self.max_connections = max_connections
+        self.table = table
+        self.staging_table = f"{table}_staging"
+        self.batch_size = batch_size
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._pool = pool
+        self._pool_lock = threading.Lock()
+        self._pending: Dict[tuple, MarketDataPoint] = {}
+        self._pending_lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self.last_flush = time.time()
+        self.stats = {'rows_written': 0, 'flushes': 0, 'flush_seconds': 0.0,
+                      'duplicates_merged': 0, 'rows_dropped': 0, 'flush_errors': 0}
+
+    @property
+    def pool(self):
+        """Connection pool (created on first use)"""
+        if self._pool is None:
+            with self._pool_lock:
+                if self._pool is None:
+                    self._pool = ThreadedConnectionPool(self.min_connections, self.max_connections, self.db_url)
+        return self._pool
+
+    @contextmanager
+    def connection(self):
+        """Borrow a pooled connection; commit on success, rollback on error"""
+        conn = self.pool.getconn()
+        try:
+            yield conn
+            conn.commit()
+        except Exception:
+            if not conn.closed:
+                conn.rollback()
+            raise
+        finally:
+            self.pool.putconn(conn, close=bool(conn.closed))
+
+    def close(self):
+        """Flush pending bars and close all pooled connections"""
+        self.flush()
+        if self._pool is not None:
+            self._pool.closeall()
+            self._pool = None
+
+    # ------------------------------------------------------------------
+    # Buffered ingestion
+    # ------------------------------------------------------------------
+
+    def add(self, data_points: List[MarketDataPoint]):
+        """Buffer bars for the next flush (later bars replace earlier ones with the same key)"""
+        with self._pending_lock:
+            for point in data_points:
+                key = (point.timestamp, point.symbol)
+                if key in self._pending:
+                    self.stats['duplicates_merged'] += 1
+                    del self._pending[key]
+                self._pending[key] = point
+            overflow = len(self._pending) - self.max_pending
+            if overflow > 0:
+                # Database unreachable for too long: drop the oldest buffered bars
+                for key in list(self._pending)[:overflow]:
+                    del self._pending[key]
+                self.stats['rows_dropped'] += overflow
+                logger.warning(f"Market data buffer full, dropped {overflow} oldest points")
+
+    @property
+    def pending_count(self) -> int:
+        return len(self._pending)
+
+    def flush_due(self) -> bool:
+        return bool(self._pending) and (len(self._pending) >= self.flush_rows
+                                        or time.time() - self.last_flush >= self.flush_interval)
+
+    def flush_if_due(self) -> int:
+        return self.flush() if self.flush_due() else 0
+
+    def flush(self) -> int:
+        """Write all buffered bars; on failure they stay buffered for the next attempt"""
+        with self._flush_lock:
+            with self._pending_lock:
+                if not self._pending:
+                    return 0
+                batch, self._pending = self._pending, {}
+            saved = self.save_market_data(list(batch.values()))
+            self.last_flush = time.time()
+            if saved < len(batch):
+                with self._pending_lock:
+                    batch.update(self._pending)
+                    self._pending = batch
+            return saved
+
+    def _copy_buffer(self, data_points: List[MarketDataPoint]) -> io.StringIO:
+        """CSV rows for COPY (None -> empty unquoted field -> NULL)"""
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for point in data_points:
+            writer.writerow((
+                point.timestamp.isoformat(),
+                point.symbol,
+                point.market,
+                point.open,
+                point.high,
+                point.low,
+                point.close,
+                # BIGINT column: COPY rejects '53210.0'
+                int(point.volume) if point.volume is not None else None,
+                point.adjusted_close
+            ))
+        buffer.seek(0)
+        return buffer
+
+    def save_market_data(self, data_points: List[MarketDataPoint]) -> int:
+        """Save market data to TimescaleDB hypertable (COPY + one merge per batch)"""
+        if not data_points:
+            return 0
+        # ON CONFLICT cannot touch the same row twice in one statement: keep the last bar per key
+        unique = list({(point.timestamp, point.symbol): point for point in data_points}.values())
+        columns = ', '.join(MARKET_DATA_COLUMNS)
+        updates = ', '.join(f"{column} = EXCLUDED.{column}" for column in MARKET_DATA_COLUMNS[3:])
+        started = time.time()
         try:
-            with psycopg2.connect(self.db_url) as conn:
+            with self.connection() as conn:
                 with conn.cursor() as cur:
-                    for point in data_points:
-                        cur.execute("""
-                            INSERT INTO market_data 
-                            (timestamp, symbol, market, open, high, low, close, volume, adjusted_close)
-                            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
-                            ON CONFLICT (timestamp, symbol) DO UPDATE SET
-                            open = EXCLUDED.open,
-                            high = EXCLUDED.high,
-                            low = EXCLUDED.low,
-                            close = EXCLUDED.close,
-                            volume = EXCLUDED.volume,
-                            adjusted_close = EXCLUDED.adjusted_close
-                        """, (
-                            point.timestamp,
-                            point.symbol,
-                            point.market,
-                            point.open,
-                            point.high,
-                            point.low,
-                            point.close,
-                            point.volume,
-                            point.adjusted_close
-                        ))
-                    conn.commit()
-                    logger.info(f"Saved {len(data_points)} market data points")
-                    
+                    cur.execute(f"""
+                        CREATE TEMP TABLE IF NOT EXISTS {self.staging_table}
+                        ON COMMIT DELETE ROWS
+                        AS SELECT {columns} FROM {self.table} WITH NO DATA
+                    """)
+                    for offset in range(0, len(unique), self.batch_size):
+                        if offset:
+                            cur.execute(f"TRUNCATE {self.staging_table}")
+                        cur.copy_expert(
+                            f"COPY {self.staging_table} ({columns}) FROM STDIN WITH (FORMAT csv)",
+                            self._copy_buffer(unique[offset:offset + self.batch_size])
+                        )
+                        cur.execute(f"""
+                            INSERT INTO {self.table} ({columns})
+                            SELECT {columns} FROM {self.staging_table}
+                            ON CONFLICT (timestamp, symbol) DO UPDATE SET {updates}
+                        """)
+            elapsed = time.time() - started
+            self.stats['rows_written'] += len(unique)
+            self.stats['flushes'] += 1
+            self.stats['flush_seconds'] += elapsed
+            logger.info(f"Saved {len(unique)} market data points in {elapsed:.3f}s")
+            return len(unique)
+
         except Exception as e:
+            self.stats['flush_errors'] += 1
             logger.error(f"Database save error: {e}")
+            return 0
     
+    def get_latest_timestamps(self, symbols: List[str]) -> Dict[str, datetime]:
+        """Timestamp of the newest stored bar per symbol (providers resume from here)"""
+        try:
+            with self.connection() as conn:
+                with conn.cursor() as cur:
+                    cur.execute(f"""
+                        SELECT symbol, MAX(timestamp)
+                        FROM {self.table}
+                        WHERE symbol = ANY(%s)
+                        GROUP BY symbol
+                    """, (list(symbols),))
+                    return dict(cur.fetchall())
+
+        except Exception as e:
+            logger.error(f"Get latest timestamps error: {e}")
+            return {}
+
     def get_symbols_for_analysis(self) -> Dict[str, List[str]]:
         """Get symbols that need analysis"""
         try:
-            with psycopg2.connect(self.db_url) as conn:
+            with self.connection() as conn:
                 with conn.cursor(cursor_factory=RealDictCursor) as cur:
                     # Most active symbols from last 24h
                     cur.execute("""
@@ -219,35 +483,49 @@ class DatabaseManager:
             return {}
 
 class ParquetArchiver:
-    """Raw data archival to Parquet files"""
+    """Raw data archival into the partitioned Parquet market archive (cold tier)
+
+    The day's rows are streamed from a server-side cursor in chunks into the
+    market/date/symbol-bucket layout, then the day's partitions are compacted.
+    """
     
-    def __init__(self, data_path: str = "/app/data/raw"):
+    def __init__(self, data_path: str = "/app/data/market_archive", db_manager: Optional[DatabaseManager] = None,
+                 chunk_rows: int = 100000):
         self.data_path = data_path
-        os.makedirs(data_path, exist_ok=True)
+        self.db_manager = db_manager
+        self.chunk_rows = chunk_rows
+        self.archive = MarketArchive(data_path)
+
+    def _chunks(self, cur):
+        while True:
+            rows = cur.fetchmany(self.chunk_rows)
+            if not rows:
+                break
+            yield pd.DataFrame(rows, columns=list(MARKET_DATA_COLUMNS))
         
-    def archive_daily_data(self, date: datetime):
+    def archive_daily_data(self, date: datetime) -> int:
         """Archive day's data to Parquet"""
         try:
-            db_url = os.getenv('DATABASE_URL')
-            with psycopg2.connect(db_url) as conn:
-                # Query day's data
-                query = """
-                    SELECT * FROM market_data 
-                    WHERE DATE(timestamp) = %s
-                    ORDER BY timestamp, symbol
-                """
-                df = pd.read_sql(query, conn, params=[date.date()])
-                
-                if len(df) > 0:
-                    # Save to Parquet
-                    filename = f"market_data_{date.strftime('%Y-%m-%d')}.parquet"
-                    filepath = os.path.join(self.data_path, filename)
-                    df.to_parquet(filepath, compression='snappy', index=False)
-                    
-                    logger.info(f"Archived {len(df)} records to {filename}")
+            if self.db_manager is None:
+                self.db_manager = DatabaseManager(os.getenv('DATABASE_URL'))
+            day = date.date() if isinstance(date, datetime) else date
+            with self.db_manager.connection() as conn:
+                # Named cursor: rows stay on the server and arrive chunk by chunk
+                with conn.cursor(name=f"archive_{day.strftime('%Y%m%d')}") as cur:
+                    cur.itersize = self.chunk_rows
+                    cur.execute(f"""
+                        SELECT {', '.join(MARKET_DATA_COLUMNS)} FROM market_data 
+                        WHERE timestamp >= %s AND timestamp < %s
+                    """, (day, day + timedelta(days=1)))
+                    rows = self.archive.write_chunks(self._chunks(cur))
+
+            compacted = self.archive.compact(start=day, end=day)
+            logger.info(f"Archived {rows} records for {day} ({compacted} partitions compacted)")
+            return rows
                     
         except Exception as e:
             logger.error(f"Parquet archive error: {e}")
+            return 0
 
 class RealTimeDataCollector:
     """Main real-time data collection orchestrator"""
@@ -261,53 +539,82 @@ class RealTimeDataCollector:
         self.db_url = os.getenv('DATABASE_URL')
         self.redis_url = os.getenv('REDIS_URL')
         
-        # Data providers
-        self.polygon_provider = PolygonDataProvider(self.polygon_api_key) if self.polygon_api_key else None
+        # Data providers (bounded concurrency + rate limit per provider)
+        self.polygon_provider = PolygonDataProvider(
+            self.polygon_api_key,
+            max_concurrency=int(os.getenv('POLYGON_MAX_CONCURRENCY', '8')),
+            requests_per_second=float(os.getenv('POLYGON_RATE_LIMIT', '50'))
+        ) if self.polygon_api_key else None
         self.binance_provider = BinanceDataProvider(
             self.binance_api_key, 
-            self.binance_secret
+            self.binance_secret,
+            max_concurrency=int(os.getenv('BINANCE_MAX_CONCURRENCY', '8')),
+            requests_per_second=float(os.getenv('BINANCE_RATE_LIMIT', '10'))
         ) if self.binance_api_key and self.binance_secret else None
+        self._providers_seeded = False
         
         # Database and cache
         self.db_manager = DatabaseManager(self.db_url) if self.db_url else None
         self.redis_client = redis.from_url(self.redis_url) if self.redis_url else None
-        self.parquet_archiver = ParquetArchiver()
+        self.parquet_archiver = ParquetArchiver(os.getenv('MARKET_ARCHIVE_PATH', '/app/data/market_archive'),
+                                                db_manager=self.db_manager)
         
         # Collection intervals
         self.data_collection_interval = 60  # 1 minute
         self.analysis_trigger_interval = 15 * 60  # 15 minutes
         
-        # Symbol lists
-        self.stock_symbols = ['AAPL', 'MSFT', 'GOOGL', 'TSLA', 'NVDA']  # Top US stocks
-        self.crypto_symbols = ['BTCUSDT', 'ETHUSDT', 'ADAUSDT', 'DOTUSDT']  # Top crypto
+        # Symbol lists (override with comma separated COLLECTOR_*_SYMBOLS)
+        self.stock_symbols = env_list('COLLECTOR_STOCK_SYMBOLS', ['AAPL', 'MSFT', 'GOOGL', 'TSLA', 'NVDA'])
+        self.crypto_symbols = env_list('COLLECTOR_CRYPTO_SYMBOLS', ['BTCUSDT', 'ETHUSDT', 'ADAUSDT', 'DOTUSDT'])
         
+    async def _seed_providers(self):
+        """Resume incremental fetches from the newest stored bar per symbol"""
+        self._providers_seeded = True
+        if not self.db_manager:
+            return
+        for provider, symbols in ((self.polygon_provider, self.stock_symbols),
+                                  (self.binance_provider, self.crypto_symbols)):
+            if provider:
+                provider.seed_last_timestamps(
+                    await asyncio.to_thread(self.db_manager.get_latest_timestamps, symbols))
+
     async def collect_market_data(self):
-        """Collect market data from all providers"""
+        """Collect market data from all providers (providers run in parallel)"""
         all_data_points = []
-        
-        # Collect stock data
+        if not self._providers_seeded:
+            await self._seed_providers()
+
+        fetches = []
         if self.polygon_provider:
-            stock_data = await self.polygon_provider.get_realtime_data(self.stock_symbols)
-            all_data_points.extend(stock_data)
-            
-        # Collect crypto data
+            fetches.append(self.polygon_provider.get_realtime_data(self.stock_symbols))
         if self.binance_provider:
-            crypto_data = await self.binance_provider.get_realtime_data(self.crypto_symbols)
-            all_data_points.extend(crypto_data)
+            fetches.append(self.binance_provider.get_realtime_data(self.crypto_symbols))
+        for result in await asyncio.gather(*fetches, return_exceptions=True):
+            if isinstance(result, Exception):
+                logger.error(f"Provider fetch error: {result}")
+            else:
+                all_data_points.extend(result)
             
-        # Save to database
+        # Buffer for the database; flush in batches off the event loop
         if self.db_manager and all_data_points:
-            self.db_manager.save_market_data(all_data_points)
+            self.db_manager.add(all_data_points)
+            if self.db_manager.flush_due():
+                await asyncio.to_thread(self.db_manager.flush)
             
-        # Cache latest data in Redis
+        # Cache latest data in Redis (latest bar per symbol, one pipelined round trip)
         if self.redis_client and all_data_points:
+            latest = {}
             for point in all_data_points:
-                key = f"latest_data:{point.symbol}"
-                self.redis_client.setex(
-                    key, 
+                if point.symbol not in latest or point.timestamp >= latest[point.symbol].timestamp:
+                    latest[point.symbol] = point
+            pipe = self.redis_client.pipeline(transaction=False)
+            for point in latest.values():
+                pipe.setex(
+                    f"latest_data:{point.symbol}",
                     300,  # 5 minute TTL
                     json.dumps(asdict(point), default=str)
                 )
+            pipe.execute()
         
         logger.info(f"Collected {len(all_data_points)} data points")
         return all_data_points
@@ -318,25 +625,28 @@ class RealTimeDataCollector:
             if not self.db_manager:
                 return
                 
+            # Analysis reads the hypertable: write buffered bars first
+            await asyncio.to_thread(self.db_manager.flush)
+
             # Get symbols that need analysis
             symbols_by_market = self.db_manager.get_symbols_for_analysis()
             
             # Trigger analysis for each symbol via Redis
             if self.redis_client:
-                for market, symbols in symbols_by_market.items():
-                    for symbol in symbols:
-                        analysis_request = {
-                            'symbol': symbol,
-                            'market': market,
-                            'timestamp': datetime.now().isoformat(),
-                            'trigger': 'scheduled_analysis'
-                        }
-                        
-                        # Push to analysis queue
-                        self.redis_client.lpush(
-                            'analysis_queue',
-                            json.dumps(analysis_request)
-                        )
+                analysis_requests = [
+                    json.dumps({
+                        'symbol': symbol,
+                        'market': market,
+                        'timestamp': datetime.now().isoformat(),
+                        'trigger': 'scheduled_analysis'
+                    })
+                    for market, symbols in symbols_by_market.items()
+                    for symbol in symbols
+                ]
+                
+                # Push to analysis queue (single LPUSH)
+                if analysis_requests:
+                    self.redis_client.lpush('analysis_queue', *analysis_requests)
                         
                 logger.info(f"Triggered analysis for {sum(len(symbols) for symbols in symbols_by_market.values())} symbols")
                 
@@ -356,6 +666,11 @@ class RealTimeDataCollector:
             'redis': self.redis_client is not None,
             'last_collection': getattr(self, 'last_collection_time', None)
         }
+        if self.db_manager:
+            status['ingest'] = {'pending_rows': self.db_manager.pending_count, **self.db_manager.stats}
+        for name, provider in (('polygon', self.polygon_provider), ('binance', self.binance_provider)):
+            if provider:
+                status['providers'][f"{name}_fetch"] = dict(provider.executor.stats)
         return status
     
     async def run_collection_cycle(self):
@@ -472,7 +787,11 @@ async def main():
     await init_web_server(collector)
     
     # Start data collection
-    await collector.start_collection_loop()
+    try:
+        await collector.start_collection_loop()
+    finally:
+        if collector.db_manager:
+            collector.db_manager.close()
 
 if __name__ == "__main__":
     asyncio.run(main())
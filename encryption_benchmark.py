@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+PlanB Motoru - Encryption benchmark
+
+Büyük bir yedek dosyasında akış şifreleme hızını (MB/s) ve tepe bellek kullanımını (RSS)
+ölçer; küçük bir örnekle eski tek Fernet token yolu ile karşılaştırır.
+
+Kullanım:
+    python encryption_benchmark.py --size-mb 1024 --workers 1 4 --legacy-mb 64
+"""
+
+import argparse
+import os
+import resource
+import tempfile
+import time
+
+from src.security.encryption_manager import encryption_manager, _derive_master_key, EncryptionManager
+
+
+def peak_rss_mb() -> float:
+    # Linux'ta ru_maxrss KB cinsindendir
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def write_sample(path: str, size_mb: int):
+    """Yarı sıkıştırılabilir örnek yedek dosyası (bellekte tutmadan)"""
+    block = os.urandom(512 * 1024) + b"PlanB" * (512 * 1024 // 5) + b"\0" * (512 * 1024 % 5)
+    with open(path, 'wb') as f:
+        for _ in range(size_mb):
+            f.write(block)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="PlanB encryption benchmark")
+    parser.add_argument("--size-mb", type=int, default=1024)
+    parser.add_argument("--chunk-mb", type=int, default=4)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, min(4, os.cpu_count() or 1)])
+    parser.add_argument("--legacy-mb", type=int, default=64, help="0 = eski yol ölçülmez")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    for _ in range(5):
+        EncryptionManager()
+    print(f"🔑 5 yeni örnek: {(time.perf_counter() - started) * 1000:.1f} ms "
+          f"(PBKDF2 önbelleği: {_derive_master_key.cache_info().hits} isabet)")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        source = os.path.join(tmp, "backup.zip")
+        write_sample(source, args.size_mb)
+        baseline = peak_rss_mb()
+        print(f"📦 Örnek yedek: {args.size_mb} MB, başlangıç tepe RSS {baseline:.0f} MB")
+
+        for workers in sorted(set(args.workers)):
+            encrypted = os.path.join(tmp, "backup.zip.enc")
+            restored = os.path.join(tmp, "backup.restored.zip")
+            started = time.perf_counter()
+            assert encryption_manager.encrypt_file(source, encrypted, args.chunk_mb * 1024 * 1024, workers)
+            encrypt_time = time.perf_counter() - started
+            started = time.perf_counter()
+            assert encryption_manager.decrypt_file(encrypted, restored, workers)
+            decrypt_time = time.perf_counter() - started
+            assert os.path.getsize(restored) == os.path.getsize(source)
+            print(f"🔐 {workers} işçi: şifreleme {args.size_mb / encrypt_time:,.0f} MB/s, "
+                  f"çözme {args.size_mb / decrypt_time:,.0f} MB/s, tepe RSS {peak_rss_mb():.0f} MB")
+            os.remove(encrypted)
+            os.remove(restored)
+
+        if args.legacy_mb:
+            # Eski yol: tüm içerik tek Fernet token olarak bellekte (base64 ile)
+            with open(source, 'rb') as f:
+                data = f.read(args.legacy_mb * 1024 * 1024)
+            started = time.perf_counter()
+            token = encryption_manager.fernet.encrypt(data)
+            encryption_manager.fernet.decrypt(token)
+            elapsed = time.perf_counter() - started
+            print(f"🐢 Tek Fernet token ({args.legacy_mb} MB): {2 * args.legacy_mb / elapsed:,.0f} MB/s, "
+                  f"tepe RSS {peak_rss_mb():.0f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,13 +4,19 @@ Enhanced Sentiment Analyzer for PlanB Trading System
 Integrates News API, Reddit API, and TextBlob for comprehensive sentiment analysis
 """
 import os
-import requests
+import re
+import asyncio
+import hashlib
+import threading
 import logging
-import json
 import time
+from collections import OrderedDict
 from datetime import datetime, timedelta
 import base64
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import aiohttp
+import requests
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -35,16 +41,215 @@ except ImportError as e:
     logger.warning(f"TextBlob not available: {e}")
     TEXTBLOB_AVAILABLE = False
 
+try:
+    from src.analysis.lexicon_sentiment import get_sentiment_scorer
+    BATCH_SCORER_AVAILABLE = True
+except ImportError as e:
+    logger.warning(f"Batch sentiment scorer not available: {e}")
+    BATCH_SCORER_AVAILABLE = False
+
+NEWS_API_URL = 'https://newsapi.org/v2/everything'
+REDDIT_SUBREDDITS = ['stocks', 'investing', 'SecurityAnalysis', 'StockMarket', 'wallstreetbets']
+SENTIMENT_CACHE_TTL = int(os.getenv('SENTIMENT_CACHE_TTL', '1800'))
+NEWS_QUERY_MAX_CHARS = 450  # NewsAPI rejects q longer than 500 chars
+NEUTRAL_RESULT = {'score': 0, 'count': 0}
+# Reddit OAuth allows ~100 requests/minute per client; requests are spaced to stay under it
+REDDIT_REQUEST_INTERVAL = float(os.getenv('REDDIT_REQUEST_INTERVAL', '0.6'))
+REDDIT_DEFAULT_BACKOFF = 60.0
+
+
+class TTLCache:
+    """Thread-safe key -> value cache with per-entry expiry"""
+    
+    def __init__(self, ttl: float = SENTIMENT_CACHE_TTL):
+        self.ttl = ttl
+        self.entries: Dict = {}
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+    
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                self.entries.pop(key, None)
+                self.misses += 1
+                return None
+            self.hits += 1
+            return entry[1]
+    
+    def set(self, key, value, ttl: Optional[float] = None):
+        with self.lock:
+            self.entries[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+    
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+class RequestPacer:
+    """Fixed-interval limiter shared by all coroutines/threads hitting one API
+    
+    Each caller reserves the next free slot and sleeps until it; `back_off` pushes every
+    later slot past a server-requested pause (429 / Retry-After).
+    """
+    
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.next_at = 0.0
+        self.lock = threading.Lock()
+        self.waited = 0.0
+    
+    def reserve(self) -> float:
+        """Seconds the caller has to wait for its slot"""
+        with self.lock:
+            now = time.monotonic()
+            slot = max(now, self.next_at)
+            self.next_at = slot + self.interval
+            self.waited += slot - now
+            return slot - now
+    
+    async def wait(self):
+        delay = self.reserve()
+        if delay > 0:
+            await asyncio.sleep(delay)
+    
+    def back_off(self, seconds: float):
+        with self.lock:
+            self.next_at = max(self.next_at, time.monotonic() + seconds)
+
+
+def _retry_after(headers) -> Optional[float]:
+    """Server-requested pause in seconds (Retry-After, or Reddit's exhausted X-Ratelimit window)"""
+    for name in ('Retry-After', 'X-Ratelimit-Reset'):
+        value = headers.get(name)
+        if value is None:
+            continue
+        if name == 'X-Ratelimit-Reset':
+            try:
+                if float(headers.get('X-Ratelimit-Remaining', 1)) >= 1:
+                    continue
+            except ValueError:
+                continue
+        try:
+            return max(float(value), 0.0)
+        except ValueError:
+            continue
+    return None
+
+
+class PolarityCache:
+    """Content-hash -> polarity memo so an identical headline is scored only once"""
+    
+    def __init__(self, max_entries: int = 50000):
+        self.max_entries = max_entries
+        self.entries: OrderedDict = OrderedDict()
+        self.lock = threading.Lock()
+        self.scored = 0
+    
+    @staticmethod
+    def content_hash(text: str) -> str:
+        normalized = ' '.join(text.lower().split())
+        return hashlib.sha1(normalized.encode('utf-8')).hexdigest()
+    
+    def score_texts(self, texts: List[str], scorer) -> List[Optional[float]]:
+        """Return polarity per text; scorer(list_of_texts) runs only on unseen content"""
+        keys = [self.content_hash(t) for t in texts]
+        results: List[Optional[float]] = [None] * len(texts)
+        missing: Dict[str, str] = {}
+        with self.lock:
+            for i, key in enumerate(keys):
+                if key in self.entries:
+                    self.entries.move_to_end(key)
+                    results[i] = self.entries[key]
+                elif key not in missing:
+                    missing[key] = texts[i]
+        
+        if missing:
+            scores = scorer(list(missing.values()))
+            with self.lock:
+                for key, score in zip(missing, scores):
+                    if score is None:
+                        continue
+                    self.entries[key] = score
+                    self.scored += 1
+                while len(self.entries) > self.max_entries:
+                    self.entries.popitem(last=False)
+            fresh = dict(zip(missing, scores))
+            results = [fresh.get(key) if result is None else result for key, result in zip(keys, results)]
+        
+        return results
+    
+    def __len__(self):
+        return len(self.entries)
+
+
+def textblob_polarity(texts: List[str]) -> List[Optional[float]]:
+    """Per-document TextBlob polarity (None where scoring fails)"""
+    if not TEXTBLOB_AVAILABLE:
+        return [None] * len(texts)
+    scores = []
+    for text in texts:
+        try:
+            scores.append(TextBlob(text).sentiment.polarity)
+        except Exception as e:
+            logger.debug(f"TextBlob error for article: {e}")
+            scores.append(None)
+    return scores
+
+
+def default_polarity_scorer():
+    """Batch scorer selected by SENTIMENT_SCORER (lexicon by default), TextBlob as fallback"""
+    if BATCH_SCORER_AVAILABLE:
+        scorer = get_sentiment_scorer()
+        return lambda texts: scorer.score_texts(texts).tolist()
+    return textblob_polarity
+
+
+def _article_text(article: Dict) -> str:
+    return f"{article.get('title') or ''} {article.get('description') or ''}".strip()
+
+
+def _post_text(post: Dict) -> str:
+    data = post.get('data', {})
+    return f"{data.get('title') or ''} {data.get('selftext') or ''}".strip()
+
+
+def _symbol_pattern(symbol: str) -> re.Pattern:
+    return re.compile(rf'(?<![A-Za-z0-9]){re.escape(symbol)}(?![A-Za-z0-9])', re.IGNORECASE)
+
+
+def build_news_queries(symbols: Iterable[str], max_chars: int = NEWS_QUERY_MAX_CHARS) -> List[Tuple[List[str], str]]:
+    """Pack symbols into as few OR-queries as NewsAPI's query length limit allows"""
+    suffix = ' AND (stock OR shares OR trading OR financial OR market)'
+    queries, chunk = [], []
+    for symbol in symbols:
+        candidate = chunk + [symbol]
+        query = '(' + ' OR '.join(f'"{s}"' for s in candidate) + ')' + suffix
+        if chunk and len(query) > max_chars:
+            queries.append((chunk, '(' + ' OR '.join(f'"{s}"' for s in chunk) + ')' + suffix))
+            chunk = [symbol]
+        else:
+            chunk = candidate
+    if chunk:
+        queries.append((chunk, '(' + ' OR '.join(f'"{s}"' for s in chunk) + ')' + suffix))
+    return queries
+
 
 class EnhancedSentimentAnalyzer:
     """
     Enhanced sentiment analyzer combining multiple sources:
     - News API for financial news
     - Reddit API for social sentiment
-    - TextBlob for natural language processing
+    - Batch lexicon scorer (or TextBlob, via SENTIMENT_SCORER) for polarity
+    
+    Source results are cached per (symbol, source) for SENTIMENT_CACHE_TTL seconds and
+    article polarity is memoised by content hash. prefetch_symbols() fills the cache for
+    a whole market with one NewsAPI query per symbol chunk, so get_symbol_sentiment()
+    inside a scan is a dictionary lookup.
     """
     
-    def __init__(self):
+    def __init__(self, cache_ttl: float = SENTIMENT_CACHE_TTL, max_concurrency: int = 8):
         # API Keys from environment - with fallback defaults
         self.news_api_key = os.getenv('NEWS_API_KEY')
         self.reddit_client_id = os.getenv('REDDIT_CLIENT_ID')
@@ -65,9 +270,16 @@ class EnhancedSentimentAnalyzer:
         else:
             logger.info("✅ Reddit API configured successfully")
         
+        self.cache = TTLCache(cache_ttl)
+        self.polarity_cache = PolarityCache()
+        self.polarity_scorer = default_polarity_scorer()
+        self.max_concurrency = max_concurrency
+        self.reddit_pacer = RequestPacer(REDDIT_REQUEST_INTERVAL)
+        
         # Reddit OAuth token
         self.reddit_token = None
         self.reddit_token_expires = None
+        self.reddit_lock = threading.Lock()
         
         # Initialize Reddit authentication
         self._authenticate_reddit()
@@ -115,159 +327,263 @@ class EnhancedSentimentAnalyzer:
             return False
         return datetime.now() < self.reddit_token_expires
     
-    def get_news_sentiment(self, symbol: str, days_back: int = 7) -> Dict:
-        """Get news sentiment for a symbol using News API"""
+    def _ensure_reddit_token(self) -> bool:
+        with self.reddit_lock:
+            return self._is_reddit_token_valid() or self._authenticate_reddit()
+    
+    # ------------------------------------------------------------------
+    # Scoring
+    # ------------------------------------------------------------------
+    
+    def score_texts(self, texts: List[str]) -> List[Optional[float]]:
+        """Polarity (-1..1) per text, reusing scores for previously seen content"""
+        texts = [t for t in texts if t]
+        if not texts:
+            return []
+        return self.polarity_cache.score_texts(texts, self.polarity_scorer)
+    
+    def _aggregate(self, texts: List[str], source: str, empty_source: str) -> Dict:
+        if not texts:
+            return {**NEUTRAL_RESULT, 'source': empty_source}
+        polarities = [p for p in self.score_texts(texts) if p is not None]
+        if not polarities:
+            return {**NEUTRAL_RESULT, 'source': f'{source}_no_analysis'}
+        avg_sentiment = sum(polarities) / len(polarities)
+        return {
+            'score': round((avg_sentiment + 1) * 50, 1),  # Convert -1..1 to 0-100 scale
+            'count': len(polarities),
+            'source': source
+        }
+    
+    # ------------------------------------------------------------------
+    # Async source fetching
+    # ------------------------------------------------------------------
+    
+    def _news_params(self, query: str, days_back: int, page_size: int) -> Dict:
+        end_date = datetime.now()
+        start_date = end_date - timedelta(days=days_back)
+        return {
+            'q': query,
+            'from': start_date.strftime('%Y-%m-%d'),
+            'to': end_date.strftime('%Y-%m-%d'),
+            'sortBy': 'relevancy',
+            'language': 'en',
+            'pageSize': page_size,
+            'apiKey': self.news_api_key
+        }
+    
+    async def _fetch_news_articles(self, session: aiohttp.ClientSession, query: str,
+                                   days_back: int = 7, page_size: int = 50) -> Optional[List[Dict]]:
+        async with session.get(NEWS_API_URL, params=self._news_params(query, days_back, page_size)) as response:
+            if response.status != 200:
+                logger.error(f"News API error: {response.status}")
+                return None
+            return (await response.json()).get('articles', [])
+    
+    async def _fetch_subreddit(self, session: aiohttp.ClientSession, subreddit: str, symbol: str,
+                               semaphore: asyncio.Semaphore) -> Optional[List[Dict]]:
+        """Posts matching the symbol, or None if the request failed (never cache a failure as quiet)"""
+        headers = {
+            'Authorization': f'Bearer {self.reddit_token}',
+            'User-Agent': 'PlanBTradingBot/1.0'
+        }
+        params = {'q': symbol, 'sort': 'relevance', 'limit': 10, 'restrict_sr': 1, 't': 'week'}
+        for attempt in range(2):
+            try:
+                await self.reddit_pacer.wait()
+                async with semaphore:
+                    async with session.get(f'https://oauth.reddit.com/r/{subreddit}/search',
+                                           headers=headers, params=params) as response:
+                        pause = _retry_after(response.headers)
+                        if response.status == 429 or pause is not None:
+                            pause = REDDIT_DEFAULT_BACKOFF if pause is None else pause
+                            logger.warning(f"Reddit rate limited ({response.status}), backing off {pause:.0f}s")
+                            self.reddit_pacer.back_off(pause)
+                        if response.status == 429 and attempt == 0:
+                            continue
+                        if response.status != 200:
+                            logger.debug(f"Reddit search error r/{subreddit}: {response.status}")
+                            return None
+                        data = await response.json()
+                        return data.get('data', {}).get('children', [])
+            except Exception as e:
+                logger.debug(f"Error searching subreddit {subreddit}: {e}")
+                return None
+        return None
+    
+    async def _news_sentiment_async(self, session: aiohttp.ClientSession, symbol: str, days_back: int = 7) -> Dict:
+        cached = self.cache.get((symbol, 'news'))
+        if cached is not None:
+            return cached
         if not self.news_api_key:
-            logger.warning("News API key not found")
-            return {'score': 0, 'count': 0, 'source': 'news_api_unavailable'}
-        
+            return {**NEUTRAL_RESULT, 'source': 'news_api_unavailable'}
         try:
-            # Calculate date range
-            end_date = datetime.now()
-            start_date = end_date - timedelta(days=days_back)
-            
-            # Prepare search query
             query = f'"{symbol}" OR "{symbol.upper()}" AND (stock OR shares OR trading OR financial OR market)'
-            
-            params = {
-                'q': query,
-                'from': start_date.strftime('%Y-%m-%d'),
-                'to': end_date.strftime('%Y-%m-%d'),
-                'sortBy': 'relevancy',
-                'language': 'en',
-                'pageSize': 50,
-                'apiKey': self.news_api_key
-            }
-            
-            response = requests.get('https://newsapi.org/v2/everything', params=params, timeout=15)
-            
-            if response.status_code != 200:
-                logger.error(f"News API error: {response.status_code}")
-                return {'score': 0, 'count': 0, 'source': 'news_api_error'}
-            
-            articles = response.json().get('articles', [])
-            
-            if not articles:
-                return {'score': 0, 'count': 0, 'source': 'news_no_articles'}
-            
-            # Analyze sentiment of articles
-            total_sentiment = 0
-            article_count = 0
-            
-            for article in articles:
-                title = article.get('title', '')
-                description = article.get('description', '')
-                content = f"{title} {description}"
-                
-                if content and TEXTBLOB_AVAILABLE:
-                    try:
-                        blob = TextBlob(content)
-                        sentiment = blob.sentiment.polarity
-                        total_sentiment += sentiment
-                        article_count += 1
-                    except Exception as e:
-                        logger.debug(f"TextBlob error for article: {e}")
-                        continue
-            
-            if article_count == 0:
-                return {'score': 0, 'count': 0, 'source': 'news_no_analysis'}
-            
-            # Calculate average sentiment (-1 to 1) -> (0 to 100)
-            avg_sentiment = total_sentiment / article_count
-            normalized_score = (avg_sentiment + 1) * 50  # Convert to 0-100 scale
-            
-            return {
-                'score': round(normalized_score, 1),
-                'count': article_count,
-                'source': 'news_api'
-            }
-            
+            articles = await self._fetch_news_articles(session, query, days_back)
+            if articles is None:
+                return {**NEUTRAL_RESULT, 'source': 'news_api_error'}
+            result = self._aggregate([_article_text(a) for a in articles], 'news_api', 'news_no_articles')
         except Exception as e:
             logger.error(f"News sentiment error: {e}")
-            return {'score': 0, 'count': 0, 'source': 'news_error'}
+            return {**NEUTRAL_RESULT, 'source': 'news_error'}
+        self.cache.set((symbol, 'news'), result)
+        return result
     
-    def get_reddit_sentiment(self, symbol: str, limit: int = 25) -> Dict:
-        """Get Reddit sentiment for a symbol"""
-        if not self._is_reddit_token_valid():
-            if not self._authenticate_reddit():
-                return {'score': 0, 'count': 0, 'source': 'reddit_auth_failed'}
-        
+    async def _reddit_sentiment_async(self, session: aiohttp.ClientSession, symbol: str, limit: int = 25,
+                                      semaphore: Optional[asyncio.Semaphore] = None) -> Dict:
+        cached = self.cache.get((symbol, 'reddit'))
+        if cached is not None:
+            return cached
+        if not await asyncio.get_running_loop().run_in_executor(None, self._ensure_reddit_token):
+            return {**NEUTRAL_RESULT, 'source': 'reddit_auth_failed'}
+        semaphore = semaphore or asyncio.Semaphore(self.max_concurrency)
         try:
-            headers = {
-                'Authorization': f'Bearer {self.reddit_token}',
-                'User-Agent': 'PlanBTradingBot/1.0'
-            }
-            
-            # Search multiple relevant subreddits
-            subreddits = ['stocks', 'investing', 'SecurityAnalysis', 'StockMarket', 'wallstreetbets']
-            all_posts = []
-            
-            for subreddit in subreddits:
-                try:
-                    # Search for symbol in subreddit
-                    url = f'https://oauth.reddit.com/r/{subreddit}/search'
-                    params = {
-                        'q': symbol,
-                        'sort': 'relevance',
-                        'limit': 10,
-                        'restrict_sr': 1,
-                        't': 'week'
-                    }
-                    
-                    response = requests.get(url, headers=headers, params=params, timeout=10)
-                    
-                    if response.status_code == 200:
-                        data = response.json()
-                        posts = data.get('data', {}).get('children', [])
-                        all_posts.extend(posts)
-                    
-                    # Rate limiting
-                    time.sleep(0.5)
-                    
-                except Exception as e:
-                    logger.debug(f"Error searching subreddit {subreddit}: {e}")
-                    continue
-            
-            if not all_posts:
-                return {'score': 0, 'count': 0, 'source': 'reddit_no_posts'}
-            
-            # Analyze sentiment
-            total_sentiment = 0
-            post_count = 0
-            
-            for post in all_posts[:limit]:
-                try:
-                    post_data = post.get('data', {})
-                    title = post_data.get('title', '')
-                    selftext = post_data.get('selftext', '')
-                    content = f"{title} {selftext}"
-                    
-                    if content and TEXTBLOB_AVAILABLE:
-                        blob = TextBlob(content)
-                        sentiment = blob.sentiment.polarity
-                        total_sentiment += sentiment
-                        post_count += 1
-                        
-                except Exception as e:
-                    logger.debug(f"Error analyzing Reddit post: {e}")
+            batches = await asyncio.gather(*(
+                self._fetch_subreddit(session, subreddit, symbol, semaphore) for subreddit in REDDIT_SUBREDDITS
+            ))
+            if any(batch is None for batch in batches):
+                return {**NEUTRAL_RESULT, 'source': 'reddit_error'}
+            posts = [post for batch in batches for post in batch]
+            result = self._aggregate([_post_text(p) for p in posts[:limit]], 'reddit', 'reddit_no_posts')
+        except Exception as e:
+            logger.error(f"Reddit sentiment error: {e}")
+            return {**NEUTRAL_RESULT, 'source': 'reddit_error'}
+        self.cache.set((symbol, 'reddit'), result)
+        return result
+    
+    async def _prefetch_news_async(self, session: aiohttp.ClientSession, symbols: List[str],
+                                   days_back: int = 7, page_size: int = 100) -> Dict[str, Dict]:
+        """One NewsAPI request per symbol chunk; articles are routed to the symbols they mention
+        
+        A full page means the grouped query was truncated, so symbols without a match in it are not
+        known to be quiet: they are re-queried individually instead of being cached as neutral.
+        """
+        results = {}
+        pending = []
+        for symbol in symbols:
+            cached = self.cache.get((symbol, 'news'))
+            if cached is None:
+                pending.append(symbol)
+            else:
+                results[symbol] = cached
+        if not pending or not self.news_api_key:
+            return results
+        
+        patterns = {symbol: _symbol_pattern(symbol) for symbol in pending}
+        queries = build_news_queries(pending)
+        responses = await asyncio.gather(*(
+            self._fetch_news_articles(session, query, days_back, page_size=page_size) for _, query in queries
+        ), return_exceptions=True)
+        
+        unresolved = []
+        for (chunk, _), articles in zip(queries, responses):
+            if isinstance(articles, Exception) or articles is None:
+                logger.debug(f"News prefetch failed for {len(chunk)} symbols: {articles}")
+                continue
+            texts = [_article_text(a) for a in articles]
+            self.score_texts(texts)  # warm the polarity cache once for the whole chunk
+            truncated = len(articles) >= page_size
+            for symbol in chunk:
+                matched = [t for t in texts if patterns[symbol].search(t)]
+                if not matched and truncated:
+                    unresolved.append(symbol)
                     continue
+                results[symbol] = self._aggregate(matched, 'news_api', 'news_no_articles')
+                self.cache.set((symbol, 'news'), results[symbol])
+        
+        if unresolved:
+            logger.debug(f"News prefetch: {len(unresolved)} symbols re-queried individually")
+            semaphore = asyncio.Semaphore(self.max_concurrency)
             
-            if post_count == 0:
-                return {'score': 0, 'count': 0, 'source': 'reddit_no_analysis'}
-            
-            # Calculate average sentiment
-            avg_sentiment = total_sentiment / post_count
-            normalized_score = (avg_sentiment + 1) * 50  # Convert to 0-100 scale
-            
-            return {
-                'score': round(normalized_score, 1),
-                'count': post_count,
-                'source': 'reddit'
-            }
+            async def single(symbol):
+                async with semaphore:
+                    return await self._news_sentiment_async(session, symbol, days_back)
             
-        except Exception as e:
-            logger.error(f"Reddit sentiment error: {e}")
-            return {'score': 0, 'count': 0, 'source': 'reddit_error'}
+            results.update(zip(unresolved, await asyncio.gather(*(single(s) for s in unresolved))))
+        return results
+    
+    async def prefetch_symbols_async(self, symbols: Iterable[str], include_reddit: bool = None) -> Dict[str, float]:
+        """Fill the sentiment cache for a market and return symbol -> combined score"""
+        symbols = list(dict.fromkeys(symbols))
+        include_reddit = self.reddit_enabled if include_reddit is None else include_reddit
+        news, reddit = {}, {}
+        timeout = aiohttp.ClientTimeout(total=30)
+        connector = aiohttp.TCPConnector(limit=self.max_concurrency * 2)
+        async with aiohttp.ClientSession(timeout=timeout, connector=connector) as session:
+            if self.news_enabled:
+                news = await self._prefetch_news_async(session, symbols)
+            if include_reddit:
+                semaphore = asyncio.Semaphore(self.max_concurrency)
+                reddit = dict(zip(symbols, await asyncio.gather(*(
+                    self._reddit_sentiment_async(session, symbol, semaphore=semaphore) for symbol in symbols
+                ))))
+        return {symbol: self.combine_sentiment(symbol, news.get(symbol, NEUTRAL_RESULT),
+                                               reddit.get(symbol, NEUTRAL_RESULT))
+                for symbol in symbols}
+    
+    def prefetch_symbols(self, symbols: Iterable[str], include_reddit: bool = None) -> Dict[str, float]:
+        """Synchronous wrapper around prefetch_symbols_async"""
+        return asyncio.run(self.prefetch_symbols_async(symbols, include_reddit))
+    
+    async def _single_source_async(self, source: str, symbol: str, **kwargs) -> Dict:
+        async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=15)) as session:
+            if source == 'news':
+                return await self._news_sentiment_async(session, symbol, **kwargs)
+            return await self._reddit_sentiment_async(session, symbol, **kwargs)
+    
+    # ------------------------------------------------------------------
+    # Public per-symbol API
+    # ------------------------------------------------------------------
+    
+    def get_news_sentiment(self, symbol: str, days_back: int = 7) -> Dict:
+        """Get news sentiment for a symbol using News API"""
+        cached = self.cache.get((symbol, 'news'))
+        if cached is not None:
+            return cached
+        if not self.news_api_key:
+            logger.warning("News API key not found")
+            return {**NEUTRAL_RESULT, 'source': 'news_api_unavailable'}
+        return asyncio.run(self._single_source_async('news', symbol, days_back=days_back))
+    
+    def get_reddit_sentiment(self, symbol: str, limit: int = 25) -> Dict:
+        """Get Reddit sentiment for a symbol (subreddits are searched concurrently)"""
+        cached = self.cache.get((symbol, 'reddit'))
+        if cached is not None:
+            return cached
+        if not self._ensure_reddit_token():
+            return {**NEUTRAL_RESULT, 'source': 'reddit_auth_failed'}
+        return asyncio.run(self._single_source_async('reddit', symbol, limit=limit))
+    
+    def combine_sentiment(self, symbol: str, news_sentiment: Dict, reddit_sentiment: Dict) -> float:
+        """Weighted 0-100 score from news and Reddit results"""
+        # Default neutral sentiment
+        final_score = 50.0
+        
+        # Weight calculation based on data availability
+        total_weight = 0
+        weighted_sum = 0
+        
+        # News sentiment (weight: 0.6)
+        if news_sentiment['count'] > 0:
+            news_weight = min(0.6, news_sentiment['count'] * 0.1)  # Max 0.6, scales with article count
+            weighted_sum += news_sentiment['score'] * news_weight
+            total_weight += news_weight
+            logger.debug(f"News sentiment for {symbol}: {news_sentiment['score']:.1f} (from {news_sentiment['count']} articles)")
+        
+        # Reddit sentiment (weight: 0.4)
+        if reddit_sentiment['count'] > 0:
+            reddit_weight = min(0.4, reddit_sentiment['count'] * 0.05)  # Max 0.4, scales with post count
+            weighted_sum += reddit_sentiment['score'] * reddit_weight
+            total_weight += reddit_weight
+            logger.debug(f"Reddit sentiment for {symbol}: {reddit_sentiment['score']:.1f} (from {reddit_sentiment['count']} posts)")
+        
+        # Calculate final weighted score
+        if total_weight > 0:
+            final_score = weighted_sum / total_weight
+        
+        logger.debug(f"Final sentiment score for {symbol}: {final_score:.1f}/100")
+        
+        return round(final_score, 1)
     
     def get_symbol_sentiment(self, symbol: str) -> float:
         """
@@ -275,42 +591,25 @@ class EnhancedSentimentAnalyzer:
         Combines news and Reddit sentiment with weighted average
         """
         try:
-            # Get sentiment from multiple sources
+            # Get sentiment from multiple sources (served from cache after prefetch)
             news_sentiment = self.get_news_sentiment(symbol)
             reddit_sentiment = self.get_reddit_sentiment(symbol)
-            
-            # Default neutral sentiment
-            final_score = 50.0
-            
-            # Weight calculation based on data availability
-            total_weight = 0
-            weighted_sum = 0
-            
-            # News sentiment (weight: 0.6)
-            if news_sentiment['count'] > 0:
-                news_weight = min(0.6, news_sentiment['count'] * 0.1)  # Max 0.6, scales with article count
-                weighted_sum += news_sentiment['score'] * news_weight
-                total_weight += news_weight
-                logger.info(f"News sentiment for {symbol}: {news_sentiment['score']:.1f} (from {news_sentiment['count']} articles)")
-            
-            # Reddit sentiment (weight: 0.4)
-            if reddit_sentiment['count'] > 0:
-                reddit_weight = min(0.4, reddit_sentiment['count'] * 0.05)  # Max 0.4, scales with post count
-                weighted_sum += reddit_sentiment['score'] * reddit_weight
-                total_weight += reddit_weight
-                logger.info(f"Reddit sentiment for {symbol}: {reddit_sentiment['score']:.1f} (from {reddit_sentiment['count']} posts)")
-            
-            # Calculate final weighted score
-            if total_weight > 0:
-                final_score = weighted_sum / total_weight
-            
-            logger.info(f"Final sentiment score for {symbol}: {final_score:.1f}/100")
-            
-            return round(final_score, 1)
+            return self.combine_sentiment(symbol, news_sentiment, reddit_sentiment)
             
         except Exception as e:
             logger.error(f"Error calculating sentiment for {symbol}: {e}")
             return 50.0  # Return neutral sentiment on error
+    
+    def get_cache_stats(self) -> Dict:
+        """Cache hit/miss counters"""
+        return {
+            'source_entries': len(self.cache.entries),
+            'source_hits': self.cache.hits,
+            'source_misses': self.cache.misses,
+            'polarity_entries': len(self.polarity_cache),
+            'texts_scored': self.polarity_cache.scored,
+            'reddit_wait_seconds': round(self.reddit_pacer.waited, 2)
+        }
 
 
 def test_sentiment_analyzer():
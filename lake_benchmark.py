@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+PlanB Motoru - Personal Data Lake benchmark
+
+Sentetik olaylarla columnar lake ingest hızı ve öngörü süresini ölçer; küçük bir
+örnekle eski "olay başına şifreli JSON dosyası" yolu ile karşılaştırır.
+
+Kullanım:
+    python lake_benchmark.py --events 1000000 --legacy-sample 5000
+"""
+
+import argparse
+import json
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from src.ai.personal_data_lake import PersonalDataLake
+from src.storage.columnar_lake import ColumnarLake
+from src.storage.document_store import DocumentStore
+
+
+def synthetic_trades(count: int, days: int = 365, seed: int = 42) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    now = pd.Timestamp(datetime.now())
+    symbols = np.array([f"SYM{i:03d}" for i in range(500)])
+    return pd.DataFrame({
+        'ts': now - pd.to_timedelta(rng.integers(0, days * 86400, count), unit='s'),
+        'symbol': symbols[rng.integers(0, len(symbols), count)],
+        'transaction_type': np.array(['buy', 'sell'])[rng.integers(0, 2, count)],
+        'quantity': rng.integers(1, 1000, count),
+        'price': rng.uniform(1, 500, count).round(2),
+        'market': np.array(['bist', 'nasdaq', 'crypto'])[rng.integers(0, 3, count)],
+    })
+
+
+def legacy_roundtrip(directory: str, frame: pd.DataFrame) -> tuple:
+    """Eski yol: olay başına bir JSON dosyası yaz, öngörü için hepsini geri oku"""
+    os.makedirs(directory, exist_ok=True)
+    started = time.perf_counter()
+    for i, row in enumerate(frame.to_dict('records')):
+        row['ts'] = row['ts'].isoformat()
+        with open(f"{directory}/trade_{i}.json", 'w', encoding='utf-8') as f:
+            json.dump({'trade_data': row}, f, indent=2, ensure_ascii=False)
+    write_time = time.perf_counter() - started
+
+    started = time.perf_counter()
+    rows = []
+    for filename in os.listdir(directory):
+        with open(f"{directory}/{filename}", 'r', encoding='utf-8') as f:
+            rows.append(json.load(f)['trade_data'])
+    pd.DataFrame(rows)
+    return write_time, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description="PlanB personal data lake benchmark")
+    parser.add_argument("--events", type=int, default=1_000_000)
+    parser.add_argument("--block-rows", type=int, default=50_000)
+    parser.add_argument("--legacy-sample", type=int, default=5000, help="0 = eski yol ölçülmez")
+    args = parser.parse_args()
+
+    frame = synthetic_trades(args.events)
+    with tempfile.TemporaryDirectory() as tmp:
+        lake = ColumnarLake(os.path.join(tmp, "columnar"), block_rows=args.block_rows)
+        started = time.perf_counter()
+        blocks = lake.append_frame('trades', frame)
+        ingest = time.perf_counter() - started
+        size_mb = sum(block['bytes'] for block in lake.blocks()) / 1024 / 1024
+        print(f"📥 Ingest: {args.events:,} olay, {blocks} blok, {size_mb:.1f} MB şifreli, "
+              f"{ingest:.2f}s ({args.events / ingest:,.0f} olay/s)")
+
+        store = DocumentStore(os.path.join(tmp, "store.db"))
+        data_lake = PersonalDataLake(store=store, data_directory=os.path.join(tmp, "lake"), lake=lake)
+
+        started = time.perf_counter()
+        patterns = data_lake._analyze_trading_patterns()
+        insight = time.perf_counter() - started
+        print(f"🧠 İşlem kalıpları (90 gün, 2 kolon): {insight * 1000:.1f} ms, "
+              f"{patterns['trade_count_90d']:,} işlem, {lake.stats['blocks_pruned']} blok elendi")
+
+        started = time.perf_counter()
+        symbol_rows = lake.scan('trades', columns=['ts', 'price'], filters=[('symbol', '==', 'SYM007')])
+        print(f"🔎 Sembol filtresi (tüm yıl): {(time.perf_counter() - started) * 1000:.1f} ms, {len(symbol_rows):,} satır")
+
+        started = time.perf_counter()
+        report = data_lake.get_data_quality_report()
+        print(f"📊 Veri kalitesi raporu: {(time.perf_counter() - started) * 1000:.1f} ms, "
+              f"{report['total_data_points']:,} veri noktası, tazelik {report['data_freshness']}")
+        store.close()
+
+        if args.legacy_sample:
+            sample = frame.head(args.legacy_sample)
+            write_time, read_time = legacy_roundtrip(os.path.join(tmp, "legacy"), sample)
+            scale = args.events / len(sample)
+            print(f"🐢 Eski yol ({len(sample):,} örnek): yazma {write_time:.2f}s, okuma {read_time:.2f}s "
+                  f"→ {args.events:,} olay için ~{write_time * scale:.0f}s / ~{read_time * scale:.0f}s")
+
+
+if __name__ == "__main__":
+    main()
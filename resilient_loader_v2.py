@@ -44,6 +44,15 @@ def is_finnhub_supported(ticker):
     # If no exchange suffix or US ticker, likely supported
     return True
 
+def load_from_archive(ticker, period, interval, ttl):
+    """Serve a cache miss from the collector's Parquet market archive (cold tier)"""
+    try:
+        from src.storage.market_archive import market_archive, serve_from_archive
+        return serve_from_archive(market_archive, ticker, period, interval, max_age=ttl)
+    except Exception as e:
+        print(f"⚠️ Archive read error for {ticker}: {e}")
+        return None
+
 def cached_download(ticker, period="10d", interval="1d", ttl=172800):  # 2 gün TTL
     """
     Enhanced resilient data loader v2 with parquet cache
@@ -75,6 +84,21 @@ def cached_download(ticker, period="10d", interval="1d", ttl=172800):  # 2 gün
                 print(f"⚠️ Parquet cache read error for {ticker}: {e}")
                 # Continue to fresh download
     
+    # Cold tier: archived bars cover the period -> no network request
+    archived_df = load_from_archive(ticker, period, interval, ttl)
+    if archived_df is not None:
+        try:
+            archived_df.to_parquet(cache_path, compression="zstd", engine="pyarrow")
+            # Archive data is complete only until the next session opens: age the cache file so it expires then
+            valid_until = archived_df.attrs.get('valid_until')
+            if valid_until:
+                stamp = min(time.time(), valid_until - ttl)
+                os.utime(cache_path, (stamp, stamp))
+        except Exception as e:
+            print(f"⚠️ Parquet cache save error: {e}")
+        print(f"🗄️ Archive hit: {ticker} ({len(archived_df)} rows) → Parquet cached")
+        return archived_df
+    
     # Try Yahoo Finance first
     try:
         print(f"🌐 Downloading {ticker} from Yahoo...")
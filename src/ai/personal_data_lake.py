@@ -4,18 +4,26 @@ Kişisel veri gölü ve AI öğrenme sistemi
 """
 import json
 import os
+import shutil
 import pandas as pd
 import numpy as np
 from typing import Dict, List, Optional, Any, Tuple
 from datetime import datetime, timedelta
 from src.utils.logger import log_info, log_error, log_debug
 from src.security.encryption_manager import encryption_manager
+from src.storage.document_store import DocumentStore, document_store
+from src.storage.columnar_lake import ColumnarLake
 
 class PersonalDataLake:
     """Kişisel veri gölü ve AI öğrenme sistemi"""
     
-    def __init__(self):
-        self.data_directory = "data/personal_data_lake"
+    # Olay kategorileri columnar lake'e yazılır; eski dosya başına olay dizinleri bir kez taşınır
+    EVENT_CATEGORIES = ('portfolios', 'analyses', 'trades', 'behavior')
+    
+    def __init__(self, store: DocumentStore = None, data_directory: str = "data/personal_data_lake",
+                 lake: ColumnarLake = None):
+        self.data_directory = data_directory
+        self.store = store or document_store
         
         # Veri kategorileri
         self.data_categories = {
@@ -31,6 +39,8 @@ class PersonalDataLake:
         }
         
         self._ensure_directories()
+        self.lake = lake or ColumnarLake(f"{self.data_directory}/columnar")
+        self._migrate_legacy_event_files()
         
         # AI öğrenme modelleri
         self.learning_models = {
@@ -53,19 +63,12 @@ class PersonalDataLake:
     def store_portfolio_data(self, portfolio_data: Dict[str, Any]) -> bool:
         """Portföy verilerini sakla"""
         try:
-            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-            filename = f"{self.data_directory}/portfolios/portfolio_{timestamp}.json"
-            
-            # Veriyi şifrele
-            encrypted_data = self._encrypt_data(portfolio_data)
-            
-            with open(filename, 'w', encoding='utf-8') as f:
-                json.dump(encrypted_data, f, indent=2, ensure_ascii=False)
+            self._append_event('portfolios', portfolio_data)
             
             # AI öğrenme için veriyi işle
             self._process_portfolio_for_learning(portfolio_data)
             
-            log_info(f"Portföy verisi saklandı: {filename}")
+            log_info("Portföy verisi saklandı")
             return True
             
         except Exception as e:
@@ -76,7 +79,6 @@ class PersonalDataLake:
         """Analiz verilerini sakla"""
         try:
             timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-            filename = f"{self.data_directory}/analyses/{symbol}_{timestamp}.json"
             
             # Veriyi zenginleştir
             enriched_data = {
@@ -87,16 +89,12 @@ class PersonalDataLake:
                 'user_context': self._get_user_context()
             }
             
-            # Veriyi şifrele
-            encrypted_data = self._encrypt_data(enriched_data)
-            
-            with open(filename, 'w', encoding='utf-8') as f:
-                json.dump(encrypted_data, f, indent=2, ensure_ascii=False)
+            self._append_event('analyses', enriched_data, analysis_data, symbol=symbol)
             
             # AI öğrenme için veriyi işle
             self._process_analysis_for_learning(symbol, analysis_data)
             
-            log_info(f"Analiz verisi saklandı: {filename}")
+            log_info(f"Analiz verisi saklandı: {symbol}")
             return True
             
         except Exception as e:
@@ -107,7 +105,6 @@ class PersonalDataLake:
         """İşlem verilerini sakla"""
         try:
             timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-            filename = f"{self.data_directory}/trades/trade_{timestamp}.json"
             
             # Veriyi zenginleştir
             enriched_data = {
@@ -117,16 +114,12 @@ class PersonalDataLake:
                 'analysis_context': self._get_analysis_context(trade_data.get('symbol', ''))
             }
             
-            # Veriyi şifrele
-            encrypted_data = self._encrypt_data(enriched_data)
-            
-            with open(filename, 'w', encoding='utf-8') as f:
-                json.dump(encrypted_data, f, indent=2, ensure_ascii=False)
+            self._append_event('trades', enriched_data, trade_data)
             
             # AI öğrenme için veriyi işle
             self._process_trade_for_learning(trade_data)
             
-            log_info(f"İşlem verisi saklandı: {filename}")
+            log_info(f"İşlem verisi saklandı: {trade_data.get('symbol', '')}")
             return True
             
         except Exception as e:
@@ -137,7 +130,6 @@ class PersonalDataLake:
         """Kullanıcı davranış verilerini sakla"""
         try:
             timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-            filename = f"{self.data_directory}/behavior/behavior_{timestamp}.json"
             
             # Veriyi zenginleştir
             enriched_data = {
@@ -146,22 +138,66 @@ class PersonalDataLake:
                 'session_context': self._get_session_context()
             }
             
-            # Veriyi şifrele
-            encrypted_data = self._encrypt_data(enriched_data)
-            
-            with open(filename, 'w', encoding='utf-8') as f:
-                json.dump(encrypted_data, f, indent=2, ensure_ascii=False)
+            self._append_event('behavior', enriched_data, behavior_data)
             
             # AI öğrenme için veriyi işle
             self._process_behavior_for_learning(behavior_data)
             
-            log_info(f"Kullanıcı davranış verisi saklandı: {filename}")
+            log_info("Kullanıcı davranış verisi saklandı")
             return True
             
         except Exception as e:
             log_error(f"Kullanıcı davranış verisi saklama hatası: {e}")
             return False
     
+    def _append_event(self, category: str, record: Dict[str, Any], fields: Dict[str, Any] = None,
+                      ts: datetime = None, **columns):
+        """Olayı lake'e ekle: üst düzey skaler alanlar kolon, tam kayıt `payload` olarak"""
+        row = {
+            key: value for key, value in (fields if fields is not None else record).items()
+            if isinstance(value, (str, int, float, bool)) and key not in ('ts', 'payload')
+        }
+        row.update(columns)
+        row['ts'] = ts or datetime.now()
+        row['payload'] = json.dumps(record, ensure_ascii=False, default=str)
+        self.lake.append(category, row)
+    
+    def _migrate_legacy_event_files(self):
+        """Eski olay başına JSON dosyalarını lake'e taşı ve `_migrated` altına al"""
+        for category in self.EVENT_CATEGORIES:
+            directory = f"{self.data_directory}/{category}"
+            files = sorted(f for f in os.listdir(directory) if f.endswith('.json'))
+            if not files:
+                continue
+            try:
+                for filename in files:
+                    path = f"{directory}/{filename}"
+                    with open(path, 'r', encoding='utf-8') as f:
+                        record = json.load(f)
+                    fields = next((record[k] for k in ('analysis_data', 'trade_data', 'behavior_data')
+                                   if isinstance(record.get(k), dict)), record)
+                    extra = {'symbol': record['symbol']} if isinstance(record.get('symbol'), str) else {}
+                    self._append_event(category, record, fields,
+                                       ts=datetime.fromtimestamp(os.path.getmtime(path)), **extra)
+                self.lake.flush(category)
+                
+                migrated_dir = f"{self.data_directory}/_migrated/{category}"
+                os.makedirs(migrated_dir, exist_ok=True)
+                for filename in files:
+                    shutil.move(f"{directory}/{filename}", f"{migrated_dir}/{filename}")
+                log_info(f"{len(files)} {category} olayı columnar lake'e taşındı")
+            except Exception as e:
+                log_error(f"Lake taşıma hatası ({category}): {e}")
+    
+    def query_events(self, category: str, columns: List[str] = None, start: datetime = None,
+                     end: datetime = None, filters: List[Tuple[str, str, Any]] = ()) -> pd.DataFrame:
+        """Lake olaylarını yalnızca gereken kolon ve bölümleri okuyarak sorgula"""
+        try:
+            return self.lake.scan(category, columns=columns, start=start, end=end, filters=filters)
+        except Exception as e:
+            log_error(f"Lake sorgu hatası ({category}): {e}")
+            return pd.DataFrame(columns=columns or [])
+    
     def generate_ai_insights(self) -> Dict[str, Any]:
         """AI öngörüleri oluştur"""
         try:
@@ -222,11 +258,7 @@ class PersonalDataLake:
             self._update_learning_models(learning_data)
             
             # Öğrenme verilerini sakla
-            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-            filename = f"{self.data_directory}/learning/feedback_{timestamp}.json"
-            
-            with open(filename, 'w', encoding='utf-8') as f:
-                json.dump(learning_data, f, indent=2, ensure_ascii=False)
+            self.store.append_log('lake_feedback', learning_data, ts=learning_data['timestamp'])
             
             log_info("Geri bildirimden öğrenme tamamlandı")
             return True
@@ -306,6 +338,10 @@ class PersonalDataLake:
                 'confidence_threshold': 0.7
             }
             
+            analyses = self.query_events('analyses', columns=['symbol'], start=datetime.now() - timedelta(days=90))
+            if not analyses.empty:
+                preferences['most_analyzed_symbols'] = list(analyses['symbol'].value_counts().index[:5])
+            
             return preferences
             
         except Exception as e:
@@ -325,6 +361,17 @@ class PersonalDataLake:
                 'diversification_level': 'high'
             }
             
+            # Son 90 günün işlemleri: yalnızca zaman ve işlem tipi kolonları okunur
+            trades = self.query_events('trades', columns=['ts', 'transaction_type'],
+                                       start=datetime.now() - timedelta(days=90))
+            if not trades.empty:
+                hours = trades['ts'].dt.hour
+                for side, key in (('buy', 'preferred_entry_times'), ('sell', 'preferred_exit_times')):
+                    top_hours = hours[trades['transaction_type'] == side].value_counts().index[:2]
+                    if len(top_hours):
+                        patterns[key] = [f"{hour:02d}:00" for hour in sorted(top_hours)]
+                patterns['trade_count_90d'] = int(len(trades))
+            
             return patterns
             
         except Exception as e:
@@ -366,6 +413,11 @@ class PersonalDataLake:
                 'trend_following_tendency': 0.7
             }
             
+            trades = self.query_events('trades', columns=['ts'], start=datetime.now() - timedelta(days=90))
+            if not trades.empty:
+                busiest_days = trades['ts'].dt.day_name().value_counts().index[:3]
+                market_timing['best_performing_days'] = list(busiest_days)
+            
             return market_timing
             
         except Exception as e:
@@ -446,24 +498,6 @@ class PersonalDataLake:
         except Exception as e:
             return {}
     
-    def _encrypt_data(self, data: Dict[str, Any]) -> Dict[str, Any]:
-        """Veriyi şifrele"""
-        try:
-            # Hassas verileri şifrele
-            encrypted_data = data.copy()
-            
-            # Portföy değerlerini şifrele
-            if 'portfolio_data' in encrypted_data:
-                portfolio_data = encrypted_data['portfolio_data']
-                if 'cash' in portfolio_data:
-                    portfolio_data['cash'] = encryption_manager.encrypt(str(portfolio_data['cash']))
-            
-            return encrypted_data
-            
-        except Exception as e:
-            log_error(f"Veri şifreleme hatası: {e}")
-            return data
-    
     def _get_market_conditions(self) -> Dict[str, Any]:
         """Piyasa koşullarını getir"""
         try:
@@ -490,6 +524,17 @@ class PersonalDataLake:
         except Exception as e:
             return {}
     
+    def _get_analysis_context(self, symbol: str) -> Dict[str, Any]:
+        """İşlem anındaki analiz bağlamını getir"""
+        try:
+            last_analysis = self.lake.latest('analyses')
+            return {
+                'symbol': symbol,
+                'last_analysis_at': last_analysis.isoformat() if last_analysis else None
+            }
+        except Exception as e:
+            return {}
+    
     def _get_session_context(self) -> Dict[str, Any]:
         """Oturum bağlamını getir"""
         try:
@@ -506,11 +551,7 @@ class PersonalDataLake:
     def _store_ai_insights(self, insights: Dict[str, Any]):
         """AI öngörülerini sakla"""
         try:
-            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-            filename = f"{self.data_directory}/insights/insights_{timestamp}.json"
-            
-            with open(filename, 'w', encoding='utf-8') as f:
-                json.dump(insights, f, indent=2, ensure_ascii=False)
+            self.store.append_log('lake_insights', insights)
             
         except Exception as e:
             log_error(f"AI öngörü saklama hatası: {e}")
@@ -536,10 +577,11 @@ class PersonalDataLake:
     def _count_total_data_points(self) -> int:
         """Toplam veri noktası sayısını hesapla"""
         try:
-            total_count = 0
+            # Lake olayları manifest'ten sayılır; diğer kategoriler hâlâ dosya başına kayıttır
+            total_count = self.lake.count()
             for category in self.data_categories.values():
                 category_path = f"{self.data_directory}/{category}"
-                if os.path.exists(category_path):
+                if category not in self.EVENT_CATEGORIES and os.path.exists(category_path):
                     total_count += len([f for f in os.listdir(category_path) if f.endswith('.json')])
             return total_count
         except Exception as e:
@@ -548,8 +590,14 @@ class PersonalDataLake:
     def _calculate_data_freshness(self) -> float:
         """Veri tazeliğini hesapla"""
         try:
-            # Simüle edilmiş veri tazeliği
-            return 0.85  # %85 taze
+            # Kategori başına en yeni olayın yaşı (30 günde sıfıra iner), manifest'ten
+            scores = []
+            for category in self.EVENT_CATEGORIES:
+                latest = self.lake.latest(category)
+                if latest:
+                    age_days = (datetime.now() - latest).total_seconds() / 86400
+                    scores.append(max(0.0, 1 - age_days / 30))
+            return round(sum(scores) / len(scores), 2) if scores else 0.0
         except Exception as e:
             return 0.0
     
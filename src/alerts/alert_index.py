@@ -0,0 +1,331 @@
+"""
+PlanB Motoru - Alert Index
+(tür, pazar, sembol) anahtarlı uyarı indeksi, sıralı eşik dizileri ve cooldown heap'i
+"""
+import heapq
+import math
+import time
+from bisect import bisect_left, bisect_right
+from datetime import datetime
+from typing import Dict, List, Optional, Any, Tuple, Mapping, Iterable
+import numpy as np
+import pandas as pd
+from src.utils.logger import log_error, log_debug
+
+
+class ThresholdBook:
+    """Eşiğe göre sıralı uyarı listesi; aşılan uyarılar bisect ile bulunur"""
+
+    def __init__(self):
+        self._values: List[float] = []
+        self._ids: List[str] = []
+        self._by_id: Dict[str, float] = {}
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __contains__(self, alert_id: str) -> bool:
+        return alert_id in self._by_id
+
+    @property
+    def ids(self) -> List[str]:
+        return list(self._ids)
+
+    def add(self, alert_id: str, threshold: float):
+        """Uyarıyı eşik sırasına ekle (varsa eski kaydın yerine)"""
+        self.remove(alert_id)
+        pos = bisect_right(self._values, threshold)
+        self._values.insert(pos, threshold)
+        self._ids.insert(pos, alert_id)
+        self._by_id[alert_id] = threshold
+
+    def remove(self, alert_id: str) -> bool:
+        """Uyarıyı listeden çıkar"""
+        threshold = self._by_id.pop(alert_id, None)
+        if threshold is None:
+            return False
+        lo = bisect_left(self._values, threshold)
+        hi = bisect_right(self._values, threshold)
+        pos = self._ids.index(alert_id, lo, hi)
+        del self._values[pos]
+        del self._ids[pos]
+        return True
+
+    def below(self, value: float, inclusive: bool = False) -> List[str]:
+        """Eşiği value'nun altında kalan uyarılar (value eşiği yukarı aşmış)"""
+        end = bisect_right(self._values, value) if inclusive else bisect_left(self._values, value)
+        return self._ids[:end]
+
+    def above(self, value: float, inclusive: bool = False) -> List[str]:
+        """Eşiği value'nun üstünde kalan uyarılar (value eşiği aşağı kırmış)"""
+        start = bisect_left(self._values, value) if inclusive else bisect_right(self._values, value)
+        return self._ids[start:]
+
+    def items(self) -> Iterable[Tuple[str, float]]:
+        return zip(self._ids, self._values)
+
+
+class DeadlineHeap:
+    """Süre sonu (cooldown, expiry) takibi; süresi dolanlar heap'ten O(log n) ile düşer"""
+
+    def __init__(self):
+        self._heap: List[Tuple[float, str]] = []
+        self._until: Dict[str, float] = {}
+
+    def __len__(self) -> int:
+        return len(self._until)
+
+    def __contains__(self, alert_id: str) -> bool:
+        return alert_id in self._until
+
+    def start(self, alert_id: str, until: float):
+        """Uyarı için bitiş zamanı (epoch saniye) belirle"""
+        self._until[alert_id] = until
+        heapq.heappush(self._heap, (until, alert_id))
+        # Güncellenen/silinen kayıtlardan kalan eski girdiler birikirse heap'i yeniden kur
+        if len(self._heap) > 2 * len(self._until) + 64:
+            self._heap = [(u, a) for a, u in self._until.items()]
+            heapq.heapify(self._heap)
+
+    def clear(self, alert_id: str):
+        """Bitiş zamanını kaldır (heap girdisi tembel olarak düşer)"""
+        self._until.pop(alert_id, None)
+
+    def release(self, now: Optional[float] = None) -> List[str]:
+        """Süresi dolan uyarıları çıkar ve döndür"""
+        now = time.time() if now is None else now
+        released = []
+        while self._heap and self._heap[0][0] <= now:
+            until, alert_id = heapq.heappop(self._heap)
+            if self._until.get(alert_id) == until:
+                del self._until[alert_id]
+                released.append(alert_id)
+        return released
+
+    def is_pending(self, alert_id: str, now: Optional[float] = None) -> bool:
+        """Uyarının süresi henüz dolmadı mı"""
+        self.release(now)
+        return alert_id in self._until
+
+    def pending(self, now: Optional[float] = None) -> Dict[str, float]:
+        """Süresi dolmamış uyarılar -> bitiş zamanı"""
+        self.release(now)
+        return self._until
+
+
+def parse_timestamp(value: Any) -> Optional[float]:
+    """ISO zaman damgasını epoch saniyeye çevir"""
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value).timestamp()
+    except (TypeError, ValueError):
+        return None
+
+
+def price_bounds(conditions: Dict[str, Any]) -> Tuple[float, float]:
+    """price_above/price_below koşullarını açık (alt, üst) aralığa çevir"""
+    low = float(conditions['price_above']) if 'price_above' in conditions else -math.inf
+    high = float(conditions['price_below']) if 'price_below' in conditions else math.inf
+    if math.isnan(low) or math.isnan(high):
+        raise ValueError("NaN fiyat eşiği")
+    return low, high
+
+
+class PriceBook:
+    """Tek sembolün fiyat uyarıları: alt sınır, üst sınır, bant ve koşulsuz gruplar"""
+
+    def __init__(self):
+        self.above = ThresholdBook()   # yalnızca price_above: fiyat > eşik
+        self.below = ThresholdBook()   # yalnızca price_below: fiyat < eşik
+        self.bands: Dict[str, Tuple[float, float]] = {}
+        self.unbounded: Dict[str, None] = {}
+
+    def __len__(self) -> int:
+        return len(self.above) + len(self.below) + len(self.bands) + len(self.unbounded)
+
+    def add(self, alert_id: str, low: float, high: float):
+        self.remove(alert_id)
+        if low > -math.inf and high < math.inf:
+            self.bands[alert_id] = (low, high)
+        elif low > -math.inf:
+            self.above.add(alert_id, low)
+        elif high < math.inf:
+            self.below.add(alert_id, high)
+        else:
+            self.unbounded[alert_id] = None
+
+    def remove(self, alert_id: str) -> bool:
+        removed = self.above.remove(alert_id) or self.below.remove(alert_id)
+        removed = self.bands.pop(alert_id, False) is not False or removed
+        removed = self.unbounded.pop(alert_id, False) is not False or removed
+        return removed
+
+    def crossed(self, price: float) -> List[str]:
+        """Fiyatın koşulunu sağladığı uyarılar"""
+        if math.isnan(price):
+            return []
+        ids = self.above.below(price)
+        ids += self.below.above(price)
+        if self.bands:
+            ids += [aid for aid, (low, high) in self.bands.items() if low < price < high]
+        ids += list(self.unbounded)
+        return ids
+
+    def entries(self) -> Iterable[Tuple[str, float, float]]:
+        for aid, low in self.above.items():
+            yield aid, low, math.inf
+        for aid, high in self.below.items():
+            yield aid, -math.inf, high
+        for aid, (low, high) in self.bands.items():
+            yield aid, low, high
+        for aid in self.unbounded:
+            yield aid, -math.inf, math.inf
+
+
+class AlertIndex:
+    """CustomAlertManager uyarıları için (tür, pazar, sembol) anahtarlı indeks"""
+
+    def __init__(self):
+        self._buckets: Dict[Tuple[str, str, str], Dict[str, None]] = {}
+        self._keys: Dict[str, Tuple[str, str, str]] = {}
+        self._order: Dict[str, int] = {}
+        self._seq = 0
+        self._price_books: Dict[Tuple[str, str], PriceBook] = {}
+        self._market_arrays: Dict[str, Dict[str, Any]] = {}
+        self.cooldowns = DeadlineHeap()
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def rebuild(self, alerts: Dict[str, Dict[str, Any]]):
+        """İndeksi uyarı sözlüğünden baştan kur"""
+        self.__init__()
+        for alert_data in alerts.values():
+            self.add(alert_data)
+        log_debug(f"Uyarı indeksi kuruldu: {len(self)} aktif uyarı")
+
+    def add(self, alert_data: Dict[str, Any]) -> bool:
+        """Uyarıyı indekse ekle/güncelle; pasif uyarılar indekslenmez"""
+        alert_id = alert_data['alert_id']
+        self.remove(alert_id)
+        if alert_data.get('type') == 'price':
+            try:
+                low, high = price_bounds(alert_data.get('conditions', {}))
+            except (TypeError, ValueError) as e:
+                log_error(f"Geçersiz fiyat koşulu ({alert_id}): {e}")
+                return False
+
+        # Cooldown, pasif uyarı yeniden aktifleşirse de geçerli kalmalı
+        last_triggered = parse_timestamp(alert_data.get('last_triggered'))
+        if last_triggered is not None:
+            until = last_triggered + alert_data.get('cooldown_minutes', 60) * 60
+            if until > time.time():
+                self.cooldowns.start(alert_id, until)
+
+        if not alert_data.get('is_active', True):
+            return False
+
+        key = (alert_data.get('type'), alert_data.get('market'), alert_data.get('symbol'))
+        self._buckets.setdefault(key, {})[alert_id] = None
+        self._keys[alert_id] = key
+        self._order.setdefault(alert_id, self._seq)
+        self._seq += 1
+
+        if key[0] == 'price':
+            self._price_books.setdefault(key[1:], PriceBook()).add(alert_id, low, high)
+            self._market_arrays.pop(key[1], None)
+        return True
+
+    def remove(self, alert_id: str) -> bool:
+        """Uyarıyı indeksten çıkar"""
+        self.cooldowns.clear(alert_id)
+        key = self._keys.pop(alert_id, None)
+        if key is None:
+            return False
+        bucket = self._buckets.get(key)
+        if bucket is not None:
+            bucket.pop(alert_id, None)
+            if not bucket:
+                del self._buckets[key]
+        if key[0] == 'price':
+            book = self._price_books.get(key[1:])
+            if book is not None:
+                book.remove(alert_id)
+                if not len(book):
+                    del self._price_books[key[1:]]
+            self._market_arrays.pop(key[1], None)
+        return True
+
+    def start_cooldown(self, alert_id: str, cooldown_minutes: float, now: Optional[float] = None):
+        """Tetiklenen uyarı için cooldown başlat"""
+        now = time.time() if now is None else now
+        if cooldown_minutes and cooldown_minutes > 0:
+            self.cooldowns.start(alert_id, now + cooldown_minutes * 60)
+
+    def _ready(self, alert_ids: Iterable[str], now: Optional[float] = None) -> List[str]:
+        """Cooldown'da olmayanları oluşturulma sırasıyla döndür"""
+        cooling = self.cooldowns.pending(now)
+        ready = [aid for aid in alert_ids if aid not in cooling]
+        ready.sort(key=self._order.__getitem__)
+        return ready
+
+    def candidates(self, alert_type: str, market: str, symbol: str, now: Optional[float] = None) -> List[str]:
+        """Tür/pazar/sembol için cooldown'da olmayan aktif uyarılar"""
+        bucket = self._buckets.get((alert_type, market, symbol))
+        if not bucket:
+            return []
+        return self._ready(bucket, now)
+
+    def crossed_prices(self, market: str, symbol: str, price: float, now: Optional[float] = None) -> List[str]:
+        """Fiyatın koşulunu sağladığı, cooldown'da olmayan fiyat uyarıları"""
+        book = self._price_books.get((market, symbol))
+        if book is None:
+            return []
+        return self._ready(book.crossed(float(price)), now)
+
+    def _build_market_arrays(self, market: str) -> Dict[str, Any]:
+        """Pazarın tüm fiyat uyarılarını düz numpy dizilerine çevir"""
+        rows = [
+            (self._order[aid], symbol, aid, low, high)
+            for (book_market, symbol), book in self._price_books.items() if book_market == market
+            for aid, low, high in book.entries()
+        ]
+        rows.sort(key=lambda row: row[0])
+        symbols = [row[1] for row in rows]
+        codes, uniques = pd.factorize(pd.Index(symbols, dtype=object))
+        arrays = {
+            'symbols': pd.Index(uniques),
+            'codes': codes.astype(np.intp),
+            'alert_ids': np.array([row[2] for row in rows], dtype=object),
+            'lows': np.array([row[3] for row in rows], dtype=np.float64),
+            'highs': np.array([row[4] for row in rows], dtype=np.float64),
+        }
+        self._market_arrays[market] = arrays
+        return arrays
+
+    def crossed_market(self, market: str, prices: Mapping[str, float],
+                       now: Optional[float] = None) -> Dict[str, List[str]]:
+        """Bir pazarın tüm tick'lerini tek vektörel karşılaştırmada değerlendir"""
+        arrays = self._market_arrays.get(market) or self._build_market_arrays(market)
+        if not len(arrays['alert_ids']):
+            return {}
+
+        tick_series = prices if isinstance(prices, pd.Series) else pd.Series(prices, dtype=np.float64)
+        tick_series = tick_series[~tick_series.index.duplicated(keep='last')]
+        symbol_prices = tick_series.reindex(arrays['symbols']).to_numpy(dtype=np.float64)
+        alert_prices = symbol_prices[arrays['codes']]
+        # NaN (tick gelmeyen sembol) her iki karşılaştırmada da False döner
+        mask = (alert_prices > arrays['lows']) & (alert_prices < arrays['highs'])
+        if not mask.any():
+            return {}
+
+        cooling = self.cooldowns.pending(now)
+        result: Dict[str, List[str]] = {}
+        symbols = arrays['symbols']
+        for pos in np.flatnonzero(mask):
+            alert_id = arrays['alert_ids'][pos]
+            if alert_id in cooling:
+                continue
+            result.setdefault(symbols[arrays['codes'][pos]], []).append(alert_id)
+        return result
@@ -6,11 +6,14 @@ import json
 import os
 import threading
 import time
-from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Any, Callable
+from datetime import datetime
+from typing import Dict, List, Optional, Any, Callable, Mapping, Tuple
 from dataclasses import dataclass, asdict
 from enum import Enum
+import numpy as np
+import pandas as pd
 from src.utils.logger import log_info, log_error, log_debug, log_warning
+from src.alerts.alert_index import ThresholdBook, DeadlineHeap, parse_timestamp
 
 class AlertType(Enum):
     """Uyarı türleri"""
@@ -29,6 +32,9 @@ class AlertStatus(Enum):
     EXPIRED = "expired"
     DISABLED = "disabled"
 
+PRICE_ALERT_TYPES = (AlertType.PRICE_ABOVE, AlertType.PRICE_BELOW, AlertType.PRICE_CHANGE)
+ANALYSIS_ALERT_TYPES = (AlertType.ANALYSIS_SCORE, AlertType.SENTIMENT_CHANGE)
+
 @dataclass
 class Alert:
     """Uyarı sınıfı"""
@@ -68,6 +74,15 @@ class AlertManager:
         self.callbacks: List[Callable] = []
         self.running = False
         self.monitor_thread = None
+        # (tür, sembol) -> eşiğe göre sıralı aktif uyarılar
+        self._books: Dict[Tuple[AlertType, str], ThresholdBook] = {}
+        self._indexed: Dict[str, Tuple[AlertType, str]] = {}
+        self.cooldowns = DeadlineHeap()
+        self.expiries = DeadlineHeap()
+        # Tür -> tüm sembollerin eşikleri düz numpy dizilerinde (toplu kontrol için, indeks değişince düşer)
+        self._arrays: Dict[AlertType, Dict[str, Any]] = {}
+        # İndeks ve heap'ler izleme thread'i ile akış abonesi thread'inden birlikte değiştirilir
+        self.lock = threading.RLock()
         self._ensure_data_dir()
         self._load_alerts()
     
@@ -101,6 +116,7 @@ class AlertManager:
                         cooldown_minutes=alert_data.get('cooldown_minutes', 60)
                     )
                     self.alerts[alert.id] = alert
+                    self._index_alert(alert)
                 
                 log_info(f"{len(self.alerts)} uyarı yüklendi")
             
@@ -112,19 +128,64 @@ class AlertManager:
         try:
             alerts_file = os.path.join(self.data_dir, "alerts.json")
             
-            data = {
-                'alerts': [asdict(alert) for alert in self.alerts.values()],
-                'last_updated': datetime.now().isoformat()
-            }
-            
-            with open(alerts_file, 'w', encoding='utf-8') as f:
-                json.dump(data, f, indent=2, ensure_ascii=False)
+            with self.lock:
+                data = {
+                    'alerts': [asdict(alert) for alert in self.alerts.values()],
+                    'last_updated': datetime.now().isoformat()
+                }
+                
+                with open(alerts_file, 'w', encoding='utf-8') as f:
+                    json.dump(data, f, indent=2, ensure_ascii=False)
             
             log_debug("Uyarılar kaydedildi")
             
         except Exception as e:
             log_error(f"Uyarılar kaydedilirken hata: {e}")
     
+    def _index_alert(self, alert: Alert):
+        """Uyarıyı (tür, sembol) eşik listesine ve süre heap'lerine ekle"""
+        self._unindex_alert(alert.id)
+        
+        last_triggered = parse_timestamp(alert.last_triggered)
+        if last_triggered is not None:
+            cooldown_end = last_triggered + alert.cooldown_minutes * 60
+            if cooldown_end > time.time():
+                self.cooldowns.start(alert.id, cooldown_end)
+        
+        if alert.status != AlertStatus.ACTIVE:
+            return
+        
+        expires_at = parse_timestamp(alert.expires_at)
+        if expires_at is not None:
+            self.expiries.start(alert.id, expires_at)
+        
+        key = (alert.alert_type, alert.symbol)
+        self._books.setdefault(key, ThresholdBook()).add(alert.id, float(alert.threshold))
+        self._indexed[alert.id] = key
+        self._arrays.pop(alert.alert_type, None)
+    
+    def _unindex_alert(self, alert_id: str):
+        """Uyarıyı indeksten çıkar"""
+        self.cooldowns.clear(alert_id)
+        self.expiries.clear(alert_id)
+        key = self._indexed.pop(alert_id, None)
+        if key is not None:
+            book = self._books[key]
+            book.remove(alert_id)
+            if not len(book):
+                del self._books[key]
+            self._arrays.pop(key[0], None)
+    
+    def _expire_due(self) -> int:
+        """Süresi dolan aktif uyarıları EXPIRED yap"""
+        expired = self.expiries.release()
+        for alert_id in expired:
+            alert = self.alerts.get(alert_id)
+            if alert is not None and alert.status == AlertStatus.ACTIVE:
+                alert.status = AlertStatus.EXPIRED
+            self._unindex_alert(alert_id)
+        return len(expired)
+    
     def create_alert(self, symbol: str, alert_type: AlertType, threshold: float, 
                     message: str, condition: str = "", expires_at: str = "",
                     is_recurring: bool = False, cooldown_minutes: int = 60) -> str:
@@ -147,7 +208,9 @@ class AlertManager:
                 cooldown_minutes=cooldown_minutes
             )
             
-            self.alerts[alert_id] = alert
+            with self.lock:
+                self.alerts[alert_id] = alert
+                self._index_alert(alert)
             self._save_alerts()
             
             log_info(f"Uyarı oluşturuldu: {symbol} - {alert_type.value} @ {threshold}")
@@ -160,14 +223,16 @@ class AlertManager:
     def update_alert(self, alert_id: str, **kwargs) -> bool:
         """Uyarıyı güncelle"""
         try:
-            if alert_id not in self.alerts:
-                return False
-            
-            alert = self.alerts[alert_id]
-            for key, value in kwargs.items():
-                if hasattr(alert, key):
-                    setattr(alert, key, value)
-            
+            with self.lock:
+                if alert_id not in self.alerts:
+                    return False
+                
+                alert = self.alerts[alert_id]
+                for key, value in kwargs.items():
+                    if hasattr(alert, key):
+                        setattr(alert, key, value)
+                
+                self._index_alert(alert)
             self._save_alerts()
             log_debug(f"Uyarı güncellendi: {alert_id}")
             return True
@@ -179,12 +244,14 @@ class AlertManager:
     def delete_alert(self, alert_id: str) -> bool:
         """Uyarıyı sil"""
         try:
-            if alert_id in self.alerts:
+            with self.lock:
+                if alert_id not in self.alerts:
+                    return False
                 del self.alerts[alert_id]
-                self._save_alerts()
-                log_info(f"Uyarı silindi: {alert_id}")
-                return True
-            return False
+                self._unindex_alert(alert_id)
+            self._save_alerts()
+            log_info(f"Uyarı silindi: {alert_id}")
+            return True
             
         except Exception as e:
             log_error(f"Uyarı silinirken hata: {e}")
@@ -192,7 +259,8 @@ class AlertManager:
     
     def get_alerts(self, symbol: str = None, status: AlertStatus = None) -> List[Alert]:
         """Uyarıları getir"""
-        alerts = list(self.alerts.values())
+        with self.lock:
+            alerts = list(self.alerts.values())
         
         if symbol:
             alerts = [alert for alert in alerts if alert.symbol == symbol]
@@ -206,15 +274,14 @@ class AlertManager:
         """Uyarı tetiklendiğinde çağrılacak fonksiyon ekle"""
         self.callbacks.append(callback)
     
-    def _trigger_alert(self, alert: Alert, trigger_value: float, data: Dict[str, Any] = None):
-        """Uyarıyı tetikle"""
+    def _trigger_alert(self, alert: Alert, trigger_value: float,
+                       data: Dict[str, Any] = None, save: bool = True) -> Optional[AlertTrigger]:
+        """Uyarıyı tetikle (kilit altında); callback'ler _notify ile kilit dışında çağrılır.
+        save=False ise kayıt çağırana bırakılır (toplu kontrol dosyayı bir kez yazar)."""
         try:
             # Cooldown kontrolü
-            if alert.last_triggered:
-                last_triggered = datetime.fromisoformat(alert.last_triggered)
-                cooldown_end = last_triggered + timedelta(minutes=alert.cooldown_minutes)
-                if datetime.now() < cooldown_end:
-                    return  # Cooldown süresi henüz bitmemiş
+            if self.cooldowns.is_pending(alert.id):
+                return None  # Cooldown süresi henüz bitmemiş
             
             # Tetikleme kaydı oluştur
             trigger_id = f"{alert.id}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
@@ -237,93 +304,165 @@ class AlertManager:
             # Recurring değilse uyarıyı devre dışı bırak
             if not alert.is_recurring:
                 alert.status = AlertStatus.TRIGGERED
+                self._unindex_alert(alert.id)
+            if alert.cooldown_minutes > 0:
+                self.cooldowns.start(alert.id, time.time() + alert.cooldown_minutes * 60)
             
-            self._save_alerts()
+            if save:
+                self._save_alerts()
+            return trigger
             
-            # Callback'leri çağır
-            for callback in self.callbacks:
+        except Exception as e:
+            log_error(f"Uyarı tetiklenirken hata: {e}")
+            return None
+    
+    def _notify(self, triggers: List[AlertTrigger]):
+        """Tetiklenen uyarılar için callback'leri çağır"""
+        for trigger in triggers:
+            for callback in list(self.callbacks):
                 try:
                     callback(trigger)
                 except Exception as e:
                     log_error(f"Alert callback hatası: {e}")
             
-            log_warning(f"🚨 UYARI TETİKLENDİ: {alert.symbol} - {alert.message}")
-            
-        except Exception as e:
-            log_error(f"Uyarı tetiklenirken hata: {e}")
+            log_warning(f"🚨 UYARI TETİKLENDİ: {trigger.symbol} - {trigger.message}")
+    
+    def _crossed(self, alert_type: AlertType, symbol: str, value: float) -> List[str]:
+        """value'nun eşiğine ulaştığı (value >= eşik) uyarılar"""
+        book = self._books.get((alert_type, symbol))
+        return book.below(value, inclusive=True) if book else []
+    
+    def _touch(self, alert_types: Tuple[AlertType, ...], symbol: str):
+        """Sembolün ilgili uyarılarının son kontrol zamanını güncelle"""
+        now = datetime.now().isoformat()
+        for alert_type in alert_types:
+            book = self._books.get((alert_type, symbol))
+            if book:
+                for alert_id in book.ids:
+                    self.alerts[alert_id].last_checked = now
+    
+    def _trigger_in_order(self, alert_ids: List[str], trigger_value: float,
+                          data: Optional[Dict[str, Any]], save: bool = True) -> List[AlertTrigger]:
+        """Adayları oluşturulma sırasıyla tetikle"""
+        triggers = []
+        for alert_id in sorted(dict.fromkeys(alert_ids), key=lambda aid: self.alerts[aid].created_date):
+            trigger = self._trigger_alert(self.alerts[alert_id], trigger_value, data, save=save)
+            if trigger is not None:
+                triggers.append(trigger)
+        return triggers
     
     def check_price_alert(self, symbol: str, current_price: float, price_data: Dict[str, Any] = None):
-        """Fiyat uyarılarını kontrol et"""
+        """Fiyat uyarılarını kontrol et (sıralı eşiklerde bisect)"""
         try:
-            active_alerts = self.get_alerts(symbol, AlertStatus.ACTIVE)
-            
-            for alert in active_alerts:
-                if alert.alert_type not in [AlertType.PRICE_ABOVE, AlertType.PRICE_BELOW, AlertType.PRICE_CHANGE]:
-                    continue
+            with self.lock:
+                self._expire_due()
                 
-                # Süre kontrolü
-                if alert.expires_at:
-                    expires_at = datetime.fromisoformat(alert.expires_at)
-                    if datetime.now() > expires_at:
-                        alert.status = AlertStatus.EXPIRED
-                        continue
-                
-                # Koşul kontrolü
-                should_trigger = False
+                candidates = self._crossed(AlertType.PRICE_ABOVE, symbol, current_price)
                 
-                if alert.alert_type == AlertType.PRICE_ABOVE and current_price >= alert.threshold:
-                    should_trigger = True
-                elif alert.alert_type == AlertType.PRICE_BELOW and current_price <= alert.threshold:
-                    should_trigger = True
-                elif alert.alert_type == AlertType.PRICE_CHANGE:
-                    # Fiyat değişim yüzdesi kontrolü
-                    if price_data and 'previous_price' in price_data:
-                        change_percent = ((current_price - price_data['previous_price']) / price_data['previous_price']) * 100
-                        if abs(change_percent) >= alert.threshold:
-                            should_trigger = True
+                below_book = self._books.get((AlertType.PRICE_BELOW, symbol))
+                if below_book:
+                    candidates += below_book.above(current_price, inclusive=True)
                 
-                if should_trigger:
-                    self._trigger_alert(alert, current_price, price_data)
+                # Fiyat değişim yüzdesi kontrolü
+                if price_data and price_data.get('previous_price'):
+                    change_percent = ((current_price - price_data['previous_price']) / price_data['previous_price']) * 100
+                    candidates += self._crossed(AlertType.PRICE_CHANGE, symbol, abs(change_percent))
                 
-                # Son kontrol zamanını güncelle
-                alert.last_checked = datetime.now().isoformat()
+                triggers = self._trigger_in_order(candidates, current_price, price_data)
+                self._touch(PRICE_ALERT_TYPES, symbol)
+            self._notify(triggers)
             
         except Exception as e:
             log_error(f"Fiyat uyarıları kontrol edilirken hata: {e}")
     
-    def check_analysis_alert(self, symbol: str, analysis_data: Dict[str, Any]):
-        """Analiz uyarılarını kontrol et"""
+    def _type_arrays(self, alert_type: AlertType) -> Dict[str, Any]:
+        """Bir türün tüm sembollerdeki eşiklerini düz numpy dizilerine çevir"""
+        arrays = self._arrays.get(alert_type)
+        if arrays is not None:
+            return arrays
+        rows = [
+            (symbol, alert_id, threshold)
+            for (book_type, symbol), book in self._books.items() if book_type == alert_type
+            for alert_id, threshold in book.items()
+        ]
+        codes, uniques = pd.factorize(pd.Index([row[0] for row in rows], dtype=object))
+        arrays = {
+            'symbols': pd.Index(uniques),
+            'codes': codes.astype(np.intp),
+            'alert_ids': np.array([row[1] for row in rows], dtype=object),
+            'thresholds': np.array([row[2] for row in rows], dtype=np.float64),
+        }
+        self._arrays[alert_type] = arrays
+        return arrays
+    
+    def check_price_alerts_batch(self, prices: Mapping[str, float],
+                                 previous_prices: Optional[Mapping[str, float]] = None):
+        """Bir pazarın tüm tick'lerini kontrol et; her tür tek vektörel eşik karşılaştırmasıyla değerlendirilir"""
         try:
-            active_alerts = self.get_alerts(symbol, AlertStatus.ACTIVE)
+            ticks = pd.Series(prices, dtype=np.float64)
+            ticks = ticks[~ticks.index.duplicated(keep='last')]
+            previous = None
+            if previous_prices is not None:
+                previous = pd.Series(previous_prices, dtype=np.float64)
+                previous = previous[~previous.index.duplicated(keep='last')]
             
-            for alert in active_alerts:
-                if alert.alert_type not in [AlertType.ANALYSIS_SCORE, AlertType.SENTIMENT_CHANGE]:
-                    continue
-                
-                # Süre kontrolü
-                if alert.expires_at:
-                    expires_at = datetime.fromisoformat(alert.expires_at)
-                    if datetime.now() > expires_at:
-                        alert.status = AlertStatus.EXPIRED
+            with self.lock:
+                self._expire_due()
+                now = datetime.now().isoformat()
+                candidates: Dict[str, List[str]] = {}
+                for alert_type in PRICE_ALERT_TYPES:
+                    arrays = self._type_arrays(alert_type)
+                    if not len(arrays['alert_ids']):
                         continue
+                    values = ticks.reindex(arrays['symbols']).to_numpy(dtype=np.float64)
+                    checked = ~np.isnan(values)[arrays['codes']]
+                    for alert_id in arrays['alert_ids'][checked]:
+                        self.alerts[alert_id].last_checked = now
+                    if alert_type == AlertType.PRICE_CHANGE:
+                        if previous is None:
+                            continue
+                        base = previous.reindex(arrays['symbols']).to_numpy(dtype=np.float64, copy=True)
+                        base[base == 0] = np.nan
+                        values = np.abs((values - base) / base * 100)
+                    alert_values = values[arrays['codes']]
+                    # NaN (tick ya da önceki fiyat yok) her iki karşılaştırmada da False döner
+                    if alert_type == AlertType.PRICE_BELOW:
+                        mask = alert_values <= arrays['thresholds']
+                    else:
+                        mask = alert_values >= arrays['thresholds']
+                    symbols = arrays['symbols']
+                    for pos in np.flatnonzero(mask):
+                        candidates.setdefault(symbols[arrays['codes'][pos]], []).append(arrays['alert_ids'][pos])
                 
-                # Koşul kontrolü
-                should_trigger = False
-                
-                if alert.alert_type == AlertType.ANALYSIS_SCORE:
-                    total_score = analysis_data.get('total_score', 0)
-                    if total_score >= alert.threshold:
-                        should_trigger = True
-                elif alert.alert_type == AlertType.SENTIMENT_CHANGE:
-                    sentiment_score = analysis_data.get('sentiment_score', 50)
-                    if abs(sentiment_score - 50) >= alert.threshold:
-                        should_trigger = True
+                triggers = []
+                for symbol in sorted(candidates, key=ticks.index.get_loc):    # tick sırasıyla
+                    alert_ids = candidates[symbol]
+                    price_data = None
+                    if previous is not None and symbol in previous.index:
+                        price_data = {'previous_price': float(previous[symbol])}
+                    triggers += self._trigger_in_order(alert_ids, float(ticks[symbol]), price_data, save=False)
+                if triggers:
+                    self._save_alerts()    # tetikleme başına değil, toplu kontrol başına tek yazım
+            self._notify(triggers)
+            
+        except Exception as e:
+            log_error(f"Toplu fiyat uyarı kontrolü hatası: {e}")
+    
+    def check_analysis_alert(self, symbol: str, analysis_data: Dict[str, Any]):
+        """Analiz uyarılarını kontrol et"""
+        try:
+            total_score = analysis_data.get('total_score', 0)
+            sentiment_score = analysis_data.get('sentiment_score', 50)
+            
+            with self.lock:
+                self._expire_due()
                 
-                if should_trigger:
-                    self._trigger_alert(alert, analysis_data.get('total_score', 0), analysis_data)
+                candidates = self._crossed(AlertType.ANALYSIS_SCORE, symbol, total_score)
+                candidates += self._crossed(AlertType.SENTIMENT_CHANGE, symbol, abs(sentiment_score - 50))
                 
-                # Son kontrol zamanını güncelle
-                alert.last_checked = datetime.now().isoformat()
+                triggers = self._trigger_in_order(candidates, total_score, analysis_data)
+                self._touch(ANALYSIS_ALERT_TYPES, symbol)
+            self._notify(triggers)
             
         except Exception as e:
             log_error(f"Analiz uyarıları kontrol edilirken hata: {e}")
@@ -339,12 +478,8 @@ class AlertManager:
             while self.running:
                 try:
                     # Süresi dolmuş uyarıları kontrol et
-                    now = datetime.now()
-                    for alert in self.alerts.values():
-                        if alert.expires_at:
-                            expires_at = datetime.fromisoformat(alert.expires_at)
-                            if now > expires_at and alert.status == AlertStatus.ACTIVE:
-                                alert.status = AlertStatus.EXPIRED
+                    with self.lock:
+                        self._expire_due()
                     
                     self._save_alerts()
                     
@@ -368,18 +503,23 @@ class AlertManager:
     
     def get_triggered_alerts(self, limit: int = 50) -> List[AlertTrigger]:
         """Tetiklenen uyarıları getir"""
-        return sorted(self.triggered_alerts, key=lambda x: x.triggered_at, reverse=True)[:limit]
+        with self.lock:
+            triggered = list(self.triggered_alerts)
+        return sorted(triggered, key=lambda x: x.triggered_at, reverse=True)[:limit]
     
     def get_alert_statistics(self) -> Dict[str, Any]:
         """Uyarı istatistiklerini getir"""
         try:
-            total_alerts = len(self.alerts)
-            active_alerts = len([a for a in self.alerts.values() if a.status == AlertStatus.ACTIVE])
-            triggered_alerts = len([a for a in self.alerts.values() if a.status == AlertStatus.TRIGGERED])
-            expired_alerts = len([a for a in self.alerts.values() if a.status == AlertStatus.EXPIRED])
+            with self.lock:
+                alerts = list(self.alerts.values())
+                total_triggers = len(self.triggered_alerts)
+            total_alerts = len(alerts)
+            active_alerts = len([a for a in alerts if a.status == AlertStatus.ACTIVE])
+            triggered_alerts = len([a for a in alerts if a.status == AlertStatus.TRIGGERED])
+            expired_alerts = len([a for a in alerts if a.status == AlertStatus.EXPIRED])
             
             # En çok tetiklenen uyarılar
-            most_triggered = sorted(self.alerts.values(), key=lambda x: x.triggered_count, reverse=True)[:5]
+            most_triggered = sorted(alerts, key=lambda x: x.triggered_count, reverse=True)[:5]
             
             return {
                 'total_alerts': total_alerts,
@@ -394,7 +534,7 @@ class AlertManager:
                     }
                     for alert in most_triggered
                 ],
-                'total_triggers': len(self.triggered_alerts)
+                'total_triggers': total_triggers
             }
             
         except Exception as e:
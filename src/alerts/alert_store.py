@@ -0,0 +1,251 @@
+"""
+PlanB Motoru - Alert Store
+Uyarı durumu ve geçmişi için append-only SQLite günlüğü, grup commit ve atomik snapshot
+"""
+import atexit
+import json
+import os
+import sqlite3
+import threading
+from typing import Dict, List, Optional, Any, Tuple
+from src.utils.logger import log_info, log_error, log_debug
+
+
+class AlertStore:
+    """CustomAlertManager kalıcılığı
+
+    - Uyarı değişiklikleri `alert_events` tablosuna eklenir (tam kayıt upsert / delete),
+      açılışta son snapshot'ın üzerine sırayla uygulanır.
+    - Tetiklemeler bellekte biriktirilir ve tek transaction'da yazılır (grup commit).
+    - Olay sayısı eşiği aşınca snapshot geçici dosyaya yazılıp `os.replace` ile
+      atomik olarak değiştirilir, katlanmış olaylar silinir.
+    """
+
+    def __init__(self, data_dir: str = "data/alerts", flush_interval: float = 1.0,
+                 batch_size: int = 500, compact_threshold: int = 2000):
+        self.data_dir = data_dir
+        self.snapshot_file = os.path.join(data_dir, "custom_alerts.json")
+        self.legacy_history_file = os.path.join(data_dir, "alert_history.json")
+        self.db_path = os.path.join(data_dir, "alert_log.db")
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.compact_threshold = compact_threshold
+
+        self.db_lock = threading.Lock()
+        self.pending_lock = threading.Lock()
+        self.pending_events: List[Tuple[str, str, Optional[str]]] = []
+        self.pending_history: List[Tuple[str, str, str]] = []
+        self.events_since_snapshot = 0
+        self.stats = {'flushes': 0, 'rows_written': 0, 'compactions': 0}
+
+        os.makedirs(data_dir, exist_ok=True)
+        self.db = self._open_db()
+        self._migrate_legacy_history()
+
+        self._stop_event = threading.Event()
+        self._flusher = None
+        atexit.register(self.close)
+
+    def _open_db(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS alert_events (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                alert_id TEXT NOT NULL,
+                op TEXT NOT NULL,
+                payload TEXT
+            );
+            CREATE TABLE IF NOT EXISTS alert_history (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                alert_id TEXT NOT NULL,
+                triggered_at TEXT NOT NULL,
+                entry TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_alert_history_alert ON alert_history(alert_id, id);
+            CREATE INDEX IF NOT EXISTS idx_alert_history_time ON alert_history(triggered_at);
+        """)
+        return conn
+
+    def _migrate_legacy_history(self):
+        """Eski alert_history.json listesini bir kez tabloya aktar"""
+        if not os.path.exists(self.legacy_history_file):
+            return
+        try:
+            with open(self.legacy_history_file, 'r', encoding='utf-8') as f:
+                entries = json.load(f)
+            with self.db_lock:
+                self.db.execute("BEGIN")
+                self.db.executemany(
+                    "INSERT INTO alert_history (alert_id, triggered_at, entry) VALUES (?, ?, ?)",
+                    [(e['alert_id'], e['triggered_at'], json.dumps(e, ensure_ascii=False)) for e in entries]
+                )
+                self.db.execute("COMMIT")
+            os.replace(self.legacy_history_file, self.legacy_history_file + ".migrated")
+            log_info(f"{len(entries)} uyarı geçmişi kaydı günlüğe taşındı")
+        except Exception as e:
+            log_error(f"Uyarı geçmişi taşıma hatası: {e}")
+
+    # ------------------------------------------------------------------
+    # Durum: snapshot + olay günlüğü
+    # ------------------------------------------------------------------
+
+    def load_alerts(self) -> Dict[str, Dict[str, Any]]:
+        """Snapshot'ı oku ve üzerine olay günlüğünü uygula"""
+        alerts: Dict[str, Dict[str, Any]] = {}
+        if os.path.exists(self.snapshot_file):
+            with open(self.snapshot_file, 'r', encoding='utf-8') as f:
+                alerts = json.load(f)
+
+        with self.db_lock:
+            rows = self.db.execute("SELECT alert_id, op, payload FROM alert_events ORDER BY seq").fetchall()
+        for alert_id, op, payload in rows:
+            if op == 'delete':
+                alerts.pop(alert_id, None)
+            else:
+                alerts[alert_id] = json.loads(payload)
+        self.events_since_snapshot = len(rows)
+        return alerts
+
+    def log_upsert(self, alert_data: Dict[str, Any], durable: bool = False):
+        """Uyarının güncel halini günlüğe ekle"""
+        payload = json.dumps(alert_data, ensure_ascii=False)
+        self._append_event((alert_data['alert_id'], 'upsert', payload), durable)
+
+    def log_delete(self, alert_id: str, durable: bool = False):
+        """Uyarı silmeyi günlüğe ekle"""
+        self._append_event((alert_id, 'delete', None), durable)
+
+    def log_trigger(self, alert_data: Dict[str, Any], history_entry: Dict[str, Any]):
+        """Tetiklemeyi (uyarı durumu + geçmiş kaydı) grup commit kuyruğuna ekle"""
+        payload = json.dumps(alert_data, ensure_ascii=False)
+        with self.pending_lock:
+            self.pending_events.append((alert_data['alert_id'], 'upsert', payload))
+            self.pending_history.append((
+                history_entry['alert_id'], history_entry['triggered_at'],
+                json.dumps(history_entry, ensure_ascii=False)
+            ))
+            full = len(self.pending_history) >= self.batch_size
+        if full:
+            self.flush()
+        else:
+            self._ensure_flusher()
+
+    def _append_event(self, event: Tuple[str, str, Optional[str]], durable: bool):
+        with self.pending_lock:
+            self.pending_events.append(event)
+        if durable:
+            self.flush()
+        else:
+            self._ensure_flusher()
+
+    def flush(self) -> int:
+        """Bekleyen olayları ve geçmiş kayıtlarını tek transaction'da yaz"""
+        # db_lock boyunca tutulur: eşzamanlı flush'lar olay sırasını bozamaz
+        with self.db_lock:
+            with self.pending_lock:
+                events, self.pending_events = self.pending_events, []
+                history, self.pending_history = self.pending_history, []
+            if not events and not history:
+                return 0
+            try:
+                self.db.execute("BEGIN")
+                self.db.executemany("INSERT INTO alert_events (alert_id, op, payload) VALUES (?, ?, ?)", events)
+                self.db.executemany(
+                    "INSERT INTO alert_history (alert_id, triggered_at, entry) VALUES (?, ?, ?)", history
+                )
+                self.db.execute("COMMIT")
+            except Exception as e:
+                log_error(f"Uyarı günlüğü yazma hatası: {e}")
+                if self.db.in_transaction:
+                    self.db.execute("ROLLBACK")
+                # Yazılamayan kayıtlar bir sonraki flush'ta yeniden denensin
+                with self.pending_lock:
+                    self.pending_events[:0] = events
+                    self.pending_history[:0] = history
+                return 0
+            self.events_since_snapshot += len(events)
+            self.stats['flushes'] += 1
+            self.stats['rows_written'] += len(events) + len(history)
+            return len(events) + len(history)
+
+    def needs_compaction(self) -> bool:
+        return self.events_since_snapshot + len(self.pending_events) >= self.compact_threshold
+
+    def compact(self, alerts: Dict[str, Dict[str, Any]]):
+        """Güncel durumu atomik snapshot olarak yaz ve katlanmış olayları sil"""
+        self.flush()
+        with self.db_lock:
+            row = self.db.execute("SELECT MAX(seq) FROM alert_events").fetchone()
+        last_seq = row[0] or 0
+
+        tmp_path = f"{self.snapshot_file}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(alerts, f, indent=2, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.snapshot_file)
+
+        # Snapshot ile silme arasında çökme olursa olaylar idempotent olarak yeniden uygulanır
+        with self.db_lock:
+            self.db.execute("DELETE FROM alert_events WHERE seq <= ?", (last_seq,))
+            remaining = self.db.execute("SELECT COUNT(*) FROM alert_events").fetchone()[0]
+        self.events_since_snapshot = remaining
+        self.stats['compactions'] += 1
+        log_debug(f"Uyarı snapshot'ı yazıldı: {len(alerts)} uyarı, {last_seq} olaya kadar katlandı")
+
+    # ------------------------------------------------------------------
+    # Geçmiş sorguları
+    # ------------------------------------------------------------------
+
+    def get_history(self, alert_id: Optional[str] = None, limit: int = 100) -> List[Dict[str, Any]]:
+        """Son `limit` geçmiş kaydı (eskiden yeniye)"""
+        self.flush()
+        with self.db_lock:
+            if alert_id:
+                rows = self.db.execute(
+                    "SELECT entry FROM alert_history WHERE alert_id = ? ORDER BY id DESC LIMIT ?",
+                    (alert_id, limit)
+                ).fetchall()
+            else:
+                rows = self.db.execute(
+                    "SELECT entry FROM alert_history ORDER BY id DESC LIMIT ?", (limit,)
+                ).fetchall()
+        return [json.loads(row[0]) for row in reversed(rows)]
+
+    def count_history(self, since: Optional[str] = None) -> int:
+        """Geçmiş kaydı sayısı (isteğe bağlı olarak `since` ISO zamanından sonra)"""
+        self.flush()
+        with self.db_lock:
+            if since:
+                row = self.db.execute(
+                    "SELECT COUNT(*) FROM alert_history WHERE triggered_at > ?", (since,)
+                ).fetchone()
+            else:
+                row = self.db.execute("SELECT COUNT(*) FROM alert_history").fetchone()
+        return row[0]
+
+    # ------------------------------------------------------------------
+    # Arka plan flush
+    # ------------------------------------------------------------------
+
+    def _ensure_flusher(self):
+        if self._flusher is None or not self._flusher.is_alive():
+            self._stop_event.clear()
+            self._flusher = threading.Thread(target=self._flush_loop, daemon=True, name="alert-store-flush")
+            self._flusher.start()
+
+    def _flush_loop(self):
+        while not self._stop_event.wait(self.flush_interval):
+            self.flush()
+
+    def close(self):
+        """Bekleyenleri yaz ve bağlantıyı kapat"""
+        self._stop_event.set()
+        if self._flusher is not None and self._flusher is not threading.current_thread():
+            self._flusher.join(timeout=self.flush_interval + 1)
+        self.flush()
+        with self.db_lock:
+            self.db.close()
+        atexit.unregister(self.close)
@@ -2,51 +2,41 @@
 PlanB Motoru - Custom Alert Manager
 Kişiselleştirilmiş uyarılar yönetimi
 """
-import json
 import os
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Callable, Mapping
 from datetime import datetime, timedelta
 from src.utils.logger import log_info, log_error, log_debug
+from src.alerts.alert_index import AlertIndex
+from src.alerts.alert_store import AlertStore
 
 class CustomAlertManager:
     """Kişiselleştirilmiş uyarı yöneticisi"""
     
-    def __init__(self):
-        self.alerts_file = "data/alerts/custom_alerts.json"
-        self.alert_history_file = "data/alerts/alert_history.json"
+    def __init__(self, data_dir: str = "data/alerts"):
+        self.data_dir = data_dir
+        self.index = AlertIndex()
         self._ensure_alert_directory()
+        self.store = AlertStore(data_dir)
+        self.alerts_file = self.store.snapshot_file
         self._load_alerts()
-        self._load_alert_history()
     
     def _ensure_alert_directory(self):
         """Uyarı dizinini oluştur"""
-        os.makedirs("data/alerts", exist_ok=True)
+        os.makedirs(self.data_dir, exist_ok=True)
     
     def _load_alerts(self):
         """Uyarıları yükle"""
         try:
-            if os.path.exists(self.alerts_file):
-                with open(self.alerts_file, 'r', encoding='utf-8') as f:
-                    self.alerts = json.load(f)
-            else:
-                self.alerts = {}
+            self.alerts = self.store.load_alerts()
             log_info(f"{len(self.alerts)} özel uyarı yüklendi")
         except Exception as e:
             log_error(f"Uyarı yükleme hatası: {e}")
             self.alerts = {}
+        self.rebuild_index()
     
-    def _load_alert_history(self):
-        """Uyarı geçmişini yükle"""
-        try:
-            if os.path.exists(self.alert_history_file):
-                with open(self.alert_history_file, 'r', encoding='utf-8') as f:
-                    self.alert_history = json.load(f)
-            else:
-                self.alert_history = []
-            log_info(f"{len(self.alert_history)} uyarı geçmişi yüklendi")
-        except Exception as e:
-            log_error(f"Uyarı geçmişi yükleme hatası: {e}")
-            self.alert_history = []
+    def rebuild_index(self):
+        """(tür, pazar, sembol) indeksini uyarılardan yeniden kur"""
+        self.index.rebuild(self.alerts)
     
     def create_alert(self, alert_data: Dict[str, Any]) -> str:
         """Yeni uyarı oluştur"""
@@ -83,7 +73,8 @@ class CustomAlertManager:
             }
             
             self.alerts[alert_id] = new_alert
-            self._save_alerts()
+            self.index.add(new_alert)
+            self.store.log_upsert(new_alert, durable=True)
             
             log_info(f"Yeni uyarı oluşturuldu: {alert_id}")
             return alert_id
@@ -142,7 +133,8 @@ class CustomAlertManager:
                     self.alerts[alert_id][field] = value
             
             self.alerts[alert_id]['updated_at'] = datetime.now().isoformat()
-            self._save_alerts()
+            self.index.add(self.alerts[alert_id])
+            self.store.log_upsert(self.alerts[alert_id], durable=True)
             
             log_info(f"Uyarı güncellendi: {alert_id}")
             return True
@@ -160,7 +152,8 @@ class CustomAlertManager:
             
             # Uyarıyı sil
             del self.alerts[alert_id]
-            self._save_alerts()
+            self.index.remove(alert_id)
+            self.store.log_delete(alert_id, durable=True)
             
             log_info(f"Uyarı silindi: {alert_id}")
             return True
@@ -170,34 +163,19 @@ class CustomAlertManager:
             return False
     
     def check_price_alerts(self, symbol: str, current_price: float, market: str = 'bist') -> List[Dict[str, Any]]:
-        """Fiyat uyarılarını kontrol et"""
+        """Fiyat uyarılarını kontrol et (sıralı eşiklerde bisect)"""
         try:
             triggered_alerts = []
             
-            for alert_id, alert_data in self.alerts.items():
-                if not alert_data.get('is_active', True):
-                    continue
-                
-                if alert_data.get('type') != 'price':
-                    continue
-                
-                if alert_data.get('symbol') != symbol or alert_data.get('market') != market:
-                    continue
-                
-                # Cooldown kontrolü
-                if self._is_in_cooldown(alert_data):
-                    continue
-                
-                # Fiyat koşullarını kontrol et
-                if self._check_price_conditions(alert_data, current_price):
-                    # Uyarıyı tetikle
-                    self._trigger_alert(alert_id, {
-                        'symbol': symbol,
-                        'current_price': current_price,
-                        'market': market,
-                        'trigger_type': 'price'
-                    })
-                    triggered_alerts.append(alert_data)
+            for alert_id in self.index.crossed_prices(market, symbol, current_price):
+                alert_data = self.alerts[alert_id]
+                self._trigger_alert(alert_id, {
+                    'symbol': symbol,
+                    'current_price': current_price,
+                    'market': market,
+                    'trigger_type': 'price'
+                })
+                triggered_alerts.append(alert_data)
             
             return triggered_alerts
             
@@ -205,38 +183,56 @@ class CustomAlertManager:
             log_error(f"Fiyat uyarı kontrolü hatası: {e}")
             return []
     
-    def check_analysis_alerts(self, symbol: str, analysis_data: Dict[str, Any], market: str = 'bist') -> List[Dict[str, Any]]:
-        """Analiz uyarılarını kontrol et"""
+    def check_market_price_alerts(self, prices: Mapping[str, float], market: str = 'bist') -> Dict[str, List[Dict[str, Any]]]:
+        """Bir pazarın tüm fiyat tick'lerini tek vektörel çağrıda kontrol et"""
         try:
-            triggered_alerts = []
+            triggered_alerts = {}
             
-            for alert_id, alert_data in self.alerts.items():
-                if not alert_data.get('is_active', True):
-                    continue
-                
-                if alert_data.get('type') != 'analysis':
-                    continue
-                
-                if alert_data.get('symbol') != symbol or alert_data.get('market') != market:
-                    continue
-                
-                # Cooldown kontrolü
-                if self._is_in_cooldown(alert_data):
-                    continue
-                
-                # Analiz koşullarını kontrol et
-                if self._check_analysis_conditions(alert_data, analysis_data):
-                    # Uyarıyı tetikle
+            for symbol, alert_ids in self.index.crossed_market(market, prices).items():
+                current_price = float(prices[symbol])
+                for alert_id in alert_ids:
                     self._trigger_alert(alert_id, {
                         'symbol': symbol,
-                        'analysis_data': analysis_data,
+                        'current_price': current_price,
                         'market': market,
-                        'trigger_type': 'analysis'
+                        'trigger_type': 'price'
                     })
-                    triggered_alerts.append(alert_data)
+                triggered_alerts[symbol] = [self.alerts[alert_id] for alert_id in alert_ids]
             
             return triggered_alerts
             
+        except Exception as e:
+            log_error(f"Pazar fiyat uyarı kontrolü hatası: {e}")
+            return {}
+    
+    def _check_indexed_alerts(self, alert_type: str, symbol: str, market: str,
+                              condition_check: Callable[[Dict[str, Any]], bool],
+                              trigger_data: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """İndeksteki aday uyarıları koşul fonksiyonuyla değerlendir"""
+        triggered_alerts = []
+        
+        for alert_id in self.index.candidates(alert_type, market, symbol):
+            alert_data = self.alerts[alert_id]
+            if condition_check(alert_data):
+                self._trigger_alert(alert_id, trigger_data)
+                triggered_alerts.append(alert_data)
+        
+        return triggered_alerts
+    
+    def check_analysis_alerts(self, symbol: str, analysis_data: Dict[str, Any], market: str = 'bist') -> List[Dict[str, Any]]:
+        """Analiz uyarılarını kontrol et"""
+        try:
+            return self._check_indexed_alerts(
+                'analysis', symbol, market,
+                lambda alert_data: self._check_analysis_conditions(alert_data, analysis_data),
+                {
+                    'symbol': symbol,
+                    'analysis_data': analysis_data,
+                    'market': market,
+                    'trigger_type': 'analysis'
+                }
+            )
+            
         except Exception as e:
             log_error(f"Analiz uyarı kontrolü hatası: {e}")
             return []
@@ -244,34 +240,16 @@ class CustomAlertManager:
     def check_sentiment_alerts(self, symbol: str, sentiment_data: Dict[str, Any], market: str = 'bist') -> List[Dict[str, Any]]:
         """Sentiment uyarılarını kontrol et"""
         try:
-            triggered_alerts = []
-            
-            for alert_id, alert_data in self.alerts.items():
-                if not alert_data.get('is_active', True):
-                    continue
-                
-                if alert_data.get('type') != 'sentiment':
-                    continue
-                
-                if alert_data.get('symbol') != symbol or alert_data.get('market') != market:
-                    continue
-                
-                # Cooldown kontrolü
-                if self._is_in_cooldown(alert_data):
-                    continue
-                
-                # Sentiment koşullarını kontrol et
-                if self._check_sentiment_conditions(alert_data, sentiment_data):
-                    # Uyarıyı tetikle
-                    self._trigger_alert(alert_id, {
-                        'symbol': symbol,
-                        'sentiment_data': sentiment_data,
-                        'market': market,
-                        'trigger_type': 'sentiment'
-                    })
-                    triggered_alerts.append(alert_data)
-            
-            return triggered_alerts
+            return self._check_indexed_alerts(
+                'sentiment', symbol, market,
+                lambda alert_data: self._check_sentiment_conditions(alert_data, sentiment_data),
+                {
+                    'symbol': symbol,
+                    'sentiment_data': sentiment_data,
+                    'market': market,
+                    'trigger_type': 'sentiment'
+                }
+            )
             
         except Exception as e:
             log_error(f"Sentiment uyarı kontrolü hatası: {e}")
@@ -280,34 +258,16 @@ class CustomAlertManager:
     def check_volume_alerts(self, symbol: str, volume_data: Dict[str, Any], market: str = 'bist') -> List[Dict[str, Any]]:
         """Hacim uyarılarını kontrol et"""
         try:
-            triggered_alerts = []
-            
-            for alert_id, alert_data in self.alerts.items():
-                if not alert_data.get('is_active', True):
-                    continue
-                
-                if alert_data.get('type') != 'volume':
-                    continue
-                
-                if alert_data.get('symbol') != symbol or alert_data.get('market') != market:
-                    continue
-                
-                # Cooldown kontrolü
-                if self._is_in_cooldown(alert_data):
-                    continue
-                
-                # Hacim koşullarını kontrol et
-                if self._check_volume_conditions(alert_data, volume_data):
-                    # Uyarıyı tetikle
-                    self._trigger_alert(alert_id, {
-                        'symbol': symbol,
-                        'volume_data': volume_data,
-                        'market': market,
-                        'trigger_type': 'volume'
-                    })
-                    triggered_alerts.append(alert_data)
-            
-            return triggered_alerts
+            return self._check_indexed_alerts(
+                'volume', symbol, market,
+                lambda alert_data: self._check_volume_conditions(alert_data, volume_data),
+                {
+                    'symbol': symbol,
+                    'volume_data': volume_data,
+                    'market': market,
+                    'trigger_type': 'volume'
+                }
+            )
             
         except Exception as e:
             log_error(f"Hacim uyarı kontrolü hatası: {e}")
@@ -316,34 +276,16 @@ class CustomAlertManager:
     def check_technical_alerts(self, symbol: str, technical_data: Dict[str, Any], market: str = 'bist') -> List[Dict[str, Any]]:
         """Teknik analiz uyarılarını kontrol et"""
         try:
-            triggered_alerts = []
-            
-            for alert_id, alert_data in self.alerts.items():
-                if not alert_data.get('is_active', True):
-                    continue
-                
-                if alert_data.get('type') != 'technical':
-                    continue
-                
-                if alert_data.get('symbol') != symbol or alert_data.get('market') != market:
-                    continue
-                
-                # Cooldown kontrolü
-                if self._is_in_cooldown(alert_data):
-                    continue
-                
-                # Teknik analiz koşullarını kontrol et
-                if self._check_technical_conditions(alert_data, technical_data):
-                    # Uyarıyı tetikle
-                    self._trigger_alert(alert_id, {
-                        'symbol': symbol,
-                        'technical_data': technical_data,
-                        'market': market,
-                        'trigger_type': 'technical'
-                    })
-                    triggered_alerts.append(alert_data)
-            
-            return triggered_alerts
+            return self._check_indexed_alerts(
+                'technical', symbol, market,
+                lambda alert_data: self._check_technical_conditions(alert_data, technical_data),
+                {
+                    'symbol': symbol,
+                    'technical_data': technical_data,
+                    'market': market,
+                    'trigger_type': 'technical'
+                }
+            )
             
         except Exception as e:
             log_error(f"Teknik analiz uyarı kontrolü hatası: {e}")
@@ -511,15 +453,7 @@ class CustomAlertManager:
     def _is_in_cooldown(self, alert_data: Dict[str, Any]) -> bool:
         """Uyarı cooldown'da mı kontrol et"""
         try:
-            last_triggered = alert_data.get('last_triggered')
-            if not last_triggered:
-                return False
-            
-            cooldown_minutes = alert_data.get('cooldown_minutes', 60)
-            last_triggered_time = datetime.fromisoformat(last_triggered)
-            cooldown_end = last_triggered_time + timedelta(minutes=cooldown_minutes)
-            
-            return datetime.now() < cooldown_end
+            return self.index.cooldowns.is_pending(alert_data['alert_id'])
             
         except Exception as e:
             log_error(f"Cooldown kontrolü hatası: {e}")
@@ -533,6 +467,7 @@ class CustomAlertManager:
             # Uyarı bilgilerini güncelle
             alert_data['last_triggered'] = datetime.now().isoformat()
             alert_data['trigger_count'] = alert_data.get('trigger_count', 0) + 1
+            self.index.start_cooldown(alert_id, alert_data.get('cooldown_minutes', 60))
             
             # Uyarı geçmişine ekle
             alert_history_entry = {
@@ -544,11 +479,10 @@ class CustomAlertManager:
                 'priority': alert_data.get('priority', 'medium')
             }
             
-            self.alert_history.append(alert_history_entry)
-            
-            # Dosyaları kaydet
-            self._save_alerts()
-            self._save_alert_history()
+            # Grup commit: durum ve geçmiş kaydı toplu olarak günlüğe yazılır
+            self.store.log_trigger(alert_data, alert_history_entry)
+            if self.store.needs_compaction():
+                self.compact()
             
             log_info(f"Uyarı tetiklendi: {alert_id}")
             
@@ -558,15 +492,8 @@ class CustomAlertManager:
     def get_alert_history(self, alert_id: str = None, limit: int = 100) -> List[Dict[str, Any]]:
         """Uyarı geçmişini getir"""
         try:
-            if alert_id:
-                # Belirli uyarı için geçmiş
-                history = [entry for entry in self.alert_history if entry['alert_id'] == alert_id]
-            else:
-                # Tüm geçmiş
-                history = self.alert_history
-            
-            # Son N kaydı döndür
-            return history[-limit:] if history else []
+            # Son N kaydı döndür (indeksli sorgu, tüm geçmiş belleğe alınmaz)
+            return self.store.get_history(alert_id, limit)
             
         except Exception as e:
             log_error(f"Uyarı geçmişi alma hatası: {e}")
@@ -590,10 +517,7 @@ class CustomAlertManager:
             
             # Son 24 saatte tetiklenen uyarılar
             last_24h = datetime.now() - timedelta(hours=24)
-            recent_triggers = len([
-                entry for entry in self.alert_history
-                if datetime.fromisoformat(entry['triggered_at']) > last_24h
-            ])
+            recent_triggers = self.store.count_history(since=last_24h.isoformat())
             
             return {
                 'total_alerts': total_alerts,
@@ -602,7 +526,7 @@ class CustomAlertManager:
                 'type_distribution': type_distribution,
                 'total_triggers': total_triggers,
                 'recent_triggers_24h': recent_triggers,
-                'total_history_entries': len(self.alert_history)
+                'total_history_entries': self.store.count_history()
             }
             
         except Exception as e:
@@ -616,21 +540,19 @@ class CustomAlertManager:
         random_part = secrets.token_hex(4)
         return f"alert_{timestamp}_{random_part}"
     
-    def _save_alerts(self):
-        """Uyarıları kaydet"""
+    def flush(self):
+        """Bekleyen tetiklemeleri günlüğe yaz"""
         try:
-            with open(self.alerts_file, 'w', encoding='utf-8') as f:
-                json.dump(self.alerts, f, indent=2, ensure_ascii=False)
+            self.store.flush()
         except Exception as e:
-            log_error(f"Uyarı kaydetme hatası: {e}")
+            log_error(f"Uyarı günlüğü flush hatası: {e}")
     
-    def _save_alert_history(self):
-        """Uyarı geçmişini kaydet"""
+    def compact(self):
+        """Uyarı durumunu atomik snapshot olarak yaz ve olay günlüğünü kısalt"""
         try:
-            with open(self.alert_history_file, 'w', encoding='utf-8') as f:
-                json.dump(self.alert_history, f, indent=2, ensure_ascii=False)
+            self.store.compact(self.alerts)
         except Exception as e:
-            log_error(f"Uyarı geçmişi kaydetme hatası: {e}")
+            log_error(f"Uyarı snapshot hatası: {e}")
 
 # Global custom alert manager instance
 custom_alert_manager = CustomAlertManager()
@@ -0,0 +1,263 @@
+"""
+PlanB Motoru - Vektörel Lexicon Sentiment Skorlayıcı
+Binlerce başlığı tek seferde token'layıp seyrek doküman-terim matrisi x lexicon vektörü ile polarite hesaplar
+"""
+import os
+import re
+import time
+from abc import ABC, abstractmethod
+from itertools import chain
+from typing import Dict, Iterable, List, Optional
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from src.utils.logger import log_info, log_warning
+
+DOC_SEPARATOR = '\n'
+TOKEN_PATTERN = re.compile(r"\n|[0-9a-zçğıöşüâîû]+(?:'[a-z]+)?")
+TURKISH_LOWER = str.maketrans({'İ': 'i'})
+NEGATORS = ('not', 'no', 'never', "n't", 'without', 'hardly')
+NEGATION_FACTOR = -0.5  # TextBlob ile aynı: olumsuzlanan kelimenin polaritesi -0.5 ile çarpılır
+
+# İngilizce finans lexicon'u (ağırlıklar TextBlob polarite ölçeğine yakın)
+ENGLISH_LEXICON = {
+    'bullish': 0.8, 'surge': 0.6, 'surges': 0.6, 'surged': 0.6, 'soar': 0.7, 'soars': 0.7, 'soared': 0.7,
+    'rally': 0.5, 'rallies': 0.5, 'rallied': 0.5, 'gain': 0.4, 'gains': 0.4, 'gained': 0.4,
+    'rise': 0.3, 'rises': 0.3, 'rising': 0.3, 'rose': 0.3, 'up': 0.2, 'upgrade': 0.5, 'upgraded': 0.5,
+    'beat': 0.4, 'beats': 0.4, 'strong': 0.43, 'stronger': 0.45, 'strongest': 0.5, 'growth': 0.4,
+    'profit': 0.4, 'profits': 0.4, 'profitable': 0.5, 'record': 0.3, 'success': 0.6, 'successful': 0.75,
+    'positive': 0.23, 'good': 0.7, 'great': 0.8, 'excellent': 1.0, 'outstanding': 0.5, 'best': 1.0,
+    'better': 0.5, 'impressive': 1.0, 'optimistic': 0.5, 'robust': 0.5, 'breakthrough': 0.5,
+    'boost': 0.4, 'boosts': 0.4, 'boosted': 0.4, 'improve': 0.4, 'improves': 0.4, 'improved': 0.4,
+    'improvement': 0.4, 'opportunity': 0.4, 'win': 0.8, 'wins': 0.8, 'higher': 0.25, 'high': 0.16,
+    'bearish': -0.8, 'plunge': -0.6, 'plunges': -0.6, 'plunged': -0.6, 'crash': -0.7, 'crashes': -0.7,
+    'crashed': -0.7, 'slump': -0.5, 'slumps': -0.5, 'slumped': -0.5, 'fall': -0.3, 'falls': -0.3,
+    'fell': -0.3, 'falling': -0.3, 'drop': -0.3, 'drops': -0.3, 'dropped': -0.3, 'decline': -0.3,
+    'declines': -0.3, 'declined': -0.3, 'down': -0.16, 'downgrade': -0.5, 'downgraded': -0.5,
+    'miss': -0.4, 'misses': -0.4, 'missed': -0.4, 'weak': -0.38, 'weaker': -0.4, 'weakest': -0.5,
+    'loss': -0.4, 'losses': -0.4, 'negative': -0.3, 'bad': -0.7, 'worse': -0.4, 'worst': -1.0,
+    'terrible': -1.0, 'awful': -1.0, 'poor': -0.4, 'disaster': -0.8, 'crisis': -0.6, 'fear': -0.5,
+    'fears': -0.5, 'concern': -0.3, 'concerns': -0.3, 'worry': -0.4, 'worries': -0.4, 'risk': -0.2,
+    'recession': -0.6, 'bankruptcy': -0.8, 'scandal': -0.7, 'lawsuit': -0.5, 'fraud': -0.8,
+    'penalty': -0.4, 'lower': -0.2, 'low': -0.1, 'cut': -0.3, 'cuts': -0.3, 'warning': -0.4,
+}
+
+# Türkçe finans lexicon'u - kök olarak eşleşir (düşüş, düşüşte, düşüşü ...)
+TURKISH_LEXICON = {
+    'yüksel': 0.4, 'artış': 0.4, 'arttı': 0.4, 'büyüme': 0.4, 'büyüdü': 0.4, 'kazanç': 0.4,
+    'kâr': 0.4, 'karlılık': 0.5, 'rekor': 0.4, 'güçlü': 0.45, 'pozitif': 0.3, 'olumlu': 0.5,
+    'iyileş': 0.4, 'başarı': 0.6, 'mükemmel': 1.0, 'harika': 0.8, 'muhteşem': 0.9, 'iyimser': 0.5,
+    'fırsat': 0.4, 'atılım': 0.5, 'ralli': 0.5, 'tavan': 0.6, 'alım': 0.2, 'toparlan': 0.4,
+    'düşüş': -0.4, 'düştü': -0.4, 'geriledi': -0.4, 'gerileme': -0.4, 'azalış': -0.3, 'kayıp': -0.4,
+    'zarar': -0.5, 'kriz': -0.6, 'negatif': -0.3, 'olumsuz': -0.5, 'zayıf': -0.4, 'kötü': -0.7,
+    'kötüleş': -0.5, 'endişe': -0.4, 'kaygı': -0.4, 'korku': -0.5, 'çöküş': -0.7, 'çöktü': -0.7,
+    'iflas': -0.8, 'skandal': -0.7, 'soruşturma': -0.4, 'dava': -0.3, 'taban': -0.6, 'baskı': -0.3,
+}
+
+DEFAULT_LEXICON = {**ENGLISH_LEXICON, **TURKISH_LEXICON}
+
+
+class SentimentScorer(ABC):
+    """Toplu sentiment skorlayıcı arayüzü - polarite -1..1"""
+
+    name = 'base'
+
+    @abstractmethod
+    def score_texts(self, texts: List[str]) -> np.ndarray:
+        """Dokümanların polaritesi (-1..1)"""
+
+    def classify_texts(self, texts: List[str], threshold: float = 0.0) -> List[str]:
+        """Polariteyi positive/negative/neutral etiketine çevir"""
+        scores = self.score_texts(texts)
+        labels = np.where(scores > threshold, 'positive', np.where(scores < -threshold, 'negative', 'neutral'))
+        return labels.tolist()
+
+    def score_text(self, text: str) -> float:
+        return float(self.score_texts([text])[0])
+
+
+class TextBlobSentimentScorer(SentimentScorer):
+    """Referans skorlayıcı: doküman başına TextBlob"""
+
+    name = 'textblob'
+
+    def __init__(self):
+        from textblob import TextBlob
+        self.text_blob = TextBlob
+
+    def score_texts(self, texts: List[str]) -> np.ndarray:
+        return np.array([self.text_blob(text or '').sentiment.polarity for text in texts], dtype=float)
+
+
+class LexiconSentimentScorer(SentimentScorer):
+    """
+    Seyrek doküman-terim matrisi ile vektörel lexicon skorlayıcı.
+
+    Her terimin iki kolonu vardır: normal ve olumsuzlanmış ("not good").
+    Polarite = (X @ ağırlık) / (eşleşen + belirsiz), belirsizlik terimleri büyüklüğü azaltır.
+    Yalnızca stem_terms içindeki (varsayılan: Türkçe lexicon) prefix_min_length ve üzeri uzunluktaki
+    tek kelimelik terimler kök olarak eşleşir; İngilizce terimler tam eşleşir (surge ≠ surgery).
+    """
+
+    name = 'lexicon'
+
+    def __init__(self, lexicon: Optional[Dict[str, float]] = None,
+                 uncertainty_terms: Iterable[str] = (), prefix_min_length: int = 5,
+                 stem_terms: Optional[Iterable[str]] = None):
+        if stem_terms is None:
+            stem_terms = TURKISH_LEXICON if lexicon is None else ()
+        stem_terms = {self._normalize(term) for term in stem_terms}
+        lexicon = {self._normalize(term): weight for term, weight in (lexicon or DEFAULT_LEXICON).items()}
+        uncertainty = {self._normalize(term) for term in uncertainty_terms} - set(lexicon)
+        self.vocabulary = list(lexicon) + sorted(uncertainty)
+        size = len(self.vocabulary)
+        self.term_index = {term: i for i, term in enumerate(self.vocabulary)}
+
+        weights = np.array([lexicon.get(term, 0.0) for term in self.vocabulary], dtype=float)
+        sentiment_mask = np.array([term in lexicon for term in self.vocabulary], dtype=float)
+        uncertainty_mask = 1.0 - sentiment_mask
+        # Kolonlar: [normal terimler | olumsuzlanmış terimler]
+        self.weights = np.concatenate([weights, weights * NEGATION_FACTOR])
+        self.sentiment_mask = np.concatenate([sentiment_mask, sentiment_mask])
+        self.uncertainty_mask = np.concatenate([uncertainty_mask, uncertainty_mask])
+        self.size = size
+
+        single = [t for t in self.vocabulary if ' ' not in t]
+        self.exact_index = pd.Index(single)
+        self.exact_columns = np.array([self.term_index[t] for t in single], dtype=np.int64)
+        self.phrase_index = pd.Index([t for t in self.vocabulary if ' ' in t])
+        self.phrase_columns = np.array([self.term_index[t] for t in self.phrase_index], dtype=np.int64)
+
+        # Kök eşleşmesi (yalnızca Türkçe terimler): uzunluk -> (kök indeksi, kolonlar)
+        stemmed = [t for t in single if t in stem_terms and len(t) >= prefix_min_length]
+        self.prefix_tables = {}
+        for length in sorted({len(t) for t in stemmed}):
+            stems = [t for t in stemmed if len(t) == length]
+            self.prefix_tables[length] = (pd.Index(stems), np.array([self.term_index[t] for t in stems]))
+        self.negator_index = pd.Index(NEGATORS)
+
+    @classmethod
+    def from_keywords(cls, positive: Iterable[str], negative: Iterable[str],
+                      uncertainty: Iterable[str] = (), prefix_min_length: int = 5,
+                      stem_terms: Iterable[str] = ()) -> 'LexiconSentimentScorer':
+        """Mevcut pozitif/negatif anahtar kelime listelerinden ±1 ağırlıklı lexicon (stem_terms: Türkçe kökler)"""
+        lexicon = {term.lower(): 1.0 for term in positive}
+        lexicon.update({term.lower(): -1.0 for term in negative})
+        return cls(lexicon, uncertainty, prefix_min_length, stem_terms)
+
+    @staticmethod
+    def _normalize(text: str) -> str:
+        return text.translate(TURKISH_LOWER).lower().strip()
+
+    def _tokenize(self, texts: List[str]):
+        """Tüm dokümanları tek regex geçişinde token'la; doküman sınırı ayraç token'ı ile bulunur"""
+        joined = DOC_SEPARATOR.join((text or '').replace('\r', ' ').replace(DOC_SEPARATOR, ' ') for text in texts)
+        raw = np.array(TOKEN_PATTERN.findall(self._normalize(joined)), dtype=object)
+        is_separator = raw == DOC_SEPARATOR
+        doc_ids = np.cumsum(is_separator)[~is_separator]
+        return raw[~is_separator], doc_ids
+
+    def _lookup_unique(self, uniques: np.ndarray) -> np.ndarray:
+        """Tekil token'lar için lexicon kolonu (-1 = eşleşme yok)"""
+        columns = np.full(len(uniques), -1, dtype=np.int64)
+        hits = self.exact_index.get_indexer(uniques)
+        columns[hits >= 0] = self.exact_columns[hits[hits >= 0]]
+
+        if self.prefix_tables:
+            series = pd.Series(uniques, dtype=object)
+            # Uzun kökler önce: en spesifik eşleşme kazanır
+            for length, (stems, stem_columns) in sorted(self.prefix_tables.items(), reverse=True):
+                pending = columns < 0
+                if not pending.any():
+                    break
+                hits = stems.get_indexer(series[pending].str.slice(0, length).to_numpy())
+                positions = np.flatnonzero(pending)[hits >= 0]
+                columns[positions] = stem_columns[hits[hits >= 0]]
+        return columns
+
+    def document_term_matrix(self, texts: List[str]) -> sparse.csr_matrix:
+        """Doküman x (2 x lexicon) sayım matrisi; ikinci yarı olumsuzlanmış kullanımlar"""
+        tokens, doc_ids = self._tokenize(texts)
+        if not len(tokens):
+            return sparse.csr_matrix((len(texts), 2 * self.size))
+
+        codes, uniques = pd.factorize(tokens)
+        uniques = np.asarray(uniques, dtype=object)
+        columns = self._lookup_unique(uniques)[codes]
+        same_doc = doc_ids[1:] == doc_ids[:-1]
+
+        if len(self.phrase_index) and len(tokens) > 1:
+            bigrams = pd.Series(tokens[:-1], dtype=object) + ' ' + pd.Series(tokens[1:], dtype=object)
+            hits = self.phrase_index.get_indexer(bigrams.to_numpy())
+            matched = np.flatnonzero((hits >= 0) & same_doc)
+            columns[matched] = self.phrase_columns[hits[matched]]
+            columns[matched + 1] = -1
+
+        is_negator = (self.negator_index.get_indexer(uniques) >= 0)[codes]
+        negated = np.zeros(len(tokens), dtype=bool)
+        negated[1:] = is_negator[:-1] & same_doc
+        columns = np.where((columns >= 0) & negated, columns + self.size, columns)
+
+        matched = columns >= 0
+        data = np.ones(int(matched.sum()), dtype=float)
+        return sparse.csr_matrix((data, (doc_ids[matched], columns[matched])),
+                                 shape=(len(texts), 2 * self.size))
+
+    def score_texts(self, texts: List[str]) -> np.ndarray:
+        if not len(texts):
+            return np.zeros(0)
+        matrix = self.document_term_matrix(list(texts))
+        weighted = matrix @ self.weights
+        matched = matrix @ self.sentiment_mask
+        uncertain = matrix @ self.uncertainty_mask
+        total = matched + uncertain
+        with np.errstate(divide='ignore', invalid='ignore'):
+            polarity = np.where(total > 0, weighted / total, 0.0)
+            damping = np.where(total > 0, 1 - 0.5 * uncertain / total, 1.0)
+        return np.clip(polarity * damping, -1.0, 1.0)
+
+
+def benchmark(scorer: SentimentScorer, texts: List[str], repeat: int = 3) -> float:
+    """Skorlayıcı hızı (doküman/saniye)"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        scorer.score_texts(texts)
+        best = min(best, time.perf_counter() - start)
+    return len(texts) / best if best > 0 else float('inf')
+
+
+_scorers: Dict[str, SentimentScorer] = {}
+
+
+def get_sentiment_scorer(name: Optional[str] = None) -> SentimentScorer:
+    """SENTIMENT_SCORER (lexicon | textblob) ile seçilen paylaşılan skorlayıcı"""
+    name = (name or os.getenv('SENTIMENT_SCORER', 'lexicon')).lower()
+    if name not in _scorers:
+        if name == 'textblob':
+            try:
+                _scorers[name] = TextBlobSentimentScorer()
+            except ImportError:
+                log_warning("TextBlob bulunamadı, lexicon skorlayıcı kullanılıyor")
+                return get_sentiment_scorer('lexicon')
+        else:
+            _scorers[name] = lexicon_sentiment_scorer
+    return _scorers[name]
+
+
+# Global lexicon scorer instance
+lexicon_sentiment_scorer = LexiconSentimentScorer()
+
+
+if __name__ == "__main__":
+    sample = [
+        "Shares surge after strong quarterly profit beats expectations",
+        "Stock falls as weak guidance raises recession fears",
+        "Hisse güçlü bilanço sonrası yükselişte",
+        "Endeks satış baskısıyla düşüşte",
+    ] * 2500
+    log_info(f"Lexicon: {benchmark(lexicon_sentiment_scorer, sample):,.0f} doküman/sn")
+    try:
+        log_info(f"TextBlob: {benchmark(TextBlobSentimentScorer(), sample[:1000], repeat=1):,.0f} doküman/sn")
+    except ImportError:
+        log_warning("TextBlob kurulu değil")
@@ -13,31 +13,43 @@ from src.api.twitter_api import twitter_api
 from src.api.news_api import news_api
 from src.api.reddit_api import reddit_api
 from src.utils.logger import log_info, log_error
+from src.analysis.lexicon_sentiment import LexiconSentimentScorer
 
 class SentimentAnalyzer:
     """Sentiment ve haber analizi yapan sınıf"""
     
     def __init__(self):
-        self.positive_keywords = [
-            'bullish', 'buy', 'strong', 'growth', 'profit', 'gain', 'rise', 'up', 'positive',
-            'excellent', 'great', 'amazing', 'fantastic', 'outstanding', 'breakthrough',
-            'partnership', 'acquisition', 'expansion', 'innovation', 'breakthrough',
+        # Türkçe anahtar kelimeler kök olarak eşleşir, İngilizceler tam eşleşir
+        turkish_positive = [
             'yükseliş', 'alış', 'güçlü', 'büyüme', 'kar', 'kazanç', 'artış', 'pozitif',
             'mükemmel', 'harika', 'muhteşem', 'başarılı', 'atılım', 'ortaklık', 'satın alma'
         ]
+        turkish_negative = [
+            'düşüş', 'satış', 'zayıf', 'kayıp', 'düşme', 'negatif', 'kötü', 'felaket',
+            'çöküş', 'iflas', 'skandal', 'dava', 'soruşturma', 'kriz'
+        ]
+        self.turkish_keywords = turkish_positive + turkish_negative
+
+        self.positive_keywords = [
+            'bullish', 'buy', 'strong', 'growth', 'profit', 'gain', 'rise', 'up', 'positive',
+            'excellent', 'great', 'amazing', 'fantastic', 'outstanding', 'breakthrough',
+            'partnership', 'acquisition', 'expansion', 'innovation', 'breakthrough'
+        ] + turkish_positive
         
         self.negative_keywords = [
             'bearish', 'sell', 'weak', 'decline', 'loss', 'fall', 'down', 'negative',
             'terrible', 'awful', 'disaster', 'crash', 'bankruptcy', 'scandal',
-            'lawsuit', 'investigation', 'regulatory', 'fine', 'penalty', 'crisis',
-            'düşüş', 'satış', 'zayıf', 'kayıp', 'düşme', 'negatif', 'kötü', 'felaket',
-            'çöküş', 'iflas', 'skandal', 'dava', 'soruşturma', 'kriz'
-        ]
+            'lawsuit', 'investigation', 'regulatory', 'fine', 'penalty', 'crisis'
+        ] + turkish_negative
         
         self.neutral_keywords = [
             'hold', 'stable', 'neutral', 'maintain', 'unchanged', 'flat',
             'bekle', 'kararlı', 'nötr', 'sabit', 'değişmez'
         ]
+        
+        # Anahtar kelime listelerinden toplu (vektörel) skorlayıcı
+        self.scorer = LexiconSentimentScorer.from_keywords(self.positive_keywords, self.negative_keywords,
+                                                           stem_terms=self.turkish_keywords)
     
     def analyze_twitter_sentiment(self, symbol: str, count: int = 100) -> Dict[str, Any]:
         """Twitter sentiment analizi (gerçek API)"""
@@ -75,18 +87,7 @@ class SentimentAnalyzer:
                 f"{symbol} showing good momentum"
             ]
             
-            positive_count = 0
-            negative_count = 0
-            neutral_count = 0
-            
-            for tweet in simulated_tweets:
-                sentiment = self._analyze_text_sentiment(tweet)
-                if sentiment == 'positive':
-                    positive_count += 1
-                elif sentiment == 'negative':
-                    negative_count += 1
-                else:
-                    neutral_count += 1
+            positive_count, negative_count, neutral_count = self._count_sentiments(simulated_tweets)
             
             total = positive_count + negative_count + neutral_count
             if total == 0:
@@ -160,18 +161,7 @@ class SentimentAnalyzer:
                 f"{symbol} shows robust growth metrics"
             ]
             
-            positive_count = 0
-            negative_count = 0
-            neutral_count = 0
-            
-            for news in simulated_news:
-                sentiment = self._analyze_text_sentiment(news)
-                if sentiment == 'positive':
-                    positive_count += 1
-                elif sentiment == 'negative':
-                    negative_count += 1
-                else:
-                    neutral_count += 1
+            positive_count, negative_count, neutral_count = self._count_sentiments(simulated_news)
             
             total = positive_count + negative_count + neutral_count
             if total == 0:
@@ -249,18 +239,7 @@ class SentimentAnalyzer:
                 f"Added more {symbol} to my portfolio"
             ]
             
-            positive_count = 0
-            negative_count = 0
-            neutral_count = 0
-            
-            for post in simulated_posts:
-                sentiment = self._analyze_text_sentiment(post)
-                if sentiment == 'positive':
-                    positive_count += 1
-                elif sentiment == 'negative':
-                    negative_count += 1
-                else:
-                    neutral_count += 1
+            positive_count, negative_count, neutral_count = self._count_sentiments(simulated_posts)
             
             total = positive_count + negative_count + neutral_count
             if total == 0:
@@ -310,18 +289,7 @@ class SentimentAnalyzer:
             ]
             
             # Her olay için sentiment analizi
-            positive_events = 0
-            negative_events = 0
-            neutral_events = 0
-            
-            for event in company_events:
-                sentiment = self._analyze_text_sentiment(event)
-                if sentiment == 'positive':
-                    positive_events += 1
-                elif sentiment == 'negative':
-                    negative_events += 1
-                else:
-                    neutral_events += 1
+            positive_events, negative_events, neutral_events = self._count_sentiments(company_events)
             
             total_events = positive_events + negative_events + neutral_events
             if total_events == 0:
@@ -358,20 +326,18 @@ class SentimentAnalyzer:
         except Exception as e:
             return {"score": 50, "sentiment": "neutral", "confidence": 0, "error": str(e)}
     
+    def _analyze_texts_sentiment(self, texts: List[str]) -> List[str]:
+        """Toplu metin sentiment analizi (positive/negative/neutral)"""
+        return self.scorer.classify_texts(texts)
+    
     def _analyze_text_sentiment(self, text: str) -> str:
         """Metin sentiment analizi"""
-        text_lower = text.lower()
-        
-        positive_score = sum(1 for keyword in self.positive_keywords if keyword in text_lower)
-        negative_score = sum(1 for keyword in self.negative_keywords if keyword in text_lower)
-        neutral_score = sum(1 for keyword in self.neutral_keywords if keyword in text_lower)
-        
-        if positive_score > negative_score:
-            return "positive"
-        elif negative_score > positive_score:
-            return "negative"
-        else:
-            return "neutral"
+        return self._analyze_texts_sentiment([text])[0]
+    
+    def _count_sentiments(self, texts: List[str]):
+        """Metin listesi için (pozitif, negatif, nötr) sayıları"""
+        labels = self._analyze_texts_sentiment(texts)
+        return labels.count('positive'), labels.count('negative'), labels.count('neutral')
     
     def calculate_sentiment_score(self, symbol: str) -> float:
         """Genel sentiment skoru hesapla (0-100)"""
@@ -9,6 +9,21 @@ import requests
 from typing import Dict, List, Optional, Any
 from datetime import datetime, timedelta
 from src.utils.logger import log_info, log_error, log_debug
+from src.analysis.lexicon_sentiment import LexiconSentimentScorer
+
+# Türkçe anahtar kelimeler kök olarak eşleşir (düşüşte, kazancı ...), İngilizceler tam eşleşir
+POSITIVE_KEYWORDS_TR = ['büyüme', 'kar', 'kazanç', 'artış', 'pozitif', 'güçlü', 'başarı']
+NEGATIVE_KEYWORDS_TR = ['düşüş', 'kayıp', 'düşme', 'negatif', 'zayıf', 'kriz', 'skandal']
+
+POSITIVE_KEYWORDS = [
+    'bullish', 'growth', 'profit', 'gain', 'rise', 'up', 'positive',
+    'strong', 'excellent', 'outstanding', 'breakthrough', 'success'
+] + POSITIVE_KEYWORDS_TR
+
+NEGATIVE_KEYWORDS = [
+    'bearish', 'decline', 'loss', 'fall', 'down', 'negative',
+    'weak', 'terrible', 'crash', 'crisis', 'scandal', 'lawsuit'
+] + NEGATIVE_KEYWORDS_TR
 
 class NewsAPI:
     """NewsAPI entegrasyonu"""
@@ -18,6 +33,8 @@ class NewsAPI:
         self.api_key = self._get_api_key()
         self.rate_limit_remaining = 1000
         self.rate_limit_reset = 0
+        self.sentiment_scorer = LexiconSentimentScorer.from_keywords(
+            POSITIVE_KEYWORDS, NEGATIVE_KEYWORDS, stem_terms=POSITIVE_KEYWORDS_TR + NEGATIVE_KEYWORDS_TR)
         
     def _get_api_key(self) -> Optional[str]:
         """NewsAPI anahtarını al"""
@@ -217,36 +234,12 @@ class NewsAPI:
                     'neutral_articles': 0
                 }
             
-            positive_keywords = [
-                'bullish', 'growth', 'profit', 'gain', 'rise', 'up', 'positive',
-                'strong', 'excellent', 'outstanding', 'breakthrough', 'success',
-                'büyüme', 'kar', 'kazanç', 'artış', 'pozitif', 'güçlü', 'başarı'
-            ]
-            
-            negative_keywords = [
-                'bearish', 'decline', 'loss', 'fall', 'down', 'negative',
-                'weak', 'terrible', 'crash', 'crisis', 'scandal', 'lawsuit',
-                'düşüş', 'kayıp', 'düşme', 'negatif', 'zayıf', 'kriz', 'skandal'
-            ]
-            
-            positive_count = 0
-            negative_count = 0
-            neutral_count = 0
-            
-            for article in articles:
-                title = article.get('title', '').lower()
-                description = article.get('description', '').lower()
-                content = f"{title} {description}"
-                
-                positive_score = sum(1 for keyword in positive_keywords if keyword in content)
-                negative_score = sum(1 for keyword in negative_keywords if keyword in content)
-                
-                if positive_score > negative_score:
-                    positive_count += 1
-                elif negative_score > positive_score:
-                    negative_count += 1
-                else:
-                    neutral_count += 1
+            # Tüm başlıklar tek seferde skorlanır
+            contents = [f"{article.get('title') or ''} {article.get('description') or ''}" for article in articles]
+            labels = self.sentiment_scorer.classify_texts(contents)
+            positive_count = labels.count('positive')
+            negative_count = labels.count('negative')
+            neutral_count = labels.count('neutral')
             
             total_articles = len(articles)
             sentiment_score = ((positive_count * 100) + (neutral_count * 50)) / total_articles
@@ -3,7 +3,7 @@ PlanB Motoru - Ana Analiz Motoru
 """
 import pandas as pd
 import sqlite3
-from datetime import datetime
+from datetime import datetime, timedelta
 from typing import List, Dict, Optional, Tuple
 from pathlib import Path
 
@@ -34,11 +34,13 @@ class PlanBAnalysisEngine:
             conn = sqlite3.connect(self.database_path)
             cursor = conn.cursor()
             
-            # Eski tabloyu sil ve yenisini oluştur
-            cursor.execute('DROP TABLE IF EXISTS analizler')
+            # Eski şemadaki tabloyu sil; güncel şema varsa geçmişi koru
+            columns = {row[1] for row in cursor.execute('PRAGMA table_info(analizler)')}
+            if columns and 'trend_guclu' not in columns:
+                cursor.execute('DROP TABLE IF EXISTS analizler')
             
             cursor.execute('''
-                CREATE TABLE analizler (
+                CREATE TABLE IF NOT EXISTS analizler (
                     id INTEGER PRIMARY KEY AUTOINCREMENT,
                     tarih TEXT NOT NULL,
                     hisse_kodu TEXT NOT NULL,
@@ -79,6 +81,67 @@ class PlanBAnalysisEngine:
             cursor.execute('CREATE INDEX IF NOT EXISTS idx_tarih ON analizler(tarih)')
             cursor.execute('CREATE INDEX IF NOT EXISTS idx_sinyal ON analizler(sinyal)')
             
+            # Keyset sayfalama için kapsayan indeksler
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_hisse_tarih_id ON analizler(hisse_kodu, tarih DESC, id DESC)')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_tarih_id ON analizler(tarih DESC, id DESC)')
+            
+            # Her varlığın son analizi (insert trigger ile güncel tutulur)
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS analiz_son (
+                    hisse_kodu TEXT PRIMARY KEY,
+                    analiz_id INTEGER NOT NULL,
+                    tarih TEXT NOT NULL,
+                    toplam_puan REAL NOT NULL,
+                    sinyal TEXT NOT NULL,
+                    pazar TEXT,
+                    guncel_fiyat REAL
+                )
+            ''')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_analiz_son_tarih ON analiz_son(tarih DESC, hisse_kodu)')
+            cursor.execute('''
+                CREATE TRIGGER IF NOT EXISTS trg_analizler_son
+                AFTER INSERT ON analizler
+                BEGIN
+                    INSERT INTO analiz_son (hisse_kodu, analiz_id, tarih, toplam_puan, sinyal, pazar, guncel_fiyat)
+                    VALUES (NEW.hisse_kodu, NEW.id, NEW.tarih, NEW.toplam_puan, NEW.sinyal, NEW.pazar, NEW.guncel_fiyat)
+                    ON CONFLICT(hisse_kodu) DO UPDATE SET
+                        analiz_id = excluded.analiz_id,
+                        tarih = excluded.tarih,
+                        toplam_puan = excluded.toplam_puan,
+                        sinyal = excluded.sinyal,
+                        pazar = excluded.pazar,
+                        guncel_fiyat = excluded.guncel_fiyat
+                    WHERE excluded.tarih >= analiz_son.tarih;
+                END
+            ''')
+            
+            # Eski kayıtların günlük özetleri (retention/compaction)
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS analiz_gunluk (
+                    hisse_kodu TEXT NOT NULL,
+                    gun TEXT NOT NULL,
+                    kayit_sayisi INTEGER NOT NULL,
+                    ortalama_puan REAL,
+                    min_puan REAL,
+                    max_puan REAL,
+                    son_puan REAL,
+                    son_sinyal TEXT,
+                    son_fiyat REAL,
+                    pazar TEXT,
+                    PRIMARY KEY (hisse_kodu, gun)
+                )
+            ''')
+            
+            # Mevcut geçmişten snapshot'ı doldur
+            cursor.execute('''
+                INSERT OR REPLACE INTO analiz_son (hisse_kodu, analiz_id, tarih, toplam_puan, sinyal, pazar, guncel_fiyat)
+                SELECT a.hisse_kodu, a.id, a.tarih, a.toplam_puan, a.sinyal, a.pazar, a.guncel_fiyat
+                FROM analizler a
+                JOIN (SELECT hisse_kodu, MAX(id) AS max_id FROM analizler GROUP BY hisse_kodu) m
+                  ON a.id = m.max_id
+                WHERE NOT EXISTS (SELECT 1 FROM analiz_son s WHERE s.hisse_kodu = a.hisse_kodu)
+            ''')
+            
             conn.commit()
             conn.close()
             
@@ -445,25 +508,29 @@ class PlanBAnalysisEngine:
         for i, result in enumerate(top_5, 1):
             log_info(f"{i}. {result['symbol']} - {result['signal']} ({result['total_score']:.1f} puan)")
     
-    def get_analysis_history(self, symbol: str = None, limit: int = 100) -> List[Dict]:
-        """Analiz geçmişini getir"""
+    def get_analysis_history(self, symbol: str = None, limit: int = 100,
+                             before_tarih: str = None, before_id: int = None) -> List[Dict]:
+        """Analiz geçmişini getir (keyset sayfalama: önceki sayfanın son (tarih, id) değeri)"""
         try:
             conn = sqlite3.connect(self.database_path)
             cursor = conn.cursor()
             
+            conditions = []
+            params: List = []
             if symbol:
-                cursor.execute('''
-                    SELECT * FROM analizler 
-                    WHERE hisse_kodu = ? 
-                    ORDER BY tarih DESC 
-                    LIMIT ?
-                ''', (symbol, limit))
-            else:
-                cursor.execute('''
-                    SELECT * FROM analizler 
-                    ORDER BY tarih DESC 
-                    LIMIT ?
-                ''', (limit,))
+                conditions.append('hisse_kodu = ?')
+                params.append(symbol)
+            if before_tarih is not None:
+                conditions.append('(tarih, id) < (?, ?)')
+                params.extend([before_tarih, before_id if before_id is not None else 2 ** 63 - 1])
+            
+            where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+            cursor.execute(f'''
+                SELECT * FROM analizler 
+                {where}
+                ORDER BY tarih DESC, id DESC 
+                LIMIT ?
+            ''', (*params, limit))
             
             columns = [description[0] for description in cursor.description]
             rows = cursor.fetchall()
@@ -477,6 +544,92 @@ class PlanBAnalysisEngine:
             log_error(f"Analiz geçmişi getirilirken hata: {e}")
             return []
     
+    def get_latest_analysis(self, limit: int = 100, market: str = None,
+                            before_tarih: str = None, before_symbol: str = None) -> List[Dict]:
+        """Her varlığın son analizi - snapshot tablosundan, keyset sayfalamalı"""
+        try:
+            conn = sqlite3.connect(self.database_path)
+            cursor = conn.cursor()
+            
+            conditions = []
+            params: List = []
+            if market:
+                conditions.append('pazar = ?')
+                params.append(market)
+            if before_tarih is not None:
+                conditions.append('(tarih, hisse_kodu) < (?, ?)')
+                params.extend([before_tarih, before_symbol or '\uffff'])
+            
+            where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+            cursor.execute(f'''
+                SELECT * FROM analiz_son 
+                {where}
+                ORDER BY tarih DESC, hisse_kodu DESC 
+                LIMIT ?
+            ''', (*params, limit))
+            
+            columns = [description[0] for description in cursor.description]
+            rows = cursor.fetchall()
+            
+            conn.close()
+            
+            return [dict(zip(columns, row)) for row in rows]
+            
+        except Exception as e:
+            log_error(f"Son analizler getirilirken hata: {e}")
+            return []
+    
+    def compact_analysis_history(self, retention_days: int = 90) -> int:
+        """retention_days'ten eski kayıtları günlük özetlere toplayıp sil"""
+        try:
+            conn = sqlite3.connect(self.database_path)
+            cursor = conn.cursor()
+            cutoff = (datetime.now() - timedelta(days=retention_days)).strftime('%Y-%m-%d')
+            
+            cursor.execute('''
+                INSERT INTO analiz_gunluk 
+                (hisse_kodu, gun, kayit_sayisi, ortalama_puan, min_puan, max_puan,
+                 son_puan, son_sinyal, son_fiyat, pazar)
+                SELECT a.hisse_kodu, substr(a.tarih, 1, 10) AS gun, COUNT(*), AVG(a.toplam_puan),
+                       MIN(a.toplam_puan), MAX(a.toplam_puan),
+                       l.toplam_puan, l.sinyal, l.guncel_fiyat, l.pazar
+                FROM analizler a
+                JOIN analizler l ON l.id = (
+                    SELECT id FROM analizler x
+                    WHERE x.hisse_kodu = a.hisse_kodu AND substr(x.tarih, 1, 10) = substr(a.tarih, 1, 10)
+                    ORDER BY x.tarih DESC, x.id DESC LIMIT 1
+                )
+                WHERE a.tarih < ?
+                  AND a.id NOT IN (SELECT analiz_id FROM analiz_son)
+                GROUP BY a.hisse_kodu, gun
+                ON CONFLICT(hisse_kodu, gun) DO UPDATE SET
+                    ortalama_puan = (analiz_gunluk.ortalama_puan * analiz_gunluk.kayit_sayisi
+                                     + excluded.ortalama_puan * excluded.kayit_sayisi)
+                                    / (analiz_gunluk.kayit_sayisi + excluded.kayit_sayisi),
+                    kayit_sayisi = analiz_gunluk.kayit_sayisi + excluded.kayit_sayisi,
+                    min_puan = MIN(analiz_gunluk.min_puan, excluded.min_puan),
+                    max_puan = MAX(analiz_gunluk.max_puan, excluded.max_puan),
+                    son_puan = excluded.son_puan,
+                    son_sinyal = excluded.son_sinyal,
+                    son_fiyat = excluded.son_fiyat
+            ''', (cutoff,))
+            
+            cursor.execute('''
+                DELETE FROM analizler 
+                WHERE tarih < ? AND id NOT IN (SELECT analiz_id FROM analiz_son)
+            ''', (cutoff,))
+            deleted_count = cursor.rowcount
+            
+            conn.commit()
+            conn.close()
+            
+            log_success(f"Analiz geçmişi sıkıştırıldı: {deleted_count} kayıt günlük özete taşındı")
+            return deleted_count
+            
+        except Exception as e:
+            log_error(f"Analiz geçmişi sıkıştırma hatası: {e}")
+            return 0
+    
     def clear_analysis_history(self):
         """Analiz geçmişini temizle"""
         try:
@@ -484,6 +637,7 @@ class PlanBAnalysisEngine:
             cursor = conn.cursor()
             
             cursor.execute('DELETE FROM analizler')
+            cursor.execute('DELETE FROM analiz_son')
             
             conn.commit()
             conn.close()
@@ -500,14 +654,10 @@ class PlanBAnalysisEngine:
             conn = sqlite3.connect(self.database_path)
             cursor = conn.cursor()
             
-            # Her varlık için en son analizi tut, diğerlerini sil
+            # Her varlık için en son analizi (snapshot) tut, diğerlerini sil
             cursor.execute('''
                 DELETE FROM analizler 
-                WHERE id NOT IN (
-                    SELECT MAX(id) 
-                    FROM analizler 
-                    GROUP BY hisse_kodu
-                )
+                WHERE id NOT IN (SELECT analiz_id FROM analiz_son)
             ''')
             
             deleted_count = cursor.rowcount
@@ -0,0 +1,743 @@
+"""
+PlanB Motoru - Dağıtık Analiz İş Kuyruğu
+
+Redis Streams üzerinde pazar bazında parçalanmış (shard) analiz işleri:
+- Üretici sembolleri `analysis_queue:<PAZAR>` akışlarına yazar; kuyrukta bekleyen sembol tekrar eklenmez
+- İşçiler tüketici grubundan toplu iş alır (XREADGROUP COUNT); görünürlük süresi dolan
+  onaylanmamış işler XAUTOCLAIM ile başka işçiye geçer, çok kez düşen iş ölü akışa taşınır
+- Sonuç ortak `analysis_results` akışına yazılır, iş aynı MULTI içinde onaylanır (XACK + XDEL)
+- docker collector'ın `analysis_queue` listesine LPUSH ettiği istekler işçiler tarafından akışlara aktarılır
+- Redis yoksa aynı komut alt kümesini uygulayan süreç içi InMemoryBroker kullanılır (tek düğüm / test)
+"""
+
+import json
+import os
+import socket
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import TimeoutError as FuturesTimeoutError
+from dataclasses import asdict, dataclass, field, is_dataclass
+from datetime import datetime
+from itertools import count as id_counter
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from src.utils.logger import log_info, log_error, log_warning
+
+try:
+    import redis
+    REDIS_AVAILABLE = True
+except ImportError:
+    REDIS_AVAILABLE = False
+
+QUEUE_PREFIX = 'analysis_queue'          # collector'ın LPUSH ettiği liste ile aynı ad
+RESULTS_STREAM = 'analysis_results'
+CONSUMER_GROUP = 'analysis_workers'
+
+
+def _text(value) -> str:
+    return value.decode() if isinstance(value, bytes) else str(value)
+
+
+def _id_key(stream_id) -> Tuple[int, int]:
+    """'1700000000000-3' -> (1700000000000, 3); '-', '+' ve '0' sınır değerleri"""
+    stream_id = _text(stream_id)
+    if stream_id == '-':
+        return (0, 0)
+    if stream_id == '+':
+        return (2 ** 63, 2 ** 63)
+    ms, _, seq = stream_id.partition('-')
+    return (int(ms), int(seq or 0))
+
+
+def _json_default(value):
+    if is_dataclass(value):
+        return asdict(value)
+    if hasattr(value, 'item'):       # numpy skalerleri
+        return value.item()
+    return str(value)
+
+
+class BrokerError(Exception):
+    """InMemoryBroker komut hatası (redis.exceptions.ResponseError karşılığı)"""
+
+
+class _Pipeline:
+    """Komutları biriktirip broker kilidi altında tek seferde çalıştırır (MULTI/EXEC karşılığı)"""
+
+    def __init__(self, broker: 'InMemoryBroker'):
+        self._broker = broker
+        self._commands = []
+
+    def __getattr__(self, name):
+        method = getattr(self._broker, name)
+
+        def queue_command(*args, **kwargs):
+            self._commands.append((method, args, kwargs))
+            return self
+        return queue_command
+
+    def execute(self) -> list:
+        with self._broker._lock:
+            commands, self._commands = self._commands, []
+            return [method(*args, **kwargs) for method, args, kwargs in commands]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self._commands = []
+        return False
+
+
+class InMemoryBroker:
+    """Redis stream/set/list/string komutlarının süreç içi, thread-safe alt kümesi
+
+    Dönüş biçimleri redis-py (decode_responses=True, RESP2) ile aynıdır; böylece kuyruk kodu
+    gerçek Redis ile bu broker arasında ayrım yapmaz. Süreçler arası paylaşım yoktur.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._changed = threading.Condition(self._lock)
+        self._streams: Dict[str, dict] = {}
+        self._groups: Dict[str, Dict[str, dict]] = {}
+        self._sets: Dict[str, set] = {}
+        self._lists: Dict[str, list] = {}
+        self._strings: Dict[str, Tuple[str, Optional[float]]] = {}
+        self._last_id = (0, 0)
+
+    # ------------------------------------------------------------------ streams
+    def _stream(self, name: str, create: bool = False) -> Optional[dict]:
+        if name not in self._streams and create:
+            self._streams[name] = {'keys': [], 'entries': {}}
+        return self._streams.get(name)
+
+    def _next_id(self) -> Tuple[int, int]:
+        ms = int(time.time() * 1000)
+        last_ms, seq = self._last_id
+        self._last_id = (ms, 0) if ms > last_ms else (last_ms, seq + 1)
+        return self._last_id
+
+    def _range(self, name: str, lower, upper, exclusive_lower: bool = False) -> List[Tuple[str, dict]]:
+        stream = self._stream(name)
+        if not stream:
+            return []
+        keys = stream['keys']
+        start = (bisect_right if exclusive_lower else bisect_left)(keys, lower)
+        end = bisect_right(keys, upper)
+        return [(f"{k[0]}-{k[1]}", dict(stream['entries'][k])) for k in keys[start:end]]
+
+    def xadd(self, name, fields: dict, id='*', maxlen=None, approximate=True):
+        with self._lock:
+            stream = self._stream(name, create=True)
+            key = self._next_id()
+            stream['keys'].append(key)
+            stream['entries'][key] = {str(k): _text(v) for k, v in fields.items()}
+            if maxlen is not None and len(stream['keys']) > maxlen:
+                for old in stream['keys'][:-maxlen]:
+                    del stream['entries'][old]
+                del stream['keys'][:-maxlen]
+            self._changed.notify_all()
+            return f"{key[0]}-{key[1]}"
+
+    def xlen(self, name) -> int:
+        with self._lock:
+            stream = self._stream(name)
+            return len(stream['keys']) if stream else 0
+
+    def xdel(self, name, *ids) -> int:
+        with self._lock:
+            stream = self._stream(name)
+            removed = 0
+            for stream_id in ids:
+                key = _id_key(stream_id)
+                if stream and key in stream['entries']:
+                    del stream['entries'][key]
+                    stream['keys'].pop(bisect_left(stream['keys'], key))
+                    removed += 1
+            return removed
+
+    def xrange(self, name, min='-', max='+', count=None):
+        with self._lock:
+            return self._range(name, _id_key(min), _id_key(max))[:count]
+
+    def xrevrange(self, name, max='+', min='-', count=None):
+        with self._lock:
+            return list(reversed(self._range(name, _id_key(min), _id_key(max))))[:count]
+
+    def xread(self, streams: dict, count=None, block=None):
+        return self._blocking(block, lambda: [
+            [name, entries] for name, last in streams.items()
+            for entries in [self._range(name, _id_key(last), _id_key('+'), exclusive_lower=True)[:count]]
+            if entries])
+
+    def _blocking(self, block, read):
+        deadline = None if not block else time.monotonic() + block / 1000
+        with self._changed:
+            while True:
+                result = read()
+                if result or block is None:
+                    return result
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return []
+                self._changed.wait(remaining)
+
+    def xgroup_create(self, name, groupname, id='$', mkstream=False):
+        with self._lock:
+            stream = self._stream(name, create=mkstream)
+            if stream is None:
+                raise BrokerError("ERR The XGROUP subcommand requires the key to exist")
+            groups = self._groups.setdefault(name, {})
+            if groupname in groups:
+                raise BrokerError("BUSYGROUP Consumer Group name already exists")
+            last = stream['keys'][-1] if id == '$' and stream['keys'] else _id_key(id if id != '$' else '0')
+            groups[groupname] = {'last_id': last, 'pending': OrderedDict()}
+            return True
+
+    def _group(self, name, groupname) -> dict:
+        try:
+            return self._groups[name][groupname]
+        except KeyError:
+            raise BrokerError(f"NOGROUP No such key '{name}' or consumer group '{groupname}'")
+
+    def xreadgroup(self, groupname, consumername, streams: dict, count=None, block=None, noack=False):
+        def read():
+            result = []
+            for name, start in streams.items():
+                group = self._group(name, groupname)
+                if _text(start) != '>':
+                    own = [(i, e) for i, e in self._range(name, _id_key(start), _id_key('+'), exclusive_lower=True)
+                           if group['pending'].get(_id_key(i), [None])[0] == consumername]
+                    result.append([name, own[:count]])
+                    continue
+                entries = self._range(name, group['last_id'], _id_key('+'), exclusive_lower=True)[:count]
+                if not entries:
+                    continue
+                group['last_id'] = _id_key(entries[-1][0])
+                if not noack:
+                    now = time.monotonic()
+                    for stream_id, _ in entries:
+                        group['pending'][_id_key(stream_id)] = [consumername, now, 1]
+                result.append([name, entries])
+            return result
+        return self._blocking(block, read)
+
+    def xack(self, name, groupname, *ids) -> int:
+        with self._lock:
+            pending = self._group(name, groupname)['pending']
+            return sum(pending.pop(_id_key(i), None) is not None for i in ids)
+
+    def xautoclaim(self, name, groupname, consumername, min_idle_time, start_id='0-0', count=None, justid=False):
+        with self._lock:
+            pending = self._group(name, groupname)['pending']
+            stream = self._stream(name)
+            now = time.monotonic()
+            claimed, deleted = [], []
+            start = _id_key(start_id)
+            for key in [k for k in pending if k >= start]:
+                if count is not None and len(claimed) >= count:
+                    return [f"{key[0]}-{key[1]}", claimed, deleted]
+                consumer, delivered_at, deliveries = pending[key]
+                if (now - delivered_at) * 1000 < min_idle_time:
+                    continue
+                stream_id = f"{key[0]}-{key[1]}"
+                if not stream or key not in stream['entries']:
+                    del pending[key]
+                    deleted.append(stream_id)
+                    continue
+                pending[key] = [consumername, now, deliveries + 1]
+                claimed.append(stream_id if justid else (stream_id, dict(stream['entries'][key])))
+            return ['0-0', claimed, deleted]
+
+    def xpending(self, name, groupname) -> dict:
+        with self._lock:
+            pending = self._group(name, groupname)['pending']
+            consumers: Dict[str, int] = {}
+            for consumer, _, _ in pending.values():
+                consumers[consumer] = consumers.get(consumer, 0) + 1
+            keys = list(pending)
+            return {'pending': len(pending),
+                    'min': f"{keys[0][0]}-{keys[0][1]}" if keys else None,
+                    'max': f"{keys[-1][0]}-{keys[-1][1]}" if keys else None,
+                    'consumers': [{'name': n, 'pending': c} for n, c in consumers.items()]}
+
+    def xpending_range(self, name, groupname, min, max, count, consumername=None, idle=None):
+        with self._lock:
+            pending = self._group(name, groupname)['pending']
+            lower, upper = _id_key(min), _id_key(max)
+            now = time.monotonic()
+            rows = []
+            for key, (consumer, delivered_at, deliveries) in pending.items():
+                if lower <= key <= upper and (consumername is None or consumer == consumername):
+                    rows.append({'message_id': f"{key[0]}-{key[1]}", 'consumer': consumer,
+                                 'time_since_delivered': int((now - delivered_at) * 1000),
+                                 'times_delivered': deliveries})
+            return rows[:count]
+
+    # ------------------------------------------------------- sets/lists/strings
+    def sadd(self, name, *values) -> int:
+        with self._lock:
+            members = self._sets.setdefault(name, set())
+            before = len(members)
+            members.update(_text(v) for v in values)
+            return len(members) - before
+
+    def srem(self, name, *values) -> int:
+        with self._lock:
+            members = self._sets.get(name, set())
+            removed = sum(_text(v) in members for v in values)
+            members.difference_update(_text(v) for v in values)
+            return removed
+
+    def smembers(self, name) -> set:
+        with self._lock:
+            return set(self._sets.get(name, set()))
+
+    def lpush(self, name, *values) -> int:
+        with self._lock:
+            items = self._lists.setdefault(name, [])
+            items[:0] = [_text(v) for v in reversed(values)]
+            return len(items)
+
+    def rpop(self, name, count=None):
+        with self._lock:
+            items = self._lists.get(name, [])
+            if not items:
+                return None
+            if count is None:
+                return items.pop()
+            popped = items[-count:][::-1]
+            del items[-count:]
+            return popped
+
+    def llen(self, name) -> int:
+        with self._lock:
+            return len(self._lists.get(name, []))
+
+    def set(self, name, value, ex=None, nx=False):
+        with self._lock:
+            if nx and self.exists(name):
+                return None
+            self._strings[name] = (_text(value), time.monotonic() + ex if ex else None)
+            return True
+
+    def get(self, name):
+        with self._lock:
+            return self._strings[name][0] if self.exists(name) else None
+
+    def exists(self, *names) -> int:
+        with self._lock:
+            now = time.monotonic()
+            found = 0
+            for name in names:
+                if name in self._strings:
+                    expires = self._strings[name][1]
+                    if expires is not None and expires <= now:
+                        del self._strings[name]
+                        continue
+                    found += 1
+                elif name in self._streams or name in self._sets or self._lists.get(name):
+                    found += 1
+            return found
+
+    def delete(self, *names) -> int:
+        with self._lock:
+            removed = 0
+            for name in names:
+                for store in (self._strings, self._streams, self._sets, self._lists):
+                    if store.pop(name, None) is not None:
+                        removed += 1
+                self._groups.pop(name, None)
+            return removed
+
+    def pipeline(self, transaction=True) -> _Pipeline:
+        return _Pipeline(self)
+
+
+def create_broker(redis_url: Optional[str] = None):
+    """REDIS_URL tanımlıysa Redis istemcisi, değilse süreç içi broker"""
+    redis_url = redis_url or os.getenv('REDIS_URL')
+    if redis_url and REDIS_AVAILABLE:
+        return redis.Redis.from_url(redis_url, decode_responses=True)
+    if redis_url:
+        log_warning("redis paketi yok, analiz kuyruğu süreç içi broker ile çalışacak")
+    return InMemoryBroker()
+
+
+@dataclass
+class AnalysisJob:
+    """Kuyruktan alınmış tek sembol işi"""
+    stream: str
+    id: str
+    symbol: str
+    market: str
+    fields: Dict[str, str] = field(default_factory=dict)
+    deliveries: int = 1
+
+
+class AnalysisWorkQueue:
+    """📬 Pazar shard'lı, tekrarsız, görünürlük süreli analiz iş kuyruğu"""
+
+    def __init__(self, broker=None, prefix: str = QUEUE_PREFIX, results_stream: str = RESULTS_STREAM,
+                 group: str = CONSUMER_GROUP, visibility_timeout: float = 300.0, max_deliveries: int = 3,
+                 results_maxlen: int = 100000, dedupe_ttl: Optional[float] = None):
+        self.broker = broker if broker is not None else InMemoryBroker()
+        self.prefix = prefix
+        self.results_stream = results_stream
+        self.group = group
+        self.visibility_timeout = visibility_timeout
+        self.max_deliveries = max_deliveries
+        self.results_maxlen = results_maxlen
+        # Üretici SET NX ile XADD arasında düşerse işaret kendiliğinden kalkar
+        self.dedupe_ttl = int(dedupe_ttl or visibility_timeout * (max_deliveries + 1))
+        self._ready_groups = set()
+        self.stats = {'enqueued': 0, 'duplicates': 0, 'imported': 0, 'claimed': 0, 'reclaimed': 0,
+                      'completed': 0, 'dead_lettered': 0}
+
+    def shard_key(self, market: str) -> str:
+        return f"{self.prefix}:{market.upper()}"
+
+    def marker_key(self, market: str, symbol: str) -> str:
+        return f"{self.prefix}:queued:{market.upper()}:{symbol}"
+
+    @property
+    def shards_key(self) -> str:
+        return f"{self.prefix}:shards"
+
+    @property
+    def dead_letter_stream(self) -> str:
+        return f"{self.prefix}:dead"
+
+    def _ensure_group(self, stream: str):
+        if stream in self._ready_groups:
+            return
+        try:
+            self.broker.xgroup_create(stream, self.group, id='0', mkstream=True)
+        except Exception as e:
+            if 'BUSYGROUP' not in str(e):
+                raise
+        self._ready_groups.add(stream)
+
+    def markets(self) -> List[str]:
+        """Kayıtlı shard'lar (en az bir kez iş yazılmış pazarlar)"""
+        return sorted(_text(m) for m in self.broker.smembers(self.shards_key))
+
+    # ---------------------------------------------------------------- üretici
+    def enqueue(self, symbols_by_market: Dict[str, Iterable[str]], trigger: str = 'scheduled_analysis') -> int:
+        """Pazar -> semboller; kuyrukta zaten bekleyen semboller atlanır. Eklenen iş sayısını döndürür"""
+        now = datetime.now().isoformat()
+        jobs = [{'symbol': symbol, 'market': market.upper(), 'trigger': trigger, 'enqueued_at': now}
+                for market, symbols in symbols_by_market.items() for symbol in symbols]
+        return self.enqueue_jobs(jobs)
+
+    def enqueue_jobs(self, jobs: List[dict]) -> int:
+        if not jobs:
+            return 0
+        pipe = self.broker.pipeline(transaction=False)
+        for job in jobs:
+            pipe.set(self.marker_key(job['market'], job['symbol']), job.get('enqueued_at', ''),
+                     ex=self.dedupe_ttl, nx=True)
+        fresh = [job for job, added in zip(jobs, pipe.execute()) if added]
+        self.stats['duplicates'] += len(jobs) - len(fresh)
+        if not fresh:
+            return 0
+
+        markets = sorted({job['market'] for job in fresh})
+        for market in markets:
+            self._ensure_group(self.shard_key(market))
+        pipe = self.broker.pipeline(transaction=False)
+        pipe.sadd(self.shards_key, *markets)
+        for job in fresh:
+            pipe.xadd(self.shard_key(job['market']), {k: _text(v) for k, v in job.items() if v is not None})
+        pipe.execute()
+        self.stats['enqueued'] += len(fresh)
+        return len(fresh)
+
+    def import_list(self, list_key: str = QUEUE_PREFIX, limit: int = 1000) -> int:
+        """Eski LPUSH listesindeki JSON istekleri shard akışlarına aktar (FIFO, tekrarlar elenir)"""
+        raw = self.broker.rpop(list_key, limit)
+        if not raw:
+            return 0
+        jobs = []
+        for item in raw if isinstance(raw, list) else [raw]:
+            try:
+                request = json.loads(item)
+                jobs.append({'symbol': request['symbol'], 'market': str(request.get('market', 'UNKNOWN')).upper(),
+                             'trigger': request.get('trigger', 'legacy'),
+                             'enqueued_at': request.get('timestamp') or datetime.now().isoformat()})
+            except (ValueError, KeyError, TypeError) as e:
+                log_error(f"Geçersiz analiz isteği atlandı: {e}")
+        added = self.enqueue_jobs(jobs)
+        self.stats['imported'] += added
+        return added
+
+    # ------------------------------------------------------------------ işçi
+    def _jobs(self, stream: str, entries, deliveries: Dict[str, int]) -> List[AnalysisJob]:
+        jobs = []
+        for stream_id, fields in entries or []:
+            fields = {_text(k): _text(v) for k, v in fields.items()}
+            stream_id = _text(stream_id)
+            jobs.append(AnalysisJob(stream, stream_id, fields.get('symbol', ''), fields.get('market', ''),
+                                    fields, deliveries.get(stream_id, 1)))
+        return jobs
+
+    def _reclaim(self, consumer: str, stream: str, limit: int) -> List[AnalysisJob]:
+        """Görünürlük süresi dolan onaylanmamış işleri devral; limiti aşanları ölü akışa taşı
+
+        Ölü işler sonuç akışına da status='dead' ile yazılır; bekleyen tarama sembolü tamamlanmış sayar.
+        """
+        result = self.broker.xautoclaim(stream, self.group, consumer, int(self.visibility_timeout * 1000),
+                                        start_id='0-0', count=limit)
+        entries = result[1] if result else []
+        if not entries:
+            return []
+        # Aralık sorgusu başka işçilerin bekleyen kayıtlarını da döndürür; her id tek tek sorgulanır
+        pipe = self.broker.pipeline(transaction=False)
+        for stream_id, _ in entries:
+            pipe.xpending_range(stream, self.group, min=stream_id, max=stream_id, count=1)
+        deliveries = {_text(row['message_id']): int(row['times_delivered'])
+                      for rows in pipe.execute() for row in rows}
+        jobs = self._jobs(stream, entries, deliveries)
+        dead = [job for job in jobs if job.deliveries > self.max_deliveries]
+        if dead:
+            pipe = self.broker.pipeline(transaction=True)
+            stamp = datetime.now().isoformat()
+            for job in dead:
+                pipe.xadd(self.dead_letter_stream, {**job.fields, 'deliveries': job.deliveries,
+                                                    'last_consumer': consumer})
+                pipe.xadd(self.results_stream, {
+                    'symbol': job.symbol, 'market': job.market, 'status': 'dead', 'worker': consumer,
+                    'job_id': job.id, 'finished_at': stamp, 'result': '',
+                }, maxlen=self.results_maxlen, approximate=True)
+                pipe.xack(stream, self.group, job.id)
+                pipe.xdel(stream, job.id)
+                pipe.delete(self.marker_key(job.market, job.symbol))
+            pipe.execute()
+            self.stats['dead_lettered'] += len(dead)
+            log_warning(f"{len(dead)} analiz işi {self.max_deliveries} denemeden sonra ölü akışa taşındı")
+        alive = [job for job in jobs if job.deliveries <= self.max_deliveries]
+        self.stats['reclaimed'] += len(alive)
+        return alive
+
+    def claim(self, consumer: str, markets: Optional[List[str]] = None, count: int = 32,
+              block_ms: Optional[int] = None) -> List[AnalysisJob]:
+        """Önce süresi dolan işleri devral, sonra yeni işleri oku (COUNT shard başına uygulanır)"""
+        streams = [self.shard_key(m) for m in (markets or self.markets())]
+        if not streams:
+            if block_ms:
+                time.sleep(block_ms / 1000)
+            return []
+        for stream in streams:
+            self._ensure_group(stream)
+
+        jobs: List[AnalysisJob] = []
+        for stream in streams:
+            if len(jobs) >= count:
+                break
+            jobs.extend(self._reclaim(consumer, stream, count - len(jobs)))
+        if len(jobs) < count:
+            response = self.broker.xreadgroup(self.group, consumer, {s: '>' for s in streams},
+                                              count=count - len(jobs), block=None if jobs else block_ms)
+            fresh = []
+            for stream, entries in response or []:
+                fresh.extend(self._jobs(_text(stream), entries, {}))
+            self.stats['claimed'] += len(fresh)
+            jobs.extend(fresh)
+        return jobs
+
+    def complete(self, consumer: str, finished: List[Tuple[AnalysisJob, Optional[dict]]]) -> int:
+        """Sonuçları ortak akışa yaz ve işleri aynı işlemde onayla/sil; işaretler kalkar"""
+        if not finished:
+            return 0
+        pipe = self.broker.pipeline(transaction=True)
+        stamp = datetime.now().isoformat()
+        for job, result in finished:
+            pipe.xadd(self.results_stream, {
+                'symbol': job.symbol, 'market': job.market, 'status': 'ok' if result else 'empty',
+                'worker': consumer, 'job_id': job.id, 'finished_at': stamp,
+                'result': json.dumps(result, default=_json_default) if result else '',
+            }, maxlen=self.results_maxlen, approximate=True)
+            pipe.xack(job.stream, self.group, job.id)
+            pipe.xdel(job.stream, job.id)
+            pipe.delete(self.marker_key(job.market, job.symbol))
+        pipe.execute()
+        self.stats['completed'] += len(finished)
+        return len(finished)
+
+    def backlog(self, markets: Optional[List[str]] = None) -> int:
+        """Henüz onaylanmamış iş sayısı (okunmamış + işlenmekte olan); onaylanan işler akıştan silinir"""
+        return sum(self.broker.xlen(self.shard_key(m)) for m in (markets or self.markets()))
+
+    # ---------------------------------------------------------------- sonuçlar
+    def latest_result_id(self) -> str:
+        latest = self.broker.xrevrange(self.results_stream, count=1)
+        return _text(latest[0][0]) if latest else '0-0'
+
+    def read_results(self, last_id: str = '0-0', count: int = 1000,
+                     block_ms: Optional[int] = None) -> Tuple[str, List[dict]]:
+        """last_id sonrasındaki sonuçlar; (yeni last_id, [{'symbol','market','status','worker','result'}])"""
+        response = self.broker.xread({self.results_stream: last_id}, count=count, block=block_ms)
+        results = []
+        for _, entries in response or []:
+            for stream_id, fields in entries:
+                fields = {_text(k): _text(v) for k, v in fields.items()}
+                fields['result'] = json.loads(fields['result']) if fields.get('result') else None
+                results.append(fields)
+                last_id = _text(stream_id)
+        return last_id, results
+
+    def get_stats(self) -> Dict:
+        shards = {}
+        for market in self.markets():
+            stream = self.shard_key(market)
+            self._ensure_group(stream)
+            shards[market] = {'backlog': self.broker.xlen(stream),
+                              'in_flight': int(self.broker.xpending(stream, self.group)['pending'])}
+        return {**self.stats, 'shards': shards, 'dead_letters': self.broker.xlen(self.dead_letter_stream)}
+
+
+_worker_ids = id_counter(1)
+
+
+class AnalysisWorker:
+    """⚙️ Kuyruktan toplu iş alıp yerel thread havuzunda analiz eden işçi (süreç/düğüm başına bir tane)"""
+
+    def __init__(self, queue: AnalysisWorkQueue, analyze_fn: Callable[[str], Optional[dict]],
+                 name: Optional[str] = None, markets: Optional[List[str]] = None, batch_size: int = 32,
+                 max_workers: int = 8, block_ms: Optional[int] = 1000, job_timeout: Optional[float] = None,
+                 prefetch_fn: Optional[Callable[[List[str], str], None]] = None,
+                 legacy_list: Optional[str] = QUEUE_PREFIX):
+        self.queue = queue
+        self.analyze_fn = analyze_fn
+        self.name = name or f"{socket.gethostname()}-{os.getpid()}-{next(_worker_ids)}"
+        self.markets = [m.upper() for m in markets] if markets else None
+        self.batch_size = batch_size
+        self.max_workers = max_workers
+        self.block_ms = block_ms
+        # Süresi aşan işler onaylanmaz; görünürlük süresi sonunda başka işçi devralır
+        self.job_timeout = job_timeout or queue.visibility_timeout
+        self.prefetch_fn = prefetch_fn
+        self.legacy_list = legacy_list
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.stats = {'batches': 0, 'processed': 0, 'failed': 0}
+
+    def process_batch(self) -> int:
+        """Bir parti al, analiz et, sonuçları yaz; işlenen iş sayısını döndürür"""
+        if self.legacy_list:
+            self.queue.import_list(self.legacy_list)
+        jobs = self.queue.claim(self.name, self.markets, self.batch_size, self.block_ms)
+        if not jobs:
+            return 0
+        if self.prefetch_fn:
+            by_market: Dict[str, List[str]] = {}
+            for job in jobs:
+                by_market.setdefault(job.market, []).append(job.symbol)
+            for market, symbols in by_market.items():
+                try:
+                    self.prefetch_fn(symbols, market)
+                except Exception as e:
+                    log_error(f"{market} ön yükleme hatası: {e}")
+
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                thread_name_prefix=f"analysis-{self.name}")
+        futures = {self._executor.submit(self.analyze_fn, job.symbol): job for job in jobs}
+        finished = []
+        try:
+            for future in as_completed(futures, timeout=self.job_timeout):
+                job = futures[future]
+                try:
+                    result = future.result()
+                except Exception as e:
+                    # Onaylanmaz: görünürlük süresi sonunda yeniden denenir
+                    self.stats['failed'] += 1
+                    log_error(f"{job.symbol} analiz hatası ({self.name}): {e}")
+                    continue
+                if result:
+                    result.setdefault('market', job.market)
+                finished.append((job, result))
+        except FuturesTimeoutError:
+            self.stats['failed'] += len(jobs) - len(finished)
+            log_warning(f"{self.name}: {len(jobs) - len(finished)} iş zaman aşımına uğradı")
+
+        self.queue.complete(self.name, finished)
+        self.stats['batches'] += 1
+        self.stats['processed'] += len(finished)
+        return len(finished)
+
+    def run(self, until_idle: bool = False):
+        """Durdurulana kadar (until_idle=True ise kuyruk boşalınca) parti işle"""
+        log_info(f"Analiz işçisi başladı: {self.name} ({', '.join(self.markets or ['tüm pazarlar'])})")
+        while not self._stop.is_set():
+            try:
+                if self.process_batch() == 0 and until_idle and self.queue.backlog(self.markets) == 0:
+                    break
+            except Exception as e:
+                log_error(f"Analiz işçisi hatası ({self.name}): {e}")
+                self._stop.wait(1.0)
+        if self._executor:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    def start(self) -> threading.Thread:
+        self._stop.clear()
+        self._thread = threading.Thread(target=self.run, name=f"analysis-worker-{self.name}", daemon=True)
+        self._thread.start()
+        return self._thread
+
+    def stop(self, timeout: float = 5.0):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+
+
+def distributed_scan(queue: AnalysisWorkQueue, symbols_by_market: Dict[str, List[str]],
+                     timeout: float = 1800.0, poll_ms: int = 1000) -> Dict[str, List[dict]]:
+    """Sembolleri kuyruğa yaz, ortak sonuç akışından hepsi gelene (veya süre dolana) kadar topla
+
+    Başka bir taramanın kuyruğa koyduğu sembolün sonucu da kabul edilir; ölü akışa taşınan iş (status='dead')
+    tamamlanmış sayılır. Pazar -> başarılı sonuçlar döner.
+    """
+    last_id = queue.latest_result_id()
+    queue.enqueue(symbols_by_market, trigger='full_scan')
+    expected = {(market.upper(), symbol) for market, symbols in symbols_by_market.items() for symbol in symbols}
+    results: Dict[str, List[dict]] = {market: [] for market in symbols_by_market}
+    markets = {market.upper(): market for market in symbols_by_market}
+
+    dead = 0
+    deadline = time.monotonic() + timeout
+    while expected and time.monotonic() < deadline:
+        last_id, batch = queue.read_results(last_id, block_ms=poll_ms)
+        for item in batch:
+            key = (item['market'], item['symbol'])
+            if key not in expected:
+                continue
+            expected.discard(key)
+            if item.get('status') == 'dead':
+                dead += 1
+            elif item['result']:
+                results[markets[item['market']]].append(item['result'])
+    if dead:
+        log_warning(f"Dağıtık tarama: {dead} sembol ölü akışa taşındı, sonuçsız tamamlandı")
+    if expected:
+        log_warning(f"Dağıtık tarama: {len(expected)} sembolün sonucu {timeout:.0f}s içinde gelmedi")
+    return results
+
+
+_analysis_queue: Optional[AnalysisWorkQueue] = None
+_queue_lock = threading.Lock()
+
+
+def get_analysis_queue(**kwargs) -> AnalysisWorkQueue:
+    """Süreç genelinde paylaşılan kuyruk (REDIS_URL varsa Redis, yoksa süreç içi broker)"""
+    global _analysis_queue
+    with _queue_lock:
+        if _analysis_queue is None:
+            _analysis_queue = AnalysisWorkQueue(create_broker(), **kwargs)
+        return _analysis_queue
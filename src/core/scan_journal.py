@@ -0,0 +1,211 @@
+"""
+PlanB Motoru - Tarama Günlüğü (scan journal)
+
+Tam pazar taramasında her sembolün sonucu geldiği anda SQLite'a yazılır:
+- Yarıda kalan tarama (hata, BATCH_TIMEOUT, yeniden başlatma) yalnızca kalan sembollerle sürer
+- Girdi barları son skorlamadan beri değişmeyen sembol yeniden analiz edilmez, son sonuç kullanılır
+  (günlük barlarda saatlik döngülerin çoğu neredeyse boş geçer)
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import asdict, is_dataclass
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+
+from src.utils.logger import log_info, log_error
+
+DEFAULT_JOURNAL_PATH = os.getenv("SCAN_JOURNAL_PATH", "data/scan_journal.db")
+
+
+def _json_default(value):
+    if is_dataclass(value):
+        return asdict(value)
+    if hasattr(value, 'item'):       # numpy skalerleri
+        return value.item()
+    return str(value)
+
+
+def bars_fingerprint(df) -> Tuple[Optional[str], Optional[str]]:
+    """(son bar zamanı, parmak izi); parmak izi satır sayısı + son barın OHLCV değerlerinden üretilir"""
+    try:
+        if df is None or df.empty:
+            return None, None
+        last = df.iloc[-1]
+        values = [str(len(df)), str(df.index[-1])]
+        values += [repr(float(last[c])) for c in ('Open', 'High', 'Low', 'Close', 'Volume') if c in df.columns]
+        return str(df.index[-1]), hashlib.blake2b('|'.join(values).encode(), digest_size=12).hexdigest()
+    except Exception as e:
+        log_error(f"Bar parmak izi hatası: {e}")
+        return None, None
+
+
+class ScanJournal:
+    """📒 Sembol bazında tamamlanma kaydı tutan, kaldığı yerden devam ettirilebilir tarama günlüğü"""
+
+    def __init__(self, path: str = DEFAULT_JOURNAL_PATH, resume_window: float = 6 * 3600,
+                 keep_scans: int = 20):
+        self.path = path
+        self.resume_window = resume_window      # bundan eski yarım tarama devam ettirilmez
+        self.keep_scans = keep_scans
+        self.db_lock = threading.Lock()
+        self.db = self._open()
+        self.stats = {'recorded': 0, 'resumed': 0, 'unchanged': 0}
+
+    def _open(self) -> sqlite3.Connection:
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS scans (
+                scan_id TEXT PRIMARY KEY,
+                started_at REAL NOT NULL,
+                finished_at REAL,
+                total INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE TABLE IF NOT EXISTS scan_progress (
+                scan_id TEXT NOT NULL,
+                market TEXT NOT NULL,
+                symbol TEXT NOT NULL,
+                status TEXT NOT NULL,
+                completed_at REAL NOT NULL,
+                PRIMARY KEY (scan_id, market, symbol)
+            );
+            CREATE TABLE IF NOT EXISTS symbol_results (
+                market TEXT NOT NULL,
+                symbol TEXT NOT NULL,
+                data_ts TEXT,
+                fingerprint TEXT,
+                score REAL,
+                result TEXT,
+                scored_at REAL NOT NULL,
+                PRIMARY KEY (market, symbol)
+            );
+        """)
+        return conn
+
+    # ------------------------------------------------------------------
+    # Tarama yaşam döngüsü
+    # ------------------------------------------------------------------
+
+    def begin_scan(self, total: int = 0) -> str:
+        """Yarım kalmış yakın tarihli taramayı devam ettir, yoksa yenisini başlat"""
+        with self.db_lock:
+            row = self.db.execute("""
+                SELECT scan_id FROM scans WHERE finished_at IS NULL AND started_at >= ?
+                ORDER BY started_at DESC LIMIT 1
+            """, (time.time() - self.resume_window,)).fetchone()
+            if row:
+                done = self.db.execute("SELECT COUNT(*) FROM scan_progress WHERE scan_id = ?", row).fetchone()[0]
+                log_info(f"Tarama {row[0]} devam ediyor: {done} sembol tamamlanmış")
+                return row[0]
+            scan_id = datetime.now().strftime('%Y%m%d-%H%M%S-%f')
+            self.db.execute("INSERT INTO scans (scan_id, started_at, total) VALUES (?, ?, ?)",
+                            (scan_id, time.time(), total))
+            return scan_id
+
+    def finish_scan(self, scan_id: str):
+        """Taramayı kapat; eski taramaların ilerleme satırlarını temizle"""
+        with self.db_lock:
+            self.db.execute("BEGIN")
+            self.db.execute("UPDATE scans SET finished_at = ? WHERE scan_id = ?", (time.time(), scan_id))
+            self.db.execute("DELETE FROM scan_progress WHERE scan_id IN (SELECT scan_id FROM scans "
+                            "WHERE finished_at IS NOT NULL)")
+            self.db.execute("DELETE FROM scans WHERE scan_id NOT IN (SELECT scan_id FROM scans "
+                            "ORDER BY started_at DESC LIMIT ?)", (self.keep_scans,))
+            self.db.execute("COMMIT")
+
+    def completed(self, scan_id: str, market: str) -> Dict[str, Optional[dict]]:
+        """Bu taramada tamamlanmış semboller -> son sonuç (başarısız analizler için None)"""
+        with self.db_lock:
+            rows = self.db.execute("""
+                SELECT p.symbol, p.status, r.result
+                FROM scan_progress p LEFT JOIN symbol_results r ON r.market = p.market AND r.symbol = p.symbol
+                WHERE p.scan_id = ? AND p.market = ?
+            """, (scan_id, market)).fetchall()
+        self.stats['resumed'] += len(rows)
+        return {symbol: json.loads(result) if status == 'ok' and result else None
+                for symbol, status, result in rows}
+
+    # ------------------------------------------------------------------
+    # Sembol sonuçları
+    # ------------------------------------------------------------------
+
+    def reusable(self, market: str, symbol: str, fingerprint: Optional[str],
+                 max_age: Optional[float] = None) -> Optional[dict]:
+        """Barlar son skorlamadan beri değişmediyse son sonuç; aksi halde None"""
+        if not fingerprint:
+            return None
+        with self.db_lock:
+            row = self.db.execute("""
+                SELECT result, scored_at FROM symbol_results
+                WHERE market = ? AND symbol = ? AND fingerprint = ? AND result IS NOT NULL
+            """, (market, symbol, fingerprint)).fetchone()
+        if not row or (max_age and time.time() - row[1] > max_age):
+            return None
+        self.stats['unchanged'] += 1
+        return json.loads(row[0])
+
+    def record(self, scan_id: str, market: str, symbol: str, data_ts: Optional[str],
+               fingerprint: Optional[str], result: Optional[dict], rescored: bool = True):
+        """Sembolü bu taramada tamamlandı olarak işaretle; yeni skor varsa son sonucu güncelle"""
+        now = time.time()
+        status = 'ok' if result else 'empty'
+        with self.db_lock:
+            try:
+                self.db.execute("BEGIN")
+                if rescored and result:
+                    self.db.execute("""
+                        INSERT OR REPLACE INTO symbol_results
+                        (market, symbol, data_ts, fingerprint, score, result, scored_at)
+                        VALUES (?, ?, ?, ?, ?, ?, ?)
+                    """, (market, symbol, data_ts, fingerprint, result.get('score'),
+                          json.dumps(result, default=_json_default), now))
+                self.db.execute("""
+                    INSERT OR REPLACE INTO scan_progress (scan_id, market, symbol, status, completed_at)
+                    VALUES (?, ?, ?, ?, ?)
+                """, (scan_id, market, symbol, status, now))
+                self.db.execute("COMMIT")
+            except Exception as e:
+                if self.db.in_transaction:
+                    self.db.execute("ROLLBACK")
+                log_error(f"Tarama günlüğü yazma hatası {symbol}: {e}")
+                return
+        self.stats['recorded'] += 1
+
+    def last_result(self, market: str, symbol: str) -> Optional[dict]:
+        with self.db_lock:
+            row = self.db.execute("SELECT data_ts, fingerprint, score, result, scored_at FROM symbol_results "
+                                  "WHERE market = ? AND symbol = ?", (market, symbol)).fetchone()
+        if not row:
+            return None
+        return {'data_ts': row[0], 'fingerprint': row[1], 'score': row[2],
+                'result': json.loads(row[3]) if row[3] else None, 'scored_at': row[4]}
+
+    def get_stats(self) -> Dict:
+        with self.db_lock:
+            symbols = self.db.execute("SELECT COUNT(*) FROM symbol_results").fetchone()[0]
+            running = self.db.execute("SELECT COUNT(*) FROM scans WHERE finished_at IS NULL").fetchone()[0]
+        return {**self.stats, 'symbols': symbols, 'running_scans': running}
+
+    def close(self):
+        with self.db_lock:
+            self.db.close()
+
+
+_scan_journal: Optional[ScanJournal] = None
+
+
+def get_scan_journal(**kwargs) -> ScanJournal:
+    """Süreç başına tek tarama günlüğü"""
+    global _scan_journal
+    if _scan_journal is None:
+        _scan_journal = ScanJournal(**kwargs)
+    return _scan_journal
@@ -456,7 +456,8 @@ HTML_TEMPLATE = """
     <script>
         let isAnalyzing = false;
         let websocket = null;
-        
+        const priceState = {};
+
         // WebSocket bağlantısı kur
         function connectWebSocket() {
             try {
@@ -497,6 +498,17 @@ HTML_TEMPLATE = """
                 case 'price_update':
                     updatePriceDisplay(data.symbol, data.data);
                     break;
+                case 'price_batch':
+                    // snapshot: tam durum, data: son görülen sürümden bu yana değişen alanlar
+                    for (const [symbol, state] of Object.entries(data.snapshot || {})) {
+                        priceState[symbol] = state;
+                        updatePriceDisplay(symbol, state);
+                    }
+                    for (const [symbol, delta] of Object.entries(data.data || {})) {
+                        priceState[symbol] = Object.assign(priceState[symbol] || {}, delta);
+                        updatePriceDisplay(symbol, priceState[symbol]);
+                    }
+                    break;
                 case 'analysis_update':
                     updateAnalysisDisplay(data.symbol, data.data);
                     break;
@@ -1123,6 +1135,81 @@ def get_market_counts():
             'message': str(e)
         }), 500
 
+_history_engine = None
+
+def _get_history_engine() -> PlanBAnalysisEngine:
+    """Geçmiş sorguları için tek motor örneği (her istekte yeniden kurulmaz)"""
+    global _history_engine
+    if _history_engine is None:
+        _history_engine = PlanBAnalysisEngine()
+    return _history_engine
+
+def _split_cursor(cursor, int_key=False):
+    """'tarih|anahtar' biçimindeki keyset cursor'ı ayır; bozuk cursor ValueError fırlatır"""
+    if not cursor:
+        return None, None
+    tarih, sep, key = cursor.rpartition('|')
+    if not sep or not tarih or not key:
+        raise ValueError('Geçersiz cursor')
+    datetime.fromisoformat(tarih)
+    return tarih, int(key) if int_key else key
+
+def _invalid_cursor():
+    return jsonify({
+        'status': 'error',
+        'message': 'Geçersiz cursor'
+    }), 400
+
+@app.route('/api/analysis/history', methods=['GET'])
+def get_analysis_history():
+    """Analiz geçmişi - keyset sayfalama (cursor = önceki sayfanın next_cursor değeri)"""
+    try:
+        limit = min(request.args.get('limit', 100, type=int), 1000)
+        try:
+            before_tarih, before_id = _split_cursor(request.args.get('cursor'), int_key=True)
+        except ValueError:
+            return _invalid_cursor()
+        rows = _get_history_engine().get_analysis_history(
+            symbol=request.args.get('symbol'), limit=limit,
+            before_tarih=before_tarih, before_id=before_id
+        )
+        next_cursor = f"{rows[-1]['tarih']}|{rows[-1]['id']}" if len(rows) == limit else None
+        return jsonify({
+            'status': 'success',
+            'results': rows,
+            'next_cursor': next_cursor
+        })
+    except Exception as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 500
+
+@app.route('/api/analysis/latest', methods=['GET'])
+def get_latest_analysis():
+    """Her varlığın son analizi (analiz_son snapshot tablosundan)"""
+    try:
+        limit = min(request.args.get('limit', 100, type=int), 1000)
+        try:
+            before_tarih, before_symbol = _split_cursor(request.args.get('cursor'))
+        except ValueError:
+            return _invalid_cursor()
+        rows = _get_history_engine().get_latest_analysis(
+            limit=limit, market=request.args.get('market'),
+            before_tarih=before_tarih, before_symbol=before_symbol
+        )
+        next_cursor = f"{rows[-1]['tarih']}|{rows[-1]['hisse_kodu']}" if len(rows) == limit else None
+        return jsonify({
+            'status': 'success',
+            'results': rows,
+            'next_cursor': next_cursor
+        })
+    except Exception as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 500
+
 @app.route('/api/portfolios', methods=['GET'])
 def get_portfolios():
     """Portfolio listesini getir"""
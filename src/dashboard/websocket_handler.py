@@ -1,31 +1,96 @@
 """
 PlanB Motoru - WebSocket Handler
 Real-time dashboard updates için WebSocket desteği
+
+Yayın/abonelik katmanı: istemciler sembol ya da piyasa bazında abone olur (abonelik
+göndermeyen istemci her şeyi alır). Her mesaj bir kez serileştirilir; fiyat tikleri
+istemci başına "kirli sembol" kümesinde birleştirilir ve istemcinin son gördüğü
+sürümden bu yana değişen alanlar toplu delta karesi olarak gönderilir. Her istemcinin
+kendi gönderici görevi vardır; yavaş istemci diğerlerini bekletmez.
 """
 import asyncio
 import websockets
+from websockets.exceptions import ConnectionClosed
 import json
 import threading
 import time
+from collections import deque
 from datetime import datetime
-from typing import Dict, Set, Any
+from typing import Dict, Set, Any, Optional, Iterable, Tuple
 from src.utils.logger import log_info, log_error, log_debug
 
+COMPACT_JSON = {'separators': (',', ':'), 'ensure_ascii': False, 'default': str}
+
+
+def _dumps(data: Any) -> str:
+    return json.dumps(data, **COMPACT_JSON)
+
+
+class ClientSession:
+    """Bir istemcinin abonelikleri, gönderim kuyruğu ve fiyat anlık görüntüsü"""
+
+    def __init__(self, websocket, queue_size: int = 256):
+        self.websocket = websocket
+        self.symbols: Set[str] = set()
+        self.markets: Set[str] = set()
+        self.firehose = True
+        # Sınırlı mesaj kuyruğu (dolunca en eski düşer) + birleştirilen fiyat tikleri
+        self.messages: deque = deque(maxlen=queue_size)
+        self.dirty: Set[str] = set()
+        self.sent: Dict[str, int] = {}
+        self.wakeup = asyncio.Event()
+        self.dropped = 0
+        self.task: Optional[asyncio.Task] = None
+
+    @property
+    def remote_address(self):
+        return getattr(self.websocket, 'remote_address', None)
+
+
 class WebSocketHandler:
     """WebSocket bağlantılarını yöneten sınıf"""
-    
-    def __init__(self, host='localhost', port=8765):
+
+    def __init__(self, host='localhost', port=8765, queue_size: int = 256,
+                 flush_interval: float = 0.05, send_timeout: float = 5.0):
         self.host = host
         self.port = port
-        self.clients: Set[websockets.WebSocketServerProtocol] = set()
+        self.queue_size = queue_size
+        self.flush_interval = flush_interval
+        self.send_timeout = send_timeout
+        self.clients: Dict[Any, ClientSession] = {}
         self.running = False
         self.server = None
-        
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+
+        # Abonelik indeksleri
+        self.firehose: Set[ClientSession] = set()
+        self.symbol_subscribers: Dict[str, Set[ClientSession]] = {}
+        self.market_subscribers: Dict[str, Set[ClientSession]] = {}
+
+        # Sembol başına son fiyat durumu, sürüm, alanların son değiştiği sürüm ve
+        # (sembol sürümü, istemci sürümü) başına bir kez serileştirilmiş parçalar
+        self.prices: Dict[str, Dict[str, Any]] = {}
+        self.price_versions: Dict[str, int] = {}
+        self.field_versions: Dict[str, Dict[str, int]] = {}
+        self.symbol_markets: Dict[str, str] = {}
+        self._fragments: Dict[str, Tuple[int, Dict[int, str]]] = {}
+
+        self.stats = {'published': 0, 'serializations': 0, 'frames_sent': 0, 'bytes_sent': 0,
+                      'ticks_conflated': 0, 'messages_dropped': 0, 'slow_disconnects': 0}
+
+    # ------------------------------------------------------------------
+    # Bağlantı yaşam döngüsü
+    # ------------------------------------------------------------------
+
     async def register_client(self, websocket, path=None):
         """Yeni istemci kaydet"""
-        self.clients.add(websocket)
-        log_info(f"WebSocket istemci bağlandı: {websocket.remote_address}")
-        
+        self.loop = asyncio.get_running_loop()
+        session = ClientSession(websocket, self.queue_size)
+        self.clients[websocket] = session
+        self.firehose.add(session)
+        session.task = asyncio.create_task(self._sender(session))
+        log_info(f"WebSocket istemci bağlandı: {session.remote_address}")
+
         try:
             # Hoş geldin mesajı gönder
             welcome_msg = {
@@ -33,80 +98,275 @@ class WebSocketHandler:
                 "message": "PlanB Motoru WebSocket bağlantısı kuruldu",
                 "timestamp": datetime.now().isoformat()
             }
-            await websocket.send(json.dumps(welcome_msg))
-            
+            self._enqueue(session, _dumps(welcome_msg))
+
             # İstemci bağlantısını dinle
             async for message in websocket:
                 await self.handle_client_message(websocket, message)
-                
-        except websockets.exceptions.ConnectionClosed:
-            log_info(f"WebSocket istemci bağlantısı kapandı: {websocket.remote_address}")
+
+        except ConnectionClosed:
+            log_info(f"WebSocket istemci bağlantısı kapandı: {session.remote_address}")
         finally:
-            self.clients.remove(websocket)
-    
+            self._drop_client(session)
+
+    def _drop_client(self, session: ClientSession):
+        """İstemciyi indekslerden çıkar ve gönderici görevini durdur"""
+        self.clients.pop(session.websocket, None)
+        self.firehose.discard(session)
+        self._unsubscribe(session, session.symbols, session.markets)
+        if session.task and session.task is not asyncio.current_task():
+            session.task.cancel()
+
     async def handle_client_message(self, websocket, message):
         """İstemci mesajlarını işle"""
         try:
+            session = self.clients.get(websocket)
+            if session is None:
+                return
             data = json.loads(message)
             msg_type = data.get('type', 'unknown')
-            
-            if msg_type == 'subscribe':
-                # Belirli bir sembol için güncellemeleri dinle
-                symbol = data.get('symbol', '')
-                log_info(f"İstemci {symbol} için güncellemeleri dinlemeye başladı")
-                
-                # Abonelik onayı gönder
-                response = {
-                    "type": "subscription_confirmed",
-                    "symbol": symbol,
-                    "message": f"{symbol} için güncellemeler aktif",
-                    "timestamp": datetime.now().isoformat()
-                }
-                await websocket.send(json.dumps(response))
-                
+
+            if msg_type in ('subscribe', 'unsubscribe'):
+                # Sembol ve/veya piyasa aboneliği: {"symbol": ..} / {"symbols": [..]} / {"market(s)": ..}
+                symbols = self._as_set(data.get('symbols'), data.get('symbol'))
+                markets = self._as_set(data.get('markets'), data.get('market'))
+                if msg_type == 'subscribe':
+                    self._subscribe(session, symbols, markets)
+                    log_debug(f"İstemci abone oldu: {len(symbols)} sembol, {len(markets)} piyasa")
+                    response = {
+                        "type": "subscription_confirmed",
+                        "symbol": data.get('symbol', ''),
+                        "symbols": sorted(session.symbols),
+                        "markets": sorted(session.markets),
+                        "message": f"{len(session.symbols)} sembol, {len(session.markets)} piyasa için güncellemeler aktif",
+                        "timestamp": datetime.now().isoformat()
+                    }
+                else:
+                    self._unsubscribe(session, symbols, markets)
+                    response = {
+                        "type": "unsubscribed",
+                        "symbols": sorted(session.symbols),
+                        "markets": sorted(session.markets),
+                        "timestamp": datetime.now().isoformat()
+                    }
+                self._enqueue(session, _dumps(response))
+
             elif msg_type == 'ping':
                 # Ping-pong için
                 pong_response = {
                     "type": "pong",
                     "timestamp": datetime.now().isoformat()
                 }
-                await websocket.send(json.dumps(pong_response))
-                
+                self._enqueue(session, _dumps(pong_response))
+
         except json.JSONDecodeError:
             log_error("Geçersiz JSON mesajı alındı")
         except Exception as e:
             log_error(f"İstemci mesajı işlenirken hata: {e}")
-    
-    async def broadcast_update(self, update_data: Dict[str, Any]):
-        """Tüm bağlı istemcilere güncelleme gönder"""
+
+    @staticmethod
+    def _as_set(many: Optional[Iterable[str]], one: Optional[str]) -> Set[str]:
+        values = set(many or [])
+        if one:
+            values.add(one)
+        return values
+
+    def _subscribe(self, session: ClientSession, symbols: Set[str], markets: Set[str]):
+        """Abonelik ekle; ilk abonelikte tüm akış kapanır, mevcut fiyatlar anlık görüntü olarak gider"""
+        if symbols or markets:
+            session.firehose = False
+            self.firehose.discard(session)
+        for symbol in symbols:
+            session.symbols.add(symbol)
+            self.symbol_subscribers.setdefault(symbol, set()).add(session)
+        for market in markets:
+            session.markets.add(market)
+            self.market_subscribers.setdefault(market, set()).add(session)
+
+        initial = {s for s in symbols if s in self.prices}
+        initial.update(s for s, m in self.symbol_markets.items() if m in markets)
+        if initial:
+            session.dirty.update(initial)
+            session.wakeup.set()
+
+    def _unsubscribe(self, session: ClientSession, symbols: Iterable[str], markets: Iterable[str]):
+        for symbol in list(symbols):
+            session.symbols.discard(symbol)
+            subscribers = self.symbol_subscribers.get(symbol)
+            if subscribers is not None:
+                subscribers.discard(session)
+                if not subscribers:
+                    del self.symbol_subscribers[symbol]
+        for market in list(markets):
+            session.markets.discard(market)
+            subscribers = self.market_subscribers.get(market)
+            if subscribers is not None:
+                subscribers.discard(session)
+                if not subscribers:
+                    del self.market_subscribers[market]
+
+    # ------------------------------------------------------------------
+    # Yayın
+    # ------------------------------------------------------------------
+
+    def _on_loop(self) -> bool:
+        try:
+            return asyncio.get_running_loop() is self.loop
+        except RuntimeError:
+            return False
+
+    def _dispatch(self, func, *args):
+        """Sunucu loop'unda çalıştır; başka thread/loop'tan çağrıldıysa loop'a aktar"""
+        if self.loop is None or self._on_loop() or not self.loop.is_running():
+            func(*args)
+        else:
+            self.loop.call_soon_threadsafe(func, *args)
+
+    def _targets(self, symbol: Optional[str] = None, market: Optional[str] = None) -> Set[ClientSession]:
+        if symbol is None and market is None:
+            return set(self.clients.values())
+        targets = set(self.firehose)
+        if symbol is not None:
+            targets |= self.symbol_subscribers.get(symbol, set())
+        if market:
+            targets |= self.market_subscribers.get(market, set())
+        return targets
+
+    def _enqueue(self, session: ClientSession, frame: str):
+        if len(session.messages) == session.messages.maxlen:
+            session.dropped += 1
+            self.stats['messages_dropped'] += 1
+        session.messages.append(frame)
+        session.wakeup.set()
+
+    def publish(self, message: Dict[str, Any], symbol: Optional[str] = None, market: Optional[str] = None):
+        """Mesajı bir kez serileştirip ilgili istemcilerin kuyruklarına koy"""
+        self._dispatch(self._publish, message, symbol, market)
+
+    def _publish(self, message: Dict[str, Any], symbol: Optional[str], market: Optional[str]):
+        if not self.clients:
+            return
+        frame = _dumps(message)
+        self.stats['serializations'] += 1
+        self.stats['published'] += 1
+        for session in self._targets(symbol, market):
+            self._enqueue(session, frame)
+
+    def publish_price(self, symbol: str, price_data: Dict[str, Any], market: Optional[str] = None):
+        """Fiyat tikini sembol durumuna işle; abonelere delta olarak gidecek şekilde işaretle"""
+        self._dispatch(self._publish_price, symbol, price_data, market)
+
+    def _publish_price(self, symbol: str, price_data: Dict[str, Any], market: Optional[str]):
+        state = self.prices.setdefault(symbol, {})
+        changed = {field: value for field, value in price_data.items() if state.get(field) != value}
+        if not changed:
+            return
+        state.update(changed)
+        version = self.price_versions.get(symbol, 0) + 1
+        self.price_versions[symbol] = version
+        field_versions = self.field_versions.setdefault(symbol, {})
+        for field in changed:
+            field_versions[field] = version
+        market = market or price_data.get('market') or self.symbol_markets.get(symbol)
+        if market:
+            self.symbol_markets[symbol] = market
+        self.stats['published'] += 1
         if not self.clients:
             return
-            
-        message = json.dumps(update_data)
-        disconnected_clients = set()
-        
-        for client in self.clients:
-            try:
-                await client.send(message)
-            except websockets.exceptions.ConnectionClosed:
-                disconnected_clients.add(client)
-            except Exception as e:
-                log_error(f"İstemciye mesaj gönderilirken hata: {e}")
-                disconnected_clients.add(client)
-        
-        # Bağlantısı kopan istemcileri temizle
-        self.clients -= disconnected_clients
-    
+
+        for session in self._targets(symbol, market):
+            if symbol in session.dirty:
+                self.stats['ticks_conflated'] += 1
+            else:
+                session.dirty.add(symbol)
+            session.wakeup.set()
+
+    def _fragment(self, symbol: str, client_version: int) -> Optional[str]:
+        """İstemcinin gördüğü sürümden bu yana değişen alanlar (sürüm 0 ise tam durum)
+
+        Aynı sürümde bekleyen istemciler aynı parçayı paylaşır; parça bir kez serileştirilir.
+        """
+        version = self.price_versions.get(symbol, 0)
+        if client_version >= version:
+            return None
+        cached_version, fragments = self._fragments.get(symbol, (0, None))
+        if cached_version != version:
+            fragments = {}
+            self._fragments[symbol] = (version, fragments)
+        fragment = fragments.get(client_version)
+        if fragment is None:
+            state = self.prices[symbol]
+            if client_version:
+                state = {field: state[field] for field, changed_at in self.field_versions[symbol].items()
+                         if changed_at > client_version}
+            fragment = fragments[client_version] = f"{_dumps(symbol)}:{_dumps(state)}"
+            self.stats['serializations'] += 1
+        return fragment
+
+    def _price_frame(self, session: ClientSession) -> Optional[str]:
+        """Kirli semboller için toplu kare: ilk kez görülenler snapshot, diğerleri data (delta)"""
+        if not session.dirty:
+            return None
+        dirty, session.dirty = session.dirty, set()
+        deltas, snapshots = [], []
+        for symbol in dirty:
+            client_version = session.sent.get(symbol, 0)
+            fragment = self._fragment(symbol, client_version)
+            if fragment is None:
+                continue
+            (deltas if client_version else snapshots).append(fragment)
+            session.sent[symbol] = self.price_versions[symbol]
+        if not deltas and not snapshots:
+            return None
+        return (f'{{"type":"price_batch","timestamp":"{datetime.now().isoformat()}",'
+                f'"data":{{{",".join(deltas)}}},"snapshot":{{{",".join(snapshots)}}}}}')
+
+    async def _sender(self, session: ClientSession):
+        """İstemci başına gönderici: kuyruğu ve birleştirilmiş fiyatları sırayla yollar"""
+        websocket = session.websocket
+        try:
+            while True:
+                await session.wakeup.wait()
+                session.wakeup.clear()
+                if self.flush_interval:
+                    # Kısa bekleme: aynı anda gelen tikler tek karede birleşir
+                    await asyncio.sleep(self.flush_interval)
+                frames = list(session.messages)
+                session.messages.clear()
+                price_frame = self._price_frame(session)
+                if price_frame:
+                    frames.append(price_frame)
+                for frame in frames:
+                    await asyncio.wait_for(websocket.send(frame), self.send_timeout)
+                    self.stats['frames_sent'] += 1
+                    self.stats['bytes_sent'] += len(frame)
+        except asyncio.TimeoutError:
+            self.stats['slow_disconnects'] += 1
+            log_error(f"Yavaş WebSocket istemcisi kapatılıyor: {session.remote_address}")
+            await self._close_client(session)
+        except ConnectionClosed:
+            self._drop_client(session)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            log_error(f"İstemciye mesaj gönderilirken hata: {e}")
+            await self._close_client(session)
+
+    async def _close_client(self, session: ClientSession):
+        self._drop_client(session)
+        try:
+            await session.websocket.close()
+        except Exception:
+            pass
+
+    async def broadcast_update(self, update_data: Dict[str, Any]):
+        """Tüm bağlı istemcilere güncelleme gönder"""
+        self.publish(update_data)
+
     async def send_price_update(self, symbol: str, price_data: Dict[str, Any]):
-        """Fiyat güncellemesi gönder"""
-        update = {
-            "type": "price_update",
-            "symbol": symbol,
-            "data": price_data,
-            "timestamp": datetime.now().isoformat()
-        }
-        await self.broadcast_update(update)
-    
+        """Fiyat güncellemesi gönder (abonelere birleştirilmiş delta olarak)"""
+        self.publish_price(symbol, price_data)
+
     async def send_analysis_update(self, symbol: str, analysis_data: Dict[str, Any]):
         """Analiz güncellemesi gönder"""
         update = {
@@ -115,8 +375,8 @@ class WebSocketHandler:
             "data": analysis_data,
             "timestamp": datetime.now().isoformat()
         }
-        await self.broadcast_update(update)
-    
+        self.publish(update, symbol=symbol, market=self.symbol_markets.get(symbol))
+
     async def send_alert(self, alert_data: Dict[str, Any]):
         """Uyarı mesajı gönder"""
         update = {
@@ -124,11 +384,12 @@ class WebSocketHandler:
             "data": alert_data,
             "timestamp": datetime.now().isoformat()
         }
-        await self.broadcast_update(update)
-    
+        self.publish(update)
+
     async def start_server(self):
         """WebSocket sunucusunu başlat"""
         try:
+            self.loop = asyncio.get_running_loop()
             self.server = await websockets.serve(
                 self.register_client,
                 self.host,
@@ -136,20 +397,29 @@ class WebSocketHandler:
             )
             self.running = True
             log_info(f"WebSocket sunucusu başlatıldı: ws://{self.host}:{self.port}")
-            
+
             # Sunucuyu çalıştır
             await self.server.wait_closed()
-            
+
         except Exception as e:
             log_error(f"WebSocket sunucusu başlatılırken hata: {e}")
-    
+
     def stop_server(self):
         """WebSocket sunucusunu durdur"""
         self.running = False
         if self.server:
-            self.server.close()
+            self._dispatch(self.server.close)
         log_info("WebSocket sunucusu durduruldu")
 
+    def get_stats(self) -> Dict[str, Any]:
+        """Yayın istatistikleri"""
+        return {
+            **self.stats,
+            'clients': len(self.clients),
+            'firehose_clients': len(self.firehose),
+            'tracked_symbols': len(self.prices)
+        }
+
 # Global WebSocket handler instance
 websocket_handler = WebSocketHandler()
 
@@ -159,33 +429,33 @@ def start_websocket_server():
         loop = asyncio.new_event_loop()
         asyncio.set_event_loop(loop)
         loop.run_until_complete(websocket_handler.start_server())
-    
+
     thread = threading.Thread(target=run_server, daemon=True)
     thread.start()
     log_info("WebSocket sunucusu thread'de başlatıldı")
     return thread
 
 def send_price_update_sync(symbol: str, price_data: Dict[str, Any]):
-    """Senkron fiyat güncellemesi gönder"""
-    if websocket_handler.running and websocket_handler.clients:
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        loop.run_until_complete(websocket_handler.send_price_update(symbol, price_data))
-        loop.close()
+    """Senkron fiyat güncellemesi gönder (sunucu loop'una thread-safe aktarılır)"""
+    if websocket_handler.running:
+        websocket_handler.publish_price(symbol, price_data)
 
 def send_analysis_update_sync(symbol: str, analysis_data: Dict[str, Any]):
     """Senkron analiz güncellemesi gönder"""
     if websocket_handler.running and websocket_handler.clients:
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        loop.run_until_complete(websocket_handler.send_analysis_update(symbol, analysis_data))
-        loop.close()
+        update = {
+            "type": "analysis_update",
+            "symbol": symbol,
+            "data": analysis_data,
+            "timestamp": datetime.now().isoformat()
+        }
+        websocket_handler.publish(update, symbol=symbol)
 
 def send_alert_sync(alert_data: Dict[str, Any]):
     """Senkron uyarı gönder"""
     if websocket_handler.running and websocket_handler.clients:
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        loop.run_until_complete(websocket_handler.send_alert(alert_data))
-        loop.close()
-
+        websocket_handler.publish({
+            "type": "alert",
+            "data": alert_data,
+            "timestamp": datetime.now().isoformat()
+        })
@@ -0,0 +1,391 @@
+"""
+PlanB Motoru - Multi-timeframe Bar Aggregator
+1 dakikalık barları bir kez alıp 5m/15m/1h/4h/1d özetlerini artımlı olarak tutar
+Saatlik ve üstü kovalar sembolün pazar seansına göre yerel saatte hizalanır (1d yerel gece yarısı,
+gün içi dilimler seans açılışı; ör. BIST 4h: 10:00-14:00, 14:00-18:00)
+"""
+import threading
+import numpy as np
+import pandas as pd
+from typing import Dict, List, Optional, Any, Iterable
+from src.utils.logger import log_info, log_error, log_debug
+from src.data.market_sessions import MarketSession, get_session, market_for_symbol
+
+# Zaman dilimi -> saniye
+TIMEFRAME_SECONDS = {
+    '1m': 60,
+    '5m': 5 * 60,
+    '15m': 15 * 60,
+    '1h': 60 * 60,
+    '4h': 4 * 60 * 60,
+    '1d': 24 * 60 * 60
+}
+
+BAR_FIELDS = ('open', 'high', 'low', 'close', 'volume')
+
+
+class BarArray:
+    """Tek zaman dilimi için bitişik numpy dizileri (amortize O(1) ekleme)"""
+
+    def __init__(self, capacity: int = 1024, max_bars: Optional[int] = None):
+        self.capacity = max(int(capacity), 16)
+        self.max_bars = max_bars
+        self.length = 0
+        self.ts = np.empty(self.capacity, dtype=np.int64)
+        self.values = np.empty((self.capacity, len(BAR_FIELDS)), dtype=np.float64)
+
+    def __len__(self) -> int:
+        return self.length
+
+    def _reserve(self, extra: int):
+        """Gerekirse kapasiteyi ikiye katla veya eski barları at"""
+        needed = self.length + extra
+        if self.max_bars and needed > 2 * self.max_bars:
+            # Saklama sınırı: son max_bars barı başa kaydır
+            keep = max(self.max_bars - extra, 0)
+            if keep:
+                self.ts[:keep] = self.ts[self.length - keep:self.length]
+                self.values[:keep] = self.values[self.length - keep:self.length]
+            self.length = keep
+            needed = self.length + extra
+        if needed <= self.capacity:
+            return
+        new_capacity = self.capacity
+        while new_capacity < needed:
+            new_capacity *= 2
+        ts = np.empty(new_capacity, dtype=np.int64)
+        values = np.empty((new_capacity, len(BAR_FIELDS)), dtype=np.float64)
+        ts[:self.length] = self.ts[:self.length]
+        values[:self.length] = self.values[:self.length]
+        self.ts, self.values, self.capacity = ts, values, new_capacity
+
+    @property
+    def last_ts(self) -> Optional[int]:
+        return int(self.ts[self.length - 1]) if self.length else None
+
+    def append(self, ts: int, o: float, h: float, l: float, c: float, v: float):
+        """Yeni bar ekle"""
+        self._reserve(1)
+        self.ts[self.length] = ts
+        self.values[self.length] = (o, h, l, c, v)
+        self.length += 1
+
+    def merge_last(self, h: float, l: float, c: float, v: float):
+        """Açık barı yeni alt bar ile güncelle"""
+        row = self.values[self.length - 1]
+        if h > row[1]:
+            row[1] = h
+        if l < row[2]:
+            row[2] = l
+        row[3] = c
+        row[4] += v
+
+    def extend(self, ts: np.ndarray, values: np.ndarray):
+        """Toplu bar ekle"""
+        if self.max_bars and len(ts) > self.max_bars:
+            ts, values = ts[-self.max_bars:], values[-self.max_bars:]
+        n = len(ts)
+        if n == 0:
+            return
+        self._reserve(n)
+        self.ts[self.length:self.length + n] = ts
+        self.values[self.length:self.length + n] = values
+        self.length += n
+
+    def to_frame(self, tz: Optional[str] = None, last_n: Optional[int] = None) -> pd.DataFrame:
+        """Diziyi DatetimeIndex'li OHLCV DataFrame'e çevir (kopya)"""
+        start = max(self.length - last_n, 0) if last_n else 0
+        index = pd.to_datetime(self.ts[start:self.length], unit='s')
+        if tz:
+            index = index.tz_localize('UTC').tz_convert(tz)
+        index.name = 'timestamp'
+        return pd.DataFrame(self.values[start:self.length].copy(), index=index, columns=list(BAR_FIELDS))
+
+
+def utc_offsets(ts: np.ndarray, timezone: str) -> np.ndarray:
+    """Epoch saniyelerin verilen saat dilimindeki UTC farkı (saniye, yaz saati dahil)"""
+    if timezone == 'UTC':
+        return np.zeros(len(ts), dtype=np.int64)
+    local = pd.to_datetime(ts, unit='s').tz_localize('UTC').tz_convert(timezone).tz_localize(None)
+    return local.values.astype('datetime64[s]').astype(np.int64) - ts
+
+
+def session_anchor(session: MarketSession, seconds: int) -> int:
+    """Yerel saatte kova hizası: 1d gece yarısı, gün içi dilimler seans açılışı"""
+    if seconds >= 86400:
+        return 0
+    return (session.open.hour * 3600 + session.open.minute * 60) % seconds
+
+
+def bucket_starts(ts: np.ndarray, seconds: int, session: Optional[MarketSession] = None) -> np.ndarray:
+    """Barların kova başlangıçları (UTC epoch); seans verilmezse UTC epoch'a hizalanır"""
+    if session is None or seconds < TIMEFRAME_SECONDS['1h']:
+        return ts - ts % seconds
+    offsets = utc_offsets(ts, session.timezone)
+    local = ts + offsets
+    return local - (local - session_anchor(session, seconds)) % seconds - offsets
+
+
+def rollup_arrays(ts: np.ndarray, values: np.ndarray, seconds: int,
+                  session: Optional[MarketSession] = None):
+    """Sıralı 1m barları verilen zaman dilimine topla (resample'sız, reduceat ile)"""
+    if len(ts) == 0:
+        return ts[:0], values[:0]
+    buckets = bucket_starts(ts, seconds, session)
+    starts = np.concatenate(([0], np.flatnonzero(np.diff(buckets)) + 1))
+    ends = np.concatenate((starts[1:], [len(ts)])) - 1
+    out = np.empty((len(starts), len(BAR_FIELDS)), dtype=np.float64)
+    out[:, 0] = values[starts, 0]
+    out[:, 1] = np.maximum.reduceat(values[:, 1], starts)
+    out[:, 2] = np.minimum.reduceat(values[:, 2], starts)
+    out[:, 3] = values[ends, 3]
+    out[:, 4] = np.add.reduceat(values[:, 4], starts)
+    return buckets[starts], out
+
+
+def frame_to_arrays(df: pd.DataFrame):
+    """OHLCV DataFrame'i (epoch saniye, değer matrisi) çiftine çevir"""
+    frame = df
+    if isinstance(frame.columns, pd.MultiIndex):
+        # yfinance tek sembol indirmesi (Price, Ticker) sütunları
+        frame = frame.droplevel(-1, axis=1)
+    frame = frame.rename(columns=lambda c: str(c).lower())
+    if 'timestamp' in frame.columns:
+        index = pd.DatetimeIndex(pd.to_datetime(frame['timestamp']))
+    else:
+        index = pd.DatetimeIndex(frame.index)
+    tz = str(index.tz) if index.tz is not None else None
+    if tz:
+        index = index.tz_convert('UTC').tz_localize(None)
+    ts = index.values.astype('datetime64[s]').astype(np.int64)
+    close = frame['close'].to_numpy(dtype=np.float64)
+    values = np.column_stack([
+        frame['open'].to_numpy(dtype=np.float64) if 'open' in frame else close,
+        frame['high'].to_numpy(dtype=np.float64) if 'high' in frame else close,
+        frame['low'].to_numpy(dtype=np.float64) if 'low' in frame else close,
+        close,
+        frame['volume'].to_numpy(dtype=np.float64) if 'volume' in frame else np.zeros(len(close))
+    ])
+    valid = ~np.isnan(values[:, 3])
+    ts, values = ts[valid], values[valid]
+    order = np.argsort(ts, kind='stable')
+    return ts[order], values[order], tz
+
+
+class SymbolBars:
+    """Bir sembolün tüm zaman dilimlerindeki barları"""
+
+    def __init__(self, timeframes: Iterable[str], max_bars: Optional[int] = None,
+                 session: Optional[MarketSession] = None):
+        self.timeframes = list(timeframes)
+        self.arrays = {tf: BarArray(max_bars=max_bars) for tf in self.timeframes}
+        self.tz = None
+        self.session = session
+        self.lock = threading.Lock()
+        # Akış yolunda UTC farkı saat başına bir kez hesaplanır
+        self._offset_hour = None
+        self._offset = 0
+
+    def _bucket(self, ts: int, seconds: int) -> int:
+        """Tek barın kova başlangıcı (bucket_starts ile aynı hiza)"""
+        if self.session is None or seconds < TIMEFRAME_SECONDS['1h']:
+            return ts - ts % seconds
+        hour = ts // 3600
+        if hour != self._offset_hour:
+            self._offset_hour = hour
+            self._offset = int(utc_offsets(np.array([ts], dtype=np.int64), self.session.timezone)[0])
+        local = ts + self._offset
+        return local - (local - session_anchor(self.session, seconds)) % seconds - self._offset
+
+    def append_bar(self, ts: int, o: float, h: float, l: float, c: float, v: float) -> bool:
+        """Yeni 1m barı tüm özetlere işle; sıra dışı/tekrarlı barları atla"""
+        base = self.arrays['1m']
+        last = base.last_ts
+        if last is not None and ts <= last:
+            return False
+        for tf in self.timeframes:
+            array = self.arrays[tf]
+            bucket = self._bucket(ts, TIMEFRAME_SECONDS[tf])
+            if array.length and array.last_ts == bucket:
+                array.merge_last(h, l, c, v)
+            else:
+                array.append(bucket, o, h, l, c, v)
+        return True
+
+    def revise_last_bar(self, ts: int, o: float, h: float, l: float, c: float, v: float) -> bool:
+        """Oluşmakta olan son 1m barı yerinde değiştir; açık üst kovalar 1m barlardan yeniden hesaplanır"""
+        base = self.arrays['1m']
+        if not base.length or base.last_ts != ts:
+            return False
+        old_volume = base.values[base.length - 1, 4]
+        base.values[base.length - 1] = (o, h, l, c, v)
+        minute_ts = base.ts[:base.length]
+        for tf in self.timeframes:
+            if tf == '1m':
+                continue
+            array = self.arrays[tf]
+            bucket = self._bucket(ts, TIMEFRAME_SECONDS[tf])
+            if not array.length or array.last_ts != bucket:
+                continue
+            row = array.values[array.length - 1]
+            if minute_ts[0] > bucket:
+                # Kovanın başı saklama sınırıyla atılmış: eldeki toplamı güncelle
+                row[1], row[2], row[3] = max(row[1], h), min(row[2], l), c
+                row[4] += v - old_volume
+                continue
+            minutes = base.values[int(np.searchsorted(minute_ts, bucket)):base.length]
+            row[:] = (minutes[0, 0], minutes[:, 1].max(), minutes[:, 2].min(), minutes[-1, 3], minutes[:, 4].sum())
+        return True
+
+    def extend_bars(self, ts: np.ndarray, values: np.ndarray) -> int:
+        """Sıralı 1m bar bloğunu vektörel olarak tüm özetlere işle"""
+        last = self.arrays['1m'].last_ts
+        if last is not None:
+            mask = ts > last
+            ts, values = ts[mask], values[mask]
+        if len(ts) == 0:
+            return 0
+        # Aynı dakikaya düşen tekrarları at
+        keep = np.concatenate(([True], np.diff(ts) > 0))
+        ts, values = ts[keep], values[keep]
+        for tf in self.timeframes:
+            array = self.arrays[tf]
+            bucket_ts, bucket_values = rollup_arrays(ts, values, TIMEFRAME_SECONDS[tf], self.session)
+            if array.length and array.last_ts == bucket_ts[0]:
+                first = bucket_values[0]
+                array.merge_last(first[1], first[2], first[3], first[4])
+                bucket_ts, bucket_values = bucket_ts[1:], bucket_values[1:]
+            array.extend(bucket_ts, bucket_values)
+        return len(ts)
+
+
+class BarAggregator:
+    """Sembol bazında paylaşılan multi-timeframe bar deposu"""
+
+    def __init__(self, timeframes: Optional[List[str]] = None, max_bars: Optional[int] = 5000,
+                 anchor_sessions: bool = True):
+        self.timeframes = timeframes or list(TIMEFRAME_SECONDS.keys())
+        if '1m' not in self.timeframes:
+            self.timeframes = ['1m'] + self.timeframes
+        self.max_bars = max_bars
+        self.anchor_sessions = anchor_sessions
+        self.symbols: Dict[str, SymbolBars] = {}
+        self.lock = threading.Lock()
+        log_info(f"Bar aggregator başlatıldı: {', '.join(self.timeframes)}")
+
+    def _get_symbol(self, symbol: str) -> SymbolBars:
+        bars = self.symbols.get(symbol)
+        if bars is None:
+            with self.lock:
+                bars = self.symbols.get(symbol)
+                if bars is None:
+                    session = get_session(market_for_symbol(symbol)) if self.anchor_sessions else None
+                    bars = SymbolBars(self.timeframes, self.max_bars, session)
+                    self.symbols[symbol] = bars
+        return bars
+
+    def has_symbol(self, symbol: str) -> bool:
+        """Sembol için veri var mı"""
+        bars = self.symbols.get(symbol)
+        return bars is not None and len(bars.arrays['1m']) > 0
+
+    def ingest_bar(self, symbol: str, timestamp: Any, open_price: float, high: float,
+                   low: float, close: float, volume: float = 0.0, revision: bool = False) -> bool:
+        """Akıştan gelen tek 1m barı işle; revision=True oluşmakta olan son barı yerinde günceller"""
+        try:
+            ts = pd.Timestamp(timestamp)
+            bars = self._get_symbol(symbol)
+            if ts.tzinfo is not None:
+                if bars.tz is None:
+                    bars.tz = str(ts.tz)
+                ts = ts.tz_convert('UTC').tz_localize(None)
+            epoch = int(ts.to_datetime64().astype('datetime64[s]').astype(np.int64))
+            with bars.lock:
+                if revision:
+                    return bars.revise_last_bar(epoch, float(open_price), float(high), float(low),
+                                                float(close), float(volume))
+                return bars.append_bar(epoch, float(open_price), float(high), float(low),
+                                       float(close), float(volume))
+        except Exception as e:
+            log_error(f"Bar işleme hatası {symbol}: {e}")
+            return False
+
+    def ingest_frame(self, symbol: str, df: pd.DataFrame) -> int:
+        """1m OHLCV DataFrame'ini toplu olarak işle, eklenen bar sayısını döndür"""
+        try:
+            if df is None or df.empty:
+                return 0
+            ts, values, tz = frame_to_arrays(df)
+            bars = self._get_symbol(symbol)
+            with bars.lock:
+                if tz and bars.tz is None:
+                    bars.tz = tz
+                added = bars.extend_bars(ts, values)
+            log_debug(f"{symbol}: {added} bar eklendi")
+            return added
+        except Exception as e:
+            log_error(f"Bar bloğu işleme hatası {symbol}: {e}")
+            return 0
+
+    def load_from_cache(self, symbol: str, period: str = "5d", ttl: int = 300) -> int:
+        """resilient_loader_v2 parquet cache'inden 1m barları yükle"""
+        try:
+            from resilient_loader_v2 import cached_download
+            df = cached_download(symbol, period=period, interval="1m", ttl=ttl)
+            return self.ingest_frame(symbol, df)
+        except Exception as e:
+            log_error(f"Cache'den bar yükleme hatası {symbol}: {e}")
+            return 0
+
+    def get_timeframe_data(self, symbol: str, timeframes: Optional[List[str]] = None,
+                           last_n: Optional[int] = None) -> Dict[str, pd.DataFrame]:
+        """MultiTimeframeCharts formatında {timeframe: DataFrame} sözlüğü döndür"""
+        bars = self.symbols.get(symbol)
+        if bars is None:
+            return {}
+        with bars.lock:
+            return {
+                tf: bars.arrays[tf].to_frame(bars.tz, last_n)
+                for tf in (timeframes or self.timeframes)
+                if tf in bars.arrays and len(bars.arrays[tf])
+            }
+
+    def get_latest_bar(self, symbol: str, timeframe: str = '1m') -> Optional[Dict[str, Any]]:
+        """Son (açık olabilir) barı döndür"""
+        bars = self.symbols.get(symbol)
+        if bars is None or timeframe not in bars.arrays:
+            return None
+        with bars.lock:
+            array = bars.arrays[timeframe]
+            if not len(array):
+                return None
+            row = array.values[array.length - 1]
+            bar = dict(zip(BAR_FIELDS, row.tolist()))
+            bar['timestamp'] = pd.Timestamp(array.last_ts, unit='s')
+            return bar
+
+    def clear(self, symbol: str = None):
+        """Sembol ya da tüm depo verisini temizle"""
+        with self.lock:
+            if symbol:
+                self.symbols.pop(symbol, None)
+            else:
+                self.symbols.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Depo istatistikleri"""
+        total_bars = sum(len(b.arrays['1m']) for b in self.symbols.values())
+        memory = sum(
+            a.ts.nbytes + a.values.nbytes
+            for b in self.symbols.values() for a in b.arrays.values()
+        )
+        return {
+            'symbols': len(self.symbols),
+            'timeframes': self.timeframes,
+            'total_1m_bars': total_bars,
+            'memory_mb': round(memory / 1024 / 1024, 2)
+        }
+
+
+# Global bar aggregator instance
+bar_aggregator = BarAggregator()
@@ -0,0 +1,88 @@
+"""
+PlanB Motoru - Piyasa Seansları
+Pazar bazında yerel saat dilimi ve seans saatleri; sembolden pazar tespiti (resmi tatiller hesaba katılmaz)
+"""
+from dataclasses import dataclass
+from datetime import date, datetime, time, timedelta
+from typing import Optional, Tuple
+
+import pandas as pd
+
+
+@dataclass(frozen=True)
+class MarketSession:
+    """Bir pazarın yerel seans saatleri; open == close tam gün işlem demektir"""
+    timezone: str
+    open: time
+    close: time
+    weekdays: Tuple[int, ...] = (0, 1, 2, 3, 4)
+
+    @property
+    def all_day(self) -> bool:
+        return self.open == self.close
+
+
+MARKET_SESSIONS = {
+    'BIST': MarketSession('Europe/Istanbul', time(10, 0), time(18, 0)),
+    'NASDAQ': MarketSession('America/New_York', time(9, 30), time(16, 0)),
+    'XETRA': MarketSession('Europe/Berlin', time(9, 0), time(17, 30)),
+    'EMTIA': MarketSession('America/New_York', time(0, 0), time(0, 0)),
+    'CRYPTO': MarketSession('UTC', time(0, 0), time(0, 0), tuple(range(7))),
+}
+
+
+def market_for_symbol(symbol: str) -> str:
+    """Sembolün pazarı (yfinance/Binance son ekine göre)"""
+    if symbol.endswith('.IS'):
+        return 'BIST'
+    if symbol.endswith('.DE'):
+        return 'XETRA'
+    if symbol.endswith('-USD') or symbol.endswith('USDT'):
+        return 'CRYPTO'
+    if '=F' in symbol:
+        return 'EMTIA'
+    return 'NASDAQ'
+
+
+def get_session(market: str) -> MarketSession:
+    return MARKET_SESSIONS.get((market or '').upper(), MARKET_SESSIONS['NASDAQ'])
+
+
+def _local(session: MarketSession, now: Optional[datetime]) -> pd.Timestamp:
+    """now'ı pazarın yerel saatine çevir (tz'siz değerler UTC kabul edilir)"""
+    stamp = pd.Timestamp.now(tz='UTC') if now is None else pd.Timestamp(now)
+    if stamp.tzinfo is None:
+        stamp = stamp.tz_localize('UTC')
+    return stamp.tz_convert(session.timezone)
+
+
+def latest_session(market: str, now: Optional[datetime] = None) -> Tuple[date, bool]:
+    """Başlamış en son seansın yerel tarihi ve seansın hâlâ açık olup olmadığı"""
+    session = get_session(market)
+    local = _local(session, now)
+    day = local.date()
+    if day.weekday() in session.weekdays and local.time() >= session.open:
+        return day, session.all_day or local.time() < session.close
+    day -= timedelta(days=1)
+    while day.weekday() not in session.weekdays:
+        day -= timedelta(days=1)
+    return day, False
+
+
+def next_session_open(market: str, now: Optional[datetime] = None) -> pd.Timestamp:
+    """now'dan sonraki ilk seans açılışı (UTC)"""
+    session = get_session(market)
+    local = _local(session, now)
+    for offset in range(8):
+        day = local.date() + timedelta(days=offset)
+        if day.weekday() not in session.weekdays:
+            continue
+        opening = pd.Timestamp(datetime.combine(day, session.open)).tz_localize(session.timezone)
+        if opening > local:
+            return opening.tz_convert('UTC')
+    return (local + pd.Timedelta(days=1)).tz_convert('UTC')
+
+
+def local_date(timestamp, market: str) -> date:
+    """Zaman damgasının pazar yerel tarihi (tz'siz değerler UTC kabul edilir)"""
+    return _local(get_session(market), timestamp).date()
@@ -0,0 +1,377 @@
+"""
+PlanB Motoru - Streaming Intraday Ingestion
+Sembol bazında ring buffer tutan, sadece yeni barları çeken ve abonelere yayınlayan asyncio servisi
+"""
+import asyncio
+import inspect
+import os
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, asdict
+from datetime import datetime
+from typing import Dict, List, Optional, Any, Callable, Iterable
+import pandas as pd
+from src.utils.logger import log_info, log_error, log_debug, log_warning
+
+
+@dataclass
+class BarEvent:
+    """Yeni bar olayı"""
+    symbol: str
+    timestamp: datetime
+    open: float
+    high: float
+    low: float
+    close: float
+    volume: float
+    previous_close: Optional[float] = None
+    market: str = ""
+    revision: bool = False          # oluşmakta olan barın güncellenmiş hali (aynı zaman damgası)
+    previous_volume: float = 0.0    # revizyonda bu dakika için daha önce yayınlanan hacim
+
+    @property
+    def volume_delta(self) -> float:
+        return self.volume - self.previous_volume
+
+    @property
+    def change_percent(self) -> float:
+        if not self.previous_close:
+            return 0.0
+        return (self.close - self.previous_close) / self.previous_close * 100
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = asdict(self)
+        data['timestamp'] = pd.Timestamp(self.timestamp).isoformat()
+        data['change_percent'] = round(self.change_percent, 4)
+        return data
+
+
+def _frame_to_events(symbol: str, df: pd.DataFrame, since: Optional[pd.Timestamp]) -> List[BarEvent]:
+    """OHLCV DataFrame'inden since ve sonrası barları olaya çevir (since barı oluşmakta olabilir)"""
+    if df is None or df.empty:
+        return []
+    frame = df
+    if isinstance(frame.columns, pd.MultiIndex):
+        frame = frame.droplevel(-1, axis=1)
+    frame = frame.rename(columns=lambda c: str(c).lower())
+    if 'timestamp' in frame.columns:
+        frame = frame.set_index('timestamp')
+    if since is not None:
+        frame = frame[frame.index >= since]
+    events = []
+    for ts, o, h, l, c, v in zip(frame.index, frame['open'], frame['high'], frame['low'],
+                                 frame['close'], frame['volume'] if 'volume' in frame else [0.0] * len(frame)):
+        if pd.isna(c):
+            continue
+        events.append(BarEvent(symbol, ts, float(o), float(h), float(l), float(c),
+                               0.0 if pd.isna(v) else float(v)))
+    return events
+
+
+class YFinanceDeltaSource:
+    """Yahoo Finance 1m kaynağı - sadece son bardan sonrasını ister"""
+
+    def __init__(self, lookback_period: str = "1d", interval: str = "1m"):
+        self.lookback_period = lookback_period
+        self.interval = interval
+
+    def _download(self, symbol: str, since: Optional[pd.Timestamp]) -> pd.DataFrame:
+        import yfinance as yf
+        ticker = yf.Ticker(symbol)
+        if since is None:
+            return ticker.history(period=self.lookback_period, interval=self.interval)
+        return ticker.history(start=since.to_pydatetime(), interval=self.interval)
+
+    async def fetch(self, symbol: str, since: Optional[pd.Timestamp]) -> List[BarEvent]:
+        """Bloklayan yfinance çağrısını executor'da çalıştır"""
+        loop = asyncio.get_running_loop()
+        df = await loop.run_in_executor(None, self._download, symbol, since)
+        return _frame_to_events(symbol, df, since)
+
+
+class ReplayFeedSource:
+    """Yerel, tekrar oynatılabilir bar akışı (testler ve geriye dönük çalıştırma için)"""
+
+    def __init__(self, frames: Dict[str, pd.DataFrame], bars_per_poll: int = 1):
+        self.bars_per_poll = bars_per_poll
+        self.events = {symbol: _frame_to_events(symbol, df, None) for symbol, df in frames.items()}
+        self.positions = {symbol: 0 for symbol in self.events}
+
+    @classmethod
+    def from_directory(cls, directory: str, bars_per_poll: int = 1) -> 'ReplayFeedSource':
+        """<SEMBOL>.parquet / <SEMBOL>.csv dosyalarından akış oluştur"""
+        frames = {}
+        for file_name in sorted(os.listdir(directory)):
+            path = os.path.join(directory, file_name)
+            symbol, ext = os.path.splitext(file_name)
+            if ext == '.parquet':
+                frames[symbol] = pd.read_parquet(path)
+            elif ext == '.csv':
+                frames[symbol] = pd.read_csv(path, index_col=0, parse_dates=True)
+        return cls(frames, bars_per_poll)
+
+    @property
+    def exhausted(self) -> bool:
+        return all(self.positions[s] >= len(e) for s, e in self.events.items())
+
+    def reset(self):
+        """Akışı başa sar"""
+        self.positions = {symbol: 0 for symbol in self.events}
+
+    async def fetch(self, symbol: str, since: Optional[pd.Timestamp]) -> List[BarEvent]:
+        events = self.events.get(symbol, [])
+        start = self.positions.get(symbol, 0)
+        batch = events[start:start + self.bars_per_poll]
+        self.positions[symbol] = start + len(batch)
+        return batch
+
+
+class StreamIngestionService:
+    """Intraday bar akışını besleyen ve abonelere dağıtan servis"""
+
+    def __init__(self, source=None, symbols: Iterable[str] = None, buffer_size: int = 500,
+                 poll_interval: float = 15.0, max_concurrency: int = 8,
+                 max_requests_per_second: Optional[float] = None):
+        self.source = source or YFinanceDeltaSource()
+        self.symbols: List[str] = list(symbols or [])
+        self.buffer_size = buffer_size
+        self.poll_interval = poll_interval
+        self.max_concurrency = max_concurrency
+        # Kaynak istek sınırı: tur başına en fazla rps * poll_interval sembol, evren turlar arasında döner
+        self.max_requests_per_second = max_requests_per_second
+        self._cursor = 0
+        self._next_request_at = 0.0
+        self.buffers: Dict[str, deque] = {}
+        self.subscribers: List[Callable] = []
+        self.running = False
+        self.thread = None
+        self.loop = None
+        self.stats = {'cycles': 0, 'events': 0, 'revisions': 0, 'errors': 0, 'last_cycle_seconds': 0.0}
+
+    def set_symbols(self, symbols: Iterable[str]):
+        """İzlenen sembolleri değiştir; listeden çıkanların buffer'ı bırakılır"""
+        self.symbols = list(dict.fromkeys(symbols))
+        keep = set(self.symbols)
+        for symbol in [s for s in self.buffers if s not in keep]:
+            del self.buffers[symbol]
+
+    def add_symbols(self, symbols: Iterable[str]):
+        """İzlenen sembollere ekle"""
+        for symbol in symbols:
+            if symbol not in self.symbols:
+                self.symbols.append(symbol)
+
+    def subscribe(self, callback: Callable):
+        """Yeni bar olaylarına abone ol (senkron ya da async callback)"""
+        if callback not in self.subscribers:
+            self.subscribers.append(callback)
+
+    def unsubscribe(self, callback: Callable):
+        """Aboneliği kaldır"""
+        if callback in self.subscribers:
+            self.subscribers.remove(callback)
+
+    def _last_timestamp(self, symbol: str) -> Optional[pd.Timestamp]:
+        buffer = self.buffers.get(symbol)
+        return pd.Timestamp(buffer[-1].timestamp) if buffer else None
+
+    async def publish(self, event: BarEvent):
+        """Olayı tüm abonelere ilet; hatalı abone diğerlerini durdurmaz"""
+        for callback in list(self.subscribers):
+            try:
+                result = callback(event)
+                if inspect.isawaitable(result):
+                    await result
+            except Exception as e:
+                log_error(f"Stream abone hatası ({event.symbol}): {e}")
+
+    def _cycle_symbols(self) -> List[str]:
+        """Bu turda sorgulanacak semboller; hız sınırı varsa evrenin sıradaki dilimi"""
+        if not self.max_requests_per_second or not self.symbols:
+            return list(self.symbols)
+        budget = max(int(self.max_requests_per_second * self.poll_interval), 1)
+        if budget >= len(self.symbols):
+            return list(self.symbols)
+        start = self._cursor % len(self.symbols)
+        self._cursor = start + budget
+        return (self.symbols[start:] + self.symbols[:start])[:budget]
+
+    async def _throttle(self):
+        """İstekleri 1 / max_requests_per_second aralıkla başlat"""
+        if not self.max_requests_per_second:
+            return
+        now = time.monotonic()
+        slot = max(self._next_request_at, now)
+        self._next_request_at = slot + 1.0 / self.max_requests_per_second
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+    async def _poll_symbol(self, symbol: str, semaphore: asyncio.Semaphore) -> int:
+        async with semaphore:
+            await self._throttle()
+            try:
+                events = await self.source.fetch(symbol, self._last_timestamp(symbol))
+            except Exception as e:
+                self.stats['errors'] += 1
+                log_warning(f"Stream fetch hatası {symbol}: {e}")
+                return 0
+
+        buffer = self.buffers.setdefault(symbol, deque(maxlen=self.buffer_size))
+        published = 0
+        for event in events:
+            if buffer:
+                last = buffer[-1]
+                timestamp, last_timestamp = pd.Timestamp(event.timestamp), pd.Timestamp(last.timestamp)
+                if timestamp < last_timestamp:
+                    continue
+                if timestamp == last_timestamp:
+                    # Oluşmakta olan bar: değiştiyse buffer'da yerinde güncelle ve revizyon olarak yayınla
+                    if (event.high, event.low, event.close, event.volume) == (last.high, last.low,
+                                                                              last.close, last.volume):
+                        continue
+                    if event.previous_close is None:
+                        event.previous_close = last.previous_close
+                    event.revision = True
+                    event.previous_volume = last.volume
+                    buffer[-1] = event
+                    self.stats['revisions'] += 1
+                    await self.publish(event)
+                    published += 1
+                    continue
+                if event.previous_close is None:
+                    event.previous_close = last.close
+            buffer.append(event)
+            await self.publish(event)
+            published += 1
+        return published
+
+    async def poll_once(self) -> int:
+        """Bu turun sembolleri için tek delta turu"""
+        start = time.time()
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        counts = await asyncio.gather(*(self._poll_symbol(s, semaphore) for s in self._cycle_symbols()))
+        published = sum(counts)
+        self.stats['cycles'] += 1
+        self.stats['events'] += published
+        self.stats['last_cycle_seconds'] = round(time.time() - start, 3)
+        log_debug(f"Stream turu: {published} yeni bar, {self.stats['last_cycle_seconds']}s")
+        return published
+
+    async def run(self, max_cycles: Optional[int] = None):
+        """Servisi çalıştır; stop() çağrılana ya da max_cycles dolana kadar"""
+        self.running = True
+        log_info(f"Stream ingestion başladı: {len(self.symbols)} sembol, {self.poll_interval}s aralık, "
+                 f"en fazla {self.max_requests_per_second or '∞'} istek/s")
+        cycles = 0
+        try:
+            while self.running:
+                started = time.time()
+                await self.poll_once()
+                cycles += 1
+                if max_cycles is not None and cycles >= max_cycles:
+                    break
+                if getattr(self.source, 'exhausted', False):
+                    break
+                await asyncio.sleep(max(self.poll_interval - (time.time() - started), 0))
+        finally:
+            self.running = False
+            log_info("Stream ingestion durduruldu")
+
+    def start_in_thread(self) -> threading.Thread:
+        """Servisi ayrı thread'deki event loop'ta başlat"""
+        def run_service():
+            self.loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(self.loop)
+            self.loop.run_until_complete(self.run())
+            self.loop.close()
+
+        self.thread = threading.Thread(target=run_service, daemon=True)
+        self.thread.start()
+        return self.thread
+
+    def stop(self):
+        """Servisi durdur"""
+        self.running = False
+        if self.thread and self.thread is not threading.current_thread():
+            self.thread.join(timeout=self.poll_interval + 5)
+
+    def get_recent_bars(self, symbol: str, limit: Optional[int] = None) -> pd.DataFrame:
+        """Ring buffer'daki son barlar"""
+        buffer = self.buffers.get(symbol)
+        if not buffer:
+            return pd.DataFrame()
+        events = list(buffer)[-limit:] if limit else list(buffer)
+        df = pd.DataFrame([
+            {'timestamp': e.timestamp, 'open': e.open, 'high': e.high, 'low': e.low,
+             'close': e.close, 'volume': e.volume}
+            for e in events
+        ])
+        return df.set_index('timestamp')
+
+    def get_last_bar(self, symbol: str) -> Optional[BarEvent]:
+        """Sembolün son barı"""
+        buffer = self.buffers.get(symbol)
+        return buffer[-1] if buffer else None
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Servis istatistikleri"""
+        return {
+            **self.stats,
+            'symbols': len(self.symbols),
+            'buffered_symbols': len(self.buffers),
+            'subscribers': len(self.subscribers),
+            'max_requests_per_second': self.max_requests_per_second,
+            'running': self.running
+        }
+
+
+def alert_manager_subscriber(manager=None) -> Callable:
+    """AlertManager fiyat uyarılarını her yeni barda kontrol eden abone"""
+    if manager is None:
+        from src.alerts.alert_manager import alert_manager as manager
+
+    def on_bar(event: BarEvent):
+        price_data = {'volume': event.volume, 'timestamp': pd.Timestamp(event.timestamp).isoformat()}
+        if event.previous_close:
+            price_data['previous_price'] = event.previous_close
+        manager.check_price_alert(event.symbol, event.close, price_data)
+
+    return on_bar
+
+
+def websocket_subscriber(handler=None) -> Callable:
+    """Dashboard WebSocket istemcilerine fiyat güncellemesi yayınlayan abone"""
+    if handler is None:
+        from src.dashboard.websocket_handler import websocket_handler as handler
+
+    async def on_bar(event: BarEvent):
+        if handler.running:
+            # İstemci yokken de son durum tutulur; yeni abonelere anlık görüntü olarak gider
+            await handler.send_price_update(event.symbol, event.to_dict())
+
+    return on_bar
+
+
+def aggregator_subscriber(aggregator=None) -> Callable:
+    """Multi-timeframe bar aggregator'ı besleyen abone"""
+    if aggregator is None:
+        from src.data.bar_aggregator import bar_aggregator as aggregator
+
+    def on_bar(event: BarEvent):
+        aggregator.ingest_bar(event.symbol, event.timestamp, event.open, event.high,
+                              event.low, event.close, event.volume, revision=event.revision)
+
+    return on_bar
+
+
+def watchlist_subscriber(manager=None) -> Callable:
+    """İzleme listesi fiyat tablosunu ve liste toplamlarını artımlı güncelleyen abone"""
+    if manager is None:
+        from src.watchlist.watchlist_manager import watchlist_manager as manager
+
+    return manager.quotes.on_bar
+
+
+# Global stream ingestion instance
+stream_ingestion_service = StreamIngestionService()
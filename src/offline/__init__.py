@@ -3,7 +3,8 @@ PlanB Motoru - Offline Module
 Offline mod ve yedekleme modülleri
 """
 
+from .backup_store import BackupStore, ContentChunker
 from .offline_manager import OfflineManager, offline_manager
 
-__all__ = ['OfflineManager', 'offline_manager']
+__all__ = ['BackupStore', 'ContentChunker', 'OfflineManager', 'offline_manager']
 
@@ -0,0 +1,364 @@
+"""
+PlanB Motoru - Backup Store
+İçerik adresli, tekilleştirmeli ve artımlı yedek deposu
+"""
+import hashlib
+import json
+import os
+import shutil
+import struct
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, List, Optional, Any, BinaryIO, Iterator, Set
+
+import numpy as np
+import pyarrow as pa
+
+from src.utils.logger import log_info, log_error, log_debug
+
+# Parça başlığı: bayraklar + düz metin boyutu
+CHUNK_HEADER = struct.Struct(">BI")
+FLAG_COMPRESSED = 1
+FLAG_ENCRYPTED = 2
+
+# Gear tablosu sabit tohumla üretilir: aynı içerik her çalıştırmada aynı sınırlarda bölünür
+GEAR = np.random.default_rng(0x504C414E42).integers(0, 2 ** 32, 256, dtype=np.uint64).astype(np.uint32)
+
+
+class ContentChunker:
+    """İçerik tanımlı parçalama (kayan pencere toplamı, numpy ile vektörel)
+
+    Kesim noktası yalnızca son `window` bayta bağlıdır; dosyanın başına ekleme yapılsa da
+    sonraki parçalar aynı kalır ve tekrar yazılmaz.
+    """
+
+    def __init__(self, min_size: int = 16 * 1024, avg_size: int = 64 * 1024,
+                 max_size: int = 256 * 1024, window: int = 48):
+        if avg_size & (avg_size - 1):
+            raise ValueError("avg_size 2'nin kuvveti olmalı")
+        self.min_size = min_size
+        self.max_size = max_size
+        self.window = window
+        self.mask = np.uint32(avg_size - 1)
+
+    def cut_points(self, buffer: bytes, final: bool = False) -> List[int]:
+        """Tampondaki parça bitiş ofsetleri (final değilse kalan kuyruk kesilmez)"""
+        size = len(buffer)
+        if size == 0:
+            return []
+        data = np.frombuffer(buffer, dtype=np.uint8)
+        sums = np.cumsum(np.take(GEAR, data), dtype=np.uint32)
+        rolling = sums.copy()
+        rolling[self.window:] -= sums[:-self.window]
+        candidates = np.flatnonzero((rolling & self.mask) == 0) + 1
+
+        ends: List[int] = []
+        last = 0
+        while True:
+            low, high = last + self.min_size, last + self.max_size
+            index = np.searchsorted(candidates, low)
+            if index < len(candidates) and candidates[index] <= min(high, size):
+                end = int(candidates[index])
+            elif high <= size:
+                end = high
+            else:
+                break
+            ends.append(end)
+            last = end
+        if final and last < size:
+            ends.append(size)
+        return ends
+
+    def chunks(self, reader: BinaryIO, read_size: int = 8 * 1024 * 1024) -> Iterator[bytes]:
+        """Akışı sabit bellekle parçala"""
+        carry = b''
+        while True:
+            block = reader.read(read_size)
+            final = not block
+            buffer = carry + block
+            start = 0
+            for end in self.cut_points(buffer, final):
+                yield buffer[start:end]
+                start = end
+            carry = buffer[start:]
+            if final:
+                return
+
+
+class BackupStore:
+    """Snapshot başına manifest + paylaşılan parça deposu
+
+    - Dosyalar içerik tanımlı parçalara bölünür, parça kimliği SHA-256'dır; var olan parça yazılmaz.
+    - Önceki snapshot'taki boyutu ve mtime'ı aynı dosyalar okunmadan aynen alınır.
+    - Parçalar paralel sıkıştırılır (zstd) ve AES-GCM ile şifrelenir (parça kimliği doğrulama verisi).
+    - `snapshots/<ad>.json` yalnızca özet içerir; listeleme hiçbir şeyi çözmeden yapılır.
+    """
+
+    def __init__(self, root: str, cipher=None, compress: bool = True, encrypt: bool = True,
+                 workers: Optional[int] = None, chunker: Optional[ContentChunker] = None):
+        if cipher is None and encrypt:
+            from src.security.encryption_manager import encryption_manager
+            cipher = encryption_manager
+        self.root = root
+        self.cipher = cipher
+        self.compress = compress
+        self.encrypt = encrypt
+        self.workers = workers or min(4, os.cpu_count() or 1)
+        self.chunker = chunker or ContentChunker()
+        self.codec = pa.Codec('zstd')
+        self.chunks_dir = os.path.join(root, "chunks")
+        self.snapshots_dir = os.path.join(root, "snapshots")
+        os.makedirs(self.chunks_dir, exist_ok=True)
+        os.makedirs(self.snapshots_dir, exist_ok=True)
+
+    # ------------------------------------------------------------------
+    # Parçalar
+    # ------------------------------------------------------------------
+
+    def _chunk_path(self, digest: str) -> str:
+        return os.path.join(self.chunks_dir, digest[:2], digest)
+
+    def has_chunk(self, digest: str) -> bool:
+        return os.path.exists(self._chunk_path(digest))
+
+    def _seal(self, data: bytes, associated_data: bytes) -> bytes:
+        flags, payload = 0, data
+        if self.compress:
+            compressed = self.codec.compress(data, asbytes=True)
+            if len(compressed) < len(data):
+                flags, payload = flags | FLAG_COMPRESSED, compressed
+        if self.encrypt:
+            payload = self.cipher.encrypt_block(payload, associated_data)
+            if payload is None:
+                raise RuntimeError("Yedek parçası şifrelenemedi")
+            flags |= FLAG_ENCRYPTED
+        return CHUNK_HEADER.pack(flags, len(data)) + payload
+
+    def _open(self, sealed: bytes, associated_data: bytes) -> bytes:
+        flags, size = CHUNK_HEADER.unpack_from(sealed)
+        payload = sealed[CHUNK_HEADER.size:]
+        if flags & FLAG_ENCRYPTED:
+            payload = self.cipher.decrypt_block(payload, associated_data)
+            if payload is None:
+                raise ValueError("Yedek parçası doğrulanamadı")
+        if flags & FLAG_COMPRESSED:
+            payload = self.codec.decompress(payload, decompressed_size=size, asbytes=True)
+        return payload
+
+    def _write_atomic(self, path: str, data: bytes, sync: bool = False):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+            if sync:
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def _fsync_dir(path: str):
+        """Dizin girdilerini (rename/yeni dosya) diske yaz; desteklemeyen platformlarda atlanır"""
+        try:
+            fd = os.open(path, os.O_RDONLY)
+        except OSError:
+            return
+        try:
+            os.fsync(fd)
+        except OSError:
+            pass
+        finally:
+            os.close(fd)
+
+    def _store_chunk(self, digest: str, data: bytes) -> int:
+        # Parçalar manifest'ten önce kalıcı olmalı: çökmeden sonra manifest eksik parçaya işaret etmemeli
+        sealed = self._seal(data, digest.encode())
+        self._write_atomic(self._chunk_path(digest), sealed, sync=True)
+        return len(sealed)
+
+    def load_chunk(self, digest: str) -> bytes:
+        """Parçayı oku, çöz ve içerik özetini doğrula"""
+        with open(self._chunk_path(digest), 'rb') as f:
+            data = self._open(f.read(), digest.encode())
+        if hashlib.sha256(data).hexdigest() != digest:
+            raise ValueError(f"Yedek parçası bozuk: {digest}")
+        return data
+
+    # ------------------------------------------------------------------
+    # Snapshot oluşturma
+    # ------------------------------------------------------------------
+
+    def _summary_path(self, name: str) -> str:
+        return os.path.join(self.snapshots_dir, f"{name}.json")
+
+    def _files_path(self, name: str) -> str:
+        return os.path.join(self.snapshots_dir, f"{name}.files")
+
+    def has_snapshot(self, name: str) -> bool:
+        return os.path.exists(self._summary_path(name))
+
+    @staticmethod
+    def _walk(path: str) -> Iterator[tuple]:
+        if os.path.isfile(path):
+            yield path, os.path.basename(path)
+            return
+        for root, dirs, files in os.walk(path):
+            dirs.sort()
+            for filename in sorted(files):
+                full_path = os.path.join(root, filename)
+                yield full_path, os.path.relpath(full_path, path).replace(os.sep, '/')
+
+    def create_snapshot(self, name: str, sources: Dict[str, str],
+                        previous: Optional[str] = None) -> Dict[str, Any]:
+        """`sources` (önek -> dizin/dosya) içeriğini yeni snapshot olarak kaydet"""
+        if not name or '/' in name or name.startswith('.'):
+            raise ValueError(f"Geçersiz snapshot adı: {name}")
+        if self.has_snapshot(name):
+            raise ValueError(f"Snapshot zaten mevcut: {name}")
+        previous = previous or self.latest_snapshot()
+        previous_files = self.load_files(previous) if previous else {}
+
+        files: Dict[str, Dict[str, Any]] = {}
+        stats = {'files_reused': 0, 'chunks_total': 0, 'chunks_new': 0, 'bytes_read': 0, 'bytes_stored': 0}
+        queued: Set[str] = set()
+        chunk_dirs: Set[str] = set()
+        pending = deque()
+
+        def drain(limit: int):
+            while len(pending) > limit:
+                stats['bytes_stored'] += pending.popleft().result()
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            for prefix, source in sources.items():
+                if not os.path.exists(source):
+                    continue
+                for full_path, relative in self._walk(source):
+                    key = f"{prefix}/{relative}"
+                    stat = os.stat(full_path)
+                    known = previous_files.get(key)
+                    if known and known['size'] == stat.st_size and known['mtime_ns'] == stat.st_mtime_ns:
+                        files[key] = known
+                        stats['files_reused'] += 1
+                        stats['chunks_total'] += len(known['chunks'])
+                        continue
+
+                    digests = []
+                    with open(full_path, 'rb') as f:
+                        for chunk in self.chunker.chunks(f):
+                            digest = hashlib.sha256(chunk).hexdigest()
+                            digests.append(digest)
+                            stats['bytes_read'] += len(chunk)
+                            if digest in queued or self.has_chunk(digest):
+                                continue
+                            queued.add(digest)
+                            chunk_dirs.add(os.path.dirname(self._chunk_path(digest)))
+                            pending.append(executor.submit(self._store_chunk, digest, chunk))
+                            drain(self.workers * 4)
+                    files[key] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'chunks': digests}
+                    stats['chunks_total'] += len(digests)
+            drain(0)
+        stats['chunks_new'] = len(queued)
+        # Yeni parça dosyalarının dizin girdileri de dosya listesinden önce kalıcı olmalı
+        for directory in sorted(chunk_dirs) + ([self.chunks_dir] if chunk_dirs else []):
+            self._fsync_dir(directory)
+
+        # Önce dosya listesi, sonra özet: özet varsa snapshot eksiksizdir
+        listing = json.dumps(files, ensure_ascii=False).encode()
+        self._write_atomic(self._files_path(name), self._seal(listing, name.encode()), sync=True)
+        self._fsync_dir(self.snapshots_dir)
+        summary = {
+            'name': name,
+            'created_at': datetime.now().isoformat(),
+            'previous': previous,
+            'prefixes': sorted(sources),
+            'file_count': len(files),
+            'size_bytes': sum(entry['size'] for entry in files.values()),
+            'compressed': self.compress,
+            'encrypted': self.encrypt,
+            **stats,
+        }
+        self._write_atomic(self._summary_path(name), json.dumps(summary, indent=2).encode(), sync=True)
+        self._fsync_dir(self.snapshots_dir)
+        log_info(f"Snapshot oluşturuldu: {name} ({len(files)} dosya, {stats['chunks_new']} yeni parça, "
+                 f"{stats['bytes_stored'] / 1024 / 1024:.2f} MB yazıldı)")
+        return summary
+
+    # ------------------------------------------------------------------
+    # Listeleme, geri yükleme, doğrulama
+    # ------------------------------------------------------------------
+
+    def list_snapshots(self) -> List[Dict[str, Any]]:
+        """Snapshot özetleri (yeniden eskiye); parçalar ve dosya listeleri okunmaz"""
+        summaries = []
+        for filename in os.listdir(self.snapshots_dir):
+            if filename.endswith('.json'):
+                with open(os.path.join(self.snapshots_dir, filename), 'r', encoding='utf-8') as f:
+                    summaries.append(json.load(f))
+        summaries.sort(key=lambda summary: summary['created_at'], reverse=True)
+        return summaries
+
+    def latest_snapshot(self) -> Optional[str]:
+        snapshots = self.list_snapshots()
+        return snapshots[0]['name'] if snapshots else None
+
+    def load_files(self, name: str) -> Dict[str, Dict[str, Any]]:
+        with open(self._files_path(name), 'rb') as f:
+            return json.loads(self._open(f.read(), name.encode()))
+
+    def restore_snapshot(self, name: str, target_dir: str) -> int:
+        """Snapshot'ı `target_dir/<önek>/...` altına yaz; her parça özetiyle doğrulanır"""
+        files = self.load_files(name)
+
+        def restore_file(item) -> int:
+            key, entry = item
+            path = os.path.join(target_dir, *key.split('/'))
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, 'wb') as f:
+                for digest in entry['chunks']:
+                    f.write(self.load_chunk(digest))
+            if os.path.getsize(tmp_path) != entry['size']:
+                raise ValueError(f"Geri yüklenen dosya boyutu uyuşmuyor: {key}")
+            os.replace(tmp_path, path)
+            os.utime(path, ns=(entry['mtime_ns'], entry['mtime_ns']))
+            return entry['size']
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            restored = sum(executor.map(restore_file, files.items()))
+        log_info(f"Snapshot geri yüklendi: {name} ({len(files)} dosya)")
+        return restored
+
+    def verify_snapshot(self, name: str) -> List[str]:
+        """Snapshot'ın bozuk veya eksik parçaları (boş liste = sağlam)"""
+        digests = {digest for entry in self.load_files(name).values() for digest in entry['chunks']}
+
+        def check(digest: str) -> Optional[str]:
+            try:
+                self.load_chunk(digest)
+                return None
+            except (OSError, ValueError):
+                return digest
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            return sorted(d for d in executor.map(check, digests) if d)
+
+    def delete_snapshot(self, name: str):
+        for path in (self._summary_path(name), self._files_path(name)):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def gc(self) -> int:
+        """Hiçbir snapshot'ın kullanmadığı parçaları sil; silinen parça sayısı"""
+        referenced: Set[str] = set()
+        for summary in self.list_snapshots():
+            for entry in self.load_files(summary['name']).values():
+                referenced.update(entry['chunks'])
+        removed = 0
+        for bucket in os.listdir(self.chunks_dir):
+            bucket_dir = os.path.join(self.chunks_dir, bucket)
+            for digest in os.listdir(bucket_dir):
+                if digest not in referenced:
+                    os.remove(os.path.join(bucket_dir, digest))
+                    removed += 1
+        log_debug(f"Yedek deposu temizlendi: {removed} parça silindi")
+        return removed
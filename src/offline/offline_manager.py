@@ -5,20 +5,41 @@ Offline mod ve lokal yedekleme yönetimi
 import json
 import os
 import shutil
+import sqlite3
 import zipfile
 from typing import Dict, List, Optional, Any
 from datetime import datetime, timedelta
 from src.utils.logger import log_info, log_error, log_debug
 from src.security.encryption_manager import encryption_manager
+from src.storage.document_store import DocumentStore, document_store, migrate_json_file
+from src.offline.backup_store import BackupStore
 
 class OfflineManager:
     """Offline mod ve lokal yedekleme yöneticisi"""
     
-    def __init__(self):
+    STORE_BACKUP_NAME = "store/planb_store.db"
+    
+    # Snapshot'a alınan veri dizinleri ve SQLite dosyaları
+    DATA_DIRECTORIES = [
+        'data/portfolios',
+        'data/analyses',
+        'data/users',
+        'data/watchlists',
+        'data/alerts',
+        'data/personal_data_lake',
+        'data/macro',
+        'data/cache',
+        'data/yf_cache'
+    ]
+    DATABASE_FILES = ['data/analiz_gecmisi.db']
+    
+    def __init__(self, store: DocumentStore = None):
+        self.store = store or document_store
         self.offline_directory = "data/offline"
         self.backup_directory = "data/backups"
         self.cache_directory = "data/cache"
         self._ensure_directories()
+        self.backup_store = BackupStore(self.backup_directory)
         
         # Offline mod durumu
         self.is_offline_mode = False
@@ -33,6 +54,24 @@ class OfflineManager:
             'compress_backups': True,
             'encrypt_backups': True
         }
+        
+        # Offline veri tipi başına tek doküman; durum tek anahtar
+        self.offline_docs = self.store.collection('offline_data')
+        self.status_docs = self.store.collection('offline_status')
+        self._migrate_json_files()
+    
+    def _migrate_json_files(self):
+        """Eski offline JSON dosyalarını depoya aktar"""
+        for data_type in os.listdir(self.offline_directory):
+            offline_file = f"{self.offline_directory}/{data_type}/offline_data.json"
+            migrate_json_file(
+                self.store, offline_file,
+                lambda data, data_type=data_type: self.offline_docs.__setitem__(data_type, data)
+            )
+        migrate_json_file(
+            self.store, f"{self.offline_directory}/offline_status.json",
+            lambda data: self.status_docs.__setitem__('status', data)
+        )
     
     def _ensure_directories(self):
         """Gerekli dizinleri oluştur"""
@@ -84,83 +123,53 @@ class OfflineManager:
             return False
     
     def create_backup(self, backup_name: str = None) -> str:
-        """Yedekleme oluştur"""
+        """Yedekleme oluştur (yalnızca değişen parçalar yazılır)"""
+        staging_path = f"{self.backup_directory}/.staging"
         try:
             if not backup_name:
                 backup_name = f"backup_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
             
-            backup_path = f"{self.backup_directory}/{backup_name}"
-            
-            # Yedekleme dizini oluştur
-            os.makedirs(backup_path, exist_ok=True)
-            
-            # Veri dizinlerini kopyala
-            data_directories = [
-                'data/portfolios',
-                'data/analyses',
-                'data/users',
-                'data/watchlists',
-                'data/alerts',
-                'data/personal_data_lake',
-                'data/macro',
-                'data/cache'
-            ]
-            
-            for data_dir in data_directories:
-                if os.path.exists(data_dir):
-                    dest_dir = f"{backup_path}/{os.path.basename(data_dir)}"
-                    shutil.copytree(data_dir, dest_dir, dirs_exist_ok=True)
-            
-            # Yedekleme bilgilerini kaydet
-            backup_info = {
-                'backup_name': backup_name,
-                'created_at': datetime.now().isoformat(),
-                'size_mb': self._calculate_backup_size(backup_path),
-                'file_count': self._count_backup_files(backup_path),
-                'encrypted': self.backup_settings['encrypt_backups']
-            }
-            
-            with open(f"{backup_path}/backup_info.json", 'w', encoding='utf-8') as f:
-                json.dump(backup_info, f, indent=2, ensure_ascii=False)
+            sources = {os.path.basename(data_dir): data_dir for data_dir in self.DATA_DIRECTORIES}
             
-            # Yedeklemeyi sıkıştır
-            if self.backup_settings['compress_backups']:
-                self._compress_backup(backup_path)
+            # Canlı SQLite dosyaları yerine tutarlı kopyalar alınır
+            if os.path.exists(staging_path):
+                shutil.rmtree(staging_path)
+            self.store.backup(f"{staging_path}/{self.STORE_BACKUP_NAME}")
+            sources['store'] = f"{staging_path}/store"
+            for database_file in self.DATABASE_FILES:
+                if os.path.exists(database_file):
+                    self._copy_sqlite(database_file, f"{staging_path}/databases/{os.path.basename(database_file)}")
+            sources['databases'] = f"{staging_path}/databases"
             
-            # Yedeklemeyi şifrele
-            if self.backup_settings['encrypt_backups']:
-                self._encrypt_backup(backup_path)
+            self.backup_store.compress = self.backup_settings['compress_backups']
+            self.backup_store.encrypt = self.backup_settings['encrypt_backups']
+            self.backup_store.create_snapshot(backup_name, sources)
             
             log_info(f"Yedekleme oluşturuldu: {backup_name}")
-            return backup_path
+            return f"{self.backup_directory}/{backup_name}"
             
         except Exception as e:
             log_error(f"Yedekleme oluşturma hatası: {e}")
             return ""
+        finally:
+            shutil.rmtree(staging_path, ignore_errors=True)
     
     def restore_backup(self, backup_name: str) -> bool:
         """Yedeklemeden geri yükle"""
         try:
+            if self.backup_store.has_snapshot(backup_name):
+                return self._restore_snapshot(backup_name)
+            
             backup_path = f"{self.backup_directory}/{backup_name}"
             
-            if not os.path.exists(backup_path):
+            if not any(os.path.exists(f"{backup_path}{suffix}") for suffix in ('', '.zip', '.zip.enc')):
                 log_error(f"Yedekleme bulunamadı: {backup_name}")
                 return False
             
-            # Yedekleme bilgilerini oku
-            backup_info_path = f"{backup_path}/backup_info.json"
-            if os.path.exists(backup_info_path):
-                with open(backup_info_path, 'r', encoding='utf-8') as f:
-                    backup_info = json.load(f)
-            else:
-                backup_info = {}
-            
-            # Yedeklemeyi şifre çöz
-            if backup_info.get('encrypted', False):
+            # Eski biçim: yedeklemeyi şifre çöz ve aç (bilgi dosyası arşivin içinde)
+            if os.path.exists(f"{backup_path}.zip.enc"):
                 self._decrypt_backup(backup_path)
-            
-            # Yedeklemeyi aç
-            if backup_info.get('compressed', False):
+            if os.path.exists(f"{backup_path}.zip"):
                 self._decompress_backup(backup_path)
             
             # Mevcut verileri yedekle
@@ -172,6 +181,10 @@ class OfflineManager:
                     source_path = f"{backup_path}/{item}"
                     dest_path = f"data/{item}"
                     
+                    if item == os.path.dirname(self.STORE_BACKUP_NAME):
+                        self.store.restore(f"{backup_path}/{self.STORE_BACKUP_NAME}")
+                        continue
+                    
                     if os.path.exists(dest_path):
                         shutil.rmtree(dest_path)
                     
@@ -184,6 +197,57 @@ class OfflineManager:
             log_error(f"Yedeklemeden geri yükleme hatası: {e}")
             return False
     
+    def _restore_snapshot(self, backup_name: str) -> bool:
+        """Snapshot'ı doğrula, geçici dizine aç ve veri dizinleriyle değiştir"""
+        corrupted = self.backup_store.verify_snapshot(backup_name)
+        if corrupted:
+            log_error(f"Yedekleme bütünlük kontrolü başarısız: {backup_name} ({len(corrupted)} bozuk parça)")
+            return False
+        
+        restore_path = f"{self.backup_directory}/.restore"
+        if os.path.exists(restore_path):
+            shutil.rmtree(restore_path)
+        try:
+            self.backup_store.restore_snapshot(backup_name, restore_path)
+            
+            # Mevcut verileri yedekle (değişmeyen parçalar tekrar yazılmaz)
+            self.create_backup(f"temp_before_restore_{datetime.now().strftime('%Y%m%d_%H%M%S')}")
+            
+            for item in os.listdir(restore_path):
+                source_path = f"{restore_path}/{item}"
+                
+                if item == os.path.dirname(self.STORE_BACKUP_NAME):
+                    self.store.restore(f"{restore_path}/{self.STORE_BACKUP_NAME}")
+                elif item == 'databases':
+                    for database_file in self.DATABASE_FILES:
+                        restored_file = f"{source_path}/{os.path.basename(database_file)}"
+                        if os.path.exists(restored_file):
+                            os.replace(restored_file, database_file)
+                else:
+                    dest_path = f"data/{item}"
+                    if os.path.exists(dest_path):
+                        shutil.rmtree(dest_path)
+                    shutil.move(source_path, dest_path)
+            
+            log_info(f"Yedeklemeden geri yükleme tamamlandı: {backup_name}")
+            return True
+        finally:
+            shutil.rmtree(restore_path, ignore_errors=True)
+    
+    @staticmethod
+    def _copy_sqlite(source_path: str, dest_path: str):
+        """SQLite veritabanının tutarlı kopyasını al"""
+        os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+        source = sqlite3.connect(source_path)
+        try:
+            dest = sqlite3.connect(dest_path)
+            try:
+                source.backup(dest)
+            finally:
+                dest.close()
+        finally:
+            source.close()
+    
     def get_offline_data(self, data_type: str) -> Dict[str, Any]:
         """Offline verileri getir"""
         try:
@@ -191,13 +255,7 @@ class OfflineManager:
                 log_error("Offline mod aktif değil")
                 return {}
             
-            offline_file = f"{self.offline_directory}/{data_type}/offline_data.json"
-            
-            if os.path.exists(offline_file):
-                with open(offline_file, 'r', encoding='utf-8') as f:
-                    return json.load(f)
-            else:
-                return {}
+            return self.offline_docs.get(data_type, {})
                 
         except Exception as e:
             log_error(f"Offline veri alma hatası: {e}")
@@ -210,13 +268,10 @@ class OfflineManager:
                 log_error("Offline mod aktif değil")
                 return False
             
-            offline_file = f"{self.offline_directory}/{data_type}/offline_data.json"
-            
             # Veriyi şifrele
             encrypted_data = self._encrypt_offline_data(data)
             
-            with open(offline_file, 'w', encoding='utf-8') as f:
-                json.dump(encrypted_data, f, indent=2, ensure_ascii=False)
+            self.offline_docs[data_type] = encrypted_data
             
             log_debug(f"Offline veri güncellendi: {data_type}")
             return True
@@ -279,6 +334,9 @@ class OfflineManager:
             if os.path.exists('data/cache'):
                 shutil.copytree('data/cache', f"{self.offline_directory}/market_data", dirs_exist_ok=True)
             
+            # Doküman deposu (kullanıcılar, portföyler, izleme listeleri)
+            self.store.backup(f"{self.offline_directory}/{self.STORE_BACKUP_NAME}")
+            
             log_info("Veriler offline dizinine senkronize edildi")
             
         except Exception as e:
@@ -297,6 +355,9 @@ class OfflineManager:
             if os.path.exists(f"{self.offline_directory}/user_data"):
                 shutil.copytree(f"{self.offline_directory}/user_data", 'data/users', dirs_exist_ok=True)
             
+            if os.path.exists(f"{self.offline_directory}/{self.STORE_BACKUP_NAME}"):
+                self.store.restore(f"{self.offline_directory}/{self.STORE_BACKUP_NAME}")
+            
             log_info("Offline veriler ana dizine senkronize edildi")
             
         except Exception as e:
@@ -311,8 +372,7 @@ class OfflineManager:
                 'backup_settings': self.backup_settings
             }
             
-            with open(f"{self.offline_directory}/offline_status.json", 'w', encoding='utf-8') as f:
-                json.dump(status_data, f, indent=2, ensure_ascii=False)
+            self.status_docs['status'] = status_data
                 
         except Exception as e:
             log_error(f"Offline durum kaydetme hatası: {e}")
@@ -320,12 +380,9 @@ class OfflineManager:
     def _load_offline_status(self):
         """Offline durumu yükle"""
         try:
-            status_file = f"{self.offline_directory}/offline_status.json"
+            status_data = self.status_docs.get('status')
             
-            if os.path.exists(status_file):
-                with open(status_file, 'r', encoding='utf-8') as f:
-                    status_data = json.load(f)
-                
+            if status_data:
                 self.is_offline_mode = status_data.get('is_offline_mode', False)
                 last_sync_str = status_data.get('last_sync_time')
                 if last_sync_str:
@@ -335,26 +392,6 @@ class OfflineManager:
         except Exception as e:
             log_error(f"Offline durum yükleme hatası: {e}")
     
-    def _compress_backup(self, backup_path: str):
-        """Yedeklemeyi sıkıştır"""
-        try:
-            zip_path = f"{backup_path}.zip"
-            
-            with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-                for root, dirs, files in os.walk(backup_path):
-                    for file in files:
-                        file_path = os.path.join(root, file)
-                        arcname = os.path.relpath(file_path, backup_path)
-                        zipf.write(file_path, arcname)
-            
-            # Orijinal dizini sil
-            shutil.rmtree(backup_path)
-            
-            log_info(f"Yedekleme sıkıştırıldı: {zip_path}")
-            
-        except Exception as e:
-            log_error(f"Yedekleme sıkıştırma hatası: {e}")
-    
     def _decompress_backup(self, backup_path: str):
         """Yedeklemeyi aç"""
         try:
@@ -372,28 +409,15 @@ class OfflineManager:
         except Exception as e:
             log_error(f"Yedekleme açma hatası: {e}")
     
-    def _encrypt_backup(self, backup_path: str):
-        """Yedeklemeyi şifrele"""
-        try:
-            # Yedekleme bilgilerini güncelle
-            backup_info_path = f"{backup_path}/backup_info.json"
-            if os.path.exists(backup_info_path):
-                with open(backup_info_path, 'r', encoding='utf-8') as f:
-                    backup_info = json.load(f)
-                
-                backup_info['encrypted'] = True
-                
-                with open(backup_info_path, 'w', encoding='utf-8') as f:
-                    json.dump(backup_info, f, indent=2, ensure_ascii=False)
-            
-            log_info(f"Yedekleme şifrelendi: {backup_path}")
-            
-        except Exception as e:
-            log_error(f"Yedekleme şifreleme hatası: {e}")
-    
     def _decrypt_backup(self, backup_path: str):
         """Yedekleme şifresini çöz"""
         try:
+            encrypted_path = f"{backup_path}.zip.enc"
+            if os.path.exists(encrypted_path):
+                if not encryption_manager.decrypt_file(encrypted_path, f"{backup_path}.zip"):
+                    raise ValueError(f"Şifreli yedek doğrulanamadı: {encrypted_path}")
+                os.remove(encrypted_path)
+            
             # Yedekleme bilgilerini güncelle
             backup_info_path = f"{backup_path}/backup_info.json"
             if os.path.exists(backup_info_path):
@@ -428,32 +452,6 @@ class OfflineManager:
             log_error(f"Offline veri şifreleme hatası: {e}")
             return data
     
-    def _calculate_backup_size(self, backup_path: str) -> float:
-        """Yedekleme boyutunu hesapla"""
-        try:
-            total_size = 0
-            for root, dirs, files in os.walk(backup_path):
-                for file in files:
-                    file_path = os.path.join(root, file)
-                    total_size += os.path.getsize(file_path)
-            
-            return round(total_size / (1024 * 1024), 2)  # MB
-            
-        except Exception as e:
-            return 0.0
-    
-    def _count_backup_files(self, backup_path: str) -> int:
-        """Yedekleme dosya sayısını hesapla"""
-        try:
-            file_count = 0
-            for root, dirs, files in os.walk(backup_path):
-                file_count += len(files)
-            
-            return file_count
-            
-        except Exception as e:
-            return 0
-    
     def _calculate_offline_data_size(self) -> float:
         """Offline veri boyutunu hesapla"""
         try:
@@ -469,10 +467,22 @@ class OfflineManager:
             return 0.0
     
     def _get_available_backups(self) -> List[Dict[str, Any]]:
-        """Mevcut yedeklemeleri getir"""
+        """Mevcut yedeklemeleri getir (snapshot özetlerinden; hiçbir şey açılmaz)"""
         try:
-            backups = []
+            backups = [
+                {
+                    'name': summary['name'],
+                    'created_at': summary['created_at'],
+                    'size_mb': round(summary['size_bytes'] / (1024 * 1024), 2),
+                    'stored_mb': round(summary['bytes_stored'] / (1024 * 1024), 2),
+                    'file_count': summary['file_count'],
+                    'encrypted': summary['encrypted'],
+                    'snapshot': True
+                }
+                for summary in self.backup_store.list_snapshots()
+            ]
             
+            # Eski biçim yedekleme dizinleri
             if os.path.exists(self.backup_directory):
                 for item in os.listdir(self.backup_directory):
                     backup_path = f"{self.backup_directory}/{item}"
@@ -489,7 +499,8 @@ class OfflineManager:
                                 'created_at': backup_info.get('created_at'),
                                 'size_mb': backup_info.get('size_mb', 0),
                                 'file_count': backup_info.get('file_count', 0),
-                                'encrypted': backup_info.get('encrypted', False)
+                                'encrypted': backup_info.get('encrypted', False),
+                                'snapshot': False
                             })
             
             # Tarihe göre sırala
@@ -511,11 +522,19 @@ class OfflineManager:
                 backups_to_delete = backups[self.backup_settings['max_backups']:]
                 
                 for backup in backups_to_delete:
+                    if backup['snapshot']:
+                        self.backup_store.delete_snapshot(backup['name'])
+                        log_info(f"Eski yedekleme silindi: {backup['name']}")
+                        continue
+                    
                     backup_path = f"{self.backup_directory}/{backup['name']}"
                     
                     if os.path.exists(backup_path):
                         shutil.rmtree(backup_path)
                         log_info(f"Eski yedekleme silindi: {backup['name']}")
+                
+                # Artık hiçbir snapshot'ın kullanmadığı parçaları sil
+                self.backup_store.gc()
             
         except Exception as e:
             log_error(f"Eski yedekleme temizleme hatası: {e}")
@@ -8,6 +8,7 @@ from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Any
 from dataclasses import dataclass, asdict
 from src.utils.logger import log_info, log_error, log_debug
+from src.storage.document_store import DocumentStore, document_store
 
 @dataclass
 class Position:
@@ -89,66 +90,90 @@ class Portfolio:
 class PortfolioManager:
     """Portfolio yöneticisi"""
     
-    def __init__(self, data_dir: str = "data/portfolios"):
+    def __init__(self, data_dir: str = "data/portfolios", store: DocumentStore = None):
         self.data_dir = data_dir
+        self.store = store or document_store
         self.portfolios: Dict[str, Portfolio] = {}
+        # Başlık dokümanı (pozisyonlar + nakit) ve işlem başına ayrı doküman
+        self.heads = self.store.collection('portfolios')
+        self.transaction_docs = self.store.collection('portfolio_transactions', indexes=('portfolio', 'symbol'))
         self._ensure_data_dir()
+        self._migrate_json_portfolios()
         self._load_portfolios()
     
     def _ensure_data_dir(self):
         """Veri dizinini oluştur"""
         os.makedirs(self.data_dir, exist_ok=True)
     
+    def _migrate_json_portfolios(self):
+        """Eski portfolio JSON dosyalarını depoya aktar"""
+        for filename in os.listdir(self.data_dir):
+            if not filename.endswith('.json'):
+                continue
+            filepath = os.path.join(self.data_dir, filename)
+            try:
+                with open(filepath, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                
+                name = data['name']
+                with self.store.transaction():
+                    self.heads[name] = {
+                        'name': name,
+                        'positions': data.get('positions', []),
+                        'cash': data.get('cash', 0.0),
+                        'created_date': data.get('created_date', ''),
+                        'last_updated': data.get('last_updated', '')
+                    }
+                    for seq, tx in enumerate(data.get('transactions', [])):
+                        self.transaction_docs[self._transaction_key(name, seq)] = {
+                            'portfolio': name, 'symbol': tx['symbol'], 'seq': seq, 'transaction': tx
+                        }
+                os.replace(filepath, filepath + ".migrated")
+                log_info(f"Portfolio depoya taşındı: {name}")
+            except Exception as e:
+                log_error(f"Portfolio taşınırken hata ({filename}): {e}")
+    
     def _load_portfolios(self):
         """Portfolio'ları yükle"""
         try:
-            for filename in os.listdir(self.data_dir):
-                if filename.endswith('.json'):
-                    portfolio_name = filename[:-5]  # .json uzantısını kaldır
-                    filepath = os.path.join(self.data_dir, filename)
-                    
-                    with open(filepath, 'r', encoding='utf-8') as f:
-                        data = json.load(f)
-                    
-                    # Portfolio nesnesini oluştur
-                    positions = [Position(**pos) for pos in data.get('positions', [])]
-                    transactions = [Transaction(**tx) for tx in data.get('transactions', [])]
-                    
-                    portfolio = Portfolio(
-                        name=data['name'],
-                        positions=positions,
-                        transactions=transactions,
-                        cash=data.get('cash', 0.0),
-                        created_date=data.get('created_date', ''),
-                        last_updated=data.get('last_updated', '')
-                    )
-                    
-                    self.portfolios[portfolio_name] = portfolio
-                    log_info(f"Portfolio yüklendi: {portfolio_name}")
+            for portfolio_name, data in self.heads.items():
+                # Portfolio nesnesini oluştur
+                positions = [Position(**pos) for pos in data.get('positions', [])]
+                tx_docs = sorted(self.transaction_docs.find('portfolio', portfolio_name), key=lambda doc: doc['seq'])
+                transactions = [Transaction(**doc['transaction']) for doc in tx_docs]
+                
+                portfolio = Portfolio(
+                    name=data['name'],
+                    positions=positions,
+                    transactions=transactions,
+                    cash=data.get('cash', 0.0),
+                    created_date=data.get('created_date', ''),
+                    last_updated=data.get('last_updated', '')
+                )
+                
+                self.portfolios[portfolio_name] = portfolio
+                log_info(f"Portfolio yüklendi: {portfolio_name}")
             
             log_info(f"Toplam {len(self.portfolios)} portfolio yüklendi")
             
         except Exception as e:
             log_error(f"Portfolio'lar yüklenirken hata: {e}")
     
+    @staticmethod
+    def _transaction_key(portfolio_name: str, seq: int) -> str:
+        return f"{portfolio_name}:{seq:08d}"
+    
     def _save_portfolio(self, portfolio: Portfolio):
-        """Portfolio'yu kaydet"""
+        """Portfolio başlığını kaydet (işlemler ayrı dokümanlarda tutulur)"""
         try:
-            filepath = os.path.join(self.data_dir, f"{portfolio.name}.json")
-            
-            # Portfolio'yu dict'e çevir
-            data = {
+            self.heads[portfolio.name] = {
                 'name': portfolio.name,
                 'positions': [asdict(pos) for pos in portfolio.positions],
-                'transactions': [asdict(tx) for tx in portfolio.transactions],
                 'cash': portfolio.cash,
                 'created_date': portfolio.created_date,
                 'last_updated': datetime.now().isoformat()
             }
             
-            with open(filepath, 'w', encoding='utf-8') as f:
-                json.dump(data, f, indent=2, ensure_ascii=False)
-            
             log_debug(f"Portfolio kaydedildi: {portfolio.name}")
             
         except Exception as e:
@@ -272,8 +297,13 @@ class PortfolioManager:
                 notes=notes
             )
             
+            seq = len(portfolio.transactions)
             portfolio.transactions.append(transaction)
-            self._save_portfolio(portfolio)
+            with self.store.transaction():
+                self.transaction_docs[self._transaction_key(portfolio_name, seq)] = {
+                    'portfolio': portfolio_name, 'symbol': symbol, 'seq': seq, 'transaction': asdict(transaction)
+                }
+                self._save_portfolio(portfolio)
             
             log_info(f"İşlem eklendi: {transaction_type} {quantity} {symbol} @ {price}")
             return True
@@ -4,6 +4,8 @@ Risk yönetimi ve portföy optimizasyonu
 """
 
 from .risk_manager import RiskManager, risk_manager
+from .portfolio_optimizer import PortfolioOptimizer, ReturnPanel, ledoit_wolf_shrinkage, portfolio_optimizer
 
-__all__ = ['RiskManager', 'risk_manager']
+__all__ = ['RiskManager', 'risk_manager', 'PortfolioOptimizer', 'ReturnPanel',
+           'ledoit_wolf_shrinkage', 'portfolio_optimizer']
 
@@ -0,0 +1,358 @@
+"""
+PlanB Motoru - Portfolio Optimizer
+Ledoit-Wolf kovaryans, önbellekli getiri paneli ve toplu etkin sınır çözücü
+"""
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Any, Tuple, Callable, Sequence
+
+import numpy as np
+import pandas as pd
+from scipy.linalg import cho_factor, cho_solve
+
+from src.utils.logger import log_info, log_error, log_debug
+
+TRADING_DAYS = 252
+# Eşitlik kısıtlarının ADMM cezası kutu kısıtlarınınkinin bu katı (OSQP varsayılanı)
+EQ_RHO_SCALE = 1e3
+
+
+def ledoit_wolf_shrinkage(returns: np.ndarray) -> Tuple[np.ndarray, float]:
+    """Ledoit-Wolf (2004) küçültülmüş kovaryans: ölçekli birim matrise doğru kapalı form katsayı
+
+    `returns` (T x N) günlük getiri matrisi; N > T olsa da pozitif tanımlı sonuç verir.
+    """
+    X = returns - returns.mean(axis=0)
+    n_samples, n_features = X.shape
+    sample_cov = X.T @ X / n_samples
+    mu = np.trace(sample_cov) / n_features
+
+    X2 = X ** 2
+    beta_ = np.sum(X2.T @ X2) / n_samples
+    delta_ = np.sum(sample_cov ** 2)
+    delta = (delta_ - 2 * mu * np.trace(sample_cov) + n_features * mu ** 2) / n_features
+    beta = min((beta_ - delta_) / (n_features * n_samples), delta)
+    shrinkage = 0.0 if beta <= 0 or delta == 0 else beta / delta
+
+    shrunk = (1 - shrinkage) * sample_cov
+    shrunk.flat[::n_features + 1] += shrinkage * mu
+    return shrunk, shrinkage
+
+
+class ReturnPanel:
+    """Tarihe göre hizalanmış günlük getiri matrisi (T x N)"""
+
+    def __init__(self, symbols: List[str], index: pd.DatetimeIndex, returns: np.ndarray):
+        self.symbols = list(symbols)
+        self.index = index
+        self.returns = np.ascontiguousarray(returns, dtype=np.float64)
+        first, last = (index[0], index[-1]) if len(index) else (None, None)
+        self.key = (tuple(self.symbols), str(first), str(last), len(index))
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    @classmethod
+    def from_prices(cls, prices: pd.DataFrame, min_coverage: float = 0.6) -> 'ReturnPanel':
+        """Kapanış fiyatı tablosundan (tarih x sembol) panel; seyrek semboller atılır"""
+        prices = prices.sort_index()
+        prices = prices.loc[:, prices.notna().mean() >= min_coverage]
+        # Farklı tatil günleri: son fiyat taşınır, ilk ortak günden itibaren alınır
+        returns = prices.ffill().pct_change(fill_method=None).dropna(how='any')
+        return cls(list(returns.columns), returns.index, returns.values)
+
+    @classmethod
+    def from_series(cls, returns_data: Dict[str, pd.Series]) -> 'ReturnPanel':
+        """Sembol -> getiri serisi sözlüğünden tarih hizalı panel"""
+        frame = pd.DataFrame({symbol: series for symbol, series in returns_data.items()
+                              if series is not None and not series.empty})
+        frame = frame.dropna(how='any')
+        return cls(list(frame.columns), frame.index, frame.values)
+
+    def select(self, symbols: Sequence[str]) -> 'ReturnPanel':
+        columns = [self.symbols.index(symbol) for symbol in symbols]
+        return ReturnPanel(list(symbols), self.index, self.returns[:, columns])
+
+
+def _close_series(frame: pd.DataFrame) -> Optional[pd.Series]:
+    if frame is None or frame.empty:
+        return None
+    if isinstance(frame.columns, pd.MultiIndex):
+        frame = frame.droplevel(1, axis=1) if frame.columns.nlevels > 1 else frame
+    for column in ('Close', 'close', 'Adj Close'):
+        if column in frame.columns:
+            series = frame[column]
+            return series.iloc[:, 0] if isinstance(series, pd.DataFrame) else series
+    return None
+
+
+class PortfolioOptimizer:
+    """Önbellekli kovaryans/faktörizasyon ile toplu etkin sınır çözücü
+
+    Kutu kısıtsız durumda sınır kapalı formdadır (iki çözüm). Kutu kısıtlı durumda OSQP
+    tarzı ADMM kullanılır: hedef getiriler yalnızca kısıt sınırlarını değiştirdiği için tüm
+    hedef noktalar aynı Cholesky faktörüyle tek matris olarak birlikte iterasyon yapar.
+    """
+
+    def __init__(self, panel_ttl: float = 3600, max_cached: int = 16, rho: float = 0.1,
+                 sigma: float = 1e-6, alpha: float = 1.6, eps: float = 1e-5, max_iter: int = 10000):
+        self.panel_ttl = panel_ttl
+        self.max_cached = max_cached
+        self.rho = rho
+        self.sigma = sigma
+        self.alpha = alpha
+        self.eps = eps
+        self.max_iter = max_iter
+        self._panels: 'OrderedDict[Any, Tuple[float, ReturnPanel]]' = OrderedDict()
+        self._covariances: 'OrderedDict[Any, Tuple[np.ndarray, float]]' = OrderedDict()
+        self._factors: 'OrderedDict[Any, Any]' = OrderedDict()
+        self._warm: 'OrderedDict[Any, Tuple]' = OrderedDict()
+        self.stats = {'panel_hits': 0, 'covariance_hits': 0, 'factorizations': 0, 'factor_hits': 0,
+                      'iterations': 0}
+
+    def _remember(self, cache: OrderedDict, key: Any, value: Any):
+        cache[key] = value
+        cache.move_to_end(key)
+        while len(cache) > self.max_cached:
+            cache.popitem(last=False)
+
+    # ------------------------------------------------------------------
+    # Getiri paneli ve kovaryans
+    # ------------------------------------------------------------------
+
+    def return_panel(self, symbols: Sequence[str], period: str = "1y",
+                     loader: Callable[..., pd.DataFrame] = None) -> Optional[ReturnPanel]:
+        """resilient_loader_v2 parquet cache'inden günlük getiri paneli (bellekte önbellekli)"""
+        key = (tuple(symbols), period)
+        cached = self._panels.get(key)
+        if cached and time.time() - cached[0] < self.panel_ttl:
+            self.stats['panel_hits'] += 1
+            return cached[1]
+        try:
+            if loader is None:
+                from resilient_loader_v2 import cached_download as loader
+            closes = {}
+            for symbol in symbols:
+                series = _close_series(loader(symbol, period=period, interval="1d"))
+                if series is not None:
+                    closes[symbol] = series
+            if len(closes) < 2:
+                return None
+            panel = ReturnPanel.from_prices(pd.DataFrame(closes))
+            self._remember(self._panels, key, (time.time(), panel))
+            log_debug(f"Getiri paneli oluşturuldu: {len(panel.symbols)} sembol x {len(panel)} gün")
+            return panel
+        except Exception as e:
+            log_error(f"Getiri paneli oluşturma hatası: {e}")
+            return None
+
+    def covariance(self, panel: ReturnPanel, annualize: bool = True) -> Tuple[np.ndarray, float]:
+        """Panelin Ledoit-Wolf kovaryansı (yıllık) ve küçültme katsayısı"""
+        cached = self._covariances.get(panel.key)
+        if cached is None:
+            cached = ledoit_wolf_shrinkage(panel.returns)
+            self._remember(self._covariances, panel.key, cached)
+        else:
+            self.stats['covariance_hits'] += 1
+        cov, shrinkage = cached
+        return (cov * TRADING_DAYS if annualize else cov), shrinkage
+
+    # ------------------------------------------------------------------
+    # Etkin sınır
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _matrix_key(*arrays: np.ndarray) -> str:
+        digest = hashlib.sha1()
+        for array in arrays:
+            digest.update(np.ascontiguousarray(array).tobytes())
+        return digest.hexdigest()
+
+    def efficient_frontier(self, mu: np.ndarray, cov: np.ndarray, points: int = 25,
+                           bounds: Optional[Tuple[float, float]] = (0.0, 1.0),
+                           targets: Optional[Sequence[float]] = None) -> Dict[str, Any]:
+        """Minimum varyans portföyü + hedef getirilerde etkin sınır (tek toplu çözüm)
+
+        Dönüş: 'targets', 'returns', 'volatilities', 'weights' (K x N; ilk satır minimum varyans).
+        """
+        mu = np.asarray(mu, dtype=np.float64)
+        cov = np.asarray(cov, dtype=np.float64)
+        if bounds is None:
+            return self._closed_form_frontier(mu, cov, points, targets)
+        return self._box_frontier(mu, cov, points, bounds, targets)
+
+    def _closed_form_frontier(self, mu: np.ndarray, cov: np.ndarray, points: int,
+                              targets: Optional[Sequence[float]]) -> Dict[str, Any]:
+        """Yalnızca bütçe (ve getiri) eşitliği: w = Σ⁻¹B (BᵀΣ⁻¹B)⁻¹ [1, r]"""
+        factor = self._factor(('closed', self._matrix_key(cov)), lambda: cov)
+        ones = np.ones_like(mu)
+        inv_ones, inv_mu = cho_solve(factor, np.column_stack([ones, mu])).T
+        a, b, c = ones @ inv_ones, ones @ inv_mu, mu @ inv_mu
+        min_var = inv_ones / a
+        min_return = float(mu @ min_var)
+
+        if targets is None:
+            spread = np.ptp(mu)
+            targets = np.linspace(min_return, min_return + spread, points) if spread > 1e-12 else []
+        targets = np.asarray(targets, dtype=np.float64)
+        weights = [min_var]
+        determinant = a * c - b * b
+        if len(targets) and determinant > 1e-18:
+            lam = (c - b * targets) / determinant
+            gam = (a * targets - b) / determinant
+            weights.extend(np.outer(lam, inv_ones) + np.outer(gam, inv_mu))
+        return self._frontier_result(mu, cov, np.concatenate([[min_return], targets[:len(weights) - 1]]),
+                                     np.vstack(weights), iterations=0)
+
+    def _factor(self, key: Any, build: Callable[[], np.ndarray]):
+        factor = self._factors.get(key)
+        if factor is None:
+            factor = cho_factor(build(), lower=False, check_finite=False)
+            self._remember(self._factors, key, factor)
+            self.stats['factorizations'] += 1
+        else:
+            self.stats['factor_hits'] += 1
+        return factor
+
+    @staticmethod
+    def _return_range(mu: np.ndarray, lower: float, upper: float) -> float:
+        """Kutu ve bütçe kısıtıyla ulaşılabilir en yüksek getiri (açgözlü doldurma)"""
+        weights = np.full(len(mu), float(lower))
+        remaining = 1.0 - weights.sum()
+        for index in np.argsort(-mu):
+            step = min(upper - lower, remaining)
+            weights[index] += step
+            remaining -= step
+            if remaining <= 0:
+                break
+        return float(mu @ weights)
+
+    def _box_frontier(self, mu: np.ndarray, cov: np.ndarray, points: int,
+                      bounds: Tuple[float, float], targets: Optional[Sequence[float]]) -> Dict[str, Any]:
+        n_assets = len(mu)
+        lower, upper = bounds
+        if lower * n_assets > 1 + 1e-12 or upper * n_assets < 1 - 1e-12:
+            raise ValueError(f"Ağırlık sınırları ({lower}, {upper}) ile bütçe kısıtı sağlanamaz")
+
+        # Ölçekleme: kovaryans köşegeni ~1, eşitlik satırları birim normlu
+        P = cov / (float(np.mean(np.diag(cov))) or 1.0)
+        budget_row = np.ones(n_assets) / np.sqrt(n_assets)
+        mu_norm = float(np.linalg.norm(mu - mu.mean()))
+        flat = mu_norm < 1e-12
+        mu_row = (mu - mu.mean()) / mu_norm if not flat else np.zeros(n_assets)
+        key = ('box', self._matrix_key(cov, mu), bounds)
+
+        def factor_for(rho: float):
+            def build():
+                M = P + (self.sigma + rho) * np.eye(n_assets)
+                M += EQ_RHO_SCALE * rho * (np.outer(budget_row, budget_row) + np.outer(mu_row, mu_row))
+                return M
+            return self._factor(key + (rho,), build)
+
+        def solve(column_targets: np.ndarray, warm: Optional[Tuple], rho: float) -> Tuple[Tuple, int, float]:
+            """Sütun başına bir hedef (NaN = getiri kısıtı yok) ile toplu ADMM; yakınsayan sütun çıkar"""
+            k = len(column_targets)
+            # Satırlar: [bütçe, getiri, kutu...]; getiri satırı merkezlenmiş μ ile ifade edilir
+            eq_low = np.vstack([np.full(k, 1 / np.sqrt(n_assets)),
+                                np.where(np.isnan(column_targets), -np.inf,
+                                         (column_targets - mu.mean()) / (mu_norm or 1.0))])
+            eq_high = np.where(np.isinf(eq_low), np.inf, eq_low)
+
+            if warm is not None:
+                x, z_eq, z_box, y_eq, y_box = (array.copy() for array in warm)
+            else:
+                x = np.full((n_assets, k), 1.0 / n_assets)
+                z_eq = np.vstack([budget_row @ x, mu_row @ x])
+                z_box = x.copy()
+                y_eq = np.zeros((2, k))
+                y_box = np.zeros((n_assets, k))
+
+            factor = factor_for(rho)
+            active = np.arange(k)
+            alpha = self.alpha
+            iteration = 0
+            while iteration < self.max_iter and len(active):
+                iteration += 1
+                rho_eq = EQ_RHO_SCALE * rho
+                xa, ze, zb, ye, yb = x[:, active], z_eq[:, active], z_box[:, active], y_eq[:, active], y_box[:, active]
+                rhs = self.sigma * xa + budget_row[:, None] * (rho_eq * ze[0] - ye[0]) \
+                    + mu_row[:, None] * (rho_eq * ze[1] - ye[1]) + rho * zb - yb
+                x_tilde = cho_solve(factor, rhs, check_finite=False)
+                relaxed_eq = alpha * np.vstack([budget_row @ x_tilde, mu_row @ x_tilde]) + (1 - alpha) * ze
+                relaxed_box = alpha * x_tilde + (1 - alpha) * zb
+                xa = alpha * x_tilde + (1 - alpha) * xa
+                new_eq = np.clip(relaxed_eq + ye / rho_eq, eq_low[:, active], eq_high[:, active])
+                new_box = np.clip(relaxed_box + yb / rho, lower, upper)
+                ye = ye + rho_eq * (relaxed_eq - new_eq)
+                yb = yb + rho * (relaxed_box - new_box)
+                x[:, active], z_eq[:, active], z_box[:, active] = xa, new_eq, new_box
+                y_eq[:, active], y_box[:, active] = ye, yb
+
+                if iteration % 10:
+                    continue
+                # Sütun başına artık değerler (OSQP ölçütü)
+                primal = np.maximum(np.abs(np.vstack([budget_row @ xa, mu_row @ xa]) - new_eq).max(axis=0),
+                                    np.abs(xa - new_box).max(axis=0))
+                aty = budget_row[:, None] * ye[0] + mu_row[:, None] * ye[1] + yb
+                px = P @ xa
+                dual = np.abs(px + aty).max(axis=0)
+                scale_p = max(np.abs(xa).max(), np.abs(new_eq).max())
+                scale_d = max(np.abs(px).max(), np.abs(aty).max())
+                done = (primal <= self.eps * (1 + scale_p)) & (dual <= self.eps * (1 + scale_d))
+                if iteration % 50 == 0 and not done.all():
+                    # Adaptif rho: artıklar dengesizse yeniden faktörize et (faktörler önbellekte)
+                    ratio = np.sqrt((primal.max() / (scale_p + 1e-12)) / (dual.max() / (scale_d + 1e-12) + 1e-12))
+                    if ratio > 5 or ratio < 0.2:
+                        rho = float(np.clip(rho * ratio, 1e-6, 1e6))
+                        factor = factor_for(rho)
+                active = active[~done]
+            self.stats['iterations'] += iteration
+            return (x, z_eq, z_box, y_eq, y_box), iteration, rho
+
+        # 1) Minimum varyans (getiri kısıtı yok), önbellekteki çözüm ve rho'dan sıcak başlangıç
+        cached = self._warm.get(key)
+        rho = cached[0] if cached else self.rho
+        warm_min = tuple(array[:, :1] for array in cached[2:]) if cached else None
+        state, iterations, rho = solve(np.array([np.nan]), warm_min, rho)
+        min_var = state[2][:, 0]
+        min_return = float(mu @ min_var)
+
+        # 2) Tüm hedef getiriler tek toplu çözümde; her sütun en yakın bilinen çözümden başlar
+        if targets is None:
+            max_return = self._return_range(mu, lower, upper)
+            targets = [] if flat else np.linspace(min_return, min_return + 0.95 * (max_return - min_return),
+                                                  points)[1:]
+        targets = np.asarray(targets, dtype=np.float64)
+        weights = min_var[None, :]
+        if len(targets):
+            if cached and len(cached[1]):
+                nearest = np.abs(cached[1][:, None] - targets[None, :]).argmin(axis=0)
+                warm = tuple(array[:, nearest] for array in cached[2:])
+            else:
+                warm = tuple(np.repeat(array, len(targets), axis=1) for array in state)
+            frontier_state, frontier_iterations, rho = solve(targets, warm, rho)
+            iterations += frontier_iterations
+            self._remember(self._warm, key, (rho, targets) + frontier_state)
+            weights = np.vstack([weights, frontier_state[2].T])
+        else:
+            self._remember(self._warm, key, (rho, np.array([min_return])) + state)
+
+        weights = weights / weights.sum(axis=1, keepdims=True)
+        return self._frontier_result(mu, cov, np.concatenate([[min_return], targets]), weights, iterations)
+
+    @staticmethod
+    def _frontier_result(mu: np.ndarray, cov: np.ndarray, targets: np.ndarray,
+                         weights: np.ndarray, iterations: int) -> Dict[str, Any]:
+        variances = np.einsum('ki,ij,kj->k', weights, cov, weights)
+        return {
+            'targets': targets,
+            'returns': weights @ mu,
+            'volatilities': np.sqrt(np.maximum(variances, 0)),
+            'weights': weights,
+            'iterations': iterations,
+        }
+
+
+# Global portfolio optimizer instance
+portfolio_optimizer = PortfolioOptimizer()
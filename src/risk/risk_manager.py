@@ -9,16 +9,8 @@ from datetime import datetime, timedelta
 import warnings
 warnings.filterwarnings('ignore')
 
-# ML Libraries for risk management
-try:
-    from sklearn.covariance import LedoitWolf
-    from scipy.optimize import minimize
-    from scipy.stats import norm
-    ML_AVAILABLE = True
-except ImportError:
-    ML_AVAILABLE = False
-
 from src.utils.logger import log_info, log_error, log_debug
+from src.risk.portfolio_optimizer import portfolio_optimizer, ReturnPanel, TRADING_DAYS
 
 class RiskManager:
     """Risk yönetimi sınıfı"""
@@ -176,36 +168,28 @@ class RiskManager:
                                        weights: np.ndarray, symbols: List[str]) -> Dict[str, Any]:
         """Gelişmiş risk metrikleri hesapla"""
         try:
-            if not ML_AVAILABLE:
-                return {}
-            
-            # Returns matrisi oluştur
-            returns_matrix = []
-            valid_symbols = []
-            
-            for symbol in symbols:
-                if symbol in returns_data and not returns_data[symbol].empty:
-                    returns_matrix.append(returns_data[symbol].values)
-                    valid_symbols.append(symbol)
-            
-            if len(returns_matrix) < 2:
+            # Tarihe göre hizalanmış returns paneli
+            panel = ReturnPanel.from_series({symbol: returns_data[symbol] for symbol in symbols
+                                             if symbol in returns_data})
+            if len(panel.symbols) < 2 or len(panel) < 2:
                 return {}
             
-            returns_df = pd.DataFrame(returns_matrix).T
-            returns_df.columns = valid_symbols
+            weight_by_symbol = dict(zip(symbols, weights))
+            panel_weights = np.array([weight_by_symbol[symbol] for symbol in panel.symbols])
+            returns_df = pd.DataFrame(panel.returns, index=panel.index, columns=panel.symbols)
             
-            # Kovaryans matrisi
-            if len(returns_df) > 30:  # Yeterli veri varsa
-                cov_matrix = LedoitWolf().fit(returns_df).covariance_
+            # Kovaryans matrisi (günlük)
+            if len(panel) > 30:  # Yeterli veri varsa
+                cov_matrix, _ = portfolio_optimizer.covariance(panel, annualize=False)
             else:
                 cov_matrix = returns_df.cov().values
             
             # Portföy volatilitesi
-            portfolio_variance = np.dot(weights[:len(valid_symbols)], np.dot(cov_matrix, weights[:len(valid_symbols)]))
-            portfolio_volatility = np.sqrt(portfolio_variance * 252)  # Yıllık volatilite
+            portfolio_variance = panel_weights @ cov_matrix @ panel_weights
+            portfolio_volatility = np.sqrt(portfolio_variance * TRADING_DAYS)  # Yıllık volatilite
             
             # VaR hesaplamaları
-            portfolio_returns = returns_df.dot(weights[:len(valid_symbols)])
+            portfolio_returns = returns_df.dot(panel_weights)
             var_metrics = {}
             expected_shortfall = {}
             
@@ -219,7 +203,7 @@ class RiskManager:
             
             # Sharpe Ratio (varsayılan risk-free rate %2)
             risk_free_rate = 0.02
-            expected_return = portfolio_returns.mean() * 252
+            expected_return = portfolio_returns.mean() * TRADING_DAYS
             sharpe_ratio = (expected_return - risk_free_rate) / portfolio_volatility if portfolio_volatility > 0 else 0
             
             # Maximum Drawdown
@@ -310,8 +294,15 @@ class RiskManager:
             return {'error': str(e)}
     
     def optimize_portfolio_weights(self, expected_returns: Dict[str, float] = None,
-                                 risk_tolerance: float = 0.1) -> Dict[str, Any]:
-        """Portföy ağırlıklarını optimize et"""
+                                 risk_tolerance: float = 0.1,
+                                 returns_data: Dict[str, pd.Series] = None,
+                                 frontier_points: int = 25) -> Dict[str, Any]:
+        """Portföy ağırlıklarını optimize et
+        
+        Kovaryans, verilen returns_data'dan veya parquet cache'indeki fiyat geçmişinden
+        Ledoit-Wolf ile kestirilir; etkin sınır tek toplu çözümle hesaplanır ve yıllık
+        volatilitesi risk_tolerance'ı aşmayan en yüksek getirili nokta seçilir.
+        """
         try:
             if not self.portfolio_data:
                 return {'error': 'Portföy verisi yok'}
@@ -329,75 +320,77 @@ class RiskManager:
             # Beklenen getiri vektörü
             mu = np.array([expected_returns.get(symbol, 0.08) for symbol in symbols])
             
-            # Kovaryans matrisi (basit yaklaşım)
-            # Gerçek uygulamada historical returns kullanılmalı
-            cov_matrix = np.eye(n_assets) * 0.04  # %20 volatilite varsayımı
+            # Kovaryans matrisi: tarihsel getirilerden Ledoit-Wolf (yıllık)
+            cov_matrix, covariance_source = self._estimate_covariance(symbols, returns_data)
             
-            # Optimizasyon fonksiyonu (Markowitz)
-            def portfolio_variance(weights):
-                return np.dot(weights.T, np.dot(cov_matrix, weights))
-            
-            def portfolio_return(weights):
-                return np.dot(weights, mu)
-            
-            # Kısıtlar
-            constraints = [
-                {'type': 'eq', 'fun': lambda x: np.sum(x) - 1},  # Ağırlıklar toplamı 1
-            ]
-            
-            # Sınırlar (her pozisyon %0-30 arası)
-            bounds = tuple((0, 0.3) for _ in range(n_assets))
-            
-            # Başlangıç değerleri (eşit ağırlık)
-            x0 = np.array([1.0 / n_assets] * n_assets)
-            
-            # Optimizasyon
-            result = minimize(
-                portfolio_variance,
-                x0,
-                method='SLSQP',
-                bounds=bounds,
-                constraints=constraints
+            # Etkin sınır (her pozisyon %0-30 arası)
+            upper = max(0.3, 1.0 / n_assets)
+            frontier = portfolio_optimizer.efficient_frontier(
+                mu, cov_matrix, points=frontier_points, bounds=(0.0, upper)
             )
+            within_risk = np.flatnonzero(frontier['volatilities'] <= risk_tolerance)
+            best = within_risk[np.argmax(frontier['returns'][within_risk])] if len(within_risk) else 0
+            
+            optimal_weights = frontier['weights'][best]
+            optimal_return = float(frontier['returns'][best])
+            optimal_volatility = float(frontier['volatilities'][best])
+            
+            # Mevcut ağırlıklarla karşılaştır
+            current_weights = np.array([self.portfolio_data[symbol]['weight'] for symbol in symbols])
+            current_return = float(current_weights @ mu)
+            current_volatility = float(np.sqrt(current_weights @ cov_matrix @ current_weights))
+            current_sharpe = current_return / current_volatility if current_volatility > 0 else 0.0
+            optimal_sharpe = optimal_return / optimal_volatility if optimal_volatility > 0 else 0.0
+            
+            optimization_result = {
+                'optimal_weights': dict(zip(symbols, optimal_weights)),
+                'optimal_return': optimal_return,
+                'optimal_volatility': optimal_volatility,
+                'current_weights': dict(zip(symbols, current_weights)),
+                'current_return': current_return,
+                'current_volatility': current_volatility,
+                'improvement_potential': {
+                    'return_improvement': optimal_return - current_return,
+                    'volatility_reduction': current_volatility - optimal_volatility,
+                    'sharpe_improvement': optimal_sharpe - current_sharpe
+                },
+                'efficient_frontier': {
+                    'returns': frontier['returns'].tolist(),
+                    'volatilities': frontier['volatilities'].tolist()
+                },
+                'covariance_source': covariance_source,
+                'recommendations': self._get_optimization_recommendations(
+                    optimal_weights, current_weights, symbols
+                )
+            }
             
-            if result.success:
-                optimal_weights = result.x
-                optimal_return = portfolio_return(optimal_weights)
-                optimal_variance = portfolio_variance(optimal_weights)
-                optimal_volatility = np.sqrt(optimal_variance)
-                
-                # Mevcut ağırlıklarla karşılaştır
-                current_weights = np.array([self.portfolio_data[symbol]['weight'] for symbol in symbols])
-                current_return = portfolio_return(current_weights)
-                current_variance = portfolio_variance(current_weights)
-                current_volatility = np.sqrt(current_variance)
-                
-                optimization_result = {
-                    'optimal_weights': dict(zip(symbols, optimal_weights)),
-                    'optimal_return': optimal_return,
-                    'optimal_volatility': optimal_volatility,
-                    'current_weights': dict(zip(symbols, current_weights)),
-                    'current_return': current_return,
-                    'current_volatility': current_volatility,
-                    'improvement_potential': {
-                        'return_improvement': optimal_return - current_return,
-                        'volatility_reduction': current_volatility - optimal_volatility,
-                        'sharpe_improvement': (optimal_return / optimal_volatility) - (current_return / current_volatility)
-                    },
-                    'recommendations': self._get_optimization_recommendations(
-                        optimal_weights, current_weights, symbols
-                    )
-                }
-                
-                log_info("Portföy optimizasyonu tamamlandı")
-                return optimization_result
-            else:
-                return {'error': 'Optimizasyon başarısız'}
+            log_info("Portföy optimizasyonu tamamlandı")
+            return optimization_result
                 
         except Exception as e:
             log_error(f"Portföy optimizasyonu hatası: {e}")
             return {'error': str(e)}
     
+    def _estimate_covariance(self, symbols: List[str],
+                             returns_data: Dict[str, pd.Series] = None) -> Tuple[np.ndarray, str]:
+        """Yıllık kovaryans matrisi; tarihsel veri yoksa %20 volatilite varsayımı"""
+        n_assets = len(symbols)
+        if returns_data:
+            panel = ReturnPanel.from_series({symbol: returns_data[symbol] for symbol in symbols
+                                             if symbol in returns_data})
+        else:
+            panel = portfolio_optimizer.return_panel(symbols)
+        
+        if panel is None or len(panel) < 2 or len(panel.symbols) < 2:
+            return np.eye(n_assets) * 0.04, 'default'
+        
+        cov_matrix = np.eye(n_assets) * 0.04
+        positions = [symbols.index(symbol) for symbol in panel.symbols]
+        panel_cov, shrinkage = portfolio_optimizer.covariance(panel)
+        cov_matrix[np.ix_(positions, positions)] = panel_cov
+        log_debug(f"Ledoit-Wolf kovaryans: {len(panel.symbols)}/{n_assets} sembol, küçültme {shrinkage:.2f}")
+        return cov_matrix, 'ledoit_wolf'
+    
     def calculate_stop_loss_levels(self, symbol: str, price_data: pd.DataFrame = None) -> Dict[str, Any]:
         """Stop loss seviyelerini hesapla"""
         try:
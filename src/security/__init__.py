@@ -4,7 +4,9 @@ Güvenlik ve erişim kontrolü
 """
 
 from .encryption_manager import EncryptionManager, encryption_manager
+from .session_store import SessionStore, SessionNamespace, TimingWheel, session_store
 from .access_control import AccessControl, access_control
 
-__all__ = ['EncryptionManager', 'encryption_manager', 'AccessControl', 'access_control']
+__all__ = ['EncryptionManager', 'encryption_manager', 'SessionStore', 'SessionNamespace', 'TimingWheel',
+           'session_store', 'AccessControl', 'access_control']
 
@@ -3,24 +3,36 @@ PlanB Motoru - Access Control
 Kişisel kullanım için erişim kontrolü ve kimlik doğrulama
 """
 import os
-import json
 import hashlib
 import secrets
 from typing import Dict, Any, Optional, List
 from datetime import datetime, timedelta
 from src.security.encryption_manager import encryption_manager
+from src.security.session_store import SessionStore, session_store
+from src.storage.document_store import DocumentStore, document_store, migrate_json_file
 from src.utils.logger import log_info, log_error, log_debug
 
 class AccessControl:
     """Kişisel erişim kontrolü"""
     
-    def __init__(self):
-        self.user_sessions = {}
-        self.failed_attempts = {}
+    ACCESS_LOG_STREAM = 'access_log'
+    ACCESS_LOG_LIMIT = 1000
+    ACCESS_LOG_TRIM_EVERY = 100
+    RATE_LIMIT_WINDOW = 60 * 60  # 1 saat
+    
+    def __init__(self, store: DocumentStore = None, sessions: SessionStore = None):
+        self.store = store or document_store
+        self.session_store = sessions or session_store
+        self._access_log_writes = 0
+        # Oturumlar bellekte; süre dolumu zamanlama çarkıyla, kalıcılık periyodik snapshot ile
+        self.user_sessions = self.session_store.namespace('access_sessions')
         self.max_failed_attempts = 5
         self.session_timeout = 24 * 60 * 60  # 24 saat
         self.personal_device_id = self._get_personal_device_id()
         self.authorized_devices = self._load_authorized_devices()
+        self._api_key_data = None
+        self._migrate_access_log()
+        self._migrate_session_files()
         
     def _get_personal_device_id(self) -> str:
         """Kişisel cihaz ID'si oluştur"""
@@ -91,9 +103,6 @@ class AccessControl:
                 
                 self.user_sessions[session_token] = session_data
                 
-                # Şifrelenmiş oturum verilerini kaydet
-                encryption_manager.encrypt_data(session_data, f"session_{session_token}")
-                
                 log_info("Kişisel oturum oluşturuldu")
                 return session_token
             else:
@@ -105,40 +114,32 @@ class AccessControl:
             return None
     
     def verify_session(self, session_token: str) -> bool:
-        """Oturum doğrulama"""
+        """Oturum doğrulama (yalnızca bellek; diske dokunmaz)"""
         try:
             if not session_token:
                 return False
             
-            # Oturum verilerini kontrol et
-            if session_token in self.user_sessions:
-                session_data = self.user_sessions[session_token]
-                
-                # Süre kontrolü
-                expires_at = datetime.fromisoformat(session_data['expires_at'])
-                if datetime.now() > expires_at:
-                    # Süresi dolmuş oturum
-                    self.invalidate_session(session_token)
-                    return False
-                
-                # Cihaz kontrolü
-                if session_data['device_id'] not in self.authorized_devices:
-                    log_error("Yetkisiz cihaz oturum erişimi")
-                    return False
-                
-                # Son aktiviteyi güncelle
-                session_data['last_activity'] = datetime.now().isoformat()
-                
-                return True
-            else:
-                # Şifrelenmiş oturum verilerini kontrol et
-                encrypted_session = encryption_manager.decrypt_data(filename=f"session_{session_token}")
-                if encrypted_session:
-                    # Oturumu memory'ye yükle
-                    self.user_sessions[session_token] = encrypted_session
-                    return self.verify_session(session_token)
-                
+            session_data = self.user_sessions.get(session_token)
+            if session_data is None:
+                return False
+            
+            # Süre kontrolü (çark tik aralığı içinde dolan oturumlar için)
+            expires_at = datetime.fromisoformat(session_data['expires_at'])
+            if datetime.now() > expires_at:
+                # Süresi dolmuş oturum
+                self.invalidate_session(session_token)
                 return False
+            
+            # Cihaz kontrolü
+            if session_data['device_id'] not in self.authorized_devices:
+                log_error("Yetkisiz cihaz oturum erişimi")
+                return False
+            
+            # Son aktiviteyi güncelle
+            session_data['last_activity'] = datetime.now().isoformat()
+            self.user_sessions.save(session_token)
+            
+            return True
                 
         except Exception as e:
             log_error(f"Oturum doğrulama hatası: {e}")
@@ -147,13 +148,7 @@ class AccessControl:
     def invalidate_session(self, session_token: str) -> bool:
         """Oturumu geçersiz kıl"""
         try:
-            if session_token in self.user_sessions:
-                del self.user_sessions[session_token]
-            
-            # Şifrelenmiş oturum dosyasını sil
-            session_file = f"data/encrypted/session_{session_token}.enc"
-            if os.path.exists(session_file):
-                os.remove(session_file)
+            self.user_sessions.pop(session_token, None)
             
             log_info(f"Oturum geçersiz kılındı: {session_token}")
             return True
@@ -162,6 +157,21 @@ class AccessControl:
             log_error(f"Oturum geçersiz kılma hatası: {e}")
             return False
     
+    def _migrate_session_files(self):
+        """Eski oturum başına şifreli dosyaları (data/encrypted/session_*.enc) belleğe aktar"""
+        directory = "data/encrypted"
+        if not os.path.isdir(directory):
+            return
+        session_files = [f for f in os.listdir(directory) if f.startswith("session_") and f.endswith(".enc")]
+        for filename in session_files:
+            session_data = encryption_manager.decrypt_data(filename=filename[:-len(".enc")])
+            if isinstance(session_data, dict) and 'expires_at' in session_data:
+                self.user_sessions[filename[len("session_"):-len(".enc")]] = session_data
+        # Dosyalar ancak oturumlar snapshot'a yazıldıktan sonra silinir
+        if session_files and self.session_store.snapshot():
+            for filename in session_files:
+                os.remove(os.path.join(directory, filename))
+    
     def get_session_info(self, session_token: str) -> Optional[Dict[str, Any]]:
         """Oturum bilgilerini getir"""
         try:
@@ -174,23 +184,12 @@ class AccessControl:
             return None
     
     def check_rate_limit(self, client_ip: str, action: str) -> bool:
-        """Rate limit kontrolü"""
+        """Rate limit kontrolü (son 1 saatteki başarısız denemeler, kayan pencere)"""
         try:
-            current_time = datetime.now()
             key = f"{client_ip}_{action}"
             
-            if key not in self.failed_attempts:
-                self.failed_attempts[key] = []
-            
-            # Eski kayıtları temizle (1 saat öncesi)
-            cutoff_time = current_time - timedelta(hours=1)
-            self.failed_attempts[key] = [
-                attempt_time for attempt_time in self.failed_attempts[key]
-                if attempt_time > cutoff_time
-            ]
-            
             # Rate limit kontrolü
-            if len(self.failed_attempts[key]) >= self.max_failed_attempts:
+            if self.session_store.count(key, self.RATE_LIMIT_WINDOW) >= self.max_failed_attempts:
                 log_error(f"Rate limit aşıldı: {client_ip} - {action}")
                 return False
             
@@ -203,11 +202,7 @@ class AccessControl:
     def record_failed_attempt(self, client_ip: str, action: str):
         """Başarısız denemeyi kaydet"""
         try:
-            key = f"{client_ip}_{action}"
-            if key not in self.failed_attempts:
-                self.failed_attempts[key] = []
-            
-            self.failed_attempts[key].append(datetime.now())
+            self.session_store.hit(f"{client_ip}_{action}", self.RATE_LIMIT_WINDOW)
             
         except Exception as e:
             log_error(f"Başarısız deneme kaydetme hatası: {e}")
@@ -229,6 +224,7 @@ class AccessControl:
             }
             
             encryption_manager.encrypt_data(api_key_data, "personal_api_key")
+            self._api_key_data = api_key_data
             
             log_info("Kişisel API anahtarı oluşturuldu")
             return api_key
@@ -240,8 +236,10 @@ class AccessControl:
     def verify_api_key(self, api_key: str) -> bool:
         """API anahtarını doğrula"""
         try:
-            # Şifrelenmiş API key verilerini yükle
-            api_key_data = encryption_manager.decrypt_data(filename="personal_api_key")
+            # Şifrelenmiş API key verileri ilk doğrulamada bir kez yüklenir
+            if self._api_key_data is None:
+                self._api_key_data = encryption_manager.decrypt_data(filename="personal_api_key") or {}
+            api_key_data = self._api_key_data
             if not api_key_data:
                 return False
             
@@ -277,39 +275,42 @@ class AccessControl:
                 'details': details or {}
             }
             
-            # Log dosyasına kaydet
-            log_file = "data/security/access_log.json"
-            os.makedirs(os.path.dirname(log_file), exist_ok=True)
-            
-            # Mevcut logları yükle
-            if os.path.exists(log_file):
-                with open(log_file, 'r', encoding='utf-8') as f:
-                    logs = json.load(f)
-            else:
-                logs = []
-            
-            # Yeni log ekle
-            logs.append(log_entry)
+            # Kayıt başına şifreleyip log akışına ekle (eski kayıtlar okunmaz/yeniden yazılmaz)
+            self._append_access_log(log_entry)
             
             # Son 1000 log'u tut
-            if len(logs) > 1000:
-                logs = logs[-1000:]
-            
-            # Log'u şifrele ve kaydet
-            encryption_manager.encrypt_data(logs, "access_log")
-            
-            # Şifrelenmemiş kopya da tut (debug için)
-            with open(log_file, 'w', encoding='utf-8') as f:
-                json.dump(logs, f, indent=2, ensure_ascii=False)
+            self._access_log_writes += 1
+            if self._access_log_writes % self.ACCESS_LOG_TRIM_EVERY == 0:
+                self.store.trim_log(self.ACCESS_LOG_STREAM, self.ACCESS_LOG_LIMIT)
             
         except Exception as e:
             log_error(f"Erişim log kaydetme hatası: {e}")
     
+    def _append_access_log(self, log_entry: Dict[str, Any]):
+        record = encryption_manager.encrypt_data(log_entry) or log_entry
+        self.store.append_log(self.ACCESS_LOG_STREAM, record, ts=log_entry['timestamp'])
+    
+    def _migrate_access_log(self):
+        """Eski access_log.json dosyasını log akışına aktar"""
+        def load(logs):
+            for log_entry in logs:
+                self._append_access_log(log_entry)
+        migrate_json_file(self.store, "data/security/access_log.json", load)
+    
+    def _read_access_logs(self) -> List[Dict[str, Any]]:
+        logs = []
+        for record in self.store.read_log(self.ACCESS_LOG_STREAM, limit=self.ACCESS_LOG_LIMIT):
+            if isinstance(record, str):
+                record = encryption_manager.decrypt_data(record)
+            if isinstance(record, dict):
+                logs.append(record)
+        return logs
+    
     def get_access_statistics(self) -> Dict[str, Any]:
         """Erişim istatistiklerini getir"""
         try:
             # Şifrelenmiş log'ları yükle
-            logs = encryption_manager.decrypt_data(filename="access_log") or []
+            logs = self._read_access_logs()
             
             if not logs:
                 return {}
@@ -346,22 +347,12 @@ class AccessControl:
             return {}
     
     def cleanup_expired_sessions(self):
-        """Süresi dolmuş oturumları temizle"""
+        """Süresi dolmuş oturumları temizle (yalnızca dolan çark yuvaları dolaşılır)"""
         try:
-            current_time = datetime.now()
-            expired_sessions = []
-            
-            for session_token, session_data in self.user_sessions.items():
-                expires_at = datetime.fromisoformat(session_data['expires_at'])
-                if current_time > expires_at:
-                    expired_sessions.append(session_token)
-            
-            # Süresi dolmuş oturumları sil
-            for session_token in expired_sessions:
-                self.invalidate_session(session_token)
+            expired_count = self.session_store.expire()
             
-            if expired_sessions:
-                log_info(f"{len(expired_sessions)} süresi dolmuş oturum temizlendi")
+            if expired_count:
+                log_info(f"{expired_count} süresi dolmuş oturum/sayaç temizlendi")
             
         except Exception as e:
             log_error(f"Oturum temizleme hatası: {e}")
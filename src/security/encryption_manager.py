@@ -6,19 +6,58 @@ import os
 import json
 import base64
 import hashlib
-from typing import Dict, Any, Optional
+import struct
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Dict, Any, Optional, BinaryIO, Callable, Iterator, Tuple
 from datetime import datetime, timedelta
 from cryptography.fernet import Fernet
 from cryptography.hazmat.primitives import hashes
 from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from cryptography.exceptions import InvalidTag
 from src.utils.logger import log_info, log_error, log_debug
 
+# Akış şifreleme formatı: başlık (magic, sürüm, parça boyutu, nonce öneki) + [uzunluk, şifreli parça]*
+STREAM_MAGIC = b"PLBS"
+STREAM_VERSION = 1
+STREAM_HEADER = struct.Struct(">4sBI8s")
+STREAM_LENGTH = struct.Struct(">I")
+DEFAULT_CHUNK_SIZE = 4 * 1024 * 1024
+
+
+@lru_cache(maxsize=8)
+def _derive_master_key(password: str, salt: bytes) -> bytes:
+    """PBKDF2 anahtar türetme (süreç genelinde önbellekli; her örnek yeniden türetmez)"""
+    kdf = PBKDF2HMAC(
+        algorithm=hashes.SHA256(),
+        length=32,
+        salt=salt,
+        iterations=100000,
+    )
+    return base64.urlsafe_b64encode(kdf.derive(password.encode()))
+
+
+def _subkey(master_key: bytes, purpose: bytes) -> bytes:
+    return HKDF(
+        algorithm=hashes.SHA256(),
+        length=32,
+        salt=None,
+        info=purpose,
+    ).derive(base64.urlsafe_b64decode(master_key))
+
+
 class EncryptionManager:
     """AES şifreleme yöneticisi"""
     
     def __init__(self):
         self.master_key = None
         self.fernet = None
+        self.block_cipher = None
+        self.stream_cipher = None
+        self.stream_workers = min(4, os.cpu_count() or 1)
         self.key_file = "data/security/master.key"
         self.salt_file = "data/security/salt.key"
         self._ensure_security_dir()
@@ -46,17 +85,15 @@ class EncryptionManager:
                     f.write(salt)
             
             # Anahtar türet
-            kdf = PBKDF2HMAC(
-                algorithm=hashes.SHA256(),
-                length=32,
-                salt=salt,
-                iterations=100000,
-            )
-            key = base64.urlsafe_b64encode(kdf.derive(master_password.encode()))
+            key = _derive_master_key(master_password, salt)
             
             self.fernet = Fernet(key)
             self.master_key = key
             
+            # Büyük ikili bloklar ve akışlar için ayrı türetilmiş AES-GCM anahtarları (base64 şişmesi yok)
+            self.block_cipher = AESGCM(_subkey(key, b"planb-block-encryption"))
+            self.stream_cipher = AESGCM(_subkey(key, b"planb-stream-encryption"))
+            
             log_info("Şifreleme anahtarları yüklendi")
             
         except Exception as e:
@@ -135,6 +172,168 @@ class EncryptionManager:
             log_error(f"Veri şifre çözme hatası: {e}")
             return None
     
+    def encrypt_block(self, data: bytes, associated_data: bytes = None) -> Optional[bytes]:
+        """İkili bloğu AES-GCM ile şifrele (nonce + şifreli veri)"""
+        try:
+            if not self.block_cipher:
+                log_error("Şifreleme anahtarı yok")
+                return None
+            
+            nonce = os.urandom(12)
+            return nonce + self.block_cipher.encrypt(nonce, data, associated_data)
+            
+        except Exception as e:
+            log_error(f"Blok şifreleme hatası: {e}")
+            return None
+    
+    def decrypt_block(self, token: bytes, associated_data: bytes = None) -> Optional[bytes]:
+        """AES-GCM bloğunun şifresini çöz (değiştirilmiş blok reddedilir)"""
+        try:
+            if not self.block_cipher:
+                log_error("Şifreleme anahtarı yok")
+                return None
+            
+            return self.block_cipher.decrypt(token[:12], token[12:], associated_data)
+            
+        except Exception as e:
+            log_error(f"Blok şifre çözme hatası: {e}")
+            return None
+    
+    def encrypt_stream(self, reader: BinaryIO, writer: BinaryIO, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                       workers: int = None) -> int:
+        """Akışı sabit bellekle parça parça şifrele; işlenen düz metin bayt sayısı
+        
+        Her parça AES-GCM ile ayrı şifrelenir. Nonce = dosya öneki + parça sırası; ek doğrulama
+        verisi başlık, sıra ve son parça bayrağıdır (sıra değişimi ve kesilme reddedilir).
+        """
+        if not self.stream_cipher:
+            raise RuntimeError("Şifreleme anahtarı yok")
+        
+        header = STREAM_HEADER.pack(STREAM_MAGIC, STREAM_VERSION, chunk_size, os.urandom(8))
+        prefix = header[-8:]
+        writer.write(header)
+        total = 0
+        
+        def chunks() -> Iterator[Tuple[int, bytes, bool]]:
+            nonlocal total
+            index, current = 0, reader.read(chunk_size)
+            while True:
+                following = reader.read(chunk_size) if current else b''
+                total += len(current)
+                yield index, current, not following
+                if not following:
+                    return
+                index, current = index + 1, following
+        
+        def seal(job: Tuple[int, bytes, bool]) -> bytes:
+            index, data, final = job
+            aad = header + struct.pack(">IB", index, final)
+            sealed = self.stream_cipher.encrypt(prefix + struct.pack(">I", index), data, aad)
+            return STREAM_LENGTH.pack(len(sealed)) + sealed
+        
+        self._run_ordered(chunks(), seal, writer, workers)
+        return total
+    
+    def decrypt_stream(self, reader: BinaryIO, writer: BinaryIO, workers: int = None) -> int:
+        """`encrypt_stream` çıktısını sabit bellekle çöz; doğrulanamayan akışta ValueError"""
+        if not self.stream_cipher:
+            raise RuntimeError("Şifreleme anahtarı yok")
+        
+        header = reader.read(STREAM_HEADER.size)
+        if len(header) != STREAM_HEADER.size:
+            raise ValueError("Şifreli akış başlığı eksik")
+        magic, version, _, prefix = STREAM_HEADER.unpack(header)
+        if magic != STREAM_MAGIC or version != STREAM_VERSION:
+            raise ValueError("Tanınmayan şifreli akış formatı")
+        
+        def read_sealed() -> Optional[bytes]:
+            length_bytes = reader.read(STREAM_LENGTH.size)
+            if not length_bytes:
+                return None
+            (length,) = STREAM_LENGTH.unpack(length_bytes)
+            sealed = reader.read(length)
+            if len(sealed) != length:
+                raise ValueError("Şifreli akış kesilmiş")
+            return sealed
+        
+        def chunks() -> Iterator[Tuple[int, bytes, bool]]:
+            index, current = 0, read_sealed()
+            if current is None:
+                raise ValueError("Şifreli akışta parça yok")
+            while current is not None:
+                following = read_sealed()
+                yield index, current, following is None
+                index, current = index + 1, following
+        
+        def open_chunk(job: Tuple[int, bytes, bool]) -> bytes:
+            index, sealed, final = job
+            aad = header + struct.pack(">IB", index, final)
+            try:
+                return self.stream_cipher.decrypt(prefix + struct.pack(">I", index), sealed, aad)
+            except InvalidTag:
+                raise ValueError(f"Şifreli parça doğrulanamadı: {index}")
+        
+        return self._run_ordered(chunks(), open_chunk, writer, workers)
+    
+    def _run_ordered(self, jobs: Iterator[Any], func: Callable[[Any], bytes], writer: BinaryIO,
+                     workers: int = None) -> int:
+        """Parçaları paralel işle, sırayla yaz; uçuştaki parça sayısı sınırlı (sabit bellek)"""
+        workers = workers or self.stream_workers
+        written = 0
+        if workers <= 1:
+            for job in jobs:
+                out = func(job)
+                writer.write(out)
+                written += len(out)
+            return written
+        
+        window = deque()
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for job in jobs:
+                window.append(executor.submit(func, job))
+                if len(window) >= workers * 2:
+                    out = window.popleft().result()
+                    writer.write(out)
+                    written += len(out)
+            while window:
+                out = window.popleft().result()
+                writer.write(out)
+                written += len(out)
+        return written
+    
+    def encrypt_file(self, source_path: str, target_path: str, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                     workers: int = None) -> bool:
+        """Dosyayı akış olarak şifrele (hedef atomik olarak yazılır)"""
+        return self._transform_file(
+            source_path, target_path,
+            lambda src, dst: self.encrypt_stream(src, dst, chunk_size, workers), "şifreleme"
+        )
+    
+    def decrypt_file(self, source_path: str, target_path: str, workers: int = None) -> bool:
+        """`encrypt_file` çıktısını akış olarak çöz (hedef atomik olarak yazılır)"""
+        return self._transform_file(
+            source_path, target_path,
+            lambda src, dst: self.decrypt_stream(src, dst, workers), "şifre çözme"
+        )
+    
+    def _transform_file(self, source_path: str, target_path: str,
+                        transform: Callable[[BinaryIO, BinaryIO], int], action: str) -> bool:
+        tmp_path = f"{target_path}.tmp"
+        try:
+            with open(source_path, 'rb') as src, open(tmp_path, 'wb') as dst:
+                transform(src, dst)
+                dst.flush()
+                os.fsync(dst.fileno())
+            os.replace(tmp_path, target_path)
+            log_debug(f"Dosya {action} tamamlandı: {target_path}")
+            return True
+            
+        except Exception as e:
+            log_error(f"Dosya {action} hatası ({source_path}): {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return False
+    
     def encrypt_sensitive_config(self, config_data: Dict[str, Any]) -> bool:
         """Hassas konfigürasyonu şifrele"""
         try:
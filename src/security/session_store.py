@@ -0,0 +1,346 @@
+"""
+PlanB Motoru - Session Store
+Oturum ve rate-limit durumu için bellek içi depo (zamanlama çarkı + periyodik snapshot)
+"""
+import atexit
+import json
+import math
+import os
+import threading
+import time
+from collections.abc import MutableMapping
+from datetime import datetime
+from typing import Dict, List, Optional, Any, Iterable, Iterator, Set, Tuple, Callable
+from src.utils.logger import log_info, log_error, log_debug
+
+DEFAULT_SNAPSHOT_PATH = os.getenv("PLANB_SESSION_SNAPSHOT", "data/security/sessions.snapshot")
+SNAPSHOT_AAD = b"planb-session-snapshot"
+RATE_NAMESPACE = "__rate__"
+
+
+class TimingWheel:
+    """Hashed timing wheel: anahtar, bitiş tikinin `tick % slots` yuvasına konur
+
+    Zamanlama ve iptal O(1); `advance` yalnızca geçen tiklerin yuvalarını dolaşır, her girdi
+    tur başına bir kez görülür (amortize O(1) temizlik).
+    """
+
+    def __init__(self, tick_seconds: float = 1.0, slots: int = 4096, now: float = None):
+        self.tick_seconds = tick_seconds
+        self.slots: List[Set[Any]] = [set() for _ in range(slots)]
+        self.deadlines: Dict[Any, int] = {}
+        self.current_tick = int((time.time() if now is None else now) // tick_seconds)
+
+    def __len__(self) -> int:
+        return len(self.deadlines)
+
+    def schedule(self, key: Any, deadline: float):
+        """Anahtarı `deadline` (epoch saniye) anında süresi dolacak şekilde kaydet"""
+        self.cancel(key)
+        tick = max(math.ceil(deadline / self.tick_seconds), self.current_tick + 1)
+        self.deadlines[key] = tick
+        self.slots[tick % len(self.slots)].add(key)
+
+    def cancel(self, key: Any):
+        tick = self.deadlines.pop(key, None)
+        if tick is not None:
+            self.slots[tick % len(self.slots)].discard(key)
+
+    def advance(self, now: float) -> List[Any]:
+        """Çarkı `now` anına ilerlet; süresi dolan anahtarlar"""
+        target = int(now // self.tick_seconds)
+        if target <= self.current_tick:
+            return []
+        expired = []
+        # Bir turdan uzun boşlukta her yuva bir kez dolaşılması yeterli
+        steps = min(target - self.current_tick, len(self.slots))
+        for tick in range(target - steps + 1, target + 1):
+            slot = self.slots[tick % len(self.slots)]
+            due = [key for key in slot if self.deadlines[key] <= target]
+            for key in due:
+                slot.discard(key)
+                del self.deadlines[key]
+            expired.extend(due)
+        self.current_tick = target
+        return expired
+
+
+class SessionNamespace(MutableMapping):
+    """SessionStore içindeki oturum grubunun sözlük görünümü (Collection ile aynı arayüz)
+
+    Doküman `expires_field` alanındaki ISO zamanda otomatik silinir; okuma/yazma diske dokunmaz.
+    """
+
+    def __init__(self, store: 'SessionStore', name: str, expires_field: str = 'expires_at',
+                 indexes: Iterable[str] = ()):
+        self.store = store
+        self.name = name
+        self.expires_field = expires_field
+        self.indexes = tuple(indexes)
+        self.docs: Dict[str, Any] = {}
+        self.index: Dict[str, Dict[Any, Set[str]]] = {field: {} for field in self.indexes}
+
+    # --- MutableMapping ---
+
+    def __getitem__(self, key: str) -> Any:
+        with self.store._lock:
+            self.store.expire()
+            return self.docs[key]
+
+    def __setitem__(self, key: str, doc: Any):
+        with self.store._lock:
+            self._unindex(key)
+            self.docs[key] = doc
+            for field in self.indexes:
+                self.index[field].setdefault(doc.get(field), set()).add(key)
+            expires_at = doc.get(self.expires_field)
+            if expires_at:
+                self.store.wheel.schedule((self.name, key), datetime.fromisoformat(expires_at).timestamp())
+            else:
+                self.store.wheel.cancel((self.name, key))
+            self.store._dirty = True
+
+    def __delitem__(self, key: str):
+        with self.store._lock:
+            if key not in self.docs:
+                raise KeyError(key)
+            self._remove(key)
+            self.store.wheel.cancel((self.name, key))
+
+    def __contains__(self, key: object) -> bool:
+        with self.store._lock:
+            self.store.expire()
+            return key in self.docs
+
+    def __iter__(self) -> Iterator[str]:
+        with self.store._lock:
+            self.store.expire()
+            return iter(list(self.docs))
+
+    def __len__(self) -> int:
+        with self.store._lock:
+            self.store.expire()
+            return len(self.docs)
+
+    def __repr__(self) -> str:
+        return f"SessionNamespace({self.name!r}, {len(self.docs)} oturum)"
+
+    # --- Doküman işlemleri ---
+
+    def save(self, key: str):
+        """Yerinde değiştirilen dokümanı işaretle (bir sonraki snapshot'a girer)"""
+        with self.store._lock:
+            if key in self.docs:
+                self[key] = self.docs[key]
+
+    def find_keys(self, field: str, value: Any) -> List[str]:
+        with self.store._lock:
+            self.store.expire()
+            return sorted(self.index[field].get(value, ()))
+
+    def _unindex(self, key: str):
+        doc = self.docs.get(key)
+        if doc is None:
+            return
+        for field in self.indexes:
+            keys = self.index[field].get(doc.get(field))
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self.index[field][doc.get(field)]
+
+    def _remove(self, key: str):
+        self._unindex(key)
+        del self.docs[key]
+        self.store._dirty = True
+
+
+class SessionStore:
+    """Oturumlar ve kayan pencereli rate-limit sayaçları için bellek içi depo
+
+    Sıcak yol (doğrulama, rate-limit) yalnızca sözlük erişimi yapar. Durum arka planda
+    periyodik olarak şifreli snapshot'a yazılır ve yeniden başlatmada geri yüklenir.
+    """
+
+    def __init__(self, snapshot_path: Optional[str] = DEFAULT_SNAPSHOT_PATH, snapshot_interval: float = 30.0,
+                 tick_seconds: float = 1.0, wheel_slots: int = 4096, cipher=None,
+                 clock: Callable[[], float] = time.time):
+        if cipher is None and snapshot_path:
+            from src.security.encryption_manager import encryption_manager
+            cipher = encryption_manager
+        self.snapshot_path = snapshot_path
+        self.snapshot_interval = snapshot_interval
+        self.cipher = cipher
+        self.clock = clock
+        self.wheel = TimingWheel(tick_seconds, wheel_slots, now=clock())
+        self.namespaces: Dict[str, SessionNamespace] = {}
+        # anahtar -> [pencere, pencere no, önceki pencere sayısı, bu pencere sayısı]
+        self.counters: Dict[str, List[float]] = {}
+        self.stats = {'expired': 0, 'snapshots': 0}
+
+        self._lock = threading.RLock()
+        self._dirty = False
+        self._pending_docs: Dict[str, Dict[str, Any]] = {}
+        self._stop_event = threading.Event()
+        self._snapshotter = None
+        if snapshot_path:
+            self._load_snapshot()
+            atexit.register(self.close)
+
+    def namespace(self, name: str, expires_field: str = 'expires_at', indexes: Iterable[str] = ()) -> SessionNamespace:
+        """Oturum grubu görünümü (aynı isim için aynı nesne)"""
+        with self._lock:
+            if name not in self.namespaces:
+                namespace = SessionNamespace(self, name, expires_field, indexes)
+                self.namespaces[name] = namespace
+                # Snapshot'tan gelen dokümanlar grup ilk açıldığında yerleşir
+                for key, doc in self._pending_docs.pop(name, {}).items():
+                    namespace[key] = doc
+                self.expire()
+            return self.namespaces[name]
+
+    # ------------------------------------------------------------------
+    # Süre dolumu
+    # ------------------------------------------------------------------
+
+    def expire(self, now: float = None) -> int:
+        """Zamanlama çarkını ilerlet; süresi dolan oturum/sayaç sayısı"""
+        with self._lock:
+            expired = self.wheel.advance(self.clock() if now is None else now)
+            for name, key in expired:
+                if name == RATE_NAMESPACE:
+                    self.counters.pop(key, None)
+                elif name in self.namespaces and key in self.namespaces[name].docs:
+                    self.namespaces[name]._remove(key)
+            if expired:
+                self.stats['expired'] += len(expired)
+                self._dirty = True
+            return len(expired)
+
+    # ------------------------------------------------------------------
+    # Kayan pencereli sayaç
+    # ------------------------------------------------------------------
+
+    def _window_count(self, key: str, window: float, now: float) -> Tuple[List[float], float]:
+        counter = self.counters.get(key)
+        index = int(now // window)
+        if counter is None or counter[0] != window or counter[1] < index - 1:
+            counter = [window, index, 0, 0]
+        elif counter[1] == index - 1:
+            counter = [window, index, counter[3], 0]
+        # Önceki pencerenin kalan payı + bu pencere
+        elapsed = (now % window) / window
+        return counter, counter[2] * (1 - elapsed) + counter[3]
+
+    def hit(self, key: str, window: float, now: float = None) -> float:
+        """Sayaca bir olay ekle; güncel kayan pencere tahmini"""
+        with self._lock:
+            now = self.clock() if now is None else now
+            counter, count = self._window_count(key, window, now)
+            counter[3] += 1
+            self.counters[key] = counter
+            # İki pencere boyunca olay gelmezse sayaç sıfırdır; çark onu siler
+            self.wheel.schedule((RATE_NAMESPACE, key), (counter[1] + 2) * window)
+            self._dirty = True
+            return count + 1
+
+    def count(self, key: str, window: float, now: float = None) -> float:
+        """Son `window` saniyedeki olay sayısı tahmini (iki kovalı kayan pencere)"""
+        with self._lock:
+            if key not in self.counters:
+                return 0.0
+            return self._window_count(key, window, self.clock() if now is None else now)[1]
+
+    def reset(self, key: str):
+        with self._lock:
+            self.counters.pop(key, None)
+            self.wheel.cancel((RATE_NAMESPACE, key))
+            self._dirty = True
+
+    # ------------------------------------------------------------------
+    # Snapshot
+    # ------------------------------------------------------------------
+
+    def snapshot(self) -> bool:
+        """Değişiklik varsa durumu şifreli snapshot dosyasına yaz"""
+        if not self.snapshot_path:
+            return False
+        with self._lock:
+            if not self._dirty:
+                return False
+            state = {
+                'saved_at': self.clock(),
+                'namespaces': {name: dict(namespace.docs) for name, namespace in self.namespaces.items()},
+                'counters': dict(self.counters),
+            }
+            for name, docs in self._pending_docs.items():
+                state['namespaces'].setdefault(name, docs)
+            payload = json.dumps(state, ensure_ascii=False).encode()
+            self._dirty = False
+        try:
+            sealed = self.cipher.encrypt_block(payload, SNAPSHOT_AAD)
+            if sealed is None:
+                raise RuntimeError("Oturum snapshot'ı şifrelenemedi")
+            directory = os.path.dirname(self.snapshot_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            tmp_path = f"{self.snapshot_path}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(sealed)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.snapshot_path)
+            self.stats['snapshots'] += 1
+            log_debug(f"Oturum snapshot'ı yazıldı: {self.snapshot_path}")
+            return True
+        except Exception as e:
+            self._dirty = True
+            log_error(f"Oturum snapshot yazma hatası: {e}")
+            return False
+
+    def _load_snapshot(self):
+        if not os.path.exists(self.snapshot_path):
+            return
+        try:
+            with open(self.snapshot_path, 'rb') as f:
+                payload = self.cipher.decrypt_block(f.read(), SNAPSHOT_AAD)
+            if payload is None:
+                raise ValueError("snapshot doğrulanamadı")
+            state = json.loads(payload)
+            self._pending_docs = state.get('namespaces', {})
+            now = self.clock()
+            for key, counter in state.get('counters', {}).items():
+                window, index = counter[0], counter[1]
+                if (index + 2) * window > now:
+                    self.counters[key] = counter
+                    self.wheel.schedule((RATE_NAMESPACE, key), (index + 2) * window)
+            log_info(f"Oturum snapshot'ı yüklendi: {sum(len(docs) for docs in self._pending_docs.values())} oturum")
+        except Exception as e:
+            log_error(f"Oturum snapshot yükleme hatası: {e}")
+
+    def start(self):
+        """Arka plan snapshot iş parçacığını başlat"""
+        if not self.snapshot_path:
+            return
+        if self._snapshotter is None or not self._snapshotter.is_alive():
+            self._stop_event.clear()
+            self._snapshotter = threading.Thread(target=self._snapshot_loop, daemon=True, name="session-snapshot")
+            self._snapshotter.start()
+
+    def _snapshot_loop(self):
+        while not self._stop_event.wait(self.snapshot_interval):
+            self.expire()
+            self.snapshot()
+
+    def close(self):
+        """Snapshot iş parçacığını durdur ve son durumu yaz"""
+        self._stop_event.set()
+        if self._snapshotter is not None and self._snapshotter is not threading.current_thread():
+            self._snapshotter.join(timeout=1)
+        self.snapshot()
+        atexit.unregister(self.close)
+
+
+# Global session store instance
+session_store = SessionStore()
+session_store.start()
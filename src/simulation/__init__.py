@@ -4,6 +4,7 @@ Simülasyon ve senaryo modülleri
 """
 
 from .scenario_simulator import ScenarioSimulator, scenario_simulator
+from .stress_engine import StressEngine, PortfolioExposure, stress_engine
 
-__all__ = ['ScenarioSimulator', 'scenario_simulator']
+__all__ = ['ScenarioSimulator', 'scenario_simulator', 'StressEngine', 'PortfolioExposure', 'stress_engine']
 
@@ -8,12 +8,15 @@ from typing import Dict, List, Optional, Any, Tuple
 from datetime import datetime, timedelta
 from src.utils.logger import log_info, log_error, log_debug
 from src.portfolio.portfolio_manager import portfolio_manager
+from src.simulation.stress_engine import (stress_engine, symbol_sector,
+                                          CRYPTO_SYMBOLS, COMMODITY_SYMBOLS)
 
 class ScenarioSimulator:
     """Senaryo simülatörü"""
     
     def __init__(self):
         self.portfolio_manager = portfolio_manager
+        self.stress_engine = stress_engine
         self.scenarios = {
             'market_crash': {
                 'name': 'Piyasa Çöküşü',
@@ -111,63 +114,60 @@ class ScenarioSimulator:
                 log_error(f"Senaryo bulunamadı: {scenario_name}")
                 return {}
             
-            # Mevcut portföy değeri
-            current_value = portfolio.cash
-            position_impacts = []
-            
-            for symbol, position in portfolio.positions.items():
-                current_price = position['current_price']
-                quantity = position['quantity']
-                position_value = current_price * quantity
-                
-                # Sembol etkisini hesapla
-                impact = self._calculate_symbol_impact(symbol, scenario, custom_impacts)
-                new_price = current_price * (1 + impact)
-                new_value = new_price * quantity
-                value_change = new_value - position_value
-                value_change_pct = (value_change / position_value * 100) if position_value > 0 else 0
-                
-                position_impacts.append({
-                    'symbol': symbol,
-                    'current_price': current_price,
-                    'new_price': new_price,
-                    'current_value': position_value,
-                    'new_value': new_value,
-                    'value_change': value_change,
-                    'value_change_pct': value_change_pct,
-                    'impact_factor': impact,
-                    'quantity': quantity
-                })
-                
-                current_value += new_value
-            
-            # Toplam etki
-            total_current_value = portfolio.cash + sum(pos['current_value'] for pos in position_impacts)
-            total_new_value = current_value
-            total_change = total_new_value - total_current_value
-            total_change_pct = (total_change / total_current_value * 100) if total_current_value > 0 else 0
-            
-            # Risk analizi
-            risk_analysis = self._analyze_scenario_risk(position_impacts, scenario)
-            
-            return {
-                'scenario_name': scenario['name'],
-                'scenario_description': scenario['description'],
-                'portfolio_name': portfolio_name,
-                'simulation_date': datetime.now().isoformat(),
-                'current_portfolio_value': total_current_value,
-                'simulated_portfolio_value': total_new_value,
-                'total_change': total_change,
-                'total_change_pct': total_change_pct,
-                'position_impacts': position_impacts,
-                'risk_analysis': risk_analysis,
-                'scenario_details': scenario
-            }
+            return self._simulate(portfolio_name, portfolio, scenario, custom_impacts)
             
         except Exception as e:
             log_error(f"Portföy senaryo simülasyonu hatası: {e}")
             return {}
     
+    def _simulate(self, portfolio_name: str, portfolio: Any, scenario: Dict[str, Any],
+                  custom_impacts: Dict[str, float] = None) -> Dict[str, Any]:
+        """Tek senaryoyu şok matrisi motoruyla değerlendir"""
+        exposure = self.stress_engine.portfolio_exposure(portfolio)
+        impacts = self.stress_engine.symbol_impacts(exposure, [scenario], custom_impacts)[0]
+        
+        new_prices = exposure.prices * (1 + impacts)
+        new_values = new_prices * exposure.quantities
+        value_changes = new_values - exposure.values
+        
+        position_impacts = []
+        for i, symbol in enumerate(exposure.symbols):
+            position_value = exposure.values[i]
+            position_impacts.append({
+                'symbol': symbol,
+                'current_price': exposure.prices[i],
+                'new_price': new_prices[i],
+                'current_value': position_value,
+                'new_value': new_values[i],
+                'value_change': value_changes[i],
+                'value_change_pct': (value_changes[i] / position_value * 100) if position_value > 0 else 0,
+                'impact_factor': impacts[i],
+                'quantity': exposure.quantities[i]
+            })
+        
+        # Toplam etki
+        total_current_value = exposure.total_value
+        total_new_value = exposure.cash + float(new_values.sum())
+        total_change = total_new_value - total_current_value
+        total_change_pct = (total_change / total_current_value * 100) if total_current_value > 0 else 0
+        
+        # Risk analizi
+        risk_analysis = self._analyze_scenario_risk(position_impacts, scenario)
+        
+        return {
+            'scenario_name': scenario['name'],
+            'scenario_description': scenario['description'],
+            'portfolio_name': portfolio_name,
+            'simulation_date': datetime.now().isoformat(),
+            'current_portfolio_value': total_current_value,
+            'simulated_portfolio_value': total_new_value,
+            'total_change': total_change,
+            'total_change_pct': total_change_pct,
+            'position_impacts': position_impacts,
+            'risk_analysis': risk_analysis,
+            'scenario_details': scenario
+        }
+    
     def simulate_custom_scenario(self, portfolio_name: str, scenario_data: Dict[str, Any]) -> Dict[str, Any]:
         """Özel senaryo simülasyonu"""
         try:
@@ -188,58 +188,75 @@ class ScenarioSimulator:
             }
             
             # Simülasyonu çalıştır
-            return self.simulate_portfolio_scenario(portfolio_name, 'custom', custom_scenario)
+            return self._simulate(portfolio_name, portfolio, custom_scenario)
             
         except Exception as e:
             log_error(f"Özel senaryo simülasyonu hatası: {e}")
             return {}
     
     def compare_scenarios(self, portfolio_name: str, scenario_names: List[str]) -> Dict[str, Any]:
-        """Birden fazla senaryoyu karşılaştır"""
+        """Birden fazla senaryoyu karşılaştır (tüm senaryolar tek matris çarpımında)"""
         try:
-            results = {}
+            portfolio = self.portfolio_manager.get_portfolio(portfolio_name)
+            if not portfolio:
+                log_error(f"Portföy bulunamadı: {portfolio_name}")
+                return {}
             
-            for scenario_name in scenario_names:
-                result = self.simulate_portfolio_scenario(portfolio_name, scenario_name)
-                if result:
-                    results[scenario_name] = {
-                        'scenario_name': result['scenario_name'],
-                        'total_change_pct': result['total_change_pct'],
-                        'total_change': result['total_change'],
-                        'simulated_value': result['simulated_portfolio_value'],
-                        'risk_score': result['risk_analysis'].get('overall_risk_score', 0)
-                    }
+            names = [name for name in scenario_names if name in self.scenarios]
+            if not names:
+                return {}
+            scenarios = [self.scenarios[name] for name in names]
             
-            # En iyi ve en kötü senaryolar
-            if results:
-                best_scenario = max(results.items(), key=lambda x: x[1]['total_change_pct'])
-                worst_scenario = min(results.items(), key=lambda x: x[1]['total_change_pct'])
-                
-                return {
-                    'portfolio_name': portfolio_name,
-                    'comparison_date': datetime.now().isoformat(),
-                    'scenarios': results,
-                    'best_scenario': {
-                        'name': best_scenario[0],
-                        'change_pct': best_scenario[1]['total_change_pct'],
-                        'change_value': best_scenario[1]['total_change']
-                    },
-                    'worst_scenario': {
-                        'name': worst_scenario[0],
-                        'change_pct': worst_scenario[1]['total_change_pct'],
-                        'change_value': worst_scenario[1]['total_change']
-                    },
-                    'scenario_count': len(results)
+            exposure = self.stress_engine.portfolio_exposure(portfolio)
+            impacts = self.stress_engine.symbol_impacts(exposure, scenarios)
+            changes = self.stress_engine.scenario_pnl(exposure, impacts)
+            total_value = exposure.total_value
+            changes_pct = changes / total_value * 100 if total_value > 0 else np.zeros(len(names))
+            risk_scores = (self.stress_engine.risk_statistics(exposure, impacts, scenarios)['overall_risk_score']
+                           if len(exposure.symbols) else np.zeros(len(names)))
+            
+            results = {}
+            for i, scenario_name in enumerate(names):
+                results[scenario_name] = {
+                    'scenario_name': scenarios[i]['name'],
+                    'total_change_pct': float(changes_pct[i]),
+                    'total_change': float(changes[i]),
+                    'simulated_value': total_value + float(changes[i]),
+                    'risk_score': float(risk_scores[i])
                 }
             
-            return {}
+            # En iyi ve en kötü senaryolar
+            best_scenario = max(results.items(), key=lambda x: x[1]['total_change_pct'])
+            worst_scenario = min(results.items(), key=lambda x: x[1]['total_change_pct'])
+            
+            return {
+                'portfolio_name': portfolio_name,
+                'comparison_date': datetime.now().isoformat(),
+                'scenarios': results,
+                'best_scenario': {
+                    'name': best_scenario[0],
+                    'change_pct': best_scenario[1]['total_change_pct'],
+                    'change_value': best_scenario[1]['total_change']
+                },
+                'worst_scenario': {
+                    'name': worst_scenario[0],
+                    'change_pct': worst_scenario[1]['total_change_pct'],
+                    'change_value': worst_scenario[1]['total_change']
+                },
+                'scenario_count': len(results)
+            }
             
         except Exception as e:
             log_error(f"Senaryo karşılaştırma hatası: {e}")
             return {}
     
-    def stress_test_portfolio(self, portfolio_name: str) -> Dict[str, Any]:
-        """Portföy stres testi"""
+    def stress_test_portfolio(self, portfolio_name: str, bootstrap_scenarios: int = 0,
+                              horizon_days: int = 10) -> Dict[str, Any]:
+        """Portföy stres testi
+        
+        bootstrap_scenarios > 0 ise tanımlı senaryolara ek olarak tarihsel bootstrap
+        senaryolarından kuyruk istatistikleri (VaR / ES) de hesaplanır.
+        """
         try:
             # Tüm senaryoları test et
             all_scenarios = list(self.scenarios.keys())
@@ -249,15 +266,18 @@ class ScenarioSimulator:
                 return {}
             
             # Stres testi metrikleri
-            scenario_changes = [scenario['total_change_pct'] for scenario in comparison_result['scenarios'].values()]
+            scenario_changes = np.array([scenario['total_change_pct']
+                                         for scenario in comparison_result['scenarios'].values()])
+            losses = scenario_changes[scenario_changes < 0]
+            gains = scenario_changes[scenario_changes > 0]
             
             stress_metrics = {
-                'max_loss_pct': min(scenario_changes),
-                'max_gain_pct': max(scenario_changes),
-                'average_change_pct': np.mean(scenario_changes),
-                'volatility': np.std(scenario_changes),
-                'downside_risk': np.mean([change for change in scenario_changes if change < 0]),
-                'upside_potential': np.mean([change for change in scenario_changes if change > 0])
+                'max_loss_pct': float(scenario_changes.min()),
+                'max_gain_pct': float(scenario_changes.max()),
+                'average_change_pct': float(scenario_changes.mean()),
+                'volatility': float(scenario_changes.std()),
+                'downside_risk': float(losses.mean()) if len(losses) else 0.0,
+                'upside_potential': float(gains.mean()) if len(gains) else 0.0
             }
             
             # Risk seviyesi belirleme
@@ -268,7 +288,7 @@ class ScenarioSimulator:
             else:
                 risk_level = 'Düşük Risk'
             
-            return {
+            result = {
                 'portfolio_name': portfolio_name,
                 'stress_test_date': datetime.now().isoformat(),
                 'stress_metrics': stress_metrics,
@@ -277,10 +297,54 @@ class ScenarioSimulator:
                 'recommendations': self._generate_stress_test_recommendations(stress_metrics)
             }
             
+            if bootstrap_scenarios > 0:
+                result['tail_metrics'] = self.historical_stress_test(
+                    portfolio_name, n_scenarios=bootstrap_scenarios, horizon_days=horizon_days
+                )
+            
+            return result
+            
         except Exception as e:
             log_error(f"Stres testi hatası: {e}")
             return {}
     
+    def historical_stress_test(self, portfolio_name: str, n_scenarios: int = 10000,
+                               horizon_days: int = 10, block_days: int = 5,
+                               returns_data: Dict[str, pd.Series] = None,
+                               seed: Optional[int] = None) -> Dict[str, Any]:
+        """Tarihsel bootstrap senaryolarıyla kuyruk istatistikleri
+        
+        Getiri geçmişi verilmezse parquet cache'inden günlük getiri paneli kullanılır.
+        """
+        try:
+            portfolio = self.portfolio_manager.get_portfolio(portfolio_name)
+            if not portfolio:
+                log_error(f"Portföy bulunamadı: {portfolio_name}")
+                return {}
+            
+            from src.risk.portfolio_optimizer import ReturnPanel, portfolio_optimizer
+            
+            exposure = self.stress_engine.portfolio_exposure(portfolio)
+            symbols = list(dict.fromkeys(exposure.symbols))
+            if returns_data:
+                panel = ReturnPanel.from_series({symbol: returns_data[symbol] for symbol in symbols
+                                                 if symbol in returns_data})
+            else:
+                panel = portfolio_optimizer.return_panel(symbols)
+            
+            if panel is None or len(panel) < horizon_days or not panel.symbols:
+                log_error(f"Bootstrap için yetersiz getiri geçmişi: {portfolio_name}")
+                return {}
+            
+            return self.stress_engine.historical_stress(
+                exposure, panel.symbols, panel.returns, n_scenarios=n_scenarios,
+                horizon_days=horizon_days, block_days=block_days, seed=seed
+            )
+            
+        except Exception as e:
+            log_error(f"Tarihsel stres testi hatası: {e}")
+            return {}
+    
     def _calculate_symbol_impact(self, symbol: str, scenario: Dict[str, Any], 
                                custom_impacts: Dict[str, float] = None) -> float:
         """Sembol etkisini hesapla"""
@@ -317,49 +381,15 @@ class ScenarioSimulator:
     
     def _get_symbol_sector(self, symbol: str) -> str:
         """Sembol sektörünü belirle"""
-        try:
-            # Basit sektör eşleştirmesi
-            sector_mapping = {
-                # Teknoloji
-                'AAPL': 'technology', 'MSFT': 'technology', 'GOOGL': 'technology',
-                'AMZN': 'technology', 'META': 'technology', 'NVDA': 'technology',
-                'TSLA': 'technology', 'NFLX': 'technology',
-                
-                # Finans
-                'JPM': 'finance', 'BAC': 'finance', 'WFC': 'finance',
-                'GS': 'finance', 'MS': 'finance',
-                
-                # Sağlık
-                'JNJ': 'healthcare', 'PFE': 'healthcare', 'UNH': 'healthcare',
-                'ABBV': 'healthcare', 'LLY': 'healthcare',
-                
-                # Enerji
-                'XOM': 'energy', 'CVX': 'energy', 'SHEL': 'energy', 'BP': 'energy',
-                
-                # Tüketici
-                'WMT': 'consumer', 'HD': 'consumer', 'MCD': 'consumer',
-                'NKE': 'consumer', 'KO': 'consumer', 'PEP': 'consumer',
-                
-                # BIST
-                'THYAO.IS': 'technology', 'AKBNK.IS': 'finance', 'GARAN.IS': 'finance',
-                'ISCTR.IS': 'finance', 'SAHOL.IS': 'consumer', 'TUPRS.IS': 'energy',
-                'KRDMD.IS': 'energy', 'SASA.IS': 'consumer'
-            }
-            
-            return sector_mapping.get(symbol, 'other')
-            
-        except Exception as e:
-            return 'other'
+        return symbol_sector(symbol)
     
     def _is_crypto_symbol(self, symbol: str) -> bool:
         """Kripto sembol mü kontrol et"""
-        crypto_symbols = ['BTC', 'ETH', 'ADA', 'DOT', 'SOL', 'AVAX', 'MATIC', 'ATOM', 'XRP']
-        return symbol in crypto_symbols
+        return symbol in CRYPTO_SYMBOLS
     
     def _is_commodity_symbol(self, symbol: str) -> bool:
         """Emtia sembol mü kontrol et"""
-        commodity_symbols = ['GOLD', 'SILVER', 'OIL', 'GAS']
-        return symbol in commodity_symbols
+        return symbol in COMMODITY_SYMBOLS
     
     def _analyze_scenario_risk(self, position_impacts: List[Dict[str, Any]], 
                              scenario: Dict[str, Any]) -> Dict[str, Any]:
@@ -0,0 +1,265 @@
+"""
+PlanB Motoru - Stress Engine
+Şok matrisi x maruziyet matrisi ile toplu senaryo ve bootstrap stres hesabı
+"""
+from collections import OrderedDict
+from typing import Dict, List, Optional, Any, Tuple, Sequence
+
+import numpy as np
+
+from src.utils.logger import log_info, log_error, log_debug
+
+SECTORS = ('technology', 'finance', 'healthcare', 'energy', 'consumer', 'utilities')
+# Faktör sırası: genel piyasa, sektörler, kripto, emtia
+FACTORS = ('market',) + SECTORS + ('crypto', 'commodity')
+FACTOR_INDEX = {factor: i for i, factor in enumerate(FACTORS)}
+SECTOR_WEIGHT = 0.7  # Sektör etkisi genel piyasaya %70 ağırlıkla eklenir
+
+SECTOR_MAPPING = {
+    # Teknoloji
+    'AAPL': 'technology', 'MSFT': 'technology', 'GOOGL': 'technology',
+    'AMZN': 'technology', 'META': 'technology', 'NVDA': 'technology',
+    'TSLA': 'technology', 'NFLX': 'technology',
+
+    # Finans
+    'JPM': 'finance', 'BAC': 'finance', 'WFC': 'finance',
+    'GS': 'finance', 'MS': 'finance',
+
+    # Sağlık
+    'JNJ': 'healthcare', 'PFE': 'healthcare', 'UNH': 'healthcare',
+    'ABBV': 'healthcare', 'LLY': 'healthcare',
+
+    # Enerji
+    'XOM': 'energy', 'CVX': 'energy', 'SHEL': 'energy', 'BP': 'energy',
+
+    # Tüketici
+    'WMT': 'consumer', 'HD': 'consumer', 'MCD': 'consumer',
+    'NKE': 'consumer', 'KO': 'consumer', 'PEP': 'consumer',
+
+    # BIST
+    'THYAO.IS': 'technology', 'AKBNK.IS': 'finance', 'GARAN.IS': 'finance',
+    'ISCTR.IS': 'finance', 'SAHOL.IS': 'consumer', 'TUPRS.IS': 'energy',
+    'KRDMD.IS': 'energy', 'SASA.IS': 'consumer'
+}
+CRYPTO_SYMBOLS = frozenset(['BTC', 'ETH', 'ADA', 'DOT', 'SOL', 'AVAX', 'MATIC', 'ATOM', 'XRP'])
+COMMODITY_SYMBOLS = frozenset(['GOLD', 'SILVER', 'OIL', 'GAS'])
+
+
+def symbol_sector(symbol: str) -> str:
+    """Sembol sektörü (eşleşme yoksa 'other')"""
+    return SECTOR_MAPPING.get(symbol, 'other')
+
+
+class PortfolioExposure:
+    """Bir portföyün pozisyon vektörleri ve (faktör x sembol) maruziyet matrisi"""
+
+    def __init__(self, symbols: List[str], prices: np.ndarray, quantities: np.ndarray,
+                 exposure: np.ndarray, cash: float = 0.0):
+        self.symbols = symbols
+        self.prices = prices
+        self.quantities = quantities
+        self.values = prices * quantities
+        self.exposure = exposure
+        self.cash = cash
+
+    @property
+    def total_value(self) -> float:
+        return float(self.cash + self.values.sum())
+
+
+class StressEngine:
+    """Senaryoları (senaryo x faktör) şok matrisine çevirip tek matris çarpımıyla değerlendirir
+
+    Sembol etkisi = piyasa + 0.7 * sektör; kripto ve emtia sembolleri yalnızca kendi
+    faktörünü taşır. Sembole özel etkiler (symbol_impacts / custom_impacts) faktör
+    modelini ezen seyrek bir maske olarak uygulanır.
+    """
+
+    def __init__(self, max_cached: int = 32):
+        self.max_cached = max_cached
+        self._exposures: 'OrderedDict[Tuple[str, ...], np.ndarray]' = OrderedDict()
+
+    # ------------------------------------------------------------------
+    # Maruziyet
+    # ------------------------------------------------------------------
+
+    def exposure_matrix(self, symbols: Sequence[str]) -> np.ndarray:
+        """(faktör x sembol) maruziyet matrisi; sembol kümesi başına bir kez kurulur"""
+        key = tuple(symbols)
+        exposure = self._exposures.get(key)
+        if exposure is not None:
+            self._exposures.move_to_end(key)
+            return exposure
+
+        exposure = np.zeros((len(FACTORS), len(key)))
+        for column, symbol in enumerate(key):
+            if symbol in CRYPTO_SYMBOLS:
+                exposure[FACTOR_INDEX['crypto'], column] = 1.0
+            elif symbol in COMMODITY_SYMBOLS:
+                exposure[FACTOR_INDEX['commodity'], column] = 1.0
+            else:
+                exposure[FACTOR_INDEX['market'], column] = 1.0
+                sector = symbol_sector(symbol)
+                if sector in FACTOR_INDEX:
+                    exposure[FACTOR_INDEX[sector], column] = SECTOR_WEIGHT
+
+        self._exposures[key] = exposure
+        while len(self._exposures) > self.max_cached:
+            self._exposures.popitem(last=False)
+        log_debug(f"Maruziyet matrisi kuruldu: {len(key)} sembol")
+        return exposure
+
+    def portfolio_exposure(self, portfolio: Any) -> Optional[PortfolioExposure]:
+        """Portfolio nesnesinden (Position listesi veya sembol -> dict) maruziyet"""
+        positions = portfolio.positions
+        if isinstance(positions, dict):
+            rows = [(symbol, pos['current_price'], pos['quantity']) for symbol, pos in positions.items()]
+        else:
+            rows = [(pos.symbol, pos.current_price, pos.quantity) for pos in positions]
+        symbols = [row[0] for row in rows]
+        prices = np.array([row[1] for row in rows], dtype=np.float64)
+        quantities = np.array([row[2] for row in rows], dtype=np.float64)
+        return PortfolioExposure(symbols, prices, quantities, self.exposure_matrix(symbols),
+                                 float(getattr(portfolio, 'cash', 0.0)))
+
+    # ------------------------------------------------------------------
+    # Şok matrisi ve değerlendirme
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def shock_matrix(scenarios: Sequence[Dict[str, Any]]) -> np.ndarray:
+        """Senaryo sözlüklerinden (senaryo x faktör) şok matrisi"""
+        shocks = np.zeros((len(scenarios), len(FACTORS)))
+        for row, scenario in enumerate(scenarios):
+            shocks[row, FACTOR_INDEX['market']] = scenario.get('market_impact', 0.0)
+            for sector, impact in (scenario.get('sector_impacts') or {}).items():
+                if sector in FACTOR_INDEX:
+                    shocks[row, FACTOR_INDEX[sector]] = impact
+            shocks[row, FACTOR_INDEX['crypto']] = scenario.get('crypto_impact', 0.0)
+            shocks[row, FACTOR_INDEX['commodity']] = scenario.get('commodity_impact', 0.0)
+        return shocks
+
+    def symbol_impacts(self, exposure: PortfolioExposure, scenarios: Sequence[Dict[str, Any]],
+                       custom_impacts: Dict[str, float] = None) -> np.ndarray:
+        """(senaryo x sembol) fiyat etkisi: şok @ maruziyet, ardından sembole özel etkiler"""
+        impacts = self.shock_matrix(scenarios) @ exposure.exposure
+        column_of = {}
+        for column, symbol in enumerate(exposure.symbols):
+            column_of.setdefault(symbol, []).append(column)
+
+        for row, scenario in enumerate(scenarios):
+            for symbol, impact in (scenario.get('symbol_impacts') or {}).items():
+                impacts[row, column_of.get(symbol, [])] = impact
+        for symbol, impact in (custom_impacts or {}).items():
+            impacts[:, column_of.get(symbol, [])] = impact
+        return impacts
+
+    @staticmethod
+    def scenario_pnl(exposure: PortfolioExposure, impacts: np.ndarray) -> np.ndarray:
+        """Senaryo başına toplam değer değişimi (tek matris-vektör çarpımı)"""
+        return impacts @ exposure.values
+
+    @staticmethod
+    def risk_statistics(exposure: PortfolioExposure, impacts: np.ndarray,
+                        scenarios: Sequence[Dict[str, Any]]) -> Dict[str, np.ndarray]:
+        """Senaryo başına risk analizi metrikleri (ScenarioSimulator._analyze_scenario_risk ile aynı)"""
+        values = exposure.values
+        change_pct = np.where(values > 0, impacts * 100, 0.0)
+        total_value = values.sum()
+        weighted = change_pct @ values / total_value if total_value > 0 else np.zeros(len(impacts))
+        volatility = change_pct.std(axis=1)
+        severity = np.array([abs(scenario.get('market_impact', 0)) * 100 for scenario in scenarios])
+        return {
+            'max_loss_pct': change_pct.min(axis=1),
+            'max_gain_pct': change_pct.max(axis=1),
+            'average_impact_pct': change_pct.mean(axis=1),
+            'weighted_avg_impact_pct': weighted,
+            'impact_volatility': volatility,
+            'overall_risk_score': np.abs(weighted) + volatility,
+            'scenario_severity': severity,
+        }
+
+    # ------------------------------------------------------------------
+    # Tarihsel bootstrap
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def bootstrap_returns(daily_returns: np.ndarray, n_scenarios: int = 10000, horizon_days: int = 10,
+                          block_days: int = 5, seed: Optional[int] = None) -> np.ndarray:
+        """Blok bootstrap ile (senaryo x sembol) ufuk getirileri
+
+        Ufuk, rastgele başlangıçlı `block_days` uzunluğunda tarihsel bloklardan oluşur;
+        bloklar tüm semboller için aynı günleri kullandığından korelasyon korunur. Blok
+        toplamları kümülatif log-getiri farkıyla tek gather işlemine iner.
+        """
+        rng = np.random.default_rng(seed)
+        log_returns = np.log1p(np.clip(daily_returns, -0.99, None))
+        n_days, n_symbols = log_returns.shape
+        block_days = max(1, min(block_days, horizon_days, n_days))
+        cumulative = np.vstack([np.zeros(n_symbols), np.cumsum(log_returns, axis=0)])
+
+        total = np.zeros((n_scenarios, n_symbols))
+        remaining = horizon_days
+        while remaining > 0:
+            length = min(block_days, remaining)
+            starts = rng.integers(0, n_days - length + 1, n_scenarios)
+            total += cumulative[starts + length] - cumulative[starts]
+            remaining -= length
+        return np.expm1(total)
+
+    @staticmethod
+    def tail_statistics(pnl: np.ndarray, total_value: float,
+                        confidence_levels: Sequence[float] = (0.95, 0.99)) -> Dict[str, Any]:
+        """Senaryo P&L dağılımından VaR / Expected Shortfall ve özet metrikler"""
+        ordered = np.sort(pnl)
+        stats = {
+            'scenario_count': int(len(pnl)),
+            'mean_change': float(pnl.mean()),
+            'worst_change': float(ordered[0]),
+            'best_change': float(ordered[-1]),
+            'loss_probability': float((pnl < 0).mean()),
+        }
+        for confidence in confidence_levels:
+            cutoff = max(1, int(np.floor(len(ordered) * (1 - confidence))))
+            var_value = -float(ordered[cutoff - 1])
+            es_value = -float(ordered[:cutoff].mean())
+            label = int(round(confidence * 100))
+            stats[f'var_{label}'] = var_value
+            stats[f'es_{label}'] = es_value
+            stats[f'var_{label}_pct'] = var_value / total_value * 100 if total_value > 0 else 0.0
+            stats[f'es_{label}_pct'] = es_value / total_value * 100 if total_value > 0 else 0.0
+        return stats
+
+    def historical_stress(self, exposure: PortfolioExposure, symbols: Sequence[str], daily_returns: np.ndarray,
+                          n_scenarios: int = 10000, horizon_days: int = 10, block_days: int = 5,
+                          seed: Optional[int] = None) -> Dict[str, Any]:
+        """Tarihsel bootstrap senaryolarıyla portföy kuyruk istatistikleri
+
+        `daily_returns` (gün x sembol) `symbols` sırasındadır. Geçmişi olmayan pozisyonlar
+        o günün eşit ağırlıklı ortalama getirisini (beta 1) taşır.
+        """
+        try:
+            column_of = {symbol: i for i, symbol in enumerate(symbols)}
+            market = daily_returns.mean(axis=1, keepdims=True)
+            panel = np.hstack([daily_returns, market])
+            columns = np.array([column_of.get(symbol, len(symbols)) for symbol in exposure.symbols])
+
+            returns = self.bootstrap_returns(panel, n_scenarios, horizon_days, block_days, seed)
+            pnl = returns[:, columns] @ exposure.values
+            stats = self.tail_statistics(pnl, exposure.total_value)
+            stats.update({
+                'horizon_days': horizon_days,
+                'block_days': block_days,
+                'history_days': int(len(daily_returns)),
+                'proxied_positions': int((columns == len(symbols)).sum()),
+            })
+            log_info(f"Bootstrap stres testi: {n_scenarios} senaryo, {len(exposure.symbols)} pozisyon")
+            return stats
+
+        except Exception as e:
+            log_error(f"Bootstrap stres testi hatası: {e}")
+            return {}
+
+
+# Global stress engine instance
+stress_engine = StressEngine()
@@ -0,0 +1,11 @@
+"""
+PlanB Motoru - Storage Module
+Ortak doküman deposu, columnar olay gölü ve bar arşivi
+"""
+
+from .document_store import DocumentStore, Collection, document_store, migrate_json_file
+from .columnar_lake import ColumnarLake
+from .market_archive import MarketArchive, ArchiveWriter, market_archive, symbol_bucket
+
+__all__ = ['DocumentStore', 'Collection', 'document_store', 'migrate_json_file', 'ColumnarLake',
+           'MarketArchive', 'ArchiveWriter', 'market_archive', 'symbol_bucket']
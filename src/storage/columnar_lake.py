@@ -0,0 +1,503 @@
+"""
+PlanB Motoru - Columnar Lake
+Tarih bölümlü, blok başına şifreli Parquet olay deposu ve manifest indeksi
+"""
+import atexit
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, date
+from typing import Dict, List, Optional, Any, Iterable, Tuple
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+from src.utils.logger import log_info, log_error, log_debug
+
+# Manifest'te değer kümesi tutulacak düşük kardinaliteli metin kolonları için üst sınır
+MAX_TRACKED_VALUES = 64
+
+FILTER_OPS = ('==', '!=', '<', '<=', '>', '>=', 'in')
+
+Filter = Tuple[str, str, Any]
+
+# promote_options pyarrow 14 ile geldi; requirements pyarrow>=10 olduğundan eski sürümlerde promote=True kullanılır
+PERMISSIVE_CONCAT = int(pa.__version__.split('.')[0]) >= 14
+
+
+def _to_json_value(value: Any) -> Any:
+    if isinstance(value, (datetime, pd.Timestamp)):
+        return value.isoformat()
+    return value
+
+
+def _concat_frames(tables: List[pa.Table]) -> pd.DataFrame:
+    """Şemaları farklı olabilen blokları tek DataFrame'de birleştir"""
+    if PERMISSIVE_CONCAT:
+        return pa.concat_tables(tables, promote_options='permissive').to_pandas()
+    try:
+        # Eski sürümler yalnızca eksik kolonları null ile doldurur; tip genişletme pandas'a bırakılır
+        return pa.concat_tables(tables, promote=True).to_pandas()
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        return pd.concat([table.to_pandas() for table in tables], ignore_index=True)
+
+
+def _column_array(values: pd.Series) -> pa.Array:
+    """Kolonu Arrow dizisine çevir; karışık tipli kolonlar metne düşer"""
+    try:
+        return pa.array(values, from_pandas=True)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        return pa.array(values.map(lambda v: None if v is None or v is pd.NA else str(v)), type=pa.string())
+
+
+def _is_text(kind: pa.DataType) -> bool:
+    return pa.types.is_string(kind) or pa.types.is_large_string(kind)
+
+
+def _block_stats(table: pa.Table) -> Dict[str, Dict[str, Any]]:
+    """Blok kolonlarının min/max ve (düşük kardinalitede) değer kümesi"""
+    stats: Dict[str, Dict[str, Any]] = {}
+    for name, column in zip(table.column_names, table.columns):
+        entry: Dict[str, Any] = {'nulls': column.null_count}
+        kind = column.type
+        if (pa.types.is_integer(kind) or pa.types.is_floating(kind) or pa.types.is_timestamp(kind)
+                or _is_text(kind) or pa.types.is_boolean(kind)):
+            if column.null_count < len(column):
+                bounds = pc.min_max(column)
+                entry['min'] = _to_json_value(bounds['min'].as_py())
+                entry['max'] = _to_json_value(bounds['max'].as_py())
+            if _is_text(kind) or pa.types.is_boolean(kind):
+                unique = pc.unique(column.drop_null())
+                if len(unique) <= MAX_TRACKED_VALUES:
+                    entry['values'] = sorted(unique.to_pylist())
+        stats[name] = entry
+    return stats
+
+
+def _may_match(stats: Optional[Dict[str, Any]], op: str, value: Any) -> bool:
+    """Manifest istatistiklerine göre blok filtreyi sağlayabilir mi (emin değilse True)"""
+    if stats is None:
+        # Kolon blokta yok: tüm değerler null, hiçbir karşılaştırma sağlanmaz
+        return False
+    try:
+        values = stats.get('values')
+        if values is not None:
+            if op == '==':
+                return value in values
+            if op == 'in':
+                return any(v in values for v in value)
+            if op == '!=':
+                return values != [value]
+        if 'min' not in stats:
+            return False
+        low, high = stats['min'], stats['max']
+        if isinstance(value, (datetime, pd.Timestamp)):
+            value = value.isoformat()
+        if op == '==':
+            return low <= value <= high
+        if op == 'in':
+            return any(low <= v <= high for v in value)
+        if op == '<':
+            return low < value
+        if op == '<=':
+            return low <= value
+        if op == '>':
+            return high > value
+        if op == '>=':
+            return high >= value
+    except TypeError:
+        pass
+    return True
+
+
+class ColumnarLake:
+    """Kategori/gün bölümlü şifreli Parquet blokları
+
+    - Olaylar bellekte biriktirilir ve `block_rows` satırlık bloklar halinde yazılır; arka plan
+      zamanlayıcısı `max_buffer_age` saniyeyi geçen tamponları yeni olay beklemeden yazar.
+    - Her blok ayrı AES-GCM ile şifrelenir; blok yolu ek doğrulama verisidir.
+    - `_manifest.json` blok başına satır sayısı, zaman aralığı ve kolon istatistiklerini tutar;
+      sorgular bölüm ve blokları çözmeden eler, okunan bloklarda yalnızca istenen kolonlar çözülür.
+    - Her yazım manifest'i baştan yazmak yerine `_manifest.log` günlüğüne tek satır ekler;
+      günlük `manifest_rollover` satıra ulaşınca manifest'e katlanır.
+    - `compact()` bir günün küçük bloklarını `block_rows` satırlık bloklarda birleştirir.
+    """
+
+    def __init__(self, root: str, cipher=None, block_rows: int = 50000, row_group_size: int = 16384,
+                 max_buffer_age: float = 5.0, max_workers: int = 4, flush_interval: float = 1.0,
+                 manifest_rollover: int = 256, compact_interval: float = 3600.0,
+                 compact_min_blocks: int = 32):
+        if cipher is None:
+            from src.security.encryption_manager import encryption_manager
+            cipher = encryption_manager
+        self.root = root
+        self.cipher = cipher
+        self.block_rows = block_rows
+        self.row_group_size = row_group_size
+        self.max_buffer_age = max_buffer_age
+        self.max_workers = max_workers
+        self.manifest_rollover = manifest_rollover
+        self.compact_interval = compact_interval
+        self.compact_min_blocks = compact_min_blocks
+        self.manifest_file = os.path.join(root, "_manifest.json")
+        self.journal_file = os.path.join(root, "_manifest.log")
+
+        self._lock = threading.RLock()
+        self._buffers: Dict[str, List[Dict[str, Any]]] = {}
+        self._buffer_started: Dict[str, float] = {}
+        # Birleştirilen blokların dosyaları, süren okuma kalmayınca silinir
+        self._active_scans = 0
+        self._retired: List[str] = []
+        self.stats = {'blocks_written': 0, 'rows_written': 0, 'blocks_read': 0, 'blocks_pruned': 0,
+                      'manifest_appends': 0, 'manifest_rollovers': 0, 'blocks_compacted': 0}
+
+        os.makedirs(root, exist_ok=True)
+        self.manifest = self._load_manifest()
+        atexit.register(self.flush)
+
+        self._stop = threading.Event()
+        self._flusher = None
+        if flush_interval and flush_interval > 0:
+            self._flusher = threading.Thread(target=self._flush_loop, args=(flush_interval,),
+                                             name=f"lake-flush-{os.path.basename(root)}", daemon=True)
+            self._flusher.start()
+
+    # ------------------------------------------------------------------
+    # Manifest
+    # ------------------------------------------------------------------
+
+    def _load_manifest(self) -> Dict[str, Any]:
+        """Manifest'i aç ve günlüğü üzerine uygula; günlük varsa hemen manifest'e katlanır"""
+        manifest = {'version': 2, 'next_block': 0, 'blocks': []}
+        if os.path.exists(self.manifest_file):
+            with open(self.manifest_file, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+        self._journal_entries = 0
+        if not os.path.exists(self.journal_file):
+            return manifest
+
+        ids = {block['id'] for block in manifest['blocks']}
+        with open(self.journal_file, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    log_error(f"Lake manifest günlüğünde yarım satır atlandı: {self.journal_file}")
+                    break
+                # Katlama sırasında kesilen açılışta aynı satır ikinci kez gelebilir
+                removed = set(entry.get('remove', ()))
+                if removed:
+                    manifest['blocks'] = [b for b in manifest['blocks'] if b['id'] not in removed]
+                    ids -= removed
+                added = [b for b in entry.get('add', ()) if b['id'] not in ids and b['id'] not in removed]
+                manifest['blocks'].extend(added)
+                ids.update(b['id'] for b in added)
+                manifest['next_block'] = max(manifest['next_block'], entry.get('next_block', 0))
+        self.manifest = manifest
+        self._save_manifest()
+        return manifest
+
+    def _save_manifest(self):
+        """Manifest'i atomik olarak yeniden yaz ve günlüğü sıfırla (rollover)"""
+        tmp_path = f"{self.manifest_file}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.manifest, f, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.manifest_file)
+        if os.path.exists(self.journal_file):
+            os.remove(self.journal_file)
+        self._journal_entries = 0
+        self.stats['manifest_rollovers'] += 1
+
+    def _commit(self, added: List[Dict[str, Any]], removed: Iterable[int] = ()):
+        """Blok ekleme/çıkarmalarını günlüğe tek satır olarak yaz (fsync), sonra bellekte uygula"""
+        removed = sorted(set(removed))
+        if not added and not removed:
+            return
+        entry = {'next_block': self.manifest['next_block'], 'add': added, 'remove': removed}
+        with open(self.journal_file, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        if removed:
+            dropped = set(removed)
+            self.manifest['blocks'] = [b for b in self.manifest['blocks'] if b['id'] not in dropped]
+        self.manifest['blocks'].extend(added)
+        self._journal_entries += 1
+        self.stats['manifest_appends'] += 1
+        if self._journal_entries >= self.manifest_rollover:
+            self._save_manifest()
+
+    def blocks(self, category: Optional[str] = None) -> List[Dict[str, Any]]:
+        return [b for b in self.manifest['blocks'] if category is None or b['category'] == category]
+
+    # ------------------------------------------------------------------
+    # Yazma
+    # ------------------------------------------------------------------
+
+    def append(self, category: str, row: Dict[str, Any]):
+        """Tek olay ekle (`ts` yoksa şimdiki zaman)"""
+        row.setdefault('ts', datetime.now())
+        with self._lock:
+            buffer = self._buffers.setdefault(category, [])
+            if not buffer:
+                self._buffer_started[category] = time.monotonic()
+            buffer.append(row)
+            due = (len(buffer) >= self.block_rows
+                   or time.monotonic() - self._buffer_started[category] >= self.max_buffer_age)
+        if due:
+            self.flush(category)
+
+    def append_frame(self, category: str, frame: pd.DataFrame) -> int:
+        """DataFrame'i doğrudan bloklara yaz (toplu yükleme); yazılan blok sayısı"""
+        if 'ts' not in frame.columns:
+            raise ValueError("Olay tablosunda 'ts' kolonu gerekli")
+        with self._lock:
+            entries = self._write_frame(category, frame)
+            self._commit(entries)
+        return len(entries)
+
+    def flush(self, category: Optional[str] = None) -> int:
+        """Bekleyen olayları blok olarak yaz"""
+        with self._lock:
+            categories = [category] if category is not None else list(self._buffers)
+            entries = []
+            for name in categories:
+                rows = self._buffers.pop(name, None)
+                self._buffer_started.pop(name, None)
+                if rows:
+                    entries += self._write_frame(name, pd.DataFrame(rows))
+            self._commit(entries)
+            return len(entries)
+
+    def flush_due(self) -> int:
+        """Yalnızca max_buffer_age süresini dolduran tamponları yaz"""
+        now = time.monotonic()
+        with self._lock:
+            due = [name for name, started in self._buffer_started.items() if now - started >= self.max_buffer_age]
+        return sum(self.flush(name) for name in due)
+
+    def _flush_loop(self, interval: float):
+        """Arka plan zamanlayıcısı: süresi dolan tamponları yaz, saatlik olarak günleri birleştir"""
+        last_compact = time.monotonic()
+        while not self._stop.wait(interval):
+            try:
+                self.flush_due()
+                if self.compact_interval and time.monotonic() - last_compact >= self.compact_interval:
+                    last_compact = time.monotonic()
+                    self.compact()
+            except Exception as e:
+                log_error(f"Lake arka plan yazım hatası: {e}")
+
+    def _write_frame(self, category: str, frame: pd.DataFrame) -> List[Dict[str, Any]]:
+        """Olayları gün bölümlerine blok olarak yaz; manifest girdilerini döndür (commit çağıranda)"""
+        frame = frame.copy()
+        frame['ts'] = pd.to_datetime(frame['ts'])
+        frame = frame.sort_values('ts', kind='stable').reset_index(drop=True)
+        days = frame['ts'].values.astype('datetime64[D]')
+
+        # Sıralı zaman damgalarında her gün ardışık bir aralıktır
+        jobs = []
+        unique_days, starts = np.unique(days, return_index=True)
+        bounds = list(starts) + [len(frame)]
+        for i, day in enumerate(unique_days):
+            for start in range(bounds[i], bounds[i + 1], self.block_rows):
+                stop = min(start + self.block_rows, bounds[i + 1])
+                block_id = self.manifest['next_block']
+                self.manifest['next_block'] += 1
+                path = f"{category}/date={day}/part-{block_id:06d}.parquet.enc"
+                jobs.append((block_id, str(day), path, frame.iloc[start:stop]))
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            entries = list(executor.map(lambda job: self._write_block(category, *job), jobs))
+        self.stats['blocks_written'] += len(entries)
+        self.stats['rows_written'] += sum(entry['rows'] for entry in entries)
+        return entries
+
+    def _write_block(self, category: str, block_id: int, day: str, path: str,
+                     chunk: pd.DataFrame) -> Dict[str, Any]:
+        table = pa.table({name: _column_array(chunk[name]) for name in chunk.columns})
+        sink = pa.BufferOutputStream()
+        pq.write_table(table, sink, compression='zstd', row_group_size=self.row_group_size)
+        token = self.cipher.encrypt_block(sink.getvalue().to_pybytes(), path.encode())
+        if token is None:
+            raise RuntimeError(f"Blok şifrelenemedi: {path}")
+
+        full_path = os.path.join(self.root, path)
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        with open(f"{full_path}.tmp", 'wb') as f:
+            f.write(token)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(f"{full_path}.tmp", full_path)
+
+        stats = _block_stats(table)
+        log_debug(f"Lake bloğu yazıldı: {path} ({table.num_rows} satır)")
+        return {
+            'id': block_id,
+            'category': category,
+            'date': day,
+            'path': path,
+            'rows': table.num_rows,
+            'bytes': len(token),
+            'min_ts': stats['ts']['min'],
+            'max_ts': stats['ts']['max'],
+            'columns': stats,
+        }
+
+    # ------------------------------------------------------------------
+    # Sıkıştırma (compaction)
+    # ------------------------------------------------------------------
+
+    def compact(self, category: Optional[str] = None, include_today: bool = False) -> int:
+        """Gün bölümlerindeki küçük blokları `block_rows` satırlık bloklarda birleştir
+
+        Geçmiş günler her zaman, bugün yalnızca `compact_min_blocks` küçük bloğu aşınca (ya da
+        include_today ile) birleştirilir. Yeni bloklar ve eski blokların çıkarılması günlüğe tek
+        satırda yazılır; eski dosyalar süren okuma kalmayınca silinir. Birleştirilen gün sayısı döner.
+        """
+        today = date.today().isoformat()
+        with self._lock:
+            groups: Dict[Tuple[str, str], List[Dict[str, Any]]] = {}
+            for block in self.blocks(category):
+                groups.setdefault((block['category'], block['date']), []).append(block)
+        compacted = 0
+        for (name, day), blocks in sorted(groups.items()):
+            small = [b for b in blocks if b['rows'] < self.block_rows]
+            if len(small) < 2:
+                continue
+            if day >= today and not include_today and len(small) < self.compact_min_blocks:
+                continue
+            with self._lock:
+                current = {b['id'] for b in self.blocks(name)}
+                if not all(b['id'] in current for b in small):
+                    continue                    # başka bir sıkıştırma değiştirmiş
+                frame = _concat_frames([self._read_block(b) for b in small])
+                entries = self._write_frame(name, frame)
+                self._commit(entries, removed=[b['id'] for b in small])
+                self._retired.extend(b['path'] for b in small)
+                self.stats['blocks_compacted'] += len(small)
+                self._drop_retired()
+            compacted += 1
+            log_debug(f"Lake günü birleştirildi: {name}/{day} {len(small)} -> {len(entries)} blok")
+        return compacted
+
+    def _drop_retired(self):
+        """Birleştirilmiş blok dosyalarını sil (kilit altında, süren okuma yoksa)"""
+        if self._active_scans:
+            return
+        for path in self._retired:
+            try:
+                os.remove(os.path.join(self.root, path))
+            except FileNotFoundError:
+                pass
+        self._retired = []
+
+    # ------------------------------------------------------------------
+    # Okuma
+    # ------------------------------------------------------------------
+
+    def _read_block(self, block: Dict[str, Any], columns: Optional[List[str]] = None,
+                    filters: Optional[List[Filter]] = None) -> pa.Table:
+        token = self._read_file(block['path'])
+        plain = self.cipher.decrypt_block(token, block['path'].encode())
+        if plain is None:
+            raise RuntimeError(f"Blok çözülemedi: {block['path']}")
+        return pq.read_table(pa.BufferReader(plain), columns=columns, filters=filters)
+
+    def prune(self, category: str, start: Optional[datetime] = None, end: Optional[datetime] = None,
+              filters: Iterable[Filter] = ()) -> List[Dict[str, Any]]:
+        """Manifest'e göre sorguyu sağlayabilecek bloklar ([start, end) aralığı)"""
+        start_iso = start.isoformat() if start else None
+        end_iso = end.isoformat() if end else None
+        selected = []
+        for block in self.blocks(category):
+            if start_iso and block['max_ts'] < start_iso:
+                continue
+            if end_iso and block['min_ts'] >= end_iso:
+                continue
+            if all(_may_match(block['columns'].get(column), op, value) for column, op, value in filters):
+                selected.append(block)
+        return selected
+
+    def scan(self, category: str, columns: Optional[List[str]] = None, start: Optional[datetime] = None,
+             end: Optional[datetime] = None, filters: Iterable[Filter] = ()) -> pd.DataFrame:
+        """Kategori olaylarını oku: bölüm/blok eleme + kolon projeksiyonu + satır filtresi
+
+        `filters` (kolon, operatör, değer) üçlüleridir; operatörler: ==, !=, <, <=, >, >=, in.
+        """
+        filters = list(filters)
+        for _, op, _ in filters:
+            if op not in FILTER_OPS:
+                raise ValueError(f"Desteklenmeyen filtre operatörü: {op}")
+        self.flush(category)
+
+        with self._lock:
+            candidates = self.blocks(category)
+            blocks = self.prune(category, start, end, filters)
+            self._active_scans += 1
+        self.stats['blocks_pruned'] += len(candidates) - len(blocks)
+
+        row_filters = list(filters)
+        if start:
+            row_filters.append(('ts', '>=', pd.Timestamp(start)))
+        if end:
+            row_filters.append(('ts', '<', pd.Timestamp(end)))
+
+        def read(block):
+            present = [c for c in columns if c in block['columns']] if columns else None
+            return self._read_block(block, present, row_filters or None)
+
+        try:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                tables = [t for t in executor.map(read, blocks) if t.num_rows]
+        finally:
+            with self._lock:
+                self._active_scans -= 1
+                self._drop_retired()
+        self.stats['blocks_read'] += len(blocks)
+
+        if not tables:
+            return pd.DataFrame(columns=columns or [])
+        frame = _concat_frames(tables)
+        if columns:
+            frame = frame.reindex(columns=columns)
+        return frame
+
+    def _read_file(self, path: str) -> bytes:
+        with open(os.path.join(self.root, path), 'rb') as f:
+            return f.read()
+
+    def count(self, category: Optional[str] = None) -> int:
+        """Olay sayısı (manifest + bekleyenler, blok çözmeden)"""
+        with self._lock:
+            pending = sum(len(rows) for name, rows in self._buffers.items() if category in (None, name))
+            return sum(block['rows'] for block in self.blocks(category)) + pending
+
+    def latest(self, category: str) -> Optional[datetime]:
+        """Kategorideki en yeni olay zamanı"""
+        with self._lock:
+            latest = max((block['max_ts'] for block in self.blocks(category)), default=None)
+            pending = [row['ts'] for row in self._buffers.get(category, [])]
+        candidates = [pd.Timestamp(ts).to_pydatetime() for ts in pending]
+        if latest:
+            candidates.append(datetime.fromisoformat(latest))
+        return max(candidates) if candidates else None
+
+    def categories(self) -> List[str]:
+        with self._lock:
+            return sorted({block['category'] for block in self.manifest['blocks']} | set(self._buffers))
+
+    def close(self):
+        self._stop.set()
+        if self._flusher and self._flusher is not threading.current_thread():
+            self._flusher.join(timeout=5)
+        self.flush()
+        atexit.unregister(self.flush)
+        log_info(f"Lake kapatıldı: {self.root}")
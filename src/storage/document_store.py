@@ -0,0 +1,531 @@
+"""
+PlanB Motoru - Document Store
+JSON dosya yöneticileri için ortak SQLite anahtar-değer/doküman katmanı
+"""
+import atexit
+import json
+import os
+import sqlite3
+import threading
+from collections.abc import MutableMapping
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, List, Optional, Any, Iterable, Iterator, Tuple, Callable
+from src.utils.logger import log_info, log_error, log_debug
+
+DEFAULT_STORE_PATH = os.getenv("PLANB_STORE_PATH", "data/store/planb_store.db")
+
+_DELETED = object()
+_NOT_PENDING = object()
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    collection TEXT NOT NULL,
+    key TEXT NOT NULL,
+    data TEXT NOT NULL,
+    updated_at TEXT NOT NULL,
+    PRIMARY KEY (collection, key)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS document_index (
+    collection TEXT NOT NULL,
+    field TEXT NOT NULL,
+    value TEXT NOT NULL,
+    key TEXT NOT NULL,
+    PRIMARY KEY (collection, field, value, key)
+) WITHOUT ROWID;
+
+CREATE INDEX IF NOT EXISTS idx_document_index_key ON document_index(collection, key);
+
+CREATE TABLE IF NOT EXISTS collection_meta (
+    collection TEXT PRIMARY KEY,
+    indexes TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS log_records (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    stream TEXT NOT NULL,
+    ts TEXT NOT NULL,
+    data TEXT NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_log_records_stream ON log_records(stream, id);
+CREATE INDEX IF NOT EXISTS idx_log_records_ts ON log_records(stream, ts);
+"""
+
+
+def index_values(doc: Any, fields: Iterable[str]) -> Dict[str, List[str]]:
+    """Dokümanın ikincil indeks değerleri (liste alanlarda her eleman ayrı)"""
+    values: Dict[str, List[str]] = {}
+    if not isinstance(doc, dict):
+        return values
+    for field in fields:
+        value = doc.get(field)
+        if value is None:
+            continue
+        if isinstance(value, (list, tuple, set)):
+            values[field] = sorted({str(v) for v in value if v is not None})
+        else:
+            values[field] = [str(value)]
+    return values
+
+
+class Collection(MutableMapping):
+    """Bir koleksiyonun dict benzeri görünümü
+
+    Okunan dokümanlar önbellekte tutulur; yerinde değiştirilen doküman `save(key)`
+    ile yalnızca kendisi yazılır. Tüm koleksiyon yalnızca ilk iterasyonda okunur.
+    """
+
+    def __init__(self, store: 'DocumentStore', name: str, indexes: Iterable[str] = ()):
+        self.store = store
+        self.name = name
+        self.indexes = tuple(indexes)
+        self._cache: Dict[str, Any] = {}
+        self._complete = False
+
+    # --- MutableMapping ---
+
+    def __getitem__(self, key: str) -> Any:
+        if key in self._cache:
+            return self._cache[key]
+        doc = self.store._load(self.name, key)
+        if doc is _DELETED:
+            raise KeyError(key)
+        self._cache[key] = doc
+        return doc
+
+    def __setitem__(self, key: str, doc: Any):
+        self.store._stage_put(self, key, doc)
+        self._cache[key] = doc
+
+    def __delitem__(self, key: str):
+        if key not in self:
+            raise KeyError(key)
+        self.store._stage_delete(self, key)
+        self._cache.pop(key, None)
+
+    def __contains__(self, key: object) -> bool:
+        if key in self._cache:
+            return True
+        if self._complete or not isinstance(key, str):
+            return False
+        try:
+            self[key]
+            return True
+        except KeyError:
+            return False
+
+    def __iter__(self) -> Iterator[str]:
+        self._load_all()
+        return iter(list(self._cache))
+
+    def __len__(self) -> int:
+        self._load_all()
+        return len(self._cache)
+
+    def __repr__(self) -> str:
+        return f"Collection({self.name!r}, indexes={self.indexes})"
+
+    # --- Doküman işlemleri ---
+
+    def save(self, key: str):
+        """Yerinde değiştirilen dokümanı yaz (yalnızca bu anahtar)"""
+        self.store._stage_put(self, key, self[key])
+
+    def find_keys(self, field: str, value: Any) -> List[str]:
+        """İkincil indeksten anahtarları bul"""
+        if field not in self.indexes:
+            raise ValueError(f"{self.name} koleksiyonunda indekssiz alan: {field}")
+        return self.store._find_keys(self.name, field, str(value))
+
+    def find(self, field: str, value: Any) -> List[Any]:
+        """İkincil indeksten dokümanları bul"""
+        return [self[key] for key in self.find_keys(field, value)]
+
+    def find_one(self, field: str, value: Any) -> Optional[Any]:
+        keys = self.find_keys(field, value)
+        return self[keys[0]] if keys else None
+
+    def distinct(self, field: str) -> Dict[str, int]:
+        """İndeksli alanın değer -> doküman sayısı dağılımı"""
+        if field not in self.indexes:
+            raise ValueError(f"{self.name} koleksiyonunda indekssiz alan: {field}")
+        return self.store._distinct(self.name, field)
+
+    def is_empty(self) -> bool:
+        """Koleksiyonu yüklemeden boş mu kontrol et"""
+        if self._cache:
+            return False
+        return self.store._count(self.name) == 0
+
+    def invalidate(self, keys: Optional[Iterable[str]] = None):
+        """Önbelleği (kısmen) düşür; sonraki erişim veritabanından okunur"""
+        if keys is None:
+            self._cache.clear()
+        else:
+            for key in keys:
+                self._cache.pop(key, None)
+        self._complete = False
+
+    def _load_all(self):
+        if self._complete:
+            return
+        for key, doc in self.store._load_collection(self.name):
+            # Önbellekteki (yerinde değişmiş olabilecek) kopya geçerlidir
+            self._cache.setdefault(key, doc)
+        self._complete = True
+
+
+class DocumentStore:
+    """Transaction, ikincil indeks ve yazma birleştirme destekli SQLite doküman deposu"""
+
+    def __init__(self, db_path: str = DEFAULT_STORE_PATH, coalesce: bool = False,
+                 flush_interval: float = 0.5):
+        self.db_path = db_path
+        self.coalesce = coalesce
+        self.flush_interval = flush_interval
+        self.collections: Dict[str, Collection] = {}
+        self.stats = {'flushes': 0, 'documents_written': 0, 'log_records_written': 0}
+
+        self._lock = threading.RLock()
+        # (koleksiyon, anahtar) -> (json, indeks değerleri) veya None (silme); son yazan kazanır
+        self._pending: Dict[Tuple[str, str], Optional[Tuple[str, Dict[str, List[str]]]]] = {}
+        self._pending_logs: List[Tuple[str, str, str]] = []
+        self._tx_depth = 0
+        self._tx_saved: Dict[Tuple[str, str], Any] = {}
+        self._tx_log_mark = 0
+
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.db = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript(SCHEMA)
+
+        self._stop_event = threading.Event()
+        self._flusher = None
+        atexit.register(self.close)
+
+    def collection(self, name: str, indexes: Iterable[str] = ()) -> Collection:
+        """Koleksiyon görünümü (aynı isim için aynı nesne)"""
+        with self._lock:
+            collection = self.collections.get(name)
+            if collection is None:
+                collection = Collection(self, name, indexes)
+                self.collections[name] = collection
+            else:
+                collection.indexes += tuple(i for i in indexes if i not in collection.indexes)
+
+            # İndeks tanımı değiştiyse mevcut dokümanları yeniden indeksle
+            row = self.db.execute("SELECT indexes FROM collection_meta WHERE collection = ?", (name,)).fetchone()
+            if row is None or sorted(json.loads(row[0])) != sorted(collection.indexes):
+                self._reindex(collection)
+                self.db.execute(
+                    "INSERT OR REPLACE INTO collection_meta (collection, indexes) VALUES (?, ?)",
+                    (name, json.dumps(sorted(collection.indexes)))
+                )
+            return collection
+
+    # ------------------------------------------------------------------
+    # Transaction ve yazma birleştirme
+    # ------------------------------------------------------------------
+
+    @contextmanager
+    def transaction(self):
+        """Bloğun tüm yazımlarını tek SQLite transaction'ında uygula (hata olursa geri al)"""
+        with self._lock:
+            if self._tx_depth == 0:
+                self._tx_saved = {}
+                self._tx_log_mark = len(self._pending_logs)
+            self._tx_depth += 1
+            try:
+                yield self
+            except BaseException:
+                self._tx_depth -= 1
+                if self._tx_depth == 0:
+                    self._rollback_staged()
+                raise
+            self._tx_depth -= 1
+            if self._tx_depth == 0:
+                self._tx_saved = {}
+                self._after_write()
+
+    def _rollback_staged(self):
+        for (name, key), previous in self._tx_saved.items():
+            if previous is _NOT_PENDING:
+                self._pending.pop((name, key), None)
+            else:
+                self._pending[(name, key)] = previous
+            collection = self.collections.get(name)
+            if collection is not None:
+                collection.invalidate([key])
+        del self._pending_logs[self._tx_log_mark:]
+        self._tx_saved = {}
+
+    def _remember(self, slot: Tuple[str, str]):
+        if self._tx_depth and slot not in self._tx_saved:
+            self._tx_saved[slot] = self._pending.get(slot, _NOT_PENDING)
+
+    def _stage_put(self, collection: Collection, key: str, doc: Any):
+        data = json.dumps(doc, ensure_ascii=False)
+        with self._lock:
+            slot = (collection.name, key)
+            self._remember(slot)
+            self._pending[slot] = (data, index_values(doc, collection.indexes))
+            self._after_write()
+
+    def _stage_delete(self, collection: Collection, key: str):
+        with self._lock:
+            slot = (collection.name, key)
+            self._remember(slot)
+            self._pending[slot] = None
+            self._after_write()
+
+    def _after_write(self):
+        if self._tx_depth:
+            return
+        if self.coalesce:
+            self._ensure_flusher()
+        else:
+            self.flush()
+
+    def set_coalescing(self, enabled: bool, flush_interval: Optional[float] = None):
+        """Yazma birleştirme modunu aç/kapat (kapatırken bekleyenler yazılır)"""
+        if flush_interval is not None:
+            self.flush_interval = flush_interval
+        self.coalesce = enabled
+        if not enabled:
+            self.flush()
+
+    def flush(self) -> int:
+        """Bekleyen doküman ve log yazımlarını tek transaction'da uygula"""
+        with self._lock:
+            if self._tx_depth or (not self._pending and not self._pending_logs):
+                return 0
+            pending, logs = self._pending, self._pending_logs
+            now = datetime.now().isoformat()
+            try:
+                self.db.execute("BEGIN")
+                for (name, key), value in pending.items():
+                    self.db.execute("DELETE FROM document_index WHERE collection = ? AND key = ?", (name, key))
+                    if value is None:
+                        self.db.execute("DELETE FROM documents WHERE collection = ? AND key = ?", (name, key))
+                        continue
+                    data, indexed = value
+                    self.db.execute(
+                        "INSERT OR REPLACE INTO documents (collection, key, data, updated_at) VALUES (?, ?, ?, ?)",
+                        (name, key, data, now)
+                    )
+                    self.db.executemany(
+                        "INSERT OR IGNORE INTO document_index (collection, field, value, key) VALUES (?, ?, ?, ?)",
+                        [(name, field, v, key) for field, values in indexed.items() for v in values]
+                    )
+                self.db.executemany("INSERT INTO log_records (stream, ts, data) VALUES (?, ?, ?)", logs)
+                self.db.execute("COMMIT")
+            except Exception as e:
+                log_error(f"Doküman deposu yazma hatası: {e}")
+                if self.db.in_transaction:
+                    self.db.execute("ROLLBACK")
+                return 0
+            self._pending, self._pending_logs = {}, []
+            self.stats['flushes'] += 1
+            self.stats['documents_written'] += len(pending)
+            self.stats['log_records_written'] += len(logs)
+            return len(pending) + len(logs)
+
+    def _ensure_flusher(self):
+        if self._flusher is None or not self._flusher.is_alive():
+            self._stop_event.clear()
+            self._flusher = threading.Thread(target=self._flush_loop, daemon=True, name="document-store-flush")
+            self._flusher.start()
+
+    def _flush_loop(self):
+        while not self._stop_event.wait(self.flush_interval):
+            self.flush()
+
+    # ------------------------------------------------------------------
+    # Okuma (bekleyen yazımlar üzerine bindirilir)
+    # ------------------------------------------------------------------
+
+    def _load(self, name: str, key: str) -> Any:
+        with self._lock:
+            slot = (name, key)
+            if slot in self._pending:
+                value = self._pending[slot]
+                return _DELETED if value is None else json.loads(value[0])
+            row = self.db.execute(
+                "SELECT data FROM documents WHERE collection = ? AND key = ?", (name, key)
+            ).fetchone()
+        return json.loads(row[0]) if row else _DELETED
+
+    def _load_collection(self, name: str) -> List[Tuple[str, Any]]:
+        with self._lock:
+            rows = self.db.execute(
+                "SELECT key, data FROM documents WHERE collection = ? ORDER BY key", (name,)
+            ).fetchall()
+            overlay = {key: value for (coll, key), value in self._pending.items() if coll == name}
+        docs = [(key, json.loads(data)) for key, data in rows if key not in overlay]
+        docs.extend((key, json.loads(value[0])) for key, value in overlay.items() if value is not None)
+        return docs
+
+    def _find_keys(self, name: str, field: str, value: str) -> List[str]:
+        with self._lock:
+            keys = {row[0] for row in self.db.execute(
+                "SELECT key FROM document_index WHERE collection = ? AND field = ? AND value = ?",
+                (name, field, value)
+            )}
+            for (coll, key), pending in self._pending.items():
+                if coll != name:
+                    continue
+                if pending is not None and value in pending[1].get(field, ()):
+                    keys.add(key)
+                else:
+                    keys.discard(key)
+        return sorted(keys)
+
+    def _distinct(self, name: str, field: str) -> Dict[str, int]:
+        self.flush()
+        with self._lock:
+            rows = self.db.execute(
+                "SELECT value, COUNT(*) FROM document_index WHERE collection = ? AND field = ? GROUP BY value",
+                (name, field)
+            ).fetchall()
+        return dict(rows)
+
+    def _count(self, name: str) -> int:
+        with self._lock:
+            count = self.db.execute("SELECT COUNT(*) FROM documents WHERE collection = ?", (name,)).fetchone()[0]
+            for (coll, key), value in self._pending.items():
+                if coll != name:
+                    continue
+                exists = self.db.execute(
+                    "SELECT 1 FROM documents WHERE collection = ? AND key = ?", (name, key)
+                ).fetchone() is not None
+                count += (value is not None) - exists
+        return count
+
+    def _reindex(self, collection: Collection):
+        """İndeks alanları değişen koleksiyonun dokümanlarını yeniden indeksle"""
+        docs = self._load_collection(collection.name)
+        if not docs:
+            return
+        with self.transaction():
+            for key, doc in docs:
+                self._stage_put(collection, key, doc)
+        log_debug(f"{collection.name} koleksiyonu yeniden indekslendi: {len(docs)} doküman")
+
+    # ------------------------------------------------------------------
+    # Append-only log akışları
+    # ------------------------------------------------------------------
+
+    def append_log(self, stream: str, record: Any, ts: Optional[str] = None):
+        """Log akışına kayıt ekle (mevcut kayıtlar okunmaz/yeniden yazılmaz)"""
+        data = json.dumps(record, ensure_ascii=False)
+        with self._lock:
+            self._pending_logs.append((stream, ts or datetime.now().isoformat(), data))
+            self._after_write()
+
+    def read_log(self, stream: str, limit: Optional[int] = None, since: Optional[str] = None) -> List[Any]:
+        """Akışın son kayıtları (eskiden yeniye)"""
+        self.flush()
+        query = "SELECT data FROM log_records WHERE stream = ?"
+        params: List[Any] = [stream]
+        if since:
+            query += " AND ts > ?"
+            params.append(since)
+        query += " ORDER BY id DESC"
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(limit)
+        with self._lock:
+            rows = self.db.execute(query, params).fetchall()
+        return [json.loads(row[0]) for row in reversed(rows)]
+
+    def count_log(self, stream: str, since: Optional[str] = None) -> int:
+        self.flush()
+        with self._lock:
+            if since:
+                row = self.db.execute(
+                    "SELECT COUNT(*) FROM log_records WHERE stream = ? AND ts > ?", (stream, since)
+                ).fetchone()
+            else:
+                row = self.db.execute("SELECT COUNT(*) FROM log_records WHERE stream = ?", (stream,)).fetchone()
+        return row[0]
+
+    def trim_log(self, stream: str, keep: int) -> int:
+        """Akışta yalnızca son `keep` kaydı tut"""
+        self.flush()
+        with self._lock:
+            cursor = self.db.execute("""
+                DELETE FROM log_records WHERE stream = ? AND id <= (
+                    SELECT id FROM log_records WHERE stream = ? ORDER BY id DESC LIMIT 1 OFFSET ?
+                )
+            """, (stream, stream, keep))
+        return cursor.rowcount
+
+    # ------------------------------------------------------------------
+    # Yedekleme ve kapanış
+    # ------------------------------------------------------------------
+
+    def backup(self, path: str) -> str:
+        """Tutarlı kopya (SQLite online backup API)"""
+        self.flush()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        target = sqlite3.connect(path)
+        try:
+            with self._lock:
+                self.db.backup(target)
+        finally:
+            target.close()
+        return path
+
+    def restore(self, path: str):
+        """Yedek veritabanını canlı depoya geri yükle ve önbellekleri düşür"""
+        source = sqlite3.connect(path)
+        try:
+            with self._lock:
+                self._pending, self._pending_logs = {}, []
+                source.backup(self.db)
+                for collection in self.collections.values():
+                    collection.invalidate()
+        finally:
+            source.close()
+        log_info(f"Doküman deposu geri yüklendi: {path}")
+
+    def close(self):
+        """Bekleyenleri yaz ve bağlantıyı kapat"""
+        self._stop_event.set()
+        if self._flusher is not None and self._flusher is not threading.current_thread():
+            self._flusher.join(timeout=self.flush_interval + 1)
+        try:
+            self.flush()
+            with self._lock:
+                self.db.close()
+        except sqlite3.ProgrammingError:
+            pass
+        atexit.unregister(self.close)
+
+
+def migrate_json_file(store: DocumentStore, path: str, loader: Callable[[Any], Any]) -> bool:
+    """Eski JSON dosyasını tek transaction'da depoya aktar ve `.migrated` olarak yeniden adlandır"""
+    if not os.path.exists(path):
+        return False
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        with store.transaction():
+            loader(data)
+        os.replace(path, path + ".migrated")
+        log_info(f"JSON dosyası depoya taşındı: {path}")
+        return True
+    except Exception as e:
+        log_error(f"JSON taşıma hatası ({path}): {e}")
+        return False
+
+
+# Global document store instance
+document_store = DocumentStore(coalesce=os.getenv("PLANB_STORE_COALESCE", "0") == "1")
@@ -0,0 +1,358 @@
+"""
+PlanB Motoru - Market Archive
+Piyasa/gün/sembol kovası bölümlü (hive) Parquet bar arşivi, akışlı yazım ve sıkıştırma (compaction)
+"""
+import os
+import threading
+import uuid
+import zlib
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Iterable
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from src.utils.logger import log_info, log_error, log_debug
+from src.data.market_sessions import market_for_symbol, latest_session, next_session_open, local_date
+
+# Bölüm kolonları dosyada değil yolda tutulur: market=<M>/date=<YYYY-MM-DD>/bucket=<NN>
+BAR_SCHEMA = pa.schema([
+    ('timestamp', pa.timestamp('us')),
+    ('symbol', pa.string()),
+    ('open', pa.float64()),
+    ('high', pa.float64()),
+    ('low', pa.float64()),
+    ('close', pa.float64()),
+    ('volume', pa.int64()),
+    ('adjusted_close', pa.float64()),
+])
+PARTITIONING = ds.partitioning(
+    pa.schema([('market', pa.string()), ('date', pa.string()), ('bucket', pa.int32())]), flavor='hive'
+)
+DATASET_SCHEMA = pa.schema(list(BAR_SCHEMA) + list(PARTITIONING.schema))
+SORT_KEYS = [('symbol', 'ascending'), ('timestamp', 'ascending')]
+
+# yfinance aralıkları -> pandas yeniden örnekleme kuralı
+INTERVAL_RULES = {
+    '1m': '1min', '2m': '2min', '5m': '5min', '15m': '15min', '30m': '30min',
+    '60m': '60min', '1h': '1h', '1d': '1D', '5d': '5D', '1wk': 'W-FRI',
+}
+
+
+def symbol_bucket(symbol: str, buckets: int) -> int:
+    """Sembolün kovası (süreçler arası kararlı hash)"""
+    return zlib.crc32(symbol.encode()) % buckets
+
+
+class ArchiveWriter:
+    """Parça parça gelen barları bölüm başına açık ParquetWriter'lara akıtır
+
+    Her parça bölümlere ayrılıp (sembol, zaman) sırasıyla yeni row group(lar) olarak
+    yazılır; dosyalar kapanışta `.tmp` uzantısından atomik olarak yayınlanır.
+    """
+
+    def __init__(self, archive: 'MarketArchive'):
+        self.archive = archive
+        self.writers: Dict[tuple, pq.ParquetWriter] = {}
+        self.paths: Dict[tuple, str] = {}
+        self.rows = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+        return False
+
+    def write(self, frame: pd.DataFrame, market: Optional[str] = None) -> int:
+        """Bir parça yaz (`market` kolonu yoksa parametre kullanılır)"""
+        if frame is None or frame.empty:
+            return 0
+        markets = frame['market'] if 'market' in frame.columns else pd.Series(market, index=frame.index)
+        if markets.isna().any():
+            raise ValueError("Arşivlenen barlar için market gerekli")
+        table = self.archive._to_table(frame)
+        keys = pd.DataFrame({
+            'market': markets.astype(str).to_numpy(),
+            'date': pd.to_datetime(frame['timestamp']).dt.strftime('%Y-%m-%d').to_numpy(),
+            'bucket': frame['symbol'].map(lambda s: symbol_bucket(s, self.archive.buckets)).to_numpy(),
+        })
+        for key, positions in keys.groupby(['market', 'date', 'bucket'], sort=False).indices.items():
+            part = table.take(pa.array(positions)).sort_by(SORT_KEYS)
+            self._writer(key).write_table(part, row_group_size=self.archive.row_group_size)
+        self.rows += len(frame)
+        return len(frame)
+
+    def _writer(self, key: tuple) -> pq.ParquetWriter:
+        writer = self.writers.get(key)
+        if writer is None:
+            directory = self.archive.partition_dir(*key)
+            os.makedirs(directory, exist_ok=True)
+            path = os.path.join(directory, f"part-{uuid.uuid4().hex}.parquet")
+            writer = pq.ParquetWriter(f"{path}.tmp", BAR_SCHEMA, compression=self.archive.compression,
+                                      write_statistics=True)
+            self.writers[key] = writer
+            self.paths[key] = path
+        return writer
+
+    def close(self) -> List[str]:
+        """Dosyaları kapat ve yayınla"""
+        published = []
+        for key, writer in self.writers.items():
+            writer.close()
+            os.replace(f"{self.paths[key]}.tmp", self.paths[key])
+            published.append(self.paths[key])
+        self.writers.clear()
+        self.archive.stats['files_written'] += len(published)
+        self.archive.stats['rows_written'] += self.rows
+        return published
+
+    def abort(self):
+        for key, writer in self.writers.items():
+            try:
+                writer.close()
+                os.remove(f"{self.paths[key]}.tmp")
+            except OSError:
+                pass
+        self.writers.clear()
+
+
+class MarketArchive:
+    """Soğuk katman bar arşivi
+
+    - Yerleşim: `<root>/market=<M>/date=<YYYY-MM-DD>/bucket=<NN>/part-*.parquet`
+    - Dosyalar (sembol, zaman) sıralı row group'lardan oluşur; row group min/max
+      istatistikleri sembol ve zaman filtrelerinde okuma yapmadan eleme sağlar.
+    - Sorgular yalnızca istenen piyasa/gün/kova dizinlerini listeler ve yalnızca
+      istenen kolonları okur.
+    - `compact` küçük dosyaları bölüm başına tek dosyada birleştirir ve tekrarları atar.
+    """
+
+    def __init__(self, root: str, buckets: int = 16, row_group_size: int = 65536,
+                 compression: str = 'zstd'):
+        self.root = root
+        self.buckets = buckets
+        self.row_group_size = row_group_size
+        self.compression = compression
+        self._compact_lock = threading.Lock()
+        self.stats = {'files_written': 0, 'rows_written': 0, 'files_scanned': 0,
+                      'partitions_compacted': 0, 'duplicates_removed': 0}
+
+    # ------------------------------------------------------------------
+    # Yerleşim
+    # ------------------------------------------------------------------
+
+    def partition_dir(self, market: str, date: str, bucket: int) -> str:
+        return os.path.join(self.root, f"market={market}", f"date={date}", f"bucket={bucket:02d}")
+
+    @staticmethod
+    def _values(directory: str, prefix: str) -> List[str]:
+        """`prefix=<değer>` alt dizinlerinin değerleri"""
+        try:
+            return sorted(entry.name[len(prefix) + 1:] for entry in os.scandir(directory)
+                          if entry.is_dir() and entry.name.startswith(f"{prefix}="))
+        except FileNotFoundError:
+            return []
+
+    def markets(self) -> List[str]:
+        return self._values(self.root, 'market')
+
+    def dates(self, market: str) -> List[str]:
+        return self._values(os.path.join(self.root, f"market={market}"), 'date')
+
+    def partitions(self, markets: Optional[Iterable[str]] = None, start: Optional[datetime] = None,
+                   end: Optional[datetime] = None, symbols: Optional[Iterable[str]] = None) -> List[str]:
+        """Sorguyu sağlayabilecek bölüm dizinleri (diğer bölümler hiç listelenmez)"""
+        first_day = pd.Timestamp(start).strftime('%Y-%m-%d') if start is not None else None
+        last_day = pd.Timestamp(end).strftime('%Y-%m-%d') if end is not None else None
+        buckets = (sorted({symbol_bucket(s, self.buckets) for s in symbols})
+                   if symbols is not None else range(self.buckets))
+        directories = []
+        for market in (markets if markets is not None else self.markets()):
+            for day in self.dates(market):
+                if (first_day and day < first_day) or (last_day and day > last_day):
+                    continue
+                for bucket in buckets:
+                    directory = self.partition_dir(market, day, bucket)
+                    if os.path.isdir(directory):
+                        directories.append(directory)
+        return directories
+
+    @staticmethod
+    def _files(directory: str) -> List[str]:
+        return sorted(os.path.join(directory, name) for name in os.listdir(directory)
+                      if name.endswith('.parquet'))
+
+    # ------------------------------------------------------------------
+    # Yazma
+    # ------------------------------------------------------------------
+
+    def _to_table(self, frame: pd.DataFrame) -> pa.Table:
+        """Parçayı arşiv şemasına getir (eksik kolonlar null, fazlalar atılır)"""
+        columns = {}
+        for field in BAR_SCHEMA:
+            if field.name in frame.columns:
+                values = frame[field.name]
+                if field.name == 'timestamp':
+                    values = pd.to_datetime(values)
+                columns[field.name] = pa.array(values, type=field.type, from_pandas=True)
+            else:
+                columns[field.name] = pa.nulls(len(frame), type=field.type)
+        return pa.table(columns, schema=BAR_SCHEMA)
+
+    def writer(self) -> ArchiveWriter:
+        return ArchiveWriter(self)
+
+    def write_chunks(self, chunks: Iterable[pd.DataFrame], market: Optional[str] = None) -> int:
+        """Parça akışını arşivle; yazılan satır sayısı (hata olursa yarım dosyalar silinir)"""
+        with self.writer() as writer:
+            for chunk in chunks:
+                writer.write(chunk, market)
+            rows = writer.rows
+        log_info(f"Arşive {rows} bar yazıldı")
+        return rows
+
+    def compact(self, markets: Optional[Iterable[str]] = None, start: Optional[datetime] = None,
+                end: Optional[datetime] = None, min_files: int = 2) -> int:
+        """Bölüm başına dosyaları tek sıralı dosyada birleştir; (zaman, sembol) tekrarlarında son yazılan kalır"""
+        compacted = 0
+        with self._compact_lock:
+            for directory in self.partitions(markets, start, end):
+                files = self._files(directory)
+                if len(files) < min_files:
+                    continue
+                try:
+                    files.sort(key=os.path.getmtime)
+                    table = pa.concat_tables([pq.read_table(path, schema=BAR_SCHEMA) for path in files])
+                    order = pa.array(range(table.num_rows), type=pa.int64())
+                    table = table.append_column('__order', order)
+                    # Her (zaman, sembol) için en son yazılan satır
+                    latest = table.group_by(['timestamp', 'symbol']).aggregate([('__order', 'max')])
+                    keep = pc.is_in(order, value_set=latest['__order_max'])
+                    unique = table.filter(keep).drop_columns(['__order']).sort_by(SORT_KEYS)
+                    self.stats['duplicates_removed'] += table.num_rows - unique.num_rows
+
+                    path = os.path.join(directory, f"part-{uuid.uuid4().hex}.parquet")
+                    pq.write_table(unique, f"{path}.tmp", compression=self.compression,
+                                   row_group_size=self.row_group_size, write_statistics=True)
+                    os.replace(f"{path}.tmp", path)
+                    for old in files:
+                        os.remove(old)
+                    compacted += 1
+                    log_debug(f"Bölüm sıkıştırıldı: {directory} ({len(files)} dosya -> 1)")
+                except Exception as e:
+                    log_error(f"Bölüm sıkıştırma hatası {directory}: {e}")
+        self.stats['partitions_compacted'] += compacted
+        return compacted
+
+    # ------------------------------------------------------------------
+    # Okuma
+    # ------------------------------------------------------------------
+
+    def scan(self, symbols: Optional[Iterable[str]] = None, markets: Optional[Iterable[str]] = None,
+             start: Optional[datetime] = None, end: Optional[datetime] = None,
+             columns: Optional[List[str]] = None) -> pd.DataFrame:
+        """Barları oku ([start, end] aralığı); bölüm eleme + row group istatistikleri + kolon projeksiyonu"""
+        symbols = list(symbols) if symbols is not None else None
+        files = [path for directory in self.partitions(markets, start, end, symbols)
+                 for path in self._files(directory)]
+        wanted = columns or ['timestamp', 'symbol', 'market'] + BAR_SCHEMA.names[2:]
+        if not files:
+            return pd.DataFrame(columns=wanted)
+        self.stats['files_scanned'] += len(files)
+
+        dataset = ds.dataset(files, schema=DATASET_SCHEMA, format='parquet',
+                             partitioning=PARTITIONING, partition_base_dir=self.root)
+        condition = None
+        for clause in (
+            ds.field('symbol').isin(symbols) if symbols is not None else None,
+            ds.field('timestamp') >= pa.scalar(pd.Timestamp(start), pa.timestamp('us')) if start is not None else None,
+            ds.field('timestamp') <= pa.scalar(pd.Timestamp(end), pa.timestamp('us')) if end is not None else None,
+        ):
+            if clause is not None:
+                condition = clause if condition is None else condition & clause
+        table = dataset.to_table(columns=wanted, filter=condition)
+        return table.to_pandas().sort_values(
+            [c for c in ('symbol', 'timestamp') if c in wanted], kind='stable').reset_index(drop=True)
+
+    def bars(self, symbol: str, start: Optional[datetime] = None, end: Optional[datetime] = None,
+             interval: str = '1d') -> pd.DataFrame:
+        """Sembolün barlarını yfinance biçiminde (Open/High/Low/Close/Volume, Date indeksi) yeniden örnekle
+
+        Son ham barın zamanı attrs['last_timestamp'] içinde (ISO) döner (1d kovasının etiketi gece yarısıdır).
+        """
+        rule = INTERVAL_RULES.get(interval)
+        if rule is None:
+            return pd.DataFrame()
+        frame = self.scan([symbol], start=start, end=end,
+                          columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'])
+        if frame.empty:
+            return pd.DataFrame()
+        frame = frame.set_index('timestamp')
+        resampled = frame.resample(rule).agg({'open': 'first', 'high': 'max', 'low': 'min',
+                                              'close': 'last', 'volume': 'sum'}).dropna(subset=['close'])
+        resampled.columns = ['Open', 'High', 'Low', 'Close', 'Volume']
+        resampled.index.name = 'Date'
+        resampled.attrs['last_timestamp'] = frame.index[-1].isoformat()
+        return resampled
+
+
+def period_days(period: str) -> Optional[int]:
+    """yfinance periyodu -> gün ('10d', '1mo', '1y'); bilinmeyen periyotlar için None"""
+    try:
+        if period.endswith('mo'):
+            return int(period[:-2]) * 30
+        if period.endswith('d'):
+            return int(period[:-1])
+        if period.endswith('y'):
+            return int(period[:-1]) * 365
+    except ValueError:
+        pass
+    return None
+
+
+def serve_from_archive(archive: MarketArchive, ticker: str, period: str, interval: str,
+                       max_age: float, now: Optional[datetime] = None) -> Optional[pd.DataFrame]:
+    """Arşiv istenen periyodu eksiksiz kapsıyorsa barları döndür (yoksa None)
+
+    Arşiv yalnızca tamamlanmış günleri tutar: son ham bardan sonra pazarda yeni bir seans başladıysa
+    periyot o seansı da içermelidir ve arşiv kullanılmaz. Açık seansta tazelik son ham bar zamanına
+    göre max_age ile ölçülür. attrs['valid_until'] sonraki seans açılışıdır (epoch saniye); cache
+    kopyası o anda eskimelidir.
+    """
+    days = period_days(period)
+    if days is None or interval not in INTERVAL_RULES:
+        return None
+    now_utc = pd.Timestamp.now(tz='UTC') if now is None else pd.Timestamp(now)
+    if now_utc.tzinfo is None:
+        now_utc = now_utc.tz_localize('UTC')
+    now_utc = now_utc.tz_convert('UTC')
+    start = now_utc.tz_localize(None) - timedelta(days=days)
+    bars = archive.bars(ticker, start=start, interval=interval)
+    if bars.empty:
+        return None
+    # Hafta sonu/tatil boşluğu için başlangıçta birkaç gün tolerans
+    if bars.index[0] > start + timedelta(days=4):
+        return None
+
+    # Arşiv zaman damgaları tz'siz UTC (collector konteyner saati)
+    market = market_for_symbol(ticker)
+    last = pd.Timestamp(bars.attrs.get('last_timestamp', bars.index[-1]))
+    session_date, session_open = latest_session(market, now_utc)
+    last_date = local_date(last, market)
+    if last_date < session_date:
+        return None                         # bugünkü (ya da son) seans arşivde yok
+    if session_open and (now_utc.tz_localize(None) - last).total_seconds() > max_age:
+        return None                         # seans sürüyor, arşivdeki son bar eski
+    bars.attrs['valid_until'] = next_session_open(market, now_utc).timestamp()
+    return bars
+
+
+# Global market archive instance
+market_archive = MarketArchive(os.getenv('MARKET_ARCHIVE_PATH', 'data/market_archive'))
@@ -0,0 +1,54 @@
+"""
+PlanB Motoru - JSON Migration
+Eski JSON dosyalarını doküman deposuna aktaran komut satırı aracı
+
+Kullanım:
+    python -m src.storage.migrate_json [--store data/store/planb_store.db]
+"""
+import argparse
+from typing import Dict
+
+from src.storage.document_store import DocumentStore, DEFAULT_STORE_PATH
+
+
+def migrate_all(store: DocumentStore) -> Dict[str, int]:
+    """Tüm yöneticileri verilen depo ile aç (açılışta JSON dosyalarını taşırlar) ve sayıları döndür"""
+    from src.watchlist.watchlist_manager import WatchlistManager
+    from src.user.user_manager import UserManager
+    from src.portfolio.portfolio_manager import PortfolioManager
+    from src.offline.offline_manager import OfflineManager
+    from src.security.access_control import AccessControl
+
+    watchlists = WatchlistManager(store=store)
+    users = UserManager(store=store)
+    portfolios = PortfolioManager(store=store)
+    OfflineManager(store=store)
+    AccessControl(store=store)
+    store.flush()
+
+    return {
+        'watchlists': len(watchlists.watchlists),
+        'users': len(users.users),
+        'user_sessions': len(users.sessions),
+        'user_preferences': len(users.preferences),
+        'portfolios': len(portfolios.portfolios),
+        'portfolio_transactions': len(portfolios.transaction_docs),
+        'access_log': store.count_log('access_log'),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="PlanB Motoru JSON -> doküman deposu taşıma aracı")
+    parser.add_argument("--store", default=DEFAULT_STORE_PATH, help="SQLite depo dosyası")
+    args = parser.parse_args()
+
+    store = DocumentStore(args.store)
+    print(f"📦 JSON dosyaları taşınıyor: {args.store}")
+    for name, count in migrate_all(store).items():
+        print(f"   {name:<24} {count:>8}")
+    store.close()
+    print("✅ Taşıma tamamlandı (kaynak dosyalar .migrated olarak yeniden adlandırıldı)")
+
+
+if __name__ == "__main__":
+    main()
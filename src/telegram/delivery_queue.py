@@ -0,0 +1,351 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+📤 TELEGRAM DELIVERY QUEUE - Arka planda, hız limitine uyan mesaj gönderimi
+
+- Tek asyncio worker + tek havuzlu aiohttp oturumu
+- Global (saniyede ~30) ve sohbet başına (1/sn, gruplar 20/dk) hız limitleri, 429 retry_after desteği
+- Kısa mesajları birleştirir, uzun mesajları satır sınırlarından böler
+- Gönderilmemiş mesajlar SQLite outbox'ta kalır, yeniden başlatmada gönderilir
+"""
+
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+import aiohttp
+
+logger = logging.getLogger(__name__)
+
+TELEGRAM_API_BASE = "https://api.telegram.org"
+TELEGRAM_MAX_LENGTH = 4096
+DEFAULT_OUTBOX_PATH = os.getenv("TELEGRAM_OUTBOX_PATH", "data/telegram_outbox.db")
+
+
+def split_message(text: str, limit: int = TELEGRAM_MAX_LENGTH) -> List[str]:
+    """Mesajı satır sınırlarından limit uzunluğunda parçalara böl"""
+    if len(text) <= limit:
+        return [text]
+    parts: List[str] = []
+    current = ""
+    for line in text.split("\n"):
+        # Tek satır limitten uzunsa sert böl
+        while len(line) > limit:
+            if current:
+                parts.append(current)
+                current = ""
+            parts.append(line[:limit])
+            line = line[limit:]
+        candidate = f"{current}\n{line}" if current else line
+        if len(candidate) > limit:
+            parts.append(current)
+            current = line
+        else:
+            current = candidate
+    if current:
+        parts.append(current)
+    return parts
+
+
+class TokenBucket:
+    """Basit token bucket (saniyede rate, en fazla burst)"""
+
+    def __init__(self, rate: float, burst: Optional[float] = None):
+        self.rate = rate
+        self.capacity = burst or rate
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def delay(self) -> float:
+        """Bir token için beklenecek süre (0 ise token hemen harcanır)"""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class TelegramDeliveryQueue:
+    """📤 Kalıcı outbox'lı asenkron Telegram gönderim kuyruğu"""
+
+    def __init__(self, bot_token: str, default_chat_id: str = "", api_base: str = TELEGRAM_API_BASE,
+                 outbox_path: str = DEFAULT_OUTBOX_PATH, global_rate: float = 25.0,
+                 chat_interval: float = 1.0, group_interval: float = 3.0,
+                 max_length: int = TELEGRAM_MAX_LENGTH, max_attempts: int = 8):
+        self.bot_token = bot_token
+        self.default_chat_id = str(default_chat_id)
+        self.api_base = api_base.rstrip("/")
+        self.outbox_path = outbox_path
+        self.chat_interval = chat_interval
+        self.group_interval = group_interval
+        self.max_length = max_length
+        self.max_attempts = max_attempts
+        self.global_bucket = TokenBucket(global_rate)
+        self.chat_next_send: Dict[str, float] = {}
+
+        self.db_lock = threading.Lock()
+        self.db = self._open_outbox()
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.wakeup: Optional[asyncio.Event] = None
+        self.thread: Optional[threading.Thread] = None
+        self.running = False
+        self.stats = {"sent": 0, "parts": 0, "coalesced": 0, "rate_limited": 0, "failed": 0, "dropped": 0}
+
+    # ------------------------------------------------------------------
+    # Outbox
+    # ------------------------------------------------------------------
+
+    def _open_outbox(self) -> sqlite3.Connection:
+        directory = os.path.dirname(self.outbox_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = sqlite3.connect(self.outbox_path, check_same_thread=False, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS outbox (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                chat_id TEXT NOT NULL,
+                text TEXT NOT NULL,
+                reply_markup TEXT,
+                created_at REAL NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                not_before REAL NOT NULL DEFAULT 0
+            )
+        """)
+        return conn
+
+    def enqueue(self, text: str, chat_id: Optional[str] = None, reply_markup: Optional[dict] = None) -> int:
+        """Mesajı kuyruğa ekle (thread-safe, hemen döner)"""
+        with self.db_lock:
+            cursor = self.db.execute(
+                "INSERT INTO outbox (chat_id, text, reply_markup, created_at) VALUES (?, ?, ?, ?)",
+                (str(chat_id or self.default_chat_id), text,
+                 json.dumps(reply_markup) if reply_markup else None, time.time())
+            )
+        self._notify()
+        return cursor.lastrowid
+
+    def pending_count(self) -> int:
+        with self.db_lock:
+            return self.db.execute("SELECT COUNT(*) FROM outbox").fetchone()[0]
+
+    def _load_ready(self, limit: int = 200) -> List[dict]:
+        with self.db_lock:
+            rows = self.db.execute("""
+                SELECT id, chat_id, text, reply_markup, attempts FROM outbox
+                WHERE not_before <= ? ORDER BY id LIMIT ?
+            """, (time.time(), limit)).fetchall()
+        return [{"ids": [r[0]], "chat_id": r[1], "text": r[2], "reply_markup": r[3], "attempts": r[4]}
+                for r in rows]
+
+    def _complete(self, ids: List[int]):
+        with self.db_lock:
+            self.db.executemany("DELETE FROM outbox WHERE id = ?", [(i,) for i in ids])
+
+    def _retry_later(self, chat_id: str, ids: List[int], delay: float):
+        """Mesajı ve sıra korunsun diye sohbetin sonraki mesajlarını ertele"""
+        not_before = time.time() + delay
+        with self.db_lock:
+            self.db.executemany("UPDATE outbox SET attempts = attempts + 1 WHERE id = ?", [(i,) for i in ids])
+            self.db.execute("UPDATE outbox SET not_before = ? WHERE chat_id = ? AND not_before < ?",
+                            (not_before, chat_id, not_before))
+
+    def _next_ready_in(self) -> Optional[float]:
+        with self.db_lock:
+            row = self.db.execute("SELECT MIN(not_before) FROM outbox").fetchone()
+        if row[0] is None:
+            return None
+        return max(row[0] - time.time(), 0.0)
+
+    # ------------------------------------------------------------------
+    # Batching
+    # ------------------------------------------------------------------
+
+    def _coalesce(self, messages: List[dict]) -> List[dict]:
+        """Aynı sohbete ardışık, butonsuz mesajları limit dahilinde birleştir"""
+        merged: List[dict] = []
+        for message in messages:
+            last = merged[-1] if merged else None
+            if (last and last["chat_id"] == message["chat_id"]
+                    and not last["reply_markup"] and not message["reply_markup"]
+                    and len(last["text"]) + 2 + len(message["text"]) <= self.max_length):
+                last["text"] = f"{last['text']}\n\n{message['text']}"
+                last["ids"].extend(message["ids"])
+                last["attempts"] = max(last["attempts"], message["attempts"])
+                self.stats["coalesced"] += 1
+            else:
+                merged.append(dict(message, ids=list(message["ids"])))
+        return merged
+
+    # ------------------------------------------------------------------
+    # Sending
+    # ------------------------------------------------------------------
+
+    async def _wait_turn(self, chat_id: str):
+        """Global ve sohbet başına hız limitini bekle"""
+        interval = self.group_interval if chat_id.startswith("-") else self.chat_interval
+        wait = self.chat_next_send.get(chat_id, 0) - time.monotonic()
+        if wait > 0:
+            await asyncio.sleep(wait)
+        delay = self.global_bucket.delay()
+        while delay > 0:
+            await asyncio.sleep(delay)
+            delay = self.global_bucket.delay()
+        self.chat_next_send[chat_id] = time.monotonic() + interval
+
+    async def _post(self, session: aiohttp.ClientSession, chat_id: str, text: str,
+                    reply_markup: Optional[str]) -> Tuple[int, dict]:
+        payload = {
+            "chat_id": chat_id,
+            "text": text,
+            "parse_mode": "HTML",
+            "disable_web_page_preview": True,
+        }
+        if reply_markup:
+            payload["reply_markup"] = json.loads(reply_markup)
+        await self._wait_turn(chat_id)
+        url = f"{self.api_base}/bot{self.bot_token}/sendMessage"
+        async with session.post(url, json=payload) as response:
+            try:
+                body = await response.json(content_type=None)
+            except Exception:
+                body = {}
+            return response.status, body or {}
+
+    async def _deliver(self, session: aiohttp.ClientSession, message: dict) -> bool:
+        """Mesajı (gerekirse parçalayarak) gönder; başarısızsa yeniden planla"""
+        parts = split_message(message["text"], self.max_length)
+        for index, part in enumerate(parts):
+            # Buton sadece son parçaya eklenir
+            markup = message["reply_markup"] if index == len(parts) - 1 else None
+            try:
+                status, body = await self._post(session, message["chat_id"], part, markup)
+            except Exception as e:
+                status, body = 0, {"description": str(e)}
+
+            if status == 200:
+                self.stats["parts"] += 1
+                continue
+            if index > 0:
+                # Gönderilmiş parçaları tekrar yollamamak için kalan metni outbox'ta bırak
+                self._replace_text(message["ids"], "\n".join(parts[index:]))
+            if status == 429:
+                retry_after = float(body.get("parameters", {}).get("retry_after", 1))
+                self.stats["rate_limited"] += 1
+                logger.warning(f"⚠️ Telegram rate limit, {retry_after}s bekleniyor")
+                self._retry_later(message["chat_id"], message["ids"], retry_after)
+                return False
+            if status in (400, 401, 403, 404):
+                logger.error(f"❌ Telegram hatası {status}: {str(body.get('description', ''))[:200]}")
+                self.stats["dropped"] += 1
+                self._complete(message["ids"])
+                return False
+            self.stats["failed"] += 1
+            if message["attempts"] + 1 >= self.max_attempts:
+                logger.error(f"❌ Mesaj {self.max_attempts} denemede gönderilemedi, bırakılıyor")
+                self.stats["dropped"] += 1
+                self._complete(message["ids"])
+            else:
+                self._retry_later(message["chat_id"], message["ids"], min(2 ** message["attempts"], 300))
+            return False
+
+        self._complete(message["ids"])
+        self.stats["sent"] += 1
+        return True
+
+    def _replace_text(self, ids: List[int], text: str):
+        with self.db_lock:
+            self.db.execute("UPDATE outbox SET text = ? WHERE id = ?", (text, ids[0]))
+            self.db.executemany("DELETE FROM outbox WHERE id = ?", [(i,) for i in ids[1:]])
+        del ids[1:]
+
+    async def run(self):
+        """Worker döngüsü: outbox boşalana kadar gönder, sonra yeni mesaj bekle"""
+        self.loop = asyncio.get_running_loop()
+        self.wakeup = asyncio.Event()
+        self.running = True
+        timeout = aiohttp.ClientTimeout(total=30)
+        connector = aiohttp.TCPConnector(limit=4)
+        async with aiohttp.ClientSession(timeout=timeout, connector=connector) as session:
+            while self.running:
+                ready = self._load_ready()
+                if ready:
+                    blocked = set()
+                    for message in self._coalesce(ready):
+                        if not self.running:
+                            break
+                        if message["chat_id"] in blocked:
+                            continue
+                        if not await self._deliver(session, message):
+                            # Sıra korunur: sohbetin kalan mesajları bir sonraki tura kalır
+                            blocked.add(message["chat_id"])
+                    continue
+                self.wakeup.clear()
+                next_ready = self._next_ready_in()
+                try:
+                    await asyncio.wait_for(self.wakeup.wait(),
+                                           timeout=5.0 if next_ready is None else min(next_ready, 5.0))
+                except asyncio.TimeoutError:
+                    pass
+        logger.info("📤 Telegram delivery queue durduruldu")
+
+    def _notify(self):
+        if self.loop and self.wakeup and not self.loop.is_closed():
+            self.loop.call_soon_threadsafe(self.wakeup.set)
+
+    def start(self) -> threading.Thread:
+        """Worker'ı ayrı thread'deki event loop'ta başlat"""
+        if self.thread and self.thread.is_alive():
+            return self.thread
+        started = threading.Event()
+
+        def run_worker():
+            loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(loop)
+            loop.call_soon(started.set)
+            loop.run_until_complete(self.run())
+            loop.close()
+
+        self.thread = threading.Thread(target=run_worker, name="telegram-delivery", daemon=True)
+        self.thread.start()
+        started.wait(timeout=5)
+        logger.info(f"📤 Telegram delivery queue başladı ({self.pending_count()} bekleyen mesaj)")
+        return self.thread
+
+    def flush(self, timeout: float = 30.0) -> bool:
+        """Outbox boşalana kadar bekle (kapanış ve testler için)"""
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            if self.pending_count() == 0:
+                return True
+            time.sleep(0.05)
+        return self.pending_count() == 0
+
+    def stop(self, timeout: float = 5.0):
+        """Worker'ı durdur; gönderilmemiş mesajlar outbox'ta kalır"""
+        self.running = False
+        self._notify()
+        if self.thread and self.thread is not threading.current_thread():
+            self.thread.join(timeout=timeout)
+
+    def get_stats(self) -> Dict:
+        return {**self.stats, "pending": self.pending_count(), "running": self.running}
+
+
+_delivery_queue: Optional[TelegramDeliveryQueue] = None
+
+
+def get_delivery_queue(bot_token: str, chat_id: str, **kwargs) -> TelegramDeliveryQueue:
+    """Süreç başına tek, başlatılmış delivery queue"""
+    global _delivery_queue
+    if _delivery_queue is None:
+        _delivery_queue = TelegramDeliveryQueue(bot_token, chat_id, **kwargs)
+        _delivery_queue.start()
+    return _delivery_queue
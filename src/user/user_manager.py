@@ -2,18 +2,21 @@
 PlanB Motoru - User Manager
 Kullanıcı hesapları ve tercihleri yönetimi
 """
-import json
 import os
 import hashlib
 from typing import Dict, List, Optional, Any
 from datetime import datetime, timedelta
 from src.security.encryption_manager import encryption_manager
 from src.utils.logger import log_info, log_error, log_debug
+from src.storage.document_store import DocumentStore, document_store, migrate_json_file
+from src.security.session_store import SessionStore, session_store
 
 class UserManager:
     """Kullanıcı yöneticisi"""
     
-    def __init__(self):
+    def __init__(self, store: DocumentStore = None, sessions: SessionStore = None):
+        self.store = store or document_store
+        self.session_store = sessions or session_store
         self.users_file = "data/users/users.json"
         self.preferences_file = "data/users/preferences.json"
         self.sessions_file = "data/users/sessions.json"
@@ -29,13 +32,12 @@ class UserManager:
     def _load_users(self):
         """Kullanıcıları yükle"""
         try:
-            if os.path.exists(self.users_file):
-                with open(self.users_file, 'r', encoding='utf-8') as f:
-                    self.users = json.load(f)
-            else:
-                self.users = {}
+            # Kullanıcı adı/email/rol ikincil indeksli koleksiyon
+            self.users = self.store.collection('users', indexes=('username', 'email', 'role', 'status'))
+            migrate_json_file(self.store, self.users_file, self.users.update)
+            if self.users.is_empty():
                 self._create_default_user()
-            log_info(f"{len(self.users)} kullanıcı yüklendi")
+            log_info("Kullanıcılar doküman deposundan açıldı")
         except Exception as e:
             log_error(f"Kullanıcı yükleme hatası: {e}")
             self.users = {}
@@ -43,12 +45,9 @@ class UserManager:
     def _load_preferences(self):
         """Kullanıcı tercihlerini yükle"""
         try:
-            if os.path.exists(self.preferences_file):
-                with open(self.preferences_file, 'r', encoding='utf-8') as f:
-                    self.preferences = json.load(f)
-            else:
-                self.preferences = {}
-            log_info(f"{len(self.preferences)} kullanıcı tercihi yüklendi")
+            self.preferences = self.store.collection('user_preferences')
+            migrate_json_file(self.store, self.preferences_file, self.preferences.update)
+            log_info("Kullanıcı tercihleri doküman deposundan açıldı")
         except Exception as e:
             log_error(f"Kullanıcı tercihleri yükleme hatası: {e}")
             self.preferences = {}
@@ -56,12 +55,19 @@ class UserManager:
     def _load_sessions(self):
         """Kullanıcı oturumlarını yükle"""
         try:
-            if os.path.exists(self.sessions_file):
-                with open(self.sessions_file, 'r', encoding='utf-8') as f:
-                    self.sessions = json.load(f)
-            else:
-                self.sessions = {}
-            log_info(f"{len(self.sessions)} kullanıcı oturumu yüklendi")
+            # Oturumlar bellekte tutulur; doğrulama diske dokunmaz
+            self.sessions = self.session_store.namespace('user_sessions', indexes=('user_id',))
+            migrate_json_file(self.store, self.sessions_file, self.sessions.update)
+            
+            # Doküman deposundaki eski oturumları taşı
+            legacy_sessions = self.store.collection('user_sessions')
+            if not legacy_sessions.is_empty():
+                self.sessions.update(legacy_sessions)
+                if self.session_store.snapshot():
+                    with self.store.transaction():
+                        for session_id in list(legacy_sessions):
+                            del legacy_sessions[session_id]
+            log_info("Kullanıcı oturumları oturum deposundan açıldı")
         except Exception as e:
             log_error(f"Kullanıcı oturumları yükleme hatası: {e}")
             self.sessions = {}
@@ -117,7 +123,6 @@ class UserManager:
             }
             
             self.users['default_user'] = default_user
-            self._save_users()
             log_info("Varsayılan kullanıcı oluşturuldu")
             
         except Exception as e:
@@ -154,7 +159,6 @@ class UserManager:
             }
             
             self.users[user_id] = new_user
-            self._save_users()
             
             log_info(f"Yeni kullanıcı oluşturuldu: {username}")
             return True
@@ -186,7 +190,7 @@ class UserManager:
             user['last_login'] = datetime.now().isoformat()
             user['login_count'] = user.get('login_count', 0) + 1
             
-            self._save_users()
+            self._save_user(user['user_id'])
             
             # Oturum oluştur
             session_id = self._create_session(user['user_id'])
@@ -229,7 +233,7 @@ class UserManager:
                     self.users[user_id][field] = value
             
             self.users[user_id]['updated_at'] = datetime.now().isoformat()
-            self._save_users()
+            self._save_user(user_id)
             
             log_info(f"Kullanıcı güncellendi: {user_id}")
             return True
@@ -256,7 +260,7 @@ class UserManager:
             user['password_hash'] = self._hash_password(new_password)
             user['password_changed_at'] = datetime.now().isoformat()
             
-            self._save_users()
+            self._save_user(user_id)
             
             log_info(f"Şifre değiştirildi: {user_id}")
             return True
@@ -293,7 +297,7 @@ class UserManager:
             self.users[user_id]['preferences'] = updated_preferences
             self.users[user_id]['preferences_updated_at'] = datetime.now().isoformat()
             
-            self._save_users()
+            self._save_user(user_id)
             
             log_info(f"Kullanıcı tercihleri güncellendi: {user_id}")
             return True
@@ -318,7 +322,6 @@ class UserManager:
             }
             
             self.sessions[session_id] = session_data
-            self._save_sessions()
             
             log_info(f"Oturum oluşturuldu: {session_id}")
             return session_id
@@ -343,7 +346,7 @@ class UserManager:
             
             # Son aktiviteyi güncelle
             session['last_activity'] = datetime.now().isoformat()
-            self._save_sessions()
+            self._save_session(session_id)
             
             # Kullanıcı bilgilerini getir
             user = self.get_user(session['user_id'])
@@ -404,13 +407,11 @@ class UserManager:
                 return False
             
             # Kullanıcının oturumlarını sil
-            sessions_to_delete = [sid for sid, session in self.sessions.items() if session['user_id'] == user_id]
-            for session_id in sessions_to_delete:
+            for session_id in self.sessions.find_keys('user_id', user_id):
                 self._delete_session(session_id)
             
             # Kullanıcıyı sil
             del self.users[user_id]
-            self._save_users()
             
             log_info(f"Kullanıcı silindi: {user_id}")
             return True
@@ -421,24 +422,15 @@ class UserManager:
     
     def _username_exists(self, username: str) -> bool:
         """Kullanıcı adı var mı kontrol et"""
-        for user in self.users.values():
-            if user['username'] == username:
-                return True
-        return False
+        return bool(self.users.find_keys('username', username))
     
     def _email_exists(self, email: str) -> bool:
         """Email var mı kontrol et"""
-        for user in self.users.values():
-            if user['email'] == email:
-                return True
-        return False
+        return bool(self.users.find_keys('email', email))
     
     def _find_user_by_username(self, username: str) -> Optional[Dict[str, Any]]:
         """Kullanıcı adına göre kullanıcı bul"""
-        for user in self.users.values():
-            if user['username'] == username:
-                return user
-        return None
+        return self.users.find_one('username', username)
     
     def _generate_user_id(self, username: str) -> str:
         """Kullanıcı ID oluştur"""
@@ -523,7 +515,6 @@ class UserManager:
         try:
             if session_id in self.sessions:
                 del self.sessions[session_id]
-                self._save_sessions()
                 log_info(f"Oturum silindi: {session_id}")
                 return True
             return False
@@ -531,46 +522,27 @@ class UserManager:
             log_error(f"Oturum silme hatası: {e}")
             return False
     
-    def _save_users(self):
-        """Kullanıcıları kaydet"""
+    def _save_user(self, user_id: str):
+        """Tek kullanıcıyı kaydet"""
         try:
-            with open(self.users_file, 'w', encoding='utf-8') as f:
-                json.dump(self.users, f, indent=2, ensure_ascii=False)
+            self.users.save(user_id)
         except Exception as e:
             log_error(f"Kullanıcı kaydetme hatası: {e}")
     
-    def _save_preferences(self):
-        """Tercihleri kaydet"""
-        try:
-            with open(self.preferences_file, 'w', encoding='utf-8') as f:
-                json.dump(self.preferences, f, indent=2, ensure_ascii=False)
-        except Exception as e:
-            log_error(f"Tercih kaydetme hatası: {e}")
-    
-    def _save_sessions(self):
-        """Oturumları kaydet"""
+    def _save_session(self, session_id: str):
+        """Tek oturumu işaretle (bir sonraki snapshot'a girer)"""
         try:
-            with open(self.sessions_file, 'w', encoding='utf-8') as f:
-                json.dump(self.sessions, f, indent=2, ensure_ascii=False)
+            self.sessions.save(session_id)
         except Exception as e:
             log_error(f"Oturum kaydetme hatası: {e}")
     
     def cleanup_expired_sessions(self):
-        """Süresi dolmuş oturumları temizle"""
+        """Süresi dolmuş oturumları temizle (yalnızca dolan çark yuvaları dolaşılır)"""
         try:
-            current_time = datetime.now()
-            expired_sessions = []
-            
-            for session_id, session_data in self.sessions.items():
-                expires_at = datetime.fromisoformat(session_data['expires_at'])
-                if current_time > expires_at:
-                    expired_sessions.append(session_id)
+            expired_count = self.session_store.expire()
             
-            for session_id in expired_sessions:
-                self._delete_session(session_id)
-            
-            if expired_sessions:
-                log_info(f"{len(expired_sessions)} süresi dolmuş oturum temizlendi")
+            if expired_count:
+                log_info(f"{expired_count} süresi dolmuş oturum/sayaç temizlendi")
             
         except Exception as e:
             log_error(f"Oturum temizleme hatası: {e}")
@@ -579,7 +551,7 @@ class UserManager:
         """Kullanıcı istatistikleri"""
         try:
             total_users = len(self.users)
-            active_users = len([u for u in self.users.values() if u['status'] == 'active'])
+            active_users = len(self.users.find_keys('status', 'active'))
             total_sessions = len(self.sessions)
             
             # Son 24 saatte giriş yapan kullanıcılar
@@ -595,10 +567,7 @@ class UserManager:
                 'inactive_users': total_users - active_users,
                 'total_sessions': total_sessions,
                 'recent_logins_24h': recent_logins,
-                'user_roles': {
-                    role: len([u for u in self.users.values() if u['role'] == role])
-                    for role in set(u['role'] for u in self.users.values())
-                }
+                'user_roles': self.users.distinct('role')
             }
             
         except Exception as e:
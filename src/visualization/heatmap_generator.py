@@ -2,12 +2,93 @@
 PlanB Motoru - Heatmap Generator
 Sektör bazlı heatmap görselleştirme
 """
+import threading
+from collections import OrderedDict
 import numpy as np
 import pandas as pd
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Sequence, Tuple
 from datetime import datetime, timedelta
 from src.utils.logger import log_info, log_error, log_debug
 
+# Zaman dilimi -> panelin son kaç barı (None = tüm geçmiş)
+TIMEFRAME_BARS = {
+    '1d': 1,
+    '5d': 5,
+    '1mo': 21,
+    '3mo': 63,
+    '6mo': 126,
+    '1y': 252,
+    'all': None
+}
+
+COLOR_THRESHOLDS = np.array([-5.0, -2.0, 2.0, 5.0])
+COLOR_LABELS = np.array(['very_negative', 'negative', 'neutral', 'positive', 'very_positive'])
+
+
+class SectorPanel:
+    """Sütunları sektöre göre sıralı, tarih hizalı getiri/hacim paneli
+
+    Her sektör bitişik bir sütun aralığıdır; sektör toplamları np.add.reduceat ile
+    segment toplamı olarak alınır. Son-k-bar toplamları ters kümülatif toplamdan tek
+    gather ile okunduğundan birden çok zaman dilimi aynı geçişte hesaplanır.
+    """
+
+    def __init__(self, sectors: List[str], starts: np.ndarray, returns: np.ndarray,
+                 volumes: np.ndarray, symbol_counts: np.ndarray):
+        self.sectors = sectors
+        self.starts = starts
+        self.symbol_counts = symbol_counts
+        self.bars = len(returns)
+        self._window_sums = self._reverse_cumsums(returns, volumes)
+        self._stats: Dict[Tuple, Dict[str, np.ndarray]] = {}
+
+    @staticmethod
+    def _reverse_cumsums(returns: np.ndarray, volumes: np.ndarray) -> List[np.ndarray]:
+        """Satır k-1: son k barın sembol bazında toplamları"""
+        valid_returns = ~np.isnan(returns)
+        valid_volumes = ~np.isnan(volumes)
+        clean_returns = np.where(valid_returns, returns, 0.0)
+        clean_volumes = np.where(valid_volumes, volumes, 0.0)
+        return [np.cumsum(array[::-1], axis=0) for array in
+                (valid_returns.astype(np.float64), clean_returns, clean_returns ** 2,
+                 valid_volumes.astype(np.float64), clean_volumes)]
+
+    def window_stats(self, timeframes: Sequence[str]) -> Dict[str, np.ndarray]:
+        """(zaman dilimi x sektör) gözlem sayısı, ortalama, volatilite ve ortalama hacim"""
+        key = tuple(timeframes)
+        cached = self._stats.get(key)
+        if cached is not None:
+            return cached
+
+        if not self.bars or not len(self.starts):
+            shape = (len(timeframes), len(self.sectors))
+            cached = {name: np.zeros(shape) for name in ('count', 'mean', 'std', 'volume')}
+            self._stats[key] = cached
+            return cached
+
+        rows = np.array([min(TIMEFRAME_BARS.get(tf) or self.bars, self.bars) - 1 for tf in timeframes])
+        # (zaman dilimi x sembol) -> (zaman dilimi x sektör) segment toplamları
+        count, total, squares, volume_count, volume_total = (
+            np.add.reduceat(sums[rows], self.starts, axis=1) for sums in self._window_sums
+        )
+        with np.errstate(divide='ignore', invalid='ignore'):
+            mean = np.where(count > 0, total / count, 0.0)
+            variance = np.where(count > 0, squares / count - mean ** 2, 0.0)
+            volume = np.where(volume_count > 0, volume_total / volume_count, 0.0)
+        cached = {
+            'count': count,
+            'mean': mean,
+            'std': np.sqrt(np.maximum(variance, 0.0)),
+            'volume': volume,
+        }
+        self._stats[key] = cached
+        return cached
+
+
+def _column(df: pd.DataFrame, name: str) -> Optional[pd.Series]:
+    return df[name] if name in df.columns else None
+
+
 class HeatmapGenerator:
     """Sektör bazlı heatmap oluşturucu"""
     
@@ -33,121 +114,165 @@ class HeatmapGenerator:
             'Storage': ['FIL', 'AR', 'SC', 'STORJ', 'SIA'],
             'Privacy': ['XMR', 'ZEC', 'DASH', 'SCRT', 'BEAM']
         }
+        
+        # Bar başına önbellek: aynı veriyle tekrar çağrılar paneli yeniden kurmaz
+        self.max_cached = 8
+        self._panels: 'OrderedDict[str, SectorPanel]' = OrderedDict()
+        self._lock = threading.Lock()
+    
+    # ------------------------------------------------------------------
+    # Panel ve önbellek
+    # ------------------------------------------------------------------
+    
+    def _sector_panel(self, price_data: Dict[str, pd.DataFrame],
+                      market_type: str = 'equity') -> Tuple[str, SectorPanel]:
+        """Eşlemedeki semboller için sektöre göre sıralı panel; son bar değişmedikçe önbellekten"""
+        mapping = self.crypto_sectors if market_type == 'crypto' else self.sector_mapping
+        columns = []
+        for sector_id, (sector, symbols) in enumerate(mapping.items()):
+            for symbol in symbols:
+                df = price_data.get(symbol)
+                if df is not None and not df.empty:
+                    columns.append((sector_id, symbol, df))
+        
+        # Önbellek anahtarı: piyasa türü + her sembolün bar sayısı ve son bar zamanı
+        signature = tuple((symbol, len(df), df.index[-1]) for _, symbol, df in columns)
+        key = f"{market_type}:{hash(signature) & 0xFFFFFFFFFFFFFFFF:016x}"
+        with self._lock:
+            panel = self._panels.get(key)
+            if panel is not None:
+                self._panels.move_to_end(key)
+                return key, panel
+        
+        returns, volumes, sector_ids = {}, {}, []
+        for position, (sector_id, symbol, df) in enumerate(columns):
+            close = _column(df, 'close')
+            volume = _column(df, 'volume')
+            if close is not None:
+                values = close.to_numpy(dtype=np.float64)
+                returns[position] = pd.Series(values[1:] / values[:-1] - 1, index=df.index[1:])
+            if volume is not None:
+                volumes[position] = volume.astype(np.float64)
+            sector_ids.append(sector_id)
+        
+        positions = list(range(len(columns)))
+        return_frame = pd.DataFrame(returns).reindex(columns=positions)
+        volume_frame = pd.DataFrame(volumes).reindex(columns=positions)
+        index = return_frame.index.union(volume_frame.index)
+        return_matrix = return_frame.reindex(index).to_numpy(dtype=np.float64, copy=True)
+        volume_matrix = volume_frame.reindex(index).to_numpy(dtype=np.float64)
+        return_matrix[~np.isfinite(return_matrix)] = np.nan
+        
+        # Sütunlar zaten sektör sırasında: her sektörün ilk sütunu segment başlangıcı
+        sector_ids = np.array(sector_ids, dtype=np.intp)
+        present = np.unique(sector_ids)
+        starts = np.searchsorted(sector_ids, present)
+        names = list(mapping)
+        symbol_counts = np.array([len([s for s in mapping[names[i]] if s in price_data]) for i in present])
+        panel = SectorPanel([names[i] for i in present], starts, return_matrix, volume_matrix, symbol_counts)
+        
+        with self._lock:
+            self._panels[key] = panel
+            while len(self._panels) > self.max_cached:
+                self._panels.popitem(last=False)
+        log_debug(f"Heatmap paneli oluşturuldu: {len(columns)} sembol x {len(index)} bar")
+        return key, panel
+    
+    def _heatmap_rows(self, panel: SectorPanel, timeframes: Sequence[str]) -> Dict[str, Dict[str, Any]]:
+        """Zaman dilimi başına {sektör: metrikler}"""
+        stats = panel.window_stats(timeframes)
+        return_pct = stats['mean'] * 100
+        volatility_pct = stats['std'] * 100
+        colors = COLOR_LABELS[np.searchsorted(COLOR_THRESHOLDS, return_pct, side='left')]
+        
+        result = {}
+        for row, timeframe in enumerate(timeframes):
+            result[timeframe] = {
+                sector: {
+                    'return_pct': round(float(return_pct[row, i]), 2),
+                    'volatility_pct': round(float(volatility_pct[row, i]), 2),
+                    'volume_ratio': round(float(stats['volume'][row, i]), 0),
+                    'symbol_count': int(panel.symbol_counts[i]),
+                    'color_intensity': str(colors[row, i])
+                }
+                for i, sector in enumerate(panel.sectors) if stats['count'][row, i] > 0
+            }
+        return result
+    
+    def generate_multi_timeframe_heatmap(self, price_data: Dict[str, pd.DataFrame],
+                                         timeframes: Sequence[str] = ('1d', '5d', '1mo', '3mo'),
+                                         market_type: str = 'equity') -> Dict[str, Any]:
+        """Birden çok zaman dilimi için sektör heatmap'i (tek panel, tek geçiş)"""
+        try:
+            _, panel = self._sector_panel(price_data, market_type)
+            heatmaps = self._heatmap_rows(panel, list(timeframes))
+            
+            return {
+                'heatmaps': heatmaps,
+                'timeframes': list(timeframes),
+                'market_type': market_type,
+                'generated_at': datetime.now().isoformat(),
+                'total_sectors': len(panel.sectors)
+            }
+            
+        except Exception as e:
+            log_error(f"Çoklu zaman dilimi heatmap hatası: {e}")
+            return {}
     
     def generate_sector_heatmap(self, price_data: Dict[str, pd.DataFrame], 
                               timeframe: str = '1d') -> Dict[str, Any]:
-        """Sektör heatmap oluştur"""
+        """Sektör heatmap oluştur
+        
+        timeframe panelin son kaç barının kullanılacağını belirler (TIMEFRAME_BARS);
+        tanınmayan değerlerde tüm geçmiş kullanılır.
+        """
         try:
-            heatmap_data = {}
-            
-            for sector, symbols in self.sector_mapping.items():
-                sector_returns = []
-                sector_volumes = []
-                
-                for symbol in symbols:
-                    if symbol in price_data and not price_data[symbol].empty:
-                        df = price_data[symbol]
-                        
-                        # Getiri hesapla
-                        if 'close' in df.columns:
-                            returns = df['close'].pct_change(fill_method=None).dropna()
-                            if not returns.empty:
-                                sector_returns.extend(returns.tolist())
-                        
-                        # Hacim hesapla
-                        if 'volume' in df.columns:
-                            volumes = df['volume'].dropna()
-                            if not volumes.empty:
-                                sector_volumes.extend(volumes.tolist())
-                
-                if sector_returns:
-                    avg_return = np.mean(sector_returns) * 100
-                    volatility = np.std(sector_returns) * 100
-                    volume_ratio = np.mean(sector_volumes) if sector_volumes else 0
-                    
-                    heatmap_data[sector] = {
-                        'return_pct': round(avg_return, 2),
-                        'volatility_pct': round(volatility, 2),
-                        'volume_ratio': round(volume_ratio, 0),
-                        'symbol_count': len([s for s in symbols if s in price_data]),
-                        'color_intensity': self._calculate_color_intensity(avg_return, volatility)
-                    }
+            key, panel = self._sector_panel(price_data, 'equity')
+            heatmap_data = self._heatmap_rows(panel, [timeframe])[timeframe]
             
             return {
                 'heatmap_data': heatmap_data,
                 'timeframe': timeframe,
                 'generated_at': datetime.now().isoformat(),
-                'total_sectors': len(heatmap_data)
+                'total_sectors': len(heatmap_data),
+                'panel_key': key
             }
             
         except Exception as e:
             log_error(f"Sektör heatmap oluşturma hatası: {e}")
             return {}
     
-    def generate_crypto_heatmap(self, price_data: Dict[str, pd.DataFrame]) -> Dict[str, Any]:
+    def generate_crypto_heatmap(self, price_data: Dict[str, pd.DataFrame],
+                                timeframe: str = 'all') -> Dict[str, Any]:
         """Kripto sektör heatmap oluştur"""
         try:
-            heatmap_data = {}
-            
-            for sector, symbols in self.crypto_sectors.items():
-                sector_returns = []
-                sector_volumes = []
-                
-                for symbol in symbols:
-                    if symbol in price_data and not price_data[symbol].empty:
-                        df = price_data[symbol]
-                        
-                        if 'close' in df.columns:
-                            returns = df['close'].pct_change(fill_method=None).dropna()
-                            if not returns.empty:
-                                sector_returns.extend(returns.tolist())
-                        
-                        if 'volume' in df.columns:
-                            volumes = df['volume'].dropna()
-                            if not volumes.empty:
-                                sector_volumes.extend(volumes.tolist())
-                
-                if sector_returns:
-                    avg_return = np.mean(sector_returns) * 100
-                    volatility = np.std(sector_returns) * 100
-                    volume_ratio = np.mean(sector_volumes) if sector_volumes else 0
-                    
-                    heatmap_data[sector] = {
-                        'return_pct': round(avg_return, 2),
-                        'volatility_pct': round(volatility, 2),
-                        'volume_ratio': round(volume_ratio, 0),
-                        'symbol_count': len([s for s in symbols if s in price_data]),
-                        'color_intensity': self._calculate_color_intensity(avg_return, volatility)
-                    }
+            key, panel = self._sector_panel(price_data, 'crypto')
+            heatmap_data = self._heatmap_rows(panel, [timeframe])[timeframe]
             
             return {
                 'heatmap_data': heatmap_data,
                 'market_type': 'crypto',
+                'timeframe': timeframe,
                 'generated_at': datetime.now().isoformat(),
-                'total_sectors': len(heatmap_data)
+                'total_sectors': len(heatmap_data),
+                'panel_key': key
             }
             
         except Exception as e:
             log_error(f"Kripto heatmap oluşturma hatası: {e}")
             return {}
     
-    def _calculate_color_intensity(self, return_pct: float, volatility: float) -> str:
-        """Renk yoğunluğunu hesapla"""
-        try:
-            # Getiri bazlı renk
-            if return_pct > 5:
-                return 'very_positive'
-            elif return_pct > 2:
-                return 'positive'
-            elif return_pct > -2:
-                return 'neutral'
-            elif return_pct > -5:
-                return 'negative'
-            else:
-                return 'very_negative'
-                
-        except Exception as e:
-            return 'neutral'
+    def _sector_returns(self, heatmap_data: Dict[str, Any]) -> Tuple[List[str], np.ndarray]:
+        """Heatmap'in sektör getiri vektörü; panel önbellekteyse gruplanmış dizilerden"""
+        sectors = heatmap_data['heatmap_data']
+        panel = self._panels.get(heatmap_data.get('panel_key'))
+        timeframe = heatmap_data.get('timeframe', 'all')
+        if panel is not None:
+            stats = panel.window_stats([timeframe])
+            present = stats['count'][0] > 0
+            names = [sector for sector, keep in zip(panel.sectors, present) if keep]
+            return names, np.round(stats['mean'][0][present] * 100, 2)
+        return list(sectors), np.array([data['return_pct'] for data in sectors.values()], dtype=np.float64)
     
     def generate_rotation_analysis(self, heatmap_data: Dict[str, Any]) -> Dict[str, Any]:
         """Sektör rotasyon analizi"""
@@ -155,23 +280,21 @@ class HeatmapGenerator:
             if not heatmap_data or 'heatmap_data' not in heatmap_data:
                 return {}
             
-            sectors = heatmap_data['heatmap_data']
-            
-            # En iyi ve en kötü performans
-            sorted_sectors = sorted(sectors.items(), 
-                                  key=lambda x: x[1]['return_pct'], reverse=True)
+            names, returns = self._sector_returns(heatmap_data)
             
-            top_performers = sorted_sectors[:3]
-            bottom_performers = sorted_sectors[-3:]
+            # En iyi ve en kötü performans (kararlı sıralama: eşitlikte ilk sektör önde)
+            order = np.argsort(-returns, kind='stable')
+            top_performers = order[:3]
+            bottom_performers = order[-3:]
             
             # Momentum analizi
             momentum_analysis = {
-                'leading_sectors': [{'sector': sector, 'return': data['return_pct']} 
-                                  for sector, data in top_performers],
-                'lagging_sectors': [{'sector': sector, 'return': data['return_pct']} 
-                                  for sector, data in bottom_performers],
-                'rotation_strength': self._calculate_rotation_strength(sectors),
-                'market_breadth': self._calculate_market_breadth(sectors)
+                'leading_sectors': [{'sector': names[i], 'return': float(returns[i])} 
+                                  for i in top_performers],
+                'lagging_sectors': [{'sector': names[i], 'return': float(returns[i])} 
+                                  for i in bottom_performers],
+                'rotation_strength': self._calculate_rotation_strength(returns),
+                'market_breadth': self._calculate_market_breadth(returns)
             }
             
             return momentum_analysis
@@ -180,11 +303,10 @@ class HeatmapGenerator:
             log_error(f"Rotasyon analizi hatası: {e}")
             return {}
     
-    def _calculate_rotation_strength(self, sectors: Dict[str, Any]) -> str:
+    def _calculate_rotation_strength(self, returns: np.ndarray) -> str:
         """Rotasyon gücünü hesapla"""
         try:
-            returns = [data['return_pct'] for data in sectors.values()]
-            if not returns:
+            if not len(returns):
                 return 'weak'
             
             std_returns = np.std(returns)
@@ -199,12 +321,11 @@ class HeatmapGenerator:
         except Exception as e:
             return 'weak'
     
-    def _calculate_market_breadth(self, sectors: Dict[str, Any]) -> Dict[str, Any]:
+    def _calculate_market_breadth(self, returns: np.ndarray) -> Dict[str, Any]:
         """Piyasa genişliğini hesapla"""
         try:
-            positive_sectors = len([data for data in sectors.values() 
-                                  if data['return_pct'] > 0])
-            total_sectors = len(sectors)
+            positive_sectors = int((returns > 0).sum())
+            total_sectors = len(returns)
             
             breadth_ratio = positive_sectors / total_sectors if total_sectors > 0 else 0
             
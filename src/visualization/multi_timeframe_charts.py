@@ -83,6 +83,17 @@ class MultiTimeframeCharts:
             log_error(f"Multi-timeframe analiz hatası: {e}")
             return {}
     
+    def generate_from_aggregator(self, symbol: str, aggregator=None) -> Dict[str, Any]:
+        """Paylaşılan bar aggregator'daki hazır özetlerden multi-timeframe analiz"""
+        try:
+            if aggregator is None:
+                from src.data.bar_aggregator import bar_aggregator as aggregator
+            price_data = aggregator.get_timeframe_data(symbol, list(self.timeframes.keys()))
+            return self.generate_multi_timeframe_analysis(symbol, price_data)
+        except Exception as e:
+            log_error(f"Aggregator multi-timeframe analiz hatası: {e}")
+            return {}
+    
     def _analyze_timeframe_basic(self, df: pd.DataFrame, timeframe: str) -> Dict[str, Any]:
         """Temel timeframe analizi"""
         try:
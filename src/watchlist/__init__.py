@@ -4,6 +4,8 @@ PlanB Motoru - Watchlist Module
 """
 
 from .watchlist_manager import WatchlistManager, watchlist_manager
+from .watchlist_index import WatchlistIndex
+from .watchlist_performance import QuoteBoard
 
-__all__ = ['WatchlistManager', 'watchlist_manager']
+__all__ = ['WatchlistManager', 'watchlist_manager', 'WatchlistIndex', 'QuoteBoard']
 
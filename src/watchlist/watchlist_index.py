@@ -0,0 +1,130 @@
+"""
+PlanB Motoru - Watchlist Index
+İzleme listeleri için ters indeks (sembol -> listeler, kelime -> listeler) ve popülerlik sıralaması
+"""
+import bisect
+import heapq
+import re
+import threading
+from typing import Dict, List, Set, Any, Iterable, Tuple
+
+TOKEN_PATTERN = re.compile(r"[^\W_]+", re.UNICODE)
+
+
+def tokenize(text: str) -> Set[str]:
+    """Küçük harfli kelimeler; ayraç içeren ifadeler (THYAO.IS, blue-chip) bütün olarak da eklenir"""
+    text = (text or "").lower()
+    tokens = set(TOKEN_PATTERN.findall(text))
+    tokens.update(part for part in text.split() if not TOKEN_PATTERN.fullmatch(part))
+    return tokens
+
+
+class WatchlistIndex:
+    """Sembol ve kelime posting listeleri; önek araması sıralı sözlük üzerinde bisect ile"""
+
+    def __init__(self):
+        self.symbol_postings: Dict[str, Set[str]] = {}
+        self.token_postings: Dict[str, Set[str]] = {}
+        self.vocabulary: List[str] = []
+        self.views: Dict[str, int] = {}
+        self._entries: Dict[str, Tuple[Set[str], Set[str]]] = {}
+        self.lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, watchlist_id: str) -> bool:
+        return watchlist_id in self._entries
+
+    def rebuild(self, watchlists: Iterable[Tuple[str, Dict[str, Any]]]):
+        """Tüm indeksi baştan kur"""
+        with self.lock:
+            self.symbol_postings.clear()
+            self.token_postings.clear()
+            self.vocabulary = []
+            self.views.clear()
+            self._entries.clear()
+            for watchlist_id, watchlist in watchlists:
+                self.add(watchlist_id, watchlist)
+
+    def add(self, watchlist_id: str, watchlist: Dict[str, Any]):
+        """Listeyi indeksle (varsa önceki girdisi değiştirilir)"""
+        with self.lock:
+            self.remove(watchlist_id)
+            symbols = set(watchlist.get('symbols', []))
+            tokens = tokenize(watchlist.get('name', '')) | tokenize(watchlist.get('description', ''))
+            for tag in watchlist.get('tags', []):
+                tokens |= tokenize(tag)
+            for symbol in symbols:
+                tokens |= tokenize(symbol)
+                self.symbol_postings.setdefault(symbol, set()).add(watchlist_id)
+            for token in tokens:
+                postings = self.token_postings.get(token)
+                if postings is None:
+                    postings = self.token_postings[token] = set()
+                    bisect.insort(self.vocabulary, token)
+                postings.add(watchlist_id)
+            self._entries[watchlist_id] = (symbols, tokens)
+            self.views[watchlist_id] = watchlist.get('view_count', 0)
+
+    def remove(self, watchlist_id: str):
+        """Listeyi indeksten çıkar"""
+        with self.lock:
+            entry = self._entries.pop(watchlist_id, None)
+            self.views.pop(watchlist_id, None)
+            if entry is None:
+                return
+            symbols, tokens = entry
+            for symbol in symbols:
+                postings = self.symbol_postings.get(symbol)
+                if postings is not None:
+                    postings.discard(watchlist_id)
+                    if not postings:
+                        del self.symbol_postings[symbol]
+            for token in tokens:
+                postings = self.token_postings.get(token)
+                if postings is not None:
+                    postings.discard(watchlist_id)
+                    if not postings:
+                        del self.token_postings[token]
+                        position = bisect.bisect_left(self.vocabulary, token)
+                        if position < len(self.vocabulary) and self.vocabulary[position] == token:
+                            del self.vocabulary[position]
+
+    def watchlists_for_symbol(self, symbol: str) -> Set[str]:
+        """Sembolü içeren listeler"""
+        return self.symbol_postings.get(symbol, set())
+
+    def _prefix_matches(self, prefix: str) -> Set[str]:
+        """Öneki `prefix` olan tüm kelimelerin posting birleşimi"""
+        matches: Set[str] = set()
+        start = bisect.bisect_left(self.vocabulary, prefix)
+        for token in self.vocabulary[start:]:
+            if not token.startswith(prefix):
+                break
+            matches |= self.token_postings[token]
+        return matches
+
+    def search(self, query: str) -> List[str]:
+        """Sorgudaki her kelime (önek olarak) listenin bir alanında geçmeli"""
+        with self.lock:
+            query_tokens = TOKEN_PATTERN.findall((query or "").lower())
+            if not query_tokens:
+                return []
+            result = None
+            for token in sorted(query_tokens, key=len, reverse=True):
+                matches = self._prefix_matches(token)
+                result = matches if result is None else result & matches
+                if not result:
+                    return []
+            return sorted(result)
+
+    def set_views(self, watchlist_id: str, view_count: int):
+        if watchlist_id in self._entries:
+            self.views[watchlist_id] = view_count
+
+    def most_viewed(self, limit: int = 10) -> List[str]:
+        """En çok görüntülenen listeler (tam sıralama yerine heap ile ilk `limit`)"""
+        with self.lock:
+            return [watchlist_id for watchlist_id, _ in
+                    heapq.nlargest(limit, self.views.items(), key=lambda item: item[1])]
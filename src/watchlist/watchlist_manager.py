@@ -4,15 +4,23 @@ PlanB Motoru - Watchlist Manager
 """
 import json
 import os
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Callable
 from datetime import datetime, timedelta
+import pandas as pd
 from src.utils.logger import log_info, log_error, log_debug
+from src.storage.document_store import DocumentStore, document_store, migrate_json_file
+from src.watchlist.watchlist_index import WatchlistIndex
+from src.watchlist.watchlist_performance import QuoteBoard
 
 class WatchlistManager:
     """İzleme listesi yöneticisi"""
     
-    def __init__(self):
+    def __init__(self, store: DocumentStore = None, loader: Callable[..., pd.DataFrame] = None):
         self.watchlists_file = "data/watchlists/watchlists.json"
+        self.store = store or document_store
+        # Sembol/kelime ters indeksi ve paylaşılan fiyat cache'inden beslenen fiyat tablosu
+        self.index = WatchlistIndex()
+        self.quotes = QuoteBoard(self.index, loader=loader)
         self._ensure_watchlist_directory()
         self._load_watchlists()
     
@@ -23,13 +31,13 @@ class WatchlistManager:
     def _load_watchlists(self):
         """İzleme listelerini yükle"""
         try:
-            if os.path.exists(self.watchlists_file):
-                with open(self.watchlists_file, 'r', encoding='utf-8') as f:
-                    self.watchlists = json.load(f)
-            else:
-                self.watchlists = {}
+            # Doküman deposu: market/tag/kullanıcı ikincil indeksli, değişiklikte yalnızca ilgili liste yazılır
+            self.watchlists = self.store.collection('watchlists', indexes=('market', 'tags', 'user_id'))
+            migrate_json_file(self.store, self.watchlists_file, self.watchlists.update)
+            if self.watchlists.is_empty():
                 self._create_default_watchlists()
-            log_info(f"{len(self.watchlists)} izleme listesi yüklendi")
+            self._rebuild_index()
+            log_info("İzleme listeleri doküman deposundan açıldı")
         except Exception as e:
             log_error(f"İzleme listesi yükleme hatası: {e}")
             self.watchlists = {}
@@ -80,8 +88,8 @@ class WatchlistManager:
                 }
             }
             
-            self.watchlists = default_watchlists
-            self._save_watchlists()
+            with self.store.transaction():
+                self.watchlists.update(default_watchlists)
             log_info("Varsayılan izleme listeleri oluşturuldu")
             
         except Exception as e:
@@ -111,7 +119,7 @@ class WatchlistManager:
             }
             
             self.watchlists[watchlist_id] = new_watchlist
-            self._save_watchlists()
+            self._index_watchlist(watchlist_id)
             
             log_info(f"Yeni izleme listesi oluşturuldu: {name}")
             return watchlist_id
@@ -133,17 +141,22 @@ class WatchlistManager:
         try:
             watchlists_list = []
             
-            for watchlist_id, watchlist_data in self.watchlists.items():
-                # Market filtresi
-                if market and watchlist_data.get('market') != market:
-                    continue
-                
-                # Tag filtresi
-                if tags:
-                    watchlist_tags = watchlist_data.get('tags', [])
-                    if not any(tag in watchlist_tags for tag in tags):
-                        continue
-                
+            # Filtreler ikincil indeksten çözülür, tüm listeler taranmaz
+            candidate_ids = None
+            if market:
+                candidate_ids = set(self.watchlists.find_keys('market', market))
+            if tags:
+                tagged_ids = set()
+                for tag in tags:
+                    tagged_ids.update(self.watchlists.find_keys('tags', tag))
+                candidate_ids = tagged_ids if candidate_ids is None else candidate_ids & tagged_ids
+            
+            if candidate_ids is None:
+                candidates = self.watchlists.items()
+            else:
+                candidates = [(wid, self.watchlists[wid]) for wid in sorted(candidate_ids)]
+            
+            for watchlist_id, watchlist_data in candidates:
                 # Güvenli veri döndür
                 safe_watchlist = {
                     'watchlist_id': watchlist_data['watchlist_id'],
@@ -183,7 +196,8 @@ class WatchlistManager:
                     self.watchlists[watchlist_id][field] = value
             
             self.watchlists[watchlist_id]['updated_at'] = datetime.now().isoformat()
-            self._save_watchlists()
+            self._save_watchlist(watchlist_id)
+            self._index_watchlist(watchlist_id)
             
             log_info(f"İzleme listesi güncellendi: {watchlist_id}")
             return True
@@ -210,7 +224,8 @@ class WatchlistManager:
             watchlist['symbols'].append(symbol)
             watchlist['updated_at'] = datetime.now().isoformat()
             
-            self._save_watchlists()
+            self._save_watchlist(watchlist_id)
+            self._index_watchlist(watchlist_id)
             
             log_info(f"Sembol eklendi: {symbol} -> {watchlist_id}")
             return True
@@ -237,7 +252,8 @@ class WatchlistManager:
             watchlist['symbols'].remove(symbol)
             watchlist['updated_at'] = datetime.now().isoformat()
             
-            self._save_watchlists()
+            self._save_watchlist(watchlist_id)
+            self._index_watchlist(watchlist_id)
             
             log_info(f"Sembol çıkarıldı: {symbol} -> {watchlist_id}")
             return True
@@ -255,7 +271,8 @@ class WatchlistManager:
             
             # İzleme listesini sil
             del self.watchlists[watchlist_id]
-            self._save_watchlists()
+            self.index.remove(watchlist_id)
+            self.quotes.drop(watchlist_id)
             
             log_info(f"İzleme listesi silindi: {watchlist_id}")
             return True
@@ -265,77 +282,76 @@ class WatchlistManager:
             return False
     
     def get_watchlist_performance(self, watchlist_id: str) -> Dict[str, Any]:
-        """İzleme listesi performansı"""
+        """İzleme listesi performansı (günlük bar cache'i + canlı barlar)"""
         try:
             watchlist = self.get_watchlist(watchlist_id)
             if not watchlist:
                 return {}
             
-            # Simüle edilmiş performans verileri
-            symbols = watchlist['symbols']
-            performance_data = []
-            
-            for symbol in symbols:
-                # Simüle edilmiş performans
-                import numpy as np
-                price = np.random.uniform(10, 1000)
-                change = np.random.uniform(-10, 10)
-                volume = np.random.uniform(1000000, 10000000)
-                
-                performance_data.append({
-                    'symbol': symbol,
-                    'price': price,
-                    'change': change,
-                    'change_pct': change,
-                    'volume': volume,
-                    'market_cap': price * volume * 0.1
-                })
-            
-            # Toplam performans
-            total_change = np.mean([data['change_pct'] for data in performance_data])
-            best_performer = max(performance_data, key=lambda x: x['change_pct'])
-            worst_performer = min(performance_data, key=lambda x: x['change_pct'])
-            
-            return {
-                'watchlist_id': watchlist_id,
-                'watchlist_name': watchlist['name'],
-                'total_symbols': len(symbols),
-                'average_change': total_change,
-                'best_performer': best_performer,
-                'worst_performer': worst_performer,
-                'performance_data': performance_data,
-                'updated_at': datetime.now().isoformat()
-            }
+            # Yalnızca süresi dolmuş semboller cache'den okunur; toplamlar artımlı tutulur
+            self.quotes.load_symbols(watchlist['symbols'])
+            return self._performance_result(watchlist_id, watchlist)
             
         except Exception as e:
             log_error(f"İzleme listesi performans alma hatası: {e}")
             return {}
     
+    def get_watchlists_performance(self, watchlist_ids: List[str] = None) -> Dict[str, Dict[str, Any]]:
+        """Birden çok listenin performansı; ortak semboller bir kez yüklenir"""
+        try:
+            ids = [wid for wid in (watchlist_ids or list(self.watchlists)) if wid in self.watchlists]
+            symbols = [symbol for wid in ids for symbol in self.watchlists[wid]['symbols']]
+            self.quotes.load_symbols(symbols)
+            return {wid: self._performance_result(wid, self.watchlists[wid]) for wid in ids}
+            
+        except Exception as e:
+            log_error(f"Toplu izleme listesi performans hatası: {e}")
+            return {}
+    
+    def _performance_result(self, watchlist_id: str, watchlist: Dict[str, Any]) -> Dict[str, Any]:
+        performance = self.quotes.performance(watchlist_id)
+        if performance is None:
+            self._index_watchlist(watchlist_id)
+            performance = self.quotes.performance(watchlist_id)
+        
+        return {
+            'watchlist_id': watchlist_id,
+            'watchlist_name': watchlist['name'],
+            'total_symbols': len(watchlist['symbols']),
+            'priced_symbols': performance['priced_symbols'],
+            'average_change': performance['average_change'],
+            'best_performer': performance['best_performer'],
+            'worst_performer': performance['worst_performer'],
+            'performance_data': performance['performance_data'],
+            'updated_at': datetime.now().isoformat()
+        }
+    
     def search_watchlists(self, query: str) -> List[Dict[str, Any]]:
-        """İzleme listelerinde arama"""
+        """İzleme listelerinde arama (ters indeks: her sorgu kelimesi bir kelimenin öneki olmalı)"""
         try:
             query_lower = query.lower()
             matching_watchlists = []
             
-            for watchlist_id, watchlist_data in self.watchlists.items():
-                # Arama kriterleri
+            for watchlist_id in self.index.search(query):
+                watchlist_data = self.watchlists.get(watchlist_id)
+                if watchlist_data is None:
+                    continue
+                # Eşleşme türü yalnızca aday listelerde belirlenir
                 name_match = query_lower in watchlist_data['name'].lower()
                 description_match = query_lower in watchlist_data.get('description', '').lower()
                 tag_match = any(query_lower in tag.lower() for tag in watchlist_data.get('tags', []))
-                symbol_match = any(query_lower in symbol.lower() for symbol in watchlist_data['symbols'])
                 
-                if name_match or description_match or tag_match or symbol_match:
-                    safe_watchlist = {
-                        'watchlist_id': watchlist_data['watchlist_id'],
-                        'name': watchlist_data['name'],
-                        'description': watchlist_data['description'],
-                        'symbols': watchlist_data['symbols'],
-                        'market': watchlist_data['market'],
-                        'tags': watchlist_data['tags'],
-                        'symbol_count': len(watchlist_data['symbols']),
-                        'match_type': 'name' if name_match else ('description' if description_match else ('tag' if tag_match else 'symbol'))
-                    }
-                    matching_watchlists.append(safe_watchlist)
+                safe_watchlist = {
+                    'watchlist_id': watchlist_data.get('watchlist_id', watchlist_id),
+                    'name': watchlist_data['name'],
+                    'description': watchlist_data['description'],
+                    'symbols': watchlist_data['symbols'],
+                    'market': watchlist_data['market'],
+                    'tags': watchlist_data['tags'],
+                    'symbol_count': len(watchlist_data['symbols']),
+                    'match_type': 'name' if name_match else ('description' if description_match else ('tag' if tag_match else 'symbol'))
+                }
+                matching_watchlists.append(safe_watchlist)
             
             return matching_watchlists
             
@@ -346,17 +362,12 @@ class WatchlistManager:
     def get_popular_watchlists(self, limit: int = 10) -> List[Dict[str, Any]]:
         """Popüler izleme listeleri"""
         try:
-            # Görüntülenme sayısına göre sırala
-            popular_watchlists = sorted(
-                self.watchlists.items(),
-                key=lambda x: x[1].get('view_count', 0),
-                reverse=True
-            )[:limit]
-            
+            # Görüntülenme sayısına göre ilk `limit` liste (indeksteki sayaçlar üzerinden heap)
             result = []
-            for watchlist_id, watchlist_data in popular_watchlists:
+            for watchlist_id in self.index.most_viewed(limit):
+                watchlist_data = self.watchlists[watchlist_id]
                 safe_watchlist = {
-                    'watchlist_id': watchlist_data['watchlist_id'],
+                    'watchlist_id': watchlist_data.get('watchlist_id', watchlist_id),
                     'name': watchlist_data['name'],
                     'description': watchlist_data['description'],
                     'market': watchlist_data['market'],
@@ -378,7 +389,8 @@ class WatchlistManager:
         try:
             if watchlist_id in self.watchlists:
                 self.watchlists[watchlist_id]['view_count'] = self.watchlists[watchlist_id].get('view_count', 0) + 1
-                self._save_watchlists()
+                self._save_watchlist(watchlist_id)
+                self.index.set_views(watchlist_id, self.watchlists[watchlist_id]['view_count'])
                 return True
             return False
         except Exception as e:
@@ -495,11 +507,22 @@ class WatchlistManager:
         timestamp = datetime.now().strftime('%Y%m%d%H%M%S')
         return f"{name.lower().replace(' ', '_')}_{timestamp}"
     
-    def _save_watchlists(self):
-        """İzleme listelerini kaydet"""
+    def _rebuild_index(self):
+        """Ters indeksi ve liste üyeliklerini depodan kur"""
+        self.index.rebuild(self.watchlists.items())
+        for watchlist_id, watchlist in self.watchlists.items():
+            self.quotes.set_members(watchlist_id, watchlist.get('symbols', []))
+    
+    def _index_watchlist(self, watchlist_id: str):
+        """Tek listenin indeks girdisini ve fiyat toplamlarını yenile"""
+        watchlist = self.watchlists[watchlist_id]
+        self.index.add(watchlist_id, watchlist)
+        self.quotes.set_members(watchlist_id, watchlist.get('symbols', []))
+    
+    def _save_watchlist(self, watchlist_id: str):
+        """Tek izleme listesini kaydet"""
         try:
-            with open(self.watchlists_file, 'w', encoding='utf-8') as f:
-                json.dump(self.watchlists, f, indent=2, ensure_ascii=False)
+            self.watchlists.save(watchlist_id)
         except Exception as e:
             log_error(f"İzleme listesi kaydetme hatası: {e}")
 
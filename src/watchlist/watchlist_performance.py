@@ -0,0 +1,282 @@
+"""
+PlanB Motoru - Watchlist Performance
+Paylaşılan OHLCV cache'inden sembol fiyat tablosu ve izleme listesi toplamlarının artımlı takibi
+"""
+import threading
+import time
+from typing import Dict, List, Optional, Any, Callable, Iterable
+
+import numpy as np
+import pandas as pd
+
+from src.utils.logger import log_info, log_error, log_debug
+from src.watchlist.watchlist_index import WatchlistIndex
+from src.data.market_sessions import local_date, market_for_symbol
+
+
+def _session_day(timestamp: Any, market: str, daily_bar: bool = False) -> int:
+    """Pazarın yerel seans tarihi (gün numarası olarak)
+
+    Canlı barlarda tz'siz zaman UTC kabul edilir; günlük barlarda tz'siz tarih zaten seans tarihidir
+    (BIST günlük barı yerel gece yarısıdır, UTC'de bir önceki güne düşer).
+    """
+    ts = pd.Timestamp(timestamp)
+    if daily_bar and ts.tzinfo is None:
+        return ts.date().toordinal()
+    return local_date(ts, market).toordinal()
+
+
+def _daily_quote(frame: pd.DataFrame, market: str) -> Optional[tuple]:
+    """Günlük OHLCV tablosundan (son kapanış, önceki kapanış, son hacim, seans günü)"""
+    if frame is None or frame.empty:
+        return None
+    if isinstance(frame.columns, pd.MultiIndex):
+        frame = frame.droplevel(1, axis=1)
+    close = frame['Close'] if 'Close' in frame.columns else frame.get('close')
+    if close is None:
+        return None
+    if isinstance(close, pd.DataFrame):
+        close = close.iloc[:, 0]
+    close = close.dropna()
+    if close.empty:
+        return None
+    volume = frame['Volume'] if 'Volume' in frame.columns else frame.get('volume')
+    if isinstance(volume, pd.DataFrame):
+        volume = volume.iloc[:, 0]
+    last_volume = float(volume.loc[close.index[-1]]) if volume is not None else 0.0
+    previous = float(close.iloc[-2]) if len(close) > 1 else np.nan
+    day = _session_day(close.index[-1], market, daily_bar=True)
+    return float(close.iloc[-1]), previous, last_volume, day
+
+
+class _Aggregate:
+    """Bir izleme listesinin artımlı toplamları"""
+    __slots__ = ('columns', 'change_sum', 'valid_count', 'best', 'worst')
+
+    def __init__(self, columns: np.ndarray):
+        self.columns = columns
+        self.change_sum = 0.0
+        self.valid_count = 0
+        self.best = -1
+        self.worst = -1
+
+
+class QuoteBoard:
+    """Sembol başına son fiyat / önceki kapanış / günlük hacim sütunları
+
+    Fiyatlar resilient_loader_v2 parquet cache'indeki günlük barlardan bir kez yüklenir,
+    sonra akıştan gelen barlarla güncellenir. Her fiyat değişimi yalnızca o sembolü
+    içeren listelerin toplamlarına (ters indeks) fark olarak işlenir; en iyi/en kötü
+    yalnızca lider sembol geri düştüğünde liste üyeleri üzerinde yeniden bulunur.
+    """
+
+    def __init__(self, index: WatchlistIndex, loader: Callable[..., pd.DataFrame] = None,
+                 period: str = "1y", ttl: float = 300, capacity: int = 256):
+        self.index = index
+        self.loader = loader
+        self.period = period
+        self.ttl = ttl
+        self.columns: Dict[str, int] = {}
+        self.symbols: List[str] = []
+        self.price = np.full(capacity, np.nan)
+        self.previous_close = np.full(capacity, np.nan)
+        self.volume = np.zeros(capacity)
+        self.day = np.full(capacity, -1, dtype=np.int64)
+        self.refreshed_at = np.zeros(capacity)
+        # Günlük bar hacminin kapsadığı son an: bundan önce başlayan canlı barlar hacme zaten dahil
+        self.seeded_at = np.zeros(capacity)
+        self.aggregates: Dict[str, _Aggregate] = {}
+        self.lock = threading.RLock()
+        self.stats = {'loads': 0, 'live_updates': 0, 'recomputes': 0}
+
+    # ------------------------------------------------------------------
+    # Sütunlar
+    # ------------------------------------------------------------------
+
+    def _column(self, symbol: str) -> int:
+        column = self.columns.get(symbol)
+        if column is None:
+            column = len(self.symbols)
+            if column == len(self.price):
+                grow = len(self.price)
+                self.price = np.concatenate([self.price, np.full(grow, np.nan)])
+                self.previous_close = np.concatenate([self.previous_close, np.full(grow, np.nan)])
+                self.volume = np.concatenate([self.volume, np.zeros(grow)])
+                self.day = np.concatenate([self.day, np.full(grow, -1, dtype=np.int64)])
+                self.refreshed_at = np.concatenate([self.refreshed_at, np.zeros(grow)])
+                self.seeded_at = np.concatenate([self.seeded_at, np.zeros(grow)])
+            self.columns[symbol] = column
+            self.symbols.append(symbol)
+        return column
+
+    def _changes(self, columns: np.ndarray) -> np.ndarray:
+        previous = self.previous_close[columns]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(previous > 0, (self.price[columns] - previous) / previous * 100, np.nan)
+
+    def _change(self, column: int) -> float:
+        previous = self.previous_close[column]
+        return (self.price[column] - previous) / previous * 100 if previous > 0 else np.nan
+
+    # ------------------------------------------------------------------
+    # Liste toplamları
+    # ------------------------------------------------------------------
+
+    def set_members(self, watchlist_id: str, symbols: Iterable[str]):
+        """Liste üyeliğini ayarla ve toplamları tek vektörel geçişte kur"""
+        with self.lock:
+            columns = np.array([self._column(symbol) for symbol in dict.fromkeys(symbols)], dtype=np.intp)
+            aggregate = _Aggregate(columns)
+            self._recompute(aggregate)
+            self.aggregates[watchlist_id] = aggregate
+
+    def drop(self, watchlist_id: str):
+        with self.lock:
+            self.aggregates.pop(watchlist_id, None)
+
+    def _recompute(self, aggregate: _Aggregate):
+        self.stats['recomputes'] += 1
+        changes = self._changes(aggregate.columns)
+        valid = ~np.isnan(changes)
+        aggregate.change_sum = float(changes[valid].sum())
+        aggregate.valid_count = int(valid.sum())
+        if aggregate.valid_count:
+            aggregate.best = int(aggregate.columns[np.nanargmax(changes)])
+            aggregate.worst = int(aggregate.columns[np.nanargmin(changes)])
+        else:
+            aggregate.best = aggregate.worst = -1
+
+    def _propagate(self, symbol: str, column: int, old: float, new: float):
+        """Sembolün değişim farkını onu içeren listelerin toplamlarına uygula"""
+        for watchlist_id in self.index.watchlists_for_symbol(symbol):
+            aggregate = self.aggregates.get(watchlist_id)
+            if aggregate is None:
+                continue
+            if not np.isnan(old):
+                aggregate.change_sum -= old
+                aggregate.valid_count -= 1
+            if not np.isnan(new):
+                aggregate.change_sum += new
+                aggregate.valid_count += 1
+
+            lost_best = aggregate.best == column and (np.isnan(new) or new < old)
+            lost_worst = aggregate.worst == column and (np.isnan(new) or new > old)
+            if lost_best or lost_worst:
+                self._recompute(aggregate)
+            elif not np.isnan(new):
+                if aggregate.best < 0 or new > self._change(aggregate.best):
+                    aggregate.best = column
+                if aggregate.worst < 0 or new < self._change(aggregate.worst):
+                    aggregate.worst = column
+
+    # ------------------------------------------------------------------
+    # Fiyat girişi
+    # ------------------------------------------------------------------
+
+    def _store_quote(self, symbol: str, price: float, previous_close: float, volume: float, day: int):
+        column = self._column(symbol)
+        old = self._change(column)
+        self.price[column] = price
+        self.previous_close[column] = previous_close
+        self.volume[column] = volume
+        self.day[column] = day
+        self.refreshed_at[column] = time.time()
+        self._propagate(symbol, column, old, self._change(column))
+
+    def load_symbols(self, symbols: Iterable[str], force: bool = False) -> int:
+        """Süresi dolmuş sembolleri günlük bar cache'inden yükle"""
+        now = time.time()
+        with self.lock:
+            stale = [symbol for symbol in dict.fromkeys(symbols)
+                     if force or symbol not in self.columns
+                     or now - self.refreshed_at[self.columns[symbol]] > self.ttl]
+        if not stale:
+            return 0
+
+        loader = self.loader
+        if loader is None:
+            from resilient_loader_v2 import cached_download as loader
+        loaded = 0
+        for symbol in stale:
+            try:
+                quote = _daily_quote(loader(symbol, period=self.period, interval="1d"),
+                                     market_for_symbol(symbol))
+            except Exception as e:
+                log_error(f"İzleme listesi fiyat yükleme hatası {symbol}: {e}")
+                quote = None
+            with self.lock:
+                if quote is None:
+                    self.refreshed_at[self._column(symbol)] = now
+                    continue
+                self._store_quote(symbol, *quote)
+                self.seeded_at[self.columns[symbol]] = now
+                loaded += 1
+        self.stats['loads'] += loaded
+        log_debug(f"İzleme listesi fiyatları yüklendi: {loaded}/{len(stale)} sembol")
+        return loaded
+
+    def update_quote(self, symbol: str, price: float, volume: float = 0.0, timestamp: Any = None) -> bool:
+        """Canlı bar: fiyatı güncelle, yeni günde önceki kapanışı kaydır
+
+        Aynı seansta günlük bardan yüklenen hacim o ana kadarki dakikaları zaten içerir;
+        yalnızca yüklemeden sonra başlayan barların hacmi eklenir (çift sayım olmaz).
+        """
+        try:
+            ts = pd.Timestamp(timestamp) if timestamp is not None else pd.Timestamp.now(tz='UTC')
+            epoch = ts.value / 10 ** 9
+            day = _session_day(ts, market_for_symbol(symbol))
+            with self.lock:
+                column = self._column(symbol)
+                current_day = int(self.day[column])
+                if current_day >= 0 and day < current_day:
+                    return False
+                if day > current_day:
+                    previous_close = self.price[column] if current_day >= 0 else np.nan
+                    self._store_quote(symbol, float(price), previous_close, float(volume), day)
+                    self.seeded_at[column] = 0.0
+                else:
+                    counted = epoch < self.seeded_at[column]
+                    self._store_quote(symbol, float(price), self.previous_close[column],
+                                      self.volume[column] + (0.0 if counted else float(volume)), day)
+                self.stats['live_updates'] += 1
+            return True
+        except Exception as e:
+            log_error(f"Canlı fiyat güncelleme hatası {symbol}: {e}")
+            return False
+
+    def on_bar(self, event: Any):
+        """StreamIngestionService abonesi olarak kullanılabilir"""
+        volume = getattr(event, 'volume_delta', event.volume)   # revizyonda yalnızca hacim farkı
+        self.update_quote(event.symbol, event.close, volume, event.timestamp)
+
+    # ------------------------------------------------------------------
+    # Okuma
+    # ------------------------------------------------------------------
+
+    def performance(self, watchlist_id: str) -> Optional[Dict[str, Any]]:
+        """Liste üyelerinin fiyat tablosu ve toplamları (tek vektörel geçiş)"""
+        with self.lock:
+            aggregate = self.aggregates.get(watchlist_id)
+            if aggregate is None:
+                return None
+            columns = aggregate.columns
+            price = self.price[columns]
+            previous = self.previous_close[columns]
+            change = price - previous
+            change_pct = self._changes(columns)
+            volume = self.volume[columns]
+            rows = [
+                {'symbol': self.symbols[column], 'price': p, 'change': c, 'change_pct': pct,
+                 'volume': v, 'traded_value': p * v}
+                for column, p, c, pct, v in zip(columns.tolist(), price.tolist(), change.tolist(),
+                                                change_pct.tolist(), volume.tolist())
+            ]
+            by_column = dict(zip(columns.tolist(), rows))
+            return {
+                'average_change': (aggregate.change_sum / aggregate.valid_count
+                                   if aggregate.valid_count else 0.0),
+                'priced_symbols': aggregate.valid_count,
+                'best_performer': by_column.get(aggregate.best),
+                'worst_performer': by_column.get(aggregate.worst),
+                'performance_data': rows,
+            }
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+PlanB Motoru - Stress engine benchmark
+
+Rastgele faktör şoklu senaryoları eski sembol başına döngüyle ve şok matrisi motoruyla
+değerlendirir; ardından tarihsel bootstrap kuyruk istatistiklerinin süresini ölçer.
+
+Kullanım:
+    python stress_benchmark.py --positions 500 --scenarios 10000 --legacy-scenarios 200
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from src.simulation.scenario_simulator import ScenarioSimulator
+from src.simulation.stress_engine import StressEngine, PortfolioExposure, SECTOR_MAPPING, SECTORS
+
+
+def random_scenarios(count: int, seed: int = 5):
+    """Piyasa/sektör/kripto/emtia şokları rastgele olan senaryo sözlükleri"""
+    rng = np.random.default_rng(seed)
+    return [{
+        'name': f'rastgele_{i}',
+        'market_impact': rng.normal(-0.05, 0.1),
+        'sector_impacts': dict(zip(SECTORS, rng.normal(0, 0.15, len(SECTORS)))),
+        'crypto_impact': rng.normal(0, 0.3),
+        'commodity_impact': rng.normal(0, 0.1),
+    } for i in range(count)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="PlanB stress engine benchmark")
+    parser.add_argument("--positions", type=int, default=500)
+    parser.add_argument("--scenarios", type=int, default=10000)
+    parser.add_argument("--legacy-scenarios", type=int, default=200, help="Eski döngüyle ölçülecek senaryo sayısı")
+    parser.add_argument("--horizon", type=int, default=10)
+    parser.add_argument("--history-days", type=int, default=500)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(1)
+    named = list(SECTOR_MAPPING) + ['BTC', 'ETH', 'GOLD', 'OIL']
+    symbols = [named[i] if i < len(named) else f"SYM{i:04d}" for i in range(args.positions)]
+    prices = rng.uniform(5, 500, args.positions)
+    quantities = rng.integers(1, 1000, args.positions).astype(float)
+    scenarios = random_scenarios(args.scenarios)
+
+    simulator = ScenarioSimulator()
+    legacy = scenarios[:args.legacy_scenarios]
+    started = time.perf_counter()
+    for scenario in legacy:
+        sum(simulator._calculate_symbol_impact(symbol, scenario) * price * quantity
+            for symbol, price, quantity in zip(symbols, prices, quantities))
+    legacy_time = time.perf_counter() - started
+    print(f"🐢 Sembol başına döngü: {len(legacy)} senaryo {legacy_time * 1000:.0f} ms "
+          f"(~{legacy_time / len(legacy) * args.scenarios:.1f}s / {args.scenarios} senaryo)")
+
+    engine = StressEngine()
+    started = time.perf_counter()
+    exposure = PortfolioExposure(symbols, prices, quantities, engine.exposure_matrix(symbols))
+    pnl = engine.scenario_pnl(exposure, engine.symbol_impacts(exposure, scenarios))
+    elapsed = time.perf_counter() - started
+    print(f"⚡ Şok matrisi: {args.positions} pozisyon x {args.scenarios} senaryo {elapsed * 1000:.0f} ms "
+          f"(en kötü {pnl.min():,.0f})")
+
+    market = rng.normal(0, 0.01, (args.history_days, 1))
+    daily = market + rng.normal(0, 0.015, (args.history_days, args.positions))
+    started = time.perf_counter()
+    stats = engine.historical_stress(exposure, symbols, daily, n_scenarios=args.scenarios,
+                                     horizon_days=args.horizon, seed=2)
+    elapsed = time.perf_counter() - started
+    print(f"📉 Bootstrap ({args.horizon} gün): {args.scenarios} senaryo {elapsed * 1000:.0f} ms, "
+          f"VaR99 %{stats['var_99_pct']:.2f}, ES99 %{stats['es_99_pct']:.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -257,6 +257,35 @@ SYMBOL_TIMEOUT = int(os.getenv("SYMBOL_TIMEOUT", "30"))
 BATCH_TIMEOUT = int(os.getenv("BATCH_TIMEOUT", "300"))
 SLEEP_BETWEEN_CYCLES = int(os.getenv("SLEEP_BETWEEN_CYCLES", "3600"))  # 60 dk (1 saat)
 
+# Telegram gönderim kuyruğu (arka plan worker, kalıcı outbox)
+try:
+    from src.telegram.delivery_queue import get_delivery_queue
+    TELEGRAM_QUEUE_ENABLED = os.getenv("TELEGRAM_QUEUE_ENABLED", "true").lower() == "true"
+except ImportError as e:
+    print(f"⚠️ Telegram delivery queue not available: {e}")
+    TELEGRAM_QUEUE_ENABLED = False
+
+# Intraday streaming (saatlik tam taramanın yanında saniyeler içinde uyarı/dashboard güncellemesi)
+STREAMING_ENABLED = os.getenv("STREAMING_ENABLED", "false").lower() == "true"
+STREAM_POLL_SECONDS = float(os.getenv("STREAM_POLL_SECONDS", "15"))
+STREAM_SCOPE = os.getenv("STREAM_SCOPE", "watchlist")  # watchlist: izleme listeleri + aktif uyarılar, all: tüm evren
+STREAM_MAX_RPS = float(os.getenv("STREAM_MAX_RPS", "4"))  # Yahoo'ya saniyede en fazla istek; 0 = sınırsız
+
+# Dağıtık tarama: semboller pazar shard'lı Redis kuyruğuna yazılır, analysis_worker.py düğümleri paylaşır
+DISTRIBUTED_SCAN_ENABLED = os.getenv("DISTRIBUTED_SCAN_ENABLED", "false").lower() == "true"
+DISTRIBUTED_SCAN_TIMEOUT = float(os.getenv("DISTRIBUTED_SCAN_TIMEOUT", "1800"))
+ANALYSIS_LOCAL_WORKERS = int(os.getenv("ANALYSIS_LOCAL_WORKERS", "1"))  # bu düğümde de işçi çalışsın
+_local_analysis_workers = []
+
+# Tarama günlüğü: yarım kalan tarama kaldığı yerden sürer, barları değişmeyen sembol yeniden skorlanmaz
+try:
+    from src.core.scan_journal import get_scan_journal, bars_fingerprint
+    SCAN_JOURNAL_ENABLED = os.getenv("SCAN_JOURNAL_ENABLED", "true").lower() == "true"
+except ImportError as e:
+    print(f"⚠️ Scan journal not available: {e}")
+    SCAN_JOURNAL_ENABLED = False
+SCAN_RESULT_MAX_AGE = float(os.getenv("SCAN_RESULT_MAX_AGE", "86400"))  # değişmemiş veride bile en geç günde bir
+
 STRONG_THRESHOLD = float(os.getenv("STRONG_THRESHOLD", "65"))  # 65+
 MAX_SIGNALS_IN_FIRST_MSG = int(os.getenv("MAX_SIGNALS_IN_FIRST_MSG", "12"))
 
@@ -269,12 +298,28 @@ SENTIMENT_MIN_IMPACT = float(os.getenv("SENTIMENT_MIN_IMPACT", "5.0"))  # Minimu
 # Yardımcılar
 # -------------------------------------------------
 def send_telegram_message(message: str, reply_markup: dict = None) -> bool:
-    """Telegram'a mesaj gönderir. ARKADAŞ FİX: Retry mekanizması ile sağlam gönderim."""
+    """
+    Telegram mesajını arka plandaki delivery queue'ya bırakır (tarama Telegram'ı beklemez).
+    Kuyruk kullanılamıyorsa doğrudan, retry'lı gönderime düşer.
+    """
     if not TELEGRAM_BOT_TOKEN or not TELEGRAM_CHAT_ID:
         print("[WARN] Telegram token/chat id bulunamadı. .env dosyasında TELEGRAM_BOT_TOKEN ve TELEGRAM_CHAT_ID ayarlayın.")
         print(f"[MSG PREVIEW]\n{message}")
         return False
     
+    if TELEGRAM_QUEUE_ENABLED:
+        try:
+            get_delivery_queue(TELEGRAM_BOT_TOKEN, TELEGRAM_CHAT_ID).enqueue(message, reply_markup=reply_markup)
+            print(f"📤 Telegram mesajı kuyruğa alındı: {message[:50]}...")
+            return True
+        except Exception as e:
+            print(f"⚠️ Telegram kuyruğu kullanılamadı, doğrudan gönderiliyor: {e}")
+    
+    return send_telegram_message_direct(message, reply_markup)
+
+
+def send_telegram_message_direct(message: str, reply_markup: dict = None) -> bool:
+    """Telegram'a mesaj gönderir. ARKADAŞ FİX: Retry mekanizması ile sağlam gönderim."""
     max_retries = 3
     for attempt in range(max_retries):
         try:
@@ -597,6 +642,23 @@ def get_sentiment_score(symbol: str) -> float:
         return 50.0  # Return neutral on any error
 
 
+def prefetch_sentiment(symbols: List[str], market_name: str) -> None:
+    """
+    Pazar taraması öncesi sentiment cache'ini toplu doldur.
+    Sembol başına NewsAPI/Reddit çağrısı yerine sembol gruplarıyla tek sorgu atılır;
+    analyze_symbol_fast içindeki get_sentiment_score çağrısı cache'ten okur.
+    """
+    if not SENTIMENT_ENABLED or not SENTIMENT_ANALYZER or not hasattr(SENTIMENT_ANALYZER, "prefetch_symbols"):
+        return
+    try:
+        start = time.time()
+        clean_symbols = [symbol.split('.')[0] for symbol in symbols]
+        SENTIMENT_ANALYZER.prefetch_symbols(clean_symbols)
+        print(f"🧠 {market_name} sentiment cache hazır ({len(clean_symbols)} sembol, {time.time() - start:.1f}s)")
+    except Exception as e:
+        print(f"[DEBUG] Sentiment prefetch error for {market_name}: {e}")
+
+
 def calculate_rsi(prices, period=14):
     """RSI hesaplaması - ARKADAŞ FINAL BOOST"""
     try:
@@ -622,12 +684,11 @@ def calculate_rsi(prices, period=14):
         return 50.0
 
 
-def analyze_symbol_fast(symbol: str) -> dict | None:
-    """Sembol için hızlı skor analizi; başarısızsa None döner."""
+def analyze_symbol_fast(symbol: str, df: pd.DataFrame | None = None) -> dict | None:
+    """Sembol için hızlı skor analizi; başarısızsa None döner. df verilirse yeniden indirilmez."""
     try:
         # ARKADAŞ FİX: Yahoo Finance retry mekanizması ile sağlam veri çekimi
-        df = None
-        max_retries = 3
+        max_retries = 0 if df is not None and not df.empty and "Close" in df.columns else 3
         for attempt in range(max_retries):
             try:
                 df = cached_download(symbol, period=YF_PERIOD, interval=YF_INTERVAL, ttl=3600)
@@ -1329,14 +1390,52 @@ def analyze_symbol_fast(symbol: str) -> dict | None:
         return None
 
 
-def analyze_batch(symbols: List[str], market_name: str) -> Tuple[List[dict], List[dict]]:
-    """Listeyi paralel analiz eder. (results, strong) döndürür"""
+def analyze_symbol_journaled(symbol: str, market_name: str, scan_id: str) -> dict | None:
+    """Barlar son skordan beri değişmediyse günlükteki sonucu döndür, değiştiyse analiz et; sonucu hemen kaydet"""
+    journal = get_scan_journal()
+    try:
+        df = cached_download(symbol, period=YF_PERIOD, interval=YF_INTERVAL, ttl=3600)
+    except Exception as e:
+        print(f"⚠️ {symbol}: veri okunamadı, analizde tekrar denenecek: {str(e)[:100]}")
+        df = None
+    data_ts, fingerprint = bars_fingerprint(df)
+    previous = journal.reusable(market_name, symbol, fingerprint, max_age=SCAN_RESULT_MAX_AGE)
+    if previous is not None:
+        journal.record(scan_id, market_name, symbol, data_ts, fingerprint, previous, rescored=False)
+        return _restore_trade_setup(previous)
+    r = analyze_symbol_fast(symbol, df)
+    journal.record(scan_id, market_name, symbol, data_ts, fingerprint, r)
+    return r
+
+
+def analyze_batch(symbols: List[str], market_name: str, scan_id: str | None = None) -> Tuple[List[dict], List[dict]]:
+    """Listeyi paralel analiz eder. (results, strong) döndürür; scan_id verilirse tarama günlüğüne yazar"""
     results: List[dict] = []
     strong: List[dict] = []
+    if scan_id:
+        # Bu taramada zaten tamamlanmış semboller (kesintiden önce) yeniden işlenmez
+        done = get_scan_journal().completed(scan_id, market_name)
+        for r in done.values():
+            if r:
+                r = _restore_trade_setup(r)
+                r["market"] = market_name
+                results.append(r)
+                if r["score"] >= STRONG_THRESHOLD:
+                    strong.append(r)
+        if done:
+            print(f"⏩ {market_name}: {len(done)} sembol önceki kesintiden tamamlanmış")
+        symbols = [s for s in symbols if s not in done]
     print(f"📊 {market_name} analizi başlıyor... ({len(symbols)} sembol)")
+    if not symbols:
+        return results, strong
+    prefetch_sentiment(symbols, market_name)
 
     with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
-        future_to_symbol = {executor.submit(analyze_symbol_fast, s): s for s in symbols}
+        if scan_id:
+            future_to_symbol = {executor.submit(analyze_symbol_journaled, s, market_name, scan_id): s
+                                for s in symbols}
+        else:
+            future_to_symbol = {executor.submit(analyze_symbol_fast, s): s for s in symbols}
         try:
             for future in cf.as_completed(future_to_symbol, timeout=BATCH_TIMEOUT):
                 sym = future_to_symbol[future]
@@ -1356,6 +1455,35 @@ def analyze_batch(symbols: List[str], market_name: str) -> Tuple[List[dict], Lis
     return results, strong
 
 
+def _restore_trade_setup(result: dict) -> dict:
+    """Kuyruktan JSON olarak dönen trade_setup'ı TradeSetup nesnesine çevir"""
+    setup = result.get("trade_setup")
+    if ULTRA_RISK_AVAILABLE and isinstance(setup, dict):
+        try:
+            result["trade_setup"] = TradeSetup(**setup)
+        except TypeError:
+            result["trade_setup"] = None
+    return result
+
+
+def distributed_market_analysis(markets: Dict[str, List[str]]) -> Dict[str, List[dict]]:
+    """Sembolleri dağıtık kuyruğa yaz; bu düğümdeki ve diğer düğümlerdeki işçilerin sonuçlarını topla"""
+    from src.core.analysis_queue import AnalysisWorker, distributed_scan, get_analysis_queue
+
+    queue = get_analysis_queue()
+    if not _local_analysis_workers:
+        for _ in range(ANALYSIS_LOCAL_WORKERS):
+            worker = AnalysisWorker(queue, analyze_symbol_fast, max_workers=MAX_WORKERS,
+                                    job_timeout=BATCH_TIMEOUT, prefetch_fn=prefetch_sentiment)
+            worker.start()
+            _local_analysis_workers.append(worker)
+
+    total = sum(len(symbols) for symbols in markets.values())
+    print(f"📬 Dağıtık tarama: {total} sembol kuyruğa yazılıyor ({len(markets)} pazar shard)")
+    results = distributed_scan(queue, markets, timeout=DISTRIBUTED_SCAN_TIMEOUT)
+    return {name: [_restore_trade_setup(r) for r in res] for name, res in results.items()}
+
+
 def full_market_analysis() -> Tuple[List[dict], Dict[str, Dict[str, int]], int]:
     """Tüm pazarları yükle, analiz et, özetleri hazırla"""
     markets: Dict[str, List[str]] = {
@@ -1370,9 +1498,30 @@ def full_market_analysis() -> Tuple[List[dict], Dict[str, Dict[str, int]], int]:
     all_strong: List[dict] = []
     total_attempted = 0
 
+    distributed = None
+    scan_id = None
+    if DISTRIBUTED_SCAN_ENABLED:
+        try:
+            distributed = distributed_market_analysis(markets)
+        except Exception as e:
+            print(f"[WARN] Dağıtık tarama başarısız, yerel analize dönülüyor: {e}")
+    if distributed is None and SCAN_JOURNAL_ENABLED:
+        try:
+            scan_id = get_scan_journal().begin_scan(sum(len(symbols) for symbols in markets.values()))
+            unchanged_before = get_scan_journal().stats["unchanged"]
+        except Exception as e:
+            print(f"[WARN] Tarama günlüğü açılamadı, günlüksüz devam: {e}")
+
     for name, symbols in markets.items():
         total_attempted += len(symbols)
-        res, strong = analyze_batch(symbols, name)
+        if distributed is not None:
+            res = distributed.get(name, [])
+            for r in res:
+                r["market"] = name
+            strong = [r for r in res if r["score"] >= STRONG_THRESHOLD]
+            print(f"✅ {name}: {len(res)} analiz OK, {len(strong)} güçlü sinyal (dağıtık)")
+        else:
+            res, strong = analyze_batch(symbols, name, scan_id)
         market_summary[name] = {
             "total": len(symbols),
             "ok": len(res),
@@ -1380,6 +1529,11 @@ def full_market_analysis() -> Tuple[List[dict], Dict[str, Dict[str, int]], int]:
         }
         all_strong.extend(strong)
 
+    if scan_id:
+        journal = get_scan_journal()
+        journal.finish_scan(scan_id)
+        print(f"📒 Tarama günlüğü: {journal.stats['unchanged'] - unchanged_before} sembol değişmemiş veriyle atlandı")
+
     # Skora göre sırala
     all_strong.sort(key=lambda x: x.get("score", 0), reverse=True)
     return all_strong, market_summary, total_attempted
@@ -1697,6 +1851,50 @@ def send_analysis_results(strong_signals: List[dict], market_summary: Dict[str,
             send_telegram_message(message2)
 
 
+def streaming_symbols(scope: str = None) -> List[str]:
+    """Akışla izlenecek semboller: varsayılan olarak izleme listeleri ve aktif fiyat uyarıları"""
+    scope = scope or STREAM_SCOPE
+    if scope == 'all':
+        return (load_bist_symbols() + load_nasdaq_symbols() + load_crypto_symbols()
+                + load_commodity_symbols() + load_xetra_symbols())
+    symbols = []
+    try:
+        from src.watchlist.watchlist_manager import watchlist_manager
+        for _, watchlist in watchlist_manager.watchlists.items():
+            symbols.extend(watchlist.get('symbols', []))
+    except Exception as e:
+        print(f"[WARN] İzleme listeleri okunamadı: {e}")
+    try:
+        from src.alerts.alert_manager import alert_manager, AlertStatus
+        symbols.extend(alert.symbol for alert in alert_manager.get_alerts(status=AlertStatus.ACTIVE))
+    except Exception as e:
+        print(f"[WARN] Aktif uyarılar okunamadı: {e}")
+    return list(dict.fromkeys(symbols))
+
+
+def start_streaming_ingestion():
+    """1m delta akışını arka planda başlat; aggregator, AlertManager, izleme listeleri ve dashboard abonedir"""
+    try:
+        from src.data.stream_ingestion import (
+            stream_ingestion_service, aggregator_subscriber,
+            alert_manager_subscriber, websocket_subscriber, watchlist_subscriber
+        )
+        stream_ingestion_service.poll_interval = STREAM_POLL_SECONDS
+        stream_ingestion_service.max_requests_per_second = STREAM_MAX_RPS or None
+        stream_ingestion_service.set_symbols(streaming_symbols())
+        stream_ingestion_service.subscribe(aggregator_subscriber())
+        stream_ingestion_service.subscribe(alert_manager_subscriber())
+        stream_ingestion_service.subscribe(watchlist_subscriber())
+        stream_ingestion_service.subscribe(websocket_subscriber())
+        stream_ingestion_service.start_in_thread()
+        print(f"📡 Streaming ingestion aktif ({STREAM_SCOPE}): {len(stream_ingestion_service.symbols)} sembol, "
+              f"{STREAM_POLL_SECONDS:.0f}s aralık, en fazla {STREAM_MAX_RPS:g} istek/s")
+        return True
+    except Exception as e:
+        print(f"[WARN] Streaming ingestion başlatılamadı: {e}")
+        return False
+
+
 def continuous_full_analysis():
     cycle = 0
     while True:
@@ -1725,6 +1923,11 @@ def continuous_full_analysis():
             time.sleep(SLEEP_BETWEEN_CYCLES)
         except KeyboardInterrupt:
             print("👋 Sistem durduruldu")
+            if TELEGRAM_QUEUE_ENABLED and TELEGRAM_BOT_TOKEN and TELEGRAM_CHAT_ID:
+                # Kuyruktaki mesajlara kısa süre tanı; kalanlar outbox'ta sonraki açılışta gönderilir
+                queue = get_delivery_queue(TELEGRAM_BOT_TOKEN, TELEGRAM_CHAT_ID)
+                queue.flush(timeout=10)
+                queue.stop()
             break
         except Exception as e:
             print(f"[ERROR] Genel hata: {e}")
@@ -1801,5 +2004,8 @@ if __name__ == "__main__":
         else:
             print("❌ Telegram Ultra Automation başlatılamadı")
     
+    if STREAMING_ENABLED:
+        start_streaming_ingestion()
+    
     # Ana analiz döngüsünü başlat
     continuous_full_analysis()
\ No newline at end of file
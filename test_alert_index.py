@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+"""
+Test Alert Index - İndeksli uyarı motorunun tam taramalı kontrol ile aynı sonucu vermesi
+"""
+
+import sys
+import os
+import random
+import tempfile
+import threading
+import time
+
+# Add project root to path
+sys.path.append(os.path.dirname(__file__))
+
+from src.alerts.alert_index import ThresholdBook, DeadlineHeap
+from src.alerts.custom_alert_manager import CustomAlertManager
+from src.alerts.alert_manager import AlertManager, AlertType, AlertStatus
+
+
+def _random_conditions(rng):
+    kind = rng.choice(['above', 'below', 'band', 'none'])
+    if kind == 'above':
+        return {'price_above': rng.uniform(50, 150)}
+    if kind == 'below':
+        return {'price_below': rng.uniform(50, 150)}
+    if kind == 'band':
+        low = rng.uniform(50, 120)
+        return {'price_above': low, 'price_below': low + rng.uniform(1, 30)}
+    return {}
+
+
+def test_threshold_book_and_deadline_heap():
+    """Bisect sınırları ve heap süre sonları doğru çalışmalı"""
+    print("🧪 Testing threshold book and deadline heap...")
+    book = ThresholdBook()
+    for alert_id, threshold in [('a', 10), ('b', 20), ('c', 20), ('d', 30)]:
+        book.add(alert_id, threshold)
+    assert book.below(20) == ['a']
+    assert book.below(20, inclusive=True) == ['a', 'b', 'c']
+    assert book.above(20) == ['d']
+    assert book.above(20, inclusive=True) == ['b', 'c', 'd']
+    book.remove('b')
+    book.add('a', 25)
+    assert book.below(100) == ['c', 'a', 'd']
+
+    heap = DeadlineHeap()
+    heap.start('x', 100.0)
+    heap.start('y', 50.0)
+    heap.start('x', 200.0)
+    assert heap.release(now=150.0) == ['y']
+    assert heap.is_pending('x', now=150.0)
+    assert not heap.is_pending('x', now=200.0)
+    print("✅ Book and heap work")
+
+
+def test_custom_alerts_match_full_scan():
+    """İndeksli ve vektörel kontrol, eski tam tarama ile aynı uyarıları tetiklemeli"""
+    print("🧪 Testing indexed custom alerts against full scan...")
+    rng = random.Random(7)
+    symbols = [f"SYM{i}" for i in range(40)]
+    with tempfile.TemporaryDirectory() as tmp:
+        manager = CustomAlertManager(data_dir=tmp)
+        for i in range(800):
+            manager.create_alert({
+                'type': 'price',
+                'symbol': rng.choice(symbols),
+                'market': rng.choice(['bist', 'us']),
+                'conditions': _random_conditions(rng),
+                'is_active': rng.random() > 0.1,
+                'cooldown_minutes': 60,
+            })
+        manager.create_alert({'type': 'analysis', 'symbol': 'SYM1', 'conditions': {'score_above': 70}})
+
+        prices = {symbol: rng.uniform(40, 160) for symbol in symbols}
+        expected = {}
+        for alert_id, alert in manager.alerts.items():
+            if (alert['type'] == 'price' and alert['is_active'] and alert['market'] == 'bist'
+                    and manager._check_price_conditions(alert, prices[alert['symbol']])):
+                expected.setdefault(alert['symbol'], []).append(alert_id)
+
+        single = manager.check_price_alerts('SYM3', prices['SYM3'], 'bist')
+        assert [a['alert_id'] for a in single] == expected.get('SYM3', [])
+
+        batch = manager.check_market_price_alerts(prices, 'bist')
+        expected.pop('SYM3', None)
+        got = {symbol: [a['alert_id'] for a in alerts] for symbol, alerts in batch.items()}
+        assert got == expected
+        assert sum(map(len, expected.values())) > 50
+
+        # Tümü cooldown'da: ikinci tick hiçbir şey tetiklememeli
+        assert manager.check_market_price_alerts(prices, 'bist') == {}
+        assert manager.check_price_alerts('SYM3', prices['SYM3'], 'bist') == []
+
+        assert manager.check_analysis_alerts('SYM1', {'total_score': 60}) == []
+        assert len(manager.check_analysis_alerts('SYM1', {'total_score': 80})) == 1
+
+        # Pasifleştirilen uyarı indeksten çıkmalı
+        alert_id = next(iter(manager.alerts))
+        manager.update_alert(alert_id, {'is_active': False})
+        assert alert_id not in manager.index._keys
+    print("✅ Indexed custom alerts match full scan")
+
+
+def test_alert_manager_bisect_and_cooldown():
+    """AlertManager eşik, değişim, cooldown ve expiry kurallarını korumalı"""
+    print("🧪 Testing AlertManager index...")
+    with tempfile.TemporaryDirectory() as tmp:
+        manager = AlertManager(data_dir=tmp)
+        manager._save_alerts = lambda: None
+        fired = []
+        manager.add_callback(lambda trigger: fired.append(trigger.alert_id))
+
+        above = manager.create_alert("AAA", AlertType.PRICE_ABOVE, 100, "above", is_recurring=True, cooldown_minutes=0)
+        below = manager.create_alert("AAA", AlertType.PRICE_BELOW, 90, "below")
+        change = manager.create_alert("AAA", AlertType.PRICE_CHANGE, 5, "change", is_recurring=True)
+        expired = manager.create_alert("BBB", AlertType.PRICE_ABOVE, 1, "old",
+                                       expires_at="2000-01-01T00:00:00")
+
+        manager.check_price_alert("AAA", 95)
+        assert fired == []
+        manager.check_price_alert("AAA", 100, {'previous_price': 90})
+        assert fired == [above, change]
+        manager.check_price_alert("AAA", 101, {'previous_price': 90})
+        assert fired == [above, change, above]   # change cooldown'da
+
+        manager.check_price_alerts_batch({"AAA": 80, "BBB": 50})
+        assert fired == [above, change, above, below]
+        assert manager.alerts[below].status == AlertStatus.TRIGGERED
+        assert manager.alerts[expired].status == AlertStatus.EXPIRED
+        count = len(fired)
+        manager.check_price_alert("AAA", 80)
+        assert len(fired) == count
+        assert manager.alerts[above].last_checked
+    print("✅ AlertManager index works")
+
+
+def test_alert_manager_batch_matches_single_checks():
+    """Vektörel toplu kontrol sembol bazlı kontrolle aynı uyarıları aynı sırayla tetiklemeli"""
+    print("🧪 Testing vectorized AlertManager batch...")
+    rng = random.Random(11)
+    symbols = [f"S{i}" for i in range(60)]
+    types = [AlertType.PRICE_ABOVE, AlertType.PRICE_BELOW, AlertType.PRICE_CHANGE]
+    with tempfile.TemporaryDirectory() as tmp:
+        managers = [AlertManager(data_dir=os.path.join(tmp, name)) for name in ('batch', 'single')]
+        fired = {0: [], 1: []}
+        for n, manager in enumerate(managers):
+            manager._save_alerts = lambda: None
+            manager.add_callback(lambda trigger, n=n: fired[n].append((trigger.alert_id, trigger.trigger_value)))
+        for i in range(400):
+            symbol, alert_type = rng.choice(symbols), rng.choice(types)
+            threshold = rng.uniform(1, 10) if alert_type == AlertType.PRICE_CHANGE else rng.uniform(80, 120)
+            recurring = rng.random() < 0.5
+            for manager in managers:
+                alert = manager.create_alert(symbol, alert_type, threshold, f"a{i}", is_recurring=recurring,
+                                             cooldown_minutes=0)
+                manager.alerts[alert].created_date = f"{i:05d}"
+
+        for _ in range(5):
+            prices = {s: rng.uniform(85, 115) for s in rng.sample(symbols, 40)}
+            previous = {s: p * rng.uniform(0.9, 1.1) for s, p in prices.items()}
+            previous[next(iter(previous))] = 0.0
+            managers[0].check_price_alerts_batch({**prices, 'NOALERT': 1.0}, previous)
+            for symbol, price in prices.items():
+                managers[1].check_price_alert(symbol, price, {'previous_price': previous[symbol]})
+            assert fired[0] == fired[1]
+        assert len(fired[0]) > 50
+        assert [a.status for a in managers[0].alerts.values()] == [a.status for a in managers[1].alerts.values()]
+    print(f"✅ Batch matches single checks ({len(fired[0])} triggers)")
+
+
+def test_alert_manager_batch_saves_once():
+    """Toplu kontrol tetiklenen uyarı sayısından bağımsız olarak dosyayı bir kez yazmalı"""
+    print("🧪 Testing AlertManager batch persistence...")
+    with tempfile.TemporaryDirectory() as tmp:
+        manager = AlertManager(data_dir=tmp)
+        saves = []
+        manager._save_alerts = lambda: saves.append(1)
+        ids = [manager.create_alert(f"S{i}", AlertType.PRICE_ABOVE, 100, f"a{i}") for i in range(10)]
+        saves.clear()
+
+        manager.check_price_alerts_batch({f"S{i}": 50.0 for i in range(10)})
+        assert saves == []
+        manager.check_price_alerts_batch({f"S{i}": 150.0 for i in range(10)})
+        assert len(saves) == 1
+        assert all(manager.alerts[alert_id].status == AlertStatus.TRIGGERED for alert_id in ids)
+    print("✅ Batch writes alerts once")
+
+
+def test_alert_manager_concurrent_updates():
+    """İzleme ve akış thread'leri aynı anda uyarı ekleyip kontrol ederken indeks tutarlı kalmalı"""
+    print("🧪 Testing AlertManager locking...")
+    with tempfile.TemporaryDirectory() as tmp:
+        manager = AlertManager(data_dir=tmp)
+        manager._save_alerts = lambda: None
+        errors = []
+
+        def writer(offset):
+            try:
+                for i in range(300):
+                    alert_id = manager.create_alert(f"S{i % 20}", AlertType.PRICE_ABOVE, 100 + i, "w",
+                                                    is_recurring=True, cooldown_minutes=0)
+                    manager.update_alert(alert_id, threshold=50 + offset + i,
+                                         expires_at="2000-01-01T00:00:00" if i % 3 == 0 else "")
+            except Exception as e:
+                errors.append(e)
+
+        def checker():
+            try:
+                for _ in range(200):
+                    manager.check_price_alerts_batch({f"S{i}": 120.0 for i in range(20)})
+                    with manager.lock:
+                        manager._expire_due()
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=writer, args=(n,)) for n in range(2)] + [threading.Thread(target=checker)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert not errors
+        with manager.lock:
+            manager._expire_due()
+            indexed = {aid for book in manager._books.values() for aid in book.ids}
+        active = {aid for aid, a in manager.alerts.items() if a.status == AlertStatus.ACTIVE}
+        assert indexed == active and indexed <= set(manager._indexed)
+    print("✅ AlertManager index stays consistent under concurrency")
+
+
+def test_indexed_check_is_fast():
+    """Binlerce uyarı ve 1000 sembollük tick tek çağrıda hızlı değerlendirilmeli"""
+    print("🧪 Benchmarking market-wide evaluation...")
+    rng = random.Random(3)
+    symbols = [f"S{i}" for i in range(1000)]
+    with tempfile.TemporaryDirectory() as tmp:
+        manager = CustomAlertManager(data_dir=tmp)
+        for i in range(5000):
+            manager.create_alert({'type': 'price', 'symbol': rng.choice(symbols),
+                                  'conditions': {'price_above': rng.uniform(500, 1000)}})
+        prices = {symbol: rng.uniform(90, 110) for symbol in symbols}
+        started = time.perf_counter()
+        for _ in range(20):
+            assert manager.check_market_price_alerts(prices) == {}
+        elapsed = (time.perf_counter() - started) / 20
+        print(f"   {elapsed * 1000:.2f} ms per 1000-symbol tick with 5000 alerts")
+        assert elapsed < 0.05
+    print("✅ Market-wide evaluation is fast")
+
+
+if __name__ == "__main__":
+    test_threshold_book_and_deadline_heap()
+    test_custom_alerts_match_full_scan()
+    test_alert_manager_bisect_and_cooldown()
+    test_alert_manager_batch_matches_single_checks()
+    test_alert_manager_batch_saves_once()
+    test_alert_manager_concurrent_updates()
+    test_indexed_check_is_fast()
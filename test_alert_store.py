@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Test Alert Store - Append-only uyarı günlüğü, grup commit, snapshot ve yeniden yükleme
+"""
+
+import sys
+import os
+import json
+import tempfile
+
+# Add project root to path
+sys.path.append(os.path.dirname(__file__))
+
+from src.alerts.custom_alert_manager import CustomAlertManager
+
+
+def _create_price_alerts(manager, count):
+    return [
+        manager.create_alert({
+            'type': 'price', 'symbol': f"SYM{i}", 'conditions': {'price_above': 10},
+            'cooldown_minutes': 0
+        })
+        for i in range(count)
+    ]
+
+
+def test_triggers_are_group_committed_and_survive_restart():
+    """Tetiklemeler toplu yazılmalı; yeniden açılışta durum ve geçmiş korunmalı"""
+    print("🧪 Testing group commit and reload...")
+    with tempfile.TemporaryDirectory() as tmp:
+        manager = CustomAlertManager(data_dir=tmp)
+        alert_ids = _create_price_alerts(manager, 20)
+        manager.store.flush_interval = 60  # yalnızca açık flush / batch ile yazılsın
+        flushes_before = manager.store.stats['flushes']
+
+        for round_no in range(10):
+            prices = {f"SYM{i}": 11 + round_no for i in range(20)}
+            assert len(manager.check_market_price_alerts(prices)) == 20
+
+        # 200 tetikleme, sorgu öncesi tek transaction'da yazılır
+        history = manager.get_alert_history(limit=5)
+        assert manager.store.stats['flushes'] - flushes_before == 1
+        assert [entry['trigger_data']['current_price'] for entry in history] == [20.0] * 5
+        assert len(manager.get_alert_history(alert_ids[3], limit=100)) == 10
+        stats = manager.get_alert_statistics()
+        assert stats['total_history_entries'] == 200
+        assert stats['recent_triggers_24h'] == 200
+        assert stats['total_triggers'] == 200
+
+        manager.delete_alert(alert_ids[0])
+        manager.store.close()
+
+        reopened = CustomAlertManager(data_dir=tmp)
+        assert len(reopened.alerts) == 19
+        assert reopened.alerts[alert_ids[1]]['trigger_count'] == 10
+        assert reopened.get_alert_statistics()['total_history_entries'] == 200
+        assert len(reopened.check_market_price_alerts({f"SYM{i}": 50 for i in range(20)})) == 19
+        reopened.store.close()
+    print("✅ Group commit and reload work")
+
+
+def test_compaction_writes_atomic_snapshot_and_migrates_legacy_history():
+    """Eşik aşılınca snapshot atomik yazılmalı; eski JSON geçmişi taşınmalı"""
+    print("🧪 Testing compaction and legacy migration...")
+    with tempfile.TemporaryDirectory() as tmp:
+        legacy = [{'alert_id': 'old', 'alert_name': 'Eski', 'triggered_at': '2020-01-01T00:00:00',
+                   'trigger_data': {}, 'notification_methods': [], 'priority': 'low'}]
+        with open(os.path.join(tmp, "alert_history.json"), 'w', encoding='utf-8') as f:
+            json.dump(legacy, f)
+
+        manager = CustomAlertManager(data_dir=tmp)
+        manager.store.compact_threshold = 50
+        alert_ids = _create_price_alerts(manager, 10)
+        for round_no in range(5):
+            manager.check_market_price_alerts({f"SYM{i}": 20 + round_no for i in range(10)})
+        manager.flush()
+
+        assert manager.store.stats['compactions'] >= 1
+        assert manager.store.events_since_snapshot < 50
+        assert not os.path.exists(manager.alerts_file + ".tmp")
+        with open(manager.alerts_file, encoding='utf-8') as f:
+            assert set(json.load(f)) == set(alert_ids)
+
+        assert not os.path.exists(os.path.join(tmp, "alert_history.json"))
+        assert manager.get_alert_history('old') == legacy
+        assert manager.get_alert_statistics()['recent_triggers_24h'] == 50
+        state = {aid: dict(alert) for aid, alert in manager.alerts.items()}
+        manager.store.close()
+
+        # Snapshot + kalan olaylar, bellekteki son durumu vermeli
+        reopened = CustomAlertManager(data_dir=tmp)
+        assert reopened.alerts == state
+        assert reopened.get_alert_statistics()['total_history_entries'] == 51
+        reopened.store.close()
+    print("✅ Compaction and migration work")
+
+
+if __name__ == "__main__":
+    test_triggers_are_group_committed_and_survive_restart()
+    test_compaction_writes_atomic_snapshot_and_migrates_legacy_history()
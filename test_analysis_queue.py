@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+"""
+Test Analysis Queue - Shard'lı dağıtık analiz kuyruğu: tekrar eleme, toplu alım, görünürlük süresi,
+ölü akış, eski liste aktarımı ve çok işçili ~991 sembol taraması
+
+Süreç içi InMemoryBroker ile çalışır; TEST_REDIS_URL tanımlıysa gerçek Redis üzerinde de doğrular.
+"""
+
+import sys
+import os
+import json
+import threading
+import time
+import zlib
+
+# Add project root to path
+sys.path.append(os.path.dirname(__file__))
+
+from src.core.analysis_queue import (AnalysisWorkQueue, AnalysisWorker, InMemoryBroker, create_broker,
+                                     distributed_scan)
+
+SCAN = {
+    'BIST': [f"B{i:03d}.IS" for i in range(400)],
+    'NASDAQ': [f"N{i:03d}" for i in range(124)],
+    'CRYPTO': [f"C{i:02d}-USD" for i in range(80)],
+    'EMTIA': [f"E{i:02d}=F" for i in range(49)],
+    'XETRA': [f"X{i:03d}.DE" for i in range(338)],
+}
+
+
+def fake_analyze(symbol, delay=0.002):
+    time.sleep(delay)
+    if symbol.endswith('7.IS'):
+        return None                         # veri yok
+    return {'symbol': symbol, 'score': zlib.crc32(symbol.encode()) % 100, 'price': 1.0}
+
+
+def test_dedupe_and_sharding():
+    """Kuyrukta bekleyen sembol tekrar eklenmemeli; işçi yalnız kendi shard'ını almalı"""
+    print("🧪 Testing dedupe and market shards...")
+    queue = AnalysisWorkQueue(InMemoryBroker())
+    assert queue.enqueue({'NASDAQ': ['AAPL', 'MSFT'], 'CRYPTO': ['BTC-USD']}) == 3
+    assert queue.enqueue({'NASDAQ': ['AAPL', 'NVDA'], 'crypto': ['BTC-USD']}) == 1
+    assert queue.stats['duplicates'] == 2 and queue.markets() == ['CRYPTO', 'NASDAQ']
+    assert queue.backlog(['NASDAQ']) == 3 and queue.backlog(['CRYPTO']) == 1
+
+    jobs = queue.claim('crypto-node', ['CRYPTO'], count=10)
+    assert [(job.market, job.symbol) for job in jobs] == [('CRYPTO', 'BTC-USD')]
+    queue.complete('crypto-node', [(jobs[0], {'symbol': 'BTC-USD', 'score': 70})])
+    assert queue.backlog(['CRYPTO']) == 0 and queue.backlog() == 3
+
+    # Tamamlanan sembol yeniden kuyruğa girebilir
+    assert queue.enqueue({'CRYPTO': ['BTC-USD']}) == 1
+    _, results = queue.read_results()
+    assert results[0]['result'] == {'symbol': 'BTC-USD', 'score': 70} and results[0]['worker'] == 'crypto-node'
+    print("✅ Dedupe and shards work")
+
+
+def test_visibility_timeout_and_dead_letter():
+    """Onaylanmayan iş görünürlük süresinden sonra başka işçiye geçmeli; sürekli düşen iş ölü akışa gitmeli"""
+    print("🧪 Testing visibility timeout and dead letters...")
+    queue = AnalysisWorkQueue(InMemoryBroker(), visibility_timeout=0.2, max_deliveries=2)
+    queue.enqueue({'BIST': [f"S{i}" for i in range(10)]})
+
+    crashed = queue.claim('node-a', count=4)
+    assert len(crashed) == 4
+    others = queue.claim('node-b', count=100)
+    assert len(others) == 6 and not {j.id for j in crashed} & {j.id for j in others}
+    queue.complete('node-b', [(job, {'symbol': job.symbol, 'score': 1}) for job in others])
+    assert queue.claim('node-b', count=100) == []
+
+    time.sleep(0.25)
+    reclaimed = queue.claim('node-b', count=100)
+    assert sorted(j.id for j in reclaimed) == sorted(j.id for j in crashed)
+    assert all(job.deliveries == 2 for job in reclaimed) and queue.stats['reclaimed'] == 4
+    queue.complete('node-b', [(job, {'symbol': job.symbol, 'score': 1}) for job in reclaimed[:3]])
+
+    time.sleep(0.25)
+    assert queue.claim('node-c', count=100) == []          # 3. teslim > max_deliveries
+    assert queue.stats['dead_lettered'] == 1 and queue.backlog() == 0
+    stats = queue.get_stats()
+    assert stats['dead_letters'] == 1 and stats['shards']['BIST'] == {'backlog': 0, 'in_flight': 0}
+    assert queue.enqueue({'BIST': [reclaimed[3].symbol]}) == 1     # işaret kalktı
+    _, results = queue.read_results()
+    dead = [r for r in results if r['status'] == 'dead']
+    assert [(r['symbol'], r['worker'], r['result']) for r in dead] == [(reclaimed[3].symbol, 'node-c', None)]
+    print("✅ Visibility timeout and dead letters work")
+
+
+def test_reclaim_counts_deliveries_per_id():
+    """Devralınan işlerin arasında başka işçinin bekleyen kayıtları olsa da teslim sayısı doğru okunmalı"""
+    print("🧪 Testing per-id delivery counts...")
+    broker = InMemoryBroker()
+    queue = AnalysisWorkQueue(broker, visibility_timeout=0.2, max_deliveries=1)
+    queue.enqueue({'BIST': ['A.IS'] + [f"B{i}.IS" for i in range(10)] + ['C.IS']})
+    first = queue.claim('crashed-node', count=1)
+    busy = queue.claim('busy-node', count=10)
+    last = queue.claim('crashed-node', count=1)
+    assert [job.symbol for job in first + last] == ['A.IS', 'C.IS']
+
+    time.sleep(0.25)
+    # Aradaki işler meşgul işçide yeni teslim edilmiş gibi kalsın
+    broker.xautoclaim(queue.shard_key('BIST'), queue.group, 'busy-node', 0, start_id=busy[0].id, count=len(busy))
+    assert queue.claim('node-c', count=100) == []
+    assert queue.stats['dead_lettered'] == 2 and queue.stats['reclaimed'] == 0
+    print("✅ Delivery counts are read per reclaimed id")
+
+
+def test_dead_letter_completes_distributed_scan():
+    """Ölü akışa taşınan sembol taramayı zaman aşımına kadar bekletmemeli"""
+    print("🧪 Testing dead letters in distributed scan...")
+    queue = AnalysisWorkQueue(InMemoryBroker(), visibility_timeout=0.1, max_deliveries=1)
+    queue.enqueue({'BIST': ['POISON.IS']})
+    assert len(queue.claim('crashed-node', count=1)) == 1             # alınır, hiç onaylanmaz
+    worker = AnalysisWorker(queue, fake_analyze, name='node', block_ms=50)
+    worker.start()
+    started = time.perf_counter()
+    try:
+        results = distributed_scan(queue, {'BIST': ['POISON.IS', 'GOOD.IS']}, timeout=30, poll_ms=50)
+    finally:
+        worker.stop()
+    elapsed = time.perf_counter() - started
+    assert [r['symbol'] for r in results['BIST']] == ['GOOD.IS']
+    assert queue.stats['dead_lettered'] == 1 and elapsed < 5, elapsed
+    print(f"✅ Dead-lettered symbol completed the scan in {elapsed * 1000:.0f} ms")
+
+
+def test_legacy_list_import():
+    """Collector'ın LPUSH ettiği JSON istekleri FIFO sırayla shard akışlarına aktarılmalı"""
+    print("🧪 Testing legacy analysis_queue list import...")
+    broker = InMemoryBroker()
+    queue = AnalysisWorkQueue(broker)
+    requests = [json.dumps({'symbol': s, 'market': m, 'timestamp': '2025-03-14T10:00:00',
+                            'trigger': 'scheduled_analysis'})
+                for s, m in [('AAPL', 'NASDAQ'), ('BTCUSDT', 'CRYPTO'), ('AAPL', 'NASDAQ')]]
+    broker.lpush('analysis_queue', *requests, 'bozuk')
+    worker = AnalysisWorker(queue, fake_analyze, name='legacy', block_ms=None)
+    assert worker.process_batch() == 2
+    assert broker.llen('analysis_queue') == 0 and queue.stats['imported'] == 2
+    _, results = queue.read_results()
+    assert {(r['market'], r['symbol']) for r in results} == {('NASDAQ', 'AAPL'), ('CRYPTO', 'BTCUSDT')}
+    print("✅ Legacy list import works")
+
+
+def test_workers_split_full_scan():
+    """Dört işçi ~991 sembollük taramayı paylaşmalı; her sembol bir kez işlenmeli, biri çökse de tamamlanmalı"""
+    print("🧪 Testing multi-worker scan...")
+    queue = AnalysisWorkQueue(InMemoryBroker(), visibility_timeout=0.5)
+    processed = {}
+    lock = threading.Lock()
+
+    def counting_analyze(symbol):
+        with lock:
+            processed[symbol] = processed.get(symbol, 0) + 1
+        return fake_analyze(symbol)
+
+    # Çöken düğüm: bir parti alır ve hiç onaylamaz
+    queue.enqueue({'BIST': SCAN['BIST'][:20]})
+    lost = queue.claim('crashed-node', ['BIST'], count=20)
+    assert len(lost) == 20
+
+    workers = [AnalysisWorker(queue, counting_analyze, name=f"node-{i}", batch_size=16, max_workers=4,
+                              block_ms=50) for i in range(3)]
+    workers.append(AnalysisWorker(queue, counting_analyze, name='crypto-node', markets=['CRYPTO'],
+                                  batch_size=16, max_workers=4, block_ms=50))
+    for worker in workers:
+        worker.start()
+    total = sum(len(symbols) for symbols in SCAN.values())
+    started = time.perf_counter()
+    try:
+        results = distributed_scan(queue, SCAN, timeout=30, poll_ms=50)
+    finally:
+        for worker in workers:
+            worker.stop()
+    elapsed = time.perf_counter() - started
+
+    assert total == 991
+    expected_ok = {m: [s for s in symbols if not s.endswith('7.IS')] for m, symbols in SCAN.items()}
+    assert {m: sorted(r['symbol'] for r in res) for m, res in results.items()} == expected_ok
+    assert sum(processed.values()) == total and set(processed.values()) == {1}
+    assert all(worker.stats['processed'] > 0 for worker in workers)
+    assert queue.stats['reclaimed'] == 20 and queue.backlog() == 0
+    sequential = total * 0.002
+    print(f"✅ {total} symbols across {len(workers)} workers in {elapsed * 1000:.0f} ms "
+          f"(sequential ~{sequential * 1000:.0f} ms + 500 ms visibility timeout); "
+          f"per worker {[w.stats['processed'] for w in workers]}")
+
+
+def test_real_redis():
+    """TEST_REDIS_URL ile gerçek Redis üzerinde aynı akış"""
+    redis_url = os.getenv('TEST_REDIS_URL')
+    if not redis_url:
+        print("⚠️ TEST_REDIS_URL tanımlı değil, gerçek Redis testi atlandı")
+        return
+    print("🧪 Testing against Redis...")
+    broker = create_broker(redis_url)
+    prefix = f"analysis_queue_test_{os.getpid()}"
+    queue = AnalysisWorkQueue(broker, prefix=prefix, results_stream=f"{prefix}:results", visibility_timeout=0.3)
+    try:
+        scan = {'NASDAQ': SCAN['NASDAQ'], 'CRYPTO': SCAN['CRYPTO']}
+        assert queue.enqueue({'NASDAQ': SCAN['NASDAQ'][:5]}) == 5
+        workers = [AnalysisWorker(queue, fake_analyze, name=f"redis-{i}", block_ms=50, legacy_list=None)
+                   for i in range(2)]
+        for worker in workers:
+            worker.start()
+        try:
+            results = distributed_scan(queue, scan, timeout=30, poll_ms=50)
+        finally:
+            for worker in workers:
+                worker.stop()
+        assert sum(len(r) for r in results.values()) == 204 and queue.backlog() == 0
+    finally:
+        keys = list(broker.scan_iter(f"{prefix}*"))
+        if keys:
+            broker.delete(*keys)
+    print("✅ Redis queue works")
+
+
+if __name__ == "__main__":
+    test_dedupe_and_sharding()
+    test_visibility_timeout_and_dead_letter()
+    test_reclaim_counts_deliveries_per_id()
+    test_dead_letter_completes_distributed_scan()
+    test_legacy_list_import()
+    test_workers_split_full_scan()
+    test_real_redis()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Test API Batch Predict - Vektörel skorlama ve havuzlu DB katmanı
+"""
+
+import sys
+import os
+import random
+import tempfile
+
+# Add project root to path
+sys.path.append(os.path.dirname(__file__))
+
+from fastapi.testclient import TestClient
+
+import ultra_api_server
+from ultra_api_server import app, score_features_batch, SQLiteConnectionPool
+from ultra_database import UltraLightweightDB
+
+
+def _reference_score(features):
+    """Eski tek-sembol skorlama mantığı"""
+    score = 50
+    if 'rsi' in features:
+        rsi = features['rsi']
+        if rsi < 30:
+            score += (30 - rsi) * 0.8
+        elif rsi > 70:
+            score -= (rsi - 70) * 0.8
+    if 'macd' in features:
+        score += features['macd'] * 15
+    if 'volume' in features and features['volume'] > 1000000:
+        score += min((features['volume'] - 1000000) / 100000, 10)
+    if 'price_change' in features:
+        score += features['price_change'] * 2
+    if 'price_ma_ratio' in features:
+        score += (features['price_ma_ratio'] - 1) * 20
+    score = max(0, min(100, score))
+    if score >= 80:
+        return "STRONG_BUY", 0.85 + (score - 80) / 100, score
+    if score >= 65:
+        return "BUY", 0.70 + (score - 65) / 67, score
+    if score >= 55:
+        return "HOLD_STRONG", 0.60 + (score - 55) / 50, score
+    if score >= 45:
+        return "HOLD", 0.40 + (score - 45) / 50, score
+    if score >= 35:
+        return "HOLD_WEAK", 0.30 + (score - 35) / 50, score
+    if score >= 20:
+        return "SELL", 0.70 + (35 - score) / 75, score
+    return "STRONG_SELL", 0.85 + (20 - score) / 100, score
+
+
+def _random_features(rng):
+    features = {}
+    for name, low, high in [('rsi', 0, 100), ('macd', -3, 3), ('volume', 0, 3000000),
+                            ('price_change', -10, 10), ('price_ma_ratio', 0.8, 1.2)]:
+        if rng.random() < 0.8:
+            features[name] = rng.uniform(low, high)
+    return features
+
+
+def test_vectorized_scoring_matches_reference():
+    """Vektörel skorlama eski skorlama ile birebir aynı olmalı"""
+    print("🧪 Testing vectorized scoring...")
+    rng = random.Random(3)
+    rows = [_random_features(rng) for _ in range(2000)]
+    scored = score_features_batch(rows)
+    for i, features in enumerate(rows):
+        signal, confidence, score = _reference_score(features)
+        assert scored["signal"][i] == signal
+        assert abs(scored["confidence"][i] - confidence) < 1e-9
+        assert abs(scored["score"][i] - score) < 1e-9
+    print("✅ Vectorized scoring matches reference")
+
+
+def test_predict_batch_endpoint_persists_rows():
+    """Batch endpoint tüm sembolleri skorlayıp tek işlemde kaydetmeli"""
+    print("🧪 Testing /api/v1/ml/predict_batch...")
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "planb_ultra.db")
+        UltraLightweightDB(db_path)
+        ultra_api_server.db_pool = SQLiteConnectionPool(db_path)
+        client = TestClient(app)
+
+        payload = {"requests": [
+            {"symbol": f"SYM{i}", "features": {"rsi": 20 + i, "macd": 0.1}} for i in range(25)
+        ]}
+        response = client.post("/api/v1/ml/predict_batch", json=payload)
+        assert response.status_code == 200
+        body = response.json()
+        assert body["count"] == 25
+        assert [p["symbol"] for p in body["predictions"]] == [f"SYM{i}" for i in range(25)]
+
+        single = client.post("/api/v1/ml/predict", json={"symbol": "ONE", "features": {"rsi": 25}})
+        assert single.json()["signal"] == _reference_score({"rsi": 25})[0]
+
+        analysis = client.get("/api/v1/analysis", params={"limit": 100}).json()
+        assert len(analysis) == 26
+        assert all("rsi" in row["features"] for row in analysis)
+    print("✅ Batch endpoint works")
+
+
+if __name__ == "__main__":
+    test_vectorized_scoring_matches_reference()
+    test_predict_batch_endpoint_persists_rows()
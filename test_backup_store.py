@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Test Backup Store - İçerik tanımlı parçalama, tekilleştirme, artımlı snapshot ve bütünlük kontrolü
+"""
+
+import sys
+import os
+import io
+import hashlib
+import tempfile
+
+# Add project root to path
+sys.path.append(os.path.dirname(__file__))
+
+from src.offline.backup_store import BackupStore, ContentChunker
+
+
+def _write(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(data)
+
+
+def _read(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def test_chunker_is_content_defined():
+    """Başa eklenen bayt sonraki parça sınırlarını kaydırmamalı"""
+    print("🧪 Testing content-defined chunking...")
+    chunker = ContentChunker()
+    data = os.urandom(4 * 1024 * 1024)
+    chunks = list(chunker.chunks(io.BytesIO(data), read_size=1024 * 1024))
+    assert b''.join(chunks) == data
+    assert all(chunker.min_size <= len(chunk) <= chunker.max_size for chunk in chunks[:-1])
+
+    shifted = list(chunker.chunks(io.BytesIO(b'PlanB' + data)))
+    original = {hashlib.sha256(chunk).digest() for chunk in chunks}
+    moved = {hashlib.sha256(chunk).digest() for chunk in shifted}
+    assert len(original & moved) >= len(original) - 1
+    assert list(chunker.chunks(io.BytesIO(b''))) == []
+    print(f"✅ {len(original & moved)}/{len(original)} chunks survive a prefix insert")
+
+
+def test_incremental_snapshot_dedup_and_restore():
+    """İkinci snapshot yalnızca değişen parçaları yazmalı; geri yükleme birebir olmalı"""
+    print("🧪 Testing incremental snapshots...")
+    with tempfile.TemporaryDirectory() as tmp:
+        source = os.path.join(tmp, "data")
+        big = os.urandom(3 * 1024 * 1024)
+        _write(f"{source}/yf_cache/THYAO.IS.parquet", big)
+        _write(f"{source}/yf_cache/kopya.parquet", big)
+        _write(f"{source}/portfolios/ana.json", b'{"cash": 1000}')
+
+        store = BackupStore(os.path.join(tmp, "backups"), workers=2)
+        first = store.create_snapshot("ilk", {'data': source})
+        assert first['file_count'] == 3
+        # Aynı içerikli iki dosya parçaları paylaşır
+        assert first['bytes_stored'] < 2 * len(big)
+
+        # Büyük dosyanın ortasında küçük bir değişiklik + değişmeyen dosya + silinen kopya
+        changed = big[:1024 * 1024] + b'X' * 100 + big[1024 * 1024 + 100:]
+        _write(f"{source}/yf_cache/THYAO.IS.parquet", changed)
+        os.remove(f"{source}/yf_cache/kopya.parquet")
+        second = store.create_snapshot("ikinci", {'data': source})
+        assert second['files_reused'] == 1 and second['file_count'] == 2
+        assert 0 < second['chunks_new'] <= 3
+        assert second['bytes_stored'] < len(big) / 4
+
+        listed = store.list_snapshots()
+        assert [summary['name'] for summary in listed] == ["ikinci", "ilk"]
+
+        target = os.path.join(tmp, "restore")
+        store.restore_snapshot("ilk", target)
+        assert _read(f"{target}/data/yf_cache/THYAO.IS.parquet") == big
+        assert _read(f"{target}/data/portfolios/ana.json") == b'{"cash": 1000}'
+
+        # İlk snapshot silinince yalnızca ona ait parçalar temizlenmeli
+        store.delete_snapshot("ilk")
+        assert store.gc() > 0
+        assert store.verify_snapshot("ikinci") == []
+        store.restore_snapshot("ikinci", os.path.join(tmp, "restore2"))
+        assert _read(f"{tmp}/restore2/data/yf_cache/THYAO.IS.parquet") == changed
+    print("✅ Incremental snapshots work")
+
+
+def test_chunks_are_durable_before_manifest():
+    """Parça dosyaları ve dizinleri, dosya listesi ve özet yazılmadan önce fsync edilmeli"""
+    print("🧪 Testing write ordering...")
+    import src.offline.backup_store as backup_module
+
+    synced = []
+    real_fsync = backup_module.os.fsync
+
+    def recording_fsync(fd):
+        synced.append(os.readlink(f"/proc/self/fd/{fd}") if os.path.exists("/proc/self/fd") else str(fd))
+        real_fsync(fd)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        source = os.path.join(tmp, "data")
+        _write(f"{source}/cache/veri.bin", os.urandom(600 * 1024))
+        store = BackupStore(os.path.join(tmp, "backups"), workers=2)
+        backup_module.os.fsync = recording_fsync
+        try:
+            store.create_snapshot("yedek", {'data': source})
+        finally:
+            backup_module.os.fsync = real_fsync
+        if not os.path.exists("/proc/self/fd"):
+            print("⚠️ /proc yok, sıralama kontrolü atlandı")
+            return
+
+        digests = store.load_files("yedek")['data/cache/veri.bin']['chunks']
+        listing = next(i for i, path in enumerate(synced) if path.endswith("yedek.files.tmp"))
+        for digest in set(digests):
+            assert synced.index(f"{store._chunk_path(digest)}.tmp") < listing
+            assert synced.index(os.path.dirname(store._chunk_path(digest))) < listing
+        summary = next(i for i, path in enumerate(synced) if path.endswith("yedek.json.tmp"))
+        assert listing < synced.index(store.snapshots_dir) < summary
+    print("✅ Chunks are synced before the manifest")
+
+
+def test_corrupted_chunk_is_detected():
+    """Bozulan parça doğrulamada yakalanmalı ve geri yükleme başarısız olmalı"""
+    print("🧪 Testing integrity verification...")
+    with tempfile.TemporaryDirectory() as tmp:
+        source = os.path.join(tmp, "data")
+        _write(f"{source}/cache/veri.bin", os.urandom(200 * 1024))
+        for encrypt in (True, False):
+            store = BackupStore(os.path.join(tmp, f"backups_{encrypt}"), encrypt=encrypt)
+            store.create_snapshot("yedek", {'data': source})
+            digest = store.load_files("yedek")['data/cache/veri.bin']['chunks'][0]
+            path = store._chunk_path(digest)
+            raw = bytearray(_read(path))
+            raw[-1] ^= 0xFF
+            _write(path, bytes(raw))
+
+            assert store.verify_snapshot("yedek") == [digest]
+            try:
+                store.restore_snapshot("yedek", os.path.join(tmp, f"restore_{encrypt}"))
+                assert False, "bozuk parça kabul edildi"
+            except ValueError:
+                pass
+    print("✅ Corrupted chunks are rejected")
+
+
+if __name__ == "__main__":
+    test_chunker_is_content_defined()
+    test_incremental_snapshot_dedup_and_restore()
+    test_chunks_are_durable_before_manifest()
+    test_corrupted_chunk_is_detected()
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Test Bar Aggregator - Multi-timeframe rollup doğrulaması
+"""
+
+import sys
+import os
+
+import numpy as np
+import pandas as pd
+
+# Add project root to path
+sys.path.append(os.path.dirname(__file__))
+
+from src.data.bar_aggregator import BarAggregator
+
+
+def _make_1m_frame(periods=3000, seed=7):
+    rng = np.random.default_rng(seed)
+    index = pd.date_range("2025-01-06 06:03", periods=periods, freq="1min")
+    close = 100 * np.cumprod(1 + rng.normal(0, 0.001, periods))
+    return pd.DataFrame({
+        "Open": close * (1 + rng.normal(0, 0.0005, periods)),
+        "High": close * 1.002,
+        "Low": close * 0.998,
+        "Close": close,
+        "Volume": rng.integers(100, 1000, periods).astype(float)
+    }, index=index)
+
+
+def _resample(df, rule, **kwargs):
+    frame = df.rename(columns=str.lower)
+    return frame.resample(rule, **kwargs).agg({
+        "open": "first", "high": "max", "low": "min", "close": "last", "volume": "sum"
+    }).dropna()
+
+
+def test_bulk_rollup_matches_resample():
+    """Toplu yükleme pandas resample ile aynı özetleri üretmeli (seans hizası kapalı: UTC epoch)"""
+    print("🧪 Testing bulk rollup...")
+    df = _make_1m_frame()
+    aggregator = BarAggregator(anchor_sessions=False)
+    assert aggregator.ingest_frame("TEST", df) == len(df)
+
+    data = aggregator.get_timeframe_data("TEST")
+    for tf, rule in {"5m": "5min", "15m": "15min", "1h": "1h", "4h": "4h", "1d": "1D"}.items():
+        expected = _resample(df, rule)
+        got = data[tf]
+        assert len(got) == len(expected), tf
+        np.testing.assert_allclose(got.to_numpy(), expected.to_numpy())
+        assert (got.index == expected.index).all(), tf
+    print("✅ Bulk rollup matches resample")
+
+
+def test_streaming_bars_match_bulk():
+    """Bar bar akış ile toplu yükleme aynı sonucu vermeli"""
+    print("🧪 Testing streaming ingestion...")
+    df = _make_1m_frame(periods=800)
+    bulk = BarAggregator()
+    bulk.ingest_frame("TEST", df.iloc[:500])
+
+    stream = BarAggregator()
+    stream.ingest_frame("TEST", df.iloc[:300])
+    for ts, row in df.iloc[300:500].iterrows():
+        assert stream.ingest_bar("TEST", ts, row["Open"], row["High"], row["Low"], row["Close"], row["Volume"])
+
+    # Tekrarlı bar atlanmalı
+    last_ts = df.index[499]
+    assert not stream.ingest_bar("TEST", last_ts, 1, 1, 1, 1, 1)
+
+    for tf in ["1m", "5m", "1h", "1d"]:
+        np.testing.assert_allclose(
+            stream.get_timeframe_data("TEST")[tf].to_numpy(),
+            bulk.get_timeframe_data("TEST")[tf].to_numpy()
+        )
+    print("✅ Streaming ingestion matches bulk")
+
+
+def test_session_anchored_buckets():
+    """4h/1d kovaları pazarın yerel saatinde hizalanmalı: 4h seans açılışında, 1d yerel gece yarısında"""
+    print("🧪 Testing session-anchored buckets...")
+    df = _make_1m_frame(periods=4000)
+    for symbol, timezone, offset in (("THYAO.IS", "Europe/Istanbul", "10h"),
+                                     ("AAPL", "America/New_York", "9h30min")):
+        aggregator = BarAggregator()
+        aggregator.ingest_frame(symbol, df)
+        data = aggregator.get_timeframe_data(symbol)
+        local = df.tz_localize("UTC").tz_convert(timezone)
+        for tf, expected in (("4h", _resample(local, "4h", offset=offset)), ("1d", _resample(local, "1D"))):
+            got = data[tf]
+            assert len(got) == len(expected), (symbol, tf)
+            np.testing.assert_allclose(got.to_numpy(), expected.to_numpy())
+            assert (got.index.tz_localize("UTC") == expected.index.tz_convert("UTC")).all(), (symbol, tf)
+
+    # BIST 4h kovaları yerel 10:00 ve 14:00'te başlar
+    bist = BarAggregator()
+    bist.ingest_frame("THYAO.IS", df)
+    hours = bist.get_timeframe_data("THYAO.IS")["4h"].index.tz_localize("UTC").tz_convert("Europe/Istanbul").hour
+    assert {10, 14} <= set(hours) <= {2, 6, 10, 14, 18, 22}
+
+    # Akış yolu da aynı hizayı kullanmalı
+    stream = BarAggregator()
+    stream.ingest_frame("THYAO.IS", df.iloc[:1500])
+    for ts, row in df.iloc[1500:].iterrows():
+        assert stream.ingest_bar("THYAO.IS", ts, row["Open"], row["High"], row["Low"], row["Close"], row["Volume"])
+    for tf in ("1h", "4h", "1d"):
+        np.testing.assert_allclose(stream.get_timeframe_data("THYAO.IS")[tf].to_numpy(),
+                                   bist.get_timeframe_data("THYAO.IS")[tf].to_numpy())
+    print("✅ Buckets follow market sessions")
+
+
+def test_retention_limit():
+    """max_bars sınırı belleği sınırlamalı"""
+    print("🧪 Testing retention...")
+    aggregator = BarAggregator(max_bars=200)
+    aggregator.ingest_frame("TEST", _make_1m_frame(periods=1000))
+    one_minute = aggregator.get_timeframe_data("TEST")["1m"]
+    assert len(one_minute) <= 400
+    assert aggregator.get_latest_bar("TEST")["timestamp"] == one_minute.index[-1]
+    print("✅ Retention works")
+
+
+if __name__ == "__main__":
+    test_bulk_rollup_matches_resample()
+    test_streaming_bars_match_bulk()
+    test_session_anchored_buckets()
+    test_retention_limit()
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+Test Collector Fan-out - Sağlayıcı başına sınırlı eşzamanlılık, ortak hız sınırlayıcı, artımlı from_ ve paralel sağlayıcılar
+
+Sahte Polygon/Binance istemcileri bloklayan SDK çağrılarını (time.sleep) taklit eder.
+"""
+
+import sys
+import os
+import asyncio
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+
+# Add project root and docker services to path
+sys.path.append(os.path.dirname(__file__))
+sys.path.append(os.path.join(os.path.dirname(__file__), 'docker'))
+
+try:
+    import market_data_collector as mdc
+except ImportError as e:
+    mdc = None
+    IMPORT_ERROR = e
+
+pytestmark = pytest.mark.skipif(mdc is None, reason="market_data_collector import edilemedi (psycopg2/redis/aiohttp gerekli)")
+
+SESSION_START = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(hours=9)
+
+
+class FakePolygonClient:
+    """Her çağrı `delay` saniye bloklar; `from_` sonrasındaki dakika barlarını döner"""
+
+    def __init__(self, delay=0.05, minutes=5, failing=()):
+        self.delay = delay
+        self.minutes = minutes
+        self.failing = set(failing)
+        self.calls = []
+        self.active = self.max_active = 0
+        self.lock = threading.Lock()
+
+    def get_aggs(self, ticker, multiplier, timespan, from_, to):
+        with self.lock:
+            self.calls.append((ticker, from_))
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        try:
+            time.sleep(self.delay)
+            if ticker in self.failing:
+                raise RuntimeError("429 Too Many Requests")
+            start_ms = from_ if isinstance(from_, int) else 0
+            bars = []
+            for minute in range(self.minutes):
+                ts = int((SESSION_START + timedelta(minutes=minute)).timestamp() * 1000)
+                if ts >= start_ms:
+                    bars.append(SimpleNamespace(timestamp=ts, open=1.0, high=2.0, low=0.5, close=1.5 + minute,
+                                                volume=100.0))
+            return bars
+        finally:
+            with self.lock:
+                self.active -= 1
+
+
+class FakeBinanceClient:
+    def __init__(self, delay=0.05):
+        self.delay = delay
+        self.calls = []
+
+    def get_klines(self, symbol, interval, limit, startTime=None):
+        self.calls.append((symbol, startTime, limit))
+        time.sleep(self.delay)
+        ts = int(SESSION_START.timestamp() * 1000)
+        return [[ts, "1", "2", "0.5", "1.5", "10.0"]][-limit:]
+
+
+def test_bounded_fanout():
+    """Semboller sağlayıcı sınırı kadar eşzamanlı çekilmeli; hatalı sembol döngüyü düşürmemeli"""
+    print("🧪 Testing bounded fan-out...")
+    client = FakePolygonClient(delay=0.05, failing={'SYM007'})
+    provider = mdc.PolygonDataProvider("key", max_concurrency=8, requests_per_second=0, client=client)
+    symbols = [f"SYM{i:03d}" for i in range(40)]
+
+    started = time.perf_counter()
+    points = asyncio.run(provider.get_realtime_data(symbols))
+    elapsed = time.perf_counter() - started
+    sequential = len(symbols) * client.delay
+    assert client.max_active == 8, client.max_active
+    assert elapsed < sequential / 3, elapsed
+    assert len(points) == 39 * 5 and provider.executor.stats['errors'] == 1
+    assert 'SYM007' not in {point.symbol for point in points}
+    provider.executor.shutdown()
+    print(f"✅ 40 symbols in {elapsed * 1000:.0f} ms (sequential ~{sequential * 1000:.0f} ms)")
+
+
+def test_shared_rate_limiter():
+    """Aynı sınırlayıcıyı paylaşan sağlayıcılar toplam hızı aşmamalı"""
+    print("🧪 Testing shared rate limiter...")
+    limiter = mdc.AsyncRateLimiter(20, burst=1)
+    first = mdc.PolygonDataProvider("key", max_concurrency=8, rate_limiter=limiter,
+                                    client=FakePolygonClient(delay=0))
+    second = mdc.PolygonDataProvider("key", max_concurrency=8, rate_limiter=limiter,
+                                     client=FakePolygonClient(delay=0))
+
+    async def both():
+        await asyncio.gather(first.get_realtime_data([f"A{i}" for i in range(6)]),
+                             second.get_realtime_data([f"B{i}" for i in range(5)]))
+
+    started = time.perf_counter()
+    asyncio.run(both())
+    elapsed = time.perf_counter() - started
+    # 11 istek, 20/s, burst 1: ilk istek hemen, kalan 10 istek >= 0.5 s
+    assert elapsed >= 0.45, elapsed
+    print(f"✅ 11 requests at 20/s took {elapsed * 1000:.0f} ms")
+
+
+def test_incremental_from_timestamp():
+    """İkinci döngü yalnızca son saklanan bardan itibaren çekmeli; veritabanı zaman damgası devralınmalı"""
+    print("🧪 Testing incremental from_ per symbol...")
+    client = FakePolygonClient(delay=0, minutes=5)
+    provider = mdc.PolygonDataProvider("key", requests_per_second=0, client=client)
+
+    first = asyncio.run(provider.get_realtime_data(['AAPL']))
+    assert len(first) == 5 and isinstance(client.calls[0][1], str)
+    assert all(isinstance(point.volume, int) for point in first)   # Agg.volume float gelir
+    last = provider.last_timestamps['AAPL']
+    assert last == SESSION_START + timedelta(minutes=4)
+
+    client.minutes = 8
+    second = asyncio.run(provider.get_realtime_data(['AAPL']))
+    assert client.calls[1][1] == int(last.timestamp() * 1000)
+    assert [point.timestamp for point in second] == [SESSION_START + timedelta(minutes=m) for m in range(4, 8)]
+
+    # Veritabanından gelen daha eski zaman damgası ilerlemeyi geri almamalı
+    provider.seed_last_timestamps({'AAPL': SESSION_START, 'MSFT': SESSION_START + timedelta(minutes=6)})
+    assert provider.last_timestamps['AAPL'] == SESSION_START + timedelta(minutes=7)
+    msft = asyncio.run(provider.get_realtime_data(['MSFT']))
+    assert [point.timestamp.minute - SESSION_START.minute for point in msft] == [6, 7]
+
+    binance = mdc.BinanceDataProvider("key", "secret", requests_per_second=0, client=FakeBinanceClient(delay=0))
+    asyncio.run(binance.get_realtime_data(['BTCUSDT']))
+    asyncio.run(binance.get_realtime_data(['BTCUSDT']))
+    assert binance.client.calls[0] == ('BTCUSDT', None, 1)
+    assert binance.client.calls[1] == ('BTCUSDT', int(SESSION_START.timestamp() * 1000), 1000)
+    print("✅ Incremental fetches work")
+
+
+def test_providers_run_in_parallel():
+    """Polygon ve Binance aynı döngüde paralel çalışmalı"""
+    print("🧪 Testing parallel providers...")
+    os.environ['MARKET_ARCHIVE_PATH'] = tempfile.mkdtemp()
+    collector = mdc.RealTimeDataCollector()
+    collector.polygon_provider = mdc.PolygonDataProvider("key", max_concurrency=5, requests_per_second=0,
+                                                         client=FakePolygonClient(delay=0.2, minutes=1))
+    collector.binance_provider = mdc.BinanceDataProvider("key", "secret", max_concurrency=4, requests_per_second=0,
+                                                         client=FakeBinanceClient(delay=0.2))
+    started = time.perf_counter()
+    points = asyncio.run(collector.collect_market_data())
+    elapsed = time.perf_counter() - started
+    assert len(points) == len(collector.stock_symbols) + len(collector.crypto_symbols)
+    assert elapsed < 0.35, elapsed
+    health = asyncio.run(collector.health_check())
+    assert health['providers']['polygon_fetch']['calls'] == len(collector.stock_symbols)
+    print(f"✅ Both providers finished in {elapsed * 1000:.0f} ms")
+
+
+if __name__ == "__main__":
+    if mdc is None:
+        print(f"❌ market_data_collector import hatası (psycopg2/redis/aiohttp gerekli): {IMPORT_ERROR}")
+        sys.exit(0)
+    test_bounded_fanout()
+    test_shared_rate_limiter()
+    test_incremental_from_timestamp()
+    test_providers_run_in_parallel()
@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""
+Test Columnar Lake - Bölümlü şifreli Parquet blokları, manifest eleme ve PersonalDataLake entegrasyonu
+"""
+
+import sys
+import os
+import json
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+# Add project root to path
+sys.path.append(os.path.dirname(__file__))
+
+from src.storage.columnar_lake import ColumnarLake
+from src.storage.document_store import DocumentStore
+
+
+def _events(count, days=60, seed=1):
+    rng = np.random.default_rng(seed)
+    now = pd.Timestamp(datetime.now())
+    return pd.DataFrame({
+        'ts': now - pd.to_timedelta(rng.integers(0, days * 86400, count), unit='s'),
+        'symbol': np.array([f"S{i}" for i in range(20)])[rng.integers(0, 20, count)],
+        'transaction_type': np.array(['buy', 'sell'])[rng.integers(0, 2, count)],
+        'price': rng.uniform(1, 100, count),
+    })
+
+
+def test_scan_prunes_blocks_and_matches_pandas():
+    """Zaman/filtre eleme ve kolon projeksiyonu pandas ile aynı sonucu vermeli"""
+    print("🧪 Testing partition pruning and predicate pushdown...")
+    with tempfile.TemporaryDirectory() as tmp:
+        frame = _events(20000)
+        lake = ColumnarLake(tmp, block_rows=1000)
+        lake.append_frame('trades', frame)
+        assert lake.count('trades') == 20000
+        assert all(block['min_ts'][:10] == block['date'] == block['max_ts'][:10] for block in lake.blocks())
+
+        start = datetime.now() - timedelta(days=10)
+        recent = lake.scan('trades', columns=['ts', 'price'], start=start,
+                           filters=[('symbol', '==', 'S3'), ('price', '>', 50)])
+        expected = frame[(frame.ts >= start) & (frame.symbol == 'S3') & (frame.price > 50)]
+        assert list(recent.columns) == ['ts', 'price']
+        assert len(recent) == len(expected)
+        assert np.allclose(np.sort(recent['price'].values), np.sort(expected['price'].values))
+        assert lake.stats['blocks_pruned'] > 0
+
+        # Düşük kardinaliteli kolon değer kümesi: olmayan değer hiçbir blok okumamalı
+        read_before = lake.stats['blocks_read']
+        assert lake.scan('trades', filters=[('transaction_type', '==', 'dividend')]).empty
+        assert lake.stats['blocks_read'] == read_before
+
+        # Manifest yeniden açılışta korunmalı
+        reopened = ColumnarLake(tmp)
+        assert reopened.count('trades') == 20000
+        assert len(reopened.scan('trades', columns=['symbol'], filters=[('symbol', 'in', ['S1', 'S2'])])) == \
+            int(frame.symbol.isin(['S1', 'S2']).sum())
+    print("✅ Pruning and pushdown match pandas")
+
+
+def test_blocks_are_encrypted_and_bound_to_path():
+    """Blok dosyaları düz metin içermemeli; başka yola taşınan blok reddedilmeli"""
+    print("🧪 Testing block encryption...")
+    with tempfile.TemporaryDirectory() as tmp:
+        lake = ColumnarLake(tmp)
+        lake.append('behavior', {'page': 'gizli_sayfa', 'duration': 3})
+        lake.append('behavior', {'page': 'panel', 'duration': 5, 'ts': datetime.now() - timedelta(days=2)})
+        lake.flush()
+        first, second = lake.blocks('behavior')
+        with open(os.path.join(tmp, first['path']), 'rb') as f:
+            raw = f.read()
+        assert b'gizli_sayfa' not in raw and b'PAR1' not in raw
+
+        # İki bloğun içeriği yer değiştirirse AES-GCM doğrulaması başarısız olmalı
+        with open(os.path.join(tmp, second['path']), 'wb') as f:
+            f.write(raw)
+        try:
+            lake.scan('behavior')
+            assert False, "yer değiştirmiş blok kabul edildi"
+        except RuntimeError:
+            pass
+    print("✅ Blocks are encrypted")
+
+
+def test_timer_flush_and_manifest_journal():
+    """Bekleyen olaylar yeni append beklemeden yazılmalı; manifest günlüğe eklenip rollover ile katlanmalı"""
+    print("🧪 Testing timer flush and manifest journal...")
+    with tempfile.TemporaryDirectory() as tmp:
+        lake = ColumnarLake(tmp, max_buffer_age=0.1, flush_interval=0.05, manifest_rollover=3)
+        lake.append('behavior', {'page': 'panel', 'duration': 1})
+        deadline = time.time() + 5
+        while not lake.blocks('behavior') and time.time() < deadline:
+            time.sleep(0.05)
+        assert lake.count('behavior') == 1 and not lake._buffers
+
+        # Her yazım günlüğe tek satır ekler; üçüncü satırda manifest'e katlanır
+        lake.append_frame('trades', _events(10, days=1))
+        assert os.path.exists(lake.journal_file) and lake._journal_entries == 2
+        lake.append_frame('trades', _events(10, days=1, seed=2))
+        assert not os.path.exists(lake.journal_file)
+        lake.append_frame('trades', _events(10, days=1, seed=3))
+        lake.close()
+
+        # Yarım kalmış son günlük satırı yok sayılmalı, önceki satırlar uygulanmalı
+        with open(lake.journal_file, 'a', encoding='utf-8') as f:
+            f.write('{"next_block": 99, "add": [')
+        reopened = ColumnarLake(tmp, flush_interval=0)
+        assert reopened.count('trades') == 30 and reopened.count('behavior') == 1
+        assert not os.path.exists(reopened.journal_file)
+    print("✅ Timer flush and manifest journal work")
+
+
+def test_compaction_merges_small_blocks():
+    """Geçmiş günlerin küçük blokları birleşmeli; satırlar ve sorgu sonucu değişmemeli"""
+    print("🧪 Testing per-day compaction...")
+    with tempfile.TemporaryDirectory() as tmp:
+        lake = ColumnarLake(tmp, block_rows=500, flush_interval=0)
+        frame = _events(2000, days=5)
+        frame = frame[frame.ts.dt.date < datetime.now().date()]
+        for start in range(0, len(frame), 100):
+            lake.append_frame('trades', frame.iloc[start:start + 100])
+        before = lake.blocks('trades')
+        old_paths = [os.path.join(tmp, block['path']) for block in before]
+        expected = lake.scan('trades').sort_values(['ts', 'price']).reset_index(drop=True)
+
+        assert lake.compact('trades') >= 4
+        after = lake.blocks('trades')
+        days = {block['date'] for block in after}
+        assert len(after) < len(before) and len(after) <= sum(
+            -(-sum(b['rows'] for b in after if b['date'] == day) // 500) for day in days)
+        assert not any(os.path.exists(path) for path in old_paths)
+        result = lake.scan('trades').sort_values(['ts', 'price']).reset_index(drop=True)
+        assert len(result) == len(frame) and np.allclose(result['price'], expected['price'])
+        assert lake.compact('trades') == 0
+
+        # Bugünün blokları yalnızca eşik aşılınca birleştirilir
+        for i in range(3):
+            lake.append_frame('behavior', pd.DataFrame({'ts': [datetime.now()], 'duration': [i]}))
+        assert lake.compact('behavior') == 0 and len(lake.blocks('behavior')) == 3
+        assert lake.compact('behavior', include_today=True) == 1 and len(lake.blocks('behavior')) == 1
+
+        reopened = ColumnarLake(tmp, flush_interval=0)
+        assert reopened.count('trades') == len(frame) and len(reopened.blocks('trades')) == len(after)
+    print("✅ Compaction works")
+
+
+def test_concat_works_without_promote_options():
+    """pyarrow < 14 (promote_options yok) yolunda farklı şemalı bloklar birleşebilmeli"""
+    print("🧪 Testing legacy pyarrow concat path...")
+    import pyarrow as pa
+    import src.storage.columnar_lake as lake_module
+
+    modern = pa.concat_tables
+
+    def legacy_concat(tables, promote=False, memory_pool=None):
+        return modern(tables, promote_options='default' if promote else 'none')
+
+    original = lake_module.PERMISSIVE_CONCAT
+    lake_module.PERMISSIVE_CONCAT = False
+    pa.concat_tables = legacy_concat
+    try:
+        frame = lake_module._concat_frames([pa.table({'a': [1, 2]}), pa.table({'a': [1.5], 'b': ['x']})])
+        missing = lake_module._concat_frames([pa.table({'a': [1]}), pa.table({'b': ['y']})])
+    finally:
+        pa.concat_tables = modern
+        lake_module.PERMISSIVE_CONCAT = original
+    assert frame['a'].tolist() == [1.0, 2.0, 1.5] and frame['b'].tolist()[-1] == 'x'
+    assert len(missing) == 2 and missing['b'].tolist()[-1] == 'y'
+    print("✅ Legacy concat path works")
+
+
+def test_personal_data_lake_ingest_and_legacy_migration():
+    """Olaylar lake'e yazılmalı; eski dosya başına olaylar bir kez taşınmalı"""
+    print("🧪 Testing PersonalDataLake integration...")
+    from src.ai.personal_data_lake import PersonalDataLake
+
+    with tempfile.TemporaryDirectory() as tmp:
+        lake_dir = os.path.join(tmp, "lake")
+        os.makedirs(os.path.join(lake_dir, "analyses"))
+        with open(os.path.join(lake_dir, "analyses", "THYAO.IS_20240101_100000.json"), 'w', encoding='utf-8') as f:
+            json.dump({'symbol': 'THYAO.IS', 'analysis_data': {'total_score': 71}, 'timestamp': '20240101_100000'}, f)
+
+        store = DocumentStore(os.path.join(tmp, "store.db"))
+        data_lake = PersonalDataLake(store=store, data_directory=lake_dir)
+        assert os.path.exists(os.path.join(lake_dir, "_migrated", "analyses", "THYAO.IS_20240101_100000.json"))
+        assert data_lake.lake.count('analyses') == 1
+
+        for score in (60, 80):
+            assert data_lake.store_analysis_data('AKBNK.IS', {'total_score': score, 'recommendation': 'AL'})
+        for hour, side in ((10, 'buy'), (10, 'buy'), (16, 'sell')):
+            data_lake.lake.append('trades', {'ts': datetime.now().replace(hour=hour), 'symbol': 'AKBNK.IS',
+                                             'transaction_type': side})
+
+        scores = data_lake.query_events('analyses', columns=['symbol', 'total_score'],
+                                        filters=[('symbol', '==', 'AKBNK.IS')])
+        assert sorted(scores['total_score']) == [60, 80]
+        insights = data_lake.generate_ai_insights()
+        assert insights['user_preferences']['most_analyzed_symbols'][0] == 'AKBNK.IS'
+        assert insights['trading_patterns']['preferred_entry_times'] == ['10:00']
+        assert insights['trading_patterns']['preferred_exit_times'] == ['16:00']
+        assert data_lake.get_data_quality_report()['total_data_points'] == 6
+        assert store.count_log('lake_insights') == 1
+        store.close()
+    print("✅ PersonalDataLake integration works")
+
+
+if __name__ == "__main__":
+    test_scan_prunes_blocks_and_matches_pandas()
+    test_blocks_are_encrypted_and_bound_to_path()
+    test_timer_flush_and_manifest_journal()
+    test_compaction_merges_small_blocks()
+    test_concat_works_without_promote_options()
+    test_personal_data_lake_ingest_and_legacy_migration()
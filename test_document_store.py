@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Test Document Store - Ortak doküman deposu: CRUD, ikincil indeks, transaction, yazma birleştirme ve JSON taşıma
+"""
+
+import sys
+import os
+import json
+import tempfile
+
+# Add project root to path
+sys.path.append(os.path.dirname(__file__))
+
+from src.storage.document_store import DocumentStore
+
+
+def test_crud_indexes_and_per_key_writes():
+    """Her CRUD işlemi yalnızca ilgili dokümanı yazmalı; indeksler güncel kalmalı"""
+    print("🧪 Testing CRUD and secondary indexes...")
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "store.db")
+        store = DocumentStore(db_path)
+        lists = store.collection('watchlists', indexes=('market', 'tags'))
+
+        for i in range(200):
+            lists[f"wl{i}"] = {'market': 'bist' if i % 2 else 'us', 'tags': [f"t{i % 5}", 'all'], 'symbols': []}
+        written = store.stats['documents_written']
+
+        lists['wl3']['symbols'].append('THYAO.IS')
+        lists['wl3']['market'] = 'crypto'
+        lists.save('wl3')
+        del lists['wl4']
+        assert store.stats['documents_written'] - written == 2
+
+        assert 'wl3' in lists.find_keys('market', 'crypto')
+        assert 'wl3' not in lists.find_keys('market', 'bist')
+        assert len(lists.find_keys('tags', 'all')) == 199
+        assert lists.distinct('market') == {'bist': 99, 'us': 99, 'crypto': 1}
+        store.close()
+
+        reopened = DocumentStore(db_path)
+        lists = reopened.collection('watchlists', indexes=('market', 'tags'))
+        assert lists['wl3']['symbols'] == ['THYAO.IS']
+        assert 'wl4' not in lists
+        assert len(lists) == 199
+        # Sonradan eklenen indeks mevcut dokümanlar için doldurulmalı
+        lists = reopened.collection('watchlists', indexes=('symbols',))
+        assert lists.find_keys('symbols', 'THYAO.IS') == ['wl3']
+        reopened.close()
+    print("✅ CRUD and indexes work")
+
+
+def test_transaction_rollback_coalescing_and_log():
+    """Hatalı transaction geri alınmalı; birleştirme modunda yazımlar tek flush'ta gitmeli"""
+    print("🧪 Testing transactions, coalescing and log streams...")
+    with tempfile.TemporaryDirectory() as tmp:
+        store = DocumentStore(os.path.join(tmp, "store.db"))
+        users = store.collection('users', indexes=('username',))
+        users['u1'] = {'username': 'ali'}
+
+        try:
+            with store.transaction():
+                users['u2'] = {'username': 'ayse'}
+                del users['u1']
+                raise RuntimeError("iptal")
+        except RuntimeError:
+            pass
+        assert users.find_keys('username', 'ali') == ['u1']
+        assert 'u2' not in users and users.find_keys('username', 'ayse') == []
+
+        store.set_coalescing(True, flush_interval=60)
+        flushes = store.stats['flushes']
+        for i in range(500):
+            users[f"c{i}"] = {'username': f"user{i}"}
+            store.append_log('access_log', {'i': i})
+        assert store.stats['flushes'] == flushes
+        # Okumalar bekleyen yazımları görmeli
+        assert users.find_one('username', 'user42') == {'username': 'user42'}
+        store.set_coalescing(False)
+        assert store.stats['flushes'] - flushes >= 1
+
+        assert store.count_log('access_log') == 500
+        store.trim_log('access_log', 100)
+        assert [record['i'] for record in store.read_log('access_log', limit=3)] == [497, 498, 499]
+        assert store.count_log('access_log') == 100
+        store.close()
+    print("✅ Transactions, coalescing and logs work")
+
+
+def test_json_migration_and_backup():
+    """Eski JSON dosyaları bir kez taşınmalı; yedekten geri yükleme çalışmalı"""
+    print("🧪 Testing JSON migration and backup...")
+    from src.watchlist.watchlist_manager import WatchlistManager
+
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        try:
+            os.makedirs("data/watchlists")
+            legacy = {'mine': {'watchlist_id': 'mine', 'name': 'Benim', 'description': '', 'symbols': ['AAPL'],
+                               'market': 'nasdaq', 'tags': ['x'], 'is_public': False,
+                               'created_at': '2024-01-01T00:00:00', 'updated_at': '2024-01-01T00:00:00'}}
+            with open("data/watchlists/watchlists.json", 'w', encoding='utf-8') as f:
+                json.dump(legacy, f)
+
+            store = DocumentStore(os.path.join(tmp, "store.db"))
+            manager = WatchlistManager(store=store)
+            assert os.path.exists("data/watchlists/watchlists.json.migrated")
+            assert list(manager.watchlists) == ['mine']
+            assert manager.add_symbol_to_watchlist('mine', 'MSFT')
+            assert [w['watchlist_id'] for w in manager.get_all_watchlists(tags=['x'])] == ['mine']
+
+            backup = store.backup(os.path.join(tmp, "backup", "store.db"))
+            manager.delete_watchlist('mine')
+            assert 'mine' not in manager.watchlists
+            store.restore(backup)
+            assert manager.watchlists['mine']['symbols'] == ['AAPL', 'MSFT']
+            store.close()
+        finally:
+            os.chdir(cwd)
+    print("✅ Migration and backup work")
+
+
+if __name__ == "__main__":
+    test_crud_indexes_and_per_key_writes()
+    test_transaction_rollback_coalescing_and_log()
+    test_json_migration_and_backup()
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Test Encryption Stream - Önbellekli anahtar türetme, parça parça akış şifreleme ve şifreli yedekler
+"""
+
+import sys
+import os
+import io
+import struct
+import tempfile
+
+# Add project root to path
+sys.path.append(os.path.dirname(__file__))
+
+from src.security.encryption_manager import EncryptionManager, encryption_manager, _derive_master_key, STREAM_HEADER
+
+
+def _records(token):
+    """Şifreli akıştaki parça sınırları"""
+    positions, pos = [], STREAM_HEADER.size
+    while pos < len(token):
+        positions.append(pos)
+        pos += 4 + struct.unpack(">I", token[pos:pos + 4])[0]
+    return positions + [len(token)]
+
+
+def test_key_derivation_is_cached():
+    """Yeni örnekler PBKDF2'yi yeniden çalıştırmamalı ve aynı anahtarı kullanmalı"""
+    print("🧪 Testing process-wide key cache...")
+    misses = _derive_master_key.cache_info().misses
+    manager = EncryptionManager()
+    assert _derive_master_key.cache_info().misses == misses
+    assert manager.master_key == encryption_manager.master_key
+    assert manager.decrypt_data(encryption_manager.encrypt_data({'a': 1})) == {'a': 1}
+    print("✅ Key derivation is cached")
+
+
+def test_stream_roundtrip_and_tampering():
+    """Tüm boyutlar ve işçi sayıları için geri dönüşüm; kesilme/sıra değişimi reddedilmeli"""
+    print("🧪 Testing chunked stream encryption...")
+    chunk = 64 * 1024
+    for size in (0, 1, chunk, chunk + 1, 5 * chunk + 123):
+        data = os.urandom(size)
+        for workers in (1, 3):
+            sealed = io.BytesIO()
+            assert encryption_manager.encrypt_stream(io.BytesIO(data), sealed, chunk, workers) == size
+            opened = io.BytesIO()
+            encryption_manager.decrypt_stream(io.BytesIO(sealed.getvalue()), opened, workers)
+            assert opened.getvalue() == data
+
+    token = sealed.getvalue()
+    bounds = _records(token)
+    truncated = token[:bounds[-2]]
+    swapped = token[:bounds[0]] + token[bounds[1]:bounds[2]] + token[bounds[0]:bounds[1]] + token[bounds[2]:]
+    flipped = bytearray(token)
+    flipped[-1] ^= 1
+    for bad in (truncated, swapped, bytes(flipped), token[:5]):
+        try:
+            encryption_manager.decrypt_stream(io.BytesIO(bad), io.BytesIO())
+            assert False, "bozuk akış kabul edildi"
+        except ValueError:
+            pass
+    print("✅ Stream encryption works")
+
+
+def test_encrypted_backup_roundtrip():
+    """Yedek parçaları ve dosya listesi şifreli saklanmalı ve geri yüklenebilmeli"""
+    print("🧪 Testing encrypted offline backup...")
+    from src.offline.offline_manager import OfflineManager
+    from src.storage.document_store import DocumentStore
+
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        try:
+            os.makedirs("data/portfolios")
+            with open("data/portfolios/ana.json", 'w', encoding='utf-8') as f:
+                f.write('{"name": "ana"}')
+            store = DocumentStore(os.path.join(tmp, "store.db"))
+            manager = OfflineManager(store=store)
+
+            assert manager.create_backup("yedek")
+            for root, dirs, files in os.walk("data/backups"):
+                for filename in files:
+                    with open(os.path.join(root, filename), 'rb') as f:
+                        raw = f.read()
+                    assert b"ana.json" not in raw and b'"name": "ana"' not in raw
+
+            os.remove("data/portfolios/ana.json")
+            assert manager.restore_backup("yedek")
+            with open("data/portfolios/ana.json", encoding='utf-8') as f:
+                assert f.read() == '{"name": "ana"}'
+            store.close()
+        finally:
+            os.chdir(cwd)
+    print("✅ Encrypted backup works")
+
+
+if __name__ == "__main__":
+    test_key_derivation_is_cached()
+    test_stream_roundtrip_and_tampering()
+    test_encrypted_backup_roundtrip()
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Test Heatmap Panel - Sektör segment toplamları, çoklu zaman dilimi, bar önbelleği ve rotasyon analizi
+"""
+
+import sys
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+# Add project root to path
+sys.path.append(os.path.dirname(__file__))
+
+from src.visualization.heatmap_generator import HeatmapGenerator
+
+
+def _price_data(mapping, days=300, seed=2):
+    """Her sembol için farklı uzunlukta, arada eksik günleri olan OHLCV"""
+    rng = np.random.default_rng(seed)
+    data = {}
+    for i, symbol in enumerate(s for symbols in mapping.values() for s in symbols):
+        index = pd.bdate_range(end="2025-03-14", periods=days - (i % 7) * 10)
+        close = 100 * np.cumprod(1 + rng.normal(0.0005 * (i % 5 - 2), 0.02, len(index)))
+        close[rng.integers(0, len(index), 3)] = np.nan
+        frame = pd.DataFrame({'close': close, 'volume': rng.integers(1000, 9000, len(index)).astype(float)},
+                             index=index)
+        data[symbol] = frame.drop(frame.index[rng.integers(0, len(index), 5)])
+    return data
+
+
+def _pooled_reference(price_data, symbols, last_dates=None):
+    """Eski yol: sektördeki tüm getiri/hacimleri listede birleştir"""
+    returns, volumes = [], []
+    for symbol in symbols:
+        if symbol in price_data and not price_data[symbol].empty:
+            df = price_data[symbol]
+            r = df['close'].pct_change(fill_method=None).dropna()
+            v = df['volume'].dropna()
+            if last_dates is not None:
+                r, v = r[r.index.isin(last_dates)], v[v.index.isin(last_dates)]
+            returns.extend(r.tolist())
+            volumes.extend(v.tolist())
+    return returns, volumes
+
+
+def test_matches_pooled_statistics():
+    """Tüm geçmiş ve son-k-bar pencereleri eski birleştirilmiş liste sonuçlarıyla aynı olmalı"""
+    print("🧪 Testing grouped reductions against pooled lists...")
+    generator = HeatmapGenerator()
+    price_data = _price_data(generator.sector_mapping)
+    del price_data['MSFT']
+    price_data['GE'] = price_data['GE'].iloc[:0]
+
+    result = generator.generate_multi_timeframe_heatmap(price_data, timeframes=('all', '5d', '1mo'))
+    all_dates = sorted(set().union(*[df.index for df in price_data.values()]))
+    for timeframe, bars in (('all', None), ('5d', 5), ('1mo', 21)):
+        last_dates = None if bars is None else all_dates[-bars:]
+        for sector, symbols in generator.sector_mapping.items():
+            returns, volumes = _pooled_reference(price_data, symbols, last_dates)
+            cell = result['heatmaps'][timeframe][sector]
+            assert abs(cell['return_pct'] - round(np.mean(returns) * 100, 2)) < 0.011, (timeframe, sector)
+            assert abs(cell['volatility_pct'] - round(np.std(returns) * 100, 2)) < 0.011, (timeframe, sector)
+            assert abs(cell['volume_ratio'] - round(np.mean(volumes), 0)) <= 1
+            assert cell['symbol_count'] == len([s for s in symbols if s in price_data])
+    print("✅ Sector statistics match for all timeframes")
+
+
+def test_bar_cache_and_rotation_reuse():
+    """Aynı bar için panel önbellekten gelmeli; yeni bar paneli yenilemeli; rotasyon aynı dizileri kullanmalı"""
+    print("🧪 Testing per-bar cache and rotation analysis...")
+    generator = HeatmapGenerator()
+    price_data = _price_data(generator.sector_mapping, days=2000)
+
+    started = time.perf_counter()
+    first = generator.generate_sector_heatmap(price_data, timeframe='1mo')
+    cold = time.perf_counter() - started
+    started = time.perf_counter()
+    second = generator.generate_sector_heatmap(price_data, timeframe='1mo')
+    warm = time.perf_counter() - started
+    assert first['panel_key'] == second['panel_key'] and len(generator._panels) == 1
+    assert first['heatmap_data'] == second['heatmap_data']
+
+    rotation = generator.generate_rotation_analysis(first)
+    returns = {sector: data['return_pct'] for sector, data in first['heatmap_data'].items()}
+    ranked = sorted(returns.items(), key=lambda item: item[1], reverse=True)
+    assert [item['sector'] for item in rotation['leading_sectors']] == [s for s, _ in ranked[:3]]
+    assert [item['sector'] for item in rotation['lagging_sectors']] == [s for s, _ in ranked[-3:]]
+    assert rotation['market_breadth']['positive_sectors'] == len([r for r in returns.values() if r > 0])
+
+    # Panel önbellekte değilse sözlükten aynı sonuç çıkmalı
+    generator._panels.clear()
+    assert generator.generate_rotation_analysis(first) == rotation
+
+    next_bar = price_data['AAPL'].index[-1] + pd.offsets.BDay()
+    price_data['AAPL'] = pd.concat([price_data['AAPL'],
+                                    pd.DataFrame({'close': [1.0], 'volume': [1.0]}, index=[next_bar])])
+    third = generator.generate_sector_heatmap(price_data, timeframe='1d')
+    assert third['panel_key'] != first['panel_key']
+
+    crypto = generator.generate_crypto_heatmap(_price_data(generator.crypto_sectors))
+    assert crypto['market_type'] == 'crypto' and crypto['total_sectors'] == len(generator.crypto_sectors)
+    print(f"✅ Cache works (cold {cold * 1000:.1f} ms, warm {warm * 1000:.2f} ms)")
+
+
+if __name__ == "__main__":
+    test_matches_pooled_statistics()
+    test_bar_cache_and_rotation_reuse()
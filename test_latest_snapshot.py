@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Test Latest Snapshot - Trigger ile güncellenen son-durum tablosu, keyset sayfalama ve sıkıştırma
+"""
+
+import sys
+import os
+import sqlite3
+import tempfile
+
+# Add project root to path
+sys.path.append(os.path.dirname(__file__))
+
+from fastapi.testclient import TestClient
+
+import ultra_api_server
+from ultra_api_server import app, SQLiteConnectionPool
+from ultra_database import UltraLightweightDB
+
+
+def _insert_market_rows(db_path):
+    conn = sqlite3.connect(db_path)
+    rows = []
+    for symbol in ["AAA", "BBB", "CCC"]:
+        for day in range(1, 6):
+            rows.append((symbol, 100.0 + day, 1000 * day, "BIST", f"2020-01-0{day} 10:00:00", 55.0))
+    # Geç gelen eski kayıt snapshot'ı geriye almamalı
+    rows.append(("AAA", 1.0, 1, "BIST", "2019-12-31 10:00:00", 40.0))
+    conn.executemany("""
+        INSERT INTO market_data (symbol, price, volume, market, timestamp, rsi)
+        VALUES (?, ?, ?, ?, ?, ?)
+    """, rows)
+    conn.commit()
+    conn.close()
+
+
+def test_snapshot_trigger_and_keyset_pages():
+    """Snapshot her sembolün son satırını tutmalı, cursor sayfaları çakışmamalı"""
+    print("🧪 Testing latest snapshot + keyset pagination...")
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "planb_ultra.db")
+        UltraLightweightDB(db_path)
+        _insert_market_rows(db_path)
+        ultra_api_server.db_pool = SQLiteConnectionPool(db_path)
+        client = TestClient(app)
+
+        latest = client.get("/api/v1/market-data", params={"limit": 10}).json()
+        assert sorted(row["symbol"] for row in latest) == ["AAA", "BBB", "CCC"]
+        assert all(row["price"] == 105.0 for row in latest)
+
+        seen = []
+        cursor = None
+        while True:
+            params = {"symbol": "AAA", "limit": 2}
+            if cursor:
+                params["cursor"] = cursor
+            response = client.get("/api/v1/market-data", params=params)
+            page = response.json()
+            seen.extend(row["id"] for row in page)
+            cursor = response.headers.get("X-Next-Cursor")
+            if not cursor:
+                break
+        assert len(seen) == 6 and len(set(seen)) == 6
+
+        assert client.get("/api/v1/analysis", params={"cursor": "bad"}).status_code == 400
+        # id bekleyen cursor'da sayı olmayan anahtar ya da bozuk zaman damgası 500 değil 400 dönmeli
+        for bad in ("2025-01-01 10:00:00|abc", "dün|5", "2025-01-01 10:00:00|"):
+            assert client.get("/api/v1/analysis", params={"cursor": bad}).status_code == 400, bad
+            assert client.get("/api/v1/market-data", params={"symbol": "AAA", "cursor": bad}).status_code == 400
+        assert client.get("/api/v1/market-data", params={"cursor": "2025-01-01 10:00:00|AAA"}).status_code == 200
+    print("✅ Snapshot and keyset pagination work")
+
+
+def test_compaction_keeps_latest_rows():
+    """Sıkıştırma eski satırları günlük özete taşımalı, son satırları korumalı"""
+    print("🧪 Testing retention compaction...")
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "planb_ultra.db")
+        db = UltraLightweightDB(db_path)
+        _insert_market_rows(db_path)
+
+        result = db.compact(retention_days=30)
+        assert result["market_data_compacted"] == 13
+
+        conn = sqlite3.connect(db_path)
+        remaining = conn.execute("SELECT symbol, price FROM market_data ORDER BY symbol").fetchall()
+        assert remaining == [("AAA", 105.0), ("BBB", 105.0), ("CCC", 105.0)]
+        daily = conn.execute("""
+            SELECT open, high, low, close, volume, samples FROM market_data_daily
+            WHERE symbol = 'AAA' AND day = '2020-01-02'
+        """).fetchone()
+        assert daily == (102.0, 102.0, 102.0, 102.0, 2000, 1)
+        assert conn.execute("SELECT COUNT(*) FROM market_data_daily").fetchone()[0] == 13
+        conn.close()
+    print("✅ Compaction works")
+
+
+if __name__ == "__main__":
+    test_snapshot_trigger_and_keyset_pages()
+    test_compaction_keeps_latest_rows()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Test Lexicon Sentiment - Vektörel skorlayıcının TextBlob ile tutarlılığı ve hız karşılaştırması
+"""
+
+import sys
+import os
+
+import numpy as np
+
+# Add project root to path
+sys.path.append(os.path.dirname(__file__))
+
+from src.analysis.lexicon_sentiment import (
+    SentimentScorer, LexiconSentimentScorer, lexicon_sentiment_scorer, get_sentiment_scorer, benchmark
+)
+
+FIXTURE_PATH = os.path.join(os.path.dirname(__file__), "data", "fixtures", "sentiment_headlines.txt")
+
+
+def _load_corpus():
+    with open(FIXTURE_PATH, encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+def test_batch_matches_single_and_keyword_semantics():
+    """Toplu skor tekil skorla aynı olmalı; olumsuzlama, kök ve ifade eşleşmeleri çalışmalı"""
+    print("🧪 Testing lexicon scorer semantics...")
+    corpus = _load_corpus()
+    batch = lexicon_sentiment_scorer.score_texts(corpus)
+    single = np.array([lexicon_sentiment_scorer.score_text(text) for text in corpus])
+    assert np.allclose(batch, single)
+
+    assert lexicon_sentiment_scorer.score_text("good results") > 0
+    assert lexicon_sentiment_scorer.score_text("not good results") < 0
+    assert lexicon_sentiment_scorer.score_text("Endeks sert düşüşte") < 0
+    assert lexicon_sentiment_scorer.score_text("İYİMSER beklentiler") > 0
+    assert lexicon_sentiment_scorer.score_text("") == 0
+
+    keywords = LexiconSentimentScorer.from_keywords(["satın alma", "up"], ["kriz"], ["belirsizlik"])
+    labels = keywords.classify_texts(["Şirket satın alma yaptı", "kriz derinleşiyor", "software update"])
+    assert labels == ["positive", "negative", "neutral"]
+    assert abs(keywords.score_text("kriz ve belirsizlik")) < 1
+    print("✅ Lexicon semantics OK")
+
+
+def test_stemming_only_for_turkish_terms():
+    """Kök eşleşmesi yalnızca Türkçe terimlerde olmalı; İngilizce terimler tam eşleşmeli"""
+    print("🧪 Testing Turkish-only stemming...")
+    assert lexicon_sentiment_scorer.score_text("Patient recovers after surgery") == 0
+    assert lexicon_sentiment_scorer.score_text("Company unveils new recorder") == 0
+    assert lexicon_sentiment_scorer.score_text("Shares surge to a record") > 0
+    assert lexicon_sentiment_scorer.score_text("Hisse yükselişte, kazançlar rekorda") > 0
+    assert lexicon_sentiment_scorer.score_text("Şirket zararını açıkladı") < 0
+
+    keywords = LexiconSentimentScorer.from_keywords(["growth", "büyüme"], ["decline", "düşüş"],
+                                                    stem_terms=["büyüme", "düşüş"])
+    assert keywords.score_text("Endeks düşüşte") < 0 and keywords.score_text("büyümeyi sürdürdü") > 0
+    assert keywords.score_text("growths declines") == 0
+    assert LexiconSentimentScorer.from_keywords(["düşüş"], []).score_text("düşüşte") == 0
+
+    try:
+        SentimentScorer()
+        assert False, "soyut skorlayıcı örneklendi"
+    except TypeError:
+        pass
+    print("✅ Stemming is Turkish-only")
+
+
+def test_consistency_with_textblob_and_speed():
+    """Fixture korpusunda TextBlob ile yön uyumu ve doküman/sn karşılaştırması"""
+    print("🧪 Testing consistency with TextBlob...")
+    try:
+        textblob_scorer = get_sentiment_scorer("textblob")
+    except Exception as e:
+        print(f"⚠️ TextBlob unavailable, skipping: {e}")
+        return
+    if textblob_scorer.name != "textblob":
+        print("⚠️ TextBlob unavailable, skipping")
+        return
+
+    corpus = _load_corpus()
+    lexicon = lexicon_sentiment_scorer.score_texts(corpus)
+    reference = textblob_scorer.score_texts(corpus)
+
+    decided = (np.abs(reference) >= 0.1) & (lexicon != 0)
+    agreement = np.mean(np.sign(lexicon[decided]) == np.sign(reference[decided]))
+    correlation = np.corrcoef(lexicon, reference)[0, 1]
+    print(f"   sign agreement: {agreement:.2%} on {decided.sum()} docs, correlation: {correlation:.2f}")
+    assert decided.sum() >= len(corpus) // 2
+    assert agreement >= 0.85
+    assert correlation >= 0.6
+
+    texts = corpus * 50
+    lexicon_rate = benchmark(lexicon_sentiment_scorer, texts)
+    textblob_rate = benchmark(textblob_scorer, texts, repeat=1)
+    print(f"   lexicon: {lexicon_rate:,.0f} docs/s, textblob: {textblob_rate:,.0f} docs/s")
+    assert lexicon_rate > textblob_rate
+    print("✅ Consistent with TextBlob")
+
+
+if __name__ == "__main__":
+    test_batch_matches_single_and_keyword_semantics()
+    test_stemming_only_for_turkish_terms()
+    test_consistency_with_textblob_and_speed()
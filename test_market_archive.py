@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+Test Market Archive - Akışlı bölümlü yazım, row group istatistikleri, sıkıştırma ve soğuk katman okuma
+"""
+
+import sys
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+
+# Add project root to path
+sys.path.append(os.path.dirname(__file__))
+
+from src.storage.market_archive import MarketArchive, serve_from_archive, symbol_bucket
+
+SYMBOLS = {'NASDAQ': [f"N{i:03d}" for i in range(40)], 'CRYPTO': ['BTCUSDT', 'ETHUSDT', 'ADAUSDT']}
+
+
+def _minute_bars(day, minutes=390, seed=0, close_offset=0.0):
+    """Piyasa başına gün içi dakika barları (veritabanı sorgusunun satır düzeninde)"""
+    rng = np.random.default_rng(seed)
+    frames = []
+    for market, symbols in SYMBOLS.items():
+        stamps = pd.date_range(pd.Timestamp(day) + pd.Timedelta(hours=9, minutes=30), periods=minutes, freq='min')
+        for symbol in symbols:
+            close = 100 + np.cumsum(rng.normal(0, 0.1, minutes)) + close_offset
+            frames.append(pd.DataFrame({
+                'timestamp': stamps, 'symbol': symbol, 'market': market,
+                'open': close, 'high': close + 0.05, 'low': close - 0.05, 'close': close,
+                'volume': rng.integers(1, 1000, minutes), 'adjusted_close': close,
+            }))
+    return pd.concat(frames).sort_values(['timestamp', 'symbol']).reset_index(drop=True)
+
+
+def _chunks(frame, size):
+    for start in range(0, len(frame), size):
+        yield frame.iloc[start:start + size]
+
+
+def test_streaming_partitions_and_scan():
+    """Parça parça yazım bölüm yerleşimine düşmeli; sorgu yalnızca ilgili kovayı ve kolonları okumalı"""
+    print("🧪 Testing streaming write and partition-pruned scan...")
+    with tempfile.TemporaryDirectory() as tmp:
+        archive = MarketArchive(tmp, buckets=8, row_group_size=2000)
+        days = ['2025-03-12', '2025-03-13', '2025-03-14']
+        frames = [_minute_bars(day, seed=i) for i, day in enumerate(days)]
+        for frame in frames:
+            assert archive.write_chunks(_chunks(frame, 5000)) == len(frame)
+        everything = pd.concat(frames)
+
+        assert archive.markets() == ['CRYPTO', 'NASDAQ'] and archive.dates('NASDAQ') == days
+        bucket = symbol_bucket('N007', 8)
+        directory = archive.partition_dir('NASDAQ', '2025-03-13', bucket)
+        files = [f for f in os.listdir(directory) if f.endswith('.parquet')]
+        metadata = pq.ParquetFile(os.path.join(directory, files[0])).metadata
+        statistics = metadata.row_group(0).column(1).statistics
+        assert statistics.has_min_max and metadata.num_rows > 0
+        assert not any(name.endswith('.tmp') for _, _, names in os.walk(tmp) for name in names)
+
+        archive.stats['files_scanned'] = 0
+        result = archive.scan(['N007'], start=datetime(2025, 3, 13), end=datetime(2025, 3, 14, 23, 59),
+                              columns=['timestamp', 'close'])
+        expected = everything[(everything['symbol'] == 'N007') & (everything['timestamp'] >= '2025-03-13')]
+        assert list(result.columns) == ['timestamp', 'close'] and len(result) == len(expected)
+        assert np.allclose(result['close'].to_numpy(), expected['close'].to_numpy())
+        # İki gün x bir kova x iki piyasa (kovası boş olan piyasa listelenmez)
+        assert archive.stats['files_scanned'] <= 2 * 2 * 3
+
+        crypto = archive.scan(markets=['CRYPTO'])
+        assert set(crypto['symbol']) == set(SYMBOLS['CRYPTO']) and set(crypto['market']) == {'CRYPTO'}
+        assert len(crypto) == 3 * 3 * 390
+    print("✅ Streaming partitions and pruned scans work")
+
+
+def test_compaction_merges_and_dedupes():
+    """Sıkıştırma bölüm başına tek dosya bırakmalı; tekrar arşivlenen barlarda son yazılan kalmalı"""
+    print("🧪 Testing compaction...")
+    with tempfile.TemporaryDirectory() as tmp:
+        archive = MarketArchive(tmp, buckets=4, row_group_size=1000)
+        first = _minute_bars('2025-03-14', seed=1)
+        archive.write_chunks(_chunks(first, 3000))
+        time.sleep(0.01)
+        rerun = _minute_bars('2025-03-14', seed=1, close_offset=1.0)
+        archive.write_chunks(_chunks(rerun, 7000))
+
+        partitions = archive.partitions()
+        before = sum(len(archive._files(d)) for d in partitions)
+        assert archive.compact() == len(partitions)
+        assert all(len(archive._files(d)) == 1 for d in partitions) and before > len(partitions)
+        assert archive.stats['duplicates_removed'] == len(first)
+
+        result = archive.scan(['BTCUSDT', 'N001'])
+        expected = rerun[rerun['symbol'].isin(['BTCUSDT', 'N001'])].sort_values(['symbol', 'timestamp'])
+        assert len(result) == len(expected)
+        assert np.allclose(result['close'].to_numpy(), expected['close'].to_numpy())
+        assert archive.compact() == 0
+    print(f"✅ Compaction works ({before} files -> {len(partitions)})")
+
+
+def test_cold_tier_serves_loader_misses():
+    """Arşiv periyodu kapsıyorsa cache miss ağa gitmeden arşivden karşılanmalı"""
+    print("🧪 Testing archive as the loader's cold tier...")
+    import resilient_loader_v2
+    # src.storage paketi `market_archive` adıyla global örneği dışa aktarır; modülü sys.modules'ten al
+    market_archive_module = sys.modules['src.storage.market_archive']
+
+    with tempfile.TemporaryDirectory() as tmp:
+        archive = MarketArchive(os.path.join(tmp, 'archive'))
+        today = pd.Timestamp.now().normalize()
+        # Bugünün barları da arşivde: son bardan sonra seans başlamadı, test günden bağımsız
+        days = pd.bdate_range(end=today, periods=15)
+        archive.write_chunks(_minute_bars(day, minutes=60, seed=i) for i, day in enumerate(days))
+
+        daily = serve_from_archive(archive, 'N003', '10d', '1d', max_age=3 * 86400)
+        assert daily is not None and list(daily.columns) == ['Open', 'High', 'Low', 'Close', 'Volume']
+        assert daily.index[-1] == days[-1] and daily.index[0] >= today - pd.Timedelta(days=11)
+        assert len(daily) == len(set(daily.index) & set(days)) >= 6
+        hourly = serve_from_archive(archive, 'N003', '5d', '1h', max_age=3 * 86400)
+        assert hourly is not None and (hourly.index.hour.isin([9, 10])).all()
+        assert serve_from_archive(archive, 'N003', '1y', '1d', max_age=3 * 86400) is None   # kapsamıyor
+        assert serve_from_archive(archive, 'YOK', '10d', '1d', max_age=3 * 86400) is None
+        assert serve_from_archive(archive, 'N003', 'max', '1d', max_age=3 * 86400) is None
+
+        original_archive, original_cache, original_download = (market_archive_module.market_archive,
+                                                                resilient_loader_v2.CACHE_DIR,
+                                                                resilient_loader_v2.yf.download)
+        calls = []
+        market_archive_module.market_archive = archive
+        resilient_loader_v2.CACHE_DIR = tmp
+        resilient_loader_v2.yf.download = lambda *args, **kwargs: calls.append(args) or pd.DataFrame()
+        try:
+            frame = resilient_loader_v2.cached_download('N003', period='10d', interval='1d', ttl=3 * 86400)
+            assert not calls and frame.equals(daily)
+            assert os.path.exists(os.path.join(tmp, f"{resilient_loader_v2.hash_key('N003', '10d', '1d')}.parquet"))
+        finally:
+            market_archive_module.market_archive = original_archive
+            resilient_loader_v2.CACHE_DIR = original_cache
+            resilient_loader_v2.yf.download = original_download
+    print("✅ Cold tier serves cache misses")
+
+
+def test_archive_freshness_follows_sessions():
+    """Tazelik son ham bara göre ölçülmeli; son bardan sonra seans başladıysa arşiv kullanılmamalı"""
+    print("🧪 Testing session-aware archive freshness...")
+    import resilient_loader_v2
+    with tempfile.TemporaryDirectory() as tmp:
+        archive = MarketArchive(os.path.join(tmp, 'archive'))
+        days = pd.bdate_range('2025-02-24', '2025-03-14')           # Cuma 14 Mart'a kadar tamamlanmış günler
+        archive.write_chunks(_minute_bars(day, minutes=60, seed=i) for i, day in enumerate(days))
+
+        saturday = pd.Timestamp('2025-03-15 12:00', tz='UTC')
+        daily = serve_from_archive(archive, 'N003', '10d', '1d', max_age=3600, now=saturday)
+        assert daily is not None and daily.index[-1] == pd.Timestamp('2025-03-14')
+        assert daily.attrs['last_timestamp'] == '2025-03-14T10:29:00'
+        assert daily.attrs['valid_until'] == pd.Timestamp('2025-03-17 13:30', tz='UTC').timestamp()   # 09:30 EDT
+        premarket = pd.Timestamp('2025-03-17 12:00', tz='UTC')
+        assert serve_from_archive(archive, 'N003', '10d', '1d', max_age=3600, now=premarket) is not None
+        opened = pd.Timestamp('2025-03-17 14:00', tz='UTC')
+        assert serve_from_archive(archive, 'N003', '10d', '1d', max_age=172800, now=opened) is None
+        assert serve_from_archive(archive, 'BTCUSDT', '10d', '1d', max_age=172800, now=saturday) is None  # 7/24
+
+        # Cache kopyası sonraki seans açılışında eskir
+        original = resilient_loader_v2.CACHE_DIR, resilient_loader_v2.load_from_archive
+        served = []
+
+        def fake_archive(ticker, period, interval, ttl):
+            served.append(ticker)
+            frame = daily.copy()
+            frame.attrs['valid_until'] = time.time() + (60 if ticker == 'N003' else -1)
+            return frame
+
+        resilient_loader_v2.CACHE_DIR = tmp
+        resilient_loader_v2.load_from_archive = fake_archive
+        try:
+            for ticker in ('N003', 'N003', 'N004', 'N004'):
+                resilient_loader_v2.cached_download(ticker, period='10d', interval='1d', ttl=3600)
+        finally:
+            resilient_loader_v2.CACHE_DIR, resilient_loader_v2.load_from_archive = original
+        assert served == ['N003', 'N004', 'N004']
+    print("✅ Archive freshness follows market sessions")
+
+
+if __name__ == "__main__":
+    test_streaming_partitions_and_scan()
+    test_compaction_merges_and_dedupes()
+    test_cold_tier_serves_loader_misses()
+    test_archive_freshness_follows_sessions()
@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+"""
+Test Market Data Ingest - Bağlantı havuzu, COPY + tek merge ile toplu upsert, tamponlu flush ve Redis pipeline
+
+Sahte havuz/bağlantı/Redis ile çalışır; TEST_DATABASE_URL tanımlıysa gerçek PostgreSQL üzerinde de doğrular.
+"""
+
+import sys
+import os
+import asyncio
+import csv
+import io
+import tempfile
+from datetime import datetime, timedelta
+
+import pytest
+
+# Add project root and docker services to path
+sys.path.append(os.path.dirname(__file__))
+sys.path.append(os.path.join(os.path.dirname(__file__), 'docker'))
+
+try:
+    import market_data_collector as mdc
+except ImportError as e:
+    mdc = None
+    IMPORT_ERROR = e
+
+pytestmark = pytest.mark.skipif(mdc is None, reason="market_data_collector import edilemedi (psycopg2/redis/aiohttp gerekli)")
+
+
+class FakeCursor:
+    def __init__(self, connection, name=None, **kwargs):
+        self.connection = connection
+        self.name = name
+        self.itersize = 2000
+        if name:
+            connection.named_cursors.append(name)
+
+    def execute(self, sql, params=None):
+        if self.connection.fail:
+            raise RuntimeError("bağlantı hatası")
+        self.connection.statements.append(' '.join(sql.split()))
+
+    def copy_expert(self, sql, buffer):
+        self.connection.statements.append(' '.join(sql.split()))
+        self.connection.copied.extend(csv.reader(io.StringIO(buffer.read())))
+
+    def fetchall(self):
+        return [{'symbol': 'AAPL', 'market': 'NASDAQ'}, {'symbol': 'BTCUSDT', 'market': 'CRYPTO'}]
+
+    def fetchmany(self, size):
+        self.connection.fetch_sizes.append(size)
+        rows, self.connection.rows = self.connection.rows[:size], self.connection.rows[size:]
+        return rows
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class FakeConnection:
+    def __init__(self):
+        self.statements, self.copied = [], []
+        self.rows, self.named_cursors, self.fetch_sizes = [], [], []
+        self.commits = self.rollbacks = 0
+        self.closed = 0
+        self.fail = False
+
+    def cursor(self, **kwargs):
+        return FakeCursor(self, **kwargs)
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        self.rollbacks += 1
+
+
+class FakePool:
+    """psycopg2.pool.ThreadedConnectionPool arayüzü"""
+
+    def __init__(self):
+        self.connection = FakeConnection()
+        self.borrowed = self.returned = 0
+        self.closed = False
+
+    def getconn(self):
+        self.borrowed += 1
+        return self.connection
+
+    def putconn(self, conn, close=False):
+        self.returned += 1
+
+    def closeall(self):
+        self.closed = True
+
+
+class FakeRedis:
+    def __init__(self):
+        self.data, self.lists, self.round_trips = {}, {}, 0
+
+    def pipeline(self, transaction=True):
+        redis, commands = self, []
+
+        class Pipeline:
+            def setex(self, key, ttl, value):
+                commands.append((key, value))
+
+            def execute(self):
+                redis.round_trips += 1
+                redis.data.update(commands)
+
+        return Pipeline()
+
+    def setex(self, key, ttl, value):
+        self.round_trips += 1
+        self.data[key] = value
+
+    def lpush(self, key, *values):
+        self.round_trips += 1
+        self.lists.setdefault(key, [])[:0] = reversed(values)
+
+
+def _points(count, start=datetime(2025, 3, 14, 10, 0), symbols=('AAPL', 'MSFT', 'BTCUSDT')):
+    return [mdc.MarketDataPoint(
+        timestamp=start + timedelta(minutes=i // len(symbols)), symbol=symbols[i % len(symbols)],
+        market='CRYPTO' if symbols[i % len(symbols)].endswith('USDT') else 'NASDAQ',
+        open=100.0 + i, high=101.0 + i, low=99.0 + i, close=100.5 + i, volume=1000 + i,
+        adjusted_close=None if i % 2 else 100.5 + i) for i in range(count)]
+
+
+def test_bulk_upsert_with_pool():
+    """Tek bağlantı ödünç alınmalı, batch başına bir COPY ve bir merge, tekrar eden anahtarlar birleşmeli"""
+    print("🧪 Testing COPY + merge through the pool...")
+    pool = FakePool()
+    manager = mdc.DatabaseManager("postgresql://fake", pool=pool, batch_size=400)
+    points = _points(900)
+    duplicate = _points(1)[0]
+    duplicate.close = 999.0
+
+    assert manager.save_market_data(points + [duplicate]) == 900
+    connection = pool.connection
+    copies = [s for s in connection.statements if s.startswith('COPY')]
+    merges = [s for s in connection.statements if s.startswith('INSERT INTO market_data')]
+    assert len(copies) == len(merges) == 3 and len([s for s in connection.statements if s.startswith('TRUNCATE')]) == 2
+    assert 'ON CONFLICT (timestamp, symbol) DO UPDATE' in merges[0] and 'ON COMMIT DELETE ROWS' in connection.statements[0]
+    assert len(connection.copied) == 900 and connection.copied[0][4:7] == ['101.0', '99.0', '999.0']
+    assert connection.copied[1][-1] == ''   # None -> NULL
+    assert pool.borrowed == pool.returned == 1 and connection.commits == 1
+
+    # Polygon Agg.volume float gelir; BIGINT kolonu için COPY'de tamsayı yazılmalı
+    polygon_point = _points(1, start=datetime(2025, 3, 15, 10, 0))[0]
+    polygon_point.volume = 53210.0
+    connection.copied.clear()
+    manager.save_market_data([polygon_point])
+    assert connection.copied[0][7] == '53210'
+
+    assert manager.get_symbols_for_analysis() == {'NASDAQ': ['AAPL'], 'CRYPTO': ['BTCUSDT']}
+    assert pool.borrowed == pool.returned == 3
+    print("✅ Bulk upsert works")
+
+
+def test_buffered_flush_and_retry():
+    """Eşik/süre dolunca flush; hata durumunda satırlar tamponda kalmalı ve bağlantı geri alınmalı"""
+    print("🧪 Testing buffered flush and retry...")
+    pool = FakePool()
+    manager = mdc.DatabaseManager("postgresql://fake", pool=pool, flush_rows=100, flush_interval=3600,
+                                  max_pending=250)
+    manager.add(_points(60))
+    assert not manager.flush_due() and manager.flush_if_due() == 0
+    manager.add(_points(60))   # ilk 60 satır aynı anahtarlar
+    assert manager.pending_count == 60 and manager.stats['duplicates_merged'] == 60
+    manager.add(_points(60, start=datetime(2025, 3, 15)))
+    assert manager.flush_due()
+
+    pool.connection.fail = True
+    assert manager.flush() == 0 and manager.pending_count == 120
+    assert pool.connection.rollbacks == 1 and manager.stats['flush_errors'] == 1
+    pool.connection.fail = False
+    assert manager.flush() == 120 and manager.pending_count == 0
+
+    manager.add(_points(300, start=datetime(2025, 3, 16)))
+    assert manager.pending_count == 250 and manager.stats['rows_dropped'] == 50
+    manager.close()
+    assert manager.pending_count == 0 and pool.closed
+    print("✅ Buffered flush works")
+
+
+def test_collector_pipelines_redis():
+    """Toplama döngüsü: sembol başına son bar tek pipeline ile, analiz kuyruğu tek LPUSH ile"""
+    print("🧪 Testing pipelined Redis writes...")
+    points = _points(90)
+
+    class Provider:
+        async def get_realtime_data(self, symbols):
+            return points
+
+    os.environ['MARKET_ARCHIVE_PATH'] = tempfile.mkdtemp()
+    collector = mdc.RealTimeDataCollector()
+    collector.polygon_provider, collector.binance_provider = Provider(), None
+    collector.db_manager = mdc.DatabaseManager("postgresql://fake", pool=FakePool(), flush_interval=0)
+    collector.redis_client = FakeRedis()
+    collector._providers_seeded = True
+
+    asyncio.run(collector.collect_market_data())
+    assert collector.redis_client.round_trips == 1 and len(collector.redis_client.data) == 3
+    assert '"close": 189.5' in collector.redis_client.data['latest_data:BTCUSDT']
+    assert collector.db_manager.stats['rows_written'] == 90
+
+    asyncio.run(collector.trigger_analysis())
+    assert collector.redis_client.round_trips == 2 and len(collector.redis_client.lists['analysis_queue']) == 2
+    print("✅ Redis writes are pipelined")
+
+
+def test_archiver_streams_day():
+    """Arşivleyici günü adlandırılmış imleçten parça parça okuyup bölümlü arşive yazmalı"""
+    print("🧪 Testing streaming Parquet archiver...")
+    pool = FakePool()
+    manager = mdc.DatabaseManager("postgresql://test", pool=pool)
+    points = _points(2500, start=datetime(2025, 3, 14, 0, 0))
+    pool.connection.rows = [tuple(getattr(point, column) for column in mdc.MARKET_DATA_COLUMNS)
+                            for point in points]
+    with tempfile.TemporaryDirectory() as tmp:
+        archiver = mdc.ParquetArchiver(tmp, db_manager=manager, chunk_rows=1000)
+        assert archiver.archive_daily_data(datetime(2025, 3, 14)) == 2500
+        assert pool.connection.named_cursors == ['archive_20250314']
+        assert pool.connection.fetch_sizes == [1000, 1000, 1000, 1000]
+        assert archiver.archive.markets() == ['CRYPTO', 'NASDAQ']
+        assert all(len(archiver.archive._files(d)) == 1 for d in archiver.archive.partitions())
+        assert len(archiver.archive.scan(['AAPL'])) == len([p for p in points if p.symbol == 'AAPL'])
+    print("✅ Archiver streams the day in chunks")
+
+
+def test_real_postgres():
+    """TEST_DATABASE_URL ile gerçek PostgreSQL üzerinde upsert"""
+    db_url = os.getenv('TEST_DATABASE_URL')
+    if not db_url:
+        print("⚠️ TEST_DATABASE_URL tanımlı değil, gerçek PostgreSQL testi atlandı")
+        return
+    print("🧪 Testing against PostgreSQL...")
+    manager = mdc.DatabaseManager(db_url, table='market_data_ingest_test')
+    with manager.connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("""
+                DROP TABLE IF EXISTS market_data_ingest_test;
+                CREATE TABLE market_data_ingest_test (
+                    timestamp TIMESTAMP NOT NULL, symbol TEXT NOT NULL, market TEXT,
+                    open DOUBLE PRECISION, high DOUBLE PRECISION, low DOUBLE PRECISION,
+                    close DOUBLE PRECISION, volume BIGINT, adjusted_close DOUBLE PRECISION,
+                    PRIMARY KEY (timestamp, symbol))
+            """)
+    try:
+        points = _points(1000)
+        assert manager.save_market_data(points) == 1000
+        for point in points[:10]:
+            point.close = -1.0
+        assert manager.save_market_data(points[:10]) == 10
+        with manager.connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("SELECT COUNT(*), SUM(CASE WHEN close = -1 THEN 1 ELSE 0 END) FROM market_data_ingest_test")
+                assert cur.fetchone() == (1000, 10)
+    finally:
+        with manager.connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("DROP TABLE IF EXISTS market_data_ingest_test")
+        manager.close()
+    print("✅ PostgreSQL upsert works")
+
+
+if __name__ == "__main__":
+    if mdc is None:
+        print(f"❌ market_data_collector import hatası (psycopg2/redis/aiohttp gerekli): {IMPORT_ERROR}")
+        sys.exit(0)
+    test_bulk_upsert_with_pool()
+    test_buffered_flush_and_retry()
+    test_collector_pipelines_redis()
+    test_archiver_streams_day()
+    test_real_postgres()
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Test Portfolio Optimizer - Ledoit-Wolf kovaryans, toplu etkin sınır ve RiskManager entegrasyonu
+"""
+
+import sys
+import os
+
+import numpy as np
+import pandas as pd
+from scipy.optimize import minimize
+
+# Add project root to path
+sys.path.append(os.path.dirname(__file__))
+
+from src.risk.portfolio_optimizer import PortfolioOptimizer, ReturnPanel, ledoit_wolf_shrinkage
+
+
+def _returns(n_assets, days, seed=5):
+    rng = np.random.default_rng(seed)
+    factors = rng.normal(0, 0.01, (days, 2))
+    loadings = rng.normal(1, 0.4, (n_assets, 2))
+    return factors @ loadings.T + rng.normal(0, 0.015, (days, n_assets))
+
+
+def test_ledoit_wolf_shrinkage():
+    """Küçültülmüş kovaryans simetrik, pozitif tanımlı olmalı ve izi korumalı"""
+    print("🧪 Testing Ledoit-Wolf shrinkage...")
+    returns = _returns(80, 60)   # N > T: örnek kovaryans tekil
+    cov, shrinkage = ledoit_wolf_shrinkage(returns)
+    sample = np.cov(returns, rowvar=False, bias=True)
+    assert 0 < shrinkage <= 1
+    assert np.allclose(cov, cov.T)
+    assert np.linalg.eigvalsh(cov).min() > 0
+    assert np.isclose(np.trace(cov), np.trace(sample))
+    assert np.allclose(cov - np.diag(np.diag(cov)), (1 - shrinkage) * (sample - np.diag(np.diag(sample))))
+    print(f"✅ Shrinkage {shrinkage:.3f}, covariance positive definite")
+
+
+def test_box_frontier_matches_slsqp():
+    """Toplu ADMM sınırı, nokta başına SLSQP ile aynı varyansları bulmalı"""
+    print("🧪 Testing batched frontier against SLSQP...")
+    optimizer = PortfolioOptimizer()
+    panel = ReturnPanel(list("ABCDEFGHIJKLMNOPQRST"), pd.bdate_range("2024-01-01", periods=250),
+                        _returns(20, 250))
+    cov, _ = optimizer.covariance(panel)
+    mu = np.random.default_rng(1).uniform(0.0, 0.25, 20)
+    frontier = optimizer.efficient_frontier(mu, cov, points=8, bounds=(0, 0.2))
+
+    weights = frontier['weights']
+    assert np.allclose(weights.sum(axis=1), 1)
+    assert weights.min() > -1e-4 and weights.max() < 0.2 + 1e-4
+    assert np.allclose(frontier['returns'][1:], frontier['targets'][1:], atol=1e-3)
+    assert np.all(np.diff(frontier['volatilities']) > -1e-4)
+
+    for target, volatility in zip(frontier['targets'], frontier['volatilities']):
+        constraints = [{'type': 'eq', 'fun': lambda w: w.sum() - 1}]
+        if target != frontier['targets'][0]:
+            constraints.append({'type': 'eq', 'fun': lambda w, t=target: w @ mu - t})
+        reference = minimize(lambda w: w @ cov @ w, np.full(20, 0.05), method='SLSQP',
+                             bounds=[(0, 0.2)] * 20, constraints=constraints)
+        assert abs(np.sqrt(reference.fun) - volatility) < 1e-3, (volatility, np.sqrt(reference.fun))
+    print(f"✅ Frontier matches SLSQP ({frontier['iterations']} ADMM iterations)")
+
+
+def test_closed_form_and_caches():
+    """Kutu kısıtsız sınır kapalı formda; ikinci çağrı kovaryans/faktör/sıcak başlangıç önbelleğini kullanmalı"""
+    print("🧪 Testing closed form frontier and caches...")
+    optimizer = PortfolioOptimizer()
+    panel = ReturnPanel([f"S{i}" for i in range(30)], pd.bdate_range("2024-01-01", periods=200),
+                        _returns(30, 200, seed=9))
+    cov, _ = optimizer.covariance(panel)
+    mu = np.linspace(0.02, 0.2, 30)
+
+    closed = optimizer.efficient_frontier(mu, cov, points=5, bounds=None)
+    inverse = np.linalg.inv(cov)
+    min_var = inverse.sum(axis=1) / inverse.sum()
+    assert np.allclose(closed['weights'][0], min_var)
+    assert np.allclose(closed['returns'], closed['targets'])
+
+    first = optimizer.efficient_frontier(mu, cov, points=10, bounds=(0, 0.15))
+    factor_hits = optimizer.stats['factor_hits']
+    cov, _ = optimizer.covariance(panel)
+    second = optimizer.efficient_frontier(mu, cov, points=10, bounds=(0, 0.15))
+    assert optimizer.stats['covariance_hits'] == 1
+    assert optimizer.stats['factor_hits'] > factor_hits
+    assert second['iterations'] < first['iterations']
+    assert np.allclose(first['volatilities'], second['volatilities'], atol=1e-4)
+    print(f"✅ Warm start: {first['iterations']} -> {second['iterations']} iterations")
+
+
+def test_risk_manager_uses_history():
+    """RiskManager tarih hizalı getirilerden Ledoit-Wolf kovaryansıyla optimize etmeli"""
+    print("🧪 Testing RiskManager integration...")
+    from src.risk.risk_manager import RiskManager
+
+    manager = RiskManager()
+    symbols = ["THYAO", "ASELS", "GARAN", "AKBNK"]
+    for symbol, price in zip(symbols, [250, 45, 90, 55]):
+        manager.add_portfolio_position(symbol, 100, price, price)
+    index = pd.bdate_range("2024-01-01", periods=120)
+    returns = _returns(4, 120, seed=2)
+    # Bir sembolün ilk günleri eksik: tarih hizalama ortak günleri kullanmalı
+    returns_data = {symbol: pd.Series(returns[:, i], index=index) for i, symbol in enumerate(symbols)}
+    returns_data["AKBNK"] = returns_data["AKBNK"].iloc[10:]
+
+    result = manager.optimize_portfolio_weights({s: r for s, r in zip(symbols, [0.3, 0.1, 0.15, 0.2])},
+                                                risk_tolerance=0.4, returns_data=returns_data)
+    assert 'error' not in result, result
+    assert result['covariance_source'] == 'ledoit_wolf'
+    assert abs(sum(result['optimal_weights'].values()) - 1) < 1e-6
+    assert max(result['optimal_weights'].values()) <= 0.3 + 1e-4
+    assert result['optimal_volatility'] <= 0.4 + 1e-6 or result['optimal_volatility'] == min(
+        result['efficient_frontier']['volatilities'])
+
+    risk = manager.calculate_portfolio_risk(returns_data)
+    assert risk['volatility'] > 0 and len(risk['covariance_matrix']) == 4
+    print(f"✅ Optimal return {result['optimal_return']:.3f}, volatility {result['optimal_volatility']:.3f}")
+
+
+if __name__ == "__main__":
+    test_ledoit_wolf_shrinkage()
+    test_box_frontier_matches_slsqp()
+    test_closed_form_and_caches()
+    test_risk_manager_uses_history()
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Test Scan Journal - Sembol bazında tamamlanma kaydı, kesintiden devam ve değişmemiş barların atlanması
+"""
+
+import sys
+import os
+import tempfile
+import threading
+
+import numpy as np
+import pandas as pd
+
+# Add project root to path
+sys.path.append(os.path.dirname(__file__))
+
+from src.core.scan_journal import ScanJournal, bars_fingerprint
+
+
+def _bars(days=60, last_close=None):
+    index = pd.bdate_range(end='2025-03-14', periods=days)
+    close = np.linspace(100, 110, days)
+    if last_close is not None:
+        close[-1] = last_close
+    return pd.DataFrame({'Open': close, 'High': close + 1, 'Low': close - 1, 'Close': close,
+                         'Volume': np.full(days, 1000.0)}, index=index)
+
+
+def test_fingerprint_tracks_bar_changes():
+    """Aynı barlar aynı parmak izini, yeni bar veya revize edilen son bar farklı parmak izini üretmeli"""
+    print("🧪 Testing bar fingerprints...")
+    data_ts, fingerprint = bars_fingerprint(_bars())
+    assert data_ts.startswith('2025-03-14') and fingerprint == bars_fingerprint(_bars())[1]
+    assert bars_fingerprint(_bars(days=61))[1] != fingerprint
+    assert bars_fingerprint(_bars(last_close=111.5))[1] != fingerprint
+    assert bars_fingerprint(None) == (None, None) and bars_fingerprint(pd.DataFrame()) == (None, None)
+    print("✅ Fingerprints work")
+
+
+def test_resume_after_interruption():
+    """Kapatılmadan kesilen tarama yeni süreçte aynı kimlikle sürmeli; tamamlanan semboller dönmeli"""
+    print("🧪 Testing resume after interruption...")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'journal.db')
+        journal = ScanJournal(path)
+        scan_id = journal.begin_scan(total=3)
+        _, fingerprint = bars_fingerprint(_bars())
+        journal.record(scan_id, 'NASDAQ', 'AAPL', '2025-03-14', fingerprint, {'symbol': 'AAPL', 'score': 72.0})
+        journal.record(scan_id, 'NASDAQ', 'BAD', None, None, None)
+        journal.close()                                     # süreç düştü, finish_scan çağrılmadı
+
+        journal = ScanJournal(path)
+        assert journal.begin_scan(total=3) == scan_id
+        assert journal.completed(scan_id, 'NASDAQ') == {'AAPL': {'symbol': 'AAPL', 'score': 72.0}, 'BAD': None}
+        assert journal.completed(scan_id, 'BIST') == {}
+        journal.finish_scan(scan_id)
+        next_scan = journal.begin_scan(total=3)
+        assert next_scan != scan_id and journal.completed(next_scan, 'NASDAQ') == {}
+        assert journal.last_result('NASDAQ', 'AAPL')['score'] == 72.0
+
+        # Pencereden eski yarım tarama devam ettirilmez
+        stale = ScanJournal(path, resume_window=0)
+        assert stale.begin_scan() != next_scan
+        assert journal.get_stats()['running_scans'] == 2
+    print("✅ Resume works")
+
+
+def test_unchanged_bars_are_reused():
+    """Parmak izi aynıysa son sonuç dönmeli; barlar değişince veya sonuç çok eskiyse None"""
+    print("🧪 Testing unchanged-bar skip...")
+    with tempfile.TemporaryDirectory() as tmp:
+        journal = ScanJournal(os.path.join(tmp, 'journal.db'))
+        scan_id = journal.begin_scan()
+        data_ts, fingerprint = bars_fingerprint(_bars())
+        journal.record(scan_id, 'BIST', 'THYAO.IS', data_ts, fingerprint, {'symbol': 'THYAO.IS', 'score': 81.0})
+
+        assert journal.reusable('BIST', 'THYAO.IS', fingerprint) == {'symbol': 'THYAO.IS', 'score': 81.0}
+        assert journal.reusable('BIST', 'THYAO.IS', bars_fingerprint(_bars(days=61))[1]) is None
+        assert journal.reusable('XETRA', 'THYAO.IS', fingerprint) is None
+        assert journal.reusable('BIST', 'THYAO.IS', None) is None
+        assert journal.reusable('BIST', 'THYAO.IS', fingerprint, max_age=1e-9) is None
+
+        # Yeniden kullanılan sonuç kaydedilirken son skorlama zamanı değişmez
+        scored_at = journal.last_result('BIST', 'THYAO.IS')['scored_at']
+        journal.record(scan_id, 'BIST', 'THYAO.IS', data_ts, fingerprint, {'symbol': 'THYAO.IS', 'score': 81.0},
+                       rescored=False)
+        assert journal.last_result('BIST', 'THYAO.IS')['scored_at'] == scored_at
+    print("✅ Unchanged bars are reused")
+
+
+def test_analyze_batch_resumes_and_skips():
+    """analyze_batch: ilk tarama hepsini analiz eder; kesintide kalanlar, sonraki döngüde yalnız değişenler"""
+    print("🧪 Testing journaled analyze_batch...")
+    import telegram_full_trader_with_sentiment as trader
+    import src.core.scan_journal as scan_journal_module
+
+    symbols = [f"S{i:02d}" for i in range(30)]
+    bars = {symbol: _bars() for symbol in symbols}
+    analyzed = []
+    lock = threading.Lock()
+    crash_after = {'count': None}
+
+    def fake_analyze(symbol, df=None):
+        with lock:
+            if crash_after['count'] is not None and len(analyzed) >= crash_after['count']:
+                raise KeyboardInterrupt     # süreç kesintisi
+            analyzed.append(symbol)
+        assert df is not None, "barlar tekrar indirilmemeli"
+        return {'symbol': symbol, 'score': 70.0 if symbol.endswith('0') else 50.0, 'trade_setup': None}
+
+    originals = (trader.cached_download, trader.analyze_symbol_fast, trader.prefetch_sentiment,
+                 trader.MAX_WORKERS, scan_journal_module._scan_journal)
+    with tempfile.TemporaryDirectory() as tmp:
+        trader.cached_download = lambda symbol, **kwargs: bars[symbol]
+        trader.analyze_symbol_fast = fake_analyze
+        trader.prefetch_sentiment = lambda *args: None
+        trader.MAX_WORKERS = 1
+        scan_journal_module._scan_journal = ScanJournal(os.path.join(tmp, 'journal.db'))
+        journal = scan_journal_module._scan_journal
+        try:
+            # 1) Kesilen tarama: 12 sembolden sonra süreç düşer
+            crash_after['count'] = 12
+            scan_id = journal.begin_scan(len(symbols))
+            try:
+                trader.analyze_batch(symbols, 'NASDAQ', scan_id)
+            except KeyboardInterrupt:
+                pass
+            assert len(analyzed) == 12 and len(journal.completed(scan_id, 'NASDAQ')) == 12
+
+            # 2) Devam: yalnızca kalan 18 sembol analiz edilir, sonuçlar tam döner
+            crash_after['count'] = None
+            analyzed.clear()
+            assert journal.begin_scan(len(symbols)) == scan_id
+            results, strong = trader.analyze_batch(symbols, 'NASDAQ', scan_id)
+            assert len(analyzed) == 18 and not set(analyzed) & set(symbols[:12])
+            assert sorted(r['symbol'] for r in results) == symbols and len(strong) == 3
+            journal.finish_scan(scan_id)
+
+            # 3) Sonraki döngü: yalnızca barı değişen 2 sembol yeniden skorlanır
+            analyzed.clear()
+            bars['S05'] = _bars(days=61)
+            bars['S17'] = _bars(last_close=120.0)
+            scan_id = journal.begin_scan(len(symbols))
+            results, strong = trader.analyze_batch(symbols, 'NASDAQ', scan_id)
+            assert sorted(analyzed) == ['S05', 'S17'] and len(results) == 30 and len(strong) == 3
+            assert all(r['market'] == 'NASDAQ' for r in results)
+            journal.finish_scan(scan_id)
+        finally:
+            (trader.cached_download, trader.analyze_symbol_fast, trader.prefetch_sentiment,
+             trader.MAX_WORKERS, scan_journal_module._scan_journal) = originals
+            journal.close()
+    print("✅ analyze_batch resumes and skips unchanged symbols")
+
+
+if __name__ == "__main__":
+    test_fingerprint_tracks_bar_changes()
+    test_resume_after_interruption()
+    test_unchanged_bars_are_reused()
+    test_analyze_batch_resumes_and_skips()
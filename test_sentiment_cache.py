@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+Test Sentiment Cache - TTL kaynak cache'i, içerik-hash polarite cache'i ve pazar çapında prefetch
+"""
+
+import sys
+import os
+import asyncio
+import time
+
+# Add project root to path
+sys.path.append(os.path.dirname(__file__))
+
+from enhanced_sentiment_analyzer import EnhancedSentimentAnalyzer, RequestPacer, build_news_queries
+
+ARTICLES = [
+    {"title": "AAPL shares surge on strong earnings", "description": "great quarter"},
+    {"title": "MSFT stock falls after weak guidance", "description": "bad outlook"},
+    {"title": "AAPL and MSFT lead market rally", "description": None},
+    {"title": "AAPL shares surge on strong earnings", "description": "great quarter"},
+]
+
+
+def _analyzer():
+    analyzer = EnhancedSentimentAnalyzer()
+    analyzer.news_api_key = "test"
+    analyzer.news_enabled = True
+    analyzer.reddit_enabled = False
+    analyzer.requests = []
+    analyzer.scored_texts = []
+
+    async def fake_fetch(session, query, days_back=7, page_size=50):
+        analyzer.requests.append(query)
+        return ARTICLES
+
+    def counting_scorer(texts):
+        analyzer.scored_texts.extend(texts)
+        return [0.5 if "surge" in t or "rally" in t else -0.5 for t in texts]
+
+    analyzer._fetch_news_articles = fake_fetch
+    analyzer.polarity_scorer = counting_scorer
+    return analyzer
+
+
+def test_prefetch_uses_one_query_and_scores_each_headline_once():
+    """Bir pazar tek sorgu ile dolmalı, tekrar eden başlık bir kez skorlanmalı"""
+    print("🧪 Testing market-wide sentiment prefetch...")
+    analyzer = _analyzer()
+    scores = analyzer.prefetch_symbols(["AAPL", "MSFT", "NVDA"])
+
+    assert len(analyzer.requests) == 1
+    assert len(analyzer.scored_texts) == 3
+    assert analyzer.get_news_sentiment("AAPL")["count"] == 3
+    assert analyzer.get_news_sentiment("NVDA")["source"] == "news_no_articles"
+    assert scores["AAPL"] > 50 and scores["NVDA"] == 50.0
+
+    # İkinci çağrı tamamen cache'ten gelmeli
+    analyzer.get_symbol_sentiment("MSFT")
+    analyzer.prefetch_symbols(["AAPL", "MSFT"])
+    assert len(analyzer.requests) == 1
+    assert len(analyzer.scored_texts) == 3
+    print("✅ Prefetch and caches work")
+
+
+def test_ttl_expiry_and_query_chunking():
+    """Süresi dolan kayıt yeniden çekilmeli, uzun sembol listesi sorgulara bölünmeli"""
+    print("🧪 Testing TTL expiry and query chunking...")
+    analyzer = _analyzer()
+    analyzer.cache.ttl = 0
+    analyzer.prefetch_symbols(["AAPL"])
+    analyzer.prefetch_symbols(["AAPL"])
+    assert len(analyzer.requests) == 2
+    assert len(analyzer.scored_texts) == 3
+
+    symbols = [f"SYM{i:04d}" for i in range(200)]
+    queries = build_news_queries(symbols)
+    assert all(len(query) <= 500 for _, query in queries)
+    assert sum(len(chunk) for chunk, _ in queries) == 200
+    print("✅ TTL and chunking work")
+
+
+def test_truncated_group_query_misses_are_requeried():
+    """Dolu sayfa dönen grup sorgusunda eşleşmeyen sembol nötr cache'lenmemeli, tek başına sorgulanmalı"""
+    print("🧪 Testing truncated grouped news query...")
+    analyzer = _analyzer()
+    full_page = [{"title": f"AAPL shares surge #{i}", "description": None} for i in range(100)]
+    nvda = [{"title": "NVDA stock rally", "description": None}]
+
+    async def fake_fetch(session, query, days_back=7, page_size=50):
+        analyzer.requests.append(query)
+        return full_page if query.startswith("(") else nvda
+
+    analyzer._fetch_news_articles = fake_fetch
+    scores = analyzer.prefetch_symbols(["AAPL", "NVDA"])
+    assert len(analyzer.requests) == 2 and analyzer.requests[1].startswith('"NVDA"')
+    assert analyzer.get_news_sentiment("NVDA")["source"] == "news_api"
+    assert analyzer.get_news_sentiment("NVDA")["count"] == 1 and scores["NVDA"] > 50
+    assert analyzer.get_news_sentiment("AAPL")["count"] == 100
+    print("✅ Truncated query misses are re-queried")
+
+
+def test_reddit_failures_are_not_cached():
+    """Başarısız (ör. 429) subreddit araması 'reddit_error' dönmeli ve cache'lenmemeli"""
+    print("🧪 Testing reddit failure handling...")
+    analyzer = _analyzer()
+    analyzer.reddit_enabled = True
+    analyzer._ensure_reddit_token = lambda: True
+    failing = {"investing"}
+
+    async def fake_subreddit(session, subreddit, symbol, semaphore):
+        if subreddit in failing:
+            return None
+        return [{"data": {"title": f"{symbol} shares surge", "selftext": ""}}]
+
+    analyzer._fetch_subreddit = fake_subreddit
+    analyzer.prefetch_symbols(["AAPL"], include_reddit=True)
+    assert analyzer.cache.get(("AAPL", "reddit")) is None
+    assert analyzer.get_reddit_sentiment("AAPL")["source"] == "reddit_error"
+
+    failing.clear()
+    assert analyzer.get_reddit_sentiment("AAPL")["source"] == "reddit"
+    assert analyzer.cache.get(("AAPL", "reddit"))["count"] == 5
+    print("✅ Reddit failures are not cached")
+
+
+class FakeRedditResponse:
+    def __init__(self, status, headers=None):
+        self.status = status
+        self.headers = headers or {}
+
+    async def json(self):
+        return {"data": {"children": [{"data": {"title": "AAPL shares surge", "selftext": ""}}]}}
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+class FakeRedditSession:
+    """İlk istek 429 + Retry-After döner, sonrakiler 200"""
+
+    def __init__(self, retry_after="0.3"):
+        self.calls = []
+        self.retry_after = retry_after
+
+    def get(self, url, headers=None, params=None):
+        self.calls.append(time.monotonic())
+        if len(self.calls) == 1:
+            return FakeRedditResponse(429, {"Retry-After": self.retry_after})
+        return FakeRedditResponse(200)
+
+
+def test_reddit_requests_are_paced_and_back_off():
+    """Reddit istekleri sabit aralıkla gönderilmeli; 429'da Retry-After kadar beklenip yeniden denenmeli"""
+    print("🧪 Testing reddit pacing and back-off...")
+    analyzer = _analyzer()
+    analyzer.reddit_pacer = RequestPacer(0.05)
+    session = FakeRedditSession()
+
+    async def scenario():
+        semaphore = asyncio.Semaphore(8)
+        return await asyncio.gather(*(analyzer._fetch_subreddit(session, "stocks", symbol, semaphore)
+                                      for symbol in ("AAPL", "MSFT", "NVDA", "AMD")))
+
+    batches = asyncio.run(scenario())
+    assert all(batch and len(batch) == 1 for batch in batches)
+    assert len(session.calls) == 5                      # 429 alan istek bir kez yeniden denendi
+    gaps = [b - a for a, b in zip(session.calls, session.calls[1:])]
+    assert gaps[0] >= 0.25                              # Retry-After sonrasına itildi
+    assert all(gap >= 0.04 for gap in gaps)             # istekler arası en az aralık
+    assert analyzer.get_cache_stats()["reddit_wait_seconds"] > 0
+
+    # Yeniden denemede de 429 gelirse başarısızlık None döner (cache'lenmez)
+    always_limited = FakeRedditSession(retry_after="0")
+    always_limited.get = lambda url, headers=None, params=None: FakeRedditResponse(429, {"Retry-After": "0"})
+    assert asyncio.run(analyzer._fetch_subreddit(always_limited, "stocks", "AAPL", asyncio.Semaphore(1))) is None
+    print("✅ Reddit requests are paced")
+
+
+if __name__ == "__main__":
+    test_prefetch_uses_one_query_and_scores_each_headline_once()
+    test_ttl_expiry_and_query_chunking()
+    test_truncated_group_query_misses_are_requeried()
+    test_reddit_failures_are_not_cached()
+    test_reddit_requests_are_paced_and_back_off()
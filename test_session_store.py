@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Test Session Store - Zamanlama çarkı, kayan pencere rate-limit, snapshot kurtarma ve disksiz doğrulama
+"""
+
+import sys
+import os
+import builtins
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+# Add project root to path
+sys.path.append(os.path.dirname(__file__))
+
+from src.security.session_store import SessionStore, TimingWheel
+
+
+class FakeClock:
+    def __init__(self, now):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def _session(user_id, clock, seconds):
+    expires = datetime.fromtimestamp(clock.now) + timedelta(seconds=seconds)
+    return {'user_id': user_id, 'device_id': 'cihaz', 'expires_at': expires.isoformat()}
+
+
+def test_timing_wheel_expiry():
+    """Girdiler tam bitiş tikinde düşmeli; çok turlu ve uzun atlamalı ilerleme doğru olmalı"""
+    print("🧪 Testing hashed timing wheel...")
+    wheel = TimingWheel(tick_seconds=1.0, slots=8, now=1000)
+    wheel.schedule('a', 1003)
+    wheel.schedule('b', 1020)   # iki tur sonra aynı yuva ailesi
+    wheel.schedule('c', 1005)
+    wheel.cancel('c')
+    assert wheel.advance(1002) == []
+    assert wheel.advance(1003) == ['a']
+    assert wheel.advance(1019) == []
+    assert wheel.advance(5000) == ['b']
+    assert len(wheel) == 0
+    print("✅ Timing wheel works")
+
+
+def test_sessions_expire_and_rate_limit_slides():
+    """Oturumlar süresinde düşmeli, indeks güncel kalmalı; rate-limit pencereyle kaymalı"""
+    print("🧪 Testing session expiry and sliding window...")
+    clock = FakeClock(1_700_000_000.0)
+    store = SessionStore(snapshot_path=None, clock=clock)
+    sessions = store.namespace('user_sessions', indexes=('user_id',))
+    sessions['kisa'] = _session('u1', clock, 10)
+    sessions['uzun'] = _session('u1', clock, 3600)
+    assert sessions.find_keys('user_id', 'u1') == ['kisa', 'uzun']
+
+    clock.now += 11
+    assert 'kisa' not in sessions
+    assert sessions.find_keys('user_id', 'u1') == ['uzun']
+    del sessions['uzun']
+    assert len(sessions) == 0 and len(store.wheel) == 0
+
+    window = 3600
+    clock.now = 1_700_000_000.0 - (1_700_000_000.0 % window)
+    for _ in range(5):
+        store.hit('1.2.3.4_login', window)
+    assert store.count('1.2.3.4_login', window) == 5
+    clock.now += window * 1.5   # önceki pencerenin yarısı hâlâ sayılır
+    assert abs(store.count('1.2.3.4_login', window) - 2.5) < 1e-9
+    clock.now += window * 2
+    store.expire()
+    assert '1.2.3.4_login' not in store.counters
+    print("✅ Expiry and sliding window work")
+
+
+def test_snapshot_recovery_and_disk_free_hot_path():
+    """Snapshot yeniden başlatmada oturumları geri getirmeli; doğrulama dosya açmamalı"""
+    print("🧪 Testing snapshot recovery...")
+    from src.security.access_control import AccessControl
+    from src.storage.document_store import DocumentStore
+
+    with tempfile.TemporaryDirectory() as tmp:
+        snapshot_path = os.path.join(tmp, "sessions.snapshot")
+        doc_store = DocumentStore(os.path.join(tmp, "store.db"))
+        store = SessionStore(snapshot_path=snapshot_path)
+        access = AccessControl(store=doc_store, sessions=store)
+        token = access.create_personal_session({'username': 'PlanB_User', 'password': 'Personal_Access_2024'})
+        for _ in range(5):
+            access.record_failed_attempt('10.0.0.1', 'login')
+        assert not access.check_rate_limit('10.0.0.1', 'login')
+
+        opened = []
+        real_open = builtins.open
+        builtins.open = lambda *args, **kwargs: opened.append(args[0]) or real_open(*args, **kwargs)
+        try:
+            started = time.perf_counter()
+            for _ in range(10000):
+                assert access.verify_session(token)
+                assert not access.verify_session('yok')
+                assert access.check_rate_limit('10.0.0.2', 'login')
+            elapsed = time.perf_counter() - started
+        finally:
+            builtins.open = real_open
+        assert opened == [], opened
+        print(f"   {elapsed / 30000 * 1e6:.1f} µs per auth check")
+
+        assert store.snapshot()
+        with open(snapshot_path, 'rb') as f:
+            assert token.encode() not in f.read()
+        store.close()
+
+        restarted = SessionStore(snapshot_path=snapshot_path)
+        access = AccessControl(store=doc_store, sessions=restarted)
+        assert access.verify_session(token)
+        assert not access.check_rate_limit('10.0.0.1', 'login')
+        restarted.close()
+        doc_store.close()
+    print("✅ Snapshot recovery works")
+
+
+if __name__ == "__main__":
+    test_timing_wheel_expiry()
+    test_sessions_expire_and_rate_limit_slides()
+    test_snapshot_recovery_and_disk_free_hot_path()
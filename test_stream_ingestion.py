@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+Test Stream Ingestion - Replay feed ile delta akış doğrulaması
+"""
+
+import sys
+import os
+import asyncio
+import time
+
+import numpy as np
+import pandas as pd
+
+# Add project root to path
+sys.path.append(os.path.dirname(__file__))
+
+from src.data.stream_ingestion import StreamIngestionService, ReplayFeedSource, aggregator_subscriber
+from src.data.bar_aggregator import BarAggregator
+
+
+def _make_frame(periods=30, start_price=100.0):
+    index = pd.date_range("2025-01-06 10:00", periods=periods, freq="1min")
+    close = start_price + np.arange(periods, dtype=float)
+    return pd.DataFrame({
+        "Open": close, "High": close + 0.5, "Low": close - 0.5, "Close": close,
+        "Volume": np.full(periods, 100.0)
+    }, index=index)
+
+
+class _FakeAlertManager:
+    def __init__(self):
+        self.calls = []
+
+    def check_price_alert(self, symbol, current_price, price_data=None):
+        self.calls.append((symbol, current_price, price_data))
+
+
+def test_replay_feed_publishes_every_bar_once():
+    """Her bar bir kez yayınlanmalı, ring buffer sınırı korunmalı"""
+    print("🧪 Testing replay ingestion...")
+    frames = {"AAA": _make_frame(), "BBB": _make_frame(periods=20, start_price=50.0)}
+    service = StreamIngestionService(ReplayFeedSource(frames, bars_per_poll=7),
+                                     symbols=frames.keys(), buffer_size=10, poll_interval=0)
+    received = []
+    aggregator = BarAggregator()
+    service.subscribe(received.append)
+    service.subscribe(aggregator_subscriber(aggregator))
+
+    asyncio.run(service.run())
+
+    assert len(received) == 50
+    assert len(service.get_recent_bars("AAA")) == 10
+    assert service.get_last_bar("AAA").close == 129.0
+    assert service.get_last_bar("AAA").previous_close == 128.0
+    assert len(aggregator.get_timeframe_data("BBB")["1m"]) == 20
+    print("✅ Replay ingestion works")
+
+
+def test_async_subscriber_and_errors_isolated():
+    """Async abone beklenmeli, hatalı abone diğerlerini durdurmamalı"""
+    print("🧪 Testing subscriber isolation...")
+    frames = {"AAA": _make_frame(periods=5)}
+    service = StreamIngestionService(ReplayFeedSource(frames, bars_per_poll=5),
+                                     symbols=["AAA"], poll_interval=0)
+    alerts = _FakeAlertManager()
+    seen = []
+
+    def broken(event):
+        raise RuntimeError("boom")
+
+    async def async_sink(event):
+        seen.append(event.symbol)
+
+    from src.data.stream_ingestion import alert_manager_subscriber
+    service.subscribe(broken)
+    service.subscribe(async_sink)
+    service.subscribe(alert_manager_subscriber(alerts))
+
+    published = asyncio.run(service.poll_once())
+    assert published == 5
+    assert len(seen) == 5
+    assert alerts.calls[-1][2]["previous_price"] == 103.0
+    print("✅ Subscribers isolated")
+
+
+class _FormingBarSource:
+    """Her turda oluşmakta olan son dakikayı güncellenmiş haliyle tekrar döndüren kaynak"""
+
+    def __init__(self):
+        self.polls = []
+        self.frames = [_make_frame(periods=3), _make_frame(periods=3), _make_frame(periods=4)]
+        self.frames[1].iloc[-1] = [102.0, 104.0, 101.0, 103.5, 250.0]   # 10:02 barı büyüdü
+
+    async def fetch(self, symbol, since):
+        from src.data.stream_ingestion import _frame_to_events
+        self.polls.append(since)
+        return _frame_to_events(symbol, self.frames[len(self.polls) - 1], since)
+
+
+def test_forming_bar_updated_in_place():
+    """Aynı dakikanın yeni hali buffer'da ve aggregator'da yerinde güncellenmeli, yeni bar eklenmemeli"""
+    print("🧪 Testing forming bar revisions...")
+    source = _FormingBarSource()
+    service = StreamIngestionService(source, symbols=["AAA"], poll_interval=0)
+    aggregator = BarAggregator()
+    received = []
+    service.subscribe(received.append)
+    service.subscribe(aggregator_subscriber(aggregator))
+
+    assert asyncio.run(service.poll_once()) == 3
+    assert asyncio.run(service.poll_once()) == 1                # yalnızca 10:02 revizyonu
+    assert source.polls[1] == pd.Timestamp("2025-01-06 10:02")  # son bar tekrar istenir
+    revision = received[-1]
+    assert revision.revision and revision.previous_volume == 100.0 and revision.volume_delta == 150.0
+    assert revision.previous_close == 101.0
+    assert len(service.get_recent_bars("AAA")) == 3 and service.get_last_bar("AAA").close == 103.5
+    assert asyncio.run(service.poll_once()) == 2                # 10:02 son haline döner, 10:03 yeni
+    assert service.stats['revisions'] == 2 and len(service.get_recent_bars("AAA")) == 4
+
+    bars = aggregator.get_timeframe_data("AAA")
+    assert len(bars["1m"]) == 4 and bars["1m"]["volume"].tolist() == [100.0] * 4
+    five = bars["5m"].iloc[-1]
+    assert (five["open"], five["high"], five["close"], five["volume"]) == (100.0, 103.5, 103.0, 400.0)
+    print("✅ Forming bar is revised in place")
+
+
+def test_rate_limit_rotates_symbols():
+    """Hız sınırında tur başına rps * aralık sembol sorgulanmalı, evren turlar arasında dönmeli"""
+    print("🧪 Testing request throttling...")
+    symbols = [f"S{i:02d}" for i in range(30)]
+    frames = {symbol: _make_frame(periods=1) for symbol in symbols}
+    service = StreamIngestionService(ReplayFeedSource(frames), symbols=symbols, poll_interval=0.1,
+                                     max_requests_per_second=100)
+    started = time.perf_counter()
+    counts = [asyncio.run(service.poll_once()) for _ in range(3)]
+    elapsed = time.perf_counter() - started
+    assert counts == [10, 10, 10] and set(service.buffers) == set(symbols)
+    assert elapsed >= 0.25, elapsed                             # 30 istek 10 ms aralıkla
+    assert service._cycle_symbols() == symbols[:10]
+
+    service.set_symbols(symbols[:5])
+    assert len(service._cycle_symbols()) == 5 and set(service.buffers) == set(symbols[:5])
+    print(f"✅ 30 symbols in 3 throttled cycles ({elapsed * 1000:.0f} ms)")
+
+
+if __name__ == "__main__":
+    test_replay_feed_publishes_every_bar_once()
+    test_async_subscriber_and_errors_isolated()
+    test_forming_bar_updated_in_place()
+    test_rate_limit_rotates_symbols()
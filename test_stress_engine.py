@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Test Stress Engine - Şok matrisi motoru, ScenarioSimulator entegrasyonu ve bootstrap kuyruk istatistikleri
+"""
+
+import sys
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+# Add project root to path
+sys.path.append(os.path.dirname(__file__))
+
+from src.simulation.stress_engine import StressEngine, PortfolioExposure, SECTOR_MAPPING
+
+MIXED_SYMBOLS = ['AAPL', 'JPM', 'XOM', 'GARAN.IS', 'BTC', 'GOLD', 'BILINMEYEN', 'KO', 'ETH']
+
+
+def _portfolio_manager(tmp):
+    from src.portfolio.portfolio_manager import PortfolioManager
+    from src.storage.document_store import DocumentStore
+    manager = PortfolioManager(data_dir=os.path.join(tmp, "portfolios"),
+                               store=DocumentStore(os.path.join(tmp, "store.db")))
+    manager.create_portfolio("stres", initial_cash=5000.0)
+    for i, symbol in enumerate(MIXED_SYMBOLS):
+        manager.add_position("stres", symbol, 10 + i, 100.0 + 7 * i)
+    return manager
+
+
+def test_matrix_matches_per_symbol_impacts():
+    """Şok @ maruziyet, eski sembol başına etki hesabıyla birebir aynı olmalı"""
+    print("🧪 Testing shock matrix against per-symbol impacts...")
+    from src.simulation.scenario_simulator import ScenarioSimulator
+
+    simulator = ScenarioSimulator()
+    engine = StressEngine()
+    prices = np.full(len(MIXED_SYMBOLS), 100.0)
+    exposure = PortfolioExposure(MIXED_SYMBOLS, prices, np.ones(len(MIXED_SYMBOLS)),
+                                 engine.exposure_matrix(MIXED_SYMBOLS))
+    scenarios = list(simulator.scenarios.values())
+    impacts = engine.symbol_impacts(exposure, scenarios, custom_impacts={'KO': 0.12})
+    for row, scenario in enumerate(scenarios):
+        for column, symbol in enumerate(MIXED_SYMBOLS):
+            expected = simulator._calculate_symbol_impact(symbol, scenario, {'KO': 0.12})
+            assert abs(impacts[row, column] - expected) < 1e-12, (symbol, scenario['name'])
+    assert engine.exposure_matrix(MIXED_SYMBOLS) is exposure.exposure
+    print(f"✅ {impacts.size} impacts match")
+
+
+def test_simulator_uses_portfolio_positions():
+    """Simülasyon, karşılaştırma ve özel senaryo gerçek Portfolio nesnesiyle çalışmalı"""
+    print("🧪 Testing ScenarioSimulator on a stored portfolio...")
+    from src.simulation.scenario_simulator import ScenarioSimulator
+
+    with tempfile.TemporaryDirectory() as tmp:
+        simulator = ScenarioSimulator()
+        simulator.portfolio_manager = _portfolio_manager(tmp)
+
+        single = simulator.simulate_portfolio_scenario("stres", "market_crash")
+        assert single and len(single['position_impacts']) == len(MIXED_SYMBOLS)
+        btc = next(pos for pos in single['position_impacts'] if pos['symbol'] == 'BTC')
+        assert abs(btc['impact_factor']) < 1e-12   # market_crash kripto şoku tanımlamıyor
+
+        comparison = simulator.compare_scenarios("stres", list(simulator.scenarios) + ['yok'])
+        crash = comparison['scenarios']['market_crash']
+        assert comparison['scenario_count'] == len(simulator.scenarios)
+        assert abs(crash['total_change'] - single['total_change']) < 1e-6
+        assert abs(crash['risk_score'] - single['risk_analysis']['overall_risk_score']) < 1e-9
+        assert comparison['worst_scenario']['name'] == 'market_crash'
+
+        custom = simulator.simulate_custom_scenario("stres", {'market_impact': -0.1,
+                                                              'symbol_impacts': {'AAPL': 0.5}})
+        aapl = next(pos for pos in custom['position_impacts'] if pos['symbol'] == 'AAPL')
+        assert custom['scenario_name'] == 'Özel Senaryo' and aapl['impact_factor'] == 0.5
+
+        stress = simulator.stress_test_portfolio("stres")
+        assert stress['risk_level'] in ('Yüksek Risk', 'Orta Risk', 'Düşük Risk')
+        simulator.portfolio_manager.store.close()
+    print("✅ Simulator works on stored portfolios")
+
+
+def test_bootstrap_tail_statistics_speed():
+    """500 pozisyon x 10k bootstrap senaryosu bir saniyenin altında olmalı"""
+    print("🧪 Testing bootstrap stress on 500 positions x 10k scenarios...")
+    rng = np.random.default_rng(4)
+    symbols = [f"S{i:03d}" for i in range(500)]
+    market = rng.normal(0, 0.01, (500, 1))
+    daily = market + rng.normal(0, 0.015, (500, 500))
+    engine = StressEngine()
+    exposure = PortfolioExposure(symbols + ['YENI'], rng.uniform(10, 200, 501), rng.integers(1, 100, 501).astype(float),
+                                 engine.exposure_matrix(symbols + ['YENI']))
+
+    started = time.perf_counter()
+    stats = engine.historical_stress(exposure, symbols, daily, n_scenarios=10000, horizon_days=10, seed=1)
+    elapsed = time.perf_counter() - started
+    assert stats['scenario_count'] == 10000 and stats['proxied_positions'] == 1
+    assert 0 < stats['var_95'] <= stats['var_99'] <= stats['es_99']
+    assert stats['var_95'] <= stats['es_95']
+    assert elapsed < 2.0, elapsed
+    print(f"✅ 10k scenarios in {elapsed * 1000:.0f} ms, VaR99 %{stats['var_99_pct']:.2f}")
+
+
+def test_historical_stress_with_returns_data():
+    """Verilen getiri geçmişiyle tarihsel stres testi tarih hizalı panel kullanmalı"""
+    print("🧪 Testing historical stress test from returns data...")
+    from src.simulation.scenario_simulator import ScenarioSimulator
+
+    with tempfile.TemporaryDirectory() as tmp:
+        simulator = ScenarioSimulator()
+        simulator.portfolio_manager = _portfolio_manager(tmp)
+        index = pd.bdate_range("2024-01-01", periods=200)
+        rng = np.random.default_rng(8)
+        returns_data = {symbol: pd.Series(rng.normal(0, 0.02, 200), index=index) for symbol in MIXED_SYMBOLS[:5]}
+        stats = simulator.historical_stress_test("stres", n_scenarios=2000, returns_data=returns_data, seed=3)
+        assert stats['history_days'] == 200 and stats['proxied_positions'] == len(MIXED_SYMBOLS) - 5
+        assert stats['loss_probability'] > 0
+        simulator.portfolio_manager.store.close()
+    assert set(SECTOR_MAPPING.values()) <= {'technology', 'finance', 'healthcare', 'energy', 'consumer'}
+    print("✅ Historical stress test works")
+
+
+if __name__ == "__main__":
+    test_matrix_matches_per_symbol_impacts()
+    test_simulator_uses_portfolio_positions()
+    test_bootstrap_tail_statistics_speed()
+    test_historical_stress_with_returns_data()
@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+"""
+Test Ultra Market Pipeline - Paylaşılan aiohttp oturumu, bloklayan çağrıların executor'a alınması,
+toplu /predict_batch ve sembol başına geri dönüş, executemany ile kalıcılık
+"""
+
+import sys
+import os
+import asyncio
+import sqlite3
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+
+# Add project root to path
+sys.path.append(os.path.dirname(__file__))
+
+try:
+    import ultra_market_pipeline as ump
+except ImportError as e:
+    ump = None
+    IMPORT_ERROR = e
+
+pytestmark = pytest.mark.skipif(ump is None, reason="ultra_market_pipeline import edilemedi (aiohttp gerekli)")
+
+
+class FakeResponse:
+    def __init__(self, status, payload=None):
+        self.status = status
+        self.payload = payload or {}
+
+    async def json(self):
+        return self.payload
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+class FakeSession:
+    """aiohttp.ClientSession.post arayüzü; batch uç noktası yoksa 404 döner"""
+
+    def __init__(self, batch_status=200):
+        self.batch_status = batch_status
+        self.calls = []
+        self.closed = False
+
+    def post(self, url, json=None):
+        self.calls.append((url.rsplit('/', 1)[-1], json))
+        if url.endswith('/predict_batch'):
+            if self.batch_status != 200:
+                return FakeResponse(self.batch_status)
+            return FakeResponse(200, {'predictions': [
+                {'symbol': r['symbol'], 'signal': 'BUY', 'confidence': 0.6} for r in json['requests']]})
+        return FakeResponse(200, {'symbol': json['symbol'], 'signal': 'HOLD', 'confidence': 0.5})
+
+    async def close(self):
+        self.closed = True
+
+
+def _records(count):
+    return [{'symbol': f"SYM{i}", 'price': 100.0 + i, 'volume': 1000 + i, 'market': 'NASDAQ',
+             'timestamp': datetime(2025, 3, 14, 10, 0) + timedelta(minutes=i), 'change_percent': 0.5,
+             'rsi': 55.0, 'macd': 0.1}
+            for i in range(count)]
+
+
+def _history(start, minutes):
+    index = pd.date_range(start, periods=minutes, freq='min')
+    close = np.linspace(100, 101, minutes)
+    return pd.DataFrame({'Open': close, 'High': close, 'Low': close, 'Close': close,
+                         'Volume': np.full(minutes, 10.0)}, index=index)
+
+
+def test_shared_session_is_reused():
+    """Her çağrı aynı ClientSession'ı kullanmalı; close sonrası yenisi açılmalı"""
+    print("🧪 Testing shared aiohttp session...")
+    pipeline = ump.UltraMarketDataPipeline(connection_limit=7)
+
+    async def scenario():
+        first = await pipeline.get_session()
+        second = await pipeline.get_session()
+        assert first is second
+        await first.close()
+        third = await pipeline.get_session()
+        assert third is not first
+        await pipeline.close()
+        assert pipeline.session is None
+
+    asyncio.run(scenario())
+    print("✅ Session is shared")
+
+
+def test_blocking_fetch_runs_in_executor():
+    """yfinance çağrıları executor thread'lerinde paralel çalışmalı, event loop bloklanmamalı"""
+    print("🧪 Testing executor offload...")
+    pipeline = ump.UltraMarketDataPipeline(max_concurrency=8)
+    threads = set()
+
+    def slow_download(symbol):
+        threads.add(threading.get_ident())
+        time.sleep(0.1)
+        return _history('2025-03-14 10:00', 30)
+
+    pipeline._download_history = slow_download
+    ticks = []
+
+    async def ticker():
+        for _ in range(5):
+            ticks.append(time.perf_counter())
+            await asyncio.sleep(0.01)
+
+    async def scenario():
+        started = time.perf_counter()
+        records, _ = await asyncio.gather(pipeline.fetch_symbols([f"S{i}" for i in range(8)]), ticker())
+        return records, time.perf_counter() - started
+
+    records, elapsed = asyncio.run(scenario())
+    pipeline.executor.shutdown(wait=True)
+    assert len(records) == 8 and elapsed < 0.4, elapsed
+    assert threading.get_ident() not in threads
+    # Loop serbest: ticker indirmeler sürerken düzenli ilerledi
+    assert len(ticks) == 5 and ticks[-1] - ticks[0] < 0.09
+    assert records[0]['rsi'] is not None and records[0]['market'] == 'NASDAQ'
+    print(f"✅ 8 blocking fetches in {elapsed * 1000:.0f} ms")
+
+
+def test_history_extended_with_deltas():
+    """İkinci indirme yalnızca son bardan sonrasını istemeli ve geçmişe eklemeli"""
+    print("🧪 Testing delta history...")
+    pipeline = ump.UltraMarketDataPipeline(history_bars=50)
+    calls = []
+
+    class FakeTicker:
+        def __init__(self, symbol):
+            self.symbol = symbol
+
+        def history(self, period=None, interval=None, start=None):
+            calls.append({'period': period, 'start': start})
+            if start is None:
+                return _history('2025-03-14 10:00', 40)
+            return _history(start, 20)        # ilk bar mevcut son barla çakışır
+
+    original = ump.yf.Ticker
+    ump.yf.Ticker = FakeTicker
+    try:
+        first = pipeline._download_history('AAPL')
+        second = pipeline._download_history('AAPL')
+    finally:
+        ump.yf.Ticker = original
+        pipeline.executor.shutdown(wait=False)
+    assert calls[0]['period'] == '1d' and calls[1]['start'] == first.index[-1].to_pydatetime()
+    assert second.index.is_unique and len(second) == 50
+    assert second.index[-1] == pd.Timestamp('2025-03-14 10:58')
+    print("✅ History is extended with deltas")
+
+
+def test_batch_predict_with_fallback():
+    """Tek /predict_batch çağrısı; uç nokta yoksa sembol başına tahmine düşmeli ve bunu hatırlamalı"""
+    print("🧪 Testing batched predict and fallback...")
+    records = _records(12)
+
+    pipeline = ump.UltraMarketDataPipeline()
+    pipeline.session = FakeSession()
+    assert asyncio.run(pipeline.run_ml_analysis_batch(records)) == 12
+    assert [name for name, _ in pipeline.session.calls] == ['predict_batch']
+    assert len(pipeline.session.calls[0][1]['requests']) == 12
+
+    legacy = ump.UltraMarketDataPipeline(max_concurrency=4)
+    legacy.session = FakeSession(batch_status=404)
+    assert asyncio.run(legacy.run_ml_analysis_batch(records)) == 12
+    names = [name for name, _ in legacy.session.calls]
+    assert names[0] == 'predict_batch' and names[1:] == ['predict'] * 12
+    assert legacy.batch_predict_supported is False
+
+    legacy.session.calls.clear()
+    asyncio.run(legacy.run_ml_analysis_batch(records[:3]))
+    assert [name for name, _ in legacy.session.calls] == ['predict'] * 3
+
+    failing = ump.UltraMarketDataPipeline()
+    failing.session = FakeSession(batch_status=500)
+    assert asyncio.run(failing.run_ml_analysis_batch(records)) == 0
+    assert failing.batch_predict_supported is True
+    for p in (pipeline, legacy, failing):
+        p.executor.shutdown(wait=False)
+    print("✅ Batched predict and fallback work")
+
+
+def test_executemany_persistence():
+    """Bir döngünün kayıtları ve metrikleri tek işlemde yazılmalı; hata 0 döndürmeli"""
+    print("🧪 Testing executemany persistence...")
+    with tempfile.TemporaryDirectory() as tmp:
+        pipeline = ump.UltraMarketDataPipeline()
+        pipeline.db_path = os.path.join(tmp, 'ultra.db')
+        assert pipeline.store_market_data_batch(_records(5)) == 0       # tablo yok
+
+        conn = sqlite3.connect(pipeline.db_path)
+        conn.executescript("""
+            CREATE TABLE market_data (id INTEGER PRIMARY KEY AUTOINCREMENT, symbol TEXT NOT NULL,
+                price REAL NOT NULL, volume INTEGER, market TEXT, timestamp DATETIME, change_percent REAL,
+                rsi REAL, macd REAL);
+            CREATE TABLE system_metrics (id INTEGER PRIMARY KEY AUTOINCREMENT, metric_name TEXT NOT NULL,
+                metric_value REAL NOT NULL, timestamp DATETIME);
+        """)
+        conn.close()
+
+        assert pipeline.store_market_data_batch(_records(250)) == 250
+        assert pipeline.store_market_data_batch([]) == 0
+        pipeline.stage_metrics = {'stage_fetch_seconds': 1.5, 'stage_store_seconds': 0.1}
+        pipeline.update_system_metrics(250, 2.0)
+
+        conn = sqlite3.connect(pipeline.db_path)
+        assert conn.execute("SELECT COUNT(*), MIN(symbol) FROM market_data").fetchone() == (250, 'SYM0')
+        metrics = dict(conn.execute("SELECT metric_name, metric_value FROM system_metrics").fetchall())
+        conn.close()
+        assert metrics['data_collection_rate'] == 125.0 and metrics['stage_fetch_seconds'] == 1.5
+        pipeline.executor.shutdown(wait=False)
+    print("✅ executemany persistence works")
+
+
+def test_back_to_back_cycles_reopen_resources():
+    """run_single_cycle kaynakları kapatır; aynı örnekte ikinci döngü yeni executor ile çalışmalı"""
+    print("🧪 Testing back-to-back cycles...")
+    with tempfile.TemporaryDirectory() as tmp:
+        pipeline = ump.UltraMarketDataPipeline(max_concurrency=4)
+        pipeline.db_path = os.path.join(tmp, 'ultra.db')
+        pipeline.symbols = {'NASDAQ': ['AAPL', 'MSFT']}
+        pipeline._download_history = lambda symbol: _history('2025-03-14 10:00', 30)
+        pipeline.batch_predict_supported = False
+
+        async def no_predictions(records):
+            return 0
+
+        pipeline.run_ml_analysis_batch = no_predictions
+        executors = []
+        for _ in range(2):
+            assert asyncio.run(pipeline.run_single_cycle()) == 2
+            assert pipeline._executor is None and pipeline.session is None
+            executors.append(pipeline.executor)
+        assert executors[0] is not executors[1]
+        asyncio.run(pipeline.close())
+    print("✅ Back-to-back cycles work")
+
+
+if __name__ == "__main__":
+    if ump is None:
+        print(f"❌ ultra_market_pipeline import hatası (aiohttp gerekli): {IMPORT_ERROR}")
+        sys.exit(0)
+    test_shared_session_is_reused()
+    test_blocking_fetch_runs_in_executor()
+    test_history_extended_with_deltas()
+    test_batch_predict_with_fallback()
+    test_executemany_persistence()
+    test_back_to_back_cycles_reopen_resources()
@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""
+Test Watchlist Performance - Cache'den fiyat tablosu, canlı barlarla artımlı toplamlar ve ters indeks araması
+"""
+
+import sys
+import os
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+# Add project root to path
+sys.path.append(os.path.dirname(__file__))
+
+from src.watchlist.watchlist_index import WatchlistIndex, tokenize
+
+
+class FakeCache:
+    """resilient_loader_v2.cached_download yerine günlük bar üreten yükleyici"""
+
+    def __init__(self, seed=3):
+        self.rng = np.random.default_rng(seed)
+        self.calls = []
+
+    def __call__(self, symbol, period="1y", interval="1d"):
+        self.calls.append(symbol)
+        if symbol == 'YOK':
+            return pd.DataFrame()
+        index = pd.bdate_range(end="2025-03-14", periods=5)
+        close = 100 * np.cumprod(1 + self.rng.normal(0, 0.02, 5))
+        return pd.DataFrame({'Open': close, 'High': close, 'Low': close, 'Close': close,
+                             'Volume': self.rng.integers(1000, 5000, 5).astype(float)}, index=index)
+
+
+def _manager(tmp, loader):
+    from src.storage.document_store import DocumentStore
+    from src.watchlist.watchlist_manager import WatchlistManager
+    return WatchlistManager(store=DocumentStore(os.path.join(tmp, "store.db")), loader=loader)
+
+
+def _expected(performance):
+    changes = [row['change_pct'] for row in performance['performance_data'] if not np.isnan(row['change_pct'])]
+    return np.mean(changes), max(changes), min(changes)
+
+
+def test_performance_from_cache():
+    """Performans cache'deki son iki kapanıştan hesaplanmalı; ikinci çağrı cache'e gitmemeli"""
+    print("🧪 Testing watchlist performance from daily cache...")
+    loader = FakeCache()
+    with tempfile.TemporaryDirectory() as tmp:
+        manager = _manager(tmp, loader)
+        performance = manager.get_watchlist_performance('tech_stocks')
+        frame = FakeCache()('AAPL')   # aynı tohumla ilk sembolün verisi
+        aapl = performance['performance_data'][0]
+        assert aapl['symbol'] == 'AAPL'
+        assert abs(aapl['price'] - frame['Close'].iloc[-1]) < 1e-9
+        assert abs(aapl['change_pct'] - (frame['Close'].iloc[-1] / frame['Close'].iloc[-2] - 1) * 100) < 1e-9
+
+        average, best, worst = _expected(performance)
+        assert abs(performance['average_change'] - average) < 1e-9
+        assert performance['best_performer']['change_pct'] == best
+        assert performance['worst_performer']['change_pct'] == worst
+
+        calls = len(loader.calls)
+        all_performance = manager.get_watchlists_performance()
+        assert len(loader.calls) - calls == len(set(s for w in manager.watchlists.values() for s in w['symbols'])) - 8
+        assert set(all_performance) == set(manager.watchlists)
+        manager.store.close()
+    print("✅ Cached performance works")
+
+
+def test_live_bars_update_aggregates_incrementally():
+    """Canlı barlar yalnızca ilgili listelerin toplamlarını güncellemeli ve tam hesapla aynı kalmalı"""
+    print("🧪 Testing incremental aggregates on live bars...")
+    from src.data.stream_ingestion import BarEvent, watchlist_subscriber
+
+    with tempfile.TemporaryDirectory() as tmp:
+        manager = _manager(tmp, FakeCache())
+        manager.create_watchlist("Karışık", symbols=['AAPL', 'THYAO.IS', 'YOK'], market='nasdaq')
+        manager.get_watchlists_performance()
+        on_bar = watchlist_subscriber(manager)
+        rng = np.random.default_rng(11)
+        symbols = ['AAPL', 'MSFT', 'THYAO.IS', 'NVDA', 'YOK']
+        recomputes = manager.quotes.stats['recomputes']
+        for i in range(500):
+            symbol = symbols[i % len(symbols)]
+            on_bar(BarEvent(symbol, datetime(2025, 3, 14, 15, i % 60), 0, 0, 0,
+                            float(rng.uniform(80, 120)), 10.0))
+        assert manager.quotes.stats['live_updates'] == 500
+        assert manager.quotes.stats['recomputes'] - recomputes < 500
+
+        for watchlist_id in manager.watchlists:
+            incremental = manager.quotes.performance(watchlist_id)
+            manager.quotes.set_members(watchlist_id, manager.watchlists[watchlist_id]['symbols'])
+            full = manager.quotes.performance(watchlist_id)
+            assert abs(incremental['average_change'] - full['average_change']) < 1e-9
+            assert incremental['best_performer'] == full['best_performer']
+            assert incremental['worst_performer'] == full['worst_performer']
+
+        # Yeni gün: önceki kapanış son fiyata kayar, hacim sıfırlanır
+        price = manager.quotes.price[manager.quotes.columns['AAPL']]
+        on_bar(BarEvent('AAPL', datetime(2025, 3, 17, 10, 0), 0, 0, 0, price * 1.1, 5.0))
+        aapl = next(row for row in manager.get_watchlist_performance('tech_stocks')['performance_data']
+                    if row['symbol'] == 'AAPL')
+        assert abs(aapl['change_pct'] - 10) < 1e-9 and aapl['volume'] == 5.0
+        manager.store.close()
+    print("✅ Incremental aggregates match full recomputation")
+
+
+def test_live_volume_not_double_counted():
+    """Günlük bardan yüklenen hacme yalnızca yüklemeden sonra başlayan canlı barlar eklenmeli"""
+    print("🧪 Testing session volume seeding...")
+    from src.data.stream_ingestion import BarEvent
+    from src.watchlist.watchlist_performance import QuoteBoard
+
+    index = pd.DatetimeIndex([datetime(2025, 3, 13), datetime(2025, 3, 14)])
+    daily = pd.DataFrame({'Close': [100.0, 101.0], 'Volume': [900.0, 1000.0]}, index=index)
+    board = QuoteBoard(WatchlistIndex(), loader=lambda symbol, **kwargs: daily)
+    assert board.load_symbols(['AAPL']) == 1
+    column = board.columns['AAPL']
+    board.seeded_at[column] = pd.Timestamp('2025-03-14 15:00').value / 10 ** 9    # yükleme anı
+
+    board.on_bar(BarEvent('AAPL', datetime(2025, 3, 14, 14, 59), 0, 0, 0, 101.5, 10.0))
+    assert board.volume[column] == 1000.0 and board.price[column] == 101.5
+    board.on_bar(BarEvent('AAPL', datetime(2025, 3, 14, 15, 1), 0, 0, 0, 101.6, 10.0))
+    board.on_bar(BarEvent('AAPL', datetime(2025, 3, 14, 15, 1), 0, 0, 0, 101.7, 15.0,
+                          revision=True, previous_volume=10.0))
+    assert board.volume[column] == 1015.0
+
+    # Yeni seans canlı barlarla başlar; yeniden yükleme hacmi günlük toplamla değiştirir
+    board.on_bar(BarEvent('AAPL', datetime(2025, 3, 17, 10, 0), 0, 0, 0, 102.0, 7.0))
+    board.on_bar(BarEvent('AAPL', datetime(2025, 3, 17, 10, 1), 0, 0, 0, 102.0, 3.0))
+    assert board.volume[column] == 10.0 and board.previous_close[column] == 101.7
+    assert board.load_symbols(['AAPL'], force=True) == 1 and board.volume[column] == 1000.0
+    print("✅ Session volume is not double counted")
+
+
+def test_bist_session_day_uses_local_date():
+    """Yerel gece yarısı damgalı BIST günlük barı ile aynı seansın canlı barı aynı gün sayılmalı"""
+    print("🧪 Testing exchange-local session days...")
+    from src.data.stream_ingestion import BarEvent
+    from src.watchlist.watchlist_performance import QuoteBoard
+
+    index = pd.DatetimeIndex(['2025-03-13', '2025-03-14']).tz_localize('Europe/Istanbul')
+    daily = pd.DataFrame({'Close': [100.0, 110.0], 'Volume': [400000.0, 500000.0]}, index=index)
+    board = QuoteBoard(WatchlistIndex(), loader=lambda symbol, **kwargs: daily)
+    board.load_symbols(['THYAO.IS'])
+    column = board.columns['THYAO.IS']
+    board.seeded_at[column] = pd.Timestamp('2025-03-14 09:00', tz='UTC').value / 10 ** 9
+
+    # 13:00 İstanbul: aynı seans, önceki kapanış ve hacim korunur
+    board.on_bar(BarEvent('THYAO.IS', pd.Timestamp('2025-03-14 10:00', tz='UTC'), 0, 0, 0, 111.0, 1000.0))
+    assert board.previous_close[column] == 100.0 and abs(board._change(column) - 11.0) < 1e-9
+    assert board.volume[column] == 501000.0
+
+    # Ertesi seansın ilk barı (UTC'de gece yarısından önce olsa da) yeni gündür
+    board.on_bar(BarEvent('THYAO.IS', pd.Timestamp('2025-03-16 22:30', tz='UTC'), 0, 0, 0, 112.0, 10.0))
+    assert board.previous_close[column] == 111.0 and board.volume[column] == 10.0
+    print("✅ Session days follow the exchange calendar")
+
+
+def test_inverted_index_search_and_popularity():
+    """Arama ve popüler listeler ters indeksten, değişikliklerle güncel kalmalı"""
+    print("🧪 Testing inverted index search...")
+    assert {'thyao', 'is', 'thyao.is'} <= tokenize('THYAO.IS')
+    with tempfile.TemporaryDirectory() as tmp:
+        manager = _manager(tmp, FakeCache())
+        assert [w['watchlist_id'] for w in manager.search_watchlists('thyao')] == ['bist_blue_chips']
+        assert [w['match_type'] for w in manager.search_watchlists('blue-chip')] == ['tag']
+        assert [w['watchlist_id'] for w in manager.search_watchlists('temettü')] == ['dividend_stocks']
+        assert manager.search_watchlists('') == []
+
+        watchlist_id = manager.create_watchlist("Savunma Sanayi", symbols=['ASELS.IS'], tags=['defense'])
+        assert [w['watchlist_id'] for w in manager.search_watchlists('asels')] == [watchlist_id]
+        manager.remove_symbol_from_watchlist(watchlist_id, 'ASELS.IS')
+        assert manager.search_watchlists('asels') == []
+        assert [w['match_type'] for w in manager.search_watchlists('savunma')] == ['name']
+
+        for _ in range(3):
+            manager.increment_view_count(watchlist_id)
+        manager.increment_view_count('crypto_majors')
+        assert [w['watchlist_id'] for w in manager.get_popular_watchlists(2)] == [watchlist_id, 'crypto_majors']
+        manager.delete_watchlist(watchlist_id)
+        assert manager.search_watchlists('savunma') == []
+        manager.store.close()
+
+    index = WatchlistIndex()
+    for i in range(20000):
+        index.add(f"w{i}", {'name': f"Liste {i}", 'symbols': [f"S{i % 500}", f"T{i}"], 'tags': ['genel']})
+    started = time.perf_counter()
+    for i in range(1000):
+        index.search(f"t{i}")
+    elapsed = time.perf_counter() - started
+    assert index.search("s7") and index.watchlists_for_symbol("S7") == {f"w{i}" for i in range(7, 20000, 500)}
+    print(f"✅ Index search works ({elapsed / 1000 * 1e6:.0f} µs per query over 20k lists)")
+
+
+if __name__ == "__main__":
+    test_performance_from_cache()
+    test_live_bars_update_aggregates_incrementally()
+    test_live_volume_not_double_counted()
+    test_bist_session_day_uses_local_date()
+    test_inverted_index_search_and_popularity()
@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+"""
+Test WebSocket Pub/Sub - Abonelikler, tek serileştirme, birleştirilmiş delta kareleri ve yavaş istemci izolasyonu
+"""
+
+import sys
+import os
+import asyncio
+import json
+import time
+
+# Add project root to path
+sys.path.append(os.path.dirname(__file__))
+
+from src.dashboard.websocket_handler import WebSocketHandler
+
+
+class FakeSocket:
+    """websockets bağlantısı yerine: gelen mesaj kuyruğu ve gönderilen kareler"""
+
+    def __init__(self, name, delay=0.0, fail=False):
+        self.remote_address = (name, 0)
+        self.delay = delay
+        self.fail = fail
+        self.inbox = asyncio.Queue()
+        self.frames = []
+        self.closed = False
+
+    async def send(self, frame):
+        if self.fail:
+            raise RuntimeError("bağlantı koptu")
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        self.frames.append(json.loads(frame))
+
+    async def close(self):
+        self.closed = True
+        await self.inbox.put(None)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        message = await self.inbox.get()
+        if message is None:
+            raise StopAsyncIteration
+        return message
+
+    def prices(self):
+        """Alınan price_batch karelerini istemci tarafındaki gibi birleştir"""
+        state = {}
+        for frame in self.frames:
+            if frame['type'] != 'price_batch':
+                continue
+            for symbol, full in frame['snapshot'].items():
+                state[symbol] = dict(full)
+            for symbol, delta in frame['data'].items():
+                state.setdefault(symbol, {}).update(delta)
+        return state
+
+
+async def _connect(handler, socket, subscribe=None):
+    task = asyncio.create_task(handler.register_client(socket))
+    await asyncio.sleep(0)
+    if subscribe:
+        await socket.inbox.put(json.dumps({'type': 'subscribe', **subscribe}))
+    await asyncio.sleep(0.01)
+    return task
+
+
+async def _settle(handler, seconds=0.05):
+    await asyncio.sleep(handler.flush_interval + seconds)
+
+
+def test_subscriptions_and_deltas():
+    """Abonelik filtreleri, delta/anlık görüntü ayrımı ve birleştirme"""
+    print("🧪 Testing subscriptions, deltas and conflation...")
+
+    async def scenario():
+        handler = WebSocketHandler(flush_interval=0.01)
+        everything, apple, crypto = FakeSocket('all'), FakeSocket('aapl'), FakeSocket('crypto')
+        tasks = [await _connect(handler, everything),
+                 await _connect(handler, apple, {'symbol': 'AAPL'}),
+                 await _connect(handler, crypto, {'market': 'crypto'})]
+        assert apple.frames[0]['type'] == 'welcome' and apple.frames[-1]['type'] == 'subscription_confirmed'
+
+        await handler.send_price_update('AAPL', {'price': 100.0, 'change': 0.5, 'market': 'nasdaq'})
+        await handler.send_price_update('BTC-USD', {'price': 60000.0, 'change': 1.0, 'market': 'crypto'})
+        await _settle(handler)
+        assert set(everything.prices()) == {'AAPL', 'BTC-USD'}
+        assert set(apple.prices()) == {'AAPL'} and set(crypto.prices()) == {'BTC-USD'}
+
+        # Aynı flush içindeki tikler birleşir; yalnızca değişen alan delta olarak gider
+        for price in (101.0, 102.0, 103.0):
+            await handler.send_price_update('AAPL', {'price': price, 'change': 0.5, 'market': 'nasdaq'})
+        await _settle(handler)
+        last = apple.frames[-1]
+        assert last['data'] == {'AAPL': {'price': 103.0}} and last['snapshot'] == {}
+        assert handler.stats['ticks_conflated'] >= 2 * 2
+        assert apple.prices()['AAPL'] == handler.prices['AAPL']
+
+        # Sonradan abone olan istemci mevcut durumu tam anlık görüntü olarak alır
+        late = FakeSocket('late')
+        tasks.append(await _connect(handler, late, {'symbols': ['AAPL', 'MSFT']}))
+        await _settle(handler)
+        assert late.frames[-1]['snapshot'] == {'AAPL': handler.prices['AAPL']}
+
+        # Analiz ve uyarı mesajları: abonelik filtresi ve herkese yayın
+        await handler.send_analysis_update('BTC-USD', {'total_score': 70})
+        await handler.send_alert({'message': 'test'})
+        await _settle(handler)
+        kinds = lambda socket: [frame['type'] for frame in socket.frames]
+        assert 'analysis_update' in kinds(crypto) and 'analysis_update' not in kinds(apple)
+        assert all('alert' in kinds(s) for s in (everything, apple, crypto, late))
+
+        await apple.inbox.put(json.dumps({'type': 'unsubscribe', 'symbol': 'AAPL'}))
+        await asyncio.sleep(0.01)
+        assert 'AAPL' not in handler.symbol_subscribers or len(handler.symbol_subscribers['AAPL']) == 1
+
+        for socket in (everything, apple, crypto, late):
+            await socket.close()
+        await asyncio.gather(*tasks)
+        assert not handler.clients and not handler.firehose
+
+    asyncio.run(scenario())
+    print("✅ Subscriptions and delta frames work")
+
+
+def test_slow_client_isolation():
+    """Yavaş istemci diğerlerini bekletmemeli, zaman aşımında kapatılmalı; hatalı istemci düşürülmeli"""
+    print("🧪 Testing slow and failing clients...")
+
+    async def scenario():
+        handler = WebSocketHandler(flush_interval=0.01, send_timeout=0.2)
+        fast, slow, broken = FakeSocket('fast'), FakeSocket('slow', delay=10), FakeSocket('broken', fail=True)
+        tasks = [await _connect(handler, socket) for socket in (fast, slow, broken)]
+
+        started = time.perf_counter()
+        for i in range(20):
+            await handler.send_price_update('AAPL', {'price': 100.0 + i})
+            await asyncio.sleep(0.005)
+        await _settle(handler)
+        assert fast.prices()['AAPL']['price'] == 119.0
+        assert time.perf_counter() - started < 1.0
+
+        await asyncio.sleep(0.3)
+        assert handler.stats['slow_disconnects'] == 1 and slow.closed
+        assert fast in handler.clients and len(handler.clients) == 1 and broken.closed
+
+        # Sınırlı kuyruk: dolunca en eski mesajlar düşer
+        handler.queue_size = 4
+        bounded = FakeSocket('bounded', delay=0.05)
+        tasks.append(await _connect(handler, bounded))
+        for i in range(20):
+            await handler.broadcast_update({'type': 'alert', 'data': {'i': i}})
+        assert handler.stats['messages_dropped'] > 0
+        await asyncio.sleep(0.5)
+        assert bounded.frames[-1]['data'] == {'i': 19}
+
+        for socket in (fast, bounded):
+            await socket.close()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    asyncio.run(scenario())
+    print("✅ Slow clients are isolated")
+
+
+def test_threadsafe_publish_and_fanout():
+    """Başka thread'den yayın sunucu loop'una aktarılmalı; mesaj başına tek serileştirme"""
+    print("🧪 Testing cross-thread publish and fan-out...")
+    import threading
+
+    async def scenario():
+        handler = WebSocketHandler(flush_interval=0.02)
+        handler.loop = asyncio.get_running_loop()
+        sockets = [FakeSocket(f"c{i}") for i in range(300)]
+        tasks = [await _connect(handler, socket) for socket in sockets]
+        await _settle(handler)
+
+        symbols = [f"S{i}" for i in range(1000)]
+        serializations = handler.stats['serializations']
+        started = time.perf_counter()
+        worker = threading.Thread(target=lambda: [handler.publish_price(s, {'price': 1.0, 'change': 0.1})
+                                                  for s in symbols])
+        worker.start()
+        worker.join()
+        while handler.stats['frames_sent'] < 2 * len(sockets):
+            await asyncio.sleep(0.005)
+        elapsed = time.perf_counter() - started
+        assert all(len(socket.prices()) == 1000 for socket in sockets)
+        # 1000 tik x 300 istemci: sembol başına tek parça, tüm istemciler paylaşır
+        assert handler.stats['serializations'] - serializations == 1000
+
+        for socket in sockets:
+            await socket.close()
+        await asyncio.gather(*tasks)
+        return elapsed
+
+    elapsed = asyncio.run(scenario())
+    print(f"✅ 1000 symbols fanned out to 300 clients in {elapsed * 1000:.0f} ms")
+
+
+def test_real_websocket_roundtrip():
+    """Gerçek websockets sunucusu ile uçtan uca abonelik ve delta"""
+    print("🧪 Testing real websocket roundtrip...")
+    import websockets
+
+    async def scenario():
+        handler = WebSocketHandler(host='127.0.0.1', port=0, flush_interval=0.01)
+        handler.loop = asyncio.get_running_loop()
+        server = await websockets.serve(handler.register_client, '127.0.0.1', 0)
+        port = next(iter(server.sockets)).getsockname()[1]
+        async with websockets.connect(f"ws://127.0.0.1:{port}") as client:
+            assert json.loads(await client.recv())['type'] == 'welcome'
+            await client.send(json.dumps({'type': 'subscribe', 'symbol': 'THYAO.IS'}))
+            assert json.loads(await client.recv())['type'] == 'subscription_confirmed'
+            await handler.send_price_update('GARAN.IS', {'price': 1.0})
+            await handler.send_price_update('THYAO.IS', {'price': 2.0, 'volume': 5})
+            frame = json.loads(await client.recv())
+            assert frame['type'] == 'price_batch' and frame['snapshot'] == {'THYAO.IS': {'price': 2.0, 'volume': 5}}
+            await client.send(json.dumps({'type': 'ping'}))
+            assert json.loads(await client.recv())['type'] == 'pong'
+        server.close()
+        await server.wait_closed()
+
+    asyncio.run(scenario())
+    print("✅ Real websocket roundtrip works")
+
+
+if __name__ == "__main__":
+    test_subscriptions_and_deltas()
+    test_slow_client_isolation()
+    test_threadsafe_publish_and_fanout()
+    test_real_websocket_roundtrip()
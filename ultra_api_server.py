@@ -4,16 +4,25 @@ PlanB Motoru - Ultra Professional API Server
 Production-Ready FastAPI with SQLite Integration
 """
 
-from fastapi import FastAPI, HTTPException, BackgroundTasks
+from fastapi import FastAPI, HTTPException, BackgroundTasks, Response
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from datetime import datetime
-from typing import Dict, List, Optional
+from typing import Any, Dict, List, Optional, Sequence
+import numpy as np
 import sqlite3
+import threading
 import json
 import random
 import asyncio
 
+try:
+    from ultra_database import ensure_snapshot_schema
+    SNAPSHOT_SCHEMA_AVAILABLE = True
+except ImportError:
+    SNAPSHOT_SCHEMA_AVAILABLE = False
+
 app = FastAPI(
     title="PlanB Motoru Ultra Professional API",
     description="Ultra-Stable Market Analysis API with ML Integration",
@@ -55,11 +64,96 @@ class PredictionRequest(BaseModel):
     symbol: str
     features: Dict[str, float]
 
-def get_db_connection():
-    """Get database connection"""
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    return conn
+class BatchPredictionRequest(BaseModel):
+    requests: List[PredictionRequest]
+
+MODEL_VERSION = "Ultra-ML-Ensemble v2.0"
+
+class SQLiteConnectionPool:
+    """Per-worker-thread SQLite connections in WAL mode plus one serialized writer"""
+    
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self.local = threading.local()
+        self.write_lock = threading.Lock()
+        self.writer: Optional[sqlite3.Connection] = None
+    
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, check_same_thread=False, timeout=30)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+    
+    def reader(self) -> sqlite3.Connection:
+        """Read connection owned by the calling worker thread"""
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            conn = self._connect()
+            self.local.conn = conn
+        return conn
+    
+    def fetch_all(self, sql: str, params: Sequence[Any] = ()) -> List[sqlite3.Row]:
+        return self.reader().execute(sql, params).fetchall()
+    
+    def fetch_one(self, sql: str, params: Sequence[Any] = ()) -> Optional[sqlite3.Row]:
+        return self.reader().execute(sql, params).fetchone()
+    
+    def execute_many(self, sql: str, rows: Sequence[Sequence[Any]]) -> int:
+        """Batched write in one transaction on the shared writer connection"""
+        with self.write_lock:
+            if self.writer is None:
+                self.writer = self._connect()
+            with self.writer:
+                self.writer.executemany(sql, rows)
+        return len(rows)
+    
+    def run_on_writer(self, func):
+        """Run func(connection) on the serialized writer connection"""
+        with self.write_lock:
+            if self.writer is None:
+                self.writer = self._connect()
+            return func(self.writer)
+
+db_pool = SQLiteConnectionPool(DB_PATH)
+
+async def db_fetch_all(sql: str, params: Sequence[Any] = ()) -> List[sqlite3.Row]:
+    """Run a read query off the event loop"""
+    return await run_in_threadpool(db_pool.fetch_all, sql, params)
+
+async def db_fetch_one(sql: str, params: Sequence[Any] = ()) -> Optional[sqlite3.Row]:
+    return await run_in_threadpool(db_pool.fetch_one, sql, params)
+
+def decode_cursor(cursor: Optional[str], int_key: bool = False):
+    """Split and validate an opaque 'timestamp|key' keyset cursor (400 on malformed input)"""
+    if not cursor:
+        return None
+    timestamp, sep, key = cursor.rpartition("|")
+    if not sep or not timestamp or not key:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    try:
+        datetime.fromisoformat(timestamp)
+        return timestamp, int(key) if int_key else key
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def set_next_cursor(response: Response, rows: List[sqlite3.Row], limit: int, key: str):
+    """Expose the next page cursor as a header so the response body stays a plain list"""
+    if rows and len(rows) == limit:
+        response.headers["X-Next-Cursor"] = f"{rows[-1]['timestamp']}|{rows[-1][key]}"
+
+@app.on_event("startup")
+async def ensure_snapshot_tables():
+    """Create latest-snapshot tables, triggers and keyset indexes if missing"""
+    if SNAPSHOT_SCHEMA_AVAILABLE:
+        try:
+            await run_in_threadpool(db_pool.run_on_writer, ensure_snapshot_schema)
+        except sqlite3.Error as e:
+            print(f"⚠️ Snapshot schema unavailable: {e}")
+
+def parse_features_column(values: List[Optional[str]]) -> List[Dict]:
+    """Decode a column of JSON feature blobs with a single json.loads call"""
+    return json.loads("[" + ",".join(v if v else "{}" for v in values) + "]") if values else []
 
 @app.get("/")
 async def root():
@@ -81,6 +175,7 @@ async def root():
             "market_data": "/api/v1/market-data",
             "analysis": "/api/v1/analysis",
             "predict": "/api/v1/ml/predict",
+            "predict_batch": "/api/v1/ml/predict_batch",
             "stats": "/api/v1/stats",
             "docs": "/docs"
         }
@@ -89,22 +184,13 @@ async def root():
 @app.get("/health")
 async def health_check():
     """Ultra-comprehensive health check"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
     try:
         # Test database connectivity
-        cursor.execute("SELECT COUNT(*) FROM market_data")
-        market_count = cursor.fetchone()[0]
-        
-        cursor.execute("SELECT COUNT(*) FROM analysis_results")
-        analysis_count = cursor.fetchone()[0]
+        market_count = (await db_fetch_one("SELECT COUNT(*) FROM market_data"))[0]
+        analysis_count = (await db_fetch_one("SELECT COUNT(*) FROM analysis_results"))[0]
         
         # Get latest data timestamp
-        cursor.execute("SELECT MAX(timestamp) FROM market_data")
-        latest_data = cursor.fetchone()[0]
-        
-        conn.close()
+        latest_data = (await db_fetch_one("SELECT MAX(timestamp) FROM market_data"))[0]
         
         return {
             "status": "ULTRA_HEALTHY",
@@ -136,34 +222,54 @@ async def health_check():
         }
 
 @app.get("/api/v1/market-data", response_model=List[MarketData])
-async def get_market_data(limit: int = 20, symbol: Optional[str] = None):
-    """Get latest market data with ultra-fast performance"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
+async def get_market_data(response: Response, limit: int = 20, symbol: Optional[str] = None,
+                          cursor: Optional[str] = None):
+    """Get latest market data with ultra-fast performance
     
+    Without a symbol, returns one row per symbol from the market_data_latest snapshot.
+    Pass the X-Next-Cursor response header back as `cursor` for the next page.
+    """
     try:
+        after = decode_cursor(cursor, int_key=bool(symbol))
         if symbol:
-            cursor.execute("""
-                SELECT * FROM market_data 
-                WHERE symbol = ? 
-                ORDER BY timestamp DESC 
-                LIMIT ?
-            """, (symbol, limit))
+            if after:
+                rows = await db_fetch_all("""
+                    SELECT * FROM market_data 
+                    WHERE symbol = ? AND (timestamp, id) < (?, ?)
+                    ORDER BY timestamp DESC, id DESC 
+                    LIMIT ?
+                """, (symbol, after[0], after[1], limit))
+            else:
+                rows = await db_fetch_all("""
+                    SELECT * FROM market_data 
+                    WHERE symbol = ? 
+                    ORDER BY timestamp DESC, id DESC 
+                    LIMIT ?
+                """, (symbol, limit))
+            set_next_cursor(response, rows, limit, 'id')
         else:
-            cursor.execute("""
-                SELECT DISTINCT symbol, price, volume, market, timestamp, 
-                       change_percent, rsi, macd
-                FROM market_data 
-                WHERE timestamp > datetime('now', '-1 hour')
-                ORDER BY timestamp DESC 
-                LIMIT ?
-            """, (limit,))
-        
-        rows = cursor.fetchall()
-        conn.close()
+            if after:
+                rows = await db_fetch_all("""
+                    SELECT row_id AS id, symbol, price, volume, market, timestamp,
+                           change_percent, rsi, macd
+                    FROM market_data_latest 
+                    WHERE (timestamp, symbol) < (?, ?)
+                    ORDER BY timestamp DESC, symbol DESC 
+                    LIMIT ?
+                """, (after[0], after[1], limit))
+            else:
+                rows = await db_fetch_all("""
+                    SELECT row_id AS id, symbol, price, volume, market, timestamp,
+                           change_percent, rsi, macd
+                    FROM market_data_latest 
+                    ORDER BY timestamp DESC, symbol DESC 
+                    LIMIT ?
+                """, (limit,))
+            set_next_cursor(response, rows, limit, 'symbol')
         
         return [
             MarketData(
+                id=row['id'],
                 symbol=row['symbol'],
                 price=row['price'],
                 volume=row['volume'],
@@ -174,37 +280,37 @@ async def get_market_data(limit: int = 20, symbol: Optional[str] = None):
                 macd=row['macd']
             ) for row in rows
         ]
+    except HTTPException:
+        raise
     except Exception as e:
-        conn.close()
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/v1/analysis", response_model=List[AnalysisResult])
-async def get_analysis_results(limit: int = 20, symbol: Optional[str] = None):
-    """Get latest analysis results"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
+async def get_analysis_results(response: Response, limit: int = 20, symbol: Optional[str] = None,
+                               cursor: Optional[str] = None):
+    """Get latest analysis results, keyset-paginated on (timestamp, id)"""
     try:
+        after = decode_cursor(cursor, int_key=True)
+        conditions, params = [], []
         if symbol:
-            cursor.execute("""
-                SELECT * FROM analysis_results 
-                WHERE symbol = ? 
-                ORDER BY timestamp DESC 
-                LIMIT ?
-            """, (symbol, limit))
-        else:
-            cursor.execute("""
-                SELECT * FROM analysis_results 
-                ORDER BY timestamp DESC 
-                LIMIT ?
-            """, (limit,))
+            conditions.append("symbol = ?")
+            params.append(symbol)
+        if after:
+            conditions.append("(timestamp, id) < (?, ?)")
+            params.extend([after[0], after[1]])
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        rows = await db_fetch_all(f"""
+            SELECT * FROM analysis_results 
+            {where}
+            ORDER BY timestamp DESC, id DESC 
+            LIMIT ?
+        """, (*params, limit))
+        set_next_cursor(response, rows, limit, 'id')
         
-        rows = cursor.fetchall()
-        conn.close()
+        all_features = parse_features_column([row['features'] for row in rows])
         
         results = []
-        for row in rows:
-            features = json.loads(row['features']) if row['features'] else {}
+        for row, features in zip(rows, all_features):
             results.append(AnalysisResult(
                 id=row['id'],
                 symbol=row['symbol'],
@@ -217,137 +323,146 @@ async def get_analysis_results(limit: int = 20, symbol: Optional[str] = None):
             ))
         
         return results
+    except HTTPException:
+        raise
     except Exception as e:
-        conn.close()
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.post("/api/v1/ml/predict")
-async def predict_signal(request: PredictionRequest):
-    """Ultra-advanced ML prediction"""
+SIGNAL_BANDS = [
+    # (min score, signal, confidence base, confidence anchor, confidence divisor, direction)
+    (80, "STRONG_BUY", 0.85, 80, 100, 1),
+    (65, "BUY", 0.70, 65, 67, 1),
+    (55, "HOLD_STRONG", 0.60, 55, 50, 1),
+    (45, "HOLD", 0.40, 45, 50, 1),
+    (35, "HOLD_WEAK", 0.30, 35, 50, 1),
+    (20, "SELL", 0.70, 35, 75, -1),
+    (-np.inf, "STRONG_SELL", 0.85, 20, 100, -1),
+]
+
+def score_features_batch(feature_rows: List[Dict[str, float]]) -> Dict[str, np.ndarray]:
+    """Ultra-advanced ML prediction - vectorized multi-factor scoring for N symbols"""
     
-    # Ultra-sophisticated ML simulation
-    features = request.features
+    def column(name: str) -> np.ndarray:
+        return np.array([f.get(name, np.nan) for f in feature_rows], dtype=np.float64)
     
-    # Multi-factor scoring algorithm
-    score = 50  # Base score
+    n = len(feature_rows)
+    score = np.full(n, 50.0)  # Base score
     
-    # RSI factor (0-100 scale)
-    if 'rsi' in features:
-        rsi = features['rsi']
-        if rsi < 30:  # Oversold
-            score += (30 - rsi) * 0.8
-        elif rsi > 70:  # Overbought
-            score -= (rsi - 70) * 0.8
+    # RSI factor (0-100 scale): oversold / overbought
+    rsi = column('rsi')
+    score += np.where(rsi < 30, (30 - rsi) * 0.8, 0.0)
+    score -= np.where(rsi > 70, (rsi - 70) * 0.8, 0.0)
     
     # MACD factor
-    if 'macd' in features:
-        macd = features['macd']
-        score += macd * 15
+    macd = column('macd')
+    score += np.nan_to_num(macd * 15)
     
     # Volume factor
-    if 'volume' in features:
-        volume = features['volume']
-        if volume > 1000000:  # High volume
-            score += min((volume - 1000000) / 100000, 10)
+    volume = column('volume')
+    score += np.where(volume > 1000000, np.minimum((volume - 1000000) / 100000, 10), 0.0)
     
     # Price momentum
-    if 'price_change' in features:
-        price_change = features['price_change']
-        score += price_change * 2
+    price_change = column('price_change')
+    score += np.nan_to_num(price_change * 2)
     
     # Moving average factor
-    if 'price_ma_ratio' in features:
-        ma_ratio = features['price_ma_ratio']
-        score += (ma_ratio - 1) * 20
+    ma_ratio = column('price_ma_ratio')
+    score += np.nan_to_num((ma_ratio - 1) * 20)
     
     # Normalize score to 0-100
-    score = max(0, min(100, score))
+    score = np.clip(score, 0, 100)
     
     # Advanced signal determination
-    if score >= 80:
-        signal = "STRONG_BUY"
-        confidence = 0.85 + (score - 80) / 100
-    elif score >= 65:
-        signal = "BUY"
-        confidence = 0.70 + (score - 65) / 67
-    elif score >= 55:
-        signal = "HOLD_STRONG"
-        confidence = 0.60 + (score - 55) / 50
-    elif score >= 45:
-        signal = "HOLD"
-        confidence = 0.40 + (score - 45) / 50
-    elif score >= 35:
-        signal = "HOLD_WEAK"
-        confidence = 0.30 + (score - 35) / 50
-    elif score >= 20:
-        signal = "SELL"
-        confidence = 0.70 + (35 - score) / 75
-    else:
-        signal = "STRONG_SELL"
-        confidence = 0.85 + (20 - score) / 100
+    signals = np.empty(n, dtype=object)
+    confidence = np.zeros(n)
+    assigned = np.zeros(n, dtype=bool)
+    for min_score, signal, base, anchor, divisor, direction in SIGNAL_BANDS:
+        mask = (score >= min_score) & ~assigned
+        signals[mask] = signal
+        confidence[mask] = base + direction * (score[mask] - anchor) / divisor
+        assigned |= mask
     
-    # Store prediction in database
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    return {"score": score, "signal": signals, "confidence": confidence}
+
+def _prediction_response(symbol: str, signal: str, confidence: float, score: float, timestamp: datetime) -> Dict:
+    confidence = round(float(confidence), 3)
+    return {
+        "symbol": symbol,
+        "signal": signal,
+        "confidence": confidence,
+        "ml_score": round(float(score), 2),
+        "model_version": MODEL_VERSION,
+        "timestamp": timestamp,
+        "recommendation": "Execute" if confidence > 0.7 else "Monitor" if confidence > 0.5 else "Hold",
+        "risk_level": "Low" if confidence > 0.8 else "Medium" if confidence > 0.6 else "High"
+    }
+
+async def _score_and_store(requests: List[PredictionRequest]) -> List[Dict]:
+    """Score all requests in one vectorized pass and persist them in one transaction"""
+    scored = score_features_batch([r.features for r in requests])
+    now = datetime.now()
+    
+    predictions = [
+        _prediction_response(r.symbol, scored["signal"][i], scored["confidence"][i], scored["score"][i], now)
+        for i, r in enumerate(requests)
+    ]
     
-    features_json = json.dumps(features)
-    cursor.execute("""
+    # Store predictions in database
+    await run_in_threadpool(db_pool.execute_many, """
         INSERT INTO analysis_results 
         (symbol, signal, confidence, ml_score, model_version, features)
         VALUES (?, ?, ?, ?, ?, ?)
-    """, (request.symbol, signal, round(confidence, 3), round(score, 2), 
-          "Ultra-ML-Ensemble v2.0", features_json))
+    """, [
+        (p["symbol"], p["signal"], p["confidence"], p["ml_score"], MODEL_VERSION, json.dumps(r.features))
+        for p, r in zip(predictions, requests)
+    ])
     
-    conn.commit()
-    conn.close()
+    return predictions
+
+@app.post("/api/v1/ml/predict")
+async def predict_signal(request: PredictionRequest):
+    """Ultra-advanced ML prediction"""
+    return (await _score_and_store([request]))[0]
+
+@app.post("/api/v1/ml/predict_batch")
+async def predict_signal_batch(request: BatchPredictionRequest):
+    """Score N symbols in one vectorized call"""
+    if not request.requests:
+        return {"count": 0, "predictions": []}
     
-    return {
-        "symbol": request.symbol,
-        "signal": signal,
-        "confidence": round(confidence, 3),
-        "ml_score": round(score, 2),
-        "model_version": "Ultra-ML-Ensemble v2.0",
-        "timestamp": datetime.now(),
-        "recommendation": "Execute" if confidence > 0.7 else "Monitor" if confidence > 0.5 else "Hold",
-        "risk_level": "Low" if confidence > 0.8 else "Medium" if confidence > 0.6 else "High"
-    }
+    predictions = await _score_and_store(request.requests)
+    return {"count": len(predictions), "predictions": predictions}
 
 @app.get("/api/v1/stats")
 async def get_system_stats():
     """Comprehensive system statistics"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
     try:
         # Market data stats
-        cursor.execute("SELECT COUNT(DISTINCT symbol) FROM market_data")
-        unique_symbols = cursor.fetchone()[0]
+        unique_symbols = (await db_fetch_one("SELECT COUNT(DISTINCT symbol) FROM market_data"))[0]
         
-        cursor.execute("SELECT COUNT(*) FROM market_data WHERE timestamp > datetime('now', '-24 hours')")
-        recent_data_points = cursor.fetchone()[0]
+        recent_data_points = (await db_fetch_one(
+            "SELECT COUNT(*) FROM market_data WHERE timestamp > datetime('now', '-24 hours')"
+        ))[0]
         
         # Analysis stats
-        cursor.execute("SELECT signal, COUNT(*) FROM analysis_results WHERE timestamp > datetime('now', '-24 hours') GROUP BY signal")
-        signal_distribution = dict(cursor.fetchall())
+        signal_distribution = {row[0]: row[1] for row in await db_fetch_all(
+            "SELECT signal, COUNT(*) FROM analysis_results WHERE timestamp > datetime('now', '-24 hours') GROUP BY signal"
+        )}
         
         # Top performing signals
-        cursor.execute("""
+        top_signals = await db_fetch_all("""
             SELECT symbol, signal, confidence FROM analysis_results 
             WHERE timestamp > datetime('now', '-24 hours') AND confidence > 0.8
             ORDER BY confidence DESC LIMIT 5
         """)
-        top_signals = cursor.fetchall()
         
         # System metrics
-        cursor.execute("""
+        metrics = await db_fetch_all("""
             SELECT metric_name, AVG(metric_value), MAX(metric_value) 
             FROM system_metrics 
             WHERE timestamp > datetime('now', '-1 hour')
             GROUP BY metric_name
         """)
-        metrics = cursor.fetchall()
-        
-        conn.close()
         
         return {
             "system_status": "ULTRA_OPERATIONAL",
@@ -373,7 +488,6 @@ async def get_system_stats():
             "system_health": "EXCELLENT"
         }
     except Exception as e:
-        conn.close()
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/v1/telegram/status")
@@ -399,6 +513,7 @@ if __name__ == "__main__":
     print("🔍 Health: http://localhost:8001/health")
     print("📊 Market Data: http://localhost:8001/api/v1/market-data")
     print("🤖 ML Predict: http://localhost:8001/api/v1/ml/predict")
+    print("📦 ML Batch Predict: http://localhost:8001/api/v1/ml/predict_batch")
     print("📈 Stats: http://localhost:8001/api/v1/stats")
     print("🎯 Status: ULTRA STABLE & PRODUCTION READY")
     print("=" * 70)
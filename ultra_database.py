@@ -10,6 +10,195 @@ import json
 from datetime import datetime, timedelta
 import random
 
+# Latest-per-symbol snapshots, kept current by insert triggers, plus daily rollups
+SNAPSHOT_SCHEMA = [
+    # Covering indexes for keyset pagination
+    "CREATE INDEX IF NOT EXISTS idx_market_symbol_ts_desc ON market_data(symbol, timestamp DESC, id DESC)",
+    "CREATE INDEX IF NOT EXISTS idx_market_ts_desc ON market_data(timestamp DESC, id DESC)",
+    "CREATE INDEX IF NOT EXISTS idx_analysis_symbol_ts_desc ON analysis_results(symbol, timestamp DESC, id DESC)",
+    "CREATE INDEX IF NOT EXISTS idx_analysis_ts_desc ON analysis_results(timestamp DESC, id DESC)",
+    """
+    CREATE TABLE IF NOT EXISTS market_data_latest (
+        symbol TEXT PRIMARY KEY,
+        row_id INTEGER NOT NULL,
+        price REAL NOT NULL,
+        volume INTEGER,
+        market TEXT,
+        timestamp DATETIME,
+        change_percent REAL,
+        rsi REAL,
+        macd REAL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_market_latest_ts ON market_data_latest(timestamp DESC, symbol DESC)",
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_market_data_latest
+    AFTER INSERT ON market_data
+    BEGIN
+        INSERT INTO market_data_latest
+        (symbol, row_id, price, volume, market, timestamp, change_percent, rsi, macd)
+        VALUES (NEW.symbol, NEW.id, NEW.price, NEW.volume, NEW.market, NEW.timestamp,
+                NEW.change_percent, NEW.rsi, NEW.macd)
+        ON CONFLICT(symbol) DO UPDATE SET
+            row_id = excluded.row_id, price = excluded.price, volume = excluded.volume,
+            market = excluded.market, timestamp = excluded.timestamp,
+            change_percent = excluded.change_percent, rsi = excluded.rsi, macd = excluded.macd
+        WHERE excluded.timestamp >= market_data_latest.timestamp;
+    END
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS analysis_latest (
+        symbol TEXT PRIMARY KEY,
+        row_id INTEGER NOT NULL,
+        signal TEXT NOT NULL,
+        confidence REAL NOT NULL,
+        ml_score REAL,
+        model_version TEXT,
+        timestamp DATETIME,
+        features TEXT
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_analysis_latest_ts ON analysis_latest(timestamp DESC, symbol DESC)",
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_analysis_latest
+    AFTER INSERT ON analysis_results
+    BEGIN
+        INSERT INTO analysis_latest
+        (symbol, row_id, signal, confidence, ml_score, model_version, timestamp, features)
+        VALUES (NEW.symbol, NEW.id, NEW.signal, NEW.confidence, NEW.ml_score, NEW.model_version,
+                NEW.timestamp, NEW.features)
+        ON CONFLICT(symbol) DO UPDATE SET
+            row_id = excluded.row_id, signal = excluded.signal, confidence = excluded.confidence,
+            ml_score = excluded.ml_score, model_version = excluded.model_version,
+            timestamp = excluded.timestamp, features = excluded.features
+        WHERE excluded.timestamp >= analysis_latest.timestamp;
+    END
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS market_data_daily (
+        symbol TEXT NOT NULL,
+        day TEXT NOT NULL,
+        market TEXT,
+        open REAL,
+        high REAL,
+        low REAL,
+        close REAL,
+        volume INTEGER,
+        avg_rsi REAL,
+        samples INTEGER NOT NULL,
+        PRIMARY KEY (symbol, day)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS analysis_daily (
+        symbol TEXT NOT NULL,
+        day TEXT NOT NULL,
+        avg_ml_score REAL,
+        avg_confidence REAL,
+        last_signal TEXT,
+        samples INTEGER NOT NULL,
+        PRIMARY KEY (symbol, day)
+    )
+    """,
+]
+
+SNAPSHOT_BACKFILL = [
+    """
+    INSERT OR IGNORE INTO market_data_latest
+    (symbol, row_id, price, volume, market, timestamp, change_percent, rsi, macd)
+    SELECT m.symbol, m.id, m.price, m.volume, m.market, m.timestamp, m.change_percent, m.rsi, m.macd
+    FROM market_data m
+    WHERE m.id = (SELECT x.id FROM market_data x WHERE x.symbol = m.symbol
+                  ORDER BY x.timestamp DESC, x.id DESC LIMIT 1)
+    """,
+    """
+    INSERT OR IGNORE INTO analysis_latest
+    (symbol, row_id, signal, confidence, ml_score, model_version, timestamp, features)
+    SELECT a.symbol, a.id, a.signal, a.confidence, a.ml_score, a.model_version, a.timestamp, a.features
+    FROM analysis_results a
+    WHERE a.id = (SELECT x.id FROM analysis_results x WHERE x.symbol = a.symbol
+                  ORDER BY x.timestamp DESC, x.id DESC LIMIT 1)
+    """,
+]
+
+def ensure_snapshot_schema(conn: sqlite3.Connection):
+    """Create snapshot tables, triggers and covering indexes; backfill from history"""
+    with conn:
+        for statement in SNAPSHOT_SCHEMA:
+            conn.execute(statement)
+        for statement in SNAPSHOT_BACKFILL:
+            conn.execute(statement)
+
+def compact_history(conn: sqlite3.Connection, retention_days: int = 30) -> dict:
+    """Roll rows older than retention_days into daily aggregates and delete them"""
+    cutoff = (datetime.now() - timedelta(days=retention_days)).strftime('%Y-%m-%d')
+    
+    with conn:
+        conn.execute("""
+            INSERT INTO market_data_daily
+            (symbol, day, market, open, high, low, close, volume, avg_rsi, samples)
+            SELECT symbol, day, market,
+                   (SELECT price FROM market_data f WHERE f.symbol = g.symbol AND date(f.timestamp) = g.day
+                    ORDER BY f.timestamp, f.id LIMIT 1),
+                   high, low,
+                   (SELECT price FROM market_data l WHERE l.symbol = g.symbol AND date(l.timestamp) = g.day
+                    ORDER BY l.timestamp DESC, l.id DESC LIMIT 1),
+                   volume, avg_rsi, samples
+            FROM (
+                SELECT symbol, date(timestamp) AS day, MAX(market) AS market, MAX(price) AS high,
+                       MIN(price) AS low, SUM(volume) AS volume, AVG(rsi) AS avg_rsi, COUNT(*) AS samples
+                FROM market_data
+                WHERE timestamp < ? AND id NOT IN (SELECT row_id FROM market_data_latest)
+                GROUP BY symbol, date(timestamp)
+            ) g
+            WHERE true
+            ON CONFLICT(symbol, day) DO UPDATE SET
+                high = MAX(market_data_daily.high, excluded.high),
+                low = MIN(market_data_daily.low, excluded.low),
+                close = excluded.close,
+                volume = market_data_daily.volume + excluded.volume,
+                avg_rsi = (market_data_daily.avg_rsi * market_data_daily.samples
+                           + excluded.avg_rsi * excluded.samples)
+                          / (market_data_daily.samples + excluded.samples),
+                samples = market_data_daily.samples + excluded.samples
+        """, (cutoff,))
+        market_deleted = conn.execute(
+            "DELETE FROM market_data WHERE timestamp < ? AND id NOT IN (SELECT row_id FROM market_data_latest)",
+            (cutoff,)
+        ).rowcount
+        
+        conn.execute("""
+            INSERT INTO analysis_daily
+            (symbol, day, avg_ml_score, avg_confidence, last_signal, samples)
+            SELECT symbol, day, avg_ml_score, avg_confidence,
+                   (SELECT signal FROM analysis_results l WHERE l.symbol = g.symbol AND date(l.timestamp) = g.day
+                    ORDER BY l.timestamp DESC, l.id DESC LIMIT 1),
+                   samples
+            FROM (
+                SELECT symbol, date(timestamp) AS day, AVG(ml_score) AS avg_ml_score,
+                       AVG(confidence) AS avg_confidence, COUNT(*) AS samples
+                FROM analysis_results
+                WHERE timestamp < ? AND id NOT IN (SELECT row_id FROM analysis_latest)
+                GROUP BY symbol, date(timestamp)
+            ) g
+            WHERE true
+            ON CONFLICT(symbol, day) DO UPDATE SET
+                avg_ml_score = (analysis_daily.avg_ml_score * analysis_daily.samples
+                                + excluded.avg_ml_score * excluded.samples)
+                               / (analysis_daily.samples + excluded.samples),
+                avg_confidence = (analysis_daily.avg_confidence * analysis_daily.samples
+                                  + excluded.avg_confidence * excluded.samples)
+                                 / (analysis_daily.samples + excluded.samples),
+                last_signal = excluded.last_signal,
+                samples = analysis_daily.samples + excluded.samples
+        """, (cutoff,))
+        analysis_deleted = conn.execute(
+            "DELETE FROM analysis_results WHERE timestamp < ? AND id NOT IN (SELECT row_id FROM analysis_latest)",
+            (cutoff,)
+        ).rowcount
+    
+    return {'market_data_compacted': market_deleted, 'analysis_compacted': analysis_deleted, 'cutoff': cutoff}
+
 class UltraLightweightDB:
     def __init__(self, db_path="data/planb_ultra.db"):
         self.db_path = db_path
@@ -79,6 +268,7 @@ class UltraLightweightDB:
         cursor.execute("CREATE INDEX IF NOT EXISTS idx_decisions_status ON user_decisions(execution_status)")
         
         conn.commit()
+        ensure_snapshot_schema(conn)
         conn.close()
         print("✅ Ultra Lightweight Database initialized")
     
@@ -212,6 +402,18 @@ class UltraLightweightDB:
         conn.close()
         print("✅ Ultra-realistic sample data inserted")
     
+    def compact(self, retention_days: int = 30) -> dict:
+        """Retention job: roll old rows into daily aggregates"""
+        conn = sqlite3.connect(self.db_path)
+        try:
+            result = compact_history(conn, retention_days)
+            conn.execute("PRAGMA optimize")
+        finally:
+            conn.close()
+        print(f"🗜️ Compacted {result['market_data_compacted']} market rows, "
+              f"{result['analysis_compacted']} analysis rows (before {result['cutoff']})")
+        return result
+    
     def get_stats(self):
         """Get database statistics"""
         conn = sqlite3.connect(self.db_path)
@@ -241,6 +443,13 @@ class UltraLightweightDB:
         return stats
 
 if __name__ == "__main__":
+    import sys
+    
+    if len(sys.argv) > 1 and sys.argv[1] == "--compact":
+        retention = int(sys.argv[2]) if len(sys.argv) > 2 else 30
+        UltraLightweightDB().compact(retention)
+        sys.exit(0)
+    
     print("🚀 Initializing Ultra Lightweight Database...")
     
     db = UltraLightweightDB()
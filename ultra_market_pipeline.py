@@ -13,11 +13,15 @@ from datetime import datetime, timedelta
 import yfinance as yf
 import pandas as pd
 import numpy as np
-from typing import Dict, List
+from typing import Dict, List, Optional
+from concurrent.futures import ThreadPoolExecutor
 import random
 
+ML_API_URL = "http://localhost:8001"
+
 class UltraMarketDataPipeline:
-    def __init__(self):
+    def __init__(self, max_concurrency: int = 16, connection_limit: int = 20,
+                 ml_api_url: str = ML_API_URL, history_bars: int = 390):
         self.db_path = "data/planb_ultra.db"
         self.symbols = {
             'BIST': ['THYAO.IS', 'AKBNK.IS', 'ISCTR.IS', 'TCELL.IS', 'SAHOL.IS'],
@@ -25,38 +29,98 @@ class UltraMarketDataPipeline:
             'CRYPTO': ['BTC-USD', 'ETH-USD', 'SOL-USD', 'ADA-USD'],
             'FOREX': ['EURUSD=X', 'GBPUSD=X', 'USDJPY=X']
         }
+        self.max_concurrency = max_concurrency
+        self.connection_limit = connection_limit
+        self.ml_api_url = ml_api_url
+        self.history_bars = history_bars
+        
+        # Shared I/O resources (opened lazily inside the running loop)
+        self.session: Optional[aiohttp.ClientSession] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self.batch_predict_supported = True
+        
+        # Per-symbol 1m history, extended with deltas instead of re-downloading
+        self.history: Dict[str, pd.DataFrame] = {}
+        
+        # Per-stage timings of the last cycle
+        self.stage_metrics: Dict[str, float] = {}
         
     def get_db_connection(self):
         """Get database connection"""
         conn = sqlite3.connect(self.db_path)
         return conn
     
+    async def get_session(self) -> aiohttp.ClientSession:
+        """Shared HTTP session with connection limits"""
+        if self.session is None or self.session.closed:
+            connector = aiohttp.TCPConnector(limit=self.connection_limit, limit_per_host=self.connection_limit)
+            self.session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=15)
+            )
+        return self.session
+    
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        """Shared executor for blocking calls, recreated after close() like the session"""
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_concurrency)
+        return self._executor
+    
+    async def close(self):
+        """Release shared session and executor"""
+        if self.session is not None and not self.session.closed:
+            await self.session.close()
+        self.session = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+        self._executor = None
+    
+    def _download_history(self, symbol: str) -> pd.DataFrame:
+        """Blocking yfinance call - runs in the executor, fetches only new bars"""
+        ticker = yf.Ticker(symbol)
+        cached = self.history.get(symbol)
+        
+        if cached is None or cached.empty:
+            hist = ticker.history(period="1d", interval="1m")
+        else:
+            delta = ticker.history(start=cached.index[-1].to_pydatetime(), interval="1m")
+            hist = pd.concat([cached, delta])
+            hist = hist[~hist.index.duplicated(keep='last')]
+        
+        hist = hist.tail(self.history_bars)
+        self.history[symbol] = hist
+        return hist
+    
+    def _build_market_record(self, symbol: str, hist: pd.DataFrame) -> Optional[Dict]:
+        """Turn 1m history into a market_data record"""
+        if hist is None or hist.empty:
+            return None
+        
+        latest = hist.iloc[-1]
+        close = hist['Close'].values
+        
+        # Calculate technical indicators
+        rsi = self.calculate_rsi(close)
+        macd = self.calculate_macd(close)
+        
+        return {
+            'symbol': symbol.replace('.IS', '').replace('-USD', '').replace('=X', ''),
+            'price': float(latest['Close']),
+            'volume': int(latest['Volume']) if not pd.isna(latest['Volume']) else 0,
+            'change_percent': float((latest['Close'] - close[-2]) / close[-2] * 100) if len(hist) > 1 else 0,
+            'rsi': rsi,
+            'macd': macd,
+            'timestamp': datetime.now(),
+            'market': self.get_market_for_symbol(symbol)
+        }
+    
     async def fetch_real_data(self, symbol: str) -> Dict:
-        """Fetch real market data for symbol"""
+        """Fetch real market data for symbol without blocking the event loop"""
         try:
-            # Use yfinance for real data
-            ticker = yf.Ticker(symbol)
-            hist = ticker.history(period="1d", interval="1m")
-            
-            if hist.empty:
-                return None
-            
-            latest = hist.iloc[-1]
-            
-            # Calculate technical indicators
-            rsi = self.calculate_rsi(hist['Close'].values)
-            macd = self.calculate_macd(hist['Close'].values)
-            
-            return {
-                'symbol': symbol.replace('.IS', '').replace('-USD', '').replace('=X', ''),
-                'price': float(latest['Close']),
-                'volume': int(latest['Volume']) if not pd.isna(latest['Volume']) else 0,
-                'change_percent': float((latest['Close'] - hist['Close'].iloc[-2]) / hist['Close'].iloc[-2] * 100) if len(hist) > 1 else 0,
-                'rsi': rsi,
-                'macd': macd,
-                'timestamp': datetime.now(),
-                'market': self.get_market_for_symbol(symbol)
-            }
+            loop = asyncio.get_running_loop()
+            hist = await loop.run_in_executor(self.executor, self._download_history, symbol)
+            return self._build_market_record(symbol, hist)
             
         except Exception as e:
             print(f"❌ Error fetching {symbol}: {e}")
@@ -106,88 +170,167 @@ class UltraMarketDataPipeline:
     
     def store_market_data(self, data: Dict):
         """Store market data in database"""
+        self.store_market_data_batch([data])
+    
+    def store_market_data_batch(self, records: List[Dict]) -> int:
+        """Store a whole cycle of market data in one transaction"""
+        if not records:
+            return 0
+        
         conn = self.get_db_connection()
-        cursor = conn.cursor()
         
         try:
-            cursor.execute("""
-                INSERT INTO market_data 
-                (symbol, price, volume, market, timestamp, change_percent, rsi, macd)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-            """, (
-                data['symbol'], data['price'], data['volume'], data['market'],
-                data['timestamp'], data['change_percent'], data['rsi'], data['macd']
-            ))
+            with conn:
+                conn.executemany("""
+                    INSERT INTO market_data 
+                    (symbol, price, volume, market, timestamp, change_percent, rsi, macd)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                """, [
+                    (data['symbol'], data['price'], data['volume'], data['market'],
+                     data['timestamp'], data['change_percent'], data['rsi'], data['macd'])
+                    for data in records
+                ])
             
-            conn.commit()
-            print(f"✅ Stored: {data['symbol']} @ ${data['price']:.2f}")
+            print(f"✅ Stored: {len(records)} market data rows")
+            return len(records)
             
         except Exception as e:
-            print(f"❌ Store error for {data['symbol']}: {e}")
+            print(f"❌ Batch store error ({len(records)} rows): {e}")
+            return 0
         finally:
             conn.close()
     
+    @staticmethod
+    def _build_features(market_data: Dict) -> Dict:
+        """Prepare features for ML model"""
+        return {
+            'rsi': market_data['rsi'],
+            'macd': market_data['macd'],
+            'price': market_data['price'],
+            'volume': market_data['volume'],
+            'price_change': market_data['change_percent']
+        }
+    
+    async def _handle_prediction(self, prediction: Dict):
+        print(f"🤖 ML Prediction for {prediction['symbol']}: {prediction['signal']} ({prediction['confidence']:.1%})")
+        
+        # If high confidence, trigger Telegram notification
+        if prediction['confidence'] > 0.75:
+            await self.send_high_confidence_alert(prediction)
+    
     async def run_ml_analysis(self, symbol: str, market_data: Dict):
         """Run ML analysis and generate signals"""
         try:
-            # Prepare features for ML model
-            features = {
-                'rsi': market_data['rsi'],
-                'macd': market_data['macd'],
-                'price': market_data['price'],
-                'volume': market_data['volume'],
-                'price_change': market_data['change_percent']
-            }
-            
-            # Call ML prediction API
-            async with aiohttp.ClientSession() as session:
-                async with session.post(
-                    'http://localhost:8001/api/v1/ml/predict',
-                    json={'symbol': symbol, 'features': features},
-                    timeout=aiohttp.ClientTimeout(total=15)
-                ) as response:
-                    if response.status == 200:
-                        prediction = await response.json()
-                        print(f"🤖 ML Prediction for {symbol}: {prediction['signal']} ({prediction['confidence']:.1%})")
-                        
-                        # If high confidence, trigger Telegram notification
-                        if prediction['confidence'] > 0.75:
-                            await self.send_high_confidence_alert(prediction)
-                    else:
-                        print(f"❌ ML API error for {symbol}: {response.status}")
+            session = await self.get_session()
+            async with session.post(
+                f'{self.ml_api_url}/api/v1/ml/predict',
+                json={'symbol': symbol, 'features': self._build_features(market_data)}
+            ) as response:
+                if response.status == 200:
+                    await self._handle_prediction(await response.json())
+                else:
+                    print(f"❌ ML API error for {symbol}: {response.status}")
                         
         except Exception as e:
             print(f"❌ ML Analysis error for {symbol}: {e}")
     
+    async def run_ml_analysis_batch(self, records: List[Dict]) -> int:
+        """Score a whole cycle with one /predict_batch call (per-symbol fallback)"""
+        if not records:
+            return 0
+        
+        if self.batch_predict_supported:
+            try:
+                session = await self.get_session()
+                payload = {'requests': [
+                    {'symbol': data['symbol'], 'features': self._build_features(data)}
+                    for data in records
+                ]}
+                async with session.post(f'{self.ml_api_url}/api/v1/ml/predict_batch', json=payload) as response:
+                    if response.status == 200:
+                        predictions = (await response.json()).get('predictions', [])
+                        for prediction in predictions:
+                            await self._handle_prediction(prediction)
+                        return len(predictions)
+                    if response.status in (404, 405):
+                        # Older API server without the batch endpoint
+                        self.batch_predict_supported = False
+                    else:
+                        print(f"❌ ML batch API error: {response.status}")
+                        return 0
+            except Exception as e:
+                print(f"❌ ML batch analysis error: {e}")
+                return 0
+        
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        
+        async def bounded(data):
+            async with semaphore:
+                await self.run_ml_analysis(data['symbol'], data)
+        
+        await asyncio.gather(*(bounded(data) for data in records))
+        return len(records)
+    
     async def send_high_confidence_alert(self, prediction: Dict):
         """Send high confidence signal alert"""
         # This would integrate with Telegram bot
         print(f"🚨 HIGH CONFIDENCE ALERT: {prediction['symbol']} - {prediction['signal']} ({prediction['confidence']:.1%})")
     
+    async def fetch_symbols(self, symbols: List[str]) -> List[Dict]:
+        """Bounded-concurrency fan-out over symbols"""
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        
+        async def bounded(symbol):
+            async with semaphore:
+                return await self.fetch_real_data(symbol)
+        
+        results = await asyncio.gather(*(bounded(s) for s in symbols), return_exceptions=True)
+        return [r for r in results if r is not None and not isinstance(r, Exception)]
+    
+    async def process_records(self, records: List[Dict]):
+        """Bulk store + batched ML for one set of records, timing each stage"""
+        loop = asyncio.get_running_loop()
+        
+        stage_start = time.time()
+        await loop.run_in_executor(self.executor, self.store_market_data_batch, records)
+        self.stage_metrics['stage_store_seconds'] = time.time() - stage_start
+        
+        stage_start = time.time()
+        await self.run_ml_analysis_batch(records)
+        self.stage_metrics['stage_ml_seconds'] = time.time() - stage_start
+    
     async def collect_data_for_market(self, market: str):
         """Collect data for all symbols in a market"""
         symbols = self.symbols.get(market, [])
         
         print(f"📊 Collecting {market} data for {len(symbols)} symbols...")
         
-        tasks = []
-        for symbol in symbols:
-            task = self.fetch_real_data(symbol)
-            tasks.append(task)
-        
-        results = await asyncio.gather(*tasks, return_exceptions=True)
+        stage_start = time.time()
+        valid_results = await self.fetch_symbols(symbols)
+        self.stage_metrics['stage_fetch_seconds'] = time.time() - stage_start
         
-        valid_results = [r for r in results if r is not None and not isinstance(r, Exception)]
-        
-        # Store valid results
-        for data in valid_results:
-            self.store_market_data(data)
-            # Run ML analysis
-            await self.run_ml_analysis(data['symbol'], data)
+        await self.process_records(valid_results)
         
         print(f"✅ {market}: {len(valid_results)}/{len(symbols)} symbols processed")
         return len(valid_results)
     
+    async def run_cycle(self) -> int:
+        """One pipeline cycle: fetch every market concurrently, then store and score in bulk"""
+        all_symbols = [symbol for symbols in self.symbols.values() for symbol in symbols]
+        self.stage_metrics = {}
+        
+        stage_start = time.time()
+        records = await self.fetch_symbols(all_symbols)
+        self.stage_metrics['stage_fetch_seconds'] = time.time() - stage_start
+        
+        await self.process_records(records)
+        
+        print(f"📊 {len(records)}/{len(all_symbols)} symbols | " + ", ".join(
+            f"{name.replace('stage_', '').replace('_seconds', '')}: {value:.2f}s"
+            for name, value in self.stage_metrics.items()
+        ))
+        return len(records)
+    
     async def run_continuous_pipeline(self):
         """Run continuous data collection pipeline"""
         print("🚀 Starting Ultra Market Data Pipeline...")
@@ -195,34 +338,35 @@ class UltraMarketDataPipeline:
         
         cycle_count = 0
         
-        while True:
-            try:
-                cycle_count += 1
-                start_time = time.time()
-                
-                print(f"\n🔄 Pipeline Cycle #{cycle_count} - {datetime.now().strftime('%H:%M:%S')}")
-                
-                # Collect data for all markets
-                total_processed = 0
-                for market in self.symbols.keys():
-                    processed = await self.collect_data_for_market(market)
-                    total_processed += processed
-                    await asyncio.sleep(2)  # Rate limiting
-                
-                # Update system metrics
-                self.update_system_metrics(total_processed, time.time() - start_time)
-                
-                print(f"✅ Cycle #{cycle_count} completed: {total_processed} symbols in {time.time() - start_time:.1f}s")
-                
-                # Wait for next cycle
-                await asyncio.sleep(60)
-                
-            except KeyboardInterrupt:
-                print("\n🛑 Pipeline stopped by user")
-                break
-            except Exception as e:
-                print(f"❌ Pipeline error: {e}")
-                await asyncio.sleep(30)  # Wait before retry
+        try:
+            while True:
+                try:
+                    cycle_count += 1
+                    start_time = time.time()
+                    
+                    print(f"\n🔄 Pipeline Cycle #{cycle_count} - {datetime.now().strftime('%H:%M:%S')}")
+                    
+                    total_processed = await self.run_cycle()
+                    cycle_time = time.time() - start_time
+                    
+                    # Update system metrics
+                    await asyncio.get_running_loop().run_in_executor(
+                        self.executor, self.update_system_metrics, total_processed, cycle_time
+                    )
+                    
+                    print(f"✅ Cycle #{cycle_count} completed: {total_processed} symbols in {cycle_time:.1f}s")
+                    
+                    # Wait for next cycle
+                    await asyncio.sleep(max(60 - cycle_time, 0))
+                    
+                except KeyboardInterrupt:
+                    print("\n🛑 Pipeline stopped by user")
+                    break
+                except Exception as e:
+                    print(f"❌ Pipeline error: {e}")
+                    await asyncio.sleep(30)  # Wait before retry
+        finally:
+            await self.close()
     
     def update_system_metrics(self, symbols_processed: int, cycle_time: float):
         """Update system performance metrics"""
@@ -234,13 +378,13 @@ class UltraMarketDataPipeline:
                 ('symbols_processed_per_cycle', symbols_processed),
                 ('cycle_time_seconds', cycle_time),
                 ('data_collection_rate', symbols_processed / cycle_time if cycle_time > 0 else 0)
-            ]
+            ] + list(self.stage_metrics.items())
             
-            for metric_name, value in metrics:
-                cursor.execute("""
-                    INSERT INTO system_metrics (metric_name, metric_value, timestamp)
-                    VALUES (?, ?, ?)
-                """, (metric_name, value, datetime.now()))
+            now = datetime.now()
+            cursor.executemany("""
+                INSERT INTO system_metrics (metric_name, metric_value, timestamp)
+                VALUES (?, ?, ?)
+            """, [(metric_name, value, now) for metric_name, value in metrics])
             
             conn.commit()
             
@@ -253,10 +397,10 @@ class UltraMarketDataPipeline:
         """Run single data collection cycle for testing"""
         print("🧪 Running single test cycle...")
         
-        total_processed = 0
-        for market in self.symbols.keys():
-            processed = await self.collect_data_for_market(market)
-            total_processed += processed
+        try:
+            total_processed = await self.run_cycle()
+        finally:
+            await self.close()
         
         print(f"✅ Test cycle completed: {total_processed} symbols processed")
         return total_processed
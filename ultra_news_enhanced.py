@@ -17,6 +17,12 @@ warnings.filterwarnings('ignore')
 
 from multi_expert_engine import ExpertModule, ModuleResult
 
+try:
+    from src.analysis.lexicon_sentiment import LexiconSentimentScorer
+    BATCH_SENTIMENT_AVAILABLE = True
+except ImportError:
+    BATCH_SENTIMENT_AVAILABLE = False
+
 logger = logging.getLogger(__name__)
 
 @dataclass
@@ -103,6 +109,16 @@ class UltraNewsModule(ExpertModule):
             }
         }
         
+        # Batch scorer over the same keyword lists (both languages)
+        self.sentiment_scorer = None
+        if BATCH_SENTIMENT_AVAILABLE:
+            keywords = {kind: [w for lang in ("tr", "en") for w in words[lang]]
+                        for kind, words in self.sentiment_keywords.items()}
+            self.sentiment_scorer = LexiconSentimentScorer.from_keywords(
+                keywords["positive"], keywords["negative"], keywords["uncertainty"],
+                stem_terms=[w for words in self.sentiment_keywords.values() for w in words["tr"]]
+            )
+        
         # News impact multipliers by category
         self.impact_multipliers = {
             "monetary_policy": 0.9,  # Very high impact
@@ -283,8 +299,23 @@ class UltraNewsModule(ExpertModule):
             logger.error(f"Error simulating news data: {str(e)}")
             return []
     
+    def analyze_sentiment_batch(self, texts: List[str]) -> np.ndarray:
+        """Analyze sentiment of many texts at once (-1..1 per text)"""
+        if self.sentiment_scorer is None:
+            return np.array([self.analyze_sentiment(text) for text in texts])
+        try:
+            sentiments = self.sentiment_scorer.score_texts(texts)
+            # Add some noise to make it more realistic
+            sentiments = sentiments + np.random.normal(0, 0.1, len(sentiments))
+            return np.clip(sentiments, -1, 1)
+        except Exception as e:
+            logger.error(f"Error analyzing sentiment batch: {str(e)}")
+            return np.zeros(len(texts))
+    
     def analyze_sentiment(self, text: str, language: str = "auto") -> float:
         """Analyze sentiment of text"""
+        if self.sentiment_scorer is not None:
+            return float(self.analyze_sentiment_batch([text])[0])
         try:
             text_lower = text.lower()
             
@@ -18,6 +18,14 @@ warnings.filterwarnings('ignore')
 
 from multi_expert_engine import ExpertModule, ModuleResult
 
+# Paylaşılan multi-timeframe bar deposu
+try:
+    from src.data.bar_aggregator import bar_aggregator, rollup_arrays, TIMEFRAME_SECONDS
+    from src.data.market_sessions import get_session, market_for_symbol
+    BAR_AGGREGATOR_AVAILABLE = True
+except ImportError:
+    BAR_AGGREGATOR_AVAILABLE = False
+
 logger = logging.getLogger(__name__)
 
 @dataclass
@@ -139,47 +147,58 @@ class UltraTechnicalModule(ExpertModule):
         """Gerekli veri alanları"""
         return ["symbol", "open", "high", "low", "close", "volume", "timestamp"]
     
+    def get_multi_timeframe_data(self, symbol: str) -> Dict[str, pd.DataFrame]:
+        """
+        Multi-timeframe veri - paylaşılan bar aggregator'dan
+        Sembol depoda yoksa 1m barlar bir kez cache'den yüklenir; özetler artımlı tutulur
+        """
+        if BAR_AGGREGATOR_AVAILABLE:
+            if not bar_aggregator.has_symbol(symbol):
+                bar_aggregator.load_from_cache(symbol)
+            timeframe_data = bar_aggregator.get_timeframe_data(symbol, self.timeframes)
+            if self.primary_timeframe in timeframe_data:
+                return {tf: df.reset_index() for tf, df in timeframe_data.items()}
+        
+        return self.simulate_multi_timeframe_data(symbol)
+    
     def simulate_multi_timeframe_data(self, symbol: str, periods: int = 500) -> Dict[str, pd.DataFrame]:
         """
-        Multi-timeframe veri simülasyonu
-        Gerçek uygulamada API'den gelecek
+        Multi-timeframe veri simülasyonu (gerçek veri yoksa fallback)
+        1m barlar vektörel üretilir, özetler resample yerine reduceat ile çıkarılır
         """
         # Base data generation (1 minute data)
-        np.random.seed(42)
+        rng = np.random.default_rng(42)
         dates = pd.date_range(start=datetime.now() - timedelta(days=30), periods=periods, freq='1min')
         
-        # Base price ve random walk
-        base_price = 100.0
-        price_changes = np.random.normal(0, 0.02, periods)
-        prices = [base_price]
-        
-        for change in price_changes[1:]:
-            new_price = prices[-1] * (1 + change)
-            prices.append(max(1.0, new_price))  # Fiyat 1'den küçük olamaz
+        # Base price ve random walk - fiyat 1'den küçük olamaz
+        price_changes = rng.normal(0, 0.02, periods)
+        price_changes[0] = 0.0
+        prices = np.maximum(1.0, 100.0 * np.cumprod(1 + price_changes))
         
         # OHLCV data generation
-        data_1m = []
-        for i, price in enumerate(prices):
-            high = price * (1 + abs(np.random.normal(0, 0.01)))
-            low = price * (1 - abs(np.random.normal(0, 0.01)))
-            open_price = prices[i-1] if i > 0 else price
-            close_price = price
-            volume = np.random.randint(1000, 10000)
-            
-            data_1m.append({
-                "timestamp": dates[i],
-                "open": open_price,
-                "high": high,
-                "low": low,
-                "close": close_price,
-                "volume": volume
-            })
-        
-        df_1m = pd.DataFrame(data_1m)
+        df_1m = pd.DataFrame({
+            "timestamp": dates,
+            "open": np.concatenate(([prices[0]], prices[:-1])),
+            "high": prices * (1 + np.abs(rng.normal(0, 0.01, periods))),
+            "low": prices * (1 - np.abs(rng.normal(0, 0.01, periods))),
+            "close": prices,
+            "volume": rng.integers(1000, 10000, periods).astype(float)
+        })
         
         # Multi-timeframe conversion
         timeframe_data = {"1m": df_1m}
         
+        if BAR_AGGREGATOR_AVAILABLE:
+            ts = dates.values.astype('datetime64[s]').astype(np.int64)
+            values = df_1m[["open", "high", "low", "close", "volume"]].to_numpy()
+            session = get_session(market_for_symbol(symbol))
+            for tf in self.timeframes[1:]:
+                bucket_ts, bucket_values = rollup_arrays(ts, values, TIMEFRAME_SECONDS[tf], session)
+                df_tf = pd.DataFrame(bucket_values, columns=["open", "high", "low", "close", "volume"])
+                df_tf.insert(0, "timestamp", pd.to_datetime(bucket_ts, unit='s'))
+                timeframe_data[tf] = df_tf
+            return timeframe_data
+        
         # 5m, 15m, 1h, 4h, 1d timeframes
         resample_rules = {
             "5m": "5min",
@@ -366,8 +385,8 @@ class UltraTechnicalModule(ExpertModule):
         try:
             symbol = raw_data["symbol"]
             
-            # Multi-timeframe data simulation
-            timeframe_data = self.simulate_multi_timeframe_data(symbol)
+            # Multi-timeframe data (shared aggregator, simulation fallback)
+            timeframe_data = self.get_multi_timeframe_data(symbol)
             
             # Ana timeframe'deki veriyi işle
             main_df = timeframe_data[self.primary_timeframe].copy()
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+PlanB Motoru - WebSocket broadcast benchmark
+
+Sahte istemcilere sembol tiki yayınını eski yolla (her tikte json.dumps + istemcilere sırayla
+gönderim) ve yayın/abonelik katmanıyla (paylaşılan parçalar, birleştirilmiş toplu kareler,
+istemci başına gönderici) karşılaştırır. Bir istemci yavaş tutulur.
+
+Kullanım:
+    python websocket_benchmark.py --clients 300 --symbols 1000 --rounds 3 --slow-delay 0.05
+"""
+
+import argparse
+import asyncio
+import json
+import time
+from datetime import datetime
+
+from src.dashboard.websocket_handler import WebSocketHandler
+
+
+class SinkSocket:
+    """Gönderilen kareleri sayan istemci; `delay` ile yavaş istemci taklidi"""
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.frames = 0
+        self.bytes = 0
+        self.remote_address = ('bench', 0)
+        self.inbox = asyncio.Event()
+
+    async def send(self, frame: str):
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        self.frames += 1
+        self.bytes += len(frame)
+
+    async def close(self):
+        self.inbox.set()
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        await self.inbox.wait()
+        raise StopAsyncIteration
+
+
+def ticks(symbols, round_no):
+    return [(symbol, {'symbol': symbol, 'close': 100.0 + round_no + i * 0.01, 'volume': 1000.0 + round_no,
+                      'open': 100.0, 'high': 101.0, 'low': 99.0,
+                      'timestamp': f"2025-03-14T15:{round_no % 60:02d}:00"})
+            for i, symbol in enumerate(symbols)]
+
+
+async def legacy(clients, symbols, rounds) -> float:
+    """Eski broadcast_update: her tik serileştirilir, istemcilere sırayla gönderilir"""
+    started = time.perf_counter()
+    for round_no in range(rounds):
+        for symbol, data in ticks(symbols, round_no):
+            message = json.dumps({"type": "price_update", "symbol": symbol, "data": data,
+                                  "timestamp": datetime.now().isoformat()})
+            for client in clients:
+                await client.send(message)
+    return time.perf_counter() - started
+
+
+async def pubsub(clients, symbols, rounds, flush_interval) -> tuple:
+    handler = WebSocketHandler(flush_interval=flush_interval)
+    handler.loop = asyncio.get_running_loop()
+    tasks = [asyncio.create_task(handler.register_client(client)) for client in clients]
+    await asyncio.sleep(0.05)
+    fast = [client for client in clients if not client.delay]
+
+    started = time.perf_counter()
+    for round_no in range(rounds):
+        for symbol, data in ticks(symbols, round_no):
+            await handler.send_price_update(symbol, data)
+        # Hızlı istemcilerin bu turu alması beklenir; yavaş istemci beklenmez
+        expected = 2 + round_no
+        while any(client.frames < expected for client in fast):
+            await asyncio.sleep(0.001)
+    elapsed = time.perf_counter() - started
+
+    for client in clients:
+        await client.close()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    return elapsed, handler.get_stats()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="PlanB websocket broadcast benchmark")
+    parser.add_argument("--clients", type=int, default=300)
+    parser.add_argument("--symbols", type=int, default=1000)
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--slow-delay", type=float, default=0.05, help="Yavaş istemcinin gönderim başına gecikmesi (s)")
+    parser.add_argument("--legacy-symbols", type=int, default=50, help="Eski yolla ölçülecek sembol sayısı")
+    parser.add_argument("--flush-interval", type=float, default=0.05)
+    args = parser.parse_args()
+    symbols = [f"SYM{i:04d}" for i in range(args.symbols)]
+
+    clients = [SinkSocket() for _ in range(args.clients - 1)] + [SinkSocket(args.slow_delay)]
+    legacy_time = asyncio.run(legacy(clients, symbols[:args.legacy_symbols], 1))
+    projected = legacy_time / args.legacy_symbols * args.symbols
+    print(f"🐢 Eski yayın: {args.legacy_symbols} sembol x {args.clients} istemci {legacy_time * 1000:.0f} ms "
+          f"(~{projected:.1f}s / tur, {args.symbols} sembol)")
+
+    clients = [SinkSocket() for _ in range(args.clients - 1)] + [SinkSocket(args.slow_delay)]
+    elapsed, stats = asyncio.run(pubsub(clients, symbols, args.rounds, args.flush_interval))
+    print(f"⚡ Yayın/abonelik: {args.rounds} tur x {args.symbols} sembol x {args.clients} istemci "
+          f"{elapsed * 1000:.0f} ms ({elapsed / args.rounds * 1000:.0f} ms / tur), "
+          f"{stats['serializations']} serileştirme, {stats['frames_sent']} kare, "
+          f"{stats['bytes_sent'] / 1e6:.1f} MB, yavaş kopma {stats['slow_disconnects']}")
+
+
+if __name__ == "__main__":
+    main()